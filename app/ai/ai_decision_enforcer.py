@@ -100,6 +100,30 @@ EXEC_REQUIRE_PREEXISTING_DECISION: bool = (
 )
 EXEC_PREEXISTING_MIN_AGE_MS: int = int(os.getenv("EXEC_PREEXISTING_MIN_AGE_MS", "5000") or "5000")
 
+# ---------------------------------------------------------------------------
+# trade_id index (app/ai/ai_decision_index.py)
+# ---------------------------------------------------------------------------
+# When enabled, candidate rows come from a persisted trade_id -> rows index
+# that follows the whole log (including rotated log.N files) instead of
+# re-parsing the last AI_DECISION_ENFORCER_TAIL_BYTES per trade.
+AI_DECISION_INDEX_ENABLED: bool = (
+    os.getenv("AI_DECISION_INDEX_ENABLED", "true").strip().lower()
+    in ("1", "true", "yes", "y", "on")
+)
+
+try:
+    from app.ai.ai_decision_index import F_CLIENT, F_TRADE, DecisionIndex, account_crc
+except Exception:  # pragma: no cover
+    DecisionIndex = None  # type: ignore
+
+# Row kinds stored in the index (same precedence as the scan below)
+KIND_OTHER = 0
+KIND_MANUAL = 1
+KIND_EXECUTOR_OUTPUT = 2
+KIND_PILOT_INPUT = 3
+
+_DECISION_INDEX = None
+
 
 def _matches_trade_id(d: Dict[str, Any], trade_id: str) -> bool:
     """
@@ -365,17 +389,84 @@ def _is_preexisting_ok(d: Dict[str, Any], now_ms: int) -> bool:
     return ts > 0 and ts < cutoff
 
 
-def _load_effective_input_decision(
+def _row_kind(d: Dict[str, Any]) -> Tuple[int, int]:
+    """Index summary for one decisions row: (kind, ts_ms)."""
+    if _is_manual_override_row(d):
+        kind = KIND_MANUAL
+    elif _is_executor_output_row(d):
+        kind = KIND_EXECUTOR_OUTPUT
+    elif _is_valid_pilot_input_row(d):
+        kind = KIND_PILOT_INPUT
+    else:
+        kind = KIND_OTHER
+    return kind, _ts_ms(d)
+
+
+def get_decision_index():
+    global _DECISION_INDEX
+    if DecisionIndex is None or not AI_DECISION_INDEX_ENABLED:
+        return None
+    if _DECISION_INDEX is None or _DECISION_INDEX.log_path != DECISIONS_PATH:
+        _DECISION_INDEX = DecisionIndex(DECISIONS_PATH, classify=_row_kind)
+    return _DECISION_INDEX
+
+
+def _collect_rows_indexed(
     trade_id: str,
-    *,
-    account_label: Optional[str] = None,
-) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
-    now_ms = int(time.time() * 1000)
+    account_label: Optional[str],
+    now_ms: int,
+) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]]:
+    """
+    Same filtering as the scan in _load_effective_input_decision, driven by
+    the index: executor outputs / too-new rows are decided from the posting
+    summary, only manual + pilot input rows are read back from the log.
+    Returns None if the index is unavailable (caller scans instead).
+    """
+    idx = get_decision_index()
+    if idx is None or not DECISIONS_PATH.exists() or not idx.catch_up():
+        return None
+
+    tid = str(trade_id or "")
+    if not tid:
+        return [], [], 0
+    need = (F_TRADE | F_CLIENT) if ":" in tid else 0xFF
+    want_crc = account_crc(account_label) if account_label else None
+    cutoff = now_ms - max(0, int(EXEC_PREEXISTING_MIN_AGE_MS))
 
     manual_rows: List[Dict[str, Any]] = []
     pilot_rows: List[Dict[str, Any]] = []
     filtered_too_new = 0
 
+    for p in idx.lookup(tid):
+        if not (p.fields & need):
+            continue
+        if want_crc is not None and p.acct_crc != want_crc:
+            continue
+        if EXEC_REQUIRE_PREEXISTING_DECISION and p.kind != KIND_MANUAL:
+            if not (p.ts_ms > 0 and p.ts_ms < cutoff):
+                filtered_too_new += 1
+                continue
+        if p.kind not in (KIND_MANUAL, KIND_PILOT_INPUT):
+            continue
+        d = idx.read_row(p)
+        if d is None or not _matches_trade_id(d, tid):
+            continue
+        if account_label and str(d.get("account_label") or "") != str(account_label):
+            continue
+        (manual_rows if p.kind == KIND_MANUAL else pilot_rows).append(d)
+
+    return manual_rows, pilot_rows, filtered_too_new
+
+
+def _collect_rows_scan(
+    trade_id: str,
+    account_label: Optional[str],
+    now_ms: int,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+    manual_rows: List[Dict[str, Any]] = []
+    pilot_rows: List[Dict[str, Any]] = []
+    filtered_too_new = 0
+
     for d in _read_lines_reverse():
         if not _matches_trade_id(d, trade_id):
             continue
@@ -399,6 +490,25 @@ def _load_effective_input_decision(
             pilot_rows.append(d)
             continue
 
+    return manual_rows, pilot_rows, filtered_too_new
+
+
+def _load_effective_input_decision(
+    trade_id: str,
+    *,
+    account_label: Optional[str] = None,
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    now_ms = int(time.time() * 1000)
+
+    collected = None
+    try:
+        collected = _collect_rows_indexed(trade_id, account_label, now_ms)
+    except Exception:
+        collected = None
+    if collected is None:
+        collected = _collect_rows_scan(trade_id, account_label, now_ms)
+    manual_rows, pilot_rows, filtered_too_new = collected
+
     if manual_rows:
         chosen = max(manual_rows, key=_ts_ms)
         return chosen, {
@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — trade_id → decision row index for ai_decisions.jsonl
+
+The enforcer used to re-read the last AI_DECISION_ENFORCER_TAIL_BYTES of the
+decisions log and json-parse every line for every trade it enforced. This
+index maps each trade identifier (trade_id / client_trade_id /
+source_trade_id) to the rows that carry it, newest first, together with a
+small per-row summary, so enforcement reads only the handful of rows that
+matter.
+
+Files (next to the log, e.g. state/ai_decisions.jsonl):
+  <log>.tidx   header + open-addressing hash table (key hash → newest posting)
+  <log>.tpost  postings, 32 bytes each:
+                 offset, length, ts_ms, next posting, account crc32,
+                 kind (caller-defined code), id-field mask, segment
+  <log>.tlock  writer lock (catch-up / rebuild)
+
+Both files are mmap'd. Exactly one process at a time extends them
+(catch_up under the lock); any number of processes can map them read-only
+(DecisionIndex(path, readonly=True)) and look up lock-free: postings are
+written before the slot that points at them, and a rebuilt/resized table
+is swapped in with os.replace after flagging the old one superseded.
+
+Rotation (ai_decision_logger renames log → log.1 → log.2 ...) is followed
+by inode plus head fingerprint (blake2b of the first 256 bytes, as in
+event_archive): every posting names a segment, the header keeps segment
+inode/fingerprint pairs, and rows are read from whichever log / log.N
+currently has that inode and head. Inodes are reused once the oldest
+rotated file is unlinked, so a matching inode alone proves nothing.
+Segments whose file is gone (or whose inode now holds another file) are
+marked dead and their postings skipped.
+
+Fail-soft: callers fall back to scanning the log if anything here fails.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from app.ops.file_lock import path_lock
+
+INITIAL_SLOTS = int(os.getenv("AI_DECISION_INDEX_SLOTS", "65536"))
+MAX_LOAD = 0.6
+
+# id-field mask bits
+F_TRADE = 1
+F_CLIENT = 2
+F_SOURCE = 4
+
+_MAGIC = b"FBTIX002"
+_PMAGIC = b"FBTPX001"
+# magic, nslots, nused, nposts, nsegs, active_seg, superseded, build_id, indexed_upto
+_HDR = struct.Struct("<8sIIIIIIQQ")
+_HDR_SIZE = 1024
+_SEG = struct.Struct("<QQQ")  # inode (0 = dead), size indexed so far, head fingerprint
+_SEG_OFF = 128
+MAX_SEGS = (_HDR_SIZE - _SEG_OFF) // _SEG.size
+_SLOT = struct.Struct("<QII")  # key hash, head posting + 1 (0 = none), count
+_PHDR = struct.Struct("<8sQ")  # magic, build_id
+_PHDR_SIZE = 64
+_POST = struct.Struct("<QIqIIBBH")
+_NO_NEXT = 0xFFFFFFFF
+_CHUNK = 4 * 1024 * 1024
+_HEAD_BYTES = 256
+
+
+def _head_fp(path: Path, size: int) -> int:
+    """Fingerprint of the first min(size, _HEAD_BYTES) bytes (append-only: stable once written)."""
+    with path.open("rb") as f:
+        head = f.read(min(int(size), _HEAD_BYTES))
+    return int.from_bytes(hashlib.blake2b(head, digest_size=8).digest(), "little")
+
+
+def _key_hash(key: str) -> int:
+    h = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+    return h | 1
+
+
+def account_crc(label: Any) -> int:
+    return zlib.crc32(str(label or "").encode("utf-8"))
+
+
+def _row_keys(row: Dict[str, Any]) -> Dict[str, int]:
+    keys: Dict[str, int] = {}
+    for field, bit in (("trade_id", F_TRADE), ("client_trade_id", F_CLIENT), ("source_trade_id", F_SOURCE)):
+        v = row.get(field)
+        if v is None:
+            continue
+        s = str(v)
+        if s:
+            keys[s] = keys.get(s, 0) | bit
+    return keys
+
+
+def _iter_lines(path: Path, start: int, end: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset, line) for complete lines in [start, end)."""
+    with path.open("rb") as f:
+        f.seek(start)
+        pos = start
+        carry = b""
+        while pos + len(carry) < end:
+            data = f.read(min(_CHUNK, end - pos - len(carry)))
+            if not data:
+                return
+            buf = carry + data
+            i = 0
+            while True:
+                j = buf.find(b"\n", i)
+                if j < 0:
+                    break
+                yield pos + i, buf[i:j]
+                i = j + 1
+            pos += i
+            carry = buf[i:]
+
+
+class Posting:
+    __slots__ = ("offset", "length", "ts_ms", "acct_crc", "kind", "fields", "seg")
+
+    def __init__(self, offset: int, length: int, ts_ms: int, acct_crc: int, kind: int, fields: int, seg: int) -> None:
+        self.offset = offset
+        self.length = length
+        self.ts_ms = ts_ms
+        self.acct_crc = acct_crc
+        self.kind = kind
+        self.fields = fields
+        self.seg = seg
+
+
+class DecisionIndex:
+    """
+    classify(row) -> (kind, ts_ms) is only needed by writers; it decides the
+    per-row summary stored in each posting.
+    """
+
+    def __init__(
+        self,
+        log_path: Path,
+        *,
+        classify: Optional[Callable[[Dict[str, Any]], Tuple[int, int]]] = None,
+        readonly: bool = False,
+    ) -> None:
+        self.log_path = Path(log_path)
+        self.tidx_path = self.log_path.with_name(self.log_path.name + ".tidx")
+        self.tpost_path = self.log_path.with_name(self.log_path.name + ".tpost")
+        self.lock_path = self.log_path.with_name(self.log_path.name + ".tlock")
+        self.classify = classify
+        self.readonly = bool(readonly) or classify is None
+        self._mu = threading.RLock()
+        self._tidx: Optional[mmap.mmap] = None
+        self._tpost: Optional[mmap.mmap] = None
+        self._nslots = 0
+        self._build_id = 0
+        self._seg_paths: Dict[int, Path] = {}
+        self.rebuilds = 0
+
+    # ------------------------------------------------------------------
+    # mapping
+    # ------------------------------------------------------------------
+
+    def close(self) -> None:
+        with self._mu:
+            for m in (self._tidx, self._tpost):
+                try:
+                    if m is not None:
+                        m.close()
+                except Exception:
+                    pass
+            self._tidx = self._tpost = None
+
+    def _map(self, path: Path) -> mmap.mmap:
+        flags = os.O_RDONLY if self.readonly else os.O_RDWR
+        fd = os.open(str(path), flags)
+        try:
+            access = mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE
+            return mmap.mmap(fd, 0, access=access)
+        finally:
+            os.close(fd)
+
+    def _header(self) -> Tuple[Any, ...]:
+        assert self._tidx is not None
+        return _HDR.unpack_from(self._tidx, 0)
+
+    def _open(self) -> bool:
+        """(Re)map the current files if not mapped or superseded. False if absent."""
+        if self._tidx is not None:
+            try:
+                if _HDR.unpack_from(self._tidx, 0)[6] == 0:
+                    return True
+            except Exception:
+                pass
+            self.close()
+        for _ in range(3):
+            try:
+                tidx = self._map(self.tidx_path)
+                tpost = self._map(self.tpost_path)
+            except Exception:
+                return False
+            hdr = _HDR.unpack_from(tidx, 0)
+            phdr = _PHDR.unpack_from(tpost, 0)
+            if hdr[0] == _MAGIC and phdr[0] == _PMAGIC and hdr[7] == phdr[1] and hdr[6] == 0:
+                self._tidx, self._tpost = tidx, tpost
+                self._nslots, self._build_id = hdr[1], hdr[7]
+                self._seg_paths = {}
+                return True
+            tidx.close()
+            tpost.close()  # caught between the two replaces of a rebuild; retry
+        return False
+
+    def _ensure_post_map(self, nposts: int) -> None:
+        assert self._tpost is not None
+        need = _PHDR_SIZE + nposts * _POST.size
+        if len(self._tpost) < need:
+            self._tpost.close()
+            self._tpost = self._map(self.tpost_path)
+
+    # ------------------------------------------------------------------
+    # hash table
+    # ------------------------------------------------------------------
+
+    def _probe(self, tidx: mmap.mmap, nslots: int, h: int) -> Tuple[int, int, int, int]:
+        """Return (slot_pos, hash, head, count) of the slot for h or the empty slot."""
+        i = h & (nslots - 1)
+        while True:
+            pos = _HDR_SIZE + i * _SLOT.size
+            sh, head, count = _SLOT.unpack_from(tidx, pos)
+            if sh == h or sh == 0:
+                return pos, sh, head, count
+            i = (i + 1) & (nslots - 1)
+
+    # ------------------------------------------------------------------
+    # read side (lock-free)
+    # ------------------------------------------------------------------
+
+    def lookup(self, key: str, *, limit: int = 10_000) -> List[Posting]:
+        """Postings for key, newest first (deduplicated by row)."""
+        out: List[Posting] = []
+        with self._mu:
+            if not key or not self._open():
+                return out
+            tidx = self._tidx
+            assert tidx is not None
+            nposts = _HDR.unpack_from(tidx, 0)[3]
+            self._ensure_post_map(nposts)
+            tpost = self._tpost
+            assert tpost is not None
+            _, sh, head, _ = self._probe(tidx, self._nslots, _key_hash(key))
+            if sh == 0 or head == 0:
+                return out
+            seen = set()
+            p = head - 1
+            while p != _NO_NEXT and p < nposts and len(out) < limit:
+                off, length, ts, nxt, crc, kind, fields, seg = _POST.unpack_from(tpost, _PHDR_SIZE + p * _POST.size)
+                if (seg, off) not in seen:
+                    seen.add((seg, off))
+                    out.append(Posting(off, length, ts, crc, kind, fields, seg))
+                p = nxt
+        return out
+
+    def _seg_matches(self, seg: int, path: Path, st: Optional[os.stat_result] = None) -> bool:
+        assert self._tidx is not None
+        inode, size, fp = _SEG.unpack_from(self._tidx, _SEG_OFF + seg * _SEG.size)
+        if not inode:
+            return False
+        try:
+            if st is None:
+                st = path.stat()
+            return int(st.st_ino) == inode and int(st.st_size) >= size and _head_fp(path, size) == fp
+        except Exception:
+            return False
+
+    def _segment_path(self, seg: int) -> Optional[Path]:
+        assert self._tidx is not None
+        if not _SEG.unpack_from(self._tidx, _SEG_OFF + seg * _SEG.size)[0]:
+            return None
+        p = self._seg_paths.get(seg)
+        if p is not None and self._seg_matches(seg, p):
+            return p
+        self._seg_paths.pop(seg, None)
+        for cand in self._candidate_paths():
+            if self._seg_matches(seg, cand):
+                self._seg_paths[seg] = cand
+                return cand
+        return None
+
+    def _candidate_paths(self) -> List[Path]:
+        out = [self.log_path]
+        prefix = self.log_path.name + "."
+        try:
+            rotated = []
+            for e in os.scandir(self.log_path.parent):
+                if e.name.startswith(prefix) and e.name[len(prefix):].isdigit():
+                    rotated.append((int(e.name[len(prefix):]), Path(e.path)))
+            out.extend(p for _, p in sorted(rotated))
+        except Exception:
+            pass
+        return out
+
+    def read_row(self, post: Posting) -> Optional[Dict[str, Any]]:
+        with self._mu:
+            if not self._open():
+                return None
+            path = self._segment_path(post.seg)
+        if path is None:
+            return None
+        try:
+            with path.open("rb") as f:
+                f.seek(post.offset)
+                raw = f.read(post.length)
+            row = orjson.loads(raw)
+            return row if isinstance(row, dict) else None
+        except Exception:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._mu:
+            if not self._open():
+                return {"present": False}
+            _, nslots, nused, nposts, nsegs, active, _, build_id, upto = self._header()
+            return {
+                "present": True,
+                "slots": nslots,
+                "keys": nused,
+                "postings": nposts,
+                "segments": nsegs,
+                "active_segment": active,
+                "indexed_upto": upto,
+                "tidx_bytes": _HDR_SIZE + nslots * _SLOT.size,
+                "tpost_bytes": _PHDR_SIZE + nposts * _POST.size,
+                "rebuilds": self.rebuilds,
+            }
+
+    # ------------------------------------------------------------------
+    # write side (under the writer lock)
+    # ------------------------------------------------------------------
+
+    def catch_up(self) -> bool:
+        """Index rows appended since the last catch-up (any process). Returns ok."""
+        if self.readonly:
+            return self._open()
+        with self._mu:
+            try:
+                st = self.log_path.stat()
+            except Exception:
+                st = None
+            try:
+                with path_lock(self.lock_path):
+                    self._catch_up_locked(st)
+                return True
+            except Exception:
+                return False
+
+    def rebuild(self) -> None:
+        with self._mu:
+            with path_lock(self.lock_path):
+                self._rebuild_locked()
+
+    def _catch_up_locked(self, st: Optional[os.stat_result]) -> None:
+        if not self._open():
+            self._rebuild_locked()
+            return
+        hdr = self._header()
+        nsegs, active, upto = hdr[4], hdr[5], hdr[8]
+        if st is None:
+            return
+        active_inode = _SEG.unpack_from(self._tidx, _SEG_OFF + active * _SEG.size)[0] if nsegs else 0
+        if nsegs and int(st.st_ino) == active_inode and _head_fp(self.log_path, min(upto, int(st.st_size))) == \
+                _SEG.unpack_from(self._tidx, _SEG_OFF + active * _SEG.size)[2]:
+            if st.st_size < upto:
+                self._rebuild_locked()  # truncated / rewritten in place
+                return
+            if st.st_size > upto:
+                self._index_segment(active, self.log_path, upto, int(st.st_size))
+            return
+        # rotated: finish the old active segment wherever it went, mark segments whose
+        # file is gone (or whose inode now holds another file) dead, then index every
+        # file we have not seen yet (oldest first; the new active log is last)
+        if nsegs:
+            old = self._segment_path(active)
+            if old is not None:
+                size = old.stat().st_size
+                if size > upto:
+                    self._index_segment(active, old, upto, size)
+        known = set()
+        for i in range(nsegs):
+            p = self._segment_path(i)
+            if p is None:
+                _SEG.pack_into(self._tidx, _SEG_OFF + i * _SEG.size, 0, 0, 0)
+            else:
+                known.add(p)
+        for path in reversed(self._candidate_paths()):
+            if path in known:
+                continue
+            try:
+                pst = path.stat()
+            except Exception:
+                continue
+            seg = self._header()[4]
+            if seg >= MAX_SEGS:
+                self._rebuild_locked()
+                return
+            _SEG.pack_into(self._tidx, _SEG_OFF + seg * _SEG.size, int(pst.st_ino), 0, _head_fp(path, 0))
+            self._set_header(nsegs=seg + 1, active_seg=seg, indexed_upto=0)
+            self._index_segment(seg, path, 0, int(pst.st_size))
+
+    def _set_header(self, **kw: int) -> None:
+        assert self._tidx is not None
+        magic, nslots, nused, nposts, nsegs, active, sup, build_id, upto = self._header()
+        vals = dict(nslots=nslots, nused=nused, nposts=nposts, nsegs=nsegs, active_seg=active,
+                    superseded=sup, build_id=build_id, indexed_upto=upto)
+        vals.update(kw)
+        _HDR.pack_into(
+            self._tidx, 0, magic, vals["nslots"], vals["nused"], vals["nposts"], vals["nsegs"],
+            vals["active_seg"], vals["superseded"], vals["build_id"], vals["indexed_upto"],
+        )
+
+    def _index_segment(self, seg: int, path: Path, start: int, end: int) -> None:
+        assert self._tidx is not None and self.classify is not None
+        hdr = self._header()
+        nused, nposts = hdr[2], hdr[3]
+        done = start
+        for off, line in _iter_lines(path, start, end):
+            done = off + len(line) + 1
+            s = line.strip()
+            if not s:
+                continue
+            try:
+                row = orjson.loads(s)
+            except Exception:
+                continue
+            if not isinstance(row, dict):
+                continue
+            keys = _row_keys(row)
+            if not keys:
+                continue
+            try:
+                kind, ts = self.classify(row)
+            except Exception:
+                continue
+            crc = account_crc(row.get("account_label"))
+            for key, fields in keys.items():
+                if (nused + 1) > self._nslots * MAX_LOAD:
+                    self._set_header(nused=nused, nposts=nposts)
+                    self._grow_slots()
+                self._grow_posts(nposts + 1)
+                h = _key_hash(key)
+                pos, sh, head, count = self._probe(self._tidx, self._nslots, h)
+                assert self._tpost is not None
+                _POST.pack_into(
+                    self._tpost, _PHDR_SIZE + nposts * _POST.size,
+                    off, len(line), int(ts), (head - 1) if head else _NO_NEXT, crc, int(kind) & 0xFF, fields, seg,
+                )
+                # slot head/count first, hash last: readers never see a half-built slot
+                struct.pack_into("<II", self._tidx, pos + 8, nposts + 1, count + 1)
+                if sh == 0:
+                    struct.pack_into("<Q", self._tidx, pos, h)
+                    nused += 1
+                nposts += 1
+        inode, _, fp = _SEG.unpack_from(self._tidx, _SEG_OFF + seg * _SEG.size)
+        if start < _HEAD_BYTES:
+            fp = _head_fp(path, done)
+        _SEG.pack_into(self._tidx, _SEG_OFF + seg * _SEG.size, inode, done, fp)
+        kw: Dict[str, int] = {"nused": nused, "nposts": nposts}
+        if seg == hdr[5]:
+            kw["indexed_upto"] = done
+        self._set_header(**kw)
+
+    def _grow_posts(self, need: int) -> None:
+        assert self._tpost is not None
+        size = _PHDR_SIZE + need * _POST.size
+        if len(self._tpost) >= size:
+            return
+        cur = os.path.getsize(self.tpost_path)
+        if cur < size:
+            new = max(size, _PHDR_SIZE + max(1024, (cur - _PHDR_SIZE) // _POST.size * 2) * _POST.size)
+            with open(self.tpost_path, "r+b") as f:
+                f.truncate(new)
+        self._tpost.close()
+        self._tpost = self._map(self.tpost_path)
+
+    def _grow_slots(self) -> None:
+        """Rehash into a table twice the size (hashes are stored, keys are not needed)."""
+        assert self._tidx is not None
+        old = self._tidx
+        nslots = self._nslots * 2
+        tmp = self.tidx_path.with_name(f"{self.tidx_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.truncate(_HDR_SIZE + nslots * _SLOT.size)
+        fd = os.open(str(tmp), os.O_RDWR)
+        try:
+            new = mmap.mmap(fd, 0, access=mmap.ACCESS_WRITE)
+        finally:
+            os.close(fd)
+        new[:_HDR_SIZE] = old[:_HDR_SIZE]
+        for i in range(self._nslots):
+            sh, head, count = _SLOT.unpack_from(old, _HDR_SIZE + i * _SLOT.size)
+            if sh == 0:
+                continue
+            pos, _, _, _ = self._probe(new, nslots, sh)
+            _SLOT.pack_into(new, pos, sh, head, count)
+        self._tidx, self._nslots = new, nslots
+        self._set_header(nslots=nslots)
+        new.flush()
+        os.replace(tmp, self.tidx_path)
+        # flag the old table so mapped readers re-open
+        hdr = list(_HDR.unpack_from(old, 0))
+        hdr[6] = 1
+        _HDR.pack_into(old, 0, *hdr)
+        old.close()
+
+    def _rebuild_locked(self) -> None:
+        """Fresh index over every log / log.N on disk (oldest first)."""
+        self.close()
+        self.rebuilds += 1
+        build_id = int.from_bytes(os.urandom(8), "little")
+        tidx_tmp = self.tidx_path.with_name(f"{self.tidx_path.name}.{os.getpid()}.tmp")
+        tpost_tmp = self.tpost_path.with_name(f"{self.tpost_path.name}.{os.getpid()}.tmp")
+        nslots = 1
+        while nslots < max(1024, INITIAL_SLOTS):
+            nslots *= 2
+        with open(tidx_tmp, "wb") as f:
+            f.truncate(_HDR_SIZE + nslots * _SLOT.size)
+            f.seek(0)
+            f.write(_HDR.pack(_MAGIC, nslots, 0, 0, 0, 0, 0, build_id, 0))
+        with open(tpost_tmp, "wb") as f:
+            f.write(_PHDR.pack(_PMAGIC, build_id).ljust(_PHDR_SIZE, b"\0"))
+            f.truncate(_PHDR_SIZE + 4096 * _POST.size)
+
+        # index into the temp files, then publish
+        final_tidx, final_tpost = self.tidx_path, self.tpost_path
+        self.tidx_path, self.tpost_path = tidx_tmp, tpost_tmp
+        try:
+            self._tidx, self._tpost = self._map(tidx_tmp), self._map(tpost_tmp)
+            self._nslots, self._build_id, self._seg_paths = nslots, build_id, {}
+            files = [p for p in reversed(self._candidate_paths()) if p.exists()]
+            for path in files[-MAX_SEGS:]:
+                try:
+                    st = path.stat()
+                except Exception:
+                    continue
+                seg = self._header()[4]
+                _SEG.pack_into(self._tidx, _SEG_OFF + seg * _SEG.size, int(st.st_ino), 0, _head_fp(path, 0))
+                self._set_header(nsegs=seg + 1, active_seg=seg, indexed_upto=0)
+                self._index_segment(seg, path, 0, int(st.st_size))
+            self._tidx.flush()
+            self._tpost.flush()
+        finally:
+            self.close()
+            self.tidx_path, self.tpost_path = final_tidx, final_tpost
+        old = None
+        try:
+            old = self._map(final_tidx) if final_tidx.exists() else None
+        except Exception:
+            old = None
+        os.replace(tpost_tmp, final_tpost)
+        os.replace(tidx_tmp, final_tidx)
+        if old is not None:
+            try:
+                hdr = list(_HDR.unpack_from(old, 0))
+                if hdr[0] == _MAGIC:
+                    hdr[6] = 1
+                    _HDR.pack_into(old, 0, *hdr)
+            except Exception:
+                pass
+            old.close()
+        self._open()
+
+
+__all__ = [
+    "DecisionIndex",
+    "Posting",
+    "account_crc",
+    "F_TRADE",
+    "F_CLIENT",
+    "F_SOURCE",
+]
@@ -1,15 +1,240 @@
 ﻿# ai_decision_scorer.py
 # READ-ONLY AI decision scoring (safe for PAPER / CANARY / LIVE)
+#
+# Scoring is a hash lookup into an in-process aggregate index keyed by
+# (strategy, symbol, account, setup bucket). The index is refreshed
+# incrementally: *.jsonl memory files are tailed by byte offset, other
+# files are parsed once per (mtime, size). Each file's contribution is kept,
+# so a removed, truncated or rewritten file is subtracted and only that file
+# is re-read. When a bucket has fewer than
+# AI_SCORING_MIN_OUTCOMES outcomes we fall back along AI_SCORING_FALLBACK
+# (coarser levels), ending at the global win rate.
 
 import json
 import os
-from statistics import mean
+import threading
+import time
 
 MEMORY_DIR = os.getenv("AI_MEMORY_PATH", "state/ai_memory")
 MIN_OUTCOMES = int(os.getenv("AI_SCORING_MIN_OUTCOMES", "1"))
+REFRESH_SEC = float(os.getenv("AI_SCORING_REFRESH_SEC", "1.0"))
+FALLBACK = os.getenv(
+    "AI_SCORING_FALLBACK",
+    "strategy+symbol+account+setup,strategy+symbol+account,strategy+symbol,strategy,*",
+)
+
+_FIELDS = ("strategy", "symbol", "account", "setup")
+_WILDCARDS = {"", "any", "*", "none", "null", "unknown"}
+
+
+def _parse_levels(spec):
+    levels = []
+    for part in str(spec or "").split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        if part == "*":
+            levels.append(())
+            continue
+        fields = tuple(f.strip() for f in part.split("+") if f.strip() in _FIELDS)
+        if fields and fields not in levels:
+            levels.append(fields)
+    if () not in levels:
+        levels.append(())
+    return levels
+
+
+LEVELS = _parse_levels(FALLBACK)
+
+
+def _norm(v, upper=False):
+    if v is None:
+        return None
+    s = str(v).strip()
+    if s.lower() in _WILDCARDS:
+        return None
+    return s.upper() if upper else s.lower()
+
+
+def _setup_of(d):
+    if not isinstance(d, dict):
+        return None
+    return _norm(d.get("setup_type") or d.get("regime") or d.get("setup_bucket"))
+
+
+def _dims(*, strategy, symbol, account, setup):
+    return {
+        "strategy": _norm(strategy),
+        "symbol": _norm(symbol, upper=True),
+        "account": _norm(account),
+        "setup": setup,
+    }
+
+
+def _key(level, dims):
+    vals = []
+    for f in level:
+        v = dims.get(f)
+        if v is None:
+            return None
+        vals.append(v)
+    return (level, tuple(vals))
+
+
+class _MemoryIndex:
+    """Aggregates per bucket: [n, wins, r_n, r_sum, r_sq_sum]."""
+
+    def __init__(self, memory_dir, levels):
+        self.memory_dir = memory_dir
+        self.levels = levels
+        self.buckets = {}
+        # name -> [mtime_ns, size, offset, {bucket key: aggregate}, records, inode]
+        self.files = {}
+        self.records = 0
+        self.last_refresh = 0.0
+        self.lock = threading.Lock()
+
+    def _add(self, row, contrib):
+        if not isinstance(row, dict):
+            return
+        outcome = row.get("outcome")
+        if not isinstance(outcome, dict) or "win" not in outcome or outcome["win"] is None:
+            return
+        win = 1 if outcome["win"] else 0
+        r = outcome.get("r_multiple")
+        try:
+            r = float(r) if r is not None else None
+        except Exception:
+            r = None
+        dims = _dims(
+            strategy=row.get("strategy"),
+            symbol=row.get("symbol") or row.get("symbol_scope"),
+            account=row.get("account_label") or row.get("account_scope"),
+            setup=_setup_of(row) or _setup_of(row.get("setup")),
+        )
+        for level in self.levels:
+            k = _key(level, dims)
+            if k is None:
+                continue
+            for agg in (self.buckets, contrib):
+                b = agg.get(k)
+                if b is None:
+                    b = agg[k] = [0, 0, 0, 0.0, 0.0]
+                b[0] += 1
+                b[1] += win
+                if r is not None:
+                    b[2] += 1
+                    b[3] += r
+                    b[4] += r * r
+        self.records += 1
+        return True
+
+    def _drop(self, name):
+        # subtract one file's contribution; emptied buckets disappear
+        prev = self.files.pop(name, None)
+        if prev is None:
+            return
+        for k, c in prev[3].items():
+            b = self.buckets.get(k)
+            if b is None:
+                continue
+            if b[0] <= c[0]:
+                del self.buckets[k]
+                continue
+            for i in range(5):
+                b[i] -= c[i]
+        self.records -= prev[4]
+
+    def _tail(self, path, offset, contrib):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n")
+        if end < 0:
+            return offset, 0
+        added = 0
+        for line in data[: end + 1].splitlines():
+            if not line.strip():
+                continue
+            try:
+                if self._add(json.loads(line), contrib):
+                    added += 1
+            except Exception:
+                continue
+        return offset + end + 1, added
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_refresh < REFRESH_SEC:
+            return
+        with self.lock:
+            if not force and now - self.last_refresh < REFRESH_SEC:
+                return
+            self.last_refresh = now
+            try:
+                entries = list(os.scandir(self.memory_dir))
+            except Exception:
+                return
+            seen = set()
+            for e in entries:
+                try:
+                    if not e.is_file():
+                        continue
+                    st = e.stat()
+                except Exception:
+                    continue
+                seen.add(e.name)
+                prev = self.files.get(e.name)
+                if prev is not None and prev[0] == st.st_mtime_ns and prev[1] == st.st_size:
+                    continue
+                jsonl = e.name.endswith(".jsonl")
+                if prev is not None and (not jsonl or st.st_size < prev[2] or st.st_ino != prev[5]):
+                    # rewritten or truncated: take this file back out and re-read it
+                    self._drop(e.name)
+                    prev = None
+                if prev is None:
+                    prev = self.files[e.name] = [0, 0, 0, {}, 0, st.st_ino]
+                try:
+                    if jsonl:
+                        prev[2], added = self._tail(e.path, prev[2], prev[3])
+                        prev[4] += added
+                    else:
+                        with open(e.path, "r", encoding="utf-8") as f:
+                            prev[4] += 1 if self._add(json.loads(f.readline()), prev[3]) else 0
+                        prev[2] = st.st_size
+                except Exception:
+                    if not jsonl:
+                        prev[2] = st.st_size
+                prev[0], prev[1] = st.st_mtime_ns, st.st_size
+            for name in [n for n in self.files if n not in seen]:
+                self._drop(name)
+
+    def lookup(self, dims):
+        for level in self.levels:
+            k = _key(level, dims)
+            if k is None:
+                continue
+            b = self.buckets.get(k)
+            if b is not None and b[0] >= MIN_OUTCOMES:
+                return level, b
+        return None, None
+
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_index():
+    global _INDEX
+    if _INDEX is None or _INDEX.memory_dir != MEMORY_DIR:
+        with _INDEX_LOCK:
+            if _INDEX is None or _INDEX.memory_dir != MEMORY_DIR:
+                _INDEX = _MemoryIndex(MEMORY_DIR, LEVELS)
+    return _INDEX
 
 
 def _load_memory():
+    # Legacy full scan (first line of every file); kept for tooling/benchmarks.
     if not os.path.isdir(MEMORY_DIR):
         return []
 
@@ -26,21 +251,40 @@ def _load_memory():
     return rows
 
 
-def score_decision(*, features, symbol, strategy, account_label, mode):
+def explain_decision(*, features, symbol, strategy, account_label, mode=None):
     """
-    Returns float score in [0,1] or None if insufficient memory
+    Returns the bucket used for scoring with its stats, or None if insufficient memory
     """
-    memory = _load_memory()
-    if len(memory) < MIN_OUTCOMES:
+    idx = get_index()
+    idx.refresh()
+    dims = _dims(strategy=strategy, symbol=symbol, account=account_label, setup=_setup_of(features))
+    level, b = idx.lookup(dims)
+    if b is None:
         return None
+    n, wins, r_n, r_sum, r_sq = b
+    avg_r = r_sum / r_n if r_n else None
+    r_std = max(0.0, r_sq / r_n - avg_r * avg_r) ** 0.5 if r_n else None
+    return {
+        "level": "+".join(level) or "*",
+        "n": n,
+        "wins": wins,
+        "win_rate": round(wins / n, 4),
+        "r_n": r_n,
+        "avg_r": round(avg_r, 4) if avg_r is not None else None,
+        "r_std": round(r_std, 4) if r_std is not None else None,
+    }
 
-    wins = []
-    for row in memory:
-        outcome = row.get("outcome", {})
-        if "win" in outcome:
-            wins.append(1.0 if outcome["win"] else 0.0)
 
-    if len(wins) < MIN_OUTCOMES:
+def score_decision(*, features, symbol, strategy, account_label, mode):
+    """
+    Returns float score in [0,1] or None if insufficient memory
+    """
+    info = explain_decision(features=features, symbol=symbol, strategy=strategy, account_label=account_label, mode=mode)
+    if info is None:
         return None
+    return info["win_rate"]
+
 
-    return round(mean(wins), 4)
+def index_stats():
+    idx = get_index()
+    return {"files": len(idx.files), "records": idx.records, "buckets": len(idx.buckets), "levels": ["+".join(l) or "*" for l in idx.levels]}
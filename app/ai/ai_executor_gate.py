@@ -12,7 +12,9 @@ Responsibilities:
   - Consider execution mode (PAPER / LIVE_CANARY / LIVE_FULL).
   - Accept an upstream "precheck" (classifier hard block) and make it auditable.
   - Return a structured decision payload.
-  - Append EVERY decision (allow or deny) to state/ai_policy_log.jsonl for audit.
+  - Keep rolling decision counters in memory (reason / strategy / mode /
+    account, score histograms) and flush them to a compact stats file.
+  - Append every block, plus a sample of allows, to state/ai_policy_log.jsonl.
 
 Policy source:
 --------------
@@ -44,17 +46,31 @@ B) mapping-style schema (legacy-friendly):
   "StratA": {"min_score": 0.55}
 }
 
+The policy file is compiled once per file version (mtime/size) into
+per-strategy thresholds; see get_compiled_policy().
+
 Logging:
 --------
 Writes to: state/ai_policy_log.jsonl
+  all blocks + AI_POLICY_LOG_SAMPLE_RATE of allows (1.0 = every decision)
+
+Counters:
+---------
+Writes to: state/ai_policy_counters_<ACCOUNT_LABEL>.json
+  every AI_POLICY_COUNTERS_FLUSH_SEC and at exit; cumulative across
+  restarts (seeded from the existing file). ai_policiy_stats reads these.
 """
 
 from __future__ import annotations
 
+import atexit
 import os
+import random
+import threading
 import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 
 import orjson
 
@@ -81,12 +97,33 @@ STATE_DIR.mkdir(parents=True, exist_ok=True)
 POLICY_PATH: Path = STATE_DIR / "setup_policy.json"
 POLICY_LOG_PATH: Path = STATE_DIR / "ai_policy_log.jsonl"
 
+ACCOUNT_LABEL: str = os.getenv("ACCOUNT_LABEL", "main").strip() or "main"
+COUNTERS_GLOB: str = "ai_policy_counters_*.json"
+COUNTERS_PATH: Path = STATE_DIR / f"ai_policy_counters_{ACCOUNT_LABEL}.json"
+
 log = get_logger("executor_ai_gate")
 
 # Optional kill switch for policy logging
 AI_POLICY_LOG_DISABLE = os.getenv("AI_POLICY_LOG_DISABLE", "false").lower() in ("1", "true", "yes")
 AI_POLICY_LOG_INCLUDE_FEATURES = os.getenv("AI_POLICY_LOG_INCLUDE_FEATURES", "true").lower() in ("1", "true", "yes")
 
+# Fraction of ALLOW decisions written to the JSONL log (blocks are always written)
+try:
+    AI_POLICY_LOG_SAMPLE_RATE = min(1.0, max(0.0, float(os.getenv("AI_POLICY_LOG_SAMPLE_RATE", "0.05"))))
+except Exception:
+    AI_POLICY_LOG_SAMPLE_RATE = 0.05
+
+try:
+    AI_POLICY_COUNTERS_FLUSH_SEC = float(os.getenv("AI_POLICY_COUNTERS_FLUSH_SEC", "30"))
+except Exception:
+    AI_POLICY_COUNTERS_FLUSH_SEC = 30.0
+
+# How often get_compiled_policy() stats setup_policy.json for edits
+try:
+    AI_POLICY_RECHECK_SEC = float(os.getenv("AI_POLICY_RECHECK_SEC", "1"))
+except Exception:
+    AI_POLICY_RECHECK_SEC = 1.0
+
 
 # ---------------------------------------------------------------------------
 # Policy loading (schema-adaptive)
@@ -191,6 +228,118 @@ def _resolve_policy_for_strategy(policy: Dict[str, Any], strategy_name: str) ->
     return merged
 
 
+# ---------------------------------------------------------------------------
+# Compiled policy (once per file version)
+# ---------------------------------------------------------------------------
+
+_ALL_MODES: Tuple[str, ...] = ("PAPER", "LIVE_CANARY", "LIVE_FULL")
+
+
+@dataclass(frozen=True)
+class StrategyThresholds:
+    """
+    Per-strategy policy, resolved and parsed once.
+
+    effective_min maps mode -> the min score that applies in that mode
+    (min_score_live / min_score_canary override min_score). The list fields
+    are shared by every decision built from this object; treat as read-only.
+    """
+    cfg: Dict[str, Any]
+    min_score: Optional[float]
+    min_score_live: Optional[float]
+    min_score_canary: Optional[float]
+    enabled_modes: FrozenSet[str]
+    missing_ok_modes: FrozenSet[str]
+    enabled_modes_list: List[str]
+    missing_ok_modes_list: List[str]
+    effective_min: Dict[str, Optional[float]]
+
+
+def compile_strategy_cfg(policy_cfg: Dict[str, Any]) -> StrategyThresholds:
+    min_score, min_score_live, min_score_canary = _extract_min_scores(policy_cfg)
+
+    enabled = policy_cfg.get("enabled_modes") or policy_cfg.get("modes") or list(_ALL_MODES)
+    enabled = [str(m).upper() for m in enabled if isinstance(m, (str, bytes))]
+
+    missing_ok = policy_cfg.get("missing_score_allow_modes", ["PAPER"])
+    missing_ok = [str(m).upper() for m in missing_ok if isinstance(m, (str, bytes))]
+
+    effective: Dict[str, Optional[float]] = {m: min_score for m in _ALL_MODES + ("UNKNOWN",)}
+    if min_score_live is not None:
+        effective["LIVE_FULL"] = min_score_live
+    if min_score_canary is not None:
+        effective["LIVE_CANARY"] = min_score_canary
+
+    return StrategyThresholds(
+        cfg=policy_cfg,
+        min_score=min_score,
+        min_score_live=min_score_live,
+        min_score_canary=min_score_canary,
+        enabled_modes=frozenset(enabled),
+        missing_ok_modes=frozenset(missing_ok),
+        enabled_modes_list=enabled,
+        missing_ok_modes_list=missing_ok,
+        effective_min=effective,
+    )
+
+
+class CompiledPolicy:
+    """
+    setup_policy.json normalized and compiled into StrategyThresholds.
+    Strategies not named in the file share the compiled __default__.
+    """
+
+    def __init__(self, policy: Dict[str, Any], version: Optional[Tuple[int, int]] = None) -> None:
+        self.policy = policy
+        self.version = version
+        self.default = compile_strategy_cfg(_resolve_policy_for_strategy(policy, "__default__"))
+        self._by_strategy: Dict[str, StrategyThresholds] = {}
+        for name in policy:
+            if name != "__default__" and isinstance(name, str):
+                self._by_strategy[name] = compile_strategy_cfg(_resolve_policy_for_strategy(policy, name))
+
+    def for_strategy(self, strategy_name: str) -> StrategyThresholds:
+        return self._by_strategy.get(strategy_name, self.default)
+
+
+_COMPILED: Optional[CompiledPolicy] = None
+_COMPILED_CHECKED: float = 0.0
+_COMPILED_LOCK = threading.Lock()
+
+
+def _policy_stat_key() -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(POLICY_PATH)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def get_compiled_policy() -> CompiledPolicy:
+    """
+    Compiled policy for the current setup_policy.json version.
+
+    The file is stat()ed at most every AI_POLICY_RECHECK_SEC and only re-read
+    and re-compiled when its (mtime, size) changes, so UI/Telegram edits
+    apply within a second.
+    """
+    global _COMPILED, _COMPILED_CHECKED
+    cur = _COMPILED
+    now = time.monotonic()
+    if cur is not None and (now - _COMPILED_CHECKED) < AI_POLICY_RECHECK_SEC:
+        return cur
+    key = _policy_stat_key()
+    _COMPILED_CHECKED = now
+    if cur is not None and cur.version == key:
+        return cur
+    with _COMPILED_LOCK:
+        cur = _COMPILED
+        if cur is None or cur.version != key:
+            cur = CompiledPolicy(load_setup_policy(), key)
+            _COMPILED = cur
+        return cur
+
+
 # ---------------------------------------------------------------------------
 # Logging helper
 # ---------------------------------------------------------------------------
@@ -198,18 +347,239 @@ def _resolve_policy_for_strategy(policy: Dict[str, Any], strategy_name: str) ->
 def _append_policy_log(decision: Dict[str, Any]) -> None:
     """
     Append a single JSONL line to ai_policy_log.jsonl.
+
+    Blocks are always written; allows only at AI_POLICY_LOG_SAMPLE_RATE
+    (the row carries log_sample_rate so readers can re-weight).
     """
     if AI_POLICY_LOG_DISABLE:
         return
+    if decision.get("allow") and AI_POLICY_LOG_SAMPLE_RATE < 1.0:
+        if random.random() >= AI_POLICY_LOG_SAMPLE_RATE:
+            return
+        decision = dict(decision, log_sample_rate=AI_POLICY_LOG_SAMPLE_RATE)
 
+    line = orjson.dumps(decision) + b"\n"
     try:
-        POLICY_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with POLICY_LOG_PATH.open("ab") as f:
-            f.write(orjson.dumps(decision) + b"\n")
+        try:
+            f = open(POLICY_LOG_PATH, "ab")
+        except FileNotFoundError:
+            POLICY_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+            f = open(POLICY_LOG_PATH, "ab")
+        with f:
+            f.write(line)
     except Exception as e:  # pragma: no cover
         log.exception("[ai_gate] Failed to append to %s: %r", POLICY_LOG_PATH, e)
 
 
+# ---------------------------------------------------------------------------
+# Rolling decision counters
+# ---------------------------------------------------------------------------
+
+SCORE_BUCKETS: Tuple[str, ...] = ("<0.2", "0.2-0.4", "0.4-0.6", "0.6-0.8", ">=0.8", "None")
+
+
+def score_bucket(score: Optional[float]) -> str:
+    if score is None:
+        return "None"
+    if score < 0.2:
+        return "<0.2"
+    if score < 0.4:
+        return "0.2-0.4"
+    if score < 0.6:
+        return "0.4-0.6"
+    if score < 0.8:
+        return "0.6-0.8"
+    return ">=0.8"
+
+
+def _bump(group: Dict[str, Dict[str, Any]], key: str, allow: bool, n: int = 1) -> Dict[str, Any]:
+    g = group.get(key)
+    if g is None:
+        g = group[key] = {"decisions": 0, "allowed": 0, "blocked": 0}
+    g["decisions"] += n
+    g["allowed" if allow else "blocked"] += n
+    return g
+
+
+class DecisionCounters:
+    """
+    Cumulative allow/block aggregates, cheap enough to update per decision.
+
+    observe() only bumps one flat (strategy, mode, account, reason, bucket,
+    allow) cell; the nested per-reason / strategy / mode / account view is
+    built in to_dict(), which is the on-disk format
+    (ai_policy_counters_<label>.json). merge_counters() folds several of
+    them together for the stats tool.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None) -> None:
+        self._lock = threading.Lock()
+        self._base: Dict[str, Any] = self.empty()
+        if isinstance(data, dict):
+            merge_counters(self._base, data)
+        self._cells: Dict[Tuple[str, str, str, str, str, bool], int] = {}
+        self._scores: Dict[str, List[float]] = {}
+        self._since_ms = 0
+        self._updated_ms = 0
+        self.dirty = False
+
+    @staticmethod
+    def empty() -> Dict[str, Any]:
+        return {
+            "schema_version": 1,
+            "since_ms": 0,
+            "updated_ms": 0,
+            "total": 0,
+            "allowed": 0,
+            "blocked": 0,
+            "by_reason": {},
+            "by_strategy": {},
+            "by_mode": {},
+            "by_account": {},
+            "score_histogram": {b: 0 for b in SCORE_BUCKETS},
+        }
+
+    def observe(self, decision: Dict[str, Any]) -> None:
+        score = decision.get("score")
+        strat = str(decision.get("strategy_name") or "unknown")
+        key = (
+            strat,
+            str(decision.get("mode") or "UNKNOWN").upper(),
+            str(decision.get("account_label") or "unknown"),
+            str(decision.get("reason") or "unknown"),
+            score_bucket(score),
+            bool(decision.get("allow")),
+        )
+        ts_ms = int(decision.get("ts_ms") or 0)
+        with self._lock:
+            self._cells[key] = self._cells.get(key, 0) + 1
+            if score is not None:
+                acc = self._scores.get(strat)
+                if acc is None:
+                    acc = self._scores[strat] = [0.0, 0]
+                acc[0] += score
+                acc[1] += 1
+            if not self._since_ms:
+                self._since_ms = ts_ms
+            if ts_ms > self._updated_ms:
+                self._updated_ms = ts_ms
+            self.dirty = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            cells = list(self._cells.items())
+            scores = {k: tuple(v) for k, v in self._scores.items()}
+            since_ms, updated_ms = self._since_ms, self._updated_ms
+            out = orjson.loads(orjson.dumps(self._base))
+
+        d = self.empty()
+        d["since_ms"], d["updated_ms"] = since_ms, updated_ms
+        for (strat, mode, acct, reason, bucket, allow), n in cells:
+            d["total"] += n
+            d["allowed" if allow else "blocked"] += n
+            d["by_reason"][reason] = d["by_reason"].get(reason, 0) + n
+            d["score_histogram"][bucket] += n
+            sg = _bump(d["by_strategy"], strat, allow, n)
+            sr = sg.setdefault("by_reason", {})
+            sr[reason] = sr.get(reason, 0) + n
+            sh = sg.setdefault("score_histogram", {})
+            sh[bucket] = sh.get(bucket, 0) + n
+            _bump(d["by_mode"], mode, allow, n)
+            _bump(d["by_account"], acct, allow, n)
+        for strat, (ssum, scnt) in scores.items():
+            sg = d["by_strategy"].get(strat)
+            if sg is not None:
+                sg["score_sum"] = ssum
+                sg["score_cnt"] = scnt
+        return merge_counters(out, d)
+
+
+def merge_counters(into: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Add counters `other` into `into` (in place) and return `into`.
+    Unknown / malformed parts of `other` are ignored.
+    """
+    def _add_map(dst: Dict[str, Any], src: Any) -> None:
+        if not isinstance(src, dict):
+            return
+        for k, v in src.items():
+            if isinstance(v, dict):
+                _add_map(dst.setdefault(k, {}), v)
+            elif isinstance(v, (int, float)) and not isinstance(v, bool):
+                dst[k] = dst.get(k, 0) + v
+
+    for k in ("total", "allowed", "blocked"):
+        v = other.get(k)
+        if isinstance(v, (int, float)):
+            into[k] = into.get(k, 0) + int(v)
+    for k in ("by_reason", "by_strategy", "by_mode", "by_account", "score_histogram"):
+        _add_map(into.setdefault(k, {}), other.get(k))
+    since = [x for x in (into.get("since_ms"), other.get("since_ms")) if isinstance(x, int) and x > 0]
+    into["since_ms"] = min(since) if since else 0
+    into["updated_ms"] = max(int(into.get("updated_ms") or 0), int(other.get("updated_ms") or 0))
+    return into
+
+
+_COUNTERS: Optional[DecisionCounters] = None
+_COUNTERS_INIT_LOCK = threading.Lock()
+_COUNTERS_LAST_FLUSH: float = 0.0
+
+
+def _load_counters_file(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        data = orjson.loads(path.read_bytes())
+        return data if isinstance(data, dict) else None
+    except Exception:
+        return None
+
+
+def get_decision_counters() -> DecisionCounters:
+    """
+    Process-wide counters, seeded from this label's counters file so the
+    totals survive restarts (delete the file to reset).
+    """
+    global _COUNTERS
+    if _COUNTERS is None:
+        with _COUNTERS_INIT_LOCK:
+            if _COUNTERS is None:
+                _COUNTERS = DecisionCounters(_load_counters_file(COUNTERS_PATH) if COUNTERS_PATH.exists() else None)
+                atexit.register(flush_decision_counters)
+    return _COUNTERS
+
+
+def flush_decision_counters(force: bool = False) -> bool:
+    """
+    Atomically write the counters file if anything changed. Returns True if
+    a write happened.
+    """
+    global _COUNTERS_LAST_FLUSH
+    c = _COUNTERS
+    if c is None or not (c.dirty or force):
+        return False
+    try:
+        c.dirty = False
+        data = c.to_dict()
+        data["account_label"] = ACCOUNT_LABEL
+        tmp = COUNTERS_PATH.with_suffix(".json.tmp")
+        tmp.write_bytes(orjson.dumps(data))
+        os.replace(tmp, COUNTERS_PATH)
+        _COUNTERS_LAST_FLUSH = time.time()
+        return True
+    except Exception as e:  # pragma: no cover
+        c.dirty = True
+        log.warning("[ai_gate] Failed to flush counters to %s: %r", COUNTERS_PATH, e)
+        return False
+
+
+def _record_decision(decision: Dict[str, Any]) -> None:
+    try:
+        get_decision_counters().observe(decision)
+        if time.time() - _COUNTERS_LAST_FLUSH >= AI_POLICY_COUNTERS_FLUSH_SEC:
+            flush_decision_counters()
+    except Exception as e:  # pragma: no cover
+        log.warning("[ai_gate] counters update failed: %r", e)
+
+
 # ---------------------------------------------------------------------------
 # Core gating logic
 # ---------------------------------------------------------------------------
@@ -244,14 +614,20 @@ def ai_gate_decide(
     mode: str,
     features: Dict[str, Any],
     raw_score: Optional[float],
-    policy_cfg: Dict[str, Any],
+    policy_cfg: Optional[Dict[str, Any]] = None,
     trade_id: Optional[str] = None,
     precheck_allow: Optional[bool] = None,
     precheck_reason: Optional[str] = None,
+    thresholds: Optional[StrategyThresholds] = None,
 ) -> Dict[str, Any]:
     """
     Core AI gate function. Returns a structured decision payload.
 
+    thresholds:
+      - Precompiled policy (get_compiled_policy().for_strategy(...)). When
+        omitted, policy_cfg is compiled for this call; when both are
+        omitted, the compiled policy for strategy_name is used.
+
     precheck_allow/precheck_reason:
       - If upstream classifier says "block", we enforce block here
         so policy logs reflect real execution.
@@ -260,13 +636,11 @@ def ai_gate_decide(
     mode_norm = _normalize_mode(mode)
     symbol_norm = str(symbol or "").upper()
 
-    min_score, min_score_live, min_score_canary = _extract_min_scores(policy_cfg)
-
-    enabled_modes = policy_cfg.get("enabled_modes") or policy_cfg.get("modes") or ["PAPER", "LIVE_CANARY", "LIVE_FULL"]
-    enabled_modes = [str(m).upper() for m in enabled_modes if isinstance(m, (str, bytes))]
-
-    missing_ok_modes = policy_cfg.get("missing_score_allow_modes", ["PAPER"])
-    missing_ok_modes = [str(m).upper() for m in missing_ok_modes if isinstance(m, (str, bytes))]
+    if thresholds is None:
+        if isinstance(policy_cfg, dict):
+            thresholds = compile_strategy_cfg(policy_cfg)
+        else:
+            thresholds = get_compiled_policy().for_strategy(str(strategy_name))
 
     score: Optional[float]
     try:
@@ -284,24 +658,19 @@ def ai_gate_decide(
         reason = f"precheck_block:{r}" if r else "precheck_block"
 
     # 1) Mode allowed?
-    if allow and mode_norm not in enabled_modes:
+    if allow and mode_norm not in thresholds.enabled_modes:
         allow = False
         reason = "mode_not_enabled"
 
     # 2) Missing score handling
     if allow and score is None:
-        if mode_norm not in missing_ok_modes:
+        if mode_norm not in thresholds.missing_ok_modes:
             allow = False
             reason = "missing_score_blocked"
 
     # 3) Threshold check
     if allow and score is not None:
-        effective_min: Optional[float] = min_score
-        if mode_norm == "LIVE_FULL" and min_score_live is not None:
-            effective_min = min_score_live
-        elif mode_norm == "LIVE_CANARY" and min_score_canary is not None:
-            effective_min = min_score_canary
-
+        effective_min = thresholds.effective_min.get(mode_norm)
         if effective_min is not None and score < effective_min:
             allow = False
             reason = "score_below_min"
@@ -315,12 +684,12 @@ def ai_gate_decide(
         "mode": mode_norm,
         "trade_id": trade_id,
         "score": score,
-        "min_score": min_score,
-        "min_score_live": min_score_live,
-        "min_score_canary": min_score_canary,
+        "min_score": thresholds.min_score,
+        "min_score_live": thresholds.min_score_live,
+        "min_score_canary": thresholds.min_score_canary,
         "policy_flags": {
-            "enabled_modes": enabled_modes,
-            "missing_score_allow_modes": missing_ok_modes,
+            "enabled_modes": thresholds.enabled_modes_list,
+            "missing_score_allow_modes": thresholds.missing_ok_modes_list,
         },
         "ts_ms": ts_ms,
     }
@@ -330,6 +699,7 @@ def ai_gate_decide(
     else:
         decision["features"] = {}
 
+    _record_decision(decision)
     _append_policy_log(decision)
     return decision
 
@@ -342,10 +712,11 @@ def should_allow_trade(
     mode: str,
     features: Dict[str, Any],
     raw_score: Optional[float],
-    policy_cfg: Dict[str, Any],
+    policy_cfg: Optional[Dict[str, Any]] = None,
     trade_id: Optional[str] = None,
     precheck_allow: Optional[bool] = None,
     precheck_reason: Optional[str] = None,
+    thresholds: Optional[StrategyThresholds] = None,
 ) -> bool:
     """
     Thin wrapper that runs ai_gate_decide and returns decision["allow"].
@@ -361,6 +732,7 @@ def should_allow_trade(
         trade_id=trade_id,
         precheck_allow=precheck_allow,
         precheck_reason=precheck_reason,
+        thresholds=thresholds,
     )
     return bool(decision.get("allow", False))
 
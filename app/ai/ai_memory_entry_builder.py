@@ -1,7 +1,21 @@
 ﻿#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Flashback — MemoryEntry Builder v1.5.0 (Phase 5)
+Flashback — MemoryEntry Builder v1.6.0 (Phase 5)
+
+v1.6.0 (incremental ingest):
+- Per-source byte offsets (setups / decisions / outcomes) persisted in SQLite
+  (ingest_offsets). Each run reads only lines appended since the last run;
+  a source that shrank or whose head bytes changed is re-read from 0.
+- Setups and decisions live in small pending tables (pending_setups,
+  pending_decisions) instead of full in-memory indexes rebuilt per run.
+  Matched rows are pruned after a grace period, unmatched ones after a TTL.
+- Outcomes that can't be matched yet (no setup / no decision) are parked in
+  pending_outcomes and retried on the next run.
+- Rows are written with executemany in sized transactions (BATCH_ROWS);
+  offsets + pending tables commit in the same transaction as the rows.
+- Rebuild drops secondary indexes for the bulk load and recreates them after.
+- Stats include run duration and rows/s.
 
 Fixes:
 - Provides build_memory_entries(...) public entrypoint (tool expects it)
@@ -10,8 +24,7 @@ Fixes:
     • outcome_enriched
     • outcome_record (auto-enrich via setups.jsonl by trade_id)
 - In ingest mode: SQLite insert first, JSONL append only if insert succeeded
-- Incremental ingest default:
-    • if since_ts_ms not provided, auto-derives from SQLite MAX(ts_ms) + 1
+- Incremental ingest default: resumes from per-source byte offsets (v1.6.0)
 
 History-safe. Deterministic. Fail-soft.
 """
@@ -21,17 +34,18 @@ from __future__ import annotations
 import argparse
 import hashlib
 import json
+import os
 import sqlite3
 import time
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
 
 from app.ai.ai_memory_contract import (
     ContractPaths,
-    append_jsonl,
     extract_fingerprints_from_setup,
     get_ts_ms,
-    iter_jsonl,
     normalize_symbol,
     normalize_timeframe,
     validate_decision_record,
@@ -42,12 +56,35 @@ from app.ai.ai_memory_contract import (
 # ----------------------------- SQLITE --------------------------------------
 
 
+# Rows per write transaction
+BATCH_ROWS = int(os.getenv("MEMORY_BUILDER_BATCH_ROWS", "2000"))
+# Pending setups/decisions: matched rows kept this long (more outcomes for the
+# same trade_id may follow), unmatched rows dropped after PENDING_TTL.
+MATCHED_GRACE_MS = int(float(os.getenv("MEMORY_BUILDER_MATCHED_GRACE_DAYS", "3")) * 86_400_000)
+PENDING_TTL_MS = int(float(os.getenv("MEMORY_BUILDER_PENDING_TTL_DAYS", "30")) * 86_400_000)
+
+_HEAD_BYTES = 256
+
+_SECONDARY_INDEXES: Tuple[Tuple[str, str], ...] = (
+    ("idx_mem_trade_ts", "memory_entries(trade_id, ts_ms DESC)"),
+    ("idx_mem_symbol_tf_ts", "memory_entries(symbol, timeframe, ts_ms DESC)"),
+    ("idx_mem_policy", "memory_entries(policy_hash)"),
+    ("idx_mem_memory_id", "memory_entries(memory_id)"),
+    ("idx_mem_mfp", "memory_entries(memory_fingerprint)"),
+)
+
+
 def _connect(db_path: Path) -> sqlite3.Connection:
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(db_path))
+    # isolation_level=None: we issue BEGIN/COMMIT ourselves around each batch.
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
     conn.execute("PRAGMA temp_store=MEMORY;")
+    conn.execute("PRAGMA cache_size=-65536;")  # 64 MiB page cache
+    conn.execute("PRAGMA mmap_size=268435456;")  # 256 MiB
+    conn.execute("PRAGMA wal_autocheckpoint=10000;")
+    conn.execute("PRAGMA journal_size_limit=67108864;")
     return conn
 
 
@@ -87,30 +124,60 @@ def _init_db(conn: sqlite3.Connection) -> None:
         """
     )
 
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_mem_trade_ts ON memory_entries(trade_id, ts_ms DESC);")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_mem_symbol_tf_ts ON memory_entries(symbol, timeframe, ts_ms DESC);")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_mem_policy ON memory_entries(policy_hash);")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_mem_memory_id ON memory_entries(memory_id);")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_mem_mfp ON memory_entries(memory_fingerprint);")
+    _create_secondary_indexes(conn)
 
-    conn.commit()
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingest_offsets (
+            source TEXT PRIMARY KEY,
+            path TEXT,
+            offset INTEGER NOT NULL,
+            head_sha1 TEXT,
+            updated_ms INTEGER
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS pending_setups (
+            trade_id TEXT PRIMARY KEY,
+            ts_ms INTEGER,
+            matched_ms INTEGER,
+            raw_json BLOB NOT NULL
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS pending_decisions (
+            key TEXT PRIMARY KEY,
+            ts_ms INTEGER,
+            matched_ms INTEGER,
+            raw_json BLOB NOT NULL
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS pending_outcomes (
+            key TEXT PRIMARY KEY,
+            ts_ms INTEGER,
+            first_seen_ms INTEGER,
+            reason TEXT,
+            raw_json BLOB NOT NULL
+        );
+        """
+    )
 
 
-def _get_latest_ts_ms(conn: sqlite3.Connection) -> Optional[int]:
-    try:
-        cur = conn.execute("SELECT MAX(ts_ms) FROM memory_entries;")
-        row = cur.fetchone()
-        if not row:
-            return None
-        v = row[0]
-        if v is None:
-            return None
-        return int(v)
-    except Exception:
-        return None
+def _create_secondary_indexes(conn: sqlite3.Connection) -> None:
+    for name, target in _SECONDARY_INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target};")
 
 
-# ----------------------------- HASHING / IDS -------------------------------
+def _drop_secondary_indexes(conn: sqlite3.Connection) -> None:
+    for name, _target in _SECONDARY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name};")
 
 
 def _sha256_hex(obj: Any) -> str:
@@ -177,69 +244,224 @@ def _memory_id_from(
     )
 
 
-# ----------------------------- INDEX BUILD ---------------------------------
+# ----------------------------- OFFSETS / TAILING ---------------------------
 
 
-def _load_setups_index(
-    paths: ContractPaths, *, max_lines: Optional[int] = None
-) -> Tuple[Dict[str, Dict[str, Any]], int, int]:
-    idx: Dict[str, Dict[str, Any]] = {}
-    ok_n = 0
-    bad_n = 0
+def _now_ms() -> int:
+    return int(time.time() * 1000)
 
-    for ev in iter_jsonl(paths.setups_path, max_lines=max_lines):
-        ok, _ = validate_setup_record(ev)
-        if not ok:
-            bad_n += 1
+
+def _head_sha1(path: Path, upto: int) -> str:
+    n = min(_HEAD_BYTES, max(0, upto))
+    if n <= 0:
+        return ""
+    try:
+        with path.open("rb") as f:
+            return hashlib.sha1(f.read(n)).hexdigest()
+    except Exception:
+        return ""
+
+
+def _get_offset(conn: sqlite3.Connection, source: str, path: Path) -> int:
+    """
+    Stored byte offset for `source`, or 0 if unknown / the file was rotated,
+    truncated or replaced (different path, shrunk, or head bytes changed).
+    """
+    row = conn.execute(
+        "SELECT path, offset, head_sha1 FROM ingest_offsets WHERE source = ?;", (source,)
+    ).fetchone()
+    if not row:
+        return 0
+    stored_path, offset, head = row[0], int(row[1] or 0), row[2] or ""
+    if stored_path != str(path) or not path.exists():
+        return 0
+    if path.stat().st_size < offset:
+        return 0
+    if offset > 0 and _head_sha1(path, offset) != head:
+        return 0
+    return offset
+
+
+def _set_offset(conn: sqlite3.Connection, source: str, path: Path, offset: int) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO ingest_offsets (source, path, offset, head_sha1, updated_ms) VALUES (?,?,?,?,?);",
+        (source, str(path), int(offset), _head_sha1(path, offset), _now_ms()),
+    )
+
+
+def _iter_new_jsonl(path: Path, offset: int, *, max_lines: Optional[int] = None) -> Iterator[Tuple[Optional[Dict[str, Any]], int]]:
+    """
+    Yield (obj_or_None, end_offset) for each complete line after `offset`.
+    A trailing partial line is not consumed. obj is None for blank/bad lines
+    (their offset still advances so they aren't retried forever).
+    """
+    if not path.exists():
+        return
+    n = 0
+    with path.open("rb") as f:
+        f.seek(offset)
+        pos = offset
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            if max_lines and n >= max_lines:
+                break
+            pos += len(raw)
+            n += 1
+            raw = _trim_json_bytes(raw)
+            obj: Any = None
+            if raw:
+                try:
+                    obj = orjson.loads(raw)
+                except Exception:
+                    last = raw.rfind(b"}")
+                    try:
+                        obj = orjson.loads(raw[: last + 1]) if last != -1 else None
+                    except Exception:
+                        obj = None
+            yield (obj if isinstance(obj, dict) else None), pos
+
+
+def _trim_json_bytes(raw: bytes) -> bytes:
+    raw = raw.strip()
+    if raw.startswith(b"\xef\xbb\xbf"):
+        raw = raw[3:].lstrip()
+    return raw.rstrip(b"\x00").rstrip()
+
+
+# ----------------------------- PENDING TABLES ------------------------------
+
+
+def _ingest_setups(
+    conn: sqlite3.Connection, path: Path, *, max_lines: Optional[int] = None
+) -> Tuple[int, int, int]:
+    """
+    Fold new setup_context lines into pending_setups (first-win per trade_id).
+    Returns (ok, bad, lines_read).
+    """
+    offset = _get_offset(conn, "setups", path)
+    ok_n = bad_n = lines = 0
+    batch: List[Tuple[str, int, bytes]] = []
+    end = offset
+
+    def _flush() -> None:
+        conn.execute("BEGIN;")
+        if batch:
+            conn.executemany(
+                "INSERT OR IGNORE INTO pending_setups (trade_id, ts_ms, matched_ms, raw_json) VALUES (?,?,NULL,?);",
+                batch,
+            )
+        _set_offset(conn, "setups", path, end)
+        conn.execute("COMMIT;")
+        batch.clear()
+
+    for ev, end in _iter_new_jsonl(path, offset, max_lines=max_lines):
+        lines += 1
+        if ev is None:
             continue
-        tid = str(ev.get("trade_id") or "").strip()
+        ok, _ = validate_setup_record(ev)
+        tid = str(ev.get("trade_id") or "").strip() if ok else ""
         if not tid:
             bad_n += 1
             continue
-        # Deterministic: first-win (file order). If duplicates exist, we keep earliest.
-        if tid not in idx:
-            idx[tid] = ev
+        batch.append((tid, get_ts_ms(ev, default=0), orjson.dumps(ev)))
         ok_n += 1
-
-    return idx, ok_n, bad_n
+        if len(batch) >= BATCH_ROWS:
+            _flush()
+    if lines:
+        _flush()
+    return ok_n, bad_n, lines
 
 
-def _load_decisions_map(
-    paths: ContractPaths, *, max_lines: Optional[int] = None
-) -> Tuple[Dict[str, Dict[str, Any]], int, int]:
-    out: Dict[str, Dict[str, Any]] = {}
-    ok_n = 0
-    bad_n = 0
-
-    for ev in iter_jsonl(paths.decisions_path, max_lines=max_lines):
+def _ingest_decisions(
+    conn: sqlite3.Connection, path: Path, *, max_lines: Optional[int] = None
+) -> Tuple[int, int, int]:
+    """
+    Fold new decision lines into pending_decisions keyed by trade_id and
+    client_trade_id (last-win, matching the old full-index behavior).
+    Returns (ok, bad, lines_read).
+    """
+    offset = _get_offset(conn, "decisions", path)
+    ok_n = bad_n = lines = 0
+    batch: List[Tuple[str, int, bytes]] = []
+    end = offset
+
+    def _flush() -> None:
+        conn.execute("BEGIN;")
+        if batch:
+            conn.executemany(
+                "INSERT OR REPLACE INTO pending_decisions (key, ts_ms, matched_ms, raw_json) VALUES (?,?,NULL,?);",
+                batch,
+            )
+        _set_offset(conn, "decisions", path, end)
+        conn.execute("COMMIT;")
+        batch.clear()
+
+    for ev, end in _iter_new_jsonl(path, offset, max_lines=max_lines):
+        lines += 1
+        if ev is None:
+            continue
         ok, _ = validate_decision_record(ev)
         if not ok:
             bad_n += 1
             continue
-
         tid = str(ev.get("trade_id") or "").strip()
         cid = str(ev.get("client_trade_id") or ev.get("clientTradeId") or "").strip()
-
+        ts = get_ts_ms(ev, default=0)
+        blob = orjson.dumps(ev)
         if tid:
-            out[tid] = ev
-        if cid:
-            out[cid] = ev
-
+            batch.append((tid, ts, blob))
+        if cid and cid != tid:
+            batch.append((cid, ts, blob))
         ok_n += 1
+        if len(batch) >= BATCH_ROWS:
+            _flush()
+    if lines:
+        _flush()
+    return ok_n, bad_n, lines
+
+
+def _lookup_json(conn: sqlite3.Connection, sql: str, key: str) -> Optional[Dict[str, Any]]:
+    row = conn.execute(sql, (key,)).fetchone()
+    if not row:
+        return None
+    try:
+        obj = orjson.loads(row[0])
+    except Exception:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def _prune_pending(conn: sqlite3.Connection) -> int:
+    now = _now_ms()
+    n = 0
+    conn.execute("BEGIN;")
+    for table in ("pending_setups", "pending_decisions"):
+        cur = conn.execute(
+            f"DELETE FROM {table} WHERE (matched_ms IS NOT NULL AND matched_ms < ?) "
+            f"OR (matched_ms IS NULL AND ts_ms > 0 AND ts_ms < ?);",
+            (now - MATCHED_GRACE_MS, now - PENDING_TTL_MS),
+        )
+        n += cur.rowcount or 0
+    cur = conn.execute("DELETE FROM pending_outcomes WHERE first_seen_ms < ?;", (now - PENDING_TTL_MS,))
+    n += cur.rowcount or 0
+    conn.execute("COMMIT;")
+    return n
+
 
-    return out, ok_n, bad_n
+# ----------------------------- ENRICH --------------------------------------
 
 
-def _try_enrich_outcome_record(raw: Dict[str, Any], setups_idx: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+def _try_enrich_outcome_record(raw: Dict[str, Any], setup: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     """
-    Convert outcome_record-like rows into an outcome_enriched envelope using setups.jsonl by trade_id.
+    Convert outcome_record-like rows into an outcome_enriched envelope using the
+    setup_context row for the same trade_id (from pending_setups).
     This prevents silently dropping historical outcomes.
     """
     tid = str(raw.get("trade_id") or "").strip()
     if not tid:
         return None
 
-    setup = setups_idx.get(tid)
     if not isinstance(setup, dict):
         return None
 
@@ -380,7 +602,19 @@ def _build_memory_entry(enriched: Dict[str, Any], decision: Dict[str, Any]) -> O
     return entry
 
 
-def _insert_entry(conn: sqlite3.Connection, entry: Dict[str, Any]) -> None:
+_INSERT_SQL = """
+    INSERT OR IGNORE INTO memory_entries (
+        entry_id, trade_id, ts_ms,
+        account_label, symbol, timeframe, strategy, setup_type, policy_hash,
+        allow, size_multiplier, decision, tier_used, gates_reason,
+        memory_id, setup_fingerprint, memory_fingerprint,
+        pnl_usd, r_multiple, win, exit_reason, pnl_kind,
+        raw_json
+    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?);
+"""
+
+
+def _entry_row(entry: Dict[str, Any]) -> Tuple[Any, ...]:
     d = entry.get("decision") if isinstance(entry.get("decision"), dict) else {}
     o = entry.get("outcome") if isinstance(entry.get("outcome"), dict) else {}
 
@@ -389,45 +623,47 @@ def _insert_entry(conn: sqlite3.Connection, entry: Dict[str, Any]) -> None:
             return None
         return 1 if bool(b) else 0
 
-    conn.execute(
-        """
-        INSERT OR IGNORE INTO memory_entries (
-            entry_id, trade_id, ts_ms,
-            account_label, symbol, timeframe, strategy, setup_type, policy_hash,
-            allow, size_multiplier, decision, tier_used, gates_reason,
-            memory_id, setup_fingerprint, memory_fingerprint,
-            pnl_usd, r_multiple, win, exit_reason, pnl_kind,
-            raw_json
-        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?);
-        """,
-        (
-            entry.get("entry_id"),
-            entry.get("trade_id"),
-            int(entry.get("ts_ms") or 0),
-            entry.get("account_label"),
-            entry.get("symbol"),
-            entry.get("timeframe"),
-            entry.get("strategy"),
-            entry.get("setup_type"),
-            entry.get("policy_hash"),
-            _i(d.get("allow")),
-            float(d.get("size_multiplier") or 1.0),
-            d.get("decision"),
-            d.get("tier_used"),
-            d.get("gates_reason"),
-            entry.get("memory_id"),
-            entry.get("setup_fingerprint"),
-            entry.get("memory_fingerprint"),
-            o.get("pnl_usd"),
-            o.get("r_multiple"),
-            _i(o.get("win")),
-            o.get("exit_reason"),
-            o.get("pnl_kind"),
-            json.dumps(entry, ensure_ascii=False),
-        ),
+    return (
+        entry.get("entry_id"),
+        entry.get("trade_id"),
+        int(entry.get("ts_ms") or 0),
+        entry.get("account_label"),
+        entry.get("symbol"),
+        entry.get("timeframe"),
+        entry.get("strategy"),
+        entry.get("setup_type"),
+        entry.get("policy_hash"),
+        _i(d.get("allow")),
+        float(d.get("size_multiplier") or 1.0),
+        d.get("decision"),
+        d.get("tier_used"),
+        d.get("gates_reason"),
+        entry.get("memory_id"),
+        entry.get("setup_fingerprint"),
+        entry.get("memory_fingerprint"),
+        o.get("pnl_usd"),
+        o.get("r_multiple"),
+        _i(o.get("win")),
+        o.get("exit_reason"),
+        o.get("pnl_kind"),
+        json.dumps(entry, ensure_ascii=False),
     )
 
 
+def _insert_entry(conn: sqlite3.Connection, entry: Dict[str, Any]) -> None:
+    conn.execute(_INSERT_SQL, _entry_row(entry))
+
+
+def _existing_entry_ids(conn: sqlite3.Connection, ids: List[str]) -> set:
+    out: set = set()
+    # SQLite default max variables is 999 on older builds; chunk conservatively.
+    for i in range(0, len(ids), 900):
+        chunk = ids[i : i + 900]
+        q = "SELECT entry_id FROM memory_entries WHERE entry_id IN (%s);" % ",".join("?" * len(chunk))
+        out.update(r[0] for r in conn.execute(q, chunk))
+    return out
+
+
 # ----------------------------- PUBLIC API ----------------------------------
 
 
@@ -446,10 +682,17 @@ def build_memory_entries(
     Public entrypoint expected by app.tools.ai_memory_entry_build.
 
     mode:
-      - "ingest" (default): incremental, history-safe, appends only on new DB insert
-      - "rebuild": wipes JSONL + SQLite and rebuilds from scratch
+      - "ingest" (default): incremental from stored per-source offsets,
+        history-safe, appends JSONL only for rows newly inserted in SQLite
+      - "rebuild": wipes JSONL + SQLite (incl. offsets/pending) and rebuilds from scratch
+
+    since_ts_ms: optional extra filter on outcome ts_ms (offsets already make
+    ingest incremental; this is no longer auto-derived from MAX(ts_ms)).
+    max_*_lines: cap on NEW lines read per source this run; the rest is picked
+    up next run.
     """
-    t0 = time.time()
+    t0 = time.perf_counter()
+    mode = mode.lower()
 
     local_paths = ContractPaths(
         setups_path=paths.setups_path,
@@ -459,41 +702,102 @@ def build_memory_entries(
         memory_index_path=db_path,
     )
 
-    setups_idx, setup_ok, setup_bad = _load_setups_index(local_paths, max_lines=max_setup_lines)
-    decisions_map, decision_ok, decision_bad = _load_decisions_map(local_paths, max_lines=max_decision_lines)
+    if mode == "rebuild":
+        if local_paths.memory_entries_path.exists():
+            local_paths.memory_entries_path.unlink()
+        for suffix in ("", "-wal", "-shm"):
+            p = Path(str(local_paths.memory_index_path) + suffix)
+            if p.exists():
+                p.unlink()
 
     conn = _connect(local_paths.memory_index_path)
     _init_db(conn)
+    if mode == "rebuild":
+        # Bulk load without per-insert index maintenance; recreated at the end.
+        _drop_secondary_indexes(conn)
 
-    if mode.lower() == "rebuild":
-        if local_paths.memory_entries_path.exists():
-            local_paths.memory_entries_path.unlink()
-        if local_paths.memory_index_path.exists():
-            conn.close()
-            local_paths.memory_index_path.unlink()
-            conn = _connect(local_paths.memory_index_path)
-            _init_db(conn)
-
-    if mode.lower() != "rebuild":
-        if since_ts_ms is None:
-            latest = _get_latest_ts_ms(conn)
-            since_ts_ms = (latest + 1) if latest is not None else None
+    setup_ok, setup_bad, setup_lines = _ingest_setups(conn, local_paths.setups_path, max_lines=max_setup_lines)
+    decision_ok, decision_bad, decision_lines = _ingest_decisions(
+        conn, local_paths.decisions_path, max_lines=max_decision_lines
+    )
 
     processed = 0
     inserted = 0
     skipped_existing = 0
     bad_rows = 0
     skipped_no_decision = 0
+    skipped_no_setup = 0
     skipped_old = 0
     enriched_from_setup = 0
-
-    for raw in iter_jsonl(local_paths.outcomes_path, max_lines=max_outcome_lines):
-        processed += 1
+    pending_retried = 0
+    pending_resolved = 0
+
+    now = _now_ms()
+    out_offset = _get_offset(conn, "outcomes", local_paths.outcomes_path)
+    out_end = out_offset
+
+    entries: List[Dict[str, Any]] = []
+    matched_setups: List[str] = []
+    matched_decisions: List[str] = []
+    resolved_pending: List[str] = []
+    new_pending: List[Tuple[str, int, int, str, bytes]] = []
+
+    def _flush() -> None:
+        nonlocal inserted, skipped_existing
+        # Dedupe within the batch, then against the table (so we only append
+        # JSONL for rows that were actually inserted).
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for e in entries:
+            by_id.setdefault(str(e.get("entry_id")), e)
+        existing = _existing_entry_ids(conn, list(by_id))
+        fresh = [e for eid, e in by_id.items() if eid not in existing]
+        skipped_existing += len(entries) - len(fresh)
+
+        conn.execute("BEGIN;")
+        if fresh:
+            conn.executemany(_INSERT_SQL, [_entry_row(e) for e in fresh])
+        if matched_setups:
+            conn.executemany(
+                "UPDATE pending_setups SET matched_ms = ? WHERE trade_id = ?;",
+                [(now, k) for k in matched_setups],
+            )
+        if matched_decisions:
+            conn.executemany(
+                "UPDATE pending_decisions SET matched_ms = ? WHERE key = ?;",
+                [(now, k) for k in matched_decisions],
+            )
+        if resolved_pending:
+            conn.executemany("DELETE FROM pending_outcomes WHERE key = ?;", [(k,) for k in resolved_pending])
+        if new_pending:
+            conn.executemany(
+                "INSERT OR REPLACE INTO pending_outcomes (key, ts_ms, first_seen_ms, reason, raw_json) VALUES (?,?,?,?,?);",
+                new_pending,
+            )
+        _set_offset(conn, "outcomes", local_paths.outcomes_path, out_end)
+        conn.execute("COMMIT;")
+
+        if fresh:
+            local_paths.memory_entries_path.parent.mkdir(parents=True, exist_ok=True)
+            with local_paths.memory_entries_path.open("ab") as fh:
+                fh.write(b"".join(orjson.dumps(e) + b"\n" for e in fresh))
+        inserted += len(fresh)
+
+        entries.clear()
+        matched_setups.clear()
+        matched_decisions.clear()
+        resolved_pending.clear()
+        new_pending.clear()
+
+    def _handle(raw: Dict[str, Any], pending_key: Optional[str]) -> None:
+        nonlocal bad_rows, skipped_no_decision, skipped_no_setup, enriched_from_setup, pending_resolved
 
         ts_ms = get_ts_ms(raw)
-        if mode.lower() != "rebuild" and since_ts_ms is not None and ts_ms < int(since_ts_ms):
-            skipped_old += 1
-            continue
+        tid = str(raw.get("trade_id") or "").strip()
+        key = pending_key or f"{tid}::{ts_ms}"
+
+        def _park(reason: str) -> None:
+            if pending_key is None and tid:
+                new_pending.append((key, ts_ms, now, reason, orjson.dumps(raw)))
 
         ev_type = str(raw.get("event_type") or "").strip()
         enriched: Optional[Dict[str, Any]] = None
@@ -501,47 +805,87 @@ def build_memory_entries(
         if ev_type == "outcome_enriched":
             ok, _ = validate_outcome_enriched(raw)
             enriched = raw if ok else None
+            if enriched is None:
+                bad_rows += 1
+                return
         else:
-            enriched = _try_enrich_outcome_record(raw, setups_idx)
-            if enriched is not None:
-                enriched_from_setup += 1
-
-        if enriched is None:
-            bad_rows += 1
-            continue
+            setup = _lookup_json(conn, "SELECT raw_json FROM pending_setups WHERE trade_id = ?;", tid) if tid else None
+            if setup is None:
+                skipped_no_setup += 1
+                _park("no_setup")
+                return
+            enriched = _try_enrich_outcome_record(raw, setup)
+            if enriched is None:
+                bad_rows += 1
+                if pending_key is not None:
+                    resolved_pending.append(pending_key)
+                return
+            enriched_from_setup += 1
+            matched_setups.append(tid)
 
         tid = str(enriched.get("trade_id") or "").strip()
         if not tid:
             bad_rows += 1
-            continue
+            return
 
-        decision = decisions_map.get(tid)
+        decision = _lookup_json(conn, "SELECT raw_json FROM pending_decisions WHERE key = ?;", tid)
         if not decision:
             skipped_no_decision += 1
-            continue
+            _park("no_decision")
+            return
+        matched_decisions.append(tid)
 
         entry = _build_memory_entry(enriched, decision)
+        if pending_key is not None:
+            resolved_pending.append(pending_key)
+            pending_resolved += 1
         if not entry:
             bad_rows += 1
+            return
+        entries.append(entry)
+
+    # 1) Retry outcomes parked on earlier runs (their setup/decision may have arrived).
+    if mode != "rebuild":
+        for pkey, blob in conn.execute("SELECT key, raw_json FROM pending_outcomes;").fetchall():
+            try:
+                raw = orjson.loads(blob)
+            except Exception:
+                resolved_pending.append(pkey)
+                continue
+            pending_retried += 1
+            _handle(raw, pkey)
+            if len(entries) >= BATCH_ROWS:
+                _flush()
+
+    # 2) New outcome lines since the stored offset.
+    for raw, out_end in _iter_new_jsonl(local_paths.outcomes_path, out_offset, max_lines=max_outcome_lines):
+        if raw is None:
             continue
-
-        before = conn.total_changes
-        _insert_entry(conn, entry)
-        after = conn.total_changes
-
-        if after == before:
-            skipped_existing += 1
-        else:
-            append_jsonl(local_paths.memory_entries_path, entry)
-            inserted += 1
-
-        if (inserted + skipped_existing) % 250 == 0:
-            conn.commit()
-
-    conn.commit()
+        processed += 1
+        if since_ts_ms is not None and get_ts_ms(raw) < int(since_ts_ms):
+            skipped_old += 1
+            continue
+        _handle(raw, None)
+        if len(entries) + len(new_pending) >= BATCH_ROWS:
+            _flush()
+
+    _flush()
+
+    if mode == "rebuild":
+        t_idx = time.perf_counter()
+        _create_secondary_indexes(conn)
+        index_build_sec = round(time.perf_counter() - t_idx, 3)
+    else:
+        index_build_sec = 0.0
+
+    pruned = _prune_pending(conn)
+    pending_counts = {
+        t: int(conn.execute(f"SELECT COUNT(*) FROM {t};").fetchone()[0])
+        for t in ("pending_setups", "pending_decisions", "pending_outcomes")
+    }
     conn.close()
 
-    elapsed = round(time.time() - t0, 3)
+    elapsed = time.perf_counter() - t0
 
     return {
         "processed_outcome_rows": processed,
@@ -552,14 +896,22 @@ def build_memory_entries(
         "setup_index_bad": setup_bad,
         "decision_index_ok": decision_ok,
         "decision_index_bad": decision_bad,
-        "elapsed_sec": elapsed,
-        "mode": mode.lower(),
+        "new_lines": {"setups": setup_lines, "decisions": decision_lines, "outcomes_offset": out_end},
+        "elapsed_sec": round(elapsed, 3),
+        "rows_per_sec": round(inserted / elapsed, 1) if elapsed > 0 else 0.0,
+        "index_build_sec": index_build_sec,
+        "mode": mode,
         "since_ts_ms": since_ts_ms,
         "outcomes_skipped_old": skipped_old,
         "skipped_no_decision": skipped_no_decision,
+        "skipped_no_setup": skipped_no_setup,
         "enriched_from_setup": enriched_from_setup,
-        "decisions_index_keys": len(decisions_map),
-        "setups_index_keys": len(setups_idx),
+        "pending_retried": pending_retried,
+        "pending_resolved": pending_resolved,
+        "pending_pruned": pruned,
+        "pending": pending_counts,
+        "decisions_index_keys": pending_counts["pending_decisions"],
+        "setups_index_keys": pending_counts["pending_setups"],
         "out_jsonl": str(out_jsonl),
         "db_path": str(db_path),
     }
@@ -572,9 +924,9 @@ def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--rebuild", action="store_true", help="Wipe + rebuild entries + index from scratch.")
     ap.add_argument("--ingest", action="store_true", help="Incremental ingest into SQLite + JSONL (default).")
-    ap.add_argument("--max-decisions", type=int, default=0, help="Max decision lines to scan (0 = no cap).")
-    ap.add_argument("--max-outcomes", type=int, default=0, help="Max outcomes lines to scan (0 = no cap).")
-    ap.add_argument("--max-setups", type=int, default=0, help="Max setup lines to scan (0 = no cap).")
+    ap.add_argument("--max-decisions", type=int, default=0, help="Max new decision lines to read (0 = no cap).")
+    ap.add_argument("--max-outcomes", type=int, default=0, help="Max new outcomes lines to read (0 = no cap).")
+    ap.add_argument("--max-setups", type=int, default=0, help="Max new setup lines to read (0 = no cap).")
     ap.add_argument("--since-ts-ms", type=int, default=0, help="Only ingest outcomes with ts_ms >= this (0 = disabled).")
     args = ap.parse_args()
 
@@ -600,7 +952,7 @@ def main() -> None:
         max_setup_lines=max_set,
     )
 
-    print("=== MemoryEntry Builder v1.5.0 ===")
+    print("=== MemoryEntry Builder v1.6.0 ===")
     for k, v in stats.items():
         print(f"{k}: {v}")
     print("DONE")
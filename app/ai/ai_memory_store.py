@@ -0,0 +1,974 @@
+﻿#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — AI Memory Store (resident rollups) v3.0
+
+v3.0 (resident store)
+- Rollups are built and updated incrementally from
+    state/ai_events/setups.jsonl      (setup_context: fingerprint / policy / tf)
+    state/ai_events/outcomes.v1.jsonl (trade_outcome: pnl / r / win)
+  joined by trade_id, keyed by
+    (memory_fingerprint, symbol, timeframe, setup_type, policy_hash).
+- Held in process memory:
+    hash index    memory_fingerprint -> rollups (Tier A = same list filtered by symbol)
+    prefix index  sorted fingerprints, bisect for short (prefix) fingerprints
+  so Tier A / Tier B lookups never touch SQLite.
+- Durable backing: state/ai_memory/memory_rollups.v3.sqlite holds the
+  rollup accumulators, the trade_id -> setup join keys, parked outcomes and
+  the per-source byte offsets, written in one transaction. A restart loads
+  that and tails only the new bytes; a rewritten/truncated source rebuilds.
+- A daemon thread tails + persists (AI_MEMORY_STORE_REFRESH_SEC /
+  AI_MEMORY_STORE_PERSIST_SEC); queries only take a short lock.
+
+Query contract (unchanged from v2.3)
+- Tier A: symbol-scoped, Tier B: ANY fallback
+- Strict policy + timeframe by default; policy_hash / memory_fingerprint
+  may be prefixes.
+- memory["size_multiplier"] = clamp(avg_size_multiplier, 0..1).
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from app.ai.ai_memory_contract import extract_fingerprints_from_setup, get_ts_ms
+
+try:
+    from app.core.config import settings  # type: ignore
+    ROOT: Path = settings.ROOT  # type: ignore
+except Exception:  # pragma: no cover
+    ROOT = Path(__file__).resolve().parents[2]
+
+try:
+    from app.core.log import get_logger  # type: ignore
+except Exception:  # pragma: no cover
+    import logging
+
+    def get_logger(name: str) -> "logging.Logger":  # type: ignore
+        logger_ = logging.getLogger(name)
+        if not logger_.handlers:
+            handler = logging.StreamHandler()
+            fmt = logging.Formatter("%(asctime)s [%(levelname)s] [%(name)s] %(message)s")
+            handler.setFormatter(fmt)
+            logger_.addHandler(handler)
+        return logger_
+
+logger = get_logger("ai_memory_store")
+
+STATE_DIR: Path = ROOT / "state"
+AI_MEMORY_DIR: Path = STATE_DIR / "ai_memory"
+
+
+def _env_path(name: str, default: Path) -> Path:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    p = Path(raw)
+    return p if p.is_absolute() else ROOT / p
+
+
+ROLLUPS_DB: Path = _env_path("AI_MEMORY_ROLLUPS_DB", AI_MEMORY_DIR / "memory_rollups.v3.sqlite")
+SETUPS_PATH: Path = _env_path("AI_MEMORY_SETUPS_PATH", STATE_DIR / "ai_events" / "setups.jsonl")
+OUTCOMES_PATH: Path = _env_path("AI_MEMORY_OUTCOMES_PATH", STATE_DIR / "ai_events" / "outcomes.v1.jsonl")
+
+REFRESH_SEC = float(os.getenv("AI_MEMORY_STORE_REFRESH_SEC", "1.0"))
+PERSIST_SEC = float(os.getenv("AI_MEMORY_STORE_PERSIST_SEC", "5.0"))
+PENDING_TTL_MS = int(float(os.getenv("AI_MEMORY_STORE_PENDING_TTL_DAYS", "30")) * 86_400_000)
+BACKGROUND = os.getenv("AI_MEMORY_STORE_BACKGROUND", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+
+_HEAD_BYTES = 256
+_CHUNK = 4 * 1024 * 1024
+_LOCK_LINES = 512  # lines ingested per lock hold (keeps query stalls short)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _normalize_timeframe(tf: Any) -> Optional[str]:
+    if tf is None:
+        return None
+    try:
+        s = str(tf).strip().lower()
+    except Exception:
+        return None
+    if not s:
+        return None
+    if s.endswith(("m", "h", "d", "w")):
+        return s
+    try:
+        n = int(float(s))
+        if n > 0:
+            return f"{n}m"
+    except Exception:
+        return None
+    return None
+
+
+def _normalize_symbol(sym: Any) -> Optional[str]:
+    if sym is None:
+        return None
+    try:
+        s = str(sym).strip().upper()
+    except Exception:
+        return None
+    return s or None
+
+
+def _safe_str(x: Any) -> str:
+    try:
+        return str(x).strip() if x is not None else ""
+    except Exception:
+        return ""
+
+
+def _opt_float(x: Any) -> Optional[float]:
+    try:
+        return None if x is None or x == "" else float(x)
+    except Exception:
+        return None
+
+
+def _clamp(x: float, lo: float, hi: float) -> float:
+    try:
+        return max(lo, min(hi, float(x)))
+    except Exception:
+        return lo
+
+
+def _looks_like_full_hash(s: str) -> bool:
+    s = (s or "").strip()
+    return len(s) >= 24
+
+
+def _looks_like_full_fp(s: str) -> bool:
+    # fingerprints are typically sha256 hex (64), but callers might pass shorter prefixes
+    s = (s or "").strip()
+    return len(s) >= 32
+
+
+def _memory_id(memory_fingerprint: str, policy_hash: str, symbol: str, timeframe: str) -> str:
+    # same derivation as ai_memory_entry_builder (account_scope="global")
+    s = json.dumps(
+        {
+            "account_scope": "global",
+            "memory_fingerprint": memory_fingerprint,
+            "policy_hash": policy_hash,
+            "symbol_scope": symbol,
+            "timeframe": timeframe,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(s.encode("utf-8", errors="ignore")).hexdigest()
+
+
+@dataclass(frozen=True)
+class QueryOptions:
+    k: int = 25
+    min_n: int = 3
+    min_n_symbol: Optional[int] = None
+    min_n_any: Optional[int] = None
+
+    policy_match: str = "strict"       # "strict" | "off"
+    timeframe_match: str = "strict"    # "strict" | "off"
+    max_age_days: int = 180
+
+    prefer_symbol_scope: bool = True
+    allow_any_fallback: bool = True
+
+
+def _effective_min_n(opts: QueryOptions, tier: str) -> int:
+    if tier == "A" and opts.min_n_symbol is not None:
+        return max(1, int(opts.min_n_symbol))
+    if tier == "B" and opts.min_n_any is not None:
+        return max(1, int(opts.min_n_any))
+    if tier == "A":
+        return 1
+    return max(1, int(opts.min_n))
+
+
+# ---------------------------------------------------------------------------
+# Rollup accumulator
+# ---------------------------------------------------------------------------
+
+RollupKey = Tuple[str, str, str, str, str]  # (memory_fingerprint, symbol, timeframe, setup_type, policy_hash)
+
+
+class _Rollup:
+    __slots__ = (
+        "key", "memory_id", "n", "wins", "losses", "r_n", "r_sum", "pnl_n", "pnl_sum",
+        "allow_n", "allow_sum", "size_n", "size_sum", "last_ts_ms",
+    )
+
+    def __init__(self, key: RollupKey, memory_id: str) -> None:
+        self.key = key
+        self.memory_id = memory_id
+        self.n = self.wins = self.losses = 0
+        self.r_n = self.pnl_n = self.allow_n = self.size_n = 0
+        self.r_sum = self.pnl_sum = self.allow_sum = self.size_sum = 0.0
+        self.last_ts_ms = 0
+
+    def add(self, ts_ms: int, win: Optional[bool], r: Optional[float], pnl: Optional[float],
+            allow: Optional[bool], size_mult: Optional[float]) -> None:
+        self.n += 1
+        if win is True:
+            self.wins += 1
+        elif win is False:
+            self.losses += 1
+        if r is not None:
+            self.r_n += 1
+            self.r_sum += r
+        if pnl is not None:
+            self.pnl_n += 1
+            self.pnl_sum += pnl
+        if allow is not None:
+            self.allow_n += 1
+            self.allow_sum += 1.0 if allow else 0.0
+        if size_mult is not None:
+            self.size_n += 1
+            self.size_sum += size_mult
+        if ts_ms > self.last_ts_ms:
+            self.last_ts_ms = ts_ms
+
+    @property
+    def avg_r(self) -> float:
+        return self.r_sum / self.r_n if self.r_n else 0.0
+
+    @property
+    def win_rate(self) -> Optional[float]:
+        known = self.wins + self.losses
+        return self.wins / known if known else None
+
+    def sort_key(self) -> Tuple[float, float, int, int]:
+        # ORDER BY avg_r_multiple DESC, win_rate DESC, n DESC, last_ts_ms DESC
+        wr = self.win_rate
+        return (self.avg_r, wr if wr is not None else -1.0, self.n, self.last_ts_ms)
+
+    def row(self) -> Tuple[Any, ...]:
+        return (*self.key, self.memory_id or None, self.n, self.wins, self.losses, self.r_n, self.r_sum,
+                self.pnl_n, self.pnl_sum, self.allow_n, self.allow_sum, self.size_n, self.size_sum,
+                self.last_ts_ms)
+
+    @classmethod
+    def from_row(cls, r: Tuple[Any, ...]) -> "_Rollup":
+        ru = cls((r[0], r[1], r[2], r[3], r[4]), r[5] or "")
+        (ru.n, ru.wins, ru.losses, ru.r_n, ru.r_sum, ru.pnl_n, ru.pnl_sum,
+         ru.allow_n, ru.allow_sum, ru.size_n, ru.size_sum, ru.last_ts_ms) = r[6:18]
+        return ru
+
+    def to_memory(self) -> Dict[str, Any]:
+        """
+        Memory dict shape expected by ai_gatekeeper AND AI Pilot sizing
+        (top-level size_multiplier surfaced from avg_size_multiplier).
+        """
+        avg_size_mult = self.size_sum / self.size_n if self.size_n else 1.0
+        fp, sym, tf, st, ph = self.key
+        if not self.memory_id:
+            self.memory_id = _memory_id(fp, ph, sym, tf)  # derived lazily; not needed for lookups
+        return {
+            "memory_fingerprint": fp,
+            "memory_id": self.memory_id,
+            "symbol": sym or None,
+            "timeframe": tf or None,
+            "setup_type": st or None,
+            "policy_hash": ph or None,
+            "last_ts_ms": int(self.last_ts_ms),
+            "size_multiplier": float(_clamp(avg_size_mult, 0.0, 1.0)),
+            "stats": {
+                "n": self.n,
+                "wins": self.wins,
+                "losses": self.losses,
+                "r_mean": float(self.avg_r),
+                "r_sum": float(self.r_sum),
+                "win_rate": self.win_rate,
+                "avg_pnl_usd": self.pnl_sum / self.pnl_n if self.pnl_n else None,
+                "allow_rate": self.allow_sum / self.allow_n if self.allow_n else None,
+                "avg_size_multiplier": float(avg_size_mult),
+            },
+        }
+
+
+# ---------------------------------------------------------------------------
+# Source parsing
+# ---------------------------------------------------------------------------
+
+def _setup_fields(ev: Dict[str, Any]) -> Tuple[str, str, str, str, str]:
+    """(policy_hash, timeframe, setup_type, symbol, memory_fingerprint) of a setup-like event."""
+    policy = ev.get("policy") if isinstance(ev.get("policy"), dict) else {}
+    payload = ev.get("payload") if isinstance(ev.get("payload"), dict) else {}
+    features = payload.get("features") if isinstance(payload.get("features"), dict) else {}
+    extra = payload.get("extra") if isinstance(payload.get("extra"), dict) else {}
+
+    policy_hash = _safe_str(policy.get("policy_hash"))
+    timeframe = _normalize_timeframe(ev.get("timeframe")) or _normalize_timeframe(extra.get("timeframe")) or ""
+    setup_type = _safe_str(ev.get("setup_type") or payload.get("setup_type") or features.get("setup_type"))
+    symbol = _normalize_symbol(ev.get("symbol")) or ""
+    mem_fp = _safe_str(features.get("memory_fingerprint"))
+    if not mem_fp:
+        try:
+            mem_fp = _safe_str(extract_fingerprints_from_setup(ev)[1])
+        except Exception:
+            mem_fp = ""
+    return policy_hash, timeframe, setup_type, symbol, mem_fp
+
+
+# trade_id -> [key, allow, size_multiplier, ts_ms, applied_ts_ms]
+_SetupRec = List[Any]
+
+
+def _parse_setup(ev: Dict[str, Any]) -> Optional[Tuple[str, _SetupRec]]:
+    if str(ev.get("event_type") or "") != "setup_context":
+        return None
+    tid = _safe_str(ev.get("trade_id"))
+    if not tid:
+        return None
+    ph, tf, st, sym, fp = _setup_fields(ev)
+    if not fp:
+        return None
+    extra = ev.get("extra") if isinstance(ev.get("extra"), dict) else {}
+    allow = ev.get("allow", extra.get("allow"))
+    size_mult = _opt_float(ev.get("size_multiplier", extra.get("size_multiplier")))
+    return tid, [(fp, sym, tf, st, ph), (bool(allow) if allow is not None else None), size_mult, get_ts_ms(ev, 0), 0]
+
+
+def _parse_outcome(ev: Dict[str, Any]) -> Optional[Tuple[str, int, Optional[bool], Optional[float], Optional[float]]]:
+    tid = _safe_str(ev.get("trade_id"))
+    if not tid:
+        return None
+    et = str(ev.get("event_type") or "")
+    if et and et not in ("trade_outcome", "outcome_record", "outcome_enriched"):
+        return None
+    stats = ev.get("stats") if isinstance(ev.get("stats"), dict) else {}
+    try:
+        ts = int(ev.get("closed_ts_ms") or 0) or get_ts_ms(ev, 0)
+    except Exception:
+        ts = get_ts_ms(ev, 0)
+    pnl = _opt_float(ev.get("pnl_usd", stats.get("pnl_usd")))
+    r = _opt_float(ev.get("r_multiple", stats.get("r_multiple")))
+    win_raw = ev.get("win", stats.get("win"))
+    win = bool(win_raw) if win_raw is not None else (pnl > 0 if pnl is not None else None)
+    return tid, int(ts), win, r, pnl
+
+
+def _head_sha1(path: Path, upto: int) -> str:
+    n = min(_HEAD_BYTES, max(0, upto))
+    if n <= 0:
+        return ""
+    try:
+        with path.open("rb") as f:
+            return hashlib.sha1(f.read(n)).hexdigest()
+    except Exception:
+        return ""
+
+
+def _iter_new_lines(path: Path, offset: int) -> Iterator[Tuple[bytes, int]]:
+    """(line, end_offset) for complete lines after offset; a trailing partial line is left."""
+    try:
+        f = path.open("rb")
+    except Exception:
+        return
+    with f:
+        f.seek(offset)
+        pos = offset
+        carry = b""
+        while True:
+            data = f.read(_CHUNK)
+            if not data:
+                return
+            buf = carry + data
+            i = 0
+            while True:
+                j = buf.find(b"\n", i)
+                if j < 0:
+                    break
+                yield buf[i:j], pos + j + 1
+                i = j + 1
+            pos += i
+            carry = buf[i:]
+
+
+# ---------------------------------------------------------------------------
+# SQLite backing
+# ---------------------------------------------------------------------------
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS rollups (
+        memory_fingerprint TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        timeframe TEXT NOT NULL,
+        setup_type TEXT NOT NULL,
+        policy_hash TEXT NOT NULL,
+        memory_id TEXT,
+        n INTEGER NOT NULL, wins INTEGER NOT NULL, losses INTEGER NOT NULL,
+        r_n INTEGER NOT NULL, r_sum REAL NOT NULL,
+        pnl_n INTEGER NOT NULL, pnl_sum REAL NOT NULL,
+        allow_n INTEGER NOT NULL, allow_sum REAL NOT NULL,
+        size_n INTEGER NOT NULL, size_sum REAL NOT NULL,
+        last_ts_ms INTEGER NOT NULL,
+        PRIMARY KEY (memory_fingerprint, symbol, timeframe, setup_type, policy_hash)
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS setup_keys (
+        trade_id TEXT PRIMARY KEY,
+        memory_fingerprint TEXT NOT NULL, symbol TEXT, timeframe TEXT, setup_type TEXT, policy_hash TEXT,
+        allow INTEGER, size_multiplier REAL, ts_ms INTEGER NOT NULL, applied_ts_ms INTEGER NOT NULL
+    );
+    """,
+    "CREATE TABLE IF NOT EXISTS pending_outcomes (trade_id TEXT NOT NULL, ts_ms INTEGER NOT NULL, raw_json BLOB NOT NULL);",
+    "CREATE TABLE IF NOT EXISTS ingest_offsets (source TEXT PRIMARY KEY, path TEXT, offset INTEGER, head_sha1 TEXT, updated_ms INTEGER);",
+)
+
+_ROLLUP_COLS = (
+    "memory_fingerprint, symbol, timeframe, setup_type, policy_hash, memory_id, n, wins, losses, "
+    "r_n, r_sum, pnl_n, pnl_sum, allow_n, allow_sum, size_n, size_sum, last_ts_ms"
+)
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), isolation_level=None, timeout=30.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    for ddl in _SCHEMA:
+        conn.execute(ddl)
+    return conn
+
+
+# ---------------------------------------------------------------------------
+# Resident store
+# ---------------------------------------------------------------------------
+
+class MemoryRollupStore:
+    """
+    In-memory rollups + join state, tailing setups/outcomes and persisting to
+    SQLite. One per process (see get_store()); several processes may share
+    the same database — a process only persists when it is at least as far
+    along both sources as what is already stored.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = ROLLUPS_DB,
+        setups_path: Path = SETUPS_PATH,
+        outcomes_path: Path = OUTCOMES_PATH,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.paths = {"setups": Path(setups_path), "outcomes": Path(outcomes_path)}
+        self.lock = threading.Lock()
+        self._io_lock = threading.Lock()  # serialises refresh/persist callers
+
+        self._reset_state()
+        self._last_refresh = 0.0
+        self._last_persist = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self.rebuilds = 0
+        self.persist_skipped = 0
+        self._load()
+
+    # ---- state ----
+
+    def _reset_state(self) -> None:
+        self.rollups: Dict[RollupKey, _Rollup] = {}
+        self.by_fp: Dict[str, List[_Rollup]] = {}
+        self._fps_sorted: List[str] = []
+        self._fps_new: List[str] = []
+        self.setups: Dict[str, _SetupRec] = {}
+        self.pending: Dict[str, List[Tuple[int, bytes]]] = {}
+        self.offsets: Dict[str, int] = {"setups": 0, "outcomes": 0}
+        self.heads: Dict[str, str] = {"setups": "", "outcomes": ""}
+        self._dirty_rollups: set = set()
+        self._dirty_setups: set = set()
+        self._pending_dirty = False
+        self._full_write = False
+
+    def _index(self, ru: _Rollup) -> None:
+        self.rollups[ru.key] = ru
+        fp = ru.key[0]
+        lst = self.by_fp.get(fp)
+        if lst is None:
+            self.by_fp[fp] = [ru]
+            self._fps_new.append(fp)
+        else:
+            lst.append(ru)
+
+    def _load(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            conn = _connect(self.db_path)
+        except Exception as e:
+            logger.warning("ai_memory_store: cannot open %s (%r); starting empty", self.db_path, e)
+            return
+        try:
+            conn.execute("BEGIN;")
+            for r in conn.execute(f"SELECT {_ROLLUP_COLS} FROM rollups;"):
+                self._index(_Rollup.from_row(r))
+            for tid, fp, sym, tf, st, ph, allow, sm, ts, applied in conn.execute(
+                "SELECT trade_id, memory_fingerprint, symbol, timeframe, setup_type, policy_hash, "
+                "allow, size_multiplier, ts_ms, applied_ts_ms FROM setup_keys;"
+            ):
+                self.setups[tid] = [(fp, sym or "", tf or "", st or "", ph or ""),
+                                    (bool(allow) if allow is not None else None), sm, int(ts), int(applied)]
+            for tid, ts, raw in conn.execute("SELECT trade_id, ts_ms, raw_json FROM pending_outcomes;"):
+                self.pending.setdefault(tid, []).append((int(ts), bytes(raw)))
+            for source, path, offset, head in conn.execute(
+                "SELECT source, path, offset, head_sha1 FROM ingest_offsets;"
+            ):
+                if source in self.paths and path == str(self.paths[source]):
+                    self.offsets[source] = int(offset or 0)
+                    self.heads[source] = head or ""
+            conn.execute("COMMIT;")
+        except Exception as e:
+            logger.warning("ai_memory_store: load failed (%r); rebuilding from sources", e)
+            self._reset_state()
+            self._full_write = True
+        finally:
+            conn.close()
+        self._fps_sorted = sorted(self.by_fp)
+        self._fps_new = []
+        logger.info("ai_memory_store: loaded %d rollups, %d setups, %d pending in %.0fms",
+                    len(self.rollups), len(self.setups), len(self.pending), (time.perf_counter() - t0) * 1000)
+
+    # ---- ingest ----
+
+    def _source_changed(self, source: str) -> bool:
+        path = self.paths[source]
+        off = self.offsets[source]
+        try:
+            size = path.stat().st_size
+        except Exception:
+            return off > 0
+        if size < off:
+            return True
+        return off > 0 and _head_sha1(path, off) != self.heads[source]
+
+    def _apply(self, tid: str, rec: _SetupRec, ts: int, win: Optional[bool], r: Optional[float],
+               pnl: Optional[float]) -> None:
+        if ts and ts <= rec[4]:
+            return  # outcome already applied (re-delivered line)
+        rec[4] = max(rec[4], ts)
+        key = rec[0]
+        ru = self.rollups.get(key)
+        if ru is None:
+            ru = _Rollup(key, "")
+            self._index(ru)
+        ru.add(ts, win, r, pnl, rec[1], rec[2])
+        self._dirty_rollups.add(key)
+        self._dirty_setups.add(tid)
+
+    def _ingest_setup_line(self, line: bytes) -> None:
+        try:
+            ev = orjson.loads(line)
+        except Exception:
+            return
+        parsed = _parse_setup(ev) if isinstance(ev, dict) else None
+        if parsed is None:
+            return
+        tid, rec = parsed
+        old = self.setups.get(tid)
+        if old is not None:
+            rec[4] = old[4]
+        self.setups[tid] = rec
+        self._dirty_setups.add(tid)
+        parked = self.pending.pop(tid, None)
+        if parked:
+            self._pending_dirty = True
+            for _ts, raw in parked:
+                self._ingest_outcome_line(raw)
+
+    def _ingest_outcome_line(self, line: bytes) -> None:
+        try:
+            ev = orjson.loads(line)
+        except Exception:
+            return
+        parsed = _parse_outcome(ev) if isinstance(ev, dict) else None
+        if parsed is None:
+            return
+        tid, ts, win, r, pnl = parsed
+        rec = self.setups.get(tid)
+        if rec is None:
+            self.pending.setdefault(tid, []).append((ts or _now_ms(), bytes(line)))
+            self._pending_dirty = True
+            return
+        self._apply(tid, rec, ts, win, r, pnl)
+
+    def _tail(self, source: str) -> int:
+        path = self.paths[source]
+        handle = self._ingest_setup_line if source == "setups" else self._ingest_outcome_line
+        n = 0
+        it = _iter_new_lines(path, self.offsets[source])
+        done = False
+        while not done:
+            with self.lock:
+                for _ in range(_LOCK_LINES):
+                    nxt = next(it, None)
+                    if nxt is None:
+                        done = True
+                        break
+                    line, end = nxt
+                    line = line.strip()
+                    if line:
+                        handle(line)
+                        n += 1
+                    self.offsets[source] = end
+        if n and not self.heads[source]:
+            self.heads[source] = _head_sha1(path, self.offsets[source])
+        return n
+
+    def refresh(self, *, force: bool = False) -> int:
+        """Ingest new setup/outcome lines. Returns lines consumed."""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < REFRESH_SEC:
+            return 0
+        with self._io_lock:
+            self._last_refresh = now
+            if self._source_changed("setups") or self._source_changed("outcomes"):
+                logger.warning("ai_memory_store: source rewritten/truncated; rebuilding rollups")
+                with self.lock:
+                    self._reset_state()
+                    self._full_write = True
+                self.rebuilds += 1
+            n = self._tail("setups") + self._tail("outcomes")
+            if self._fps_new:
+                with self.lock:
+                    merged = sorted(set(self._fps_sorted).union(self._fps_new)) if len(self._fps_new) > 64 else None
+                    if merged is None:
+                        merged = list(self._fps_sorted)
+                        for fp in self._fps_new:
+                            bisect.insort(merged, fp)
+                    self._fps_sorted = merged
+                    self._fps_new = []
+            if time.monotonic() - self._last_persist >= PERSIST_SEC:
+                self.persist()
+            return n
+
+    # ---- persistence ----
+
+    def persist(self) -> bool:
+        """Write dirty state + offsets in one transaction. Returns False if skipped."""
+        with self.lock:
+            now = _now_ms()
+            cutoff = now - PENDING_TTL_MS
+            expired = [tid for tid, rec in self.setups.items() if rec[3] and rec[3] < cutoff]
+            for tid in expired:
+                self.setups.pop(tid, None)
+                self._dirty_setups.discard(tid)
+            stale = [tid for tid, rows in self.pending.items() if all(ts < cutoff for ts, _ in rows)]
+            for tid in stale:
+                self.pending.pop(tid, None)
+                self._pending_dirty = True
+            full = self._full_write
+            keys = list(self.rollups) if full else list(self._dirty_rollups)
+            rollup_rows = [self.rollups[k].row() for k in keys if k in self.rollups]
+            tids = list(self.setups) if full else list(self._dirty_setups)
+            setup_rows = [
+                (t, *rec[0], (None if rec[1] is None else int(rec[1])), rec[2], rec[3], rec[4])
+                for t in tids
+                for rec in (self.setups.get(t),)
+                if rec is not None
+            ]
+            pending_rows = None
+            if full or self._pending_dirty:
+                pending_rows = []
+                for tid, rows in self.pending.items():
+                    for ts, raw in rows:
+                        pending_rows.append((tid, ts, raw))
+            offsets = dict(self.offsets)
+            heads = dict(self.heads)
+            self._dirty_rollups = set()
+            self._dirty_setups = set()
+            self._pending_dirty = False
+            self._full_write = False
+
+        self._last_persist = time.monotonic()
+        try:
+            conn = _connect(self.db_path)
+        except Exception as e:
+            logger.warning("ai_memory_store: persist open failed: %r", e)
+            self._requeue(keys, tids, full)
+            return False
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            stored = {
+                s: (int(o or 0), h or "")
+                for s, p, o, h in conn.execute("SELECT source, path, offset, head_sha1 FROM ingest_offsets;")
+                if s in self.paths and p == str(self.paths[s])
+            }
+            if not full and stored and all(
+                stored.get(s, (0, ""))[1] in ("", heads[s]) and stored.get(s, (0, ""))[0] >= offsets[s]
+                for s in self.paths
+            ):
+                # another process already persisted this far (or further)
+                conn.execute("ROLLBACK;")
+                self.persist_skipped += 1
+                return False
+            if full:
+                conn.execute("DELETE FROM rollups;")
+                conn.execute("DELETE FROM setup_keys;")
+            conn.executemany(
+                f"INSERT OR REPLACE INTO rollups ({_ROLLUP_COLS}) VALUES ({','.join('?' * 18)});", rollup_rows
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO setup_keys (trade_id, memory_fingerprint, symbol, timeframe, setup_type, "
+                "policy_hash, allow, size_multiplier, ts_ms, applied_ts_ms) VALUES (?,?,?,?,?,?,?,?,?,?);",
+                setup_rows,
+            )
+            conn.execute("DELETE FROM setup_keys WHERE ts_ms > 0 AND ts_ms < ?;", (cutoff,))
+            if pending_rows is not None:
+                conn.execute("DELETE FROM pending_outcomes;")
+                conn.executemany("INSERT INTO pending_outcomes (trade_id, ts_ms, raw_json) VALUES (?,?,?);",
+                                 pending_rows)
+            conn.executemany(
+                "INSERT OR REPLACE INTO ingest_offsets (source, path, offset, head_sha1, updated_ms) VALUES (?,?,?,?,?);",
+                [(s, str(self.paths[s]), offsets[s], heads[s], now) for s in self.paths],
+            )
+            conn.execute("COMMIT;")
+            return True
+        except Exception as e:
+            logger.warning("ai_memory_store: persist failed: %r", e)
+            try:
+                conn.execute("ROLLBACK;")
+            except Exception:
+                pass
+            self._requeue(keys, tids, full)
+            return False
+        finally:
+            conn.close()
+
+    def _requeue(self, keys: List[RollupKey], tids: List[str], full: bool) -> None:
+        with self.lock:
+            self._dirty_rollups.update(keys)
+            self._dirty_setups.update(tids)
+            self._pending_dirty = True
+            self._full_write = self._full_write or full
+
+    # ---- background ----
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def _loop() -> None:
+            while True:
+                try:
+                    self.refresh(force=True)
+                except Exception as e:
+                    logger.warning("ai_memory_store: refresh failed: %r", e)
+                time.sleep(max(0.05, REFRESH_SEC))
+
+        self._thread = threading.Thread(target=_loop, name="ai_memory_store", daemon=True)
+        self._thread.start()
+
+    # ---- query ----
+
+    def _candidates(self, fp: str) -> List[_Rollup]:
+        if _looks_like_full_fp(fp):
+            return self.by_fp.get(fp) or []
+        out: List[_Rollup] = []
+        fps = self._fps_sorted
+        i = bisect.bisect_left(fps, fp)
+        while i < len(fps) and fps[i].startswith(fp):
+            out.extend(self.by_fp.get(fps[i]) or ())
+            i += 1
+        for extra in self._fps_new:  # not merged into the sorted list yet
+            if extra.startswith(fp):
+                out.extend(self.by_fp.get(extra) or ())
+        return out
+
+    def query(
+        self,
+        *,
+        memory_fingerprint: str,
+        symbol: Optional[str],
+        timeframe: Optional[str],
+        setup_type: Optional[str],
+        policy_hash: Optional[str],
+        min_n: int,
+        max_age_days: int,
+        k: int,
+    ) -> List[Dict[str, Any]]:
+        if self._thread is None:
+            self.refresh()
+        age_cutoff = _now_ms() - int(max(1, max_age_days) * 86_400_000)
+        ph = str(policy_hash or "").strip()
+        ph_exact = _looks_like_full_hash(ph)
+        with self.lock:
+            hits = []
+            for ru in self._candidates(memory_fingerprint):
+                _fp, sym, tf, st, rph = ru.key
+                if ru.n < min_n or ru.last_ts_ms < age_cutoff:
+                    continue
+                if symbol and sym != symbol:
+                    continue
+                if timeframe and tf != timeframe:
+                    continue
+                if setup_type and st != setup_type:
+                    continue
+                if ph and (rph != ph if ph_exact else not rph.startswith(ph)):
+                    continue
+                hits.append(ru)
+            hits.sort(key=_Rollup.sort_key, reverse=True)
+            return [ru.to_memory() for ru in hits[: max(1, int(k))]]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rollups": len(self.rollups),
+            "fingerprints": len(self.by_fp),
+            "setups": len(self.setups),
+            "pending_outcomes": sum(len(v) for v in self.pending.values()),
+            "offsets": dict(self.offsets),
+            "rebuilds": self.rebuilds,
+            "persist_skipped": self.persist_skipped,
+            "db_path": str(self.db_path),
+        }
+
+
+_STORE: Optional[MemoryRollupStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> MemoryRollupStore:
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                st = MemoryRollupStore()
+                st.refresh(force=True)
+                if BACKGROUND:
+                    st.start()
+                _STORE = st
+    return _STORE
+
+
+# ---------------------------------------------------------------------------
+# Public query API (v2.x contract)
+# ---------------------------------------------------------------------------
+
+def _get_setup_fields(setup_event: Dict[str, Any]) -> Tuple[str, str, str, str, str]:
+    """
+    Return (policy_hash, timeframe, setup_type, symbol, memory_fingerprint)
+    """
+    return _setup_fields(setup_event)
+
+
+def _query_rollups(**kw: Any) -> List[Dict[str, Any]]:
+    return get_store().query(**kw)
+
+
+def query_memories_tiered(setup_event: Dict[str, Any], opts: QueryOptions = QueryOptions()) -> Dict[str, Any]:
+    """
+    Tier A: symbol scoped
+    Tier B: ANY fallback
+    """
+    policy_hash, tf, setup_type, sym, mem_fp = _get_setup_fields(setup_event)
+
+    if not mem_fp:
+        return {"ts": _now_ms(), "matched": [], "tier_used": "NONE", "meta": {"reason": "missing_memory_fingerprint"}}
+
+    k = max(1, int(opts.k))
+    tierA_min = _effective_min_n(opts, "A")
+    tierB_min = _effective_min_n(opts, "B")
+
+    strict_policy = (opts.policy_match == "strict")
+    strict_tf = (opts.timeframe_match == "strict")
+
+    ph = policy_hash if (strict_policy and policy_hash) else None
+    tfn = tf if (strict_tf and tf) else None
+    st = setup_type or None
+
+    if opts.prefer_symbol_scope and sym:
+        mA = _query_rollups(
+            memory_fingerprint=mem_fp,
+            symbol=sym,
+            timeframe=tfn,
+            setup_type=st,
+            policy_hash=ph,
+            min_n=tierA_min,
+            max_age_days=int(opts.max_age_days),
+            k=k,
+        )
+        if mA:
+            return {
+                "ts": _now_ms(),
+                "matched": mA,
+                "tier_used": "A",
+                "meta": {
+                    "min_n_effective": tierA_min,
+                    "policy_match": opts.policy_match,
+                    "timeframe_match": opts.timeframe_match,
+                },
+            }
+
+    if opts.allow_any_fallback:
+        mB = _query_rollups(
+            memory_fingerprint=mem_fp,
+            symbol=None,
+            timeframe=tfn,
+            setup_type=st,
+            policy_hash=ph,
+            min_n=tierB_min,
+            max_age_days=int(opts.max_age_days),
+            k=k,
+        )
+        if mB:
+            return {
+                "ts": _now_ms(),
+                "matched": mB,
+                "tier_used": "B",
+                "meta": {
+                    "min_n_effective": tierB_min,
+                    "policy_match": opts.policy_match,
+                    "timeframe_match": opts.timeframe_match,
+                },
+            }
+
+    return {"ts": _now_ms(), "matched": [], "tier_used": "NONE", "meta": {"reason": "no_matches_after_tiers"}}
+
+
+def query_memories(setup_event: Dict[str, Any], opts: QueryOptions = QueryOptions()) -> Dict[str, Any]:
+    """
+    Backward compatible: behaves like Tier B (ANY).
+    """
+    opts2 = QueryOptions(
+        k=opts.k,
+        min_n=opts.min_n,
+        min_n_symbol=opts.min_n_symbol,
+        min_n_any=opts.min_n_any,
+        policy_match=opts.policy_match,
+        timeframe_match=opts.timeframe_match,
+        max_age_days=opts.max_age_days,
+        prefer_symbol_scope=False,
+        allow_any_fallback=True,
+    )
+    r = query_memories_tiered(setup_event, opts2)
+    r["tier_used"] = "B" if r.get("matched") else "NONE"
+    return r
+
+
+def store_stats() -> Dict[str, Any]:
+    return get_store().stats()
+
+
+__all__ = [
+    "QueryOptions",
+    "MemoryRollupStore",
+    "get_store",
+    "query_memories_tiered",
+    "query_memories",
+    "store_stats",
+]
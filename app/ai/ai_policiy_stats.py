@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Flashback — AI Policy Stats (v1.0)
+Flashback — AI Policy Stats (v1.1)
 
 Purpose
 -------
-Analyze the AI policy decisions recorded in:
+Summarize the AI policy decisions counted by executor_ai_gate:
 
-    state/ai_policy_log.jsonl
+    state/ai_policy_counters_<label>.json   (one per executor label)
 
 and produce a compact but insightful summary:
 
@@ -15,30 +15,21 @@ and produce a compact but insightful summary:
     - Allow vs block counts and percentages
     - Breakdown by reason (score_below_min, mode_not_enabled, etc.)
     - Per-strategy stats (how often AI blocks each strategy)
-    - Per-mode stats (PAPER / LIVE_CANARY / LIVE_FULL)
+    - Per-mode / per-account stats (PAPER / LIVE_CANARY / LIVE_FULL)
+    - Score histogram (overall and per strategy)
 
 This is READ-ONLY and does NOT change any policy.
 
 Inputs
 ------
-    state/ai_policy_log.jsonl
-    Each line is a decision payload emitted by executor_ai_gate.ai_gate_decide:
-
-      {
-        "allow": bool,
-        "reason": "ok" | "score_below_min" | ...,
-        "strategy_name": "Sub1_Trend",
-        "symbol": "BTCUSDT",
-        "account_label": "main",
-        "mode": "PAPER",
-        "trade_id": "...",
-        "score": 0.73,
-        "min_score": 0.0,
-        "min_score_live": 0.6,
-        "min_score_canary": 0.5,
-        "policy_flags": {...},
-        "ts_ms": 1733500100123
-      }
+    state/ai_policy_counters_*.json
+    Rolling aggregates flushed by ai_gate_decide (see
+    ai_executor_gate.DecisionCounters). Reading them is O(strategies),
+    not O(decisions).
+
+    --from-log rebuilds from state/ai_policy_log.jsonl instead. That log
+    holds every block but only a sample of allows
+    (AI_POLICY_LOG_SAMPLE_RATE), so allow counts from it are sampled.
 
 Outputs
 -------
@@ -51,12 +42,14 @@ This will be used later by policy_tune.py to suggest threshold changes.
 
 from __future__ import annotations
 
-from collections import Counter, defaultdict
+import argparse
 from pathlib import Path
 from typing import Any, Dict, List
 
 import orjson
 
+from app.ai.ai_executor_gate import COUNTERS_GLOB, DecisionCounters, merge_counters
+
 try:
     from app.core.config import settings  # type: ignore
     from app.core.logger import get_logger  # type: ignore
@@ -109,8 +102,50 @@ def _to_float(x: Any):
         return None
 
 
-def build_stats(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
-    total = len(rows)
+def load_counters(state_dir: Path = STATE_DIR) -> Dict[str, Any]:
+    """
+    Merge every executor's counters file into one aggregate.
+    """
+    merged = DecisionCounters.empty()
+    files = sorted(state_dir.glob(COUNTERS_GLOB))
+    if not files:
+        log.warning("[ai_policy_stats] no %s in %s; no decisions yet.", COUNTERS_GLOB, state_dir)
+    for path in files:
+        try:
+            data = orjson.loads(path.read_bytes())
+        except Exception:
+            continue
+        if isinstance(data, dict):
+            merge_counters(merged, data)
+    return merged
+
+
+def _finalize_group(name_key: str, groups: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for name, g in groups.items():
+        if not isinstance(g, dict):
+            continue
+        dec = int(g.get("decisions") or 0)
+        row: Dict[str, Any] = {
+            name_key: name,
+            "decisions": dec,
+            "allowed": int(g.get("allowed") or 0),
+            "blocked": int(g.get("blocked") or 0),
+            "allow_pct": round(int(g.get("allowed") or 0) * 100.0 / (dec or 1), 2),
+        }
+        if name_key == "strategy_name":
+            cnt = int(g.get("score_cnt") or 0)
+            row["score_sum"] = float(g.get("score_sum") or 0.0)
+            row["score_cnt"] = cnt
+            row["avg_score"] = row["score_sum"] / cnt if cnt > 0 else None
+            row["by_reason"] = dict(g.get("by_reason") or {})
+            row["score_histogram"] = dict(g.get("score_histogram") or {})
+        out.append(row)
+    return sorted(out, key=lambda r: r["decisions"], reverse=True)
+
+
+def build_stats_from_counters(counters: Dict[str, Any]) -> Dict[str, Any]:
+    total = int(counters.get("total") or 0)
     if total == 0:
         return {
             "total_decisions": 0,
@@ -122,132 +157,57 @@ def build_stats(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
             "by_reason_pct": {},
             "by_strategy": [],
             "by_mode": [],
+            "by_account": [],
             "score_histogram": {},
         }
 
-    allow_count = 0
-    block_count = 0
-    by_reason: Counter[str] = Counter()
-    by_strategy: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
-        "strategy_name": "",
-        "decisions": 0,
-        "allowed": 0,
-        "blocked": 0,
-        "allow_pct": 0.0,
-        "avg_score": None,
-        "score_sum": 0.0,
-        "score_cnt": 0,
-    })
-    by_mode: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
-        "mode": "",
-        "decisions": 0,
-        "allowed": 0,
-        "blocked": 0,
-        "allow_pct": 0.0,
-    })
-
-    # Simple score histogram buckets: <0.2, 0.2-0.4, 0.4-0.6, 0.6-0.8, >=0.8
-    score_buckets = {
-        "<0.2": 0,
-        "0.2-0.4": 0,
-        "0.4-0.6": 0,
-        "0.6-0.8": 0,
-        ">=0.8": 0,
-        "None": 0,
-    }
+    allow_count = int(counters.get("allowed") or 0)
+    block_count = int(counters.get("blocked") or 0)
+    by_reason = dict(counters.get("by_reason") or {})
 
-    for d in rows:
-        allow = bool(d.get("allow"))
-        reason = str(d.get("reason") or "unknown")
-        strat = str(d.get("strategy_name") or "unknown")
-        mode = str(d.get("mode") or "UNKNOWN").upper()
-        score = _to_float(d.get("score"))
-
-        if allow:
-            allow_count += 1
-        else:
-            block_count += 1
-
-        by_reason[reason] += 1
-
-        # per-strategy
-        s = by_strategy[strat]
-        s["strategy_name"] = strat
-        s["decisions"] += 1
-        if allow:
-            s["allowed"] += 1
-        else:
-            s["blocked"] += 1
-        if score is not None:
-            s["score_sum"] += score
-            s["score_cnt"] += 1
-
-        # per-mode
-        m = by_mode[mode]
-        m["mode"] = mode
-        m["decisions"] += 1
-        if allow:
-            m["allowed"] += 1
-        else:
-            m["blocked"] += 1
-
-        # score bucket
-        if score is None:
-            score_buckets["None"] += 1
-        else:
-            if score < 0.2:
-                score_buckets["<0.2"] += 1
-            elif score < 0.4:
-                score_buckets["0.2-0.4"] += 1
-            elif score < 0.6:
-                score_buckets["0.4-0.6"] += 1
-            elif score < 0.8:
-                score_buckets["0.6-0.8"] += 1
-            else:
-                score_buckets[">=0.8"] += 1
-
-    # finalize per-strategy stats
-    for s in by_strategy.values():
-        dec = s["decisions"] or 1
-        s["allow_pct"] = round(s["allowed"] * 100.0 / dec, 2)
-        if s["score_cnt"] > 0:
-            s["avg_score"] = s["score_sum"] / s["score_cnt"]
-
-    # finalize per-mode stats
-    for m in by_mode.values():
-        dec = m["decisions"] or 1
-        m["allow_pct"] = round(m["allowed"] * 100.0 / dec, 2)
-
-    def _pct_map(counts: Dict[str, int]) -> Dict[str, float]:
-        return {k: round(v * 100.0 / total, 2) for k, v in counts.items()}
-
-    reason_pct = _pct_map(dict(by_reason))
-
-    stats: Dict[str, Any] = {
+    return {
         "total_decisions": total,
         "allow_count": allow_count,
         "block_count": block_count,
         "allow_pct": round(allow_count * 100.0 / total, 2),
         "block_pct": round(block_count * 100.0 / total, 2),
-        "by_reason": dict(by_reason),
-        "by_reason_pct": reason_pct,
-        "by_strategy": sorted(
-            by_strategy.values(), key=lambda s: s["decisions"], reverse=True
-        ),
-        "by_mode": sorted(
-            by_mode.values(), key=lambda m: m["decisions"], reverse=True
-        ),
-        "score_histogram": score_buckets,
+        "by_reason": by_reason,
+        "by_reason_pct": {k: round(v * 100.0 / total, 2) for k, v in by_reason.items()},
+        "by_strategy": _finalize_group("strategy_name", counters.get("by_strategy") or {}),
+        "by_mode": _finalize_group("mode", counters.get("by_mode") or {}),
+        "by_account": _finalize_group("account_label", counters.get("by_account") or {}),
+        "score_histogram": dict(counters.get("score_histogram") or {}),
+        "since_ms": counters.get("since_ms"),
+        "updated_ms": counters.get("updated_ms"),
     }
-    return stats
 
 
-def main() -> None:
-    log.info("[ai_policy_stats] Loading decisions from %s ...", POLICY_LOG_PATH)
-    rows = _load_jsonl(POLICY_LOG_PATH)
-    log.info("[ai_policy_stats] Loaded %d decisions.", len(rows))
+def build_stats(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Stats from raw decision rows (ai_policy_log.jsonl format).
+    """
+    counters = DecisionCounters()
+    for d in rows:
+        d = dict(d)
+        d["score"] = _to_float(d.get("score"))
+        counters.observe(d)
+    return build_stats_from_counters(counters.to_dict())
 
-    stats = build_stats(rows)
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--from-log", action="store_true", help="Rebuild from ai_policy_log.jsonl (sampled allows)")
+    args = ap.parse_args()
+
+    if args.from_log:
+        log.info("[ai_policy_stats] Loading decisions from %s ...", POLICY_LOG_PATH)
+        rows = _load_jsonl(POLICY_LOG_PATH)
+        log.info("[ai_policy_stats] Loaded %d decisions.", len(rows))
+        stats = build_stats(rows)
+        stats["source"] = "log"
+    else:
+        stats = build_stats_from_counters(load_counters())
+        stats["source"] = "counters"
     STATS_OUTPUT_PATH.write_bytes(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
 
     # Log a quick human-readable summary
@@ -3,12 +3,23 @@
 import json
 import math
 import os
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
 
 ROOT = Path(__file__).resolve().parents[2]
 DEFAULT_SCOREBOARD_PATH = str(ROOT / "state" / "ai_memory" / "scoreboard.v1.json")
 
+# Bucket-key values that mean "any" for a dimension (symbol-agnostic / global buckets).
+_WILDCARDS = frozenset({"*", "all", "any", "__all__"})
+_ANY = "*"
+_MISSING = object()
+
+# Minimum seconds between stat() checks of the scoreboard file on the decision path.
+_RELOAD_CHECK_SEC = float(os.getenv("SCOREBOARD_RELOAD_CHECK_SEC", "1.0"))
+
 
 def _as_float(x: Any) -> Optional[float]:
     try:
@@ -42,44 +53,36 @@ def _bucket_key(setup_type: str, timeframe: str, symbol: str) -> Tuple[str, str,
     )
 
 
-def scoreboard_gate_decide(
-    setup_type: str,
-    timeframe: str,
-    symbol: str,
-    account_label: Optional[str] = None,
-) -> Optional[Dict[str, Any]]:
-    path = os.getenv("SCOREBOARD_PATH", DEFAULT_SCOREBOARD_PATH)
-    sb = _load_scoreboard(path)
-    if not sb or sb.get("schema_version") != "scoreboard.v1":
-        return None
+def _dim(v: Any) -> str:
+    s = str(v or "unknown")
+    return _ANY if s.strip().lower() in _WILDCARDS else s
 
-    min_n = int(os.getenv("SCOREBOARD_GATE_MIN_N", str(sb.get("min_n") or 10)))
-    min_conf = float(os.getenv("SCOREBOARD_GATE_MIN_CONF", "0.60"))
-    hard_block_exp = float(os.getenv("SCOREBOARD_GATE_BLOCK_EXPECTANCY_LTE", "-0.05"))
-    soft_cut_exp = float(os.getenv("SCOREBOARD_GATE_SOFT_EXPECTANCY_LTE", "0.00"))
-
-    soft_size = float(os.getenv("SCOREBOARD_GATE_SOFT_SIZE_MULT", "0.25"))
-    boost_size = float(os.getenv("SCOREBOARD_GATE_BOOST_SIZE_MULT", "1.25"))
-    max_size = float(os.getenv("SCOREBOARD_GATE_MAX_SIZE_MULT", "2.00"))
-
-    key = _bucket_key(setup_type, timeframe, symbol)
-    buckets = sb.get("buckets") or []
-
-    match = None
-    for b in buckets:
-        bk = b.get("bucket_key") or {}
-        k2 = _bucket_key(
-            bk.get("setup_type"),
-            bk.get("timeframe"),
-            bk.get("symbol"),
-        )
-        if k2 == key:
-            match = b
-            break
-
-    if not match:
-        return None
 
+# ---------------------------------------------------------------------------
+# Compiled scoreboard
+# ---------------------------------------------------------------------------
+
+class _Thresholds:
+    __slots__ = (
+        "min_n", "min_conf", "hard_block_exp", "soft_cut_exp",
+        "soft_size", "boost_size", "max_size",
+    )
+
+    def __init__(self, sb_min_n: Any) -> None:
+        self.min_n = int(os.getenv("SCOREBOARD_GATE_MIN_N", str(sb_min_n or 10)))
+        self.min_conf = float(os.getenv("SCOREBOARD_GATE_MIN_CONF", "0.60"))
+        self.hard_block_exp = float(os.getenv("SCOREBOARD_GATE_BLOCK_EXPECTANCY_LTE", "-0.05"))
+        self.soft_cut_exp = float(os.getenv("SCOREBOARD_GATE_SOFT_EXPECTANCY_LTE", "0.00"))
+        self.soft_size = float(os.getenv("SCOREBOARD_GATE_SOFT_SIZE_MULT", "0.25"))
+        self.boost_size = float(os.getenv("SCOREBOARD_GATE_BOOST_SIZE_MULT", "1.25"))
+        self.max_size = float(os.getenv("SCOREBOARD_GATE_MAX_SIZE_MULT", "2.00"))
+
+
+def _precompute_decision(match: Dict[str, Any], th: _Thresholds, path: str) -> Optional[Dict[str, Any]]:
+    """
+    Evaluate the gate for one bucket. Same rules scoreboard_gate_decide has always
+    applied; done once per bucket at compile time instead of once per signal.
+    """
     n = int(match.get("n") or 0)
     conf = _as_float(match.get("confidence"))
     exp = _as_float(match.get("expectancy"))
@@ -87,50 +90,213 @@ def scoreboard_gate_decide(
     if n <= 0 or conf is None or exp is None:
         return None
 
-    if n < min_n or conf < min_conf:
+    base = {
+        "bucket_key": match.get("bucket_key"),
+        "bucket_stats": match,
+        "scoreboard_path": path,
+    }
+
+    if n < th.min_n or conf < th.min_conf:
         return {
             "allow": True,
             "size_multiplier": None,
             "decision_code": "SCOREBOARD_INSUFFICIENT_DATA",
             "reason": (
                 f"insufficient_data n={n} conf={conf:.2f} "
-                f"(min_n={min_n} min_conf={min_conf})"
+                f"(min_n={th.min_n} min_conf={th.min_conf})"
             ),
-            "bucket_key": match.get("bucket_key"),
-            "bucket_stats": match,
-            "scoreboard_path": path,
+            **base,
         }
 
-    if exp <= hard_block_exp:
+    if exp <= th.hard_block_exp:
         return {
             "allow": False,
             "size_multiplier": 0.0,
             "decision_code": "SCOREBOARD_BLOCK_NEG_EXPECTANCY",
-            "reason": f"block exp={exp:.4f} <= {hard_block_exp}",
-            "bucket_key": match.get("bucket_key"),
-            "bucket_stats": match,
-            "scoreboard_path": path,
+            "reason": f"block exp={exp:.4f} <= {th.hard_block_exp}",
+            **base,
         }
 
-    if exp <= soft_cut_exp:
-        sm = _clamp(soft_size, 0.0, max_size)
+    if exp <= th.soft_cut_exp:
+        sm = _clamp(th.soft_size, 0.0, th.max_size)
         return {
             "allow": True,
             "size_multiplier": sm,
             "decision_code": "SCOREBOARD_SOFT_CUT",
-            "reason": f"soft_cut exp={exp:.4f} <= {soft_cut_exp} -> sm={sm}",
-            "bucket_key": match.get("bucket_key"),
-            "bucket_stats": match,
-            "scoreboard_path": path,
+            "reason": f"soft_cut exp={exp:.4f} <= {th.soft_cut_exp} -> sm={sm}",
+            **base,
         }
 
-    sm = _clamp(boost_size, 0.0, max_size)
+    sm = _clamp(th.boost_size, 0.0, th.max_size)
     return {
         "allow": True,
         "size_multiplier": sm,
         "decision_code": "SCOREBOARD_ALLOW_BOOST",
         "reason": f"allow_boost exp={exp:.4f} -> sm={sm}",
-        "bucket_key": match.get("bucket_key"),
-        "bucket_stats": match,
-        "scoreboard_path": path,
+        **base,
     }
+
+
+class CompiledScoreboard:
+    """
+    Immutable lookup structure built from a scoreboard.v1 document.
+
+    Index key: (setup_type, timeframe, symbol, regime). Buckets without a regime
+    are indexed under regime="*". Wildcard values ("*", "ALL", "any") in a bucket
+    key make it symbol-agnostic / global.
+
+    Lookup fallback chain:
+        exact (st, tf, sym, regime)
+        -> (st, tf, sym, *)
+        -> symbol-agnostic (st, tf, *, *)
+        -> global (*, *, *, *)
+
+    Each index entry holds the fully precomputed decision dict (thresholds are
+    read from env once, at compile time).
+    """
+
+    __slots__ = ("path", "stat_key", "thresholds", "n_buckets", "_index")
+
+    def __init__(self, sb: Dict[str, Any], path: str, stat_key: Tuple[int, int]) -> None:
+        self.path = path
+        self.stat_key = stat_key
+        self.thresholds = _Thresholds(sb.get("min_n"))
+
+        index: Dict[Tuple[str, str, str, str], Optional[Dict[str, Any]]] = {}
+        # (st, tf, sym) -> first bucket seen, for regime-less queries against regime'd buckets
+        first_by_triple: Dict[Tuple[str, str, str], Optional[Dict[str, Any]]] = {}
+
+        buckets = sb.get("buckets") or []
+        for b in buckets:
+            if not isinstance(b, dict):
+                continue
+            bk = b.get("bucket_key") or {}
+            st, tf, sym = _bucket_key(bk.get("setup_type"), bk.get("timeframe"), bk.get("symbol"))
+            st, tf, sym = _dim(st), _dim(tf), _dim(sym)
+            reg = _dim(bk.get("regime")) if bk.get("regime") else _ANY
+            k = (st, tf, sym, reg)
+            if k in index:
+                # First match wins, same as the old linear scan.
+                continue
+            decision = _precompute_decision(b, self.thresholds, path)
+            index[k] = decision
+            first_by_triple.setdefault((st, tf, sym), decision)
+
+        for (st, tf, sym), decision in first_by_triple.items():
+            index.setdefault((st, tf, sym, _ANY), decision)
+
+        self.n_buckets = len(buckets)
+        self._index: Mapping[Tuple[str, str, str, str], Optional[Dict[str, Any]]] = MappingProxyType(index)
+
+    def lookup(
+        self,
+        setup_type: str,
+        timeframe: str,
+        symbol: str,
+        regime: Optional[str] = None,
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Return (match_level, precomputed_decision) or (None, None).
+        match_level is one of: exact, regime_agnostic, symbol_agnostic, global.
+        """
+        st, tf, sym = _bucket_key(setup_type, timeframe, symbol)
+        get = self._index.get
+        if regime:
+            hit = get((st, tf, sym, str(regime)), _MISSING)
+            if hit is not _MISSING:
+                return "exact", hit
+            hit = get((st, tf, sym, _ANY), _MISSING)
+            if hit is not _MISSING:
+                return "regime_agnostic", hit
+        else:
+            hit = get((st, tf, sym, _ANY), _MISSING)
+            if hit is not _MISSING:
+                return "exact", hit
+        hit = get((st, tf, _ANY, _ANY), _MISSING)
+        if hit is not _MISSING:
+            return "symbol_agnostic", hit
+        hit = get((_ANY, _ANY, _ANY, _ANY), _MISSING)
+        if hit is not _MISSING:
+            return "global", hit
+        return None, None
+
+
+_COMPILE_LOCK = threading.Lock()
+_COMPILED: Optional[CompiledScoreboard] = None
+_LAST_CHECK: Dict[str, float] = {}
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def compile_scoreboard(sb: Dict[str, Any], path: str = "<memory>") -> Optional[CompiledScoreboard]:
+    """
+    Compile a scoreboard document. Returns None for non-scoreboard.v1 input.
+    """
+    if not sb or sb.get("schema_version") != "scoreboard.v1":
+        return None
+    return CompiledScoreboard(sb, path, (0, 0))
+
+
+def get_compiled_scoreboard(path: Optional[str] = None, force: bool = False) -> Optional[CompiledScoreboard]:
+    """
+    Return the compiled scoreboard for `path`, recompiling only when the file's
+    (mtime, size) changed. The new structure is swapped in with a single
+    reference assignment, so concurrent readers see either the old or the new
+    scoreboard, never a partial one.
+    """
+    global _COMPILED
+    path = path or os.getenv("SCOREBOARD_PATH", DEFAULT_SCOREBOARD_PATH)
+    cur = _COMPILED
+
+    now = time.monotonic()
+    if (
+        not force
+        and cur is not None
+        and cur.path == path
+        and now - _LAST_CHECK.get(path, 0.0) < _RELOAD_CHECK_SEC
+    ):
+        return cur
+
+    key = _stat_key(path)
+    _LAST_CHECK[path] = now
+    if key is None:
+        return None
+    if not force and cur is not None and cur.path == path and cur.stat_key == key:
+        return cur
+
+    with _COMPILE_LOCK:
+        cur = _COMPILED
+        if not force and cur is not None and cur.path == path and cur.stat_key == key:
+            return cur
+        sb = _load_scoreboard(path)
+        if not sb or sb.get("schema_version") != "scoreboard.v1":
+            return None
+        compiled = CompiledScoreboard(sb, path, key)
+        _COMPILED = compiled
+        return compiled
+
+
+def scoreboard_gate_decide(
+    setup_type: str,
+    timeframe: str,
+    symbol: str,
+    account_label: Optional[str] = None,
+    regime: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    compiled = get_compiled_scoreboard()
+    if compiled is None:
+        return None
+
+    level, decision = compiled.lookup(setup_type, timeframe, symbol, regime=regime)
+    if decision is None:
+        return None
+
+    out = dict(decision)
+    out["bucket_match"] = level
+    return out
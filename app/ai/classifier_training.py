@@ -0,0 +1,1248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — Setup Classifier Training (walk-forward, per regime)
+
+Produces the artifacts trade_classifier._load_models_once() serves:
+
+  models/setup_classifier_{regime}.pkl
+  models/setup_classifier_{regime}_meta.json
+  models/reports/setup_classifier_{regime}_report.json
+  models/setup_classifier_manifest.json   (written last; classifiers watch it)
+
+Pipeline
+--------
+1) Feature cache. state/feature_store.jsonl is read from the byte offset the
+   previous run stopped at. Feature rows and outcome rows are joined on
+   trade_id and appended to columnar files, one per (regime, time bucket):
+
+       state/training_cache/features/<regime>/<lo_ms>-<hi_ms>.<gen>.fcol
+
+   Only buckets that received rows are rewritten, each into its next
+   generation file. The cache manifest (byte offset, bucket generations and
+   digests, feature rows still waiting for their outcome) is the commit
+   point: a crash before it is saved leaves the old generations in charge,
+   so the re-read range is never appended twice.
+
+2) Walk-forward folds. Per regime, fold k trains on every bucket before
+   bucket k and tests on bucket k (expanding window). A fold is keyed by the
+   digests of the buckets it reads plus the training params, and its result
+   (metrics + out-of-sample predictions) is cached, so after new data only
+   the folds that read a changed bucket are refit.
+
+3) Folds and final models of all regimes run together on the
+   TrainingScheduler process pool, largest training sets first.
+
+4) Calibration. Base model is StandardScaler + LogisticRegression (a small
+   pure-Python logit when scikit-learn is missing). A Platt map is fitted on
+   the most recent CLF_TRAIN_CAL_FRAC of the training window, then the base
+   is refit on the whole window.
+
+5) Publish. A regime is published when its pooled out-of-sample AUC is at
+   least CLF_TRAIN_MIN_AUC. Every file goes through tmp + os.replace().
+
+Usage:
+    python -m app.ai.classifier_training [--full] [--regimes trend,range] [--workers N] [--no-publish]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import math
+import os
+import pickle
+import re
+import shutil
+import struct
+import sys
+import time
+from array import array
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+
+try:
+    from app.core.logger import get_logger
+except Exception:
+    import logging
+
+    def get_logger(name: str) -> "logging.Logger":  # type: ignore
+        logger_ = logging.getLogger(name)
+        if not logger_.handlers:
+            handler = logging.StreamHandler()
+            fmt = logging.Formatter(
+                "%(asctime)s [%(levelname)s] [%(name)s] %(message)s"
+            )
+            handler.setFormatter(fmt)
+            logger_.addHandler(handler)
+        logger_.setLevel(logging.INFO)
+        return logger_
+
+
+log = get_logger("classifier_training")
+
+try:
+    from app.core.config import settings
+except Exception:
+    class _DummySettings:  # type: ignore
+        ROOT: Path = Path(__file__).resolve().parents[2]
+    settings = _DummySettings()  # type: ignore
+
+ROOT: Path = getattr(settings, "ROOT", Path(__file__).resolve().parents[2])
+
+SOURCE_PATH: Path = Path(os.getenv("CLF_TRAIN_SOURCE", str(ROOT / "state" / "feature_store.jsonl")))
+CACHE_DIR: Path = Path(os.getenv("CLF_TRAIN_CACHE_DIR", str(ROOT / "state" / "training_cache")))
+MODELS_DIR: Path = ROOT / "models"
+MANIFEST_NAME = "setup_classifier_manifest.json"
+
+BUCKET_DAYS = float(os.getenv("CLF_TRAIN_BUCKET_DAYS", "7"))
+PENDING_MAX_AGE_DAYS = float(os.getenv("CLF_TRAIN_PENDING_MAX_AGE_DAYS", "30"))
+
+CACHE_VERSION = 2
+JOB_KIND = "setup_classifier"
+
+# Same names and order as trade_classifier._extract_live_features()
+FEATURE_NAMES: List[str] = [
+    "side_sign",
+    "atr_like",
+    "atr_pct",
+    "range_mean",
+    "range_std",
+    "volume_zscore",
+    "trend_dir",
+    "trend_strength",
+    "entry_hour",
+    "entry_dow",
+    "session_int",
+]
+
+# Alternative spellings found in feature_store rows (feature_builder output,
+# raw executor snapshots, older rows)
+_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "atr_pct": ("atr_pct", "atr_percent"),
+    "volume_zscore": ("volume_zscore", "vol_zscore", "vol_z", "volume_z"),
+    "entry_hour": ("entry_hour", "hour_utc"),
+    "entry_dow": ("entry_dow", "dow"),
+}
+
+
+@dataclass(frozen=True)
+class TrainParams:
+    min_train_rows: int = 200
+    min_test_rows: int = 20
+    max_folds: int = 12
+    cal_frac: float = 0.2
+    C: float = 1.0
+    max_iter: int = 200
+    min_auc: float = 0.5
+
+    @classmethod
+    def from_env(cls) -> "TrainParams":
+        return cls(
+            min_train_rows=int(os.getenv("CLF_TRAIN_MIN_TRAIN_ROWS", "200")),
+            min_test_rows=int(os.getenv("CLF_TRAIN_MIN_TEST_ROWS", "20")),
+            max_folds=int(os.getenv("CLF_TRAIN_MAX_FOLDS", "12")),
+            cal_frac=float(os.getenv("CLF_TRAIN_CAL_FRAC", "0.2")),
+            C=float(os.getenv("CLF_TRAIN_C", "1.0")),
+            max_iter=int(os.getenv("CLF_TRAIN_MAX_ITER", "200")),
+            min_auc=float(os.getenv("CLF_TRAIN_MIN_AUC", "0.5")),
+        )
+
+    def key(self) -> str:
+        # min_auc only gates publishing; it doesn't change a fit
+        d = asdict(self)
+        d.pop("min_auc", None)
+        return orjson.dumps(d, option=orjson.OPT_SORT_KEYS).decode()
+
+
+# ---------------------------------------------------------------------------
+# Columnar files
+# ---------------------------------------------------------------------------
+
+_FCOL_MAGIC = b"FBCOL1\n"
+
+
+def write_columns(path: Path, cols: Dict[str, array]) -> str:
+    """
+    Write equal-length typed columns to `path` atomically.
+    Layout: magic, u32 header length, JSON header, raw column blocks.
+    Returns a content digest.
+    """
+    names = list(cols)
+    rows = len(cols[names[0]]) if names else 0
+    header = orjson.dumps({
+        "rows": rows,
+        "byteorder": sys.byteorder,
+        "columns": [[k, cols[k].typecode] for k in names],
+    })
+    blob = b"".join([_FCOL_MAGIC, struct.pack("<I", len(header)), header] + [cols[k].tobytes() for k in names])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(blob)
+    os.replace(tmp, path)
+    return hashlib.blake2b(blob, digest_size=12).hexdigest()
+
+
+def read_columns(path: Path) -> Dict[str, array]:
+    blob = memoryview(Path(path).read_bytes())
+    if bytes(blob[:len(_FCOL_MAGIC)]) != _FCOL_MAGIC:
+        raise ValueError(f"not a column file: {path}")
+    off = len(_FCOL_MAGIC)
+    (hlen,) = struct.unpack_from("<I", blob, off)
+    off += 4
+    header = orjson.loads(bytes(blob[off:off + hlen]))
+    off += hlen
+    rows = int(header["rows"])
+    out: Dict[str, array] = {}
+    for name, typecode in header["columns"]:
+        col = array(typecode)
+        size = col.itemsize * rows
+        col.frombytes(blob[off:off + size])
+        off += size
+        if header.get("byteorder") != sys.byteorder:
+            col.byteswap()
+        out[name] = col
+    return out
+
+
+def _empty_columns() -> Dict[str, array]:
+    cols = {"ts": array("q"), "y": array("b")}
+    for name in FEATURE_NAMES:
+        cols[name] = array("d")
+    return cols
+
+
+def load_matrix(paths: Sequence[str]) -> Tuple[Any, List[int]]:
+    """
+    Concatenate bucket files into (X, y). X is a numpy array when numpy is
+    installed, else a list of row lists.
+    """
+    cols = _empty_columns()
+    for p in paths:
+        part = read_columns(Path(p))
+        for name, col in cols.items():
+            col.extend(part[name])
+    y = cols["y"].tolist()
+    try:
+        import numpy as np
+    except ImportError:
+        return [list(r) for r in zip(*(cols[n] for n in FEATURE_NAMES))], y
+    if not y:
+        return np.empty((0, len(FEATURE_NAMES))), y
+    return np.column_stack([np.frombuffer(cols[n], dtype=np.float64) for n in FEATURE_NAMES]), y
+
+
+# ---------------------------------------------------------------------------
+# Row parsing
+# ---------------------------------------------------------------------------
+
+def _num(v: Any) -> Optional[float]:
+    if v is None or isinstance(v, str) and not v:
+        return None
+    try:
+        f = float(v)
+    except Exception:
+        return None
+    if math.isnan(f) or math.isinf(f):
+        return None
+    return f
+
+
+def _lookup(row: Dict[str, Any], name: str) -> Optional[float]:
+    v = _num(row.get(name))
+    if v is None:
+        v = _num(row.get("f." + name))
+    if v is None:
+        feats = row.get("features")
+        if isinstance(feats, dict):
+            v = _num(feats.get(name))
+    return v
+
+
+def _has_features(row: Dict[str, Any]) -> bool:
+    if isinstance(row.get("features"), dict):
+        return True
+    return any(k.startswith("f.") for k in row)
+
+
+def _label(row: Dict[str, Any]) -> Optional[int]:
+    win = row.get("win")
+    if isinstance(win, bool):
+        return int(win)
+    if win in (0, 1):
+        return int(win)
+    for k in ("r_multiple", "pnl_r", "pnl_usd"):
+        v = _num(row.get(k))
+        if v is not None:
+            return 1 if v > 0 else 0
+    return None
+
+
+def _ts(row: Dict[str, Any]) -> Optional[int]:
+    for k in ("ts_open_ms", "opened_ts_ms", "ts_ms"):
+        v = _num(row.get(k))
+        if v is not None and v > 0:
+            return int(v)
+    return None
+
+
+def _regime(row: Dict[str, Any]) -> str:
+    raw = str(row.get("regime") or "other").strip().lower()
+    return re.sub(r"[^a-z0-9_]+", "_", raw) or "other"
+
+
+def _side_sign(row: Dict[str, Any]) -> float:
+    v = _lookup(row, "side_sign")
+    if v is not None:
+        return v
+    feats = row.get("features") if isinstance(row.get("features"), dict) else {}
+    side = str(row.get("side") or row.get("f.side") or feats.get("side") or "").lower()
+    if side in ("buy", "long"):
+        return 1.0
+    if side in ("sell", "short"):
+        return -1.0
+    return 0.0
+
+
+def _row_vector(row: Dict[str, Any], ts_ms: int, session_int) -> List[float]:
+    dt_obj = datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc)
+    vec: List[float] = []
+    for name in FEATURE_NAMES:
+        if name == "side_sign":
+            vec.append(_side_sign(row))
+            continue
+        if name == "session_int":
+            vec.append(float(session_int(ts_ms)))
+            continue
+        v = None
+        for alias in _ALIASES.get(name, (name,)):
+            v = _lookup(row, alias)
+            if v is not None:
+                break
+        if v is None and name == "entry_hour":
+            v = float(dt_obj.hour)
+        if v is None and name == "entry_dow":
+            v = float(dt_obj.weekday())
+        vec.append(v if v is not None else 0.0)
+    return vec
+
+
+def _session_int_fn():
+    # Same session buckets the live classifier derives from the signal ts
+    try:
+        from app.core.trade_classifier import _derive_session_from_ts, _session_to_int
+
+        return lambda ts_ms: _session_to_int(_derive_session_from_ts(ts_ms))
+    except Exception:
+        def _fallback(ts_ms: int) -> int:
+            hour = datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc).hour
+            if hour < 7:
+                return 0
+            if hour < 13:
+                return 1
+            if hour < 20:
+                return 2
+            return 3
+        return _fallback
+
+
+# ---------------------------------------------------------------------------
+# Feature cache
+# ---------------------------------------------------------------------------
+
+class FeatureCache:
+    """
+    Incremental columnar view of the labelled setups in the feature store.
+    sync() parses only what was appended since the last call.
+    """
+
+    def __init__(self, source: Optional[Path] = None, cache_dir: Optional[Path] = None,
+                 bucket_days: float = BUCKET_DAYS) -> None:
+        self.source = Path(source or SOURCE_PATH)
+        self.dir = Path(cache_dir or CACHE_DIR)
+        self.features_dir = self.dir / "features"
+        self.manifest_path = self.dir / "manifest.json"
+        self.bucket_ms = max(1, int(bucket_days * 86_400_000))
+        self.stats: Dict[str, Any] = {"reset": False, "bytes_read": 0, "rows_parsed": 0,
+                                      "samples_added": 0, "buckets_written": 0, "pending": 0}
+        self.m = self._load_manifest()
+
+    def _fresh(self) -> Dict[str, Any]:
+        return {
+            "version": CACHE_VERSION,
+            "source": str(self.source),
+            "bucket_ms": self.bucket_ms,
+            "feature_names": FEATURE_NAMES,
+            "ino": None,
+            "offset": 0,
+            "head_digest": None,
+            "max_ts": 0,
+            "buckets": {},
+            "pending_features": {},
+            "pending_labels": {},
+        }
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            m = orjson.loads(self.manifest_path.read_bytes())
+        except Exception:
+            return self._fresh()
+        same = (
+            m.get("version") == CACHE_VERSION
+            and m.get("source") == str(self.source)
+            and m.get("bucket_ms") == self.bucket_ms
+            and m.get("feature_names") == FEATURE_NAMES
+        )
+        return m if same else self._fresh()
+
+    def _save_manifest(self) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        tmp.write_bytes(orjson.dumps(self.m))
+        os.replace(tmp, self.manifest_path)
+
+    def reset(self) -> None:
+        # forget the buckets before deleting them
+        self.m = self._fresh()
+        self._save_manifest()
+        shutil.rmtree(self.features_dir, ignore_errors=True)
+        self.stats["reset"] = True
+
+    def _head_digest(self, upto: int) -> Optional[str]:
+        # first few KB of the consumed range; catches in-place rewrites
+        n = min(upto, 4096)
+        if n <= 0:
+            return None
+        try:
+            with open(self.source, "rb") as f:
+                return hashlib.blake2b(f.read(n), digest_size=12).hexdigest()
+        except OSError:
+            return None
+
+    def _bucket_path(self, regime: str, start: int, gen: int) -> Path:
+        return self.features_dir / regime / f"{start}-{start + self.bucket_ms}.{gen}.fcol"
+
+    def _gc(self) -> None:
+        """Drop bucket files the saved manifest no longer references (old generations, crash leftovers)."""
+        live = {self._bucket_path(r, int(st), int(b["gen"])) for r, per in self.m["buckets"].items()
+                for st, b in per.items()}
+        try:
+            regimes = list(self.features_dir.iterdir())
+        except OSError:
+            return
+        for d in regimes:
+            for p in d.glob("*.fcol*"):
+                if p not in live:
+                    try:
+                        p.unlink()
+                    except OSError:
+                        pass
+
+    def buckets(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        {regime: [bucket, ...]} oldest first; each bucket carries start,
+        rows, lo/hi ts, digest and path.
+        """
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        for regime, per in self.m["buckets"].items():
+            items = []
+            for start_s, b in per.items():
+                start = int(start_s)
+                items.append(dict(b, start=start, path=str(self._bucket_path(regime, start, int(b["gen"])))))
+            items.sort(key=lambda b: b["start"])
+            out[regime] = items
+        return out
+
+    def sync(self, full: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        try:
+            st = os.stat(self.source)
+        except OSError:
+            log.warning("feature store not found at %s", self.source)
+            return self.buckets()
+
+        m = self.m
+        if (
+            full
+            or m["ino"] != st.st_ino
+            or st.st_size < m["offset"]
+            or (m["offset"] and self._head_digest(m["offset"]) != m["head_digest"])
+        ):
+            self.reset()
+            m = self.m
+
+        if st.st_size == m["offset"]:
+            return self.buckets()
+
+        with open(self.source, "rb") as f:
+            f.seek(m["offset"])
+            data = f.read(st.st_size - m["offset"])
+        end = data.rfind(b"\n") + 1  # a torn last line waits for the next run
+        data = data[:end]
+        self.stats["bytes_read"] = end
+
+        session_int = _session_int_fn()
+        pending_f: Dict[str, Any] = m["pending_features"]
+        pending_l: Dict[str, Any] = m["pending_labels"]
+        new: Dict[Tuple[str, int], List[Tuple[int, int, List[float]]]] = {}
+        max_ts = int(m.get("max_ts") or 0)
+        parsed = 0
+
+        def add(regime: str, ts: int, y: int, vec: List[float]) -> None:
+            start = ts - ts % self.bucket_ms
+            new.setdefault((regime, start), []).append((ts, y, vec))
+
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                row = orjson.loads(line)
+            except Exception:
+                continue
+            if not isinstance(row, dict):
+                continue
+            parsed += 1
+            y = _label(row)
+            ts = _ts(row)
+            tid = row.get("trade_id")
+            tid = str(tid) if tid not in (None, "") else None
+            if ts is not None and ts > max_ts:
+                max_ts = ts
+
+            if _has_features(row):
+                if ts is None:
+                    continue
+                vec = _row_vector(row, ts, session_int)
+                regime = _regime(row)
+                if y is None and tid:
+                    early = pending_l.pop(tid, None)
+                    if early is None:
+                        pending_f[tid] = [ts, regime, vec]
+                        continue
+                    y = int(early[1])
+                if y is not None:
+                    add(regime, ts, y, vec)
+            elif y is not None and tid:
+                feat = pending_f.pop(tid, None)
+                if feat is None:
+                    # outcome seen before its feature row
+                    pending_l[tid] = [ts or 0, y]
+                    continue
+                add(feat[1], int(feat[0]), y, feat[2])
+
+        for (regime, start), samples in new.items():
+            self._append_bucket(regime, start, samples)
+
+        if PENDING_MAX_AGE_DAYS > 0 and max_ts:
+            cutoff = max_ts - int(PENDING_MAX_AGE_DAYS * 86_400_000)
+            for pend in (pending_f, pending_l):
+                for tid in [t for t, v in pend.items() if v[0] and v[0] < cutoff]:
+                    del pend[tid]
+
+        m["ino"] = st.st_ino
+        m["offset"] += end
+        m["head_digest"] = self._head_digest(m["offset"])
+        m["max_ts"] = max_ts
+        self._save_manifest()
+        if new:
+            self._gc()
+
+        self.stats["rows_parsed"] = parsed
+        self.stats["samples_added"] = sum(len(s) for s in new.values())
+        self.stats["buckets_written"] = len(new)
+        self.stats["pending"] = len(pending_f)
+        return self.buckets()
+
+    def _append_bucket(self, regime: str, start: int, samples: List[Tuple[int, int, List[float]]]) -> None:
+        prev = self.m["buckets"].get(regime, {}).get(str(start))
+        gen = int(prev["gen"]) + 1 if prev else 0
+        cols = _empty_columns()
+        if prev:
+            path = self._bucket_path(regime, start, int(prev["gen"]))
+            try:
+                cols = read_columns(path)
+            except Exception as e:
+                log.warning("unreadable bucket %s (%r); rebuilding from new rows only", path, e)
+                cols = _empty_columns()
+        last = cols["ts"][-1] if len(cols["ts"]) else None
+        samples.sort(key=lambda s: s[0])
+        for ts, y, vec in samples:
+            cols["ts"].append(ts)
+            cols["y"].append(y)
+            for name, v in zip(FEATURE_NAMES, vec):
+                cols[name].append(v)
+        if last is not None and samples[0][0] < last:
+            order = sorted(range(len(cols["ts"])), key=cols["ts"].__getitem__)
+            cols = {k: array(c.typecode, (c[i] for i in order)) for k, c in cols.items()}
+        # a new file: the committed generation stays intact until the manifest moves on
+        digest = write_columns(self._bucket_path(regime, start, gen), cols)
+        self.m["buckets"].setdefault(regime, {})[str(start)] = {
+            "gen": gen,
+            "rows": len(cols["ts"]),
+            "lo": cols["ts"][0],
+            "hi": cols["ts"][-1],
+            "digest": digest,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Models
+# ---------------------------------------------------------------------------
+
+def _sigmoid(z: float) -> float:
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-min(z, 500.0)))
+    e = math.exp(max(z, -500.0))
+    return e / (1.0 + e)
+
+
+def _logit(p: float) -> float:
+    p = min(max(p, 1e-7), 1.0 - 1e-7)
+    return math.log(p / (1.0 - p))
+
+
+def _solve(a: List[List[float]], b: List[float]) -> List[float]:
+    """Gaussian elimination with partial pivoting; a is modified."""
+    n = len(b)
+    b = list(b)
+    for i in range(n):
+        piv = max(range(i, n), key=lambda r: abs(a[r][i]))
+        if abs(a[piv][i]) < 1e-12:
+            continue
+        a[i], a[piv] = a[piv], a[i]
+        b[i], b[piv] = b[piv], b[i]
+        for r in range(i + 1, n):
+            f = a[r][i] / a[i][i]
+            if f:
+                ar, ai = a[r], a[i]
+                for c in range(i, n):
+                    ar[c] -= f * ai[c]
+                b[r] -= f * b[i]
+    x = [0.0] * n
+    for i in range(n - 1, -1, -1):
+        if abs(a[i][i]) < 1e-12:
+            continue
+        x[i] = (b[i] - sum(a[i][c] * x[c] for c in range(i + 1, n))) / a[i][i]
+    return x
+
+
+class LogitModel:
+    """
+    L2-regularised logistic regression on standardised inputs, fitted with
+    Newton steps (same objective as sklearn's LogisticRegression(C=C)).
+    Used when scikit-learn is not installed or a window has one class.
+    """
+
+    classes_ = (0, 1)
+
+    def __init__(self, C: float = 1.0, max_iter: int = 25, tol: float = 1e-6) -> None:
+        self.C = C
+        self.max_iter = max_iter
+        self.tol = tol
+        self.mu: List[float] = []
+        self.sd: List[float] = []
+        self.w: List[float] = []
+
+    def _z(self, r: Sequence[float]) -> List[float]:
+        return [(float(v) - m) / s for v, m, s in zip(r, self.mu, self.sd)] + [1.0]
+
+    def fit(self, X: Any, y: Sequence[int]) -> "LogitModel":
+        rows = [list(map(float, r)) for r in X]
+        n = len(rows)
+        d = len(rows[0]) if n else len(FEATURE_NAMES)
+        if n:
+            self.mu = [sum(c) / n for c in zip(*rows)]
+            self.sd = [math.sqrt(sum((v - m) ** 2 for v in c) / n) or 1.0 for c, m in zip(zip(*rows), self.mu)]
+        else:
+            self.mu, self.sd = [0.0] * d, [1.0] * d
+        npos = sum(y)
+        self.w = [0.0] * d + [_logit((npos + 0.5) / (n + 1.0))]
+        if npos == 0 or npos == n:
+            return self
+
+        Z = [self._z(r) for r in rows]
+        D = d + 1
+        reg = 1.0 / self.C
+        for _ in range(self.max_iter):
+            g = [0.0] * D
+            H = [[0.0] * D for _ in range(D)]
+            w = self.w
+            for z, t in zip(Z, y):
+                p = _sigmoid(sum(a * b for a, b in zip(w, z)))
+                e = p - t
+                q = p * (1.0 - p)
+                for i, zi in enumerate(z):
+                    g[i] += e * zi
+                    if zi:
+                        qi = q * zi
+                        Hi = H[i]
+                        for j in range(i, D):
+                            Hi[j] += qi * z[j]
+            for i in range(D):
+                for j in range(i):
+                    H[i][j] = H[j][i]
+            for i in range(d):  # intercept is not penalised
+                g[i] += reg * w[i]
+                H[i][i] += reg
+            step = _solve(H, g)
+            self.w = [a - b for a, b in zip(w, step)]
+            if max(abs(s) for s in step) < self.tol:
+                break
+        return self
+
+    def predict_proba(self, X: Any) -> List[List[float]]:
+        out = []
+        for r in X:
+            p = _sigmoid(sum(a * b for a, b in zip(self.w, self._z(r))))
+            out.append([1.0 - p, p])
+        return out
+
+
+class CalibratedModel:
+    """
+    Base classifier followed by a Platt map:
+        p = sigmoid(a * logit(p_base) + b)
+    predict_proba() returns [[1 - p, p], ...] like sklearn.
+    """
+
+    classes_ = (0, 1)
+
+    def __init__(self, base: Any, a: float, b: float, feature_names: List[str]) -> None:
+        self.base = base
+        self.a = a
+        self.b = b
+        self.feature_names = list(feature_names)
+
+    def predict_proba(self, X: Any) -> List[List[float]]:
+        out = []
+        for p in _positive_proba(self.base, X):
+            q = _sigmoid(self.a * _logit(p) + self.b)
+            out.append([1.0 - q, q])
+        return out
+
+
+def _positive_proba(model: Any, X: Any) -> List[float]:
+    if len(X) == 0:
+        return []
+    return [float(r[1]) for r in model.predict_proba(X)]
+
+
+def _fit_base(X: Any, y: List[int], params: TrainParams) -> Any:
+    if len(set(y)) > 1:
+        try:
+            from sklearn.linear_model import LogisticRegression
+            from sklearn.pipeline import Pipeline
+            from sklearn.preprocessing import StandardScaler
+        except ImportError:
+            pass
+        else:
+            model = Pipeline(steps=[
+                ("scaler", StandardScaler()),
+                ("clf", LogisticRegression(C=params.C, max_iter=params.max_iter)),
+            ])
+            model.fit(X, y)
+            return model
+    return LogitModel(C=params.C).fit(X, y)
+
+
+def fit_platt(p: Sequence[float], y: Sequence[int], max_iter: int = 50) -> Tuple[float, float]:
+    """
+    Platt scaling on logit(p) with Platt's smoothed targets.
+    Returns (a, b); identity (1, 0) when the window has one class.
+    """
+    npos = sum(y)
+    nneg = len(y) - npos
+    if npos == 0 or nneg == 0:
+        return 1.0, 0.0
+    hi = (npos + 1.0) / (npos + 2.0)
+    lo = 1.0 / (nneg + 2.0)
+    t = [hi if v else lo for v in y]
+    z = [_logit(v) for v in p]
+    a, b = 1.0, 0.0
+    for _ in range(max_iter):
+        gaa = gab = gbb = ga = gb = 0.0
+        for zi, ti in zip(z, t):
+            q = _sigmoid(a * zi + b)
+            e = q - ti
+            w = q * (1.0 - q)
+            ga += e * zi
+            gb += e
+            gaa += w * zi * zi
+            gab += w * zi
+            gbb += w
+        gaa += 1e-9
+        gbb += 1e-9
+        det = gaa * gbb - gab * gab
+        if abs(det) < 1e-15:
+            break
+        da = (gbb * ga - gab * gb) / det
+        db = (gaa * gb - gab * ga) / det
+        a -= da
+        b -= db
+        if abs(da) < 1e-7 and abs(db) < 1e-7:
+            break
+    return a, b
+
+
+def fit_calibrated(X: Any, y: List[int], params: TrainParams) -> CalibratedModel:
+    n = len(y)
+    k = int(n * (1.0 - params.cal_frac))
+    a, b = 1.0, 0.0
+    if params.cal_frac > 0 and min(k, n - k) >= 20:
+        head = _fit_base(X[:k], y[:k], params)
+        a, b = fit_platt(_positive_proba(head, X[k:]), y[k:])
+    return CalibratedModel(_fit_base(X, y, params), a, b, FEATURE_NAMES)
+
+
+def evaluate(y: Sequence[int], p: Sequence[float], bins: int = 10) -> Dict[str, Any]:
+    n = len(y)
+    if not n:
+        return {"n": 0}
+    npos = sum(y)
+    eps = 1e-7
+    logloss = -sum(math.log(min(max(q if t else 1.0 - q, eps), 1.0)) for t, q in zip(y, p)) / n
+    brier = sum((q - t) ** 2 for t, q in zip(y, p)) / n
+    acc = sum(1 for t, q in zip(y, p) if (q >= 0.5) == bool(t)) / n
+
+    auc = None
+    if 0 < npos < n:
+        order = sorted(range(n), key=p.__getitem__)
+        ranks = [0.0] * n
+        i = 0
+        while i < n:
+            j = i
+            while j + 1 < n and p[order[j + 1]] == p[order[i]]:
+                j += 1
+            r = (i + j) / 2.0 + 1.0
+            for k in range(i, j + 1):
+                ranks[order[k]] = r
+            i = j + 1
+        pos_ranks = sum(r for r, t in zip(ranks, y) if t)
+        auc = (pos_ranks - npos * (npos + 1) / 2.0) / (npos * (n - npos))
+
+    cal = []
+    ece = 0.0
+    for bi in range(bins):
+        lo, hi = bi / bins, (bi + 1) / bins
+        idx = [i for i, q in enumerate(p) if lo <= q < hi or (bi == bins - 1 and q == 1.0)]
+        if not idx:
+            continue
+        mp = sum(p[i] for i in idx) / len(idx)
+        fp = sum(y[i] for i in idx) / len(idx)
+        ece += len(idx) / n * abs(mp - fp)
+        cal.append({"lo": lo, "hi": hi, "n": len(idx), "mean_p": round(mp, 4), "frac_pos": round(fp, 4)})
+
+    return {
+        "n": n,
+        "base_rate": round(npos / n, 4),
+        "auc": round(auc, 4) if auc is not None else None,
+        "logloss": round(logloss, 4),
+        "brier": round(brier, 4),
+        "accuracy": round(acc, 4),
+        "ece": round(ece, 4),
+        "calibration": cal,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Jobs (run in TrainingScheduler workers)
+# ---------------------------------------------------------------------------
+
+def _warm_training() -> bool:
+    try:
+        import numpy  # noqa: F401
+        import sklearn.linear_model  # noqa: F401
+        import sklearn.pipeline  # noqa: F401
+        import sklearn.preprocessing  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def fit_fold_job(train_paths: Tuple[str, ...], test_path: str, params: TrainParams) -> Dict[str, Any]:
+    X, y = load_matrix(train_paths)
+    model = fit_calibrated(X, y, params)
+    Xt, yt = load_matrix([test_path])
+    p = _positive_proba(model, Xt)
+    return {
+        "train_rows": len(y),
+        "test_rows": len(yt),
+        "metrics": evaluate(yt, p),
+        "y": yt,
+        "p": [round(v, 6) for v in p],
+    }
+
+
+def fit_final_job(train_paths: Tuple[str, ...], params: TrainParams) -> Dict[str, Any]:
+    X, y = load_matrix(train_paths)
+    model = fit_calibrated(X, y, params)
+    return {
+        "model": model,
+        "train_rows": len(y),
+        "in_sample": evaluate(y, _positive_proba(model, X)),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Walk-forward planning
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Fold:
+    regime: str
+    index: int          # -1 = final model (all buckets)
+    train: Tuple[str, ...]
+    test: Optional[str]
+    key: str
+    train_rows: int
+    test_range: Tuple[int, int] = (0, 0)
+
+
+def _fold_key(params_key: str, regime: str, train_digests: Sequence[str], test_digest: str = "") -> str:
+    h = hashlib.blake2b(digest_size=12)
+    h.update(params_key.encode())
+    h.update(regime.encode())
+    for d in train_digests:
+        h.update(d.encode())
+    h.update(b"|" + test_digest.encode())
+    return h.hexdigest()
+
+
+def plan_regime(regime: str, buckets: List[Dict[str, Any]], params: TrainParams) -> Tuple[List[Fold], Fold]:
+    pkey = params.key()
+    folds: List[Fold] = []
+    cum = 0
+    for k, b in enumerate(buckets):
+        if k and cum >= params.min_train_rows and b["rows"] >= params.min_test_rows:
+            folds.append(Fold(
+                regime=regime,
+                index=k,
+                train=tuple(x["path"] for x in buckets[:k]),
+                test=b["path"],
+                key=_fold_key(pkey, regime, [x["digest"] for x in buckets[:k]], b["digest"]),
+                train_rows=cum,
+                test_range=(b["lo"], b["hi"]),
+            ))
+        cum += b["rows"]
+    if params.max_folds > 0:
+        folds = folds[-params.max_folds:]
+    final = Fold(
+        regime=regime,
+        index=-1,
+        train=tuple(x["path"] for x in buckets),
+        test=None,
+        key=_fold_key(pkey, regime, [x["digest"] for x in buckets]),
+        train_rows=cum,
+        test_range=(buckets[0]["lo"], buckets[-1]["hi"]) if buckets else (0, 0),
+    )
+    return folds, final
+
+
+# ---------------------------------------------------------------------------
+# Publishing
+# ---------------------------------------------------------------------------
+
+def _atomic_write_bytes(path: Path, payload: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
+
+
+def _dump_model(model: Any, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        import joblib  # type: ignore
+
+        joblib.dump(model, tmp)
+    except ImportError:
+        with open(tmp, "wb") as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return orjson.loads(path.read_bytes())
+    except Exception:
+        return None
+
+
+def published_version(models_dir: Path, regime: str) -> Optional[str]:
+    meta = _read_json(models_dir / f"setup_classifier_{regime}_meta.json") or {}
+    return meta.get("model_version")
+
+
+def _reported_version(models_dir: Path, regime: str) -> Optional[str]:
+    # the report is written for rejected builds too
+    report = _read_json(models_dir / "reports" / f"setup_classifier_{regime}_report.json") or {}
+    return report.get("model_version")
+
+
+def _iso(ms: int) -> Optional[str]:
+    if not ms:
+        return None
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc).isoformat()
+
+
+def publish_regime(models_dir: Path, regime: str, model: Any, meta: Dict[str, Any], report: Dict[str, Any]) -> None:
+    """
+    Model first, then meta and report; the manifest (written by the caller
+    once all regimes are done) is what running classifiers react to.
+    """
+    _dump_model(model, models_dir / f"setup_classifier_{regime}.pkl")
+    _atomic_write_bytes(models_dir / f"setup_classifier_{regime}_meta.json",
+                        orjson.dumps(meta, option=orjson.OPT_INDENT_2))
+    _atomic_write_bytes(models_dir / "reports" / f"setup_classifier_{regime}_report.json",
+                        orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+
+def _write_manifest(models_dir: Path, published: Dict[str, Dict[str, Any]]) -> None:
+    path = models_dir / MANIFEST_NAME
+    manifest = _read_json(path) or {}
+    regimes = manifest.get("regimes") or {}
+    regimes.update(published)
+    now_ms = int(time.time() * 1000)
+    _atomic_write_bytes(path, orjson.dumps({"updated_ms": now_ms, "updated_at": _iso(now_ms), "regimes": regimes},
+                                           option=orjson.OPT_INDENT_2))
+
+
+# ---------------------------------------------------------------------------
+# Orchestration
+# ---------------------------------------------------------------------------
+
+def run(
+    *,
+    full: bool = False,
+    regimes: Optional[Sequence[str]] = None,
+    workers: Optional[int] = None,
+    publish: bool = True,
+    scheduler: Any = None,
+    params: Optional[TrainParams] = None,
+    source: Optional[Path] = None,
+    cache_dir: Optional[Path] = None,
+    models_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Sync the feature cache, refit stale folds and final models, write
+    reports and publish. Returns a summary dict.
+
+    full=True drops the feature cache and fold results first (cold rebuild).
+    Pass `scheduler` to share a TrainingScheduler; otherwise one with
+    `workers` processes is created for this run and shut down after.
+    """
+    t0 = time.perf_counter()
+    params = params or TrainParams.from_env()
+    models_dir = Path(models_dir or MODELS_DIR)
+    cache = FeatureCache(source, cache_dir)
+    folds_dir = cache.dir / "folds"
+    if full:
+        shutil.rmtree(folds_dir, ignore_errors=True)
+
+    all_buckets = cache.sync(full=full)
+    t_sync = time.perf_counter() - t0
+    wanted = {r.strip().lower() for r in regimes} if regimes else None
+
+    plans: Dict[str, Tuple[List[Fold], Fold]] = {}
+    for regime, buckets in sorted(all_buckets.items()):
+        if wanted is None or regime in wanted:
+            plans[regime] = plan_regime(regime, buckets, params)
+
+    fold_results: Dict[str, Dict[int, Dict[str, Any]]] = {r: {} for r in plans}
+    todo: List[Tuple[str, Fold]] = []
+    for regime, (folds, final) in plans.items():
+        for f in folds:
+            cached = _read_json(folds_dir / regime / f"{f.key}.json")
+            if cached is not None:
+                cached["cached"] = True
+                fold_results[regime][f.index] = cached
+            else:
+                todo.append(("fold", f))
+        if folds and (full or _reported_version(models_dir, regime) != final.key):
+            todo.append(("final", final))
+
+    finals: Dict[str, Dict[str, Any]] = {}
+    failed: List[str] = []
+    sched = scheduler
+    if todo:
+        if sched is None:
+            from app.ai.training_scheduler import TrainingScheduler
+
+            sched = TrainingScheduler(workers or None)
+        sched.register_kind(JOB_KIND, warmup=_warm_training)
+        futures = []
+        for what, f in sorted(todo, key=lambda j: -j[1].train_rows):
+            if what == "fold":
+                fut = sched.submit(fit_fold_job, f.train, f.test, params, kind=JOB_KIND, priority=f.train_rows)
+            else:
+                fut = sched.submit(fit_final_job, f.train, params, kind=JOB_KIND, priority=f.train_rows)
+            futures.append((what, f, fut))
+        for what, f, fut in futures:
+            try:
+                res = fut.result()
+            except Exception as e:
+                log.warning("%s fit failed regime=%s index=%s: %r", what, f.regime, f.index, e)
+                failed.append(f"{f.regime}:{f.index}")
+                continue
+            if what == "final":
+                finals[f.regime] = res
+                continue
+            res["test_range"] = list(f.test_range)
+            try:
+                _atomic_write_bytes(folds_dir / f.regime / f"{f.key}.json", orjson.dumps(res))
+            except Exception as e:
+                log.warning("could not cache fold %s/%s: %r", f.regime, f.key, e)
+            res["cached"] = False
+            fold_results[f.regime][f.index] = res
+        if scheduler is None:
+            sched.shutdown()
+
+    # fold results no longer in any plan
+    for regime, (folds, _final) in plans.items():
+        keep = {f"{f.key}.json" for f in folds}
+        rdir = folds_dir / regime
+        if rdir.is_dir():
+            for p in rdir.iterdir():
+                if p.name not in keep:
+                    p.unlink(missing_ok=True)
+
+    now_ms = int(time.time() * 1000)
+    statuses: Dict[str, str] = {}
+    published: Dict[str, Dict[str, Any]] = {}
+    for regime, (folds, final) in plans.items():
+        results = [(f, fold_results[regime][f.index]) for f in folds if f.index in fold_results[regime]]
+        ys: List[int] = []
+        ps: List[float] = []
+        for _f, r in results:
+            ys.extend(r["y"])
+            ps.extend(r["p"])
+        oos = evaluate(ys, ps)
+
+        if not folds:
+            statuses[regime] = f"insufficient_history rows={final.train_rows}"
+            continue
+        if regime not in finals:
+            statuses[regime] = "unchanged" if _reported_version(models_dir, regime) == final.key else "failed"
+            continue
+
+        fin = finals[regime]
+        model = fin["model"]
+        report = {
+            "regime": regime,
+            "model_version": final.key,
+            "built_ms": now_ms,
+            "built_at": _iso(now_ms),
+            "params": asdict(params),
+            "data_range": [_iso(final.test_range[0]), _iso(final.test_range[1])],
+            "rows": final.train_rows,
+            "buckets": len(final.train),
+            "folds": [
+                {
+                    "index": f.index,
+                    "train_rows": r.get("train_rows"),
+                    "test_rows": r.get("test_rows"),
+                    "test_range": [_iso(f.test_range[0]), _iso(f.test_range[1])],
+                    "cached": r.get("cached", False),
+                    "metrics": {k: v for k, v in (r.get("metrics") or {}).items() if k != "calibration"},
+                }
+                for f, r in results
+            ],
+            "oos": oos,
+            "in_sample": fin["in_sample"],
+        }
+
+        auc = oos.get("auc")
+        if not publish:
+            statuses[regime] = f"trained oos_auc={auc} (not published)"
+            continue
+        if auc is None or auc < params.min_auc:
+            statuses[regime] = f"rejected oos_auc={auc} min_auc={params.min_auc}"
+            report["published"] = False
+            _atomic_write_bytes(models_dir / "reports" / f"setup_classifier_{regime}_report.json",
+                                orjson.dumps(report, option=orjson.OPT_INDENT_2))
+            continue
+
+        report["published"] = True
+        base = getattr(model, "base", None)
+        meta = {
+            "regime": regime,
+            "model_version": final.key,
+            "feature_names": list(FEATURE_NAMES),
+            "trained_at": _iso(now_ms),
+            "base_model": type(base).__name__,
+            "calibration": {"method": "platt", "a": model.a, "b": model.b},
+            "dataset_info": {
+                "rows": final.train_rows,
+                "buckets": len(final.train),
+                "data_range": report["data_range"],
+            },
+            "metrics": {
+                "oos": {k: v for k, v in oos.items() if k != "calibration"},
+                "in_sample": {k: v for k, v in fin["in_sample"].items() if k != "calibration"},
+                "folds": len(results),
+            },
+            "report": f"reports/setup_classifier_{regime}_report.json",
+        }
+        try:
+            publish_regime(models_dir, regime, model, meta, report)
+        except Exception as e:
+            log.exception("publish failed for regime %s: %r", regime, e)
+            statuses[regime] = "publish_failed"
+            continue
+        published[regime] = {"version": final.key, "published_ms": now_ms, "rows": final.train_rows, "oos_auc": auc}
+        statuses[regime] = f"published oos_auc={auc} folds={len(results)} rows={final.train_rows}"
+
+    if published:
+        _write_manifest(models_dir, published)
+
+    n_folds = sum(len(f) for f, _ in plans.values())
+    n_fit = sum(1 for w, _ in todo if w == "fold")
+    summary = {
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+        "sync_s": round(t_sync, 3),
+        "cache": dict(cache.stats),
+        "folds_total": n_folds,
+        "folds_fit": n_fit,
+        "folds_cached": n_folds - n_fit,
+        "finals_fit": sum(1 for w, _ in todo if w == "final"),
+        "failed": failed,
+        "regimes": statuses,
+    }
+    return summary
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Walk-forward training for the regime setup classifiers")
+    ap.add_argument("--full", action="store_true", help="drop cached features/folds and rebuild")
+    ap.add_argument("--regimes", default="", help="comma-separated subset, default all")
+    ap.add_argument("--workers", type=int, default=0, help="training processes (default TRAINING_WORKERS / cores)")
+    ap.add_argument("--no-publish", action="store_true", help="train and report, don't replace models")
+    args = ap.parse_args()
+
+    summary = run(
+        full=args.full,
+        regimes=[r for r in args.regimes.split(",") if r.strip()] or None,
+        workers=args.workers or None,
+        publish=not args.no_publish,
+    )
+    c = summary["cache"]
+    log.info(
+        "sync %.2fs reset=%s bytes=%d rows=%d samples+=%d buckets_written=%d pending=%d",
+        summary["sync_s"], c["reset"], c["bytes_read"], c["rows_parsed"], c["samples_added"],
+        c["buckets_written"], c["pending"],
+    )
+    log.info(
+        "folds total=%d fit=%d cached=%d finals=%d failed=%d in %.2fs",
+        summary["folds_total"], summary["folds_fit"], summary["folds_cached"], summary["finals_fit"],
+        len(summary["failed"]), summary["elapsed_s"],
+    )
+    for regime, status in summary["regimes"].items():
+        log.info("regime=%s %s", regime, status)
+
+
+if __name__ == "__main__":
+    main()
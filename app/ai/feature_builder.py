@@ -1,12 +1,45 @@
+"""
+Feature builder: state/features_trades.jsonl + enriched outcomes ->
+state/feature_store.jsonl (+ typed Parquet under state/feature_store/).
+
+Sources are streamed in batches of FEATURE_BUILDER_BATCH_ROWS lines from
+the byte offset the last run stopped at (per source, checked against inode
+and a head fingerprint). Feature rows and outcomes are joined on trade_id;
+whichever side arrives first waits in a pending set that is bounded by
+FEATURE_BUILDER_PENDING_MAX and FEATURE_BUILDER_PENDING_MAX_AGE_H and
+written unjoined when evicted. Each batch is validated against the feature
+registry as one polars frame, appended to the JSONL and written as one
+Parquet chunk per day.
+
+The checkpoint (offsets, pending set, output size, batch seq) is saved every
+FEATURE_BUILDER_CHECKPOINT_SEC and at the end. After a crash, output past the
+checkpoint is truncated/deleted and the sources are re-read from the
+checkpointed offsets, so no row is written twice.
+"""
 from __future__ import annotations
+import hashlib
 import math
+import os
+import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+import polars as pl
+
+from app.core.parquet_partitioned_writer import write_partitioned_chunk
 from app.data.append_store import append_rows, load_progress
 from app.data.feature_registry import enforce_schema
 
+try:  # POSIX
+    import resource
+except Exception:  # pragma: no cover - Windows
+    resource = None
+try:
+    import psutil
+except Exception:
+    psutil = None
+
 # ---------------- JSON ----------------
 try:
     import orjson
@@ -28,14 +61,24 @@ STATE = ROOT / 'state'
 FEATURES_TRADES = STATE / 'features_trades.jsonl'
 OUTCOMES = STATE / 'ai_events' / 'outcomes.enriched.backfill.jsonl'
 OUT = STATE / 'feature_store.jsonl'
+PARQUET_DIR = STATE / 'feature_store'
+CHECKPOINT = STATE / 'features' / 'builder_checkpoint.json'
+
+BATCH_ROWS = int(os.getenv('FEATURE_BUILDER_BATCH_ROWS', '50000'))
+PENDING_MAX = int(os.getenv('FEATURE_BUILDER_PENDING_MAX', '50000'))
+PENDING_MAX_AGE_MS = int(float(os.getenv('FEATURE_BUILDER_PENDING_MAX_AGE_H', '168')) * 3_600_000)
+CHECKPOINT_SEC = float(os.getenv('FEATURE_BUILDER_CHECKPOINT_SEC', '10'))
+WRITE_PARQUET = os.getenv('FEATURE_BUILDER_PARQUET', '1').strip().lower() not in ('0', 'false', 'no')
+
+_CHUNK = 8 * 1024 * 1024
+_HEAD_BYTES = 256
+_PREFIX = 'features'
 
 # ---------------- HELPERS ----------------
 def ffloat(x):
     try:
         v = float(x)
-        if math.isnan(v) or math.isinf(v):
-            return None
-        return v
+        return v if math.isfinite(v) else None
     except Exception:
         return None
 
@@ -61,19 +104,45 @@ def regime(row):
     if adx < 20 and atr < 1.0: return 'range'
     return 'other'
 
-def load_jsonl(path: Path):
-    if not path.exists():
-        return []
-    out = []
+def iter_lines(path: Path, start: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """
+    (next_offset, line) for each complete line from byte offset `start`.
+    A torn last line is left for the next run.
+    """
     with path.open('rb') as f:
-        for line in f:
-            try:
-                obj = loads(line)
-                if isinstance(obj, dict):
-                    out.append(obj)
-            except Exception:
-                continue
-    return out
+        f.seek(start)
+        pos = start
+        carry = b''
+        while True:
+            data = f.read(_CHUNK)
+            if not data:
+                return
+            buf = carry + data
+            i = 0
+            while True:
+                j = buf.find(b'\n', i)
+                if j < 0:
+                    break
+                yield pos + j + 1, buf[i:j]
+                i = j + 1
+            pos += i
+            carry = buf[i:]
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS of this process in MB (Windows: psutil peak working set); None if unknown."""
+    try:
+        if resource is not None:
+            return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        if psutil is not None:
+            mi = psutil.Process().memory_info()
+            return round(getattr(mi, 'peak_wset', mi.rss) / (1024 * 1024), 1)
+    except Exception:
+        pass
+    return None
+
+def head_fp(path: Path, n: int = _HEAD_BYTES) -> str:
+    with path.open('rb') as f:
+        return hashlib.blake2b(f.read(n), digest_size=8).hexdigest()
 
 # ---------------- NORMALIZERS ----------------
 def normalize_feature_trade(r: Dict[str, Any]):
@@ -113,7 +182,8 @@ def normalize_outcome(evt: Dict[str, Any]):
         if evt.get('event_type') != 'outcome_enriched':
             return None
 
-        extra = evt.get('outcome', {}).get('payload', {}).get('extra', {})
+        payload = evt.get('outcome', {}).get('payload', {})
+        extra = payload.get('extra', {})
         ts = fint(extra.get('opened_ms'))
         dt = datetime.fromtimestamp(ts/1000, tz=timezone.utc) if ts else None
 
@@ -130,9 +200,9 @@ def normalize_outcome(evt: Dict[str, Any]):
             'session': session(dt.hour if dt else None),
             'entry_price': ffloat(extra.get('entry_price')),
             'exit_price': ffloat(extra.get('exit_price')),
-            'pnl_usd': ffloat(evt.get('outcome', {}).get('payload', {}).get('pnl_usd')),
-            'r_multiple': ffloat(evt.get('outcome', {}).get('payload', {}).get('r_multiple')),
-            'win': evt.get('outcome', {}).get('payload', {}).get('win'),
+            'pnl_usd': ffloat(payload.get('pnl_usd')),
+            'r_multiple': ffloat(payload.get('r_multiple')),
+            'win': payload.get('win'),
         }
 
         row['regime'] = regime(row)
@@ -140,37 +210,279 @@ def normalize_outcome(evt: Dict[str, Any]):
     except Exception:
         return None
 
+# ---------------- STREAMING ----------------
+class Source:
+    """One append-only JSONL input, read in batches from a checkpointed offset."""
+
+    def __init__(self, name: str, path: Path, normalize, state: Optional[Dict[str, Any]]):
+        self.name = name
+        self.path = path
+        self.normalize = normalize
+        self.offset = 0
+        self.inode = None
+        self._it = None
+        try:
+            st = path.stat()
+        except OSError:
+            return
+        self.inode = st.st_ino
+        state = state or {}
+        offset = int(state.get('offset', 0) or 0)
+        # same file (inode + the bytes already read) and not truncated: resume
+        if (
+            offset
+            and state.get('inode') == self.inode
+            and offset <= st.st_size
+            and state.get('head') == head_fp(path, min(offset, _HEAD_BYTES))
+        ):
+            self.offset = offset
+
+    def batch(self, max_lines: int) -> Tuple[List[Dict[str, Any]], int]:
+        if self.inode is None:
+            return [], 0
+        if self._it is None:
+            self._it = iter_lines(self.path, self.offset)
+        rows = []
+        n = 0
+        for nxt, line in self._it:
+            self.offset = nxt
+            n += 1
+            if line.strip():
+                try:
+                    obj = loads(line)
+                except Exception:
+                    obj = None
+                if isinstance(obj, dict):
+                    o = self.normalize(obj)
+                    if o:
+                        rows.append(o)
+            if n >= max_lines:
+                break
+        return rows, n
+
+    def state(self) -> Dict[str, Any]:
+        head = head_fp(self.path, min(self.offset, _HEAD_BYTES)) if self.offset else None
+        return {'path': str(self.path), 'inode': self.inode, 'head': head, 'offset': self.offset}
+
+
+OUTCOME_FIELDS = ('entry_price', 'exit_price', 'pnl_usd', 'r_multiple', 'win')
+
+def join_rows(feat: Dict[str, Any], outcome: Dict[str, Any]) -> Dict[str, Any]:
+    row = dict(feat)
+    for k in OUTCOME_FIELDS:
+        row[k] = outcome.get(k)
+    for k in ('symbol', 'strategy_name', 'account_label', 'mode', 'ts_open_ms'):
+        if row.get(k) is None and outcome.get(k) is not None:
+            row[k] = outcome.get(k)
+    return row
+
+
+class Joiner:
+    """
+    trade_id join between feature rows and outcomes. Dicts keep arrival
+    order, so eviction pops oldest first.
+    """
+
+    def __init__(self, pending: Optional[Dict[str, Any]] = None):
+        pending = pending or {}
+        self.features: Dict[str, Dict[str, Any]] = dict(pending.get('features') or {})
+        self.outcomes: Dict[str, Dict[str, Any]] = dict(pending.get('outcomes') or {})
+        self.joined = 0
+        self.evicted = 0
+
+    def add(self, row: Dict[str, Any], is_feature: bool) -> Optional[Dict[str, Any]]:
+        tid = row.get('trade_id')
+        if not tid:
+            return row
+        tid = str(tid)
+        other = self.outcomes if is_feature else self.features
+        mine = self.features if is_feature else self.outcomes
+        match = other.pop(tid, None)
+        if match is None:
+            mine[tid] = row
+            return None
+        self.joined += 1
+        return join_rows(row, match) if is_feature else join_rows(match, row)
+
+    def evict(self, newest_ts: int) -> List[Dict[str, Any]]:
+        out = []
+        cutoff = newest_ts - PENDING_MAX_AGE_MS
+        for pend in (self.features, self.outcomes):
+            while len(pend) > PENDING_MAX:
+                out.append(pend.pop(next(iter(pend))))
+            while pend:
+                tid = next(iter(pend))
+                if (pend[tid].get('ts_open_ms') or 0) >= cutoff:
+                    break
+                out.append(pend.pop(tid))
+        self.evicted += len(out)
+        return out
+
+    def state(self) -> Dict[str, Any]:
+        return {'features': self.features, 'outcomes': self.outcomes}
+
+
+_DTYPES = {'int': pl.Int64, 'float': pl.Float64, 'str': pl.String, 'bool': pl.Boolean}
+
+def to_frame(rows: List[Dict[str, Any]]) -> pl.DataFrame:
+    try:
+        return pl.from_dicts(rows, infer_schema_length=None, strict=False)
+    except Exception:
+        # a column mixing nested and scalar values: keep nested ones as JSON
+        flat = [{k: (dumps(v).decode('utf-8') if isinstance(v, (dict, list)) else v) for k, v in r.items()} for r in rows]
+        return pl.from_dicts(flat, infer_schema_length=None, strict=False)
+
+def typed_frame(df: pl.DataFrame, schema: Dict[str, str]) -> pl.DataFrame:
+    """Cast to registry types so every Parquet chunk agrees; nested -> JSON text, all-null -> String."""
+    exprs = []
+    for name, dtype in df.schema.items():
+        kind = schema.get(name)
+        if isinstance(dtype, (pl.Struct, pl.List)):
+            exprs.append(pl.col(name).map_elements(lambda v: dumps(v).decode('utf-8') if v is not None else None,
+                                                   return_dtype=pl.String))
+        elif kind in _DTYPES:
+            exprs.append(pl.col(name).cast(_DTYPES[kind], strict=False))
+        elif dtype == pl.Null:
+            exprs.append(pl.col(name).cast(pl.String))
+    return df.with_columns(exprs) if exprs else df
+
+
+# ---------------- CHECKPOINT ----------------
+def load_checkpoint(path: Path = CHECKPOINT) -> Dict[str, Any]:
+    try:
+        obj = loads(path.read_bytes())
+        if isinstance(obj, dict):
+            return obj
+    except Exception:
+        pass
+    return {}
+
+def save_checkpoint(ck: Dict[str, Any], path: Path = CHECKPOINT) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(dumps(ck))
+    os.replace(tmp, path)
+
+def _chunk_seq(name: str) -> Optional[int]:
+    # '<prefix>-<seq>_<ts>.parquet'
+    head = name.split('_', 1)[0]
+    if not head.startswith(_PREFIX + '-'):
+        return None
+    try:
+        return int(head[len(_PREFIX) + 1:])
+    except ValueError:
+        return None
+
+def recover(ck: Dict[str, Any], out: Path, parquet_dir: Path) -> Tuple[int, int]:
+    """Drop output written after the last checkpoint. Returns (jsonl bytes, parquet files) removed."""
+    cut = 0
+    removed = 0
+    if 'out_size' in ck and out.exists():
+        size = out.stat().st_size
+        if size > ck['out_size']:
+            with out.open('r+b') as f:
+                f.truncate(ck['out_size'])
+            cut = size - ck['out_size']
+    seq = int(ck.get('seq', 0))
+    base = parquet_dir / '_committed'
+    if base.exists():
+        for p in base.rglob(_PREFIX + '-*.parquet*'):
+            s = _chunk_seq(p.name)
+            if s is not None and s > seq:
+                p.unlink(missing_ok=True)
+                removed += 1
+    return cut, removed
+
+
 # ---------------- BUILD ----------------
+def build(*, out: Path = OUT, parquet_dir: Path = PARQUET_DIR, checkpoint: Path = CHECKPOINT,
+          features_path: Path = FEATURES_TRADES, outcomes_path: Path = OUTCOMES,
+          batch_rows: Optional[int] = None, parquet: Optional[bool] = None) -> Dict[str, Any]:
+    batch_rows = max(2, batch_rows or BATCH_ROWS)
+    parquet = WRITE_PARQUET if parquet is None else parquet
+    t0 = time.perf_counter()
+
+    ck = load_checkpoint(checkpoint)
+    recovered = recover(ck, out, parquet_dir) if ck else (0, 0)
+    if any(recovered):
+        print(f'[feature_builder] dropped uncheckpointed output: {recovered[0]} bytes jsonl, {recovered[1]} parquet files')
+    if not ck:
+        # first run after the last_ts-based builder: skip what it already wrote
+        ck = {'seq': 0, 'legacy_last_ts': load_progress().get('last_ts')}
+    legacy_last_ts = ck.get('legacy_last_ts')
+
+    sources = [
+        (Source('features_trades', features_path, normalize_feature_trade, (ck.get('sources') or {}).get('features_trades')), True),
+        (Source('outcomes', outcomes_path, normalize_outcome, (ck.get('sources') or {}).get('outcomes')), False),
+    ]
+    joiner = Joiner(ck.get('pending'))
+    max_ts = int(ck.get('last_ts') or legacy_last_ts or 0)
+    per_source = max(1, batch_rows // len(sources))
+    stats = {'lines': 0, 'rows_out': 0, 'batches': 0, 'parquet_files': 0, 'recovered': recovered}
+    last_save = time.monotonic()
+
+    def commit(force: bool = False) -> None:
+        nonlocal last_save
+        if not force and time.monotonic() - last_save < CHECKPOINT_SEC:
+            return
+        ck['sources'] = {src.name: src.state() for src, _ in sources}
+        ck['pending'] = joiner.state()
+        ck['out_size'] = out.stat().st_size if out.exists() else 0
+        ck['last_ts'] = max_ts
+        ck['updated_ms'] = int(time.time() * 1000)
+        save_checkpoint(ck, checkpoint)
+        last_save = time.monotonic()
+
+    while True:
+        rows = []
+        consumed = 0
+        for src, is_feature in sources:
+            batch, n = src.batch(per_source)
+            consumed += n
+            for r in batch:
+                ts = r.get('ts_open_ms')
+                if legacy_last_ts and not (ts and ts > legacy_last_ts):
+                    continue
+                if ts and ts > max_ts:
+                    max_ts = ts
+                j = joiner.add(r, is_feature)
+                if j is not None:
+                    rows.append(j)
+        if not consumed:
+            break
+        stats['lines'] += consumed
+        rows.extend(joiner.evict(max_ts))
+        if rows:
+            df = to_frame(rows)
+            schema = enforce_schema(df, partial=True)
+            append_rows(out, rows, max_ts)
+            ck['seq'] = int(ck.get('seq', 0)) + 1
+            if parquet:
+                written = write_partitioned_chunk(typed_frame(df, schema), str(parquet_dir), f"{_PREFIX}-{ck['seq']:08d}",
+                                                  time_col='ts_open_ms', partition_cols=('day',))
+                stats['parquet_files'] += len(written)
+            stats['rows_out'] += len(rows)
+            stats['batches'] += 1
+        commit()
+    commit(force=True)
+
+    el = time.perf_counter() - t0
+    stats.update(
+        joined=joiner.joined,
+        evicted=joiner.evicted,
+        pending=len(joiner.features) + len(joiner.outcomes),
+        last_ts=max_ts,
+        elapsed_s=round(el, 3),
+        lines_per_s=round(stats['lines'] / el) if el > 0 else 0,
+        peak_rss_mb=peak_rss_mb(),
+    )
+    return stats
+
 def main():
-    progress = load_progress()
-    last_ts = progress.get('last_ts')
-
-    rows = []
-    max_ts = last_ts or 0
-
-    for r in load_jsonl(FEATURES_TRADES):
-        o = normalize_feature_trade(r)
-        if not o:
-            continue
-        ts = o.get('ts_open_ms')
-        if not last_ts or (ts and ts > last_ts):
-            rows.append(o)
-            if ts and ts > max_ts:
-                max_ts = ts
-
-    for e in load_jsonl(OUTCOMES):
-        o = normalize_outcome(e)
-        if not o:
-            continue
-        ts = o.get('ts_open_ms')
-        if not last_ts or (ts and ts > last_ts):
-            rows.append(o)
-            if ts and ts > max_ts:
-                max_ts = ts
-
-    enforce_schema(rows)
-    append_rows(OUT, rows, max_ts)
-    print(f'[feature_builder] appended={len(rows)} last_ts={max_ts}')
+    st = build()
+    print(f"[feature_builder] appended={st['rows_out']} joined={st['joined']} evicted={st['evicted']} "
+          f"pending={st['pending']} lines={st['lines']} ({st['lines_per_s']}/s) parquet_files={st['parquet_files']} "
+          f"peak_rss={st['peak_rss_mb']}MB last_ts={st['last_ts']}")
 
 if __name__ == '__main__':
     main()
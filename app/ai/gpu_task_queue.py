@@ -1,33 +1,14 @@
 ﻿# app/ai/gpu_task_queue.py
+# Compatibility shim: jobs now go through app.ai.training_scheduler, which
+# uses a GPU worker only when torch + CUDA exist and the CPU pool otherwise.
+
+from app.ai.training_scheduler import TrainingScheduler, get_scheduler
 
-import multiprocessing as mp
 
 class GPUTaskQueue:
-    def __init__(self):
-        self.ctx = mp.get_context("spawn")
-        self.queue = self.ctx.Queue()
-        self.worker = self.ctx.Process(
-            target=self._gpu_worker,
-            args=(self.queue,),
-            daemon=True
-        )
-        self.worker.start()
+    def __init__(self, scheduler: TrainingScheduler = None):
+        self.scheduler = scheduler or get_scheduler()
 
     def submit(self, fn, *args, **kwargs):
-        self.queue.put((fn, args, kwargs))
-
-    @staticmethod
-    def _gpu_worker(queue):
-        import torch
-        from app.ai.gpu_runtime import configure_gpu
-        from app.ai.gpu_warmup import warmup_gpu
-
-        configure_gpu()
-        warmup_gpu()
-
-        while True:
-            fn, args, kwargs = queue.get()
-            try:
-                fn(*args, **kwargs)
-            except Exception as e:
-                print("[GPU WORKER ERROR]", e)
+        """Queue fn(*args, **kwargs) on the GPU path (CPU fallback); returns a Future."""
+        return self.scheduler.submit(fn, *args, device="gpu", **kwargs)
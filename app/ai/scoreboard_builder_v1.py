@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — Incremental Scoreboard Builder (scoreboard.v1)
+
+Purpose
+-------
+Keep state/ai_memory/scoreboard.v1.json (read by ai_scoreboard_gatekeeper_v1)
+fresh without re-reading the whole trainable outcomes history on every refresh.
+
+Design
+------
+- Source:      state/ai_events/outcomes.v1.trainable.jsonl   (append-only)
+- Checkpoint:  state/ai_memory/scoreboard.v1.checkpoint.json
+    {
+      "source": "...", "offset": <bytes folded>, "head_sha1": "...",
+      "buckets": { "<setup_type>|<timeframe>|<symbol>": {<mergeable aggregates>} }
+    }
+- Per bucket we keep only mergeable aggregates:
+    n, wins, losses, sum_pnl, sumsq_pnl, sum_win, sum_loss,
+    r_n, sum_r, sumsq_r, equity, peak, trough, max_dd
+  Wilson bounds, expectancy, std, profit factor and confidence are derived
+  from these at write time (_finalize_bucket), so folding new outcomes is
+  O(new lines), not O(history).
+- If the source shrinks or its head bytes change (rotation / rewrite), the
+  checkpoint is discarded and we fold from offset 0.
+
+Paths
+-----
+- fold_new_outcomes(): one incremental pass (used by the worker loop).
+- full_rebuild_polars(): reads the whole file with polars and aggregates in
+  one shot. Kept for verification; verify() asserts both produce the same
+  scoreboard document.
+
+CLI:
+    python -m app.ai.scoreboard_builder_v1 --once
+    python -m app.ai.scoreboard_builder_v1 --worker [--interval 5]
+    python -m app.ai.scoreboard_builder_v1 --full-rebuild
+    python -m app.ai.scoreboard_builder_v1 --verify
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import math
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+ROOT = Path(__file__).resolve().parents[2]
+
+SOURCE_PATH = Path(os.getenv(
+    "SCOREBOARD_SOURCE_PATH",
+    str(ROOT / "state" / "ai_events" / "outcomes.v1.trainable.jsonl"),
+))
+OUT_PATH = Path(os.getenv(
+    "SCOREBOARD_PATH",
+    str(ROOT / "state" / "ai_memory" / "scoreboard.v1.json"),
+))
+CHECKPOINT_PATH = OUT_PATH.with_name("scoreboard.v1.checkpoint.json")
+
+MIN_N = int(os.getenv("SCOREBOARD_MIN_N", "10"))
+WORKER_INTERVAL_SEC = float(os.getenv("SCOREBOARD_BUILDER_INTERVAL_SEC", "5"))
+
+# Drop obviously fake / dev-only setup types (same hygiene as the original snapshot tool)
+_SKIP_SETUP_TYPES = frozenset({"this_is_not_real", "tick", "emit_test_signal"})
+
+_HEAD_BYTES = 256
+_WILSON_Z = 1.96
+# Floats are rounded in the output so incremental and polars sums compare equal.
+_ROUND = 8
+
+_AGG_FIELDS = (
+    "n", "wins", "losses",
+    "sum_pnl", "sumsq_pnl", "sum_win", "sum_loss",
+    "r_n", "sum_r", "sumsq_r",
+    "equity", "peak", "trough", "max_dd",
+)
+
+
+# ---------------------------------------------------------------------------
+# Row parsing (shared by both paths)
+# ---------------------------------------------------------------------------
+
+def _as_float(x: Any) -> Optional[float]:
+    try:
+        v = float(x)
+        if math.isnan(v) or math.isinf(v):
+            return None
+        return v
+    except Exception:
+        return None
+
+
+def _parse_outcome(row: Any) -> Optional[Tuple[str, str, str, float, Optional[float]]]:
+    """
+    Return (setup_type, timeframe, symbol, pnl_usd, r_multiple) or None to skip.
+    """
+    if not isinstance(row, dict):
+        return None
+    pnl = _as_float(row.get("pnl_usd"))
+    if pnl is None:
+        return None
+
+    setup_type = str(row.get("setup_type") or "unknown").strip() or "unknown"
+    if setup_type in _SKIP_SETUP_TYPES:
+        return None
+    timeframe = str(row.get("timeframe") or row.get("tf") or "unknown").strip() or "unknown"
+    symbol = str(row.get("symbol") or "unknown").strip().upper() or "UNKNOWN"
+
+    r = _as_float(row.get("r_multiple"))
+    if r is None:
+        stats = row.get("stats")
+        if isinstance(stats, dict):
+            r = _as_float(stats.get("r_multiple"))
+    return setup_type, timeframe, symbol, pnl, r
+
+
+def _bucket_id(setup_type: str, timeframe: str, symbol: str) -> str:
+    return f"{setup_type}|{timeframe}|{symbol}"
+
+
+# ---------------------------------------------------------------------------
+# Mergeable aggregates
+# ---------------------------------------------------------------------------
+
+def _new_agg() -> Dict[str, float]:
+    return {k: 0 for k in _AGG_FIELDS}
+
+
+def _fold(agg: Dict[str, float], pnl: float, r: Optional[float]) -> None:
+    agg["n"] += 1
+    agg["sum_pnl"] += pnl
+    agg["sumsq_pnl"] += pnl * pnl
+    if pnl > 0:
+        agg["wins"] += 1
+        agg["sum_win"] += pnl
+    elif pnl < 0:
+        agg["losses"] += 1
+        agg["sum_loss"] += pnl
+    if r is not None:
+        agg["r_n"] += 1
+        agg["sum_r"] += r
+        agg["sumsq_r"] += r * r
+    # Drawdown proxy over the bucket's equity curve, in file order.
+    agg["equity"] += pnl
+    if agg["equity"] > agg["peak"]:
+        agg["peak"] = agg["equity"]
+    if agg["equity"] < agg["trough"]:
+        agg["trough"] = agg["equity"]
+    dd = agg["peak"] - agg["equity"]
+    if dd > agg["max_dd"]:
+        agg["max_dd"] = dd
+
+
+def merge_aggs(a: Dict[str, float], b: Dict[str, float]) -> Dict[str, float]:
+    """
+    Merge two aggregates where `b` covers outcomes strictly after `a`
+    (e.g. two file segments folded independently).
+    """
+    out = {k: a[k] + b[k] for k in ("n", "wins", "losses", "sum_pnl", "sumsq_pnl",
+                                       "sum_win", "sum_loss", "r_n", "sum_r", "sumsq_r")}
+    out["equity"] = a["equity"] + b["equity"]
+    out["peak"] = max(a["peak"], a["equity"] + b["peak"])
+    out["trough"] = min(a["trough"], a["equity"] + b["trough"])
+    # Deepest point of b measured from a's running peak, or b's own drawdown.
+    out["max_dd"] = max(a["max_dd"], b["max_dd"], a["peak"] - a["equity"] - b["trough"])
+    return out
+
+
+def _wilson(wins: float, n: float, z: float = _WILSON_Z) -> Tuple[float, float]:
+    if n <= 0:
+        return 0.0, 0.0
+    p = wins / n
+    z2 = z * z
+    denom = 1.0 + z2 / n
+    centre = p + z2 / (2.0 * n)
+    margin = z * math.sqrt(max(0.0, p * (1.0 - p) / n + z2 / (4.0 * n * n)))
+    return max(0.0, (centre - margin) / denom), min(1.0, (centre + margin) / denom)
+
+
+def _std(s: float, ss: float, n: float) -> Optional[float]:
+    if n < 2:
+        return None
+    var = (ss - s * s / n) / (n - 1)
+    return math.sqrt(var) if var > 0 else 0.0
+
+
+def _confidence(n: int, min_n: int) -> float:
+    # Ramps from 0.0 toward 1.0 as n grows past min_n.
+    if n <= 0:
+        return 0.0
+    return float(min(1.0, max(0.0, 1.0 - math.exp(-(n / max(min_n, 1))))))
+
+
+def _recommended_action(expectancy: float, pf: Optional[float], conf: float) -> str:
+    if conf < 0.60:
+        return "COLD_START"
+    if expectancy <= 0:
+        return "BLOCK"
+    if pf is not None and pf < 1.1:
+        return "BLOCK"
+    return "ALLOW"
+
+
+def _r(x: Optional[float]) -> Optional[float]:
+    if x is None:
+        return None
+    v = round(float(x), _ROUND)
+    return 0.0 if v == 0 else v
+
+
+def _finalize_bucket(bucket_id: str, agg: Dict[str, float], min_n: int) -> Dict[str, Any]:
+    setup_type, timeframe, symbol = bucket_id.split("|", 2)
+    n = int(agg["n"])
+    wins = int(agg["wins"])
+    expectancy = agg["sum_pnl"] / n if n else 0.0
+    pf: Optional[float] = None
+    if agg["sum_loss"] < 0:
+        pf = agg["sum_win"] / abs(agg["sum_loss"])
+    w_lo, w_hi = _wilson(wins, n)
+    r_n = int(agg["r_n"])
+    conf = _confidence(n, min_n)
+    # Decide on the rounded values so both build paths agree at the boundaries.
+    action = _recommended_action(_r(expectancy), _r(pf), _r(conf))
+    return {
+        "bucket_key": {"setup_type": setup_type, "timeframe": timeframe, "symbol": symbol},
+        "n": n,
+        "wins": wins,
+        "losses": int(agg["losses"]),
+        "win_rate": _r(wins / n if n else 0.0),
+        "win_rate_wilson_lo": _r(w_lo),
+        "win_rate_wilson_hi": _r(w_hi),
+        "expectancy": _r(expectancy),
+        "avg_pnl": _r(expectancy),
+        "std_pnl": _r(_std(agg["sum_pnl"], agg["sumsq_pnl"], n)),
+        "sum_pnl": _r(agg["sum_pnl"]),
+        "profit_factor": _r(pf),
+        "r_n": r_n,
+        "expectancy_r": _r(agg["sum_r"] / r_n if r_n else None),
+        "std_r": _r(_std(agg["sum_r"], agg["sumsq_r"], r_n)),
+        "max_dd_proxy": _r(agg["max_dd"]),
+        "confidence": _r(conf),
+        "recommended_action": action,
+    }
+
+
+def build_scoreboard_doc(
+    buckets: Dict[str, Dict[str, float]],
+    min_n: int = MIN_N,
+    source: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Deterministic scoreboard.v1 document from per-bucket aggregates.
+    """
+    return {
+        "schema_version": "scoreboard.v1",
+        "min_n": min_n,
+        "source": str(source or SOURCE_PATH).replace("\\", "/"),
+        "buckets": [_finalize_bucket(k, buckets[k], min_n) for k in sorted(buckets)],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint + incremental fold
+# ---------------------------------------------------------------------------
+
+def _head_sha1(path: Path, upto: int) -> str:
+    n = min(_HEAD_BYTES, max(0, upto))
+    if n <= 0:
+        return ""
+    with path.open("rb") as f:
+        return hashlib.sha1(f.read(n)).hexdigest()
+
+
+def _atomic_write(path: Path, payload: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(source: Path = SOURCE_PATH) -> Dict[str, Any]:
+    empty = {"source": str(source), "offset": 0, "head_sha1": "", "buckets": {}}
+    try:
+        cp = orjson.loads(CHECKPOINT_PATH.read_bytes())
+    except Exception:
+        return empty
+    if not isinstance(cp, dict) or cp.get("source") != str(source):
+        return empty
+    if not isinstance(cp.get("buckets"), dict):
+        return empty
+    return cp
+
+
+def save_checkpoint(cp: Dict[str, Any]) -> None:
+    _atomic_write(CHECKPOINT_PATH, orjson.dumps(cp))
+
+
+def fold_new_outcomes(
+    cp: Dict[str, Any],
+    source: Path = SOURCE_PATH,
+    max_bytes: Optional[int] = None,
+) -> int:
+    """
+    Fold outcomes appended since cp["offset"] into cp["buckets"] (in place).
+    Only complete lines are consumed; a trailing partial line is left for the
+    next pass. Returns the number of outcomes folded.
+    """
+    if not source.exists():
+        return 0
+    size = source.stat().st_size
+    offset = int(cp.get("offset") or 0)
+
+    # Truncated / rotated / rewritten -> start over from 0.
+    if size < offset or (offset > 0 and _head_sha1(source, offset) != cp.get("head_sha1")):
+        cp["offset"] = 0
+        cp["buckets"] = {}
+        offset = 0
+
+    if size == offset:
+        return 0
+
+    with source.open("rb") as f:
+        f.seek(offset)
+        chunk = f.read(max_bytes if max_bytes else size - offset)
+
+    end = chunk.rfind(b"\n")
+    if end < 0:
+        return 0
+    chunk = chunk[: end + 1]
+
+    buckets: Dict[str, Dict[str, float]] = cp["buckets"]
+    folded = 0
+    for line in chunk.splitlines():
+        if not line.strip():
+            continue
+        try:
+            parsed = _parse_outcome(orjson.loads(line))
+        except Exception:
+            continue
+        if parsed is None:
+            continue
+        st, tf, sym, pnl, r = parsed
+        bid = _bucket_id(st, tf, sym)
+        agg = buckets.get(bid)
+        if agg is None:
+            agg = _new_agg()
+            buckets[bid] = agg
+        _fold(agg, pnl, r)
+        folded += 1
+
+    cp["offset"] = offset + len(chunk)
+    if offset == 0 or not cp.get("head_sha1"):
+        cp["head_sha1"] = _head_sha1(source, cp["offset"])
+    return folded
+
+
+def write_scoreboard(cp: Dict[str, Any], min_n: int = MIN_N, source: Path = SOURCE_PATH) -> Dict[str, Any]:
+    doc = build_scoreboard_doc(cp["buckets"], min_n=min_n, source=source)
+    doc["generated_at"] = int(time.time())
+    doc["source_offset"] = int(cp.get("offset") or 0)
+    _atomic_write(OUT_PATH, orjson.dumps(doc, option=orjson.OPT_INDENT_2))
+    return doc
+
+
+def run_once(source: Path = SOURCE_PATH, min_n: int = MIN_N) -> int:
+    """
+    One incremental refresh: load checkpoint, fold new outcomes, and (if anything
+    changed or the scoreboard is missing) write scoreboard + checkpoint.
+    """
+    cp = load_checkpoint(source)
+    prev_offset = int(cp.get("offset") or 0)
+    folded = fold_new_outcomes(cp, source=source)
+    if folded or cp["offset"] != prev_offset or not OUT_PATH.exists():
+        write_scoreboard(cp, min_n=min_n, source=source)
+        save_checkpoint(cp)
+    return folded
+
+
+def run_worker(interval_sec: float = WORKER_INTERVAL_SEC, source: Path = SOURCE_PATH, min_n: int = MIN_N) -> None:
+    """
+    Long-lived worker: the scoreboard is never more than ~interval_sec behind
+    the outcomes file. The checkpoint is held in memory between passes and only
+    persisted when something was folded.
+    """
+    cp = load_checkpoint(source)
+    print(f"[scoreboard_builder] worker start source={source} offset={cp.get('offset')} interval={interval_sec}s")
+    while True:
+        t0 = time.perf_counter()
+        try:
+            prev_offset = int(cp.get("offset") or 0)
+            folded = fold_new_outcomes(cp, source=source)
+            if folded or cp["offset"] != prev_offset or not OUT_PATH.exists():
+                write_scoreboard(cp, min_n=min_n, source=source)
+                save_checkpoint(cp)
+                dt_ms = (time.perf_counter() - t0) * 1000.0
+                print(f"[scoreboard_builder] folded={folded} buckets={len(cp['buckets'])} offset={cp['offset']} took={dt_ms:.1f}ms")
+        except Exception as e:
+            print(f"[scoreboard_builder] pass failed: {e!r}")
+        time.sleep(max(0.0, interval_sec - (time.perf_counter() - t0)))
+
+
+# ---------------------------------------------------------------------------
+# Full rebuild (polars) for verification
+# ---------------------------------------------------------------------------
+
+def _complete_len(source: Path) -> int:
+    """
+    Byte length of the complete-line prefix of source (what a rebuild consumes).
+    """
+    if not source.exists():
+        return 0
+    return source.read_bytes().rfind(b"\n") + 1
+
+
+def full_rebuild_polars(source: Path = SOURCE_PATH) -> Dict[str, Dict[str, float]]:
+    """
+    Rebuild all bucket aggregates from scratch with polars. Rows are parsed with
+    the same _parse_outcome() as the incremental path; only complete lines count.
+    """
+    import polars as pl  # heavy import; only needed for verification rebuilds
+
+    recs: Dict[str, List[Any]] = {"bucket": [], "pnl": [], "r": []}
+    if source.exists():
+        data = source.read_bytes()
+        end = data.rfind(b"\n")
+        for line in (data[: end + 1] if end >= 0 else b"").splitlines():
+            if not line.strip():
+                continue
+            try:
+                parsed = _parse_outcome(orjson.loads(line))
+            except Exception:
+                continue
+            if parsed is None:
+                continue
+            st, tf, sym, pnl, r = parsed
+            recs["bucket"].append(_bucket_id(st, tf, sym))
+            recs["pnl"].append(pnl)
+            recs["r"].append(r)
+
+    if not recs["bucket"]:
+        return {}
+
+    df = pl.DataFrame(recs, schema={"bucket": pl.Utf8, "pnl": pl.Float64, "r": pl.Float64})
+    df = df.with_columns(pl.col("pnl").cum_sum().over("bucket").alias("equity"))
+    df = df.with_columns(pl.max_horizontal(pl.col("equity").cum_max().over("bucket"), pl.lit(0.0)).alias("peak"))
+
+    agg = df.group_by("bucket", maintain_order=True).agg(
+        pl.len().alias("n"),
+        (pl.col("pnl") > 0).sum().alias("wins"),
+        (pl.col("pnl") < 0).sum().alias("losses"),
+        pl.col("pnl").sum().alias("sum_pnl"),
+        (pl.col("pnl") * pl.col("pnl")).sum().alias("sumsq_pnl"),
+        pl.col("pnl").filter(pl.col("pnl") > 0).sum().alias("sum_win"),
+        pl.col("pnl").filter(pl.col("pnl") < 0).sum().alias("sum_loss"),
+        pl.col("r").is_not_null().sum().alias("r_n"),
+        pl.col("r").sum().alias("sum_r"),
+        (pl.col("r") * pl.col("r")).sum().alias("sumsq_r"),
+        pl.col("equity").last().alias("equity"),
+        pl.col("peak").max().alias("peak"),
+        pl.min_horizontal(pl.col("equity").min(), pl.lit(0.0)).alias("trough"),
+        (pl.col("peak") - pl.col("equity")).max().alias("max_dd"),
+    )
+
+    out: Dict[str, Dict[str, float]] = {}
+    for row in agg.iter_rows(named=True):
+        bid = row.pop("bucket")
+        out[bid] = {k: (row[k] if row[k] is not None else 0) for k in _AGG_FIELDS}
+    return out
+
+
+def verify(source: Path = SOURCE_PATH, min_n: int = MIN_N) -> bool:
+    """
+    Build the scoreboard both ways (incremental from offset 0, polars full
+    rebuild) and compare the documents. Prints the first differing bucket.
+    """
+    cp = {"source": str(source), "offset": 0, "head_sha1": "", "buckets": {}}
+    fold_new_outcomes(cp, source=source)
+    inc = build_scoreboard_doc(cp["buckets"], min_n=min_n, source=source)
+    full = build_scoreboard_doc(full_rebuild_polars(source), min_n=min_n, source=source)
+    if inc == full:
+        print(f"[scoreboard_builder] verify OK buckets={len(inc['buckets'])}")
+        return True
+    for a, b in zip(inc["buckets"], full["buckets"]):
+        if a != b:
+            print(f"[scoreboard_builder] verify MISMATCH\n  incremental={a}\n  polars     ={b}")
+            break
+    else:
+        print(f"[scoreboard_builder] verify MISMATCH bucket counts {len(inc['buckets'])} vs {len(full['buckets'])}")
+    return False
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser("Scoreboard builder v1 (incremental)")
+    ap.add_argument("--source", default=str(SOURCE_PATH))
+    ap.add_argument("--min-n", type=int, default=MIN_N)
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--once", action="store_true", help="single incremental pass (default)")
+    mode.add_argument("--worker", action="store_true", help="run forever, refreshing every --interval seconds")
+    mode.add_argument("--full-rebuild", action="store_true", help="rebuild with polars, reset checkpoint")
+    mode.add_argument("--verify", action="store_true", help="compare incremental vs polars rebuild")
+    ap.add_argument("--interval", type=float, default=WORKER_INTERVAL_SEC)
+    args = ap.parse_args()
+
+    source = Path(args.source)
+
+    if args.worker:
+        run_worker(interval_sec=args.interval, source=source, min_n=args.min_n)
+        return 0
+
+    if args.verify:
+        return 0 if verify(source=source, min_n=args.min_n) else 1
+
+    if args.full_rebuild:
+        offset = _complete_len(source)
+        cp = {
+            "source": str(source),
+            "offset": offset,
+            "head_sha1": _head_sha1(source, offset) if offset else "",
+            "buckets": full_rebuild_polars(source),
+        }
+        doc = write_scoreboard(cp, min_n=args.min_n, source=source)
+        save_checkpoint(cp)
+        print(f"[scoreboard_builder] full rebuild buckets={len(doc['buckets'])} offset={offset}")
+        return 0
+
+    t0 = time.perf_counter()
+    folded = run_once(source=source, min_n=args.min_n)
+    print(f"[scoreboard_builder] folded={folded} took={(time.perf_counter() - t0) * 1000.0:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,471 @@
+# app/ai/training_scheduler.py
+# Process-pool scheduler for training jobs (CPU first, GPU when present)
+"""
+TrainingScheduler runs picklable, module-level job functions in a pool of
+spawned worker processes:
+
+    sched = TrainingScheduler()                   # workers = os.cpu_count()
+    fut = sched.submit(fit_model, X, y, kind="logreg", priority=5, timeout=600)
+    model = fut.result()
+
+- priority:   higher runs first; FIFO within a priority
+- futures:    concurrent.futures.Future per job (result / exception)
+- cancel:     fut.cancel() for queued jobs; sched.cancel(fut) also stops a
+              running job (its worker is terminated and replaced)
+- timeout:    per job, seconds of run time; worker is terminated and the
+              future fails with TimeoutError
+- warm reuse: each worker keeps per-kind state across jobs. A kind's
+              optional warmup (register_kind) runs once per worker, and jobs
+              of a kind go to a worker that is already warm for it when one
+              is idle. Inside a job, warm_state(kind) returns that state.
+- GPU:        jobs submitted with device="gpu" go to one dedicated worker that
+              runs configure_gpu()/warmup_gpu(). It is only started when torch
+              is importable and TRAINING_USE_GPU allows it; if no CUDA device
+              turns up, GPU jobs fall back to the CPU pool.
+              current_device() inside a job says where it ended up.
+"""
+
+from __future__ import annotations
+
+import heapq
+import importlib.util
+import itertools
+import multiprocessing as mp
+import os
+import pickle
+import threading
+import time
+import traceback
+from concurrent.futures import CancelledError, Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    from app.core.logger import get_logger  # type: ignore
+except Exception:  # pragma: no cover
+    import logging
+
+    def get_logger(name: str):  # type: ignore
+        logging.basicConfig(level=logging.INFO)
+        return logging.getLogger(name)
+
+
+log = get_logger("training_scheduler")
+
+TRAINING_WORKERS = int(os.getenv("TRAINING_WORKERS", "0") or "0")  # 0 = os.cpu_count()
+TRAINING_USE_GPU = os.getenv("TRAINING_USE_GPU", "auto").strip().lower()  # auto | true | false
+TRAINING_MP_START = os.getenv("TRAINING_MP_START", "spawn")
+
+_POLL_SEC = 0.05
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+_WARM: Dict[str, Any] = {}
+_DEVICE = "cpu"
+
+
+def warm_state(kind: str) -> Any:
+    """Per-worker state produced by the kind's warmup (None if it has none)."""
+    return _WARM.get(kind)
+
+
+def current_device() -> str:
+    """'cuda' inside the GPU worker when a device was configured, else 'cpu'."""
+    return _DEVICE
+
+
+def _picklable_exc(e: BaseException) -> BaseException:
+    try:
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return RuntimeError(repr(e))
+
+
+def _worker_main(worker_id: int, conn, results, gpu: bool) -> None:
+    global _DEVICE
+    if gpu:
+        try:
+            from app.ai.gpu_runtime import configure_gpu
+            from app.ai.gpu_warmup import warmup_gpu
+
+            runtime, _ = configure_gpu()
+            if runtime == "cuda":
+                warmup_gpu()
+                _DEVICE = "cuda"
+        except Exception:
+            _DEVICE = "cpu"
+        if _DEVICE != "cuda":
+            results.put(("nogpu", worker_id, None, None, 0.0))
+            return
+    results.put(("ready", worker_id, None, None, 0.0))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        if msg is None:
+            return
+        job_id, kind, fn, args, kwargs, warmup = msg
+        t0 = time.perf_counter()
+        try:
+            if kind not in _WARM:
+                _WARM[kind] = warmup() if warmup is not None else None
+            out = fn(*args, **kwargs)
+            results.put(("ok", worker_id, job_id, out, time.perf_counter() - t0))
+        except BaseException as e:  # noqa: BLE001 - report everything to the caller
+            err = _picklable_exc(e)
+            try:
+                err.__notes__ = [traceback.format_exc()]  # type: ignore[attr-defined]
+            except Exception:
+                pass
+            results.put(("err", worker_id, job_id, err, time.perf_counter() - t0))
+
+
+# ---------------------------------------------------------------------------
+# Scheduler side
+# ---------------------------------------------------------------------------
+
+@dataclass(order=True)
+class _Job:
+    sort_key: Tuple[int, int]
+    job_id: int = field(compare=False)
+    kind: str = field(compare=False)
+    fn: Callable[..., Any] = field(compare=False)
+    args: tuple = field(compare=False)
+    kwargs: dict = field(compare=False)
+    timeout: Optional[float] = field(compare=False)
+    device: str = field(compare=False)
+    future: Future = field(compare=False)
+
+
+class _Worker:
+    __slots__ = ("wid", "proc", "conn", "gpu", "ready", "warm", "job", "deadline", "started")
+
+    def __init__(self, wid: int, proc, conn, gpu: bool) -> None:
+        self.wid = wid
+        self.proc = proc
+        self.conn = conn
+        self.gpu = gpu
+        self.ready = False
+        self.warm: Set[str] = set()
+        self.job: Optional[_Job] = None
+        self.deadline: Optional[float] = None
+        self.started = 0.0
+
+
+def _gpu_possible() -> bool:
+    if TRAINING_USE_GPU in ("0", "false", "no", "off"):
+        return False
+    return importlib.util.find_spec("torch") is not None
+
+
+class TrainingScheduler:
+    def __init__(self, max_workers: Optional[int] = None, *, use_gpu: Optional[bool] = None) -> None:
+        n = max_workers or TRAINING_WORKERS or os.cpu_count() or 1
+        self._ctx = mp.get_context(TRAINING_MP_START)
+        self._results = self._ctx.Queue()
+        self._cv = threading.Condition()
+        self._heap: List[_Job] = []
+        self._gpu_heap: List[_Job] = []
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._wids = itertools.count(1)
+        self._workers: Dict[int, _Worker] = {}
+        self._by_future: Dict[int, _Job] = {}
+        self._warmups: Dict[str, Optional[Callable[[], Any]]] = {}
+        self._closed = False
+        self.stats: Dict[str, int] = {
+            "submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "timeouts": 0,
+            "warm_hits": 0, "cold_starts": 0, "respawns": 0, "gpu_jobs": 0, "gpu_fallbacks": 0,
+        }
+
+        want_gpu = _gpu_possible() if use_gpu is None else bool(use_gpu)
+        self._gpu_state = "starting" if want_gpu else "none"  # starting | ready | none
+
+        for _ in range(n):
+            self._spawn(gpu=False)
+        if want_gpu:
+            self._spawn(gpu=True)
+
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, name="train-dispatch", daemon=True),
+            threading.Thread(target=self._collect_loop, name="train-collect", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        log.info("started workers=%d gpu=%s", n, self._gpu_state)
+
+    # ---- public API ----
+
+    def register_kind(self, kind: str, warmup: Optional[Callable[[], Any]] = None) -> None:
+        """Set the once-per-worker warmup (module-level callable) for a job kind."""
+        self._warmups[kind] = warmup
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        kind: Optional[str] = None,
+        priority: int = 0,
+        timeout: Optional[float] = None,
+        device: str = "cpu",
+        **kwargs: Any,
+    ) -> Future:
+        fut: Future = Future()
+        job = _Job(
+            sort_key=(-int(priority), next(self._seq)),
+            job_id=next(self._ids),
+            kind=kind or f"{getattr(fn, '__module__', '?')}.{getattr(fn, '__qualname__', '?')}",
+            fn=fn,
+            args=args,
+            kwargs=kwargs,
+            timeout=timeout,
+            device="gpu" if str(device).lower() in ("gpu", "cuda") else "cpu",
+            future=fut,
+        )
+        with self._cv:
+            if self._closed:
+                raise RuntimeError("TrainingScheduler is shut down")
+            self._by_future[id(fut)] = job
+            if job.device == "gpu" and self._gpu_state != "none":
+                heapq.heappush(self._gpu_heap, job)
+            else:
+                if job.device == "gpu":
+                    self.stats["gpu_fallbacks"] += 1
+                heapq.heappush(self._heap, job)
+            self.stats["submitted"] += 1
+            self._cv.notify_all()
+        return fut
+
+    def cancel(self, fut: Future) -> bool:
+        """Cancel a queued or running job. Returns False if it already finished."""
+        if fut.cancel():
+            with self._cv:
+                self.stats["cancelled"] += 1
+                self._by_future.pop(id(fut), None)
+            return True
+        with self._cv:
+            for w in self._workers.values():
+                if w.job is not None and w.job.future is fut:
+                    self._kill(w, CancelledError(f"job {w.job.job_id} cancelled"))
+                    self.stats["cancelled"] += 1
+                    return True
+        return False
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        with self._cv:
+            self._closed = True
+            if cancel_pending:
+                for heap in (self._heap, self._gpu_heap):
+                    for job in heap:
+                        if job.future.cancel():
+                            self.stats["cancelled"] += 1
+                    heap.clear()
+            self._cv.notify_all()
+        if wait:
+            while True:
+                with self._cv:
+                    busy = any(w.job is not None for w in self._workers.values())
+                    if not busy and not self._heap and not self._gpu_heap:
+                        break
+                time.sleep(_POLL_SEC)
+        self._stop.set()
+        with self._cv:
+            for w in list(self._workers.values()):
+                if w.job is not None:
+                    self._kill(w, CancelledError("scheduler shut down"), respawn=False)
+                try:
+                    w.conn.send(None)
+                except Exception:
+                    pass
+        for w in list(self._workers.values()):
+            w.proc.join(timeout=2)
+            if w.proc.is_alive():
+                w.proc.terminate()
+        for t in self._threads:
+            t.join(timeout=2)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cv:
+            return {
+                **self.stats,
+                "queued": len(self._heap) + len(self._gpu_heap),
+                "running": sum(1 for w in self._workers.values() if w.job is not None),
+                "workers": sum(1 for w in self._workers.values() if not w.gpu),
+                "gpu": self._gpu_state,
+            }
+
+    def __enter__(self) -> "TrainingScheduler":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.shutdown(wait=exc[0] is None, cancel_pending=exc[0] is not None)
+
+    # ---- internals (call with self._cv held unless noted) ----
+
+    def _spawn(self, gpu: bool) -> _Worker:
+        parent, child = self._ctx.Pipe()
+        wid = next(self._wids)
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(wid, child, self._results, gpu),
+            name=f"train-worker-{wid}{'-gpu' if gpu else ''}",
+            daemon=True,
+        )
+        proc.start()
+        child.close()
+        w = _Worker(wid, proc, parent, gpu)
+        self._workers[wid] = w
+        return w
+
+    def _kill(self, w: _Worker, exc: BaseException, respawn: bool = True) -> None:
+        job = w.job
+        w.job = None
+        try:
+            w.proc.terminate()
+        except Exception:
+            pass
+        self._workers.pop(w.wid, None)
+        if job is not None:
+            self._by_future.pop(id(job.future), None)
+            if not job.future.done():
+                job.future.set_exception(exc)
+        if respawn and not self._stop.is_set():
+            self.stats["respawns"] += 1
+            self._spawn(gpu=w.gpu)
+        self._cv.notify_all()
+
+    def _gpu_fallback(self) -> None:
+        # GPU not usable on this host: move queued GPU jobs to the CPU pool
+        self._gpu_state = "none"
+        while self._gpu_heap:
+            job = heapq.heappop(self._gpu_heap)
+            self.stats["gpu_fallbacks"] += 1
+            heapq.heappush(self._heap, job)
+        log.info("no CUDA device; GPU jobs run on the CPU pool")
+
+    def _pick_worker(self, job: _Job, idle: List[_Worker]) -> _Worker:
+        for w in idle:
+            if job.kind in w.warm:
+                return w
+        # cold: prefer a worker with the fewest warm kinds (least to lose)
+        return min(idle, key=lambda w: len(w.warm))
+
+    def _next_job(self, heap: List[_Job]) -> Optional[_Job]:
+        while heap:
+            job = heapq.heappop(heap)
+            if job.future.set_running_or_notify_cancel():
+                return job
+            self._by_future.pop(id(job.future), None)
+        return None
+
+    def _assign(self, heap: List[_Job], idle: List[_Worker]) -> None:
+        while heap and idle:
+            job = self._next_job(heap)
+            if job is None:
+                return
+            w = self._pick_worker(job, idle)
+            idle.remove(w)
+            warm = job.kind in w.warm
+            self.stats["warm_hits" if warm else "cold_starts"] += 1
+            if w.gpu:
+                self.stats["gpu_jobs"] += 1
+            w.job = job
+            w.started = time.monotonic()
+            w.deadline = w.started + job.timeout if job.timeout else None
+            w.warm.add(job.kind)
+            try:
+                w.conn.send((job.job_id, job.kind, job.fn, job.args, job.kwargs, self._warmups.get(job.kind)))
+            except Exception as e:
+                # unpicklable job or dead pipe: fail the job, keep the worker unless the pipe is gone
+                w.job = None
+                w.deadline = None
+                self._by_future.pop(id(job.future), None)
+                job.future.set_exception(_picklable_exc(e))
+                self.stats["failed"] += 1
+                if isinstance(e, (OSError, EOFError)):
+                    self._kill(w, WorkerCrashed(str(e)))
+                else:
+                    idle.append(w)
+
+    def _dispatch_loop(self) -> None:
+        with self._cv:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                for w in list(self._workers.values()):
+                    if not w.ready and not w.proc.is_alive():
+                        # died during startup (e.g. GPU init crashed)
+                        self._workers.pop(w.wid, None)
+                        if w.gpu:
+                            self._gpu_fallback()
+                        elif not self._closed:
+                            self.stats["respawns"] += 1
+                            self._spawn(gpu=False)
+                    elif w.job is not None and w.deadline is not None and now > w.deadline:
+                        self.stats["timeouts"] += 1
+                        self._kill(w, TimeoutError(f"job {w.job.job_id} exceeded {w.job.timeout}s"))
+                    elif w.job is not None and not w.proc.is_alive():
+                        self.stats["failed"] += 1
+                        self._kill(w, WorkerCrashed(f"worker exited with {w.proc.exitcode}"))
+
+                cpu_idle = [w for w in self._workers.values() if not w.gpu and w.ready and w.job is None]
+                gpu_idle = [w for w in self._workers.values() if w.gpu and w.ready and w.job is None]
+                self._assign(self._gpu_heap, gpu_idle)
+                self._assign(self._heap, cpu_idle)
+                self._cv.wait(_POLL_SEC)
+
+    def _collect_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                kind, wid, job_id, payload, _elapsed = self._results.get(timeout=_POLL_SEC)
+            except Exception:
+                continue
+            with self._cv:
+                w = self._workers.get(wid)
+                if kind == "ready":
+                    if w is not None:
+                        w.ready = True
+                        if w.gpu:
+                            self._gpu_state = "ready"
+                elif kind == "nogpu":
+                    if w is not None:
+                        self._workers.pop(wid, None)
+                    self._gpu_fallback()
+                elif w is not None and w.job is not None and w.job.job_id == job_id:
+                    job = w.job
+                    w.job = None
+                    w.deadline = None
+                    self._by_future.pop(id(job.future), None)
+                    if not job.future.done():
+                        if kind == "ok":
+                            job.future.set_result(payload)
+                            self.stats["completed"] += 1
+                        else:
+                            job.future.set_exception(payload)
+                            self.stats["failed"] += 1
+                # else: result from a worker we already killed (timeout/cancel) -> drop
+                self._cv.notify_all()
+
+
+_DEFAULT: Optional[TrainingScheduler] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_scheduler() -> TrainingScheduler:
+    """Process-wide scheduler (created on first use)."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                _DEFAULT = TrainingScheduler()
+    return _DEFAULT
@@ -1,7 +1,9 @@
-﻿import json
-import os
+﻿import os
+import threading
 from datetime import datetime
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from app.api.read_model import CachedJsonFile, JsonView, atomic_write_json, conditional_response
 
 router = APIRouter()
 
@@ -12,33 +14,40 @@ STATE_PATH = os.path.join(
     'governance_state.json'
 )
 
-@router.get('/governance')
-def get_governance():
-    if not os.path.exists(STATE_PATH):
-        return {}
+GOVERNANCE_DOC = CachedJsonFile(STATE_PATH, default=None)
+GOVERNANCE_VIEW = JsonView([GOVERNANCE_DOC], lambda data: data if data is not None else {})
+
+# PATCHes are read-modify-write; serialize them within the process
+_write_lock = threading.Lock()
 
-    with open(STATE_PATH, 'r', encoding='utf-8') as f:
-        return json.load(f)
+
+@router.get('/governance')
+def get_governance(request: Request):
+    status, body, headers = conditional_response(GOVERNANCE_VIEW, request.headers.get('if-none-match'))
+    return Response(content=body, status_code=status, media_type='application/json', headers=headers)
 
 @router.patch('/governance/{district_id}')
 def update_governance(district_id: str, updates: dict):
-    if not os.path.exists(STATE_PATH):
-        raise HTTPException(status_code=500, detail='Governance state missing')
-
-    with open(STATE_PATH, 'r', encoding='utf-8') as f:
-        payload = json.load(f)
+    with _write_lock:
+        current, _ = GOVERNANCE_DOC.get()
+        if current is None:
+            raise HTTPException(status_code=500, detail='Governance state missing')
 
-    if district_id not in payload['districts']:
-        raise HTTPException(status_code=404, detail='Unknown district')
+        payload = dict(current)
+        payload['districts'] = dict(current.get('districts', {}))
 
-    for key, value in updates.items():
-        if key in payload['districts'][district_id]:
-            payload['districts'][district_id][key] = value
+        if district_id not in payload['districts']:
+            raise HTTPException(status_code=404, detail='Unknown district')
 
-    payload['districts'][district_id]['last_updated_utc'] = datetime.utcnow().isoformat()
+        district = dict(payload['districts'][district_id])
+        for key, value in updates.items():
+            if key in district:
+                district[key] = value
 
-    with open(STATE_PATH, 'w', encoding='utf-8') as f:
-        json.dump(payload, f, indent=2)
+        district['last_updated_utc'] = datetime.utcnow().isoformat()
+        payload['districts'][district_id] = district
 
-    return payload['districts'][district_id]
+        atomic_write_json(STATE_PATH, payload)
+        GOVERNANCE_DOC.invalidate()
 
+    return district
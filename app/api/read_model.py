@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# In-process read model for the cockpit API.
+#
+# Each source file is parsed once and re-parsed only when its
+# (mtime_ns, size, inode) changes; atomic writers (tmp + os.replace) always
+# produce a new inode, so back-to-back writes inside one mtime tick are
+# still seen. Views pre-serialize their JSON body and derive a strong ETag
+# from it, so an unchanged resource costs a few stat() calls per request
+# and a matching If-None-Match is answered with 304 and no body.
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class CachedJsonFile:
+    """
+    Parsed JSON file, reloaded on change. get() returns shared data:
+    callers must not mutate it.
+    """
+
+    def __init__(self, path: str, default: Any = None) -> None:
+        self.path = path
+        self.default = default
+        self._key: Any = object()
+        self._data: Any = default
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self) -> Tuple[Any, Optional[Tuple[int, int, int]]]:
+        key = _stat_key(self.path)
+        if key == self._key:
+            return self._data, key
+        with self._lock:
+            if key != self._key:
+                if key is None:
+                    data = self.default
+                else:
+                    try:
+                        with open(self.path, 'r', encoding='utf-8-sig') as f:
+                            data = json.load(f)
+                    except (OSError, ValueError):
+                        # mid-write or broken: keep serving the last good copy
+                        return self._data, self._key
+                self._data = data
+                self._key = key
+                self.loads += 1
+            return self._data, self._key
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._key = object()
+
+
+class JsonView:
+    """
+    Response body built from one or more CachedJsonFile sources.
+    Rebuilt only when a source's version changes.
+    """
+
+    def __init__(self, sources: List[CachedJsonFile], build: Callable[..., Any]) -> None:
+        self.sources = sources
+        self.build = build
+        self._key: Any = object()
+        self._body = b''
+        self._etag = ''
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self) -> Tuple[bytes, str]:
+        loaded = [s.get() for s in self.sources]
+        key = tuple(k for _, k in loaded)
+        if key == self._key:
+            return self._body, self._etag
+        with self._lock:
+            if key != self._key:
+                body = json.dumps(self.build(*[d for d, _ in loaded]), separators=(',', ':')).encode('utf-8')
+                self._body = body
+                self._etag = '"' + hashlib.blake2b(body, digest_size=10).hexdigest() + '"'
+                self._key = key
+                self.builds += 1
+            return self._body, self._etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match check (weak comparison, as RFC 9110 requires for GET).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    bare = etag[2:] if etag.startswith('W/') else etag
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == bare:
+            return True
+    return False
+
+
+def atomic_write_json(path: str, payload: Any, indent: Optional[int] = 2) -> None:
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=indent)
+    os.replace(tmp, path)
+
+
+def conditional_response(view: JsonView, if_none_match: Optional[str]) -> Tuple[int, bytes, Dict[str, str]]:
+    """
+    (status, body, headers) for a GET of `view`; framework-agnostic so the
+    FastAPI routes and the bench server share it.
+    """
+    body, etag = view.get()
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag_matches(if_none_match, etag):
+        return 304, b'', headers
+    return 200, body, headers
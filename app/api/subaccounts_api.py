@@ -1,6 +1,7 @@
-﻿import json
-import os
-from fastapi import APIRouter
+﻿import os
+from fastapi import APIRouter, Request, Response
+
+from app.api.read_model import CachedJsonFile, JsonView, conditional_response
 
 router = APIRouter()
 
@@ -18,25 +19,32 @@ GOV_FILE = os.path.join(
     'governance_state.json'
 )
 
-@router.get('/subaccounts')
-def get_subaccounts():
-    if not os.path.exists(STATE_FILE):
-        return []
+SUBACCOUNTS_DOC = CachedJsonFile(STATE_FILE, default=None)
+GOVERNANCE_DOC = CachedJsonFile(GOV_FILE, default=None)
 
-    with open(STATE_FILE, 'r', encoding='utf-8') as f:
-        state = json.load(f)
 
-    subaccounts = state.get('subaccounts', [])
+def _build_subaccounts(state, gov_state):
+    if not isinstance(state, dict):
+        return []
 
     governance = {}
-    if os.path.exists(GOV_FILE):
-        with open(GOV_FILE, 'r', encoding='utf-8') as f:
-            governance = json.load(f).get('districts', {})
+    if isinstance(gov_state, dict):
+        governance = gov_state.get('districts', {}) or {}
 
-    for sa in subaccounts:
-        gid = sa['subaccount_uid']
+    out = []
+    for sa in state.get('subaccounts', []):
+        row = dict(sa)
+        gid = sa.get('subaccount_uid')
         if gid in governance:
-            sa.update(governance[gid])
+            row.update(governance[gid])
+        out.append(row)
+    return out
 
-    return subaccounts
 
+SUBACCOUNTS_VIEW = JsonView([SUBACCOUNTS_DOC, GOVERNANCE_DOC], _build_subaccounts)
+
+
+@router.get('/subaccounts')
+def get_subaccounts(request: Request):
+    status, body, headers = conditional_response(SUBACCOUNTS_VIEW, request.headers.get('if-none-match'))
+    return Response(content=body, status_code=status, media_type='application/json', headers=headers)
@@ -38,7 +38,7 @@ from app.core.flashback_common import (
     alert_bot_error,
 )
 
-from app.core.ai_action_bus import ACTION_LOG_PATH
+from app.core.ai_action_bus import ACTION_LOG_PATH, open_cursor
 
 # Logging
 try:
@@ -242,49 +242,6 @@ def _validate_action(act: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     return out
 
 
-# ---------------------------------------------------------------------------
-# File tailing
-# ---------------------------------------------------------------------------
-
-def _iter_new_objects(path: Path, offset: int) -> Tuple[int, List[Dict[str, Any]]]:
-    """
-    Safe tailing with truncation detection.
-    Reads JSONL objects.
-    """
-    if not path.exists():
-        return offset, []
-
-    try:
-        size = path.stat().st_size
-    except Exception:
-        return offset, []
-
-    if offset > size:
-        logger.warning("ai_action_router: file truncated; resetting offset to 0")
-        offset = 0
-
-    objs: List[Dict[str, Any]] = []
-    try:
-        with path.open("rb") as f:
-            f.seek(offset)
-            for line in f:
-                offset += len(line)
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    obj = orjson.loads(line)
-                    if isinstance(obj, dict):
-                        objs.append(obj)
-                except Exception:
-                    continue
-    except Exception as e:
-        alert_bot_error("ai_action_router", f"read error: {e}", "ERROR")
-        return offset, []
-
-    return offset, objs
-
-
 # ---------------------------------------------------------------------------
 # Thresholds loader (disk store → fallback defaults, with ENV overrides)
 # ---------------------------------------------------------------------------
@@ -451,11 +408,8 @@ def loop() -> None:
         ACCOUNT_LABEL, POLL_SECONDS, SEND_TG, CONF_NOTIFY, CONF_EXEC_ELIGIBLE, DEBUG
     )
 
-    # Start at EOF to avoid spam
-    try:
-        offset = ACTION_LOG_PATH.stat().st_size if ACTION_LOG_PATH.exists() else 0
-    except Exception:
-        offset = 0
+    # Persisted cursor: first run starts at EOF (avoid spam), restarts resume
+    cursor = open_cursor(f"ai_action_router_{ACCOUNT_LABEL}", start="end")
 
     # Startup notice (only if TG enabled and throttle allows)
     if SEND_TG and _tg_throttle():
@@ -468,10 +422,10 @@ def loop() -> None:
         record_heartbeat("ai_action_router")
 
         try:
-            offset, objs = _iter_new_objects(ACTION_LOG_PATH, offset)
+            objs = cursor.poll()
 
             if DEBUG:
-                logger.info("[DBG] poll: offset=%s objs=%s path=%s", offset, len(objs), str(ACTION_LOG_PATH))
+                logger.info("[DBG] poll: offset=%s objs=%s path=%s", cursor.offset, len(objs), str(ACTION_LOG_PATH))
 
             for obj in objs:
                 env = _normalize_to_envelope(obj)
@@ -512,6 +466,8 @@ def loop() -> None:
                 except Exception as e:
                     alert_bot_error("ai_action_router", f"tg error: {e}", "WARN")
 
+            cursor.commit()
+
         except Exception as e:
             alert_bot_error("ai_action_router", f"loop error: {e}", "ERROR")
 
@@ -28,7 +28,7 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 from app.core.ai_action_builder import build_trade_action_from_sample
-from app.core.ai_state_bus import build_ai_snapshot, validate_snapshot_v2
+from app.core.ai_state_bus import get_state_service, validate_snapshot_v2
 from app.core.flashback_common import send_tg, record_heartbeat, alert_bot_error
 
 try:
@@ -182,6 +182,14 @@ AI_PILOT_MEMORY_CANARY_ONLY: bool = _env_bool("AI_PILOT_MEMORY_CANARY_ONLY", "tr
 # ✅ cold start sizing default (matches enforcer behavior)
 AI_PILOT_COLD_START_SIZE_MULT: float = _env_float("AI_PILOT_COLD_START_SIZE_MULT", "0.25")
 
+# Skip policy evaluation while the state snapshot version hasn't moved,
+# but still re-evaluate at least every AI_PILOT_MAX_SKIP_SEC.
+AI_PILOT_SKIP_UNCHANGED: bool = _env_bool("AI_PILOT_SKIP_UNCHANGED", "true")
+AI_PILOT_MAX_SKIP_SEC: float = _env_float("AI_PILOT_MAX_SKIP_SEC", "60")
+
+_last_eval_version: Optional[int] = None
+_last_eval_ts: float = 0.0
+
 
 def _require_decision_logger() -> None:
     if append_decision is not None:
@@ -210,12 +218,15 @@ def _write_decision(payload: Dict[str, Any]) -> None:
 
 
 def _build_ai_state() -> Dict[str, Any]:
-    snap = build_ai_snapshot(
+    svc = get_state_service(
+        ACCOUNT_LABEL,
         focus_symbols=None,
         include_trades=False,
         trades_limit=0,
         include_orderbook=True,
     )
+    state_snap = svc.current()
+    snap = state_snap.as_dict()
     ok, errors = validate_snapshot_v2(snap)
     if not ok:
         raise RuntimeError(f"snapshot_v2_invalid: {errors}")
@@ -240,6 +251,9 @@ def _build_ai_state() -> Dict[str, Any]:
         "buses": freshness,
         "safety": safety,
         "snapshot_v2": snap,
+        "state_version": state_snap.version,
+        "state_build_ms": state_snap.build_ms,
+        "state_rebuilt": list(state_snap.rebuilt),
     }
 
 
@@ -637,13 +651,42 @@ def _dispatch_actions(actions: List[Dict[str, Any]], *, label: str) -> int:
 
 
 def run_once() -> None:
+    global _last_eval_version, _last_eval_ts
+
+    cpu0 = time.process_time()
     record_heartbeat("ai_pilot")
     ai_state = _build_ai_state()
+    version = ai_state.get("state_version")
+
+    def _log_poll(outcome: str) -> None:
+        logger.info(
+            "⏱ poll v=%s %s build=%.2fms rebuilt=%s cpu=%.2fms",
+            version,
+            outcome,
+            float(ai_state.get("state_build_ms") or 0.0),
+            ",".join(ai_state.get("state_rebuilt") or []) or "-",
+            (time.process_time() - cpu0) * 1000.0,
+        )
+
+    now = time.time()
+    if (
+        AI_PILOT_SKIP_UNCHANGED
+        and version is not None
+        and version == _last_eval_version
+        and (now - _last_eval_ts) < AI_PILOT_MAX_SKIP_SEC
+    ):
+        _log_poll("unchanged")
+        return
+
     safety = ai_state.get("safety") or {}
     if safety.get("is_safe") is False:
         logger.warning("🚫 Snapshot unsafe, skipping policy eval: %s", safety.get("reasons"))
+        _log_poll("unsafe")
         return
 
+    _last_eval_version = version
+    _last_eval_ts = now
+
     sample_actions = _run_sample_policy(ai_state)
     core_actions = _run_core_policy(ai_state)
 
@@ -654,6 +697,7 @@ def run_once() -> None:
 
     _dispatch_actions(sample_actions, label=ACCOUNT_LABEL)
     _dispatch_actions(core_actions, label=ACCOUNT_LABEL)
+    _log_poll("evaluated")
 
 
 def loop() -> None:
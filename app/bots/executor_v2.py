@@ -60,7 +60,7 @@ from app.core.strategy_gate import (
     strategy_label,
     strategy_risk_pct,
 )
-from app.core.portfolio_guard import can_open_trade
+from app.core.portfolio_guard import can_open_trade, is_breaker_active, release_trade, reserve_trade
 from app.core.flashback_common import get_equity_usdt, record_heartbeat, GLOBAL_BREAKER
 from app.core.session_guard import should_block_trading
 from app.ai.setup_memory_policy import get_risk_multiplier  # keep: risk multiplier lives here
@@ -85,7 +85,7 @@ from app.sim.paper_broker import PaperBroker  # type: ignore
 
 # ✅ NEW: canonical policy gate + audit log
 from app.ai.ai_scoreboard_gatekeeper_v1 import scoreboard_gate_decide
-from app.ai.ai_executor_gate import ai_gate_decide, load_setup_policy, resolve_policy_cfg_for_strategy
+from app.ai.ai_executor_gate import ai_gate_decide, get_compiled_policy
 from app.core.ai_decision_stub_emitter import ensure_default_ai_decision
 
 log = get_logger("executor_v2")
@@ -792,20 +792,6 @@ def emit_ai_decision(
 
 # ---------- AI GATE WRAPPER ---------- #
 
-# Cache policy in-memory to avoid re-reading file for every signal
-_POLICY_CACHE: Optional[Dict[str, Any]] = None
-_POLICY_CACHE_TS: float = 0.0
-_POLICY_CACHE_TTL_SEC: float = 5.0  # light refresh so Telegram/UI edits apply quickly
-
-def _get_policy_cached() -> Dict[str, Any]:
-    global _POLICY_CACHE, _POLICY_CACHE_TS
-    now = time.time()
-    if _POLICY_CACHE is None or (now - _POLICY_CACHE_TS) > _POLICY_CACHE_TTL_SEC:
-        _POLICY_CACHE = load_setup_policy()
-        _POLICY_CACHE_TS = now
-    return _POLICY_CACHE
-
-
 def run_ai_gate(signal: Dict[str, Any], strat_id: str, bound_log, *, account_label: str, mode: str, trade_id: str, symbol: str) -> Dict[str, Any]:
     """
     Canonical AI gate path:
@@ -837,10 +823,10 @@ def run_ai_gate(signal: Dict[str, Any], strat_id: str, bound_log, *, account_lab
     except Exception:
         score_f = None
 
-    policy = _get_policy_cached()
-    policy_cfg = resolve_policy_cfg_for_strategy(policy, strat_id)
+    # Compiled once per setup_policy.json version (stat per call, no re-merge)
+    thresholds = get_compiled_policy().for_strategy(strat_id)
 
-    # This logs to state/ai_policy_log.jsonl (canonical) and returns allow/block
+    # Counts every decision, logs blocks + sampled allows to state/ai_policy_log.jsonl
     gate = ai_gate_decide(
         strategy_name=strat_id,
         symbol=str(symbol),
@@ -848,10 +834,10 @@ def run_ai_gate(signal: Dict[str, Any], strat_id: str, bound_log, *, account_lab
         mode=str(mode),
         features=features,
         raw_score=score_f,
-        policy_cfg=policy_cfg,
         trade_id=str(trade_id),
         precheck_allow=pre_allow,
         precheck_reason=pre_reason,
+        thresholds=thresholds,
     )
 
     decision = {
@@ -1014,7 +1000,7 @@ async def handle_strategy_signal(strat_name: str, strat_cfg: Dict[str, Any], sig
 
     lock_active = SUSPECT_LOCK_PATH.exists()
     try:
-        breaker_on = bool(GLOBAL_BREAKER.get("on", False))
+        breaker_on = bool(GLOBAL_BREAKER.get("on", False)) or is_breaker_active()
     except Exception:
         breaker_on = False
 
@@ -1586,6 +1572,9 @@ async def handle_strategy_signal(strat_name: str, strat_cfg: Dict[str, Any], sig
             strategy_name=strat_cfg.get("name", strat_name),
             risk_usd=risk_capped,
             equity_now_usd=equity_val,
+            symbol=symbol,
+            side=str(side),
+            notional_usd=float(qty_capped) * float(price_f or 0),
         )
     except TypeError:
         try:
@@ -1759,19 +1748,36 @@ async def handle_strategy_signal(strat_name: str, strat_cfg: Dict[str, Any], sig
     )
 
     if live_allowed:
-        order_id = await execute_entry(
-            symbol=symbol,
-            signal_side=str(side),
-            qty=float(qty_capped),
-            price=price_f,
-            strat=strat_id,
-            mode=trade_mode,
-            sub_uid=sub_uid,
+        reserved, reserve_reason = reserve_trade(
+            client_trade_id,
+            symbol,
+            str(side),
+            float(qty_capped) * float(price_f or 0),
+            float(risk_capped),
             account_label=account_label,
-            trade_id=client_trade_id,
-            bound_log=bound,
-            started_ms=started_ms,
         )
+        if not reserved:
+            bound.info("Exposure reservation refused for %s: %s", symbol, reserve_reason)
+            return
+
+        order_id = None
+        try:
+            order_id = await execute_entry(
+                symbol=symbol,
+                signal_side=str(side),
+                qty=float(qty_capped),
+                price=price_f,
+                strat=strat_id,
+                mode=trade_mode,
+                sub_uid=sub_uid,
+                account_label=account_label,
+                trade_id=client_trade_id,
+                bound_log=bound,
+                started_ms=started_ms,
+            )
+        finally:
+            if not order_id:
+                release_trade(client_trade_id)
         if not order_id:
             bound.warning("LIVE entry failed; not emitting setup_context (no order_id).")
             return
@@ -1,27 +1,72 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Flashback — Risk Daemon (stub v0.1)
+Flashback — Risk Daemon (v1.0)
 
 Role
 ----
-Placeholder risk daemon so supervisor_ai_stack can manage a "risk" worker.
+Real-time fleet risk view + automatic global breaker.
 
-For now this JUST:
-    - writes a heartbeat periodically
+Keeps, per account (and fleet-wide):
+    - positions (signed qty, avg entry), seeded from position_bus and moved
+      by every execution
+    - mark prices (executions' markPrice/execPrice, trades bus last price)
+    - realized PnL today (fills, fees, funding), unrealized PnL
+    - intraday PnL peak and drawdown from that peak
 
-No breakers, no trade blocking yet.
+Inputs are push-style, no REST polling:
+    - state/ws_executions*.jsonl     tailed by byte offset (ws_switchboard)
+    - state/positions_bus.json       via position_bus.subscribe_positions
+    - state/trades_bus*.json         reloaded only when the file changes
 
-Future evolution:
-    - read equity / realized & unrealized PnL
-    - enforce daily loss caps
-    - toggle GUARD_ENABLED / GLOBAL_BREAKER / AI flags
-    - write its own JSONL logs for auditing
+Every applied update is followed by a limit check; on breach the global
+breaker is flipped through portfolio_guard.set_global_breaker(persist=True),
+which every executor sees on its next guard check. The breaker latches: it
+is never cleared by this daemon. The daemon itself re-arms (can trip again)
+at the UTC day roll and once the shared breaker has been cleared (operator
+reset); an account still over its limit after a reset trips again on its
+next update.
+
+Limits (USD, 0 = disabled):
+    RISK_MAX_DAILY_LOSS_USD            fleet PnL today <= -X
+    RISK_MAX_DRAWDOWN_USD              fleet drawdown from today's peak >= X
+    RISK_ACCOUNT_MAX_DAILY_LOSS_USD    any account PnL today <= -X
+    RISK_ACCOUNT_MAX_DRAWDOWN_USD      any account drawdown >= X
+
+Other env:
+    RISK_POLL_MS                 executions/marks poll interval (default 50)
+    RISK_STATE_EXPORT_SEC        state/risk_state.json export (default 2)
+    RISK_GHOST_TTL_SEC           how long a position closed by a resync still
+                                 absorbs late fills (default 60)
+
+Restarts: risk_state.json carries the books and the executions tail offsets
+(inode + byte offset), written together. A same-day state is restored and the
+tails resume where it was taken; without one, today's (UTC) execution lines
+are replayed from the start of each file.
+
+Late fills: a position that a position_bus resync reports flat is kept as a
+"ghost" until it expires; fills executed before that resync close the ghost
+(realized PnL) instead of opening a phantom opposite position.
+
+Closed positions (flat or flipped) release their trades in the shared
+exposure ledger and count as a session result (exposure_ledger.close_symbol
+with the round-trip PnL), which keeps loss streak / trades-per-day current.
+
+Outputs:
+    state/risk_state.json             current view (periodic)
+    state/risk_daemon_events.jsonl    breaker trips (with detection latency)
 """
 
 from __future__ import annotations
 
+import os
+import threading
 import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import orjson
 
 try:
     from app.core.log import get_logger  # type: ignore
@@ -48,17 +93,707 @@ except Exception:  # pragma: no cover
     def record_heartbeat(name: str) -> None:  # type: ignore[override]
         return None
 
+ROOT = Path(__file__).resolve().parents[2]
+STATE_DIR = ROOT / "state"
+STATE_PATH = STATE_DIR / "risk_state.json"
+EVENTS_PATH = STATE_DIR / "risk_daemon_events.jsonl"
 
-def main() -> None:
-    log.info("Risk Daemon stub started (heartbeats only, no breakers yet).")
 
-    while True:
+def _env_float(name: str, default: str) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except Exception:
+        return float(default)
+
+
+MAX_DAILY_LOSS_USD = _env_float("RISK_MAX_DAILY_LOSS_USD", "0")
+MAX_DRAWDOWN_USD = _env_float("RISK_MAX_DRAWDOWN_USD", "0")
+ACCOUNT_MAX_DAILY_LOSS_USD = _env_float("RISK_ACCOUNT_MAX_DAILY_LOSS_USD", "0")
+ACCOUNT_MAX_DRAWDOWN_USD = _env_float("RISK_ACCOUNT_MAX_DRAWDOWN_USD", "0")
+POLL_SEC = _env_float("RISK_POLL_MS", "50") / 1000.0
+STATE_EXPORT_SEC = _env_float("RISK_STATE_EXPORT_SEC", "2")
+GHOST_TTL_MS = int(_env_float("RISK_GHOST_TTL_SEC", "60") * 1000)
+
+_FILL_TYPES = {"Trade", "BustTrade", "AdlTrade", "Delivery", "Settle"}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _f(x: Any) -> float:
+    try:
+        return float(x)
+    except Exception:
+        return 0.0
+
+
+def _utc_day(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _day_start_ms(ts_ms: int) -> int:
+    return ts_ms // 86_400_000 * 86_400_000
+
+
+# ---------------------------------------------------------------------------
+# Books
+# ---------------------------------------------------------------------------
+
+class _AccountBook:
+    __slots__ = ("label", "pos", "unreal", "unreal_total", "realized", "fees", "unreal_base", "peak", "updated_ms", "trip_pnl", "ghost")
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        # symbol -> [signed_qty, avg_price]
+        self.pos: Dict[str, List[float]] = {}
+        # symbol -> unrealized, plus running total (updated by deltas)
+        self.unreal: Dict[str, float] = {}
+        self.unreal_total = 0.0
+        self.realized = 0.0
+        self.fees = 0.0
+        # unrealized carried in from before today's roll
+        self.unreal_base = 0.0
+        self.peak = 0.0
+        self.updated_ms = 0
+        # symbol -> realized PnL (incl. fees) since the position was opened
+        self.trip_pnl: Dict[str, float] = {}
+        # symbol -> [signed_qty, avg_price, resync_ms] for positions a resync reported flat
+        self.ghost: Dict[str, List[float]] = {}
+
+    def pnl_today(self) -> float:
+        return self.realized + self.unreal_total - self.unreal_base
+
+    def drawdown(self) -> float:
+        return max(0.0, self.peak - self.pnl_today())
+
+    def set_unreal(self, sym: str, mark: Optional[float]) -> None:
+        p = self.pos.get(sym)
+        new = 0.0
+        if p is not None and mark and p[0]:
+            new = p[0] * (mark - p[1])
+        old = self.unreal.get(sym, 0.0)
+        if new == 0.0:
+            self.unreal.pop(sym, None)
+        else:
+            self.unreal[sym] = new
+        self.unreal_total += new - old
+
+    def _ghost_fill(self, sym: str, signed: float, qty: float, px: float, fee: float, ts_ms: int) -> bool:
+        """
+        Apply a fill executed at or before the resync that closed `sym` to
+        the ghost: realized PnL and fees only, the book stays flat. A fill
+        executed after the resync retires the ghost. Returns True if consumed.
+        """
+        g = self.ghost.get(sym)
+        if g is None or sym in self.pos:
+            return False
+        if ts_ms > g[2]:
+            del self.ghost[sym]
+            return False
+        q0, avg = g[0], g[1]
+        if q0 != 0 and (q0 > 0) != (signed > 0):
+            closed = min(qty, abs(q0))
+            self.realized += closed * (px - avg) * (1.0 if q0 > 0 else -1.0)
+            g[0] = q0 + (closed if signed > 0 else -closed)
+        if abs(g[0]) < 1e-12:
+            del self.ghost[sym]
+        self.realized -= fee
+        self.fees += fee
+        return True
+
+    def apply_fill(self, sym: str, side: str, qty: float, px: float, fee: float, ts_ms: int = 0) -> Optional[float]:
+        """
+        Average-cost position accounting; realized on the closing part.
+        Returns the round-trip PnL (fees included) when this fill closes or
+        flips the position, else None. ts_ms is the execution time (0 =
+        unknown, treated as late when a ghost exists).
+        """
+        signed = qty if side.lower() == "buy" else -qty
+        if self.ghost and self._ghost_fill(sym, signed, qty, px, fee, ts_ms):
+            return None
+        closed_pnl: Optional[float] = None
+        self.trip_pnl[sym] = self.trip_pnl.get(sym, 0.0) - fee
+        p = self.pos.get(sym)
+        if p is None:
+            p = [0.0, 0.0]
+            self.pos[sym] = p
+        q0, avg = p
+        if q0 == 0 or (q0 > 0) == (signed > 0):
+            tot = abs(q0) + qty
+            p[1] = (abs(q0) * avg + qty * px) / tot if tot else 0.0
+            p[0] = q0 + signed
+        else:
+            closed = min(qty, abs(q0))
+            gain = closed * (px - avg) * (1.0 if q0 > 0 else -1.0)
+            self.realized += gain
+            self.trip_pnl[sym] += gain
+            rest = qty - closed
+            if rest > 0:
+                p[0] = rest if signed > 0 else -rest
+                p[1] = px
+                closed_pnl = self.trip_pnl.pop(sym)
+            else:
+                p[0] = q0 + signed
+                if abs(p[0]) < 1e-12:
+                    p[0] = 0.0
+        if p[0] == 0.0:
+            del self.pos[sym]
+            closed_pnl = self.trip_pnl.pop(sym, 0.0)
+        self.realized -= fee
+        self.fees += fee
+        return closed_pnl
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "positions": {s: {"qty": q, "avg": a} for s, (q, a) in self.pos.items()},
+            "realized_today": round(self.realized, 6),
+            "fees_today": round(self.fees, 6),
+            "unrealized": round(self.unreal_total, 6),
+            "pnl_today": round(self.pnl_today(), 6),
+            "peak_today": round(self.peak, 6),
+            "drawdown": round(self.drawdown(), 6),
+            "updated_ms": self.updated_ms,
+            # restore-only fields
+            "unreal_base": self.unreal_base,
+            "trip_pnl": dict(self.trip_pnl),
+            "ghosts": {s: list(g) for s, g in self.ghost.items()},
+        }
+
+    def restore(self, snap: Dict[str, Any]) -> None:
+        for s, v in (snap.get("positions") or {}).items():
+            if isinstance(v, dict) and _f(v.get("qty")):
+                self.pos[str(s)] = [_f(v.get("qty")), _f(v.get("avg"))]
+        self.realized = _f(snap.get("realized_today"))
+        self.fees = _f(snap.get("fees_today"))
+        self.peak = _f(snap.get("peak_today"))
+        self.unreal_base = _f(snap.get("unreal_base"))
+        self.trip_pnl = {str(s): _f(v) for s, v in (snap.get("trip_pnl") or {}).items()}
+        self.ghost = {
+            str(s): [_f(g[0]), _f(g[1]), _f(g[2])]
+            for s, g in (snap.get("ghosts") or {}).items()
+            if isinstance(g, list) and len(g) == 3
+        }
+
+
+class RiskEngine:
+    """
+    Single-writer state machine; public methods are serialized by a lock so
+    position_bus watcher callbacks can land from another thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_daily_loss_usd: float = MAX_DAILY_LOSS_USD,
+        max_drawdown_usd: float = MAX_DRAWDOWN_USD,
+        account_max_daily_loss_usd: float = ACCOUNT_MAX_DAILY_LOSS_USD,
+        account_max_drawdown_usd: float = ACCOUNT_MAX_DRAWDOWN_USD,
+        trip_breaker: Any = None,
+        breaker_active: Any = None,
+        events_path: Optional[Path] = EVENTS_PATH,
+        on_close: Any = None,
+    ) -> None:
+        self.limits = {
+            "max_daily_loss_usd": max_daily_loss_usd,
+            "max_drawdown_usd": max_drawdown_usd,
+            "account_max_daily_loss_usd": account_max_daily_loss_usd,
+            "account_max_drawdown_usd": account_max_drawdown_usd,
+        }
+        self.books: Dict[str, _AccountBook] = {}
+        self.marks: Dict[str, float] = {}
+        # symbol -> labels holding it (for mark fan-out)
+        self._holders: Dict[str, Set[str]] = {}
+        self.fleet_peak = 0.0
+        self.day = _utc_day(_now_ms())
+        self._day_end_ms = (_now_ms() // 86_400_000 + 1) * 86_400_000
+        self.tripped: Optional[Dict[str, Any]] = None
+        self._trip_breaker = trip_breaker
+        # breaker_active() -> bool; lets a tripped engine re-arm after a reset
+        self._breaker_active = breaker_active
+        self._events_path = events_path
+        # on_close(account_label, symbol, round_trip_pnl | None) when a position goes flat
+        self._on_close = on_close
+        self._lock = threading.RLock()
+        self.stats = {"executions": 0, "fills": 0, "mark_updates": 0, "position_updates": 0, "evaluations": 0}
+
+    # ---------- helpers ----------
+
+    def _book(self, label: str) -> _AccountBook:
+        b = self.books.get(label)
+        if b is None:
+            b = _AccountBook(label)
+            self.books[label] = b
+        return b
+
+    def _touch_symbol(self, b: _AccountBook, sym: str) -> None:
+        if sym in b.pos:
+            self._holders.setdefault(sym, set()).add(b.label)
+        else:
+            hs = self._holders.get(sym)
+            if hs is not None:
+                hs.discard(b.label)
+        b.set_unreal(sym, self.marks.get(sym))
+
+    def _roll_day(self, now_ms: int) -> None:
+        if now_ms < self._day_end_ms:
+            return
+        self.day = _utc_day(now_ms)
+        self._day_end_ms = (now_ms // 86_400_000 + 1) * 86_400_000
+        for b in self.books.values():
+            b.realized = 0.0
+            b.fees = 0.0
+            b.unreal_base = b.unreal_total
+            b.peak = 0.0
+        self.fleet_peak = 0.0
+        if self.tripped is not None:
+            log.info("New UTC day %s: re-armed after %s", self.day, self.tripped.get("kind"))
+            self.tripped = None
+
+    # ---------- inputs ----------
+
+    def on_execution_line(self, line: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Apply one ws_executions.jsonl line ({account_label, ts_ms, data:[...]})
+        and evaluate limits. Returns the trip record if this line tripped.
+        """
+        with self._lock:
+            now = _now_ms()
+            self._roll_day(now)
+            label = str(line.get("account_label") or "main")
+            b = self._book(label)
+            rows = line.get("data") or []
+            self.stats["executions"] += 1
+            line_ts = int(_f(line.get("ts_ms")))
+            if b.ghost:
+                self._expire_ghosts(b, now)
+            for row in rows if isinstance(rows, list) else []:
+                if not isinstance(row, dict):
+                    continue
+                sym = str(row.get("symbol") or "").upper()
+                if not sym:
+                    continue
+                mark = _f(row.get("markPrice")) or _f(row.get("execPrice"))
+                et = str(row.get("execType") or "Trade")
+                fee = _f(row.get("execFee"))
+                if et == "Funding":
+                    b.realized -= fee
+                    b.fees += fee
+                elif et in _FILL_TYPES:
+                    qty = _f(row.get("execQty"))
+                    px = _f(row.get("execPrice"))
+                    if qty > 0 and px > 0:
+                        ts = int(_f(row.get("execTime"))) or line_ts
+                        closed_pnl = b.apply_fill(sym, str(row.get("side") or ""), qty, px, fee, ts)
+                        self.stats["fills"] += 1
+                        if closed_pnl is not None:
+                            self._closed(label, sym, closed_pnl)
+                if mark > 0:
+                    self._set_mark(sym, mark)
+                self._touch_symbol(b, sym)
+            b.updated_ms = now
+            return self._evaluate(now, src_ts_ms=int(line.get("ts_ms") or 0))
+
+    def on_positions(self, label: str, positions: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Authoritative resync from position_bus (size/avgPrice per symbol).
+        """
+        with self._lock:
+            now = _now_ms()
+            self._roll_day(now)
+            b = self._book(label)
+            seen: Set[str] = set()
+            for r in positions:
+                sym = str(r.get("symbol") or "").upper()
+                size = _f(r.get("size"))
+                if not sym or size <= 0:
+                    continue
+                signed = size if str(r.get("side") or "").lower() == "buy" else -size
+                b.pos[sym] = [signed, _f(r.get("avgPrice"))]
+                b.ghost.pop(sym, None)
+                seen.add(sym)
+            for sym in list(b.pos):
+                if sym not in seen:
+                    # keep it for fills that were executed before this resync
+                    q, avg = b.pos.pop(sym)
+                    b.ghost[sym] = [q, avg, float(now)]
+                    b.trip_pnl.pop(sym, None)
+                    self._closed(label, sym, None)
+            self._expire_ghosts(b, now)
+            for sym in set(b.unreal) | seen:
+                self._touch_symbol(b, sym)
+            b.updated_ms = now
+            self.stats["position_updates"] += 1
+            return self._evaluate(now)
+
+    def _expire_ghosts(self, b: _AccountBook, now_ms: int) -> None:
+        for sym in [s for s, g in b.ghost.items() if now_ms - g[2] > GHOST_TTL_MS]:
+            del b.ghost[sym]
+
+    def _closed(self, label: str, sym: str, pnl: Optional[float]) -> None:
+        if self._on_close is None:
+            return
         try:
-            record_heartbeat("risk_daemon")
+            self._on_close(label, sym, pnl)
+        except Exception as e:
+            log.warning("on_close hook failed for %s/%s: %s", label, sym, e)
+
+    def _set_mark(self, sym: str, px: float) -> None:
+        if self.marks.get(sym) == px:
+            return
+        self.marks[sym] = px
+        self.stats["mark_updates"] += 1
+        for lab in self._holders.get(sym, ()):
+            self.books[lab].set_unreal(sym, px)
+
+    def on_marks(self, marks: Dict[str, float]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            now = _now_ms()
+            self._roll_day(now)
+            for sym, px in marks.items():
+                if px > 0:
+                    self._set_mark(sym, px)
+            return self._evaluate(now)
+
+    # ---------- limits ----------
+
+    def _evaluate(self, now_ms: int, src_ts_ms: int = 0) -> Optional[Dict[str, Any]]:
+        self.stats["evaluations"] += 1
+        fleet = 0.0
+        breach: Optional[Tuple[str, str, float]] = None
+        lim = self.limits
+        for b in self.books.values():
+            pnl = b.pnl_today()
+            if pnl > b.peak:
+                b.peak = pnl
+            fleet += pnl
+            if breach is None:
+                if lim["account_max_daily_loss_usd"] > 0 and pnl <= -lim["account_max_daily_loss_usd"]:
+                    breach = ("account_daily_loss", b.label, pnl)
+                elif lim["account_max_drawdown_usd"] > 0 and b.peak - pnl >= lim["account_max_drawdown_usd"]:
+                    breach = ("account_drawdown", b.label, b.peak - pnl)
+        if fleet > self.fleet_peak:
+            self.fleet_peak = fleet
+        if breach is None:
+            if lim["max_daily_loss_usd"] > 0 and fleet <= -lim["max_daily_loss_usd"]:
+                breach = ("fleet_daily_loss", "*", fleet)
+            elif lim["max_drawdown_usd"] > 0 and self.fleet_peak - fleet >= lim["max_drawdown_usd"]:
+                breach = ("fleet_drawdown", "*", self.fleet_peak - fleet)
+        if breach is None:
+            return None
+        if self.tripped is not None:
+            if self._breaker_on():
+                return None
+            log.warning("Breaker was cleared while %s is still breached; tripping again", breach[1])
+        return self._trip(breach, now_ms, src_ts_ms)
+
+    def _breaker_on(self) -> bool:
+        """
+        Is the breaker we tripped still set? Only asked while a limit is
+        breached. A custom trip_breaker without breaker_active stays latched
+        until the day rolls; an unreadable state counts as set.
+        """
+        try:
+            if self._breaker_active is not None:
+                return bool(self._breaker_active())
+            if self._trip_breaker is not None:
+                return True
+            from app.core.portfolio_guard import get_breaker_state
+
+            return bool(get_breaker_state()["shared"].get("on", False))
         except Exception:
-            # We absolutely do not care if this fails occasionally.
+            return True
+
+    def _trip(self, breach: Tuple[str, str, float], now_ms: int, src_ts_ms: int) -> Dict[str, Any]:
+        kind, label, value = breach
+        reason = f"risk_daemon:{kind}:{label}:{value:.2f}"
+        rec = {
+            "ts_ms": now_ms,
+            "event": "breaker_trip",
+            "kind": kind,
+            "account_label": label,
+            "value": round(value, 6),
+            "limits": dict(self.limits),
+            "src_ts_ms": src_ts_ms or None,
+            "detect_latency_ms": (now_ms - src_ts_ms) if src_ts_ms else None,
+        }
+        self.tripped = rec
+        try:
+            if self._trip_breaker is not None:
+                self._trip_breaker(reason)
+            else:
+                from app.core.portfolio_guard import set_global_breaker
+
+                set_global_breaker(True, reason=reason, persist=True, source="risk_daemon")
+        except Exception as e:
+            log.error("Failed to set global breaker: %s", e)
+        rec["breaker_set_ms"] = _now_ms()
+        if self._events_path is not None:
+            try:
+                self._events_path.parent.mkdir(parents=True, exist_ok=True)
+                with self._events_path.open("ab") as f:
+                    f.write(orjson.dumps(rec) + b"\n")
+            except Exception:
+                pass
+        log.error("BREAKER TRIPPED: %s", reason)
+        return rec
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            fleet = sum(b.pnl_today() for b in self.books.values())
+            return {
+                "ts_ms": _now_ms(),
+                "day": self.day,
+                "fleet": {
+                    "pnl_today": round(fleet, 6),
+                    "peak_today": round(self.fleet_peak, 6),
+                    "drawdown": round(max(0.0, self.fleet_peak - fleet), 6),
+                    "unrealized": round(sum(b.unreal_total for b in self.books.values()), 6),
+                },
+                "accounts": {lab: b.snapshot() for lab, b in self.books.items()},
+                "marks": dict(self.marks),
+                "limits": dict(self.limits),
+                "tripped": self.tripped,
+                "stats": dict(self.stats),
+            }
+
+    def restore(self, snap: Dict[str, Any]) -> bool:
+        """
+        Load books from a snapshot() taken earlier today (UTC). A snapshot of
+        another day is ignored. Returns True if restored.
+        """
+        with self._lock:
+            if not isinstance(snap, dict) or snap.get("day") != self.day:
+                return False
+            for sym, px in (snap.get("marks") or {}).items():
+                if _f(px) > 0:
+                    self.marks[str(sym)] = _f(px)
+            for lab, acc in (snap.get("accounts") or {}).items():
+                if not isinstance(acc, dict):
+                    continue
+                b = self._book(str(lab))
+                b.restore(acc)
+                for sym in b.pos:
+                    self._touch_symbol(b, sym)
+            self.fleet_peak = _f((snap.get("fleet") or {}).get("peak_today"))
+            if isinstance(snap.get("tripped"), dict):
+                self.tripped = snap["tripped"]
+            return True
+
+
+# ---------------------------------------------------------------------------
+# Feeds
+# ---------------------------------------------------------------------------
+
+class _JsonlTail:
+    """
+    Byte-offset tail of one JSONL file; complete lines only, restart on shrink
+    or a new inode. Starts at `offset` (default: end-of-file, or 0 with
+    from_start=True); lines with ts_ms < min_ts_ms are skipped.
+    """
+
+    def __init__(self, path: Path, from_start: bool = False, offset: Optional[int] = None, min_ts_ms: int = 0) -> None:
+        self.path = path
+        self.min_ts_ms = min_ts_ms
+        try:
+            st = path.stat()
+            self.ino = st.st_ino
+            size = st.st_size
+        except OSError:
+            self.ino = 0
+            size = 0
+        if offset is not None:
+            self.offset = offset if 0 <= offset <= size else 0
+        else:
+            self.offset = 0 if from_start else size
+
+    def position(self) -> List[int]:
+        return [self.ino, self.offset]
+
+    def read(self) -> List[Dict[str, Any]]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return []
+        size = st.st_size
+        if st.st_ino != self.ino:
+            self.ino = st.st_ino
+            self.offset = 0
+        if size < self.offset:
+            self.offset = 0
+        if size == self.offset:
+            return []
+        with self.path.open("rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            return []
+        self.offset += end + 1
+        out: List[Dict[str, Any]] = []
+        for raw in chunk[: end + 1].splitlines():
+            if not raw.strip():
+                continue
+            try:
+                obj = orjson.loads(raw)
+            except Exception:
+                continue
+            if isinstance(obj, dict):
+                if self.min_ts_ms and _f(obj.get("ts_ms")) < self.min_ts_ms:
+                    continue
+                out.append(obj)
+        return out
+
+
+class _TradesBusMarks:
+    """
+    Last trade price per symbol from trades_bus*.json, re-read on change.
+    """
+
+    def __init__(self, state_dir: Path) -> None:
+        self.state_dir = state_dir
+        self._keys: Dict[Path, Tuple[int, int]] = {}
+
+    def poll(self) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for p in self.state_dir.glob("trades_bus*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            key = (st.st_mtime_ns, st.st_size)
+            if self._keys.get(p) == key:
+                continue
+            try:
+                data = orjson.loads(p.read_bytes())
+            except Exception:
+                continue
+            self._keys[p] = key
+            for sym, blk in (data.get("symbols") or {}).items():
+                trades = blk.get("trades") if isinstance(blk, dict) else None
+                if trades and isinstance(trades[-1], dict):
+                    px = _f(trades[-1].get("p") or trades[-1].get("price"))
+                    if px > 0:
+                        out[str(sym).upper()] = px
+        return out
+
+
+def _load_state(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        data = orjson.loads(path.read_bytes())
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _export_state(engine: RiskEngine, tails: Dict[Path, _JsonlTail]) -> None:
+    # books and tail offsets in one file, so a restart resumes exactly here
+    try:
+        snap = engine.snapshot()
+        snap["tails"] = {str(p): t.position() for p, t in tails.items()}
+        tmp = STATE_PATH.with_suffix(".json.tmp")
+        tmp.write_bytes(orjson.dumps(snap))
+        os.replace(tmp, STATE_PATH)
+    except Exception:
+        pass
+
+
+def run_loop(
+    engine: RiskEngine,
+    *,
+    state_dir: Path = STATE_DIR,
+    stop: Optional[threading.Event] = None,
+    from_start: bool = False,
+    use_position_bus: bool = True,
+    export_state: bool = True,
+) -> None:
+    stop = stop or threading.Event()
+    tails: Dict[Path, _JsonlTail] = {}
+    marks = _TradesBusMarks(state_dir)
+    unsubscribe = None
+
+    # resume offsets from a same-day state, else replay today's lines
+    saved_tails: Dict[str, Any] = {}
+    if not from_start and export_state:
+        saved = _load_state(STATE_PATH)
+        if saved is not None and engine.restore(saved):
+            saved_tails = saved.get("tails") or {}
+            log.info("Restored %s risk state (%d accounts).", engine.day, len(engine.books))
+    replay_from = _day_start_ms(_now_ms())
+
+    def _tail(p: Path) -> _JsonlTail:
+        if from_start:
+            return _JsonlTail(p, from_start=True)
+        pos = saved_tails.get(str(p))
+        try:
+            if isinstance(pos, list) and len(pos) == 2 and int(pos[0]) == p.stat().st_ino:
+                return _JsonlTail(p, offset=int(pos[1]))
+        except (OSError, TypeError, ValueError):
             pass
-        time.sleep(10)
+        return _JsonlTail(p, offset=0, min_ts_ms=replay_from)
+
+    if use_position_bus:
+        try:
+            from app.core import position_bus
+
+            unsubscribe = position_bus.subscribe_positions(engine.on_positions)
+            position_bus.start_position_watcher(interval_sec=max(0.05, POLL_SEC))
+        except Exception as e:
+            log.warning("position_bus unavailable (%s); using executions only.", e)
+
+    last_hb = 0.0
+    last_export = 0.0
+    last_glob = 0.0
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            if now - last_glob >= 1.0:
+                last_glob = now
+                for p in state_dir.glob("ws_executions*.jsonl"):
+                    if p not in tails:
+                        tails[p] = _tail(p)
+
+            for t in tails.values():
+                for line in t.read():
+                    engine.on_execution_line(line)
+
+            m = marks.poll()
+            if m:
+                engine.on_marks(m)
+
+            if now - last_hb >= 1.0:
+                last_hb = now
+                try:
+                    record_heartbeat("risk_daemon")
+                except Exception:
+                    pass
+
+            if export_state and now - last_export >= STATE_EXPORT_SEC:
+                last_export = now
+                _export_state(engine, tails)
+
+            stop.wait(POLL_SEC)
+    finally:
+        if unsubscribe is not None:
+            unsubscribe()
+        if export_state:
+            _export_state(engine, tails)
+
+
+def _ledger_close(label: str, sym: str, pnl: Optional[float]) -> None:
+    from app.core import exposure_ledger
+
+    exposure_ledger.close_symbol(label, sym, pnl)
+
+
+def main() -> None:
+    engine = RiskEngine(on_close=_ledger_close)
+    log.info(
+        "Risk Daemon started | limits=%s | poll=%.0fms",
+        engine.limits,
+        POLL_SEC * 1000.0,
+    )
+    run_loop(engine)
 
 
 if __name__ == "__main__":
@@ -132,6 +132,18 @@ def _ops_write(component: str, account_label: str, ok: bool, details: Dict[str,
 # Core helpers (TG / heartbeat) - import safe wrappers
 # ---------------------------------------------------------------------------
 
+def _read_heartbeats() -> Dict[str, Dict[str, Any]]:
+    """
+    Snapshot of the shared-memory heartbeat registry ({} if unavailable).
+    """
+    try:
+        from app.core.heartbeat_registry import read_heartbeats  # type: ignore
+
+        return read_heartbeats()
+    except Exception:
+        return {}
+
+
 def _load_common(log):
     try:
         from app.core.flashback_common import (  # type: ignore
@@ -618,6 +630,8 @@ def _supervisor_loop(root: Path, account_label: str, poll_seconds: int, env_file
         running_names: List[str] = []
         dead_names: List[str] = []
 
+        heartbeats = _read_heartbeats()
+
         if kill_switch_path.exists():
             msg = f"STOP KILL SWITCH ACTIVE: {kill_switch_path}"
             log.error(_ascii_safe(msg))
@@ -674,6 +688,7 @@ def _supervisor_loop(root: Path, account_label: str, poll_seconds: int, env_file
                     "restart_count": spec.restart_count,
                     "last_restart_ms": spec.last_restart_ms,
                     "last_reason": spec.last_reason,
+                    "heartbeat": heartbeats.get(name),
                 },
             )
 
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Flashback — TP/SL Manager v6.16 (PAPER ledger overlay + trade_id-linked TP orderLinkIds + Phase4 decision gate hardened + CONSOLE PROOF)
+Flashback — TP/SL Manager v6.17 (batched TP ladder diff + PAPER ledger overlay + trade_id-linked TP orderLinkIds + Phase4 decision gate hardened + CONSOLE PROOF)
 
 v6.15 Patch (PAPER positions visibility):
 - tp_sl_manager can now "see" PAPER positions opened by PaperBroker by reading:
@@ -13,6 +13,13 @@ v6.16 Patch (Phase 4 Step 3 proof):
 - When AI gate blocks TP/SL actions, we print a deterministic CONSOLE line:
     [tp_sl_manager] 🚫 GATE_BLOCKED symbol=... trade_id=... reason=...
   This is in addition to alert_bot_error() + Telegram.
+
+v6.17 Patch (batched ladder sync):
+- _sync_tp_ladder diffs the target ladder against live reduce-only TPs
+  (keep / amend / cancel / create, see app/core/tp_ladder.py) and applies
+  it through the v5 batch endpoints. Unchanged rungs cost nothing; TP
+  orderLinkIds stay "<trade_id>:TP<idx>" (vN suffix once an id is burned).
+- Requests per sync + time-to-ladder: state/tp_ladder_metrics.json
 """
 
 import os
@@ -26,7 +33,7 @@ import yaml  # type: ignore
 
 from app.core.flashback_common import (
     bybit_get,
-    bybit_post,
+    bybit_batch,
     send_tg,
     get_ticks,
     psnap,
@@ -35,7 +42,6 @@ from app.core.flashback_common import (
     atr14,
     set_stop_loss,
     cancel_all,      # kept for emergencies only; not used in normal flow  # noqa: F401
-    place_reduce_tp,
     BYBIT_WS_PRIVATE_URL,
     build_ws_auth_payload_main,
     record_heartbeat,
@@ -43,6 +49,7 @@ from app.core.flashback_common import (
 )
 
 from app.core.position_bus import get_positions_snapshot as bus_get_positions_snapshot
+from app.core import tp_ladder
 
 # -------------------------
 # Phase 4: AI decision enforcement (optional)
@@ -419,10 +426,6 @@ def _infer_trade_id_from_executions(symbol: str, side_now: str) -> Optional[str]
     return None
 
 
-def _tp_link_id(trade_id: str, idx: int) -> str:
-    return f"{trade_id}:TP{idx}"
-
-
 # ---------------------------------------------------------------------------
 # Phase 4: Gate helper (skip TP/SL sync if blocked)
 # ---------------------------------------------------------------------------
@@ -619,48 +622,6 @@ def _compute_trailing_sl(symbol: str, side_now: str, entry: Decimal, base_sl: De
     return sl_new
 
 
-def _amend_tp_order(symbol: str, order: dict, new_qty: Optional[Decimal], new_price: Optional[Decimal], side_now: Optional[str] = None) -> None:
-    body: Dict[str, str] = {"category": CATEGORY, "symbol": symbol}
-
-    order_id = order.get("orderId")
-    link_id = order.get("orderLinkId")
-    if order_id:
-        body["orderId"] = order_id
-    elif link_id:
-        body["orderLinkId"] = link_id
-    else:
-        return
-
-    if new_price is not None:
-        if side_now is not None:
-            new_price = _safe_tp_price(symbol, side_now, new_price)
-        body["price"] = str(new_price)
-    if new_qty is not None:
-        body["qty"] = str(new_qty)
-
-    try:
-        bybit_post("/v5/order/amend", body)
-    except Exception as e:
-        alert_bot_error("tp_sl_manager", f"{symbol} amend error: {e}", "ERROR")
-
-
-def _cancel_tp_order(symbol: str, order: dict) -> None:
-    body: Dict[str, str] = {"category": CATEGORY, "symbol": symbol}
-    order_id = order.get("orderId")
-    link_id = order.get("orderLinkId")
-    if order_id:
-        body["orderId"] = order_id
-    elif link_id:
-        body["orderLinkId"] = link_id
-    else:
-        return
-
-    try:
-        bybit_post("/v5/order/cancel", body)
-    except Exception as e:
-        alert_bot_error("tp_sl_manager", f"{symbol} cancel error: {e}", "WARN")
-
-
 def _extract_existing_sl(p: dict) -> Optional[Decimal]:
     raw = (
         p.get("stopLoss")
@@ -886,6 +847,7 @@ def _resolve_trade_id(symbol: str, side_now: str, position_trade_id: Optional[st
 
 
 def _sync_tp_ladder(symbol: str, side_now: str, size: Decimal, target_tps: List[Decimal], target_qtys: List[Decimal], position_trade_id: Optional[str]) -> None:
+    started = time.perf_counter()
     tick, step, _ = get_ticks(symbol)
 
     pairs = [(px, q) for px, q in zip(target_tps, target_qtys) if q > 0]
@@ -907,22 +869,10 @@ def _sync_tp_ladder(symbol: str, side_now: str, size: Decimal, target_tps: List[
 
     if not tpo:
         _MANUAL_TP_MODE.pop(symbol, None)
-        if tps:
-            base_safe = _safe_tp_price(symbol, side_now, tps[0])
-            delta = base_safe - tps[0]
-            tps = [psnap(px + delta, tick) for px in tps]
-
-        for idx, (px, q) in enumerate(zip(tps, qtys), start=1):
-            try:
-                lid = _tp_link_id(trade_id, idx) if trade_id else None
-                place_reduce_tp(symbol, side_now, q, px, link_id=lid)
-            except Exception as e:
-                alert_bot_error("tp_sl_manager", f"{symbol} TP create error: {e}", "WARN")
-        return
 
     manual_mode = _MANUAL_TP_MODE.get(symbol, False)
 
-    if _RESPECT_MANUAL_TPS and not manual_mode:
+    if tpo and _RESPECT_MANUAL_TPS and not manual_mode:
         if _detect_manual_override(symbol, side_now, tpo, tps):
             manual_mode = True
             _MANUAL_TP_MODE[symbol] = True
@@ -944,13 +894,26 @@ def _sync_tp_ladder(symbol: str, side_now: str, size: Decimal, target_tps: List[
         if each <= 0:
             return
 
+        amends = []
         for o in tpo:
             try:
                 cur_qty = Decimal(str(o.get("qty", "0")))
             except Exception:
                 cur_qty = Decimal("0")
             if cur_qty != each:
-                _amend_tp_order(symbol, o, new_qty=each, new_price=None, side_now=None)
+                ref = {"symbol": symbol, "orderId": o["orderId"]} if o.get("orderId") else (
+                    {"symbol": symbol, "orderLinkId": o["orderLinkId"]} if o.get("orderLinkId") else None
+                )
+                if ref is not None:
+                    amends.append(dict(ref, qty=str(each)))
+        if amends:
+            try:
+                out, _calls = bybit_batch("amend", amends, CATEGORY)
+                for r in out:
+                    if r["code"] != 0:
+                        alert_bot_error("tp_sl_manager", f"{symbol} amend error: {r['code']} {r['msg']}", "ERROR")
+            except Exception as e:
+                alert_bot_error("tp_sl_manager", f"{symbol} amend error: {e}", "ERROR")
         return
 
     if tps:
@@ -958,29 +921,24 @@ def _sync_tp_ladder(symbol: str, side_now: str, size: Decimal, target_tps: List[
         delta = base_safe - tps[0]
         tps = [psnap(px + delta, tick) for px in tps]
 
+    # Minimal diff (keep / amend / cancel / create) applied via batch endpoints.
     try:
-        if side_now.lower() == "buy":
-            tpo_sorted = sorted(tpo, key=lambda o: Decimal(str(o.get("price", "0"))))
-        else:
-            tpo_sorted = sorted(tpo, key=lambda o: Decimal(str(o.get("price", "0"))), reverse=True)
-    except Exception:
-        tpo_sorted = tpo
-
-    n_common = min(len(tpo_sorted), len(tps))
-    for i in range(n_common):
-        _amend_tp_order(symbol, tpo_sorted[i], new_qty=qtys[i], new_price=tps[i], side_now=side_now)
-
-    if len(tpo_sorted) > len(tps):
-        for o in tpo_sorted[len(tps):]:
-            _cancel_tp_order(symbol, o)
+        res = tp_ladder.sync_ladder(
+            symbol,
+            side_now,
+            tpo,
+            list(zip(tps, qtys)),
+            trade_id,
+            tick,
+            started=started,
+            fetch_requests=1,
+        )
+    except Exception as e:
+        alert_bot_error("tp_sl_manager", f"{symbol} TP ladder sync error: {e}", "WARN")
+        return
 
-    if len(tps) > len(tpo_sorted):
-        for idx, (px, q) in enumerate(zip(tps[len(tpo_sorted):], qtys[len(tpo_sorted):]), start=len(tpo_sorted) + 1):
-            try:
-                lid = _tp_link_id(trade_id, idx) if trade_id else None
-                place_reduce_tp(symbol, side_now, q, px, link_id=lid)
-            except Exception as e:
-                alert_bot_error("tp_sl_manager", f"{symbol} TP create (extra rung) error: {e}", "WARN")
+    for err in res.errors:
+        alert_bot_error("tp_sl_manager", f"{symbol} TP ladder {err}", "WARN")
 
 
 def _ensure_exits_for_position(p: dict, seen_state: Dict[str, Tuple[Decimal, Decimal, Decimal]]) -> None:
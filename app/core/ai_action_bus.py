@@ -39,6 +39,13 @@ Each line looks like:
     }
 
 Nothing here places orders. This is a log / bus only.
+
+Index, segments & cursors
+-------------------------
+See app/core/ai_action_index.py: appends take a writer lock and seal the
+file into numbered segments past AI_ACTIONS_SEGMENT_MAX_MB; read_actions
+bisects a sparse sidecar index instead of scanning from byte 0; consumers
+use open_cursor(name) for persisted, resumable positions.
 """
 
 from __future__ import annotations
@@ -50,6 +57,14 @@ from typing import Any, Dict, Iterable, List, Optional
 
 import orjson
 
+from app.core.ai_action_index import (
+    ActionCursor,
+    query_bus,
+    rotate_if_needed,
+    row_label,
+    writer_lock,
+)
+
 # ---------------------------------------------------------------------------
 # ROOT & path resolution
 # ---------------------------------------------------------------------------
@@ -195,9 +210,13 @@ def append_actions(
         return 0
 
     try:
-        with ACTION_LOG_PATH.open("ab") as f:
-            for b in buf:
-                f.write(b)
+        with writer_lock(ACTION_LOG_PATH):
+            with ACTION_LOG_PATH.open("ab") as f:
+                f.write(b"".join(buf))
+            try:
+                rotate_if_needed(ACTION_LOG_PATH)
+            except Exception as e:
+                logger.warning("append_actions: segment rotation failed: %r", e)
     except Exception as e:
         logger.error("append_actions: failed to write %d actions: %r", len(buf), e)
         return 0
@@ -236,11 +255,22 @@ def publish_action(action: Dict[str, Any]) -> bool:
         return False
 
 
-def read_actions(since_ts_ms: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+def read_actions(since_ts_ms: int = 0, limit: int = 500, label: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Read envelope rows from the bus (best-effort).
     Returns a list of dicts (each is one JSONL row).
+
+    Uses the sparse sidecar index (sealed segments + active file); falls back
+    to a full scan of the active file if the index is unusable.
     """
+    try:
+        return query_bus(ACTION_LOG_PATH, int(since_ts_ms), int(limit), label)
+    except Exception as e:
+        logger.warning("read_actions: index query failed, scanning: %r", e)
+    return _scan_actions(since_ts_ms, limit, label)
+
+
+def _scan_actions(since_ts_ms: int = 0, limit: int = 500, label: Optional[str] = None) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     try:
         if not ACTION_LOG_PATH.exists():
@@ -266,6 +296,8 @@ def read_actions(since_ts_ms: int = 0, limit: int = 500) -> List[Dict[str, Any]]
 
                 if ts_i < int(since_ts_ms):
                     continue
+                if label and row_label(row) != label:
+                    continue
 
                 out.append(row)
                 if len(out) >= int(limit):
@@ -276,6 +308,14 @@ def read_actions(since_ts_ms: int = 0, limit: int = 500) -> List[Dict[str, Any]]
         return out
 
 
+def open_cursor(name: str, *, start: str = "end", path: Optional[Path] = None) -> ActionCursor:
+    """
+    Named, persisted consumer position on the bus (resume after restart).
+    poll() returns new rows; commit() persists the position.
+    """
+    return ActionCursor(name, Path(path) if path is not None else ACTION_LOG_PATH, start=start)
+
+
 __all__ = [
     "ROOT",
     "ACTION_LOG_PATH",
@@ -284,6 +324,7 @@ __all__ = [
     "ensure_bus",
     "publish_action",
     "read_actions",
+    "open_cursor",
     "append_action",
     "append_actions",
     "ai_actions_age_sec",
@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — AI Action Bus index, segments & consumer cursors
+
+Purpose
+-------
+The action bus (state/ai_actions.jsonl) is append-only JSONL. Scanning it
+from byte 0 for every "since ts" query, and having every router keep its own
+in-memory offset (lost on restart), does not scale. This module keeps:
+
+  - a sparse sidecar index per segment (<bus>.idx):
+      * a global mark (running-max ts, byte offset) every AI_ACTIONS_INDEX_EVERY
+        records, so since-ts queries bisect straight to the right block
+      * a per-account mark for the first record of each label in each block,
+        so label-filtered queries only touch blocks containing that label
+  - segment rotation: when the active file exceeds AI_ACTIONS_SEGMENT_MAX_MB
+    it is sealed as <stem>.<seq>.jsonl together with its index and recorded
+    in <stem>.segments.json
+  - named, persisted consumer cursors (<dir>/ai_action_cursors/<name>.json)
+    holding (segment inode, byte offset), so consumers resume in O(1)
+
+The index is derived data: it is caught up lazily (under an index lock) from
+whatever is in the bus, so writers that bypass ai_action_bus stay indexed,
+and a missing/corrupt/stale index is simply rebuilt.
+
+Sidecar index layout
+--------------------
+  header 64 bytes: magic, indexed_upto, records, inode, last_ts, every
+  entries 48 bytes: offset (u64), ts_ms (i64), label (32 bytes, b"" = global)
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from app.ops.file_lock import path_lock
+
+try:
+    from app.core.log import get_logger
+except Exception:  # pragma: no cover
+    import logging
+    import sys
+
+    def get_logger(name: str) -> "logging.Logger":  # type: ignore
+        logger_ = logging.getLogger(name)
+        if not logger_.handlers:
+            handler = logging.StreamHandler(sys.stdout)
+            fmt = logging.Formatter("%(asctime)s [%(levelname)s] [%(name)s] %(message)s")
+            handler.setFormatter(fmt)
+            logger_.addHandler(handler)
+        logger_.setLevel(logging.INFO)
+        return logger_
+
+logger = get_logger("ai_action_index")
+
+INDEX_EVERY = max(1, int(os.getenv("AI_ACTIONS_INDEX_EVERY", "256")))
+SEGMENT_MAX_BYTES = int(float(os.getenv("AI_ACTIONS_SEGMENT_MAX_MB", "256")) * 1024 * 1024)
+SEGMENTS_KEEP = int(os.getenv("AI_ACTIONS_SEGMENTS_KEEP", "0"))  # 0 = keep all sealed segments
+
+_MAGIC = b"FBAIX001"
+_HDR = struct.Struct("<8sQQQqI")
+_HDR_SIZE = 64
+_ENT = struct.Struct("<Qq32s")
+_CHUNK = 4 * 1024 * 1024
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _atomic_write_json(path: Path, obj: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    os.replace(tmp, path)
+
+
+def _inode(path: Path) -> int:
+    try:
+        return int(path.stat().st_ino)
+    except Exception:
+        return 0
+
+
+def row_ts(row: Dict[str, Any]) -> int:
+    try:
+        return int(row.get("ts_ms", 0) or 0)
+    except Exception:
+        return 0
+
+
+def row_label(row: Dict[str, Any]) -> str:
+    """Envelope label, or the account label of a flat (legacy) action row."""
+    v = row.get("label") or row.get("account_label")
+    if not v:
+        act = row.get("action")
+        if isinstance(act, dict):
+            v = act.get("label") or act.get("account_label")
+    return str(v or "")
+
+
+def _label_key(label: str) -> bytes:
+    return label.encode("utf-8")[:32]
+
+
+def _iter_lines(path: Path, start: int, end: Optional[int]) -> Iterator[Tuple[int, int, bytes]]:
+    """Yield (offset, next_offset, line) for complete lines in [start, end)."""
+    with path.open("rb") as f:
+        f.seek(start)
+        pos = start
+        carry = b""
+        while end is None or pos + len(carry) < end:
+            want = _CHUNK if end is None else min(_CHUNK, end - pos - len(carry))
+            data = f.read(want)
+            if not data:
+                return
+            buf = carry + data
+            i = 0
+            while True:
+                j = buf.find(b"\n", i)
+                if j < 0:
+                    break
+                yield pos + i, pos + j + 1, buf[i:j]
+                i = j + 1
+            pos += i
+            carry = buf[i:]
+
+
+# ---------------------------------------------------------------------------
+# Per-segment sparse index
+# ---------------------------------------------------------------------------
+
+class SegmentIndex:
+    def __init__(self, path: Path, every: int = INDEX_EVERY) -> None:
+        self.path = Path(path)
+        self.idx_path = self.path.with_name(self.path.name + ".idx")
+        self.lock_path = self.path.with_name(self.path.name + ".ilock")
+        self.every = int(every)
+        self._mu = threading.Lock()
+        self._reset_memory()
+
+    def _reset_memory(self) -> None:
+        self.inode = 0
+        self.indexed_upto = 0
+        self.records = 0
+        self.last_ts = 0
+        self.g_off: List[int] = []
+        self.g_ts: List[int] = []
+        self.labels: Dict[bytes, List[int]] = {}
+        self._block_labels: set = set()
+        self._idx_pos = _HDR_SIZE
+        self.loaded = False
+
+    # ---- index file ----
+
+    def _write_header(self, fd: int) -> None:
+        hdr = _HDR.pack(_MAGIC, self.indexed_upto, self.records, self.inode, self.last_ts, self.every)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, hdr.ljust(_HDR_SIZE, b"\0"))
+
+    def _add_entry(self, off: int, ts: int, label: bytes) -> None:
+        if not label:
+            self.g_off.append(off)
+            self.g_ts.append(ts)
+            self._block_labels = set()
+        else:
+            self.labels.setdefault(label, []).append(off)
+            self._block_labels.add(label)
+
+    def _load_entries(self, fd: int, upto: int) -> None:
+        size = upto - self._idx_pos
+        if size < _ENT.size:
+            return
+        size -= size % _ENT.size
+        os.lseek(fd, self._idx_pos, os.SEEK_SET)
+        raw = b""
+        while len(raw) < size:
+            chunk = os.read(fd, size - len(raw))
+            if not chunk:
+                break
+            raw += chunk
+        for off, ts, label in _ENT.iter_unpack(raw[: len(raw) - len(raw) % _ENT.size]):
+            self._add_entry(off, ts, label.rstrip(b"\0"))
+        self._idx_pos += len(raw) - len(raw) % _ENT.size
+
+    def _sync_from_file(self, fd: int, log_inode: int, log_size: int) -> None:
+        """Bring in-memory state in line with the on-disk index (lock held)."""
+        raw = os.pread(fd, _HDR_SIZE, 0) if hasattr(os, "pread") else b""
+        if not raw:
+            os.lseek(fd, 0, os.SEEK_SET)
+            raw = os.read(fd, _HDR_SIZE)
+        valid = False
+        if len(raw) >= _HDR.size:
+            magic, upto, records, inode, last_ts, every = _HDR.unpack(raw[: _HDR.size])
+            valid = (
+                magic == _MAGIC
+                and every == self.every
+                and inode == log_inode
+                and upto <= log_size
+            )
+        if not valid:
+            # missing, foreign, rotated-away or truncated log: rebuild from scratch
+            self._reset_memory()
+            self.inode = log_inode
+            os.ftruncate(fd, 0)
+            self._write_header(fd)
+            return
+        if self.inode != inode or upto < self.indexed_upto or os.fstat(fd).st_size < self._idx_pos:
+            self._reset_memory()
+        self.inode, self.indexed_upto, self.records, self.last_ts = inode, upto, records, last_ts
+        self._load_entries(fd, os.fstat(fd).st_size)
+
+    def _scan_log(self, fd: int, log_size: int) -> None:
+        if log_size <= self.indexed_upto:
+            return
+        out: List[bytes] = []
+        for off, nxt, line in _iter_lines(self.path, self.indexed_upto, log_size):
+            self.indexed_upto = nxt
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = orjson.loads(line)
+            except Exception:
+                continue
+            if not isinstance(row, dict):
+                continue
+            ts = row_ts(row)
+            if ts > self.last_ts:
+                self.last_ts = ts
+            if self.records % self.every == 0:
+                out.append(_ENT.pack(off, self.last_ts, b""))
+                self._add_entry(off, self.last_ts, b"")
+            lk = _label_key(row_label(row))
+            if lk and lk not in self._block_labels:
+                out.append(_ENT.pack(off, self.last_ts, lk))
+                self._add_entry(off, self.last_ts, lk)
+            self.records += 1
+        if out:
+            os.lseek(fd, self._idx_pos, os.SEEK_SET)
+            os.write(fd, b"".join(out))
+            self._idx_pos += len(out) * _ENT.size
+        self._write_header(fd)
+
+    def catch_up(self, *, scan: bool = True) -> None:
+        """Index everything appended since the last catch-up (any process)."""
+        with self._mu:
+            if not self.path.exists():
+                self._reset_memory()
+                return
+            try:
+                with path_lock(self.lock_path):
+                    self._catch_up_locked(scan=scan)
+            except Exception as e:
+                logger.warning("ai_action_index: catch-up failed for %s: %r", self.path, e)
+
+    def _catch_up_locked(self, *, scan: bool = True) -> None:
+        st = self.path.stat()
+        fd = os.open(str(self.idx_path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self._sync_from_file(fd, int(st.st_ino), int(st.st_size))
+            if scan:
+                self._scan_log(fd, int(st.st_size))
+            self.loaded = True
+        finally:
+            os.close(fd)
+
+    # ---- queries ----
+
+    def start_offset(self, since_ts_ms: int) -> int:
+        """Byte offset before which every record has ts < since_ts_ms."""
+        i = bisect_left(self.g_ts, int(since_ts_ms))
+        return self.g_off[i - 1] if i > 0 else 0
+
+    def ranges(self, since_ts_ms: int, label: Optional[str]) -> List[Tuple[int, Optional[int]]]:
+        start = self.start_offset(since_ts_ms)
+        if not label:
+            return [(start, None)]
+        marks = self.labels.get(_label_key(label), [])
+        out: List[Tuple[int, Optional[int]]] = []
+        for m in marks[bisect_left(marks, start):]:
+            k = bisect_right(self.g_off, m)
+            out.append((m, self.g_off[k] if k < len(self.g_off) else self.indexed_upto))
+        tail = max(start, self.indexed_upto)
+        out.append((tail, None))
+        return out
+
+    def query(
+        self,
+        since_ts_ms: int = 0,
+        limit: int = 500,
+        label: Optional[str] = None,
+        *,
+        catch_up: bool = True,
+    ) -> List[Dict[str, Any]]:
+        if catch_up:
+            self.catch_up()
+        out: List[Dict[str, Any]] = []
+        if limit <= 0 or not self.path.exists():
+            return out
+        since = int(since_ts_ms)
+        for start, end in self.ranges(since, label):
+            for _, _, line in _iter_lines(self.path, start, end):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = orjson.loads(line)
+                except Exception:
+                    continue
+                if not isinstance(row, dict) or row_ts(row) < since:
+                    continue
+                if label and row_label(row) != label:
+                    continue
+                out.append(row)
+                if len(out) >= limit:
+                    return out
+        return out
+
+
+_INDEXES: Dict[str, SegmentIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_segment_index(path: Path) -> SegmentIndex:
+    key = str(Path(path))
+    idx = _INDEXES.get(key)
+    if idx is None:
+        with _INDEXES_LOCK:
+            idx = _INDEXES.get(key)
+            if idx is None:
+                idx = _INDEXES[key] = SegmentIndex(Path(path))
+    return idx
+
+
+# ---------------------------------------------------------------------------
+# Segments
+# ---------------------------------------------------------------------------
+
+def manifest_path(bus_path: Path) -> Path:
+    return bus_path.with_name(f"{bus_path.stem}.segments.json")
+
+
+def writer_lock_path(bus_path: Path) -> Path:
+    return bus_path.with_name(bus_path.name + ".wlock")
+
+
+@contextmanager
+def writer_lock(bus_path: Path) -> Iterator[None]:
+    """Serialises appends and segment rotation across processes."""
+    with path_lock(writer_lock_path(bus_path)):
+        yield
+
+
+def load_segments(bus_path: Path) -> List[Dict[str, Any]]:
+    try:
+        obj = orjson.loads(manifest_path(bus_path).read_bytes())
+        segs = obj.get("segments") if isinstance(obj, dict) else None
+        return [s for s in segs if isinstance(s, dict)] if isinstance(segs, list) else []
+    except Exception:
+        return []
+
+
+def rotate_if_needed(bus_path: Path, max_bytes: int = SEGMENT_MAX_BYTES) -> Optional[Path]:
+    """
+    Seal the active bus file as a numbered segment once it exceeds max_bytes.
+    Caller must hold the writer lock. Returns the sealed path, if rotated.
+    """
+    if max_bytes <= 0:
+        return None
+    try:
+        if bus_path.stat().st_size < max_bytes:
+            return None
+    except Exception:
+        return None
+
+    idx = get_segment_index(bus_path)
+    with idx._mu:
+        with path_lock(idx.lock_path):
+            idx._catch_up_locked()
+            segs = load_segments(bus_path)
+            seq = int(segs[-1].get("seq", 0)) + 1 if segs else 1
+            sealed = bus_path.with_name(f"{bus_path.stem}.{seq:06d}{bus_path.suffix}")
+            first_ts = idx.g_ts[0] if idx.g_ts else 0
+            entry = {
+                "seq": seq,
+                "file": sealed.name,
+                "inode": idx.inode,
+                "records": idx.records,
+                "size": idx.indexed_upto,
+                "first_ts": first_ts,
+                "last_ts": idx.last_ts,
+                "sealed_ms": _now_ms(),
+            }
+            os.replace(idx.idx_path, sealed.with_name(sealed.name + ".idx"))
+            os.replace(bus_path, sealed)
+            segs.append(entry)
+            if SEGMENTS_KEEP > 0 and len(segs) > SEGMENTS_KEEP:
+                for old in segs[: len(segs) - SEGMENTS_KEEP]:
+                    for ext in ("", ".idx", ".ilock"):
+                        p = bus_path.with_name(old["file"] + ext)
+                        try:
+                            p.unlink()
+                        except Exception:
+                            pass
+                segs = segs[len(segs) - SEGMENTS_KEEP:]
+            _atomic_write_json(manifest_path(bus_path), {"segments": segs})
+            idx._reset_memory()
+    logger.info("ai_action_index: sealed %s (%d records)", sealed.name, entry["records"])
+    return sealed
+
+
+def query_bus(
+    bus_path: Path,
+    since_ts_ms: int = 0,
+    limit: int = 500,
+    label: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """since-ts (and optional label) query across sealed segments + active file."""
+    out: List[Dict[str, Any]] = []
+    for seg in load_segments(bus_path):
+        if int(seg.get("last_ts", 0)) < int(since_ts_ms):
+            continue
+        p = bus_path.with_name(str(seg.get("file")))
+        if not p.exists():
+            continue
+        idx = get_segment_index(p)  # sealed: index once, never re-scan
+        out.extend(idx.query(since_ts_ms, limit - len(out), label, catch_up=not idx.loaded))
+        if len(out) >= limit:
+            return out
+    out.extend(get_segment_index(bus_path).query(since_ts_ms, limit - len(out), label))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Named consumer cursors
+# ---------------------------------------------------------------------------
+
+class ActionCursor:
+    """
+    Persisted read position of one consumer on the bus.
+
+        cur = ActionCursor("ai_action_router:main")
+        rows = cur.poll()        # new rows since the last commit
+        ...process rows...
+        cur.commit()             # persist position (resume point on restart)
+
+    start="end" (default) begins at the current end of the bus the first
+    time a cursor name is seen; "begin" replays from the oldest segment.
+    """
+
+    def __init__(self, name: str, bus_path: Path, *, start: str = "end", cursor_dir: Optional[Path] = None) -> None:
+        self.name = str(name)
+        self.bus_path = Path(bus_path)
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in self.name)
+        self.path = Path(cursor_dir or self.bus_path.parent / "ai_action_cursors") / f"{safe}.json"
+        self.inode = 0
+        self.offset = 0
+        self.ts_ms = 0
+        self._committed: Tuple[int, int] = (-1, -1)
+        if not self._load():
+            self._init(start)
+
+    def _load(self) -> bool:
+        try:
+            obj = orjson.loads(self.path.read_bytes())
+            self.inode = int(obj.get("inode", 0))
+            self.offset = int(obj.get("offset", 0))
+            self.ts_ms = int(obj.get("ts_ms", 0))
+            self._committed = (self.inode, self.offset)
+            return True
+        except Exception:
+            return False
+
+    def _init(self, start: str) -> None:
+        if start == "begin":
+            segs = load_segments(self.bus_path)
+            self.inode = int(segs[0].get("inode", 0)) if segs else _inode(self.bus_path)
+            self.offset = 0
+        else:
+            self.inode = _inode(self.bus_path)
+            try:
+                self.offset = self.bus_path.stat().st_size
+            except Exception:
+                self.offset = 0
+            if not self.inode:
+                # active file not created since the last seal: the end of the bus
+                # is the end of the newest sealed segment
+                segs = load_segments(self.bus_path)
+                if segs:
+                    self.inode = int(segs[-1].get("inode", 0))
+                    self.offset = int(segs[-1].get("size", 0))
+        self.ts_ms = _now_ms() if start != "begin" else 0
+
+    def _chain(self) -> List[Tuple[int, Path]]:
+        chain = [(int(s.get("inode", 0)), self.bus_path.with_name(str(s.get("file")))) for s in load_segments(self.bus_path)]
+        chain.append((_inode(self.bus_path), self.bus_path))
+        return chain
+
+    def poll(self, limit: int = 1000) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        chain = self._chain()
+        pos = next((i for i, (ino, _) in enumerate(chain) if ino and ino == self.inode), None)
+        skip_before = 0
+        if pos is None and self.inode == 0 and self.offset == 0:
+            pos = 0  # nothing existed when the cursor was created: start at the oldest file
+        elif pos is None:
+            # segment gone (retention) or bus recreated: re-seek by timestamp
+            logger.warning("ai_action_cursor[%s]: position lost; re-seeking from ts=%s", self.name, self.ts_ms)
+            for i, (ino, p) in enumerate(chain):
+                if not p.exists():
+                    continue
+                idx = get_segment_index(p)
+                idx.catch_up()
+                if i == len(chain) - 1 or idx.last_ts >= self.ts_ms:
+                    pos, self.inode = i, ino
+                    self.offset = idx.start_offset(self.ts_ms)
+                    skip_before = self.ts_ms
+                    break
+            if pos is None:
+                return out
+        self.inode = chain[pos][0]
+        while pos < len(chain) and len(out) < limit:
+            ino, p = chain[pos]
+            try:
+                size = p.stat().st_size
+            except Exception:
+                size = 0
+            if self.offset > size:
+                logger.warning("ai_action_cursor[%s]: %s truncated; resetting offset to 0", self.name, p.name)
+                self.offset = 0
+            if size > self.offset:
+                for _, nxt, line in _iter_lines(p, self.offset, size):
+                    self.offset = nxt
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        row = orjson.loads(line)
+                    except Exception:
+                        continue
+                    if isinstance(row, dict):
+                        ts = row_ts(row)
+                        if ts < skip_before:
+                            continue
+                        self.ts_ms = max(self.ts_ms, ts)
+                        out.append(row)
+                        if len(out) >= limit:
+                            return out
+            if pos == len(chain) - 1:
+                break
+            if not chain[pos + 1][0]:
+                # sealed, but the new active file does not exist yet: stay at the
+                # end of this segment (inode 0 would read as "start of the bus")
+                break
+            pos += 1
+            self.inode, self.offset = chain[pos][0], 0
+        return out
+
+    def commit(self) -> None:
+        if self._committed == (self.inode, self.offset):
+            return
+        try:
+            _atomic_write_json(
+                self.path,
+                {"name": self.name, "inode": self.inode, "offset": self.offset, "ts_ms": self.ts_ms, "updated_ms": _now_ms()},
+            )
+            self._committed = (self.inode, self.offset)
+        except Exception as e:
+            logger.warning("ai_action_cursor[%s]: commit failed: %r", self.name, e)
+
+
+__all__ = [
+    "INDEX_EVERY",
+    "SEGMENT_MAX_BYTES",
+    "SegmentIndex",
+    "ActionCursor",
+    "get_segment_index",
+    "load_segments",
+    "rotate_if_needed",
+    "writer_lock",
+    "query_bus",
+    "row_label",
+    "row_ts",
+]
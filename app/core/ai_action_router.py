@@ -64,13 +64,14 @@ from app.core.flashback_common import (
 from app.core.execution_ws import (
     open_position_ws_first,
     flatten_symbol_ws_first,
-    list_open_symbols,
+    flatten_all_ws_first,
+    flatten_fleet,
 )
 
 from app.core.ai_profile import get_current_ai_profile
 
 # Action bus path (DRY-RUN tailer)
-from app.core.ai_action_bus import ACTION_LOG_PATH
+from app.core.ai_action_bus import open_cursor
 
 # Guard + exec signal schema (QUEUE router)
 from app.core.ai_action_guard import (
@@ -228,8 +229,12 @@ def _normalize_flatten_action(payload: Dict[str, Any], profile: Dict[str, Any])
     return {"type": "FLATTEN", "symbol": symbol}
 
 
-def _normalize_flatten_all(_: Dict[str, Any]) -> Dict[str, Any]:
-    return {"type": "FLATTEN_ALL"}
+def _normalize_flatten_all(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # scope "account" (default): this ACCOUNT_LABEL; "fleet": main + every enabled subaccount
+    scope = str(payload.get("scope") or "account").strip().lower()
+    if scope not in ("account", "fleet"):
+        raise ValueError(f"FLATTEN_ALL scope must be 'account' or 'fleet', got {scope!r}")
+    return {"type": "FLATTEN_ALL", "scope": scope}
 
 
 def _normalize_nop(_: Dict[str, Any]) -> Dict[str, Any]:
@@ -312,17 +317,16 @@ def apply_ai_action(raw_action: Dict[str, Any]) -> Dict[str, Any]:
             return {"ok": True, "error": None, "normalized": normalized, "result": res}
 
         if a_type == "FLATTEN_ALL":
-            results: Dict[str, Any] = {}
-            symbols = list_open_symbols()
-            for sym in symbols:
-                try:
-                    r = flatten_symbol_ws_first(sym, notify=True)
-                    results[sym] = {"ok": True, "result": r}
-                except Exception as e_flat:
-                    err_msg = f"Flatten {sym} failed: {e_flat}"
-                    alert_bot_error("ai_action_router", err_msg, "ERROR")
-                    results[sym] = {"ok": False, "error": str(e_flat)}
-            return {"ok": True, "error": None, "normalized": normalized, "result": results}
+            # Concurrent: one position snapshot, parallel closes, final reconcile.
+            if normalized.get("scope") == "fleet":
+                res = flatten_fleet(notify=True)
+                flat = bool(res.get("ok"))
+            else:
+                res = flatten_all_ws_first(notify=True)
+                flat = bool(res.get("flat", True))
+            if not flat:
+                alert_bot_error("ai_action_router", f"FLATTEN_ALL incomplete: remaining={res.get('remaining')}", "ERROR")
+            return {"ok": True, "error": None, "normalized": normalized, "result": res}
 
         raise RuntimeError(f"Unknown normalized action type {a_type!r}")
 
@@ -357,7 +361,7 @@ def apply_ai_actions(raw_actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
 
 
 # ---------------------------------------------------------------------------
-# (2) DRY-RUN Router — Tails ACTION_LOG_PATH and logs/TG (no live orders)
+# (2) DRY-RUN Router — Tails the action bus and logs/TG (no live orders)
 # ---------------------------------------------------------------------------
 
 _VALID_TYPES_DRY = {"open", "close", "reduce", "adjust_tp", "adjust_sl"}
@@ -422,41 +426,6 @@ def _validate_action_dry(act: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     return out
 
 
-def _iter_new_envelopes(path: Path, offset: int) -> Tuple[int, List[Dict[str, Any]]]:
-    if not path.exists():
-        return offset, []
-
-    try:
-        size = path.stat().st_size
-    except Exception:
-        return offset, []
-
-    if offset > size:
-        logger.warning("ai_action_router(dry): file truncated; resetting offset to 0")
-        offset = 0
-
-    envs: List[Dict[str, Any]] = []
-    try:
-        with path.open("rb") as f:
-            f.seek(offset)
-            for line in f:
-                offset += len(line)
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    env = orjson.loads(line)
-                    if isinstance(env, dict):
-                        envs.append(env)
-                except Exception:
-                    continue
-    except Exception as e:
-        alert_bot_error("ai_action_router", f"dry read error: {e}", "ERROR")
-        return offset, []
-
-    return offset, envs
-
-
 def _fmt_env_to_text(env: Dict[str, Any], act: Dict[str, Any]) -> str:
     lines = []
     lines.append("AI Action (DRY-RUN)")
@@ -505,10 +474,7 @@ def dry_run_router_loop() -> None:
         cfg.account_label, cfg.poll_seconds, cfg.send_tg
     )
 
-    try:
-        offset = ACTION_LOG_PATH.stat().st_size if ACTION_LOG_PATH.exists() else 0
-    except Exception:
-        offset = 0
+    cursor = open_cursor(f"ai_action_router_dry_{cfg.account_label}", start="end")
 
     try:
         send_tg(f"AI Action Router online for {cfg.account_label} (DRY-RUN)")
@@ -522,7 +488,7 @@ def dry_run_router_loop() -> None:
         record_heartbeat("ai_action_router")
 
         try:
-            offset, envs = _iter_new_envelopes(ACTION_LOG_PATH, offset)
+            envs = cursor.poll()
 
             for env in envs:
                 venv = _validate_env_dry(env, cfg.account_label)
@@ -544,6 +510,8 @@ def dry_run_router_loop() -> None:
                         except Exception as e:
                             alert_bot_error("ai_action_router", f"dry tg error: {e}", "WARN")
 
+            cursor.commit()
+
         except Exception as e:
             alert_bot_error("ai_action_router", f"dry loop error: {e}", "ERROR")
 
@@ -588,39 +556,6 @@ def _resolve_paths_for_queue_router() -> Tuple[Path, Path]:
     return actions_path, exec_path
 
 
-def _load_new_actions_bytes(actions_file: Path, last_size: int) -> Tuple[List[Dict[str, Any]], int]:
-    if not actions_file.exists():
-        return [], last_size
-
-    try:
-        raw = actions_file.read_bytes()
-    except Exception as exc:
-        logger.error("Failed to read actions file %s: %s", actions_file, exc)
-        return [], last_size
-
-    new_size = len(raw)
-    if new_size <= last_size:
-        return [], new_size
-
-    chunk = raw[last_size:]
-    lines = chunk.splitlines()
-
-    actions: List[Dict[str, Any]] = []
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            obj = orjson.loads(line)
-        except Exception:
-            logger.debug("Skipping malformed action line.")
-            continue
-        if isinstance(obj, dict):
-            actions.append(obj)
-
-    return actions, new_size
-
-
 def _append_exec_signal(exec_signals_path: Path, exec_sig: ExecSignal) -> None:
     try:
         payload = orjson.dumps(exec_sig)
@@ -735,11 +670,12 @@ def execsignal_queue_router_main() -> None:
         cfg.max_notional_pct,
     )
 
-    last_size = 0
+    # Replays the file on first run (as before), then resumes from the cursor.
+    cursor = open_cursor(f"execsignal_queue_router_{account_label}", start="begin", path=actions_file)
 
     while True:
         try:
-            actions, last_size = _load_new_actions_bytes(actions_file, last_size)
+            actions = cursor.poll()
             if actions:
                 logger.info("Queue Router saw %d new actions for %s", len(actions), account_label)
 
@@ -780,6 +716,7 @@ def execsignal_queue_router_main() -> None:
                         exec_sig.get("dry_run"),
                     )
 
+            cursor.commit()
             time.sleep(poll_seconds)
 
         except KeyboardInterrupt:
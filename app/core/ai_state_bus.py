@@ -1,12 +1,63 @@
 ﻿from __future__ import annotations
 
+"""
+Flashback — AI State Bus (versioned, incremental snapshot v2)
+
+Provides AI / signal engines with one structured snapshot:
+    account    equity_usdt / mmr_pct / tier (wallet bus, REST only when stale)
+    positions  raw rows + by_symbol map (position_bus)
+    symbols    per-symbol market block (market_bus, WS-first)
+    orders     recent orders_bus events
+    freshness  bus ages (seconds)
+    safety     is_safe + reasons + thresholds
+
+Incremental builds
+------------------
+AiStateService tracks a version per source: the (mtime_ns, size) of the bus
+file behind each section (plus a refresh bucket for account so a quiet
+wallet bus still gets re-checked every AI_STATE_ACCOUNT_REFRESH_SEC). On
+current() only sections whose sources moved are rebuilt; a rebuilt section
+that compares equal to the previous one (e.g. the positions_bus touch loop
+rewriting identical rows) does not count as a change.
+
+Each current() returns an immutable StateSnapshot. Its `version` is
+monotonic per service and only moves when section content (or the safety
+verdict) changes, so callers can skip work when the version hasn't moved.
+Sections are deep-frozen once per rebuild (dicts -> MappingProxyType,
+lists -> tuples) and shared between snapshots; as_dict() / build_ai_snapshot()
+hand out a deep plain copy that callers may mutate.
+
+build_ai_snapshot() / validate_snapshot_v2() keep the v2 call contract used
+by ai_pilot, executor_v2 and ai_decision_logger.
+"""
+
+import os
+import threading
 import time
-from typing import Any, Dict, Optional
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
 
 # NOTE:
 # This module is a core dependency of the runtime pipeline.
 # executor_v2 / ai_pilot / ai_decision_logger expect build_ai_snapshot + validate_snapshot_v2 to exist.
-# It was previously clobbered during cleanup. This restores a minimal, robust snapshot bus.
+
+SNAPSHOT_SCHEMA_VERSION = 2
+
+ACCOUNT_LABEL: str = os.getenv("ACCOUNT_LABEL", "main").strip() or "main"
+
+# Staleness thresholds (seconds)
+_POS_MAX_AGE_SEC = float(os.getenv("AI_POS_MAX_AGE_SEC", "8") or "8")
+_OB_MAX_AGE_SEC = float(os.getenv("AI_OB_MAX_AGE_SEC", "5") or "5")
+_TR_MAX_AGE_SEC = float(os.getenv("AI_TR_MAX_AGE_SEC", "8") or "8")
+
+# Account section is re-checked at least this often even if the wallet bus is quiet
+_ACCOUNT_REFRESH_SEC = float(os.getenv("AI_STATE_ACCOUNT_REFRESH_SEC", "30") or "30")
+
+_ORDERS_EVENTS_LIMIT = int(os.getenv("AI_STATE_ORDERS_EVENTS", "50") or "50")
+
 
 def _now_ms() -> int:
     return int(time.time() * 1000)
@@ -17,87 +68,512 @@ def _safe_call(getter, *args, **kwargs):
     except Exception:
         return None
 
+_IMPORTS: Dict[str, Any] = {}
+
 def _safe_import(path: str):
+    """Import once per process; failed imports are remembered as None."""
+    if path in _IMPORTS:
+        return _IMPORTS[path]
     try:
         mod = __import__(path, fromlist=["*"])
-        return mod
     except Exception:
+        mod = None
+    _IMPORTS[path] = mod
+    return mod
+
+def _stat_key(path: Optional[Path]) -> Optional[Tuple[int, int]]:
+    if path is None:
         return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
 
-def build_ai_snapshot(
-    account_label: str,
-    symbol: Optional[str] = None,
-    timeframe: Optional[str] = None,
-    mode: Optional[str] = None,
-    extra: Optional[Dict[str, Any]] = None,
+def _freeze(val: Any) -> Any:
+    if isinstance(val, Mapping):
+        return MappingProxyType({k: _freeze(v) for k, v in val.items()})
+    if isinstance(val, (list, tuple)):
+        return tuple(_freeze(v) for v in val)
+    return val
+
+def _thaw(val: Any) -> Any:
+    if isinstance(val, Mapping):
+        return {k: _thaw(v) for k, v in val.items()}
+    if isinstance(val, tuple):
+        return [_thaw(v) for v in val]
+    return val
+
+def _to_float(val: Any) -> Optional[float]:
+    try:
+        if val is None:
+            return None
+        return float(val)
+    except Exception:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Sections
+# ---------------------------------------------------------------------------
+
+def _positions_path() -> Optional[Path]:
+    pb = _safe_import("app.core.position_bus")
+    return getattr(pb, "POS_SNAPSHOT_PATH", None) if pb else None
+
+def _wallet_path(label: str) -> Optional[Path]:
+    wb = _safe_import("app.core.wallet_bus")
+    return _safe_call(wb.bus_path_for_label, label) if wb else None
+
+def _market_paths(include_trades: bool) -> List[Path]:
+    mb = _safe_import("app.core.market_bus")
+    if not mb:
+        return []
+    names = ["ORDERBOOK_PATH_LABELED", "ORDERBOOK_PATH_LEGACY"]
+    if include_trades:
+        names += ["TRADES_PATH_LABELED", "TRADES_PATH_LEGACY"]
+    return [p for p in (getattr(mb, n, None) for n in names) if p is not None]
+
+def _orders_path() -> Optional[Path]:
+    ob = _safe_import("app.core.orders_bus")
+    return getattr(ob, "ORDERS_BUS_PATH", None) if ob else None
+
+
+def _build_account(label: str) -> Dict[str, Any]:
+    """
+    Account state for label. This process' own label goes through
+    flashback_common (overrides / dry-run equity apply); other labels read
+    their wallet bus directly. Both are single-flight REST only when stale.
+    """
+    fc = _safe_import("app.core.flashback_common")
+    if fc is None:
+        return {}
+    if label == (getattr(fc, "ACCOUNT_LABEL", ACCOUNT_LABEL) or "main"):
+        eq = _safe_call(fc.get_equity_usdt)
+        mmr = _safe_call(fc.get_mmr_pct)
+    else:
+        wb = _safe_import("app.core.wallet_bus")
+        if wb is None:
+            return {}
+        eq = _safe_call(wb.get_equity_usdt, label)
+        mmr = _safe_call(wb.get_mmr_pct, label)
+    out: Dict[str, Any] = {
+        "equity_usdt": str(eq) if eq is not None else None,
+        "mmr_pct": str(mmr) if mmr is not None else None,
+    }
+    if isinstance(eq, Decimal):
+        tl = _safe_call(fc.tier_from_equity, eq)
+        if tl:
+            tier, level = tl
+            out["tier"] = tier
+            out["level"] = level
+            cap = _safe_call(fc.cap_pct_for_tier, tier)
+            out["tier_size_cap_pct"] = str(cap) if cap is not None else None
+            out["tier_max_conc"] = _safe_call(fc.max_conc_for_tier, tier)
+    return out
+
+
+def _build_positions(label: str) -> Dict[str, Any]:
+    """
+    Positions straight from the bus (no REST fallback here: staleness is
+    reported via freshness/safety instead).
+    """
+    pb = _safe_import("app.core.position_bus")
+    rows: List[Dict[str, Any]] = []
+    if pb is not None:
+        rows = _safe_call(
+            pb.get_positions_for_label,
+            label=label,
+            max_age_seconds=10 ** 9,
+            allow_rest_fallback=False,
+        ) or []
+    by_symbol = {str(r.get("symbol", "")).upper(): r for r in rows if r.get("symbol")}
+    return {"raw": rows, "by_symbol": by_symbol}
+
+
+def _build_symbol_block(
+    symbol: str,
+    *,
+    include_orderbook: bool,
+    include_trades: bool,
+    trades_limit: int,
 ) -> Dict[str, Any]:
     """
-    Build a lightweight runtime snapshot for decisioning + logging.
-
-    This is intentionally fail-soft:
-    - If any sub-snapshot provider is missing or throws, we still return a snapshot with None fields.
-    - Consumers should treat missing fields as "unknown" and degrade gracefully.
-    """
-    ts_ms = _now_ms()
-
-    # Optional snapshot sources (fail-soft)
-    market_bus = _safe_import("app.core.market_bus")
-    orders_bus = _safe_import("app.core.orders_bus")
-    position_bus = _safe_import("app.core.position_bus")
-    balance_snap = _safe_import("app.exchange.balance_snapshot")
-
-    snap: Dict[str, Any] = {
-        "schema_version": "snapshot.v2",
-        "ts_ms": ts_ms,
-        "account_label": account_label,
-        "mode": mode,
-        "symbol": symbol,
-        "timeframe": timeframe,
-        "market": None,
-        "orders": None,
-        "positions": None,
-        "balances": None,
-        "extra": extra or {},
+    Per-symbol market block, WS-first with graceful fallbacks.
+    """
+    fc = _safe_import("app.core.flashback_common")
+    mb = _safe_import("app.core.market_bus")
+    sym = symbol.upper()
+
+    last_px = _safe_call(fc.last_price_ws_first, sym) if fc else None
+    spread = _safe_call(fc.spread_bps_ws, sym) if fc else None
+
+    ob_block: Optional[Dict[str, Any]] = None
+    trades_block: Optional[List[Dict[str, Any]]] = None
+    if mb is not None:
+        if include_orderbook and hasattr(mb, "get_orderbook_snapshot"):
+            ob = _safe_call(mb.get_orderbook_snapshot, sym)
+            if isinstance(ob, dict):
+                ob_block = {
+                    "bids": (ob.get("bids") or ob.get("b") or [])[:10],
+                    "asks": (ob.get("asks") or ob.get("a") or [])[:10],
+                    "ts_ms": ob.get("ts_ms", 0),
+                    "updated_ms": ob.get("updated_ms", 0),
+                }
+        if include_trades and hasattr(mb, "get_recent_trades"):
+            tr = _safe_call(mb.get_recent_trades, sym, limit=trades_limit)
+            if isinstance(tr, list):
+                trades_block = tr
+
+    return {
+        "symbol": sym,
+        "last_price": str(last_px) if last_px is not None else None,
+        "spread_bps": str(spread) if spread is not None else None,
+        "orderbook": ob_block,
+        "trades": trades_block,
     }
 
-    # Pull sub-snapshots if providers exist
-    if market_bus and hasattr(market_bus, "get_snapshot"):
-        snap["market"] = _safe_call(market_bus.get_snapshot, account_label, symbol=symbol)
 
-    if orders_bus and hasattr(orders_bus, "get_snapshot"):
-        snap["orders"] = _safe_call(orders_bus.get_snapshot, account_label, symbol=symbol)
+def _build_orders() -> Optional[Dict[str, Any]]:
+    ob = _safe_import("app.core.orders_bus")
+    if ob is None or not hasattr(ob, "get_orders_snapshot"):
+        return None
+    snap = _safe_call(ob.get_orders_snapshot)
+    if not isinstance(snap, dict):
+        return None
+    events = snap.get("events") or []
+    return {
+        "updated_ms": snap.get("updated_ms", 0),
+        "events": events[-_ORDERS_EVENTS_LIMIT:] if _ORDERS_EVENTS_LIMIT > 0 else [],
+    }
 
-    if position_bus and hasattr(position_bus, "get_snapshot"):
-        snap["positions"] = _safe_call(position_bus.get_snapshot, account_label, symbol=symbol)
 
-    if balance_snap and hasattr(balance_snap, "get_snapshot"):
-        snap["balances"] = _safe_call(balance_snap.get_snapshot, account_label)
+def _evaluate_snapshot_safety(
+    *,
+    positions_bus_age_sec: Optional[float],
+    orderbook_bus_age_sec: Optional[float],
+    trades_bus_age_sec: Optional[float],
+) -> Dict[str, Any]:
+    """
+    Conservative: a bus age that exists and exceeds its threshold -> unsafe.
+    A None age means "not required / unknown".
+    """
+    reasons: List[str] = []
+    if positions_bus_age_sec is not None and positions_bus_age_sec > _POS_MAX_AGE_SEC:
+        reasons.append(f"positions_bus_stale ({positions_bus_age_sec:.2f}s > {_POS_MAX_AGE_SEC:.2f}s)")
+    if orderbook_bus_age_sec is not None and orderbook_bus_age_sec > _OB_MAX_AGE_SEC:
+        reasons.append(f"orderbook_bus_stale ({orderbook_bus_age_sec:.2f}s > {_OB_MAX_AGE_SEC:.2f}s)")
+    if trades_bus_age_sec is not None and trades_bus_age_sec > _TR_MAX_AGE_SEC:
+        reasons.append(f"trades_bus_stale ({trades_bus_age_sec:.2f}s > {_TR_MAX_AGE_SEC:.2f}s)")
+    return {
+        "is_safe": not reasons,
+        "reasons": reasons,
+        "thresholds_sec": {
+            "positions": _POS_MAX_AGE_SEC,
+            "orderbook": _OB_MAX_AGE_SEC,
+            "trades": _TR_MAX_AGE_SEC,
+        },
+    }
 
-    return snap
 
-def validate_snapshot_v2(snapshot: Dict[str, Any]) -> bool:
+# ---------------------------------------------------------------------------
+# Versioned snapshot service
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class StateSnapshot:
     """
-    Minimal validator: ensures required top-level keys exist.
-    We do NOT hard-fail on missing sub-fields because snapshot providers can degrade.
+    One immutable view of the AI state.
+
+    version:  monotonic per service; unchanged => same section content
+    rebuilt:  sections whose sources moved during this build
+    build_ms: wall time spent in current()
     """
-    if not isinstance(snapshot, dict):
-        return False
+    version: int
+    built_ms: int
+    build_ms: float
+    rebuilt: Tuple[str, ...]
+    data: Mapping[str, Any]
 
-    required = ["schema_version", "ts_ms", "account_label"]
-    for k in required:
-        if k not in snapshot:
-            return False
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
 
-    if snapshot.get("schema_version") not in ("snapshot.v2",):
-        return False
+    def as_dict(self) -> Dict[str, Any]:
+        """Deep plain-dict copy (for JSON / legacy callers that mutate it)."""
+        return _thaw(self.data)
+
+
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+_EMPTY_POSITIONS: Mapping[str, Any] = _freeze({"raw": [], "by_symbol": {}})
+
+
+class _Section:
+    __slots__ = ("name", "key_fn", "build_fn", "key", "value", "frozen")
+
+    def __init__(self, name: str, key_fn: Callable[[], Any], build_fn: Callable[[], Any]) -> None:
+        self.name = name
+        self.key_fn = key_fn
+        self.build_fn = build_fn
+        self.key: Any = object()  # never equal to a real key -> first call builds
+        self.value: Any = None
+        self.frozen: Any = None  # deep-frozen value, shared by snapshots
+
+
+class AiStateService:
+    """
+    Incremental snapshot builder for one account label + option set.
+    Thread-safe; current() is cheap (a few os.stat calls) when nothing moved.
+    """
+
+    def __init__(
+        self,
+        account_label: Optional[str] = None,
+        *,
+        focus_symbols: Optional[List[str]] = None,
+        include_orderbook: bool = True,
+        include_trades: bool = False,
+        trades_limit: int = 50,
+    ) -> None:
+        self.label = (account_label or ACCOUNT_LABEL).strip() or "main"
+        self.focus = sorted({str(s).upper().strip() for s in (focus_symbols or []) if str(s).strip()})
+        self.include_orderbook = include_orderbook
+        self.include_trades = include_trades
+        self.trades_limit = int(trades_limit)
+
+        self._lock = threading.Lock()
+        self._version = 0
+        self._last_is_safe: Optional[bool] = None
+        self._last: Optional[StateSnapshot] = None
+        self.polls = 0
+        self.unchanged_polls = 0
+        self.section_builds: Dict[str, int] = {}
+
+        pos_path = _positions_path()
+        wallet_path = _wallet_path(self.label)
+        market_paths = _market_paths(include_trades)
+        orders_path = _orders_path()
+        self._paths = {
+            "positions": pos_path,
+            "orderbook": [p for p in market_paths if "orderbook" in p.name],
+            "trades": [p for p in market_paths if "trades" in p.name],
+        }
+
+        self._sections: Dict[str, _Section] = {}
+        self._add("account",
+                  lambda: (_stat_key(wallet_path), int(time.time() // max(1.0, _ACCOUNT_REFRESH_SEC))),
+                  lambda: _build_account(self.label))
+        self._add("positions",
+                  lambda: _stat_key(pos_path),
+                  lambda: _build_positions(self.label))
+        # symbols depends on positions (when no focus list), so its key includes that section's key
+        self._add("symbols",
+                  lambda: (tuple(_stat_key(p) for p in market_paths), tuple(self._symbol_list())),
+                  self._build_symbols)
+        self._add("orders",
+                  lambda: _stat_key(orders_path),
+                  _build_orders)
+
+    def _add(self, name: str, key_fn: Callable[[], Any], build_fn: Callable[[], Any]) -> None:
+        self._sections[name] = _Section(name, key_fn, build_fn)
+        self.section_builds[name] = 0
+
+    def _symbol_list(self) -> List[str]:
+        if self.focus:
+            return self.focus
+        pos = self._sections["positions"].value or {}
+        return sorted((pos.get("by_symbol") or {}).keys())
+
+    def _build_symbols(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            sym: _build_symbol_block(
+                sym,
+                include_orderbook=self.include_orderbook,
+                include_trades=self.include_trades,
+                trades_limit=self.trades_limit,
+            )
+            for sym in self._symbol_list()
+        }
+
+    def _age_sec(self, paths: Any, now_ns: int) -> Optional[float]:
+        """Bus age from file mtime (writers replace the file on every update)."""
+        if paths is None:
+            return None
+        if isinstance(paths, Path):
+            paths = [paths]
+        best: Optional[int] = None
+        for p in paths:
+            k = _stat_key(p)
+            if k is not None and (best is None or k[0] > best):
+                best = k[0]
+        if best is None:
+            return None
+        return max(0.0, (now_ns - best) / 1e9)
+
+    def current(self) -> StateSnapshot:
+        t0 = time.perf_counter()
+        with self._lock:
+            self.polls += 1
+            rebuilt: List[str] = []
+            changed = False
+            for sec in self._sections.values():  # insertion order: positions before symbols
+                key = sec.key_fn()
+                if key == sec.key:
+                    continue
+                value = sec.build_fn()
+                sec.key = key
+                self.section_builds[sec.name] += 1
+                rebuilt.append(sec.name)
+                if value != sec.value:
+                    sec.value = value
+                    sec.frozen = _freeze(value)
+                    changed = True
+
+            now_ns = time.time_ns()
+            freshness = {
+                "positions_bus_age_sec": self._age_sec(self._paths["positions"], now_ns),
+                "orderbook_bus_age_sec": self._age_sec(self._paths["orderbook"], now_ns) if self.include_orderbook else None,
+                "trades_bus_age_sec": self._age_sec(self._paths["trades"], now_ns) if self.include_trades else None,
+            }
+            safety = _evaluate_snapshot_safety(
+                positions_bus_age_sec=freshness["positions_bus_age_sec"],
+                orderbook_bus_age_sec=freshness["orderbook_bus_age_sec"],
+                trades_bus_age_sec=freshness["trades_bus_age_sec"],
+            )
+            if safety["is_safe"] != self._last_is_safe:
+                self._last_is_safe = safety["is_safe"]
+                changed = True
+            if changed or self._version == 0:
+                self._version += 1
+            else:
+                self.unchanged_polls += 1
+
+            data = {
+                "schema_version": SNAPSHOT_SCHEMA_VERSION,
+                "ts_ms": _now_ms(),
+                "version": self._version,
+                "account_label": self.label,
+                "account": self._sections["account"].frozen or _EMPTY,
+                "positions": self._sections["positions"].frozen or _EMPTY_POSITIONS,
+                "symbols": self._sections["symbols"].frozen or _EMPTY,
+                "orders": self._sections["orders"].frozen,
+                "freshness": _freeze(freshness),
+                "safety": _freeze(safety),
+            }
+            snap = StateSnapshot(
+                version=self._version,
+                built_ms=data["ts_ms"],
+                build_ms=(time.perf_counter() - t0) * 1000.0,
+                rebuilt=tuple(rebuilt),
+                data=MappingProxyType(data),
+            )
+            self._last = snap
+            return snap
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "version": self._version,
+            "polls": self.polls,
+            "unchanged_polls": self.unchanged_polls,
+            "section_builds": dict(self.section_builds),
+            "last_build_ms": round(self._last.build_ms, 3) if self._last else None,
+        }
+
+
+_SERVICES: Dict[Tuple[Any, ...], AiStateService] = {}
+_SERVICES_LOCK = threading.Lock()
+
+
+def get_state_service(
+    account_label: Optional[str] = None,
+    *,
+    focus_symbols: Optional[List[str]] = None,
+    include_orderbook: bool = True,
+    include_trades: bool = False,
+    trades_limit: int = 50,
+) -> AiStateService:
+    """
+    Process-wide service per (label, options), so repeated callers share
+    section caches and version ids.
+    """
+    label = (account_label or ACCOUNT_LABEL).strip() or "main"
+    focus = tuple(sorted({str(s).upper().strip() for s in (focus_symbols or []) if str(s).strip()}))
+    key = (label, focus, bool(include_orderbook), bool(include_trades), int(trades_limit))
+    svc = _SERVICES.get(key)
+    if svc is None:
+        with _SERVICES_LOCK:
+            svc = _SERVICES.get(key)
+            if svc is None:
+                svc = AiStateService(
+                    label,
+                    focus_symbols=list(focus),
+                    include_orderbook=include_orderbook,
+                    include_trades=include_trades,
+                    trades_limit=trades_limit,
+                )
+                _SERVICES[key] = svc
+    return svc
+
+
+# ---------------------------------------------------------------------------
+# v2 call contract
+# ---------------------------------------------------------------------------
+
+def build_ai_snapshot(
+    focus_symbols: Optional[List[str]] = None,
+    *,
+    include_trades: bool = False,
+    trades_limit: int = 50,
+    include_orderbook: bool = True,
+    account_label: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Snapshot v2 for the current ACCOUNT_LABEL (or account_label), as a plain
+    dict. Served by the shared AiStateService, so only changed sections are
+    rebuilt between calls.
+    """
+    svc = get_state_service(
+        account_label,
+        focus_symbols=focus_symbols,
+        include_orderbook=include_orderbook,
+        include_trades=include_trades,
+        trades_limit=trades_limit,
+    )
+    return svc.current().as_dict()
+
+def validate_snapshot_v2(snapshot: Any) -> Tuple[bool, List[str]]:
+    """
+    Lightweight schema validation: strict on core keys, flexible on the rest.
+    Returns (ok, errors).
+    """
+    if isinstance(snapshot, StateSnapshot):
+        snapshot = snapshot.data
+    if not isinstance(snapshot, Mapping):
+        return False, ["snapshot_not_dict"]
+
+    errors: List[str] = []
+    sv = snapshot.get("schema_version")
+    if sv not in (SNAPSHOT_SCHEMA_VERSION, "snapshot.v2"):
+        errors.append(f"schema_version_expected_{SNAPSHOT_SCHEMA_VERSION}_got_{sv}")
+
+    for key in ("ts_ms", "account", "positions", "symbols", "freshness", "safety"):
+        if key not in snapshot:
+            errors.append(f"missing_key:{key}")
 
-    # ts_ms should be int-like
     try:
         int(snapshot.get("ts_ms"))
     except Exception:
-        return False
+        errors.append("ts_ms_not_int")
+    if "freshness" in snapshot and not isinstance(snapshot.get("freshness"), Mapping):
+        errors.append("freshness_not_dict")
+    if "safety" in snapshot and not isinstance(snapshot.get("safety"), Mapping):
+        errors.append("safety_not_dict")
 
-    return True
+    return (len(errors) == 0), errors
 
 def get_snapshot(
     account_label: str,
@@ -109,13 +585,12 @@ def get_snapshot(
     """
     Convenience alias used by some call sites.
     """
-    return build_ai_snapshot(
+    snap = build_ai_snapshot(
+        focus_symbols=[symbol] if symbol else None,
         account_label=account_label,
-        symbol=symbol,
-        timeframe=timeframe,
-        mode=mode,
-        extra=extra,
     )
+    snap.update({"symbol": symbol, "timeframe": timeframe, "mode": mode, "extra": extra or {}})
+    return snap
 
 # ---- Existing helper retained (was the only thing left after the clobber) ----
 from app.core.ai_profile import get_district_profile
@@ -7,6 +7,7 @@ from decimal import Decimal
 from typing import Dict, Any, List, Tuple
 
 from app.core.flashback_common import list_open_positions
+from app.core.position_bus import ACCOUNT_LABEL, get_position_index_for_label
 
 # In DRY_RUN / PAPER training, correlation gating is not meaningful because:
 # - positions may be simulated (PaperBroker) not in Bybit
@@ -41,7 +42,12 @@ def get_corr(sym_a: str, sym_b: str) -> float:
 
 
 def correlated_exposure_too_high(symbol: str, max_corr: float = 0.8, max_pairs: int = 1) -> bool:
-    open_pos: List[Dict[str, Any]] = list_open_positions()
+    # Fresh position_bus rows for this process's ACCOUNT_LABEL; otherwise the
+    # per-process REST call (the bus only refreshes "main" over REST itself)
+    idx = get_position_index_for_label(ACCOUNT_LABEL)
+    open_pos: List[Dict[str, Any]] = [r for rows in idx["by_side"].values() for r in rows]
+    if not open_pos:
+        open_pos = list_open_positions()
     if not open_pos:
         return False
 
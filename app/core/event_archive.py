@@ -0,0 +1,868 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — Event Archive (JSONL → partitioned Parquet) + unified reader
+
+Purpose
+-------
+The JSONL event logs (ws_executions, public_trades, ai_decisions,
+ai_events/setups, ai_events/outcomes.v1) only ever grow, and every report
+re-parses them line by line. This module:
+
+  - compacts sealed data into schema-typed Parquet under
+      <EVENT_ARCHIVE_DIR>/<stream>/_committed/day=YYYY-MM-DD/account=<a>/symbol=<s>/
+    via parquet_partitioned_writer.write_partitioned_chunk
+      * rotated segments (<log>.1, <log>.2, ... as written by ws_switchboard /
+        ai_decision_logger) are archived whole
+      * the live file is archived up to its last complete line once at least
+        EVENT_ARCHIVE_MIN_BYTES are pending (the file itself is not touched)
+  - reads a stream as one DataFrame: Parquet archive (partition pruning on
+    day/account/symbol + replay.time_window predicate pushdown) unioned with
+    the not-yet-archived JSONL tail of every file still on disk.
+
+Progress per file is tracked by inode (+ head fingerprint, so a reused inode
+is not mistaken for an archived file) in <stream>/_manifest.json. A batch is
+recorded as pending before its Parquet files are written and committed after,
+so a crash mid-batch is cleaned up and redone instead of duplicating rows.
+Every batch also gets a sequence number, stored in each of its rows (_seq);
+readers drop rows above the manifest's committed seq.
+
+Small-file merges commit the same way: the merged file is written under its
+final name, then one manifest write lists it together with the files it
+replaces. Until that write the merged file is ignored; after it the inputs
+are ignored (and unlinked, again on the next pass if we crashed first).
+
+Run:
+    python -m app.core.event_archive --once          # one compaction pass
+    python -m app.core.event_archive                 # background loop
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+import polars as pl
+
+from app.core.io_parquet import read_parquet
+from app.core.parquet_partitioned_writer import write_partitioned_chunk
+from app.core.replay.time_window import day_bounds, with_time_window
+
+try:
+    from app.core.config import settings
+except Exception:  # pragma: no cover
+    class _DummySettings:  # type: ignore
+        ROOT: Path = Path(__file__).resolve().parents[2]
+    settings = _DummySettings()  # type: ignore
+
+ROOT: Path = getattr(settings, "ROOT", Path(__file__).resolve().parents[2])
+STATE_DIR: Path = ROOT / "state"
+
+try:
+    from app.core.log import get_logger
+except Exception:  # pragma: no cover
+    import logging
+    import sys
+
+    def get_logger(name: str) -> "logging.Logger":  # type: ignore
+        logger_ = logging.getLogger(name)
+        if not logger_.handlers:
+            handler = logging.StreamHandler(sys.stdout)
+            fmt = logging.Formatter("%(asctime)s [%(levelname)s] [%(name)s] %(message)s")
+            handler.setFormatter(fmt)
+            logger_.addHandler(handler)
+        logger_.setLevel(logging.INFO)
+        return logger_
+
+logger = get_logger("event_archive")
+
+try:
+    from app.core.flashback_common import record_heartbeat
+except Exception:  # pragma: no cover
+    def record_heartbeat(name: str) -> None:  # type: ignore
+        return None
+
+
+def _env_path(name: str, default: Path) -> Path:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    p = Path(raw)
+    return p if p.is_absolute() else ROOT / p
+
+
+ARCHIVE_DIR: Path = _env_path("EVENT_ARCHIVE_DIR", STATE_DIR / "archive")
+MIN_BYTES = int(float(os.getenv("EVENT_ARCHIVE_MIN_MB", "4")) * 1024 * 1024)
+BATCH_ROWS = int(os.getenv("EVENT_ARCHIVE_BATCH_ROWS", "250000"))
+INTERVAL_SEC = float(os.getenv("EVENT_ARCHIVE_INTERVAL_SEC", "300"))
+MERGE_FILES = int(os.getenv("EVENT_ARCHIVE_MERGE_FILES", "16"))  # merge a partition past this many files
+
+_HEAD_BYTES = 256
+_CHUNK = 8 * 1024 * 1024
+NO_ACCOUNT = "_"
+NO_SYMBOL = "_"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+# ---------------------------------------------------------------------------
+# Value helpers
+# ---------------------------------------------------------------------------
+
+def _s(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s or None
+
+
+def _f(v: Any) -> Optional[float]:
+    try:
+        return None if v is None or v == "" else float(v)
+    except Exception:
+        return None
+
+
+def _i(v: Any) -> Optional[int]:
+    try:
+        return None if v is None or v == "" else int(float(v))
+    except Exception:
+        return None
+
+
+def _b(v: Any) -> Optional[bool]:
+    if v is None:
+        return None
+    if isinstance(v, str):
+        return v.strip().lower() in ("1", "true", "yes", "y")
+    return bool(v)
+
+
+def _ms(v: Any) -> Optional[int]:
+    """Epoch ms; accepts seconds (10 digits) as well."""
+    n = _i(v)
+    if n is None or n <= 0:
+        return None
+    return n * 1000 if n < 1_000_000_000_000 else n
+
+
+def _raw(obj: Any) -> str:
+    return orjson.dumps(obj).decode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# Streams: path(s), typed schema, line -> rows
+# ---------------------------------------------------------------------------
+
+Row = Dict[str, Any]
+
+
+def _rows_public_trades(obj: Dict[str, Any]) -> Iterable[Row]:
+    t = obj.get("trade") if isinstance(obj.get("trade"), dict) else {}
+    received = _ms(obj.get("received_ms"))
+    yield {
+        "ts_ms": _ms(t.get("T")) or received,
+        "received_ms": received,
+        "account": NO_ACCOUNT,
+        "symbol": _s(obj.get("symbol") or t.get("s")),
+        "side": _s(t.get("S")),
+        "price": _f(t.get("p")),
+        "size": _f(t.get("v")),
+        "trade_id": _s(t.get("i")),
+        "raw": _raw(obj),
+    }
+
+
+def _rows_ws_executions(obj: Dict[str, Any]) -> Iterable[Row]:
+    received = _ms(obj.get("ts_ms"))
+    acct = _s(obj.get("account_label"))
+    data = obj.get("data")
+    if isinstance(data, dict):
+        data = [data]
+    for e in data if isinstance(data, list) else []:
+        if not isinstance(e, dict):
+            continue
+        yield {
+            "ts_ms": _ms(e.get("execTime")) or received,
+            "received_ms": received,
+            "account": acct,
+            "symbol": _s(e.get("symbol")),
+            "side": _s(e.get("side")),
+            "exec_id": _s(e.get("execId")),
+            "order_id": _s(e.get("orderId")),
+            "order_link_id": _s(e.get("orderLinkId")),
+            "exec_type": _s(e.get("execType")),
+            "price": _f(e.get("execPrice")),
+            "qty": _f(e.get("execQty")),
+            "fee": _f(e.get("execFee")),
+            "closed_size": _f(e.get("closedSize")),
+            "is_maker": _b(e.get("isMaker")),
+            "raw": _raw(dict(e, account_label=acct, received_ms=received)),
+        }
+
+
+def _rows_ai_decisions(obj: Dict[str, Any]) -> Iterable[Row]:
+    yield {
+        "ts_ms": _ms(obj.get("ts_ms") or obj.get("ts")),
+        "account": _s(obj.get("account_label")),
+        "symbol": _s(obj.get("symbol")),
+        "trade_id": _s(obj.get("trade_id")),
+        "client_trade_id": _s(obj.get("client_trade_id")),
+        "source_trade_id": _s(obj.get("source_trade_id")),
+        "event_type": _s(obj.get("event_type")),
+        "decision": _s(obj.get("decision") or obj.get("decision_code")),
+        "allow": _b(obj.get("allow")),
+        "size_multiplier": _f(obj.get("size_multiplier")),
+        "schema_version": _i(obj.get("schema_version")),
+        "raw": _raw(obj),
+    }
+
+
+def _rows_setups(obj: Dict[str, Any]) -> Iterable[Row]:
+    yield {
+        "ts_ms": _ms(obj.get("ts_ms") or obj.get("ts")),
+        "account": _s(obj.get("account_label")),
+        "symbol": _s(obj.get("symbol")),
+        "trade_id": _s(obj.get("trade_id")),
+        "strategy": _s(obj.get("strategy") or obj.get("strategy_name")),
+        "setup_type": _s(obj.get("setup_type")),
+        "timeframe": _s(obj.get("timeframe")),
+        "event_type": _s(obj.get("event_type")),
+        "raw": _raw(obj),
+    }
+
+
+def _rows_outcomes(obj: Dict[str, Any]) -> Iterable[Row]:
+    stats = obj.get("stats") if isinstance(obj.get("stats"), dict) else {}
+    closed = _ms(obj.get("closed_ts_ms"))
+    opened = _ms(obj.get("opened_ts_ms"))
+    yield {
+        "ts_ms": closed or opened or _ms(obj.get("ts_ms") or obj.get("ts")),
+        "account": _s(obj.get("account_label")),
+        "symbol": _s(obj.get("symbol")),
+        "trade_id": _s(obj.get("trade_id")),
+        "opened_ts_ms": opened,
+        "closed_ts_ms": closed,
+        "pnl_usd": _f(obj.get("pnl_usd", stats.get("pnl_usd"))),
+        "r_multiple": _f(obj.get("r_multiple", stats.get("r_multiple"))),
+        "win": _b(obj.get("win", stats.get("win"))),
+        "close_reason": _s(obj.get("close_reason")),
+        "raw": _raw(obj),
+    }
+
+
+_COMMON = {"ts_ms": pl.Int64, "account": pl.Utf8, "symbol": pl.Utf8}
+
+
+@dataclass(frozen=True)
+class Stream:
+    name: str
+    paths: Tuple[Path, ...]
+    rows: Callable[[Dict[str, Any]], Iterable[Row]]
+    schema: Dict[str, Any]
+
+
+def _paths(env: str, default: Path) -> Tuple[Path, ...]:
+    raw = os.getenv(env, "").strip()
+    if not raw:
+        return (default,)
+    out = []
+    for part in raw.split(","):
+        part = part.strip()
+        if part:
+            p = Path(part)
+            out.append(p if p.is_absolute() else ROOT / p)
+    return tuple(out)
+
+
+def _schema(**cols: Any) -> Dict[str, Any]:
+    out = dict(_COMMON)
+    out.update(cols)
+    out["raw"] = pl.Utf8
+    return out
+
+
+STREAMS: Dict[str, Stream] = {
+    s.name: s
+    for s in (
+        Stream(
+            "public_trades",
+            _paths("EVENT_ARCHIVE_PUBLIC_TRADES_PATHS", STATE_DIR / "public_trades.jsonl"),
+            _rows_public_trades,
+            _schema(received_ms=pl.Int64, side=pl.Utf8, price=pl.Float64, size=pl.Float64, trade_id=pl.Utf8),
+        ),
+        Stream(
+            "ws_executions",
+            _paths("EVENT_ARCHIVE_WS_EXECUTIONS_PATHS", STATE_DIR / "ws_executions.jsonl"),
+            _rows_ws_executions,
+            _schema(
+                received_ms=pl.Int64, side=pl.Utf8, exec_id=pl.Utf8, order_id=pl.Utf8, order_link_id=pl.Utf8,
+                exec_type=pl.Utf8, price=pl.Float64, qty=pl.Float64, fee=pl.Float64, closed_size=pl.Float64,
+                is_maker=pl.Boolean,
+            ),
+        ),
+        Stream(
+            "ai_decisions",
+            _paths("EVENT_ARCHIVE_AI_DECISIONS_PATHS", STATE_DIR / "ai_decisions.jsonl"),
+            _rows_ai_decisions,
+            _schema(
+                trade_id=pl.Utf8, client_trade_id=pl.Utf8, source_trade_id=pl.Utf8, event_type=pl.Utf8,
+                decision=pl.Utf8, allow=pl.Boolean, size_multiplier=pl.Float64, schema_version=pl.Int64,
+            ),
+        ),
+        Stream(
+            "setups",
+            _paths("EVENT_ARCHIVE_SETUPS_PATHS", STATE_DIR / "ai_events" / "setups.jsonl"),
+            _rows_setups,
+            _schema(trade_id=pl.Utf8, strategy=pl.Utf8, setup_type=pl.Utf8, timeframe=pl.Utf8, event_type=pl.Utf8),
+        ),
+        Stream(
+            "outcomes",
+            _paths("EVENT_ARCHIVE_OUTCOMES_PATHS", STATE_DIR / "ai_events" / "outcomes.v1.jsonl"),
+            _rows_outcomes,
+            _schema(
+                trade_id=pl.Utf8, opened_ts_ms=pl.Int64, closed_ts_ms=pl.Int64, pnl_usd=pl.Float64,
+                r_multiple=pl.Float64, win=pl.Boolean, close_reason=pl.Utf8,
+            ),
+        ),
+    )
+}
+
+
+def get_stream(name: str) -> Stream:
+    try:
+        return STREAMS[name]
+    except KeyError:
+        raise ValueError(f"unknown stream {name!r} (known: {', '.join(sorted(STREAMS))})") from None
+
+
+# ---------------------------------------------------------------------------
+# Files, fingerprints, manifest
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _File:
+    path: Path
+    inode: int
+    size: int
+    head: str
+    live: bool
+
+
+def _head_fp(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.blake2b(f.read(_HEAD_BYTES), digest_size=8).hexdigest()
+
+
+def _stream_files(stream: Stream) -> List[_File]:
+    """Rotated segments (oldest first) then live file, for every configured path."""
+    out: List[_File] = []
+    for base in stream.paths:
+        rotated: List[Tuple[int, Path]] = []
+        prefix = base.name + "."
+        try:
+            for e in os.scandir(base.parent):
+                suffix = e.name[len(prefix):] if e.name.startswith(prefix) else ""
+                if suffix.isdigit():
+                    rotated.append((int(suffix), Path(e.path)))
+        except Exception:
+            pass
+        for p, live in [(p, False) for _, p in sorted(rotated, reverse=True)] + [(base, True)]:
+            try:
+                st = p.stat()
+                if st.st_size <= 0:
+                    continue
+                out.append(_File(p, int(st.st_ino), int(st.st_size), _head_fp(p), live))
+            except Exception:
+                continue
+    return out
+
+
+def _stream_dir(stream: Stream, archive_dir: Optional[Path] = None) -> Path:
+    return Path(archive_dir or ARCHIVE_DIR) / stream.name
+
+
+def _load_manifest(sdir: Path) -> Dict[str, Any]:
+    try:
+        obj = orjson.loads((sdir / "_manifest.json").read_bytes())
+        if isinstance(obj, dict):
+            obj.setdefault("files", {})
+            obj.setdefault("merged", {})
+            return obj
+    except Exception:
+        pass
+    return {"files": {}, "pending": None, "seq": 0, "merged": {}}
+
+
+def _save_manifest(sdir: Path, man: Dict[str, Any]) -> None:
+    sdir.mkdir(parents=True, exist_ok=True)
+    path = sdir / "_manifest.json"
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(orjson.dumps(man, option=orjson.OPT_INDENT_2))
+    os.replace(tmp, path)
+
+
+def _file_key(f: _File) -> str:
+    return f"{f.inode}-{f.head}"
+
+
+def _archived_upto(man: Dict[str, Any], f: _File) -> int:
+    ent = man.get("files", {}).get(_file_key(f))
+    try:
+        return min(int(ent.get("archived_upto", 0)), f.size) if isinstance(ent, dict) else 0
+    except Exception:
+        return 0
+
+
+def _batch_prefix(stream: Stream, key: str, start: int) -> str:
+    return f"{stream.name}-{key}-{start}"
+
+
+def _parse_batch_file(name: str) -> Optional[Tuple[str, int]]:
+    """'<stream>-<inode>-<head>-<start>_<ts>.parquet' -> (file key, start)."""
+    stem = name[: -len(".parquet")] if name.endswith(".parquet") else name
+    parts = stem.rsplit("_", 1)[0].rsplit("-", 3)
+    if len(parts) != 4:
+        return None
+    try:
+        return f"{parts[1]}-{parts[2]}", int(parts[3])
+    except Exception:
+        return None
+
+
+def _is_merged_name(name: str) -> bool:
+    return "-merged_" in name
+
+
+def _rel(sdir: Path, p: Path) -> str:
+    return p.relative_to(sdir).as_posix()
+
+
+def _committed_files(sdir: Path) -> Iterator[Path]:
+    base = sdir / "_committed"
+    if not base.exists():
+        return iter(())
+    return base.rglob("*.parquet")
+
+
+# ---------------------------------------------------------------------------
+# Line parsing
+# ---------------------------------------------------------------------------
+
+def _iter_lines(path: Path, start: int, end: int) -> Iterator[Tuple[int, bytes]]:
+    """(next_offset, line) for complete lines in [start, end)."""
+    with path.open("rb") as f:
+        f.seek(start)
+        pos = start
+        carry = b""
+        while pos + len(carry) < end:
+            data = f.read(min(_CHUNK, end - pos - len(carry)))
+            if not data:
+                return
+            buf = carry + data
+            i = 0
+            while True:
+                j = buf.find(b"\n", i)
+                if j < 0:
+                    break
+                yield pos + j + 1, buf[i:j]
+                i = j + 1
+            pos += i
+            carry = buf[i:]
+
+
+def _to_frame(stream: Stream, rows: List[Row]) -> pl.DataFrame:
+    cols = {c: [r.get(c) for r in rows] for c in stream.schema}
+    df = pl.DataFrame(cols, schema=stream.schema)
+    return df.with_columns(
+        pl.col("account").fill_null(NO_ACCOUNT),
+        pl.col("symbol").fill_null(NO_SYMBOL),
+    )
+
+
+def _parse_range(stream: Stream, path: Path, start: int, end: int, max_rows: int) -> Iterator[Tuple[int, List[Row]]]:
+    """Batches of (end_offset, rows); end_offset is always a line boundary."""
+    rows: List[Row] = []
+    last = start
+    for nxt, line in _iter_lines(path, start, end):
+        last = nxt
+        line = line.strip()
+        if line:
+            try:
+                obj = orjson.loads(line)
+            except Exception:
+                obj = None
+            if isinstance(obj, dict):
+                for r in stream.rows(obj):
+                    if r.get("ts_ms") is not None:
+                        rows.append(r)
+        if len(rows) >= max_rows:
+            yield last, rows
+            rows = []
+    if rows or last > start:
+        yield last, rows
+
+
+# ---------------------------------------------------------------------------
+# Compactor
+# ---------------------------------------------------------------------------
+
+_PARTITION = ("day", "account", "symbol")
+
+
+def _cleanup_pending(stream: Stream, sdir: Path, man: Dict[str, Any]) -> None:
+    pend = man.get("pending")
+    if not isinstance(pend, dict):
+        return
+    prefix = str(pend.get("prefix") or "")
+    removed = 0
+    if prefix:
+        for p in _committed_files(sdir):
+            if p.name.startswith(prefix + "_"):
+                try:
+                    p.unlink()
+                    removed += 1
+                except Exception:
+                    pass
+    logger.warning("event_archive[%s]: discarded %d files of interrupted batch %s", stream.name, removed, prefix)
+    man["pending"] = None
+    _save_manifest(sdir, man)
+
+
+def compact_stream(
+    name: str,
+    *,
+    archive_dir: Optional[Path] = None,
+    min_bytes: Optional[int] = None,
+    batch_rows: Optional[int] = None,
+) -> Dict[str, Any]:
+    """One compaction pass for a stream. Returns counters."""
+    stream = get_stream(name)
+    sdir = _stream_dir(stream, archive_dir)
+    min_bytes = MIN_BYTES if min_bytes is None else int(min_bytes)
+    batch_rows = BATCH_ROWS if batch_rows is None else int(batch_rows)
+    man = _load_manifest(sdir)
+    _cleanup_pending(stream, sdir, man)
+
+    stats = {"stream": name, "files": 0, "bytes": 0, "rows": 0, "parquet_files": 0}
+    files = _stream_files(stream)
+    for f in files:
+        key = _file_key(f)
+        start = _archived_upto(man, f)
+        end = f.size
+        if end <= start:
+            continue
+        if f.live and end - start < min_bytes:
+            continue
+        stats["files"] += 1
+        for batch_end, rows in _parse_range(stream, f.path, start, end, batch_rows):
+            prefix = _batch_prefix(stream, key, start)
+            seq = int(man.get("seq") or 0) + 1
+            man["pending"] = {"prefix": prefix, "file": key, "start": start, "end": batch_end, "seq": seq}
+            _save_manifest(sdir, man)
+            if rows:
+                df = _to_frame(stream, rows).with_columns(pl.lit(seq, dtype=pl.Int64).alias("_seq"))
+                written = write_partitioned_chunk(df, str(sdir), prefix, time_col="ts_ms", partition_cols=_PARTITION)
+                stats["parquet_files"] += len(written)
+                stats["rows"] += df.height
+            stats["bytes"] += batch_end - start
+            man["files"][key] = {
+                "archived_upto": batch_end,
+                "path": f.path.name,
+                "live": f.live,
+                "updated_ms": _now_ms(),
+            }
+            man["seq"] = seq
+            man["pending"] = None
+            _save_manifest(sdir, man)
+            start = batch_end
+
+    # forget files that no longer exist (their rows live in the archive)
+    present = {_file_key(f) for f in files}
+    stale = [k for k in man["files"] if k not in present]
+    if stale:
+        for k in stale:
+            man["files"].pop(k, None)
+        _save_manifest(sdir, man)
+
+    stats["merged"] = merge_small_files(name, archive_dir=archive_dir)
+    return stats
+
+
+def _finish_merges(stream: Stream, sdir: Path, man: Dict[str, Any]) -> None:
+    """Unlink inputs of committed merges; drop merged files a crash left uncommitted."""
+    changed = False
+    merged = man.setdefault("merged", {})
+    for out, inputs in list(merged.items()):
+        for rel in inputs or ():
+            try:
+                (sdir / rel).unlink()
+            except FileNotFoundError:
+                pass
+            except Exception:
+                continue
+            merged.pop(rel, None)
+            changed = True
+        if inputs:
+            merged[out] = []
+            changed = True
+    for p in list(_committed_files(sdir)):
+        if _is_merged_name(p.name) and _rel(sdir, p) not in merged:
+            try:
+                p.unlink()
+                logger.warning("event_archive[%s]: discarded uncommitted merge %s", stream.name, p.name)
+            except Exception:
+                pass
+    if changed:
+        _save_manifest(sdir, man)
+
+
+def merge_small_files(name: str, *, archive_dir: Optional[Path] = None, max_files: Optional[int] = None) -> int:
+    """Rewrite partitions holding more than max_files Parquet files as one file."""
+    stream = get_stream(name)
+    sdir = _stream_dir(stream, archive_dir)
+    max_files = MERGE_FILES if max_files is None else int(max_files)
+    if max_files <= 1:
+        return 0
+    man = _load_manifest(sdir)
+    _finish_merges(stream, sdir, man)
+    by_dir: Dict[Path, List[Path]] = {}
+    for p in _committed_files(sdir):
+        by_dir.setdefault(p.parent, []).append(p)
+    merged = 0
+    for d, files in by_dir.items():
+        if len(files) <= max_files:
+            continue
+        files = [p for p in files if _is_committed(p, man, sdir)]
+        if len(files) <= 1:
+            continue
+        df = pl.concat([read_parquet(p) for p in sorted(files)], how="diagonal_relaxed").sort("ts_ms")
+        ts = int(time.time() * 1_000_000)
+        tmp = d / f"{stream.name}-merged_{ts}.parquet.tmp"
+        final = d / f"{stream.name}-merged_{ts}.parquet"
+        df.write_parquet(tmp, compression="zstd", statistics=True)
+        os.replace(tmp, final)
+        # commit point: the merged file becomes visible and its inputs invisible in one write
+        man["merged"][_rel(sdir, final)] = [_rel(sdir, p) for p in files]
+        _save_manifest(sdir, man)
+        _finish_merges(stream, sdir, man)
+        merged += 1
+    return merged
+
+
+def _is_committed(p: Path, man: Dict[str, Any], sdir: Path) -> bool:
+    merged = man.get("merged") or {}
+    rel = _rel(sdir, p)
+    if _is_merged_name(p.name):
+        return rel in merged
+    if any(rel in inputs for inputs in merged.values() if inputs):
+        return False  # replaced by a committed merge, unlink pending
+    parsed = _parse_batch_file(p.name)
+    if parsed is None:
+        return False
+    key, start = parsed
+    pend = man.get("pending")
+    if isinstance(pend, dict) and p.name.startswith(str(pend.get("prefix")) + "_"):
+        return False
+    ent = man.get("files", {}).get(key)
+    if not isinstance(ent, dict):
+        return True  # source file gone, batch committed long ago
+    return start < int(ent.get("archived_upto", 0))
+
+
+def compact_all(**kw: Any) -> List[Dict[str, Any]]:
+    out = []
+    for name in STREAMS:
+        try:
+            out.append(compact_stream(name, **kw))
+        except Exception as e:
+            logger.error("event_archive[%s]: compaction failed: %r", name, e)
+    return out
+
+
+def run_forever() -> None:
+    logger.info("Event archive compactor starting (dir=%s interval=%ss min=%.1fMB)",
+                ARCHIVE_DIR, INTERVAL_SEC, MIN_BYTES / 1024 / 1024)
+    while True:
+        record_heartbeat("event_archive")
+        for st in compact_all():
+            if st.get("rows"):
+                logger.info("event_archive[%s]: +%d rows from %d file(s), %.1fMB, %d parquet file(s), merged=%d",
+                            st["stream"], st["rows"], st["files"], st["bytes"] / 1e6, st["parquet_files"], st["merged"])
+        time.sleep(max(5.0, INTERVAL_SEC))
+
+
+# ---------------------------------------------------------------------------
+# Unified reader
+# ---------------------------------------------------------------------------
+
+def _archive_files(
+    sdir: Path,
+    man: Dict[str, Any],
+    start_ms: Optional[int],
+    end_ms: Optional[int],
+    accounts: Optional[Sequence[str]],
+    symbols: Optional[Sequence[str]],
+) -> List[Path]:
+    base = sdir / "_committed"
+    if not base.exists():
+        return []
+    lo, hi = day_bounds(start_ms, end_ms)
+    acc = {str(a) for a in accounts} if accounts else None
+    sym = {str(s).upper() for s in symbols} if symbols else None
+    out: List[Path] = []
+    for dday in base.iterdir():
+        day = dday.name.partition("=")[2]
+        if (lo and day < lo) or (hi and day > hi):
+            continue
+        for dacc in dday.iterdir():
+            if acc is not None and dacc.name.partition("=")[2] not in acc:
+                continue
+            for dsym in dacc.iterdir():
+                if sym is not None and dsym.name.partition("=")[2].upper() not in sym:
+                    continue
+                out.extend(p for p in dsym.glob("*.parquet") if _is_committed(p, man, sdir))
+    return out
+
+
+def _filter(lf: pl.LazyFrame, start_ms, end_ms, accounts, symbols) -> pl.LazyFrame:
+    lf = with_time_window(lf, start_ms, end_ms, col="ts_ms")
+    if accounts:
+        lf = lf.filter(pl.col("account").is_in([str(a) for a in accounts]))
+    if symbols:
+        lf = lf.filter(pl.col("symbol").str.to_uppercase().is_in([str(s).upper() for s in symbols]))
+    return lf
+
+
+def read_stream(
+    name: str,
+    *,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    accounts: Optional[Sequence[str]] = None,
+    symbols: Optional[Sequence[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+    archive_dir: Optional[Path] = None,
+    include_live: bool = True,
+) -> pl.DataFrame:
+    """
+    Archive ∪ live JSONL tail for [start_ms, end_ms] (inclusive), optionally
+    restricted to accounts / symbols, sorted by ts_ms.
+    """
+    stream = get_stream(name)
+    sdir = _stream_dir(stream, archive_dir)
+    cols = list(columns) if columns else list(stream.schema)
+    if "ts_ms" not in cols:
+        cols.append("ts_ms")
+
+    for attempt in range(2):
+        man = _load_manifest(sdir)
+        frames: List[pl.DataFrame] = []
+        try:
+            files = _archive_files(sdir, man, start_ms, end_ms, accounts, symbols)
+            if files:
+                lf = pl.scan_parquet(files)
+                present = lf.collect_schema().names()
+                if "_seq" in present:
+                    lf = lf.filter(pl.col("_seq") <= int(man.get("seq") or 0))
+                lf = _filter(lf, start_ms, end_ms, accounts, symbols).select([c for c in cols if c in present])
+                frames.append(lf.collect())
+            break
+        except Exception:
+            if attempt:
+                raise  # files merged away under us twice in a row
+
+    if include_live:
+        for f in _stream_files(stream):
+            start = _archived_upto(man, f)
+            if start >= f.size:
+                continue
+            rows: List[Row] = []
+            for _, batch in _parse_range(stream, f.path, start, f.size, 1 << 62):
+                rows.extend(batch)
+            if rows:
+                lf = _to_frame(stream, rows).lazy()
+                frames.append(_filter(lf, start_ms, end_ms, accounts, symbols).select(cols).collect())
+
+    if not frames:
+        return pl.DataFrame(schema={c: stream.schema.get(c, pl.Utf8) for c in cols})
+    return pl.concat(frames, how="diagonal_relaxed").sort("ts_ms")
+
+
+def read_records(name: str, **kw: Any) -> List[Dict[str, Any]]:
+    """Original JSON objects (from the raw column) for callers that want dicts."""
+    df = read_stream(name, columns=["raw"], **kw)
+    return [orjson.loads(r) for r in df.get_column("raw").to_list()]
+
+
+def stream_for_path(path: Path) -> Optional[str]:
+    """Name of the stream whose live log is path (None if it is not an archived log)."""
+    try:
+        target = Path(path).resolve()
+        for s in STREAMS.values():
+            if any(p.resolve() == target for p in s.paths):
+                return s.name
+    except Exception:
+        pass
+    return None
+
+
+def archive_status(name: str, *, archive_dir: Optional[Path] = None) -> Dict[str, Any]:
+    stream = get_stream(name)
+    sdir = _stream_dir(stream, archive_dir)
+    man = _load_manifest(sdir)
+    files = list(_committed_files(sdir))
+    pending_bytes = sum(max(0, f.size - _archived_upto(man, f)) for f in _stream_files(stream))
+    return {
+        "stream": name,
+        "parquet_files": len(files),
+        "parquet_bytes": sum(p.stat().st_size for p in files if p.exists()),
+        "jsonl_pending_bytes": pending_bytes,
+        "tracked_files": len(man.get("files", {})),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="JSONL event logs -> partitioned Parquet archive")
+    ap.add_argument("--once", action="store_true", help="run one compaction pass and exit")
+    ap.add_argument("--stream", action="append", help="limit to stream(s)")
+    ap.add_argument("--status", action="store_true")
+    args = ap.parse_args()
+    names = args.stream or list(STREAMS)
+    if args.status:
+        for n in names:
+            print(orjson.dumps(archive_status(n)).decode())
+        return
+    if args.once:
+        for n in names:
+            print(orjson.dumps(compact_stream(n)).decode())
+        return
+    run_forever()
+
+
+__all__ = [
+    "ARCHIVE_DIR",
+    "STREAMS",
+    "Stream",
+    "get_stream",
+    "compact_stream",
+    "compact_all",
+    "merge_small_files",
+    "read_stream",
+    "read_records",
+    "stream_for_path",
+    "archive_status",
+    "run_forever",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ to:
     • Open positions sized by % of equity (notional-based).
     • Flatten a single symbol.
     • Flatten all symbols.
+    • Flatten the whole fleet (all accounts) concurrently (kill switch).
     • List open symbols.
 
 All of this is built on top of app.core.flashback_common and is designed
@@ -31,10 +32,18 @@ even if called directly (bypassing routers/adapters).
 
 from __future__ import annotations
 
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
 
 from app.core.flashback_common import (
+    ACCOUNT_LABEL,
+    bybit_get,
+    bybit_post,
+    get_api_keys,
     send_tg,
     alert_bot_error,
     record_heartbeat,
@@ -54,6 +63,17 @@ from app.core.flashback_common import (
 CATEGORY = "linear"
 QUOTE = "USDT"
 
+# Fleet flatten (kill switch) budget
+FLATTEN_MAX_CONCURRENCY = int(os.getenv("FLATTEN_MAX_CONCURRENCY", "16"))
+# Per-account, per-endpoint request budget (Bybit limits order/create and
+# order/cancel-all to ~10/s per UID). burst + rate must stay under the
+# exchange's 1s window.
+FLATTEN_RATE_PER_SEC = float(os.getenv("FLATTEN_RATE_PER_SEC", "8"))
+FLATTEN_RATE_BURST = int(os.getenv("FLATTEN_RATE_BURST", "2"))
+FLATTEN_READ_RATE_PER_SEC = float(os.getenv("FLATTEN_READ_RATE_PER_SEC", "20"))
+FLATTEN_RECONCILE_ROUNDS = int(os.getenv("FLATTEN_RECONCILE_ROUNDS", "3"))
+FLATTEN_RECONCILE_DELAY_SEC = float(os.getenv("FLATTEN_RECONCILE_DELAY_SEC", "0.25"))
+
 
 # ---------------------------------------------------------------------------
 # Internal helpers
@@ -393,7 +413,10 @@ def flatten_symbol_ws_first(
 
 def flatten_all_ws_first(notify: bool = True) -> Dict[str, Any]:
     """
-    Flatten all linear symbols with open positions.
+    Flatten all linear symbols with open positions on this account.
+
+    Uses the concurrent fleet path for the current ACCOUNT_LABEL: one
+    position snapshot, closes + cancels in parallel, final reconcile.
 
     DRY-RUN:
       - If EXEC_DRY_RUN=true, returns ok=True dry_run=True and does not place orders.
@@ -409,21 +432,345 @@ def flatten_all_ws_first(notify: bool = True) -> Dict[str, Any]:
             "skipped": "EXEC_DRY_RUN",
         }
 
-    syms = list_open_symbols()
+    fleet = flatten_fleet([ACCOUNT_LABEL], notify=False)
+    per_sym = fleet["results"].get(ACCOUNT_LABEL, {})
     results: Dict[str, Any] = {}
-
-    for sym in syms:
-        res = flatten_symbol_ws_first(sym, notify=notify)
-        results[sym] = res
+    for sym, r in per_sym.items():
+        results[sym] = {
+            "ok": bool(r["ok"]),
+            "error": r["error"],
+            "symbol": sym,
+            "flattened_qty": r["qty"],
+            "time_to_flat_ms": r["flat_ms"],
+        }
 
     if notify:
-        _log(f"🧹 FLATTEN_ALL requested for {len(syms)} symbols.")
+        _log(
+            f"🧹 FLATTEN_ALL {len(results)} symbols | {fleet['elapsed_ms']:.0f}ms"
+            + ("" if fleet["ok"] else f" | remaining={fleet['remaining'].get(ACCOUNT_LABEL, [])}")
+        )
 
     return {
         "ok": True,
+        "flat": fleet["ok"],
+        "elapsed_ms": fleet["elapsed_ms"],
+        "remaining": fleet["remaining"].get(ACCOUNT_LABEL, []),
+        "results": results,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Fleet flatten (kill switch)
+#
+# One position snapshot per account (fetched concurrently), then reduce-only
+# closes + cancel_all for every (account, symbol) in parallel, bounded by a
+# global worker cap and a per-account token bucket. A final reconcile
+# re-lists positions and retries anything still open, up to
+# FLATTEN_RECONCILE_ROUNDS.
+# ---------------------------------------------------------------------------
+
+class _TokenBucket:
+    def __init__(self, rate_per_sec: float, burst: int) -> None:
+        self.rate = max(0.001, float(rate_per_sec))
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+                self.ts = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _fleet_keys(label: str, purpose: str) -> Tuple[str, str]:
+    """
+    (key, secret) for exactly this account. Only main may use the shared
+    BYBIT_MAIN_* / BYBIT_API_* fallbacks: a subaccount resolved to main's keys
+    would read (and close) main's book under its own label.
+    """
+    lab = (label or "").strip()
+    if lab.lower() == "main":
+        return get_api_keys("main", purpose=purpose)
+    lu = lab.upper()
+    p = purpose.upper()
+    key = os.getenv(f"BYBIT_{lu}_{p}_KEY", "").strip()
+    secret = os.getenv(f"BYBIT_{lu}_{p}_SECRET", "").strip()
+    if not key or not secret:
+        raise RuntimeError(f"missing BYBIT_{lu}_{p}_KEY/BYBIT_{lu}_{p}_SECRET")
+    return key, secret
+
+
+class BybitFleetExchange:
+    """
+    Per-account Bybit v5 REST adapter used by flatten_fleet().
+
+    Subaccounts need their own BYBIT_<LABEL>_* keys; a label without them
+    fails its snapshot (reported in snapshot_errors, ok=False) instead of
+    falling back to main's keys.
+
+    Any object with the same three methods can be passed instead (e.g. a
+    local mock exchange in tests/benchmarks).
+    """
+
+    def list_positions(self, label: str) -> List[Dict[str, Any]]:
+        key, secret = _fleet_keys(label, "read")
+        res = bybit_get(
+            "/v5/position/list",
+            {"category": CATEGORY, "settleCoin": QUOTE},
+            key=key,
+            secret=secret,
+        )
+        return res.get("result", {}).get("list", []) or []
+
+    def reduce_only(self, label: str, symbol: str, side: str, qty: Decimal) -> Dict[str, Any]:
+        key, secret = _fleet_keys(label, "trade")
+        body = {
+            "category": CATEGORY,
+            "symbol": symbol,
+            "side": "Sell" if side.lower() == "buy" else "Buy",
+            "orderType": "Market",
+            "qty": str(qty),
+            "reduceOnly": True,
+            "positionIdx": 0,
+        }
+        return bybit_post("/v5/order/create", body, key=key, secret=secret)
+
+    def cancel_all(self, label: str, symbol: str) -> None:
+        key, secret = _fleet_keys(label, "trade")
+        bybit_post("/v5/order/cancel-all", {"category": CATEGORY, "symbol": symbol}, key=key, secret=secret)
+
+
+def fleet_account_labels() -> List[str]:
+    """
+    main + every enabled account from config/subaccounts.yaml (or env fallback).
+    """
+    labels: List[str] = ["main"]
+    try:
+        from app.core.subs import all_subs
+
+        for sub in all_subs():
+            if not sub.get("enabled", True):
+                continue
+            lab = str(sub.get("account_label") or "").strip()
+            if lab and lab not in labels:
+                labels.append(lab)
+    except Exception as e:
+        alert_bot_error("execution_ws", f"fleet_account_labels error: {e}", "WARN")
+    return labels
+
+
+def _open_legs(rows: List[Dict[str, Any]]) -> Dict[str, List[Tuple[str, Decimal]]]:
+    """
+    symbol -> [(side, size), ...] for rows with size > 0.
+    """
+    out: Dict[str, List[Tuple[str, Decimal]]] = {}
+    for p in rows:
+        try:
+            size = Decimal(str(p.get("size", "0")))
+        except Exception:
+            size = Decimal("0")
+        if size <= 0:
+            continue
+        sym = str(p.get("symbol") or "").strip().upper()
+        if sym:
+            out.setdefault(sym, []).append((str(p.get("side") or "").strip(), size))
+    return out
+
+
+def flatten_fleet(
+    labels: Optional[Sequence[str]] = None,
+    *,
+    exchange: Any = None,
+    notify: bool = True,
+    max_concurrency: Optional[int] = None,
+    rate_per_sec: Optional[float] = None,
+    reconcile_rounds: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Flatten every open linear position across `labels` (default: the whole
+    fleet) as fast as the rate budget allows.
+
+    Returns:
+      {
+        "ok": bool,                    # True iff the final reconcile saw no open positions
+        "elapsed_ms": float,
+        "accounts": [...],
+        "results": {label: {symbol: {
+            "side", "qty", "ok", "error", "attempts",
+            "ack_ms",                  # close accepted, ms since start
+            "flat_ms",                 # reconcile confirmed flat, ms since start
+        }}},
+        "remaining": {label: [symbol, ...]},   # still open after reconcile
+        "snapshot_errors": {label: str},  # labels whose latest snapshot failed
+      }
+
+    DRY-RUN:
+      - If EXEC_DRY_RUN=true (and no explicit exchange is given), returns
+        ok=True dry_run=True and does not place orders.
+    """
+    record_heartbeat("execution_ws")
+
+    if EXEC_DRY_RUN and exchange is None:
+        if notify:
+            _log("🧪 DRY_RUN FLATTEN_FLEET blocked at execution layer")
+        return {"ok": True, "dry_run": True, "results": {}, "remaining": {}, "skipped": "EXEC_DRY_RUN"}
+
+    ex = exchange if exchange is not None else BybitFleetExchange()
+    accounts = list(labels) if labels else fleet_account_labels()
+    workers = max(1, int(max_concurrency or FLATTEN_MAX_CONCURRENCY))
+    rate = float(rate_per_sec or FLATTEN_RATE_PER_SEC)
+    rounds = int(reconcile_rounds if reconcile_rounds is not None else FLATTEN_RECONCILE_ROUNDS)
+    buckets = {
+        (lab, kind): _TokenBucket(r, FLATTEN_RATE_BURST)
+        for lab in accounts
+        for kind, r in (("read", FLATTEN_READ_RATE_PER_SEC), ("order", rate), ("cancel", rate))
+    }
+
+    t0 = time.perf_counter()
+
+    def _ms() -> float:
+        return round((time.perf_counter() - t0) * 1000.0, 3)
+
+    results: Dict[str, Dict[str, Dict[str, Any]]] = {lab: {} for lab in accounts}
+    # only the latest snapshot per label counts: a later successful read clears it
+    snapshot_errors: Dict[str, str] = {}
+
+    def _snapshot(lab: str) -> Tuple[str, Optional[Dict[str, List[Tuple[str, Decimal]]]]]:
+        try:
+            buckets[(lab, "read")].acquire()
+            legs = _open_legs(ex.list_positions(lab))
+            snapshot_errors.pop(lab, None)
+            return lab, legs
+        except Exception as e:
+            snapshot_errors[lab] = str(e)
+            alert_bot_error("execution_ws", f"[{lab}] flatten snapshot error: {e}", "ERROR")
+            return lab, None
+
+    def _close(lab: str, sym: str, legs: List[Tuple[str, Decimal]]) -> None:
+        r = results[lab].setdefault(
+            sym, {"side": None, "qty": "0", "ok": False, "error": None, "attempts": 0, "ack_ms": None, "flat_ms": None}
+        )
+        r["attempts"] += 1
+        errors: List[str] = []
+        total = Decimal("0")
+        for side, size in legs:
+            try:
+                buckets[(lab, "order")].acquire()
+                ex.reduce_only(lab, sym, side, size)
+                total += size
+                r["side"] = side
+            except Exception as e:
+                errors.append(str(e))
+                alert_bot_error("execution_ws", f"[{lab}] {sym} reduce_only error: {e}", "ERROR")
+        if total > 0:
+            r["qty"] = str(total)
+            r["ack_ms"] = _ms()
+        try:
+            buckets[(lab, "cancel")].acquire()
+            ex.cancel_all(lab, sym)
+        except Exception as e:
+            alert_bot_error("execution_ws", f"[{lab}] {sym} cancel_all error: {e}", "WARN")
+        r["ok"] = not errors
+        r["error"] = "; ".join(errors) if errors else None
+
+    remaining: Dict[str, List[str]] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flatten") as pool:
+        open_now = dict(pool.map(_snapshot, accounts))
+
+        for rnd in range(rounds + 1):
+            jobs = [
+                pool.submit(_close, lab, sym, legs)
+                for lab, legs_by_sym in open_now.items()
+                if legs_by_sym
+                for sym, legs in legs_by_sym.items()
+            ]
+            unread = [lab for lab, v in open_now.items() if v is None]
+            if not jobs and not unread:
+                break
+            for j in jobs:
+                j.result()
+
+            # Reconcile: what is still open? (accounts whose snapshot failed are re-read too)
+            time.sleep(FLATTEN_RECONCILE_DELAY_SEC if rnd == 0 else FLATTEN_RECONCILE_DELAY_SEC * 2)
+            touched = [lab for lab, v in open_now.items() if v or v is None]
+            after = dict(pool.map(_snapshot, touched))
+            seen_ms = _ms()
+            next_open: Dict[str, Dict[str, List[Tuple[str, Decimal]]]] = {}
+            for lab in touched:
+                still = after.get(lab)
+                if still is None:
+                    # Couldn't verify; read it again next round.
+                    next_open[lab] = None  # type: ignore[assignment]
+                    continue
+                for sym in open_now[lab] or ():
+                    if sym not in still:
+                        r = results[lab].get(sym)
+                        if r is not None and r["flat_ms"] is None:
+                            r["flat_ms"] = seen_ms
+                # Anything still open is retried next round, including
+                # symbols that appeared mid-flatten.
+                if still:
+                    next_open[lab] = still
+            open_now = next_open
+            remaining = {lab: sorted(v) for lab, v in open_now.items() if v}
+
+    for lab, syms in results.items():
+        for sym, r in syms.items():
+            if r["flat_ms"] is None:
+                remaining.setdefault(lab, [])
+                if sym not in remaining[lab]:
+                    remaining[lab].append(sym)
+
+    elapsed = _ms()
+    ok = not remaining and not snapshot_errors
+    n_syms = sum(len(v) for v in results.values())
+
+    if notify:
+        if ok:
+            _log(f"🧹 FLATTEN_FLEET done | accounts={len(accounts)} symbols={n_syms} | {elapsed:.0f}ms")
+        else:
+            _log(
+                f"🚨 FLATTEN_FLEET incomplete | accounts={len(accounts)} symbols={n_syms} | "
+                f"remaining={remaining} snapshot_errors={list(snapshot_errors)} | {elapsed:.0f}ms"
+            )
+
+    return {
+        "ok": ok,
+        "elapsed_ms": elapsed,
+        "accounts": accounts,
         "results": results,
+        "remaining": remaining,
+        "snapshot_errors": snapshot_errors,
     }
 
 
+def _main(argv: Optional[Sequence[str]] = None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Fleet kill switch: flatten every open linear position.")
+    ap.add_argument("cmd", choices=["flatten-fleet"])
+    ap.add_argument("--labels", default="", help="comma-separated account labels (default: whole fleet)")
+    ap.add_argument("--yes", action="store_true", help="required: actually send the orders")
+    args = ap.parse_args(argv)
+    if not args.yes:
+        print("refusing to flatten without --yes")
+        return 2
+    labels = [x.strip() for x in args.labels.split(",") if x.strip()] or None
+    res = flatten_fleet(labels, notify=True)
+    print(
+        f"ok={res['ok']} elapsed_ms={res.get('elapsed_ms', 0):.0f} "
+        f"remaining={res.get('remaining')} snapshot_errors={res.get('snapshot_errors', {})}"
+    )
+    return 0 if res["ok"] else 1
+
+
 if __name__ == "__main__":
-    print("execution_ws module loaded. Use from other scripts; no CLI here.")
+    raise SystemExit(_main())
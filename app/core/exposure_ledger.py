@@ -0,0 +1,861 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — Cross-process exposure / session ledger (mmap)
+
+One aggregate view shared by every executor on the host, kept in a
+memory-mapped file (state/exposure_ledger.shm):
+
+    globals   total open risk, long / short notional, open trade count,
+              trades / opens today, wins / losses / BE, win / loss streak,
+              realized PnL today (local calendar day, like session_guard)
+    symbols   per-symbol long / short notional, risk, open trade count
+    trades    open trades keyed by trade_id (account, symbol, side,
+              notional, risk) so closes can be netted back out
+
+Everything is updated incrementally: record_open / reserve_open /
+update_open / record_close / release / close_symbol / register_result each
+touch one trade slot, one symbol slot and the globals. Nothing is rescanned
+or re-parsed (close_symbol scans the trade table once).
+
+Concurrency
+-----------
+Mutations take a file lock (plus a thread lock) and bump one seqlock around
+the whole table. check_open() never locks: it reads the globals and one
+symbol slot and retries if the seqlock moved, so a guard decision costs a
+couple of struct unpacks. check_open() followed by record_open() can race
+with another executor; reserve_open() does check + book under the lock.
+
+Persistence
+-----------
+Every mutation is appended to the journal (state/exposure_ledger.jsonl)
+inside the same file lock that applies it, so the journal has the ledger's
+cross-process order. Once the journal passes EXPOSURE_JOURNAL_COMPACT_BYTES
+it is rewritten (under that lock) as one snapshot: the open trades plus a
+"state" record with today's session counters. A daemon thread re-exports the
+legacy state/session_guard.json every EXPOSURE_JOURNAL_FLUSH_MS and at exit.
+When the .shm file is missing (reboot, wiped state) the ledger is rebuilt by
+replaying the journal.
+
+Caps (0 = disabled)
+-------------------
+EXPOSURE_MAX_TOTAL_RISK_USD        sum of open risk + new risk > X
+EXPOSURE_MAX_SYMBOL_NOTIONAL_USD   symbol long + short notional + new > X
+EXPOSURE_MAX_IMBALANCE_USD         |long - short| after the trade > X (only
+                                   blocks trades that widen the imbalance)
+SESSION_MAX_TRADES_PER_DAY         default 999 (opens or closes today)
+SESSION_MAX_LOSS_STREAK            default 5
+
+Other env
+---------
+EXPOSURE_LEDGER_PATH          default: <ROOT>/state/exposure_ledger.shm
+EXPOSURE_JOURNAL_PATH         default: <ROOT>/state/exposure_ledger.jsonl
+EXPOSURE_SYMBOL_SLOTS         default: 256   (fixed when the file is created)
+EXPOSURE_TRADE_SLOTS          default: 2048  (fixed when the file is created)
+EXPOSURE_JOURNAL_FLUSH_MS     default: 100   (session_guard.json export)
+EXPOSURE_JOURNAL_COMPACT_BYTES default: 4194304 (0 = never compact)
+"""
+
+from __future__ import annotations
+
+import atexit
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from app.ops.file_lock import fd_lock
+
+ROOT = Path(__file__).resolve().parents[2]
+SHM_PATH = Path(os.getenv("EXPOSURE_LEDGER_PATH", str(ROOT / "state" / "exposure_ledger.shm")))
+JOURNAL_PATH = Path(os.getenv("EXPOSURE_JOURNAL_PATH", str(ROOT / "state" / "exposure_ledger.jsonl")))
+SESSION_JSON_PATH = ROOT / "state" / "session_guard.json"
+NSYMBOLS = int(os.getenv("EXPOSURE_SYMBOL_SLOTS", "256"))
+NTRADES = int(os.getenv("EXPOSURE_TRADE_SLOTS", "2048"))
+JOURNAL_FLUSH_SEC = max(0.01, float(os.getenv("EXPOSURE_JOURNAL_FLUSH_MS", "100")) / 1000.0)
+JOURNAL_COMPACT_BYTES = int(os.getenv("EXPOSURE_JOURNAL_COMPACT_BYTES", str(4 * 1024 * 1024)))
+
+
+def _env_float(name: str, default: str) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except Exception:
+        return float(default)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+MAX_TOTAL_RISK_USD = _env_float("EXPOSURE_MAX_TOTAL_RISK_USD", "0")
+MAX_SYMBOL_NOTIONAL_USD = _env_float("EXPOSURE_MAX_SYMBOL_NOTIONAL_USD", "0")
+MAX_IMBALANCE_USD = _env_float("EXPOSURE_MAX_IMBALANCE_USD", "0")
+MAX_TRADES_PER_DAY = _env_int("SESSION_MAX_TRADES_PER_DAY", 999)
+MAX_LOSS_STREAK = _env_int("SESSION_MAX_LOSS_STREAK", 5)
+
+_MAGIC = b"FBEX0001"
+_HDR = struct.Struct("<8sIII")  # magic, version, nsymbols, ntrades
+_HDR_SIZE = 64
+
+# seq, day, trades_today, opens_today, wins, losses, be, loss_streak,
+# win_streak, open_count, total_risk, long_notional, short_notional,
+# realized_today, mutations
+_GLOBALS = struct.Struct("<QqqqqqqqqqddddQ")
+_GLOBALS_OFF = _HDR_SIZE
+_GLOBALS_SIZE = 128
+_SEQ = struct.Struct("<Q")
+
+# symbol, long_notional, short_notional, risk, open_count
+_SYM = struct.Struct("<24sdddq")
+_SYM_SIZE = 64
+
+# state (0 empty, 1 used), side (+1 long / -1 short),
+# trade_id, account_label, symbol, notional, risk, opened_ms
+_TRADE = struct.Struct("<Bb6x48s24s24sddq")
+_TRADE_SIZE = 128
+
+_G_FIELDS = (
+    "seq", "day", "trades_today", "opens_today", "wins", "losses", "breakeven",
+    "loss_streak", "win_streak", "open_count", "total_risk", "long_notional",
+    "short_notional", "realized_today", "mutations",
+)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+_DAY_CACHE = [0, 0.0]  # [yyyymmdd, local midnight (unix sec) when it ends]
+
+
+def _today() -> int:
+    """
+    Local calendar day as yyyymmdd (cached until local midnight).
+    """
+    now = time.time()
+    if now < _DAY_CACHE[1]:
+        return _DAY_CACHE[0]
+    lt = time.localtime(now)
+    _DAY_CACHE[0] = lt.tm_year * 10000 + lt.tm_mon * 100 + lt.tm_mday
+    _DAY_CACHE[1] = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+    return _DAY_CACHE[0]
+
+
+def _day_of(ts_ms: int) -> int:
+    lt = time.localtime(ts_ms / 1000.0)
+    return lt.tm_year * 10000 + lt.tm_mon * 100 + lt.tm_mday
+
+
+def _key(s: str, n: int) -> bytes:
+    return str(s).encode("utf-8")[:n]
+
+
+def _side_sign(side: Any) -> int:
+    s = str(side or "").strip().lower()
+    return -1 if s in ("sell", "short", "s", "-1") else 1
+
+
+def _result_from_pnl(pnl_usd: float) -> str:
+    if pnl_usd > 0:
+        return "WIN"
+    if pnl_usd < 0:
+        return "LOSS"
+    return "BREAKEVEN"
+
+
+class ExposureLedger:
+    def __init__(
+        self,
+        path: Path = SHM_PATH,
+        journal_path: Optional[Path] = JOURNAL_PATH,
+        nsymbols: int = NSYMBOLS,
+        ntrades: int = NTRADES,
+        session_json_path: Optional[Path] = SESSION_JSON_PATH,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.journal_path = Path(journal_path) if journal_path is not None else None
+        self.session_json_path = Path(session_json_path) if session_json_path is not None else None
+        self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        created = False
+        with fd_lock(self._fd):
+            if os.fstat(self._fd).st_size < _HDR_SIZE:
+                total = _HDR_SIZE + _GLOBALS_SIZE + nsymbols * _SYM_SIZE + ntrades * _TRADE_SIZE
+                os.ftruncate(self._fd, total)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, _HDR.pack(_MAGIC, 1, nsymbols, ntrades))
+                created = True
+            self._mm = mmap.mmap(self._fd, 0)
+            magic, _ver, ns, nt = _HDR.unpack_from(self._mm, 0)
+            if magic != _MAGIC:
+                raise RuntimeError(f"exposure ledger {self.path} has an unknown layout")
+            self.nsymbols = int(ns)
+            self.ntrades = int(nt)
+            self._sym_base = _HDR_SIZE + _GLOBALS_SIZE
+            self._trade_base = self._sym_base + self.nsymbols * _SYM_SIZE
+            self._lock = threading.RLock()
+            self._sym_off: Dict[str, int] = {}
+            self._pid = os.getpid()
+            self._session_dirty = False
+            self._flusher: Optional[threading.Thread] = None
+            self._stop = threading.Event()
+            self.replayed = 0
+        if created and self.journal_path is not None:
+            self._replay_journal()
+
+    # ---------- layout helpers ----------
+
+    def _globals(self) -> List[Any]:
+        return list(_GLOBALS.unpack_from(self._mm, _GLOBALS_OFF))
+
+    def _sym_slot(self, symbol: str, create: bool) -> Optional[int]:
+        off = self._sym_off.get(symbol)
+        if off is not None:
+            return off
+        key = _key(symbol, 24)
+        start = zlib.crc32(key) % self.nsymbols
+        mm = self._mm
+        for k in range(self.nsymbols):
+            o = self._sym_base + ((start + k) % self.nsymbols) * _SYM_SIZE
+            cur = bytes(mm[o : o + 24]).rstrip(b"\x00")
+            if cur == key:
+                self._sym_off[symbol] = o
+                return o
+            if not cur:
+                if not create:
+                    return None
+                _SYM.pack_into(mm, o, key, 0.0, 0.0, 0.0, 0)
+                self._sym_off[symbol] = o
+                return o
+        if create:
+            raise RuntimeError(f"exposure ledger symbol table full ({self.nsymbols} slots)")
+        return None
+
+    def _trade_home(self, key: bytes) -> int:
+        return zlib.crc32(key) % self.ntrades
+
+    def _trade_find(self, trade_id: str) -> Tuple[Optional[int], Optional[int]]:
+        """
+        (offset of the slot holding trade_id, first empty slot on its probe path)
+        """
+        key = _key(trade_id, 48)
+        start = self._trade_home(key)
+        mm = self._mm
+        for k in range(self.ntrades):
+            o = self._trade_base + ((start + k) % self.ntrades) * _TRADE_SIZE
+            if mm[o] == 0:
+                return None, o
+            if bytes(mm[o + 8 : o + 56]).rstrip(b"\x00") == key:
+                return o, None
+        return None, None
+
+    def _trade_delete(self, off: int) -> None:
+        """
+        Linear-probing delete with backward shift, so the table never
+        accumulates tombstones and lookups stay short.
+        """
+        mm = self._mm
+        n = self.ntrades
+        i = (off - self._trade_base) // _TRADE_SIZE
+        j = i
+        while True:
+            j = (j + 1) % n
+            oj = self._trade_base + j * _TRADE_SIZE
+            if mm[oj] == 0:
+                break
+            h = self._trade_home(bytes(mm[oj + 8 : oj + 56]).rstrip(b"\x00"))
+            # move j into the hole at i unless j's home lies cyclically in (i, j]
+            if (i < j and (h <= i or h > j)) or (i > j and (h <= i and h > j)):
+                oi = self._trade_base + i * _TRADE_SIZE
+                mm[oi : oi + _TRADE_SIZE] = mm[oj : oj + _TRADE_SIZE]
+                i = j
+        oi = self._trade_base + i * _TRADE_SIZE
+        mm[oi : oi + _TRADE_SIZE] = b"\x00" * _TRADE_SIZE
+
+    @contextmanager
+    def _write(self, roll: bool = True) -> Iterator[List[Any]]:
+        """
+        Exclusive section: yields the globals (rolled to today unless
+        roll=False) and publishes them under the seqlock on exit.
+        """
+        with self._lock, fd_lock(self._fd):
+            mm = self._mm
+            g = self._globals()
+            base = g[0] + (g[0] & 1)
+            _SEQ.pack_into(mm, _GLOBALS_OFF, base + 1)
+            try:
+                if roll and g[1] != _today():
+                    self._roll(g, _today())
+                yield g
+            finally:
+                g[0] = base + 2
+                g[14] += 1
+                _GLOBALS.pack_into(mm, _GLOBALS_OFF, base + 1, *g[1:])
+                _SEQ.pack_into(mm, _GLOBALS_OFF, base + 2)
+
+    @staticmethod
+    def _roll(g: List[Any], day: int) -> None:
+        g[1] = day
+        g[2] = g[3] = g[4] = g[5] = g[6] = g[7] = g[8] = 0
+        g[13] = 0.0
+
+    # ---------- mutations (caller holds _write) ----------
+
+    def _book_open(self, g: List[Any], trade_id: str, account: str, symbol: str, sign: int,
+                   notional: float, risk: float, ts_ms: int) -> bool:
+        live, free = self._trade_find(trade_id)
+        if live is not None:
+            return False
+        # keep one slot empty so every probe terminates
+        if free is None or g[9] >= self.ntrades - 1:
+            raise RuntimeError(f"exposure ledger trade table full ({self.ntrades} slots)")
+        _TRADE.pack_into(self._mm, free, 1, sign, _key(trade_id, 48), _key(account, 24), _key(symbol, 24),
+                         notional, risk, ts_ms)
+        so = self._sym_slot(symbol, create=True)
+        name, ln, sn, r, c = _SYM.unpack_from(self._mm, so)
+        if sign > 0:
+            ln += notional
+            g[11] += notional
+        else:
+            sn += notional
+            g[12] += notional
+        _SYM.pack_into(self._mm, so, name, ln, sn, r + risk, c + 1)
+        g[9] += 1
+        g[10] += risk
+        g[3] += 1
+        return True
+
+    def _adjust(self, g: List[Any], off: int, d_notional: float, d_risk: float, remove: bool) -> None:
+        mm = self._mm
+        st, sign, tid, acct, sym, notional, risk, opened = _TRADE.unpack_from(mm, off)
+        so = self._sym_slot(sym.rstrip(b"\x00").decode("utf-8", "replace"), create=True)
+        name, ln, sn, r, c = _SYM.unpack_from(mm, so)
+        if sign > 0:
+            ln = max(0.0, ln + d_notional)
+            g[11] = max(0.0, g[11] + d_notional)
+        else:
+            sn = max(0.0, sn + d_notional)
+            g[12] = max(0.0, g[12] + d_notional)
+        r = max(0.0, r + d_risk)
+        g[10] = max(0.0, g[10] + d_risk)
+        if remove:
+            c = max(0, c - 1)
+            g[9] = max(0, g[9] - 1)
+            self._trade_delete(off)
+        else:
+            _TRADE.pack_into(mm, off, st, sign, tid, acct, sym, notional + d_notional, risk + d_risk, opened)
+        _SYM.pack_into(mm, so, name, ln, sn, r, c)
+
+    def _remove(self, g: List[Any], off: int) -> None:
+        _st, _sign, _tid, _acct, _sym, notional, risk, _opened = _TRADE.unpack_from(self._mm, off)
+        self._adjust(g, off, -notional, -risk, remove=True)
+
+    @staticmethod
+    def _result(g: List[Any], result: str, pnl_usd: Optional[float]) -> None:
+        res = (result or "UNKNOWN").upper()
+        g[2] += 1
+        if res == "WIN":
+            g[4] += 1
+            g[8] += 1
+            g[7] = 0
+        elif res == "LOSS":
+            g[5] += 1
+            g[7] += 1
+            g[8] = 0
+        elif res == "BREAKEVEN":
+            g[6] += 1
+        if pnl_usd is not None:
+            g[13] += float(pnl_usd)
+
+
+    def _close_symbol(self, g: List[Any], account: str, symbol: str) -> int:
+        so = self._sym_slot(symbol, create=False)
+        if so is None or _SYM.unpack_from(self._mm, so)[4] <= 0:
+            return 0
+        mm = self._mm
+        akey = _key(account, 24)
+        skey = _key(symbol, 24)
+        # Collect first: a delete back-shifts later entries of the probe
+        # chain, possibly into slots this scan has already passed.
+        tids: List[str] = []
+        for i in range(self.ntrades):
+            o = self._trade_base + i * _TRADE_SIZE
+            if mm[o] != 1:
+                continue
+            _st, _sign, tid, acct, sym, _n, _r, _t = _TRADE.unpack_from(mm, o)
+            if sym.rstrip(b"\x00") == skey and (not akey or acct.rstrip(b"\x00") == akey):
+                tids.append(tid.rstrip(b"\x00").decode("utf-8", "replace"))
+        n = 0
+        for tid in tids:
+            off, _free = self._trade_find(tid)
+            if off is not None:
+                self._remove(g, off)
+                n += 1
+        return n
+
+    def _apply(self, g: List[Any], rec: Dict[str, Any]) -> Any:
+        op = rec.get("op")
+        if op == "open":
+            return self._book_open(
+                g, str(rec["trade_id"]), str(rec.get("account") or ""), str(rec["symbol"]),
+                int(rec.get("side") or 1), float(rec.get("notional") or 0.0), float(rec.get("risk") or 0.0),
+                int(rec.get("ts_ms") or 0),
+            )
+        if op == "update":
+            off, _free = self._trade_find(str(rec["trade_id"]))
+            if off is None:
+                return False
+            _st, _sign, _tid, _acct, _sym, notional, risk, _t = _TRADE.unpack_from(self._mm, off)
+            new_n = notional if rec.get("notional") is None else float(rec["notional"])
+            new_r = risk if rec.get("risk") is None else float(rec["risk"])
+            self._adjust(g, off, new_n - notional, new_r - risk, remove=False)
+            return True
+        if op == "release":
+            off, _free = self._trade_find(str(rec["trade_id"]))
+            if off is None:
+                return False
+            opened = _TRADE.unpack_from(self._mm, off)[7]
+            self._remove(g, off)
+            # a reservation that never filled is not one of today's opens
+            if _day_of(opened) == g[1]:
+                g[3] = max(0, g[3] - 1)
+            return True
+        if op == "state":
+            g[1] = int(rec.get("day") or g[1])
+            for i, k in ((2, "trades_today"), (3, "opens_today"), (4, "wins"), (5, "losses"),
+                         (6, "breakeven"), (7, "loss_streak"), (8, "win_streak")):
+                g[i] = int(rec.get(k) or 0)
+            g[13] = float(rec.get("realized_today") or 0.0)
+            return True
+        pnl = rec.get("pnl")
+        if op == "close":
+            off, _free = self._trade_find(str(rec["trade_id"]))
+            if off is not None:
+                self._remove(g, off)
+            res = rec.get("result") or (_result_from_pnl(float(pnl)) if pnl is not None else None)
+            if res:
+                self._result(g, res, pnl)
+            return off is not None
+        if op == "close_symbol":
+            n = self._close_symbol(g, str(rec.get("account") or ""), str(rec["symbol"]))
+            if pnl is not None:
+                self._result(g, _result_from_pnl(float(pnl)), pnl)
+            return n
+        if op == "result":
+            self._result(g, str(rec.get("result") or "UNKNOWN"), pnl)
+            return True
+        return None
+
+    def _mutate(self, rec: Dict[str, Any]) -> Any:
+        rec["ts_ms"] = _now_ms()
+        with self._write() as g:
+            out = self._apply(g, rec)
+            if out or rec["op"] not in ("open", "update", "release"):
+                self._journal(g, rec)
+                if rec["op"] in ("close", "close_symbol", "result"):
+                    self._session_dirty = True
+        self._ensure_flusher()
+        return out
+
+    # ---------- public API: writes ----------
+
+    def record_open(self, trade_id: str, symbol: str, side: Any, notional_usd: float, risk_usd: float,
+                    account_label: str = "") -> bool:
+        """
+        Book an opened trade. Returns False if trade_id is already open.
+        """
+        return bool(self._mutate({
+            "op": "open", "trade_id": str(trade_id), "account": str(account_label or ""),
+            "symbol": str(symbol).upper(), "side": _side_sign(side),
+            "notional": float(notional_usd or 0.0), "risk": float(risk_usd or 0.0),
+        }))
+
+    def reserve_open(self, trade_id: str, symbol: str, side: Any, notional_usd: float, risk_usd: float,
+                     account_label: str = "") -> Tuple[bool, str]:
+        """
+        check_open + record_open under the ledger lock, so two executors can
+        not both take the last bit of headroom. Returns (allowed, reason).
+        """
+        symbol = str(symbol).upper()
+        rec = {
+            "op": "open", "trade_id": str(trade_id), "account": str(account_label or ""),
+            "symbol": symbol, "side": _side_sign(side),
+            "notional": float(notional_usd or 0.0), "risk": float(risk_usd or 0.0), "ts_ms": _now_ms(),
+        }
+        with self._write() as g:
+            so = self._sym_slot(symbol, create=False)
+            sym = _SYM.unpack_from(self._mm, so) if so is not None else None
+            ok, reason = _evaluate(g, sym, rec["side"], rec["notional"], rec["risk"])
+            if ok:
+                if not self._apply(g, rec):
+                    return False, "trade_id_already_open"
+                self._journal(g, rec)
+        self._ensure_flusher()
+        return ok, reason
+
+    def release(self, trade_id: str) -> bool:
+        """
+        Undo a reserve_open whose order was never placed or filled: frees
+        its exposure and takes it back out of today's opens. No session
+        result is counted.
+        """
+        return bool(self._mutate({"op": "release", "trade_id": str(trade_id)}))
+
+    def update_open(self, trade_id: str, notional_usd: Optional[float] = None,
+                    risk_usd: Optional[float] = None) -> bool:
+        """
+        Set an open trade's notional / risk (partial fills, scale-ins, stop moves).
+        """
+        return bool(self._mutate({
+            "op": "update", "trade_id": str(trade_id),
+            "notional": None if notional_usd is None else float(notional_usd),
+            "risk": None if risk_usd is None else float(risk_usd),
+        }))
+
+    def record_close(self, trade_id: str, result: Optional[str] = None, pnl_usd: Optional[float] = None) -> bool:
+        """
+        Release a trade's exposure. With result or pnl_usd it also counts as
+        a session result (WIN / LOSS / BREAKEVEN from the PnL sign).
+        """
+        return bool(self._mutate({
+            "op": "close", "trade_id": str(trade_id), "result": (result or "").upper() or None,
+            "pnl": None if pnl_usd is None else float(pnl_usd),
+        }))
+
+    def close_symbol(self, account_label: str, symbol: str, pnl_usd: Optional[float] = None) -> int:
+        """
+        Position on (account, symbol) went flat: release every open trade on
+        it. Returns the number of trades released.
+        """
+        return int(self._mutate({
+            "op": "close_symbol", "account": str(account_label or ""), "symbol": str(symbol).upper(),
+            "pnl": None if pnl_usd is None else float(pnl_usd),
+        }) or 0)
+
+    def register_result(self, result: str, pnl_usd: Optional[float] = None) -> None:
+        """
+        session_guard.register_trade_result semantics.
+        """
+        self._mutate({"op": "result", "result": (result or "UNKNOWN").upper(),
+                      "pnl": None if pnl_usd is None else float(pnl_usd)})
+
+    # ---------- public API: reads ----------
+
+    def _read(self, symbol: Optional[str] = None) -> Tuple[Tuple[Any, ...], Optional[Tuple[Any, ...]]]:
+        mm = self._mm
+        so = None
+        if symbol is not None:
+            so = self._sym_off.get(symbol)
+            if so is None:
+                so = self._sym_slot(symbol, create=False)
+        for _ in range(1000):
+            s1 = _SEQ.unpack_from(mm, _GLOBALS_OFF)[0]
+            if s1 & 1:
+                continue
+            g = _GLOBALS.unpack_from(mm, _GLOBALS_OFF)
+            sym = _SYM.unpack_from(mm, so) if so is not None else None
+            if _SEQ.unpack_from(mm, _GLOBALS_OFF)[0] == s1:
+                return g, sym
+        # A writer died mid-update; take the lock so the next write repairs the seq.
+        with self._lock, fd_lock(self._fd):
+            g = _GLOBALS.unpack_from(mm, _GLOBALS_OFF)
+            return g, (_SYM.unpack_from(mm, so) if so is not None else None)
+
+    def check_open(self, symbol: str, side: Any, notional_usd: float = 0.0, risk_usd: float = 0.0) -> Tuple[bool, str]:
+        """
+        Lock-free cap check for a prospective trade. Returns (allowed, reason).
+        """
+        g, sym = self._read(symbol)
+        if g[1] != _today():
+            g = list(g)
+            self._roll(g, _today())
+        return _evaluate(g, sym, side, notional_usd, risk_usd)
+
+    def session_state(self) -> Dict[str, Any]:
+        """
+        Same shape as the legacy state/session_guard.json.
+        """
+        g, _ = self._read()
+        g = list(g)
+        if g[1] != _today():
+            self._roll(g, _today())
+        day = str(g[1])
+        return {
+            "day": f"{day[:4]}-{day[4:6]}-{day[6:]}",
+            "trades_today": g[2],
+            "opens_today": g[3],
+            "wins_today": g[4],
+            "losses_today": g[5],
+            "breakeven_today": g[6],
+            "loss_streak": g[7],
+            "win_streak": g[8],
+            "realized_today": round(g[13], 6),
+            "last_update_ts": int(time.time()),
+        }
+
+    def snapshot(self, include_trades: bool = False) -> Dict[str, Any]:
+        g, _ = self._read()
+        out: Dict[str, Any] = dict(zip(_G_FIELDS, g))
+        out["session"] = self.session_state()
+        syms: Dict[str, Any] = {}
+        mm = self._mm
+        for i in range(self.nsymbols):
+            o = self._sym_base + i * _SYM_SIZE
+            name, ln, sn, r, c = _SYM.unpack_from(mm, o)
+            if c or ln or sn:
+                syms[name.rstrip(b"\x00").decode("utf-8", "replace")] = {
+                    "long_notional": ln, "short_notional": sn, "risk": r, "open_count": c,
+                }
+        out["symbols"] = syms
+        if include_trades:
+            trades = []
+            for i in range(self.ntrades):
+                o = self._trade_base + i * _TRADE_SIZE
+                if mm[o] != 1:
+                    continue
+                _st, sign, tid, acct, sym, n, r, t = _TRADE.unpack_from(mm, o)
+                trades.append({
+                    "trade_id": tid.rstrip(b"\x00").decode("utf-8", "replace"),
+                    "account_label": acct.rstrip(b"\x00").decode("utf-8", "replace"),
+                    "symbol": sym.rstrip(b"\x00").decode("utf-8", "replace"),
+                    "side": "Buy" if sign > 0 else "Sell",
+                    "notional": n, "risk": r, "opened_ms": t,
+                })
+            out["trades"] = trades
+        return out
+
+    # ---------- journal ----------
+
+    def _journal(self, g: List[Any], rec: Dict[str, Any]) -> None:
+        """
+        Append one applied mutation. Caller holds the file lock, so lines
+        land in the order the ledger applied them, across processes. The
+        path is opened per write: compaction may have replaced the file.
+        """
+        path = self.journal_path
+        if path is None:
+            return
+        try:
+            fd = os.open(str(path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, orjson.dumps(rec) + b"\n")
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if JOURNAL_COMPACT_BYTES > 0 and size > JOURNAL_COMPACT_BYTES:
+            try:
+                self._compact_journal(g)
+            except Exception:
+                pass
+
+    def _compact_journal(self, g: List[Any]) -> None:
+        """
+        Replace the journal with the current state (caller holds the file
+        lock; g is the in-flight globals): one open record per live trade, then a "state" record that
+        restores today's session counters over what the opens added.
+        """
+        path = self.journal_path
+        if path is None:
+            return
+        mm = self._mm
+        lines: List[bytes] = []
+        for i in range(self.ntrades):
+            o = self._trade_base + i * _TRADE_SIZE
+            if mm[o] != 1:
+                continue
+            _st, sign, tid, acct, sym, n, r, t = _TRADE.unpack_from(mm, o)
+            lines.append(orjson.dumps({
+                "op": "open", "trade_id": tid.rstrip(b"\x00").decode("utf-8", "replace"),
+                "account": acct.rstrip(b"\x00").decode("utf-8", "replace"),
+                "symbol": sym.rstrip(b"\x00").decode("utf-8", "replace"),
+                "side": sign, "notional": n, "risk": r, "ts_ms": t,
+            }))
+        lines.append(orjson.dumps({
+            "op": "state", "ts_ms": _now_ms(), "day": g[1], "trades_today": g[2], "opens_today": g[3],
+            "wins": g[4], "losses": g[5], "breakeven": g[6], "loss_streak": g[7], "win_streak": g[8],
+            "realized_today": g[13],
+        }))
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            f.write(b"\n".join(lines) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None or self.journal_path is None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="exposure-ledger-journal", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(JOURNAL_FLUSH_SEC):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def flush(self) -> None:
+        """
+        Re-export session_guard.json if a result changed it.
+        """
+        with self._lock:
+            session_dirty, self._session_dirty = self._session_dirty, False
+        if session_dirty and self.session_json_path is not None:
+            path = self.session_json_path
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(orjson.dumps(self.session_state(), option=orjson.OPT_INDENT_2))
+            os.replace(tmp, path)
+
+    def _replay_journal(self) -> None:
+        path = self.journal_path
+        if path is None or not path.exists():
+            return
+        n = 0
+        with self._write(roll=False) as g:
+            with path.open("rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        rec = orjson.loads(line)
+                    except Exception:
+                        continue
+                    if not isinstance(rec, dict):
+                        continue
+                    day = int(rec["day"]) if rec.get("op") == "state" else _day_of(int(rec.get("ts_ms") or 0))
+                    if day > g[1]:
+                        self._roll(g, day)
+                    try:
+                        self._apply(g, rec)
+                        n += 1
+                    except Exception:
+                        continue
+            if g[1] != _today():
+                self._roll(g, _today())
+        self.replayed = n
+
+    def close(self) -> None:
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception:
+            pass
+        try:
+            self._mm.close()
+        finally:
+            os.close(self._fd)
+
+
+def _evaluate(g: Any, sym: Optional[Tuple[Any, ...]], side: Any, notional: float, risk: float) -> Tuple[bool, str]:
+    """
+    Cap decision over one consistent read of the globals + the symbol slot.
+    """
+    if MAX_LOSS_STREAK > 0 and g[7] >= MAX_LOSS_STREAK:
+        return False, "session_loss_streak"
+    if MAX_TRADES_PER_DAY > 0 and max(g[2], g[3]) >= MAX_TRADES_PER_DAY:
+        return False, "session_max_trades"
+    if MAX_TOTAL_RISK_USD > 0 and g[10] + risk > MAX_TOTAL_RISK_USD:
+        return False, "total_risk_above_cap"
+    if MAX_SYMBOL_NOTIONAL_USD > 0:
+        cur = (sym[1] + sym[2]) if sym is not None else 0.0
+        if cur + notional > MAX_SYMBOL_NOTIONAL_USD:
+            return False, "symbol_notional_above_cap"
+    if MAX_IMBALANCE_USD > 0 and notional > 0:
+        imb = g[11] - g[12]
+        new = imb + notional * _side_sign(side)
+        if abs(new) > MAX_IMBALANCE_USD and abs(new) > abs(imb):
+            return False, "direction_imbalance_above_cap"
+    return True, "ok"
+
+
+# ---------------------------------------------------------------------------
+# Module-level API (one ledger per process)
+# ---------------------------------------------------------------------------
+
+_LEDGER: Optional[ExposureLedger] = None
+_LEDGER_LOCK = threading.Lock()
+
+
+def _flush_at_exit() -> None:
+    led = _LEDGER
+    if led is not None and led._pid == os.getpid():
+        try:
+            led.flush()
+        except Exception:
+            pass
+
+
+def get_ledger() -> ExposureLedger:
+    global _LEDGER
+    led = _LEDGER
+    if led is None or led._pid != os.getpid():
+        with _LEDGER_LOCK:
+            if _LEDGER is None or _LEDGER._pid != os.getpid():
+                first = _LEDGER is None
+                _LEDGER = ExposureLedger()
+                if first:
+                    atexit.register(_flush_at_exit)
+            led = _LEDGER
+    return led
+
+
+def check_open(symbol: str, side: Any, notional_usd: float = 0.0, risk_usd: float = 0.0) -> Tuple[bool, str]:
+    return get_ledger().check_open(str(symbol).upper(), side, float(notional_usd or 0.0), float(risk_usd or 0.0))
+
+
+def reserve_open(trade_id: str, symbol: str, side: Any, notional_usd: float, risk_usd: float,
+                 account_label: str = "") -> Tuple[bool, str]:
+    return get_ledger().reserve_open(trade_id, symbol, side, notional_usd, risk_usd, account_label)
+
+
+def record_open(trade_id: str, symbol: str, side: Any, notional_usd: float, risk_usd: float,
+                account_label: str = "") -> bool:
+    return get_ledger().record_open(trade_id, symbol, side, notional_usd, risk_usd, account_label)
+
+
+def release(trade_id: str) -> bool:
+    return get_ledger().release(trade_id)
+
+
+def update_open(trade_id: str, notional_usd: Optional[float] = None, risk_usd: Optional[float] = None) -> bool:
+    return get_ledger().update_open(trade_id, notional_usd, risk_usd)
+
+
+def record_close(trade_id: str, result: Optional[str] = None, pnl_usd: Optional[float] = None) -> bool:
+    return get_ledger().record_close(trade_id, result, pnl_usd)
+
+
+def close_symbol(account_label: str, symbol: str, pnl_usd: Optional[float] = None) -> int:
+    return get_ledger().close_symbol(account_label, symbol, pnl_usd)
+
+
+def register_result(result: str, pnl_usd: Optional[float] = None) -> None:
+    get_ledger().register_result(result, pnl_usd)
+
+
+def session_state() -> Dict[str, Any]:
+    return get_ledger().session_state()
+
+
+def snapshot(include_trades: bool = False) -> Dict[str, Any]:
+    return get_ledger().snapshot(include_trades=include_trades)
+
+
+if __name__ == "__main__":
+    print(orjson.dumps(snapshot(include_trades=True), option=orjson.OPT_INDENT_2).decode("utf-8"))
@@ -21,7 +21,7 @@ import orjson
 from dotenv import load_dotenv
 
 # NEW: notifier + subs for transfer notifications
-from app.core.notifier_bot import get_notifier
+from app.core.notifier_bot import get_notifier, tg_enqueue, TG_ASYNC
 from app.core.subs import all_subs as load_subs
 
 # Optional: WS-first market bus (orderbook + trades, fed by ws_switchboard)
@@ -33,6 +33,15 @@ except Exception:
 # --------- Load .env ----------
 load_dotenv()
 
+# Optional: WS-fed wallet/equity snapshot (fed by ws_switchboard)
+try:
+    from app.core import wallet_bus as _wallet_bus  # type: ignore
+except Exception:
+    _wallet_bus = None  # type: ignore
+
+# Serve get_equity_usdt / get_mmr_pct from the wallet bus (REST only when stale)
+WALLET_BUS_ENABLED: bool = os.getenv("WALLET_BUS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+
 # --------- Label / account context ----------
 ACCOUNT_LABEL: str = os.getenv("ACCOUNT_LABEL", "main").strip() or "main"
 
@@ -245,9 +254,13 @@ SWEEP_CUTOFF_HHMM = os.getenv("SWEEP_CUTOFF_HHMM", "23:59")
 HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "12"))
 RETRY_BACKOFFS = [0.5, 1.0, 2.0]  # seconds
 
-# Heartbeat file for bot liveness tracking
+# Heartbeat file for bot liveness tracking. Beats go to the shared-memory
+# registry (app.core.heartbeat_registry); HEARTBEAT_FILE is a periodic JSON
+# export of it for older readers (0 disables the export).
 HEARTBEAT_FILE = os.getenv("HEARTBEAT_FILE", ".state/heartbeats.json")
+HEARTBEAT_JSON_EXPORT_SEC = float(os.getenv("HEARTBEAT_JSON_EXPORT_SEC", "5"))
 _HEARTBEAT_LOCK = threading.Lock()
+_HEARTBEAT_LAST_EXPORT = [0.0]
 
 # Error de-duplication state for alert_bot_error
 _ERROR_LAST: Dict[str, Tuple[str, float]] = {}
@@ -354,6 +367,9 @@ def send_tg(text: str, *, label: str = None, main: bool = False) -> None:
       - Falls back to default notifier or main bot
       - Rate limited
       - Never raises (network/TG issues are swallowed)
+      - With TG_ASYNC (default) the message goes to notifier_bot's background
+        dispatcher (batched, coalesced, token-bucketed) and this returns
+        immediately; the 30s process cap only applies to the sync path.
     """
 
     # Determine token/chat based on label
@@ -405,6 +421,10 @@ def send_tg(text: str, *, label: str = None, main: bool = False) -> None:
     if not token or not chat:
         return
 
+    if TG_ASYNC:
+        tg_enqueue(token, chat, text)
+        return
+
     # Rate limit
     if _tg_rate_limited():
         return
@@ -449,8 +469,25 @@ def alert_bot_error(bot_name: str, error: Any, severity: str = "WARN") -> None:
 
 def record_heartbeat(bot_name: str) -> None:
     """
-    Record a lightweight heartbeat for a bot into HEARTBEAT_FILE.
+    Record a lightweight heartbeat for a bot in the shared-memory heartbeat
+    registry, exporting HEARTBEAT_FILE at most every HEARTBEAT_JSON_EXPORT_SEC.
+
+    Falls back to rewriting HEARTBEAT_FILE directly if the registry can't be
+    opened.
     """
+    try:
+        from app.core import heartbeat_registry
+
+        heartbeat_registry.beat(str(bot_name))
+        if HEARTBEAT_JSON_EXPORT_SEC > 0:
+            now = time.monotonic()
+            if now - _HEARTBEAT_LAST_EXPORT[0] >= HEARTBEAT_JSON_EXPORT_SEC:
+                _HEARTBEAT_LAST_EXPORT[0] = now
+                heartbeat_registry.export_json(Path(HEARTBEAT_FILE))
+        return
+    except Exception:
+        pass
+
     try:
         path = Path(HEARTBEAT_FILE)
         path.parent.mkdir(parents=True, exist_ok=True)
@@ -715,6 +752,9 @@ def get_equity_usdt() -> Decimal:
     """
     Robust unified-account equity fetcher.
 
+    Served from the WS-fed wallet bus (app.core.wallet_bus); REST is only hit,
+    single-flight, when the snapshot is older than WALLET_BUS_MAX_AGE_SEC.
+
     DRY-RUN behavior:
       - If EQUITY_OVERRIDE_USDT is set â†’ always returns that.
       - If EXEC_DRY_RUN=true and live fetch fails/returns 0 â†’ returns DRY_EQUITY_USDT.
@@ -726,6 +766,19 @@ def get_equity_usdt() -> Decimal:
         except Exception:
             pass
 
+    if WALLET_BUS_ENABLED and _wallet_bus is not None:
+        try:
+            total = _wallet_bus.get_equity_usdt(ACCOUNT_LABEL)
+        except Exception:
+            total = None
+        if total is not None:
+            if total <= 0 and EXEC_DRY_RUN:
+                return DRY_EQUITY_USDT if DRY_EQUITY_USDT > 0 else Decimal("0")
+            return total if total > 0 else Decimal("0")
+        if EXEC_DRY_RUN:
+            return DRY_EQUITY_USDT if DRY_EQUITY_USDT > 0 else Decimal("0")
+        return Decimal("0")
+
     try:
         res = bybit_get("/v5/account/wallet-balance", {"accountType": "UNIFIED"})
     except Exception:
@@ -770,6 +823,13 @@ def get_mmr_pct() -> Decimal:
     if EXEC_DRY_RUN:
         return Decimal("0")
 
+    if WALLET_BUS_ENABLED and _wallet_bus is not None:
+        try:
+            v = _wallet_bus.get_mmr_pct(ACCOUNT_LABEL)
+        except Exception:
+            v = None
+        return v if v is not None else Decimal("0")
+
     try:
         res = bybit_get("/v5/account/wallet-balance", {"accountType": "UNIFIED"})
     except Exception:
@@ -1182,7 +1242,7 @@ def cancel_all(symbol: str) -> None:
     bybit_post("/v5/order/cancel-all", {"category": "linear", "symbol": symbol})
 
 
-def place_reduce_tp(
+def reduce_tp_request(
     symbol: str,
     side_now: str,
     qty: Decimal,
@@ -1190,9 +1250,9 @@ def place_reduce_tp(
     *,
     link_id: Optional[str] = None,
 ) -> Dict[str, Any]:
+    """Reduce-only TP limit order body (no category), usable single or batched."""
     tp_side = "Sell" if side_now.lower() == "buy" else "Buy"
-    body = {
-        "category": "linear",
+    body: Dict[str, Any] = {
         "symbol": symbol,
         "side": tp_side,
         "orderType": "Limit",
@@ -1202,9 +1262,71 @@ def place_reduce_tp(
     }
     if link_id:
         body["orderLinkId"] = link_id
+    return body
+
+
+def place_reduce_tp(
+    symbol: str,
+    side_now: str,
+    qty: Decimal,
+    price: Decimal,
+    *,
+    link_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    body = {"category": "linear", **reduce_tp_request(symbol, side_now, qty, price, link_id=link_id)}
     return bybit_post("/v5/order/create", body)
 
 
+# Max requests per v5 batch call (linear allows more; 10 is valid for every category)
+BATCH_ORDER_MAX: int = max(1, int(os.getenv("BYBIT_BATCH_ORDER_MAX", "10")))
+
+_BATCH_PATHS: Dict[str, str] = {
+    "create": "/v5/order/create-batch",
+    "amend": "/v5/order/amend-batch",
+    "cancel": "/v5/order/cancel-batch",
+}
+
+
+def bybit_batch(
+    action: str,
+    reqs: List[Dict[str, Any]],
+    category: str = "linear",
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Send create/amend/cancel order requests through the v5 batch endpoints,
+    BATCH_ORDER_MAX per call.
+
+    Returns (results, http_requests). results has one entry per request, in
+    order: {"code", "msg", "orderId", "orderLinkId"}; code 0 means accepted.
+    A chunk that fails as a whole marks its items with code -1 instead of
+    raising, so one bad chunk doesn't hide the others.
+    """
+    path = _BATCH_PATHS[action]
+    out: List[Dict[str, Any]] = []
+    calls = 0
+    for i in range(0, len(reqs), BATCH_ORDER_MAX):
+        chunk = reqs[i:i + BATCH_ORDER_MAX]
+        calls += 1
+        try:
+            res = bybit_post(path, {"category": category, "request": chunk})
+        except Exception as e:
+            out.extend({"code": -1, "msg": str(e), "orderId": "", "orderLinkId": r.get("orderLinkId", "")}
+                       for r in chunk)
+            continue
+        rows = (res.get("result") or {}).get("list") or []
+        infos = (res.get("retExtInfo") or {}).get("list") or []
+        for j, r in enumerate(chunk):
+            row = rows[j] if j < len(rows) and isinstance(rows[j], dict) else {}
+            info = infos[j] if j < len(infos) and isinstance(infos[j], dict) else {}
+            out.append({
+                "code": int(info.get("code", 0) or 0),
+                "msg": str(info.get("msg", "") or ""),
+                "orderId": str(row.get("orderId") or r.get("orderId") or ""),
+                "orderLinkId": str(row.get("orderLinkId") or r.get("orderLinkId") or ""),
+            })
+    return out, calls
+
+
 def _base_tp_delta(symbol: str, entry_px: Decimal) -> Decimal:
     tick, _, _ = get_ticks(symbol)
     a = atr14(symbol, interval="60", limit=120)
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — Cross-process heartbeat / liveness registry (mmap)
+
+A fixed-slot table in a memory-mapped file (state/heartbeats.shm) shared by
+every process on the host:
+
+    worker name -> pid, last beat (ms), beat count, progress counter, started_ms
+
+Writers
+-------
+beat(name) touches only its own slot: no file read/parse/rewrite, no
+cross-process lock. Slots are keyed by (name, pid), so every slot has
+exactly one writing process (threads of that process serialize on a local
+lock). Each slot is guarded by a seqlock (counter goes odd while a write is
+in progress, even when done), so readers never see a torn record. A file
+lock is taken only the first time a process claims a slot for a name; a
+slot whose owner has died is reused by the next process beating that name.
+
+Readers
+-------
+read_heartbeats()        -> {name: {...}} newest writer per name, with
+                            "writers": [pid, ...] of every slot for it
+get_heartbeat(name)      -> {...} | None  (same merge)
+stale_workers(max_age)   -> [name, ...]
+export_json(path)        -> legacy {name: unix_sec} JSON, written atomically
+
+Env
+---
+HEARTBEAT_SHM_PATH   default: <ROOT>/state/heartbeats.shm
+HEARTBEAT_SLOTS      default: 256 (fixed when the file is created)
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from app.ops.file_lock import fd_lock
+
+try:
+    from app.ops.proc_supervisor import pid_alive as _owner_alive
+except Exception:  # pragma: no cover
+    _owner_alive = None  # type: ignore
+
+ROOT = Path(__file__).resolve().parents[2]
+SHM_PATH = Path(os.getenv("HEARTBEAT_SHM_PATH", str(ROOT / "state" / "heartbeats.shm")))
+NSLOTS = int(os.getenv("HEARTBEAT_SLOTS", "256"))
+
+_MAGIC = b"FBHB0001"
+_HDR = struct.Struct("<8sIII")  # magic, version, nslots, slot_size
+_HDR_SIZE = 64
+_SLOT_SIZE = 128
+_NAME_MAX = 64
+
+# seq, pid, ts_ms, beats, progress, started_ms, name_len
+_SLOT = struct.Struct("<QqqQQqH")
+_SEQ = struct.Struct("<Q")
+# everything after seq; writers pack only this (pack_into zero-fills its target first)
+_BODY = struct.Struct("<qqQQqH")
+_NAME_OFF = 64
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class HeartbeatRegistry:
+    def __init__(self, path: Path = SHM_PATH, nslots: int = NSLOTS) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        with fd_lock(self._fd):
+            size = os.fstat(self._fd).st_size
+            if size < _HDR_SIZE:
+                total = _HDR_SIZE + nslots * _SLOT_SIZE
+                os.ftruncate(self._fd, total)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, _HDR.pack(_MAGIC, 1, nslots, _SLOT_SIZE))
+            self._mm = mmap.mmap(self._fd, 0)
+        magic, _ver, n, slot_size = _HDR.unpack_from(self._mm, 0)
+        if magic != _MAGIC or slot_size != _SLOT_SIZE:
+            raise RuntimeError(f"heartbeat registry {self.path} has an unknown layout")
+        self.nslots = int(n)
+        self._slots: Dict[str, int] = {}
+        self._claim_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pid = os.getpid()
+
+    # ---------- slots ----------
+
+    def _off(self, i: int) -> int:
+        return _HDR_SIZE + i * _SLOT_SIZE
+
+    def _slot_head(self, off: int) -> Tuple[Optional[bytes], int]:
+        """
+        (name, pid) of a slot, read under its seqlock: struct.pack_into zeroes
+        the record before packing, so an unsynchronized read during a beat
+        can see name_len == 0 and mistake a live slot for a free one.
+        """
+        mm = self._mm
+        name: Optional[bytes] = None
+        pid = 0
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline:
+            s1 = _SEQ.unpack_from(mm, off)[0]
+            if s1 % 2:
+                time.sleep(0)  # writer preempted mid-beat
+                continue
+            (pid,) = struct.unpack_from("<q", mm, off + 8)
+            (n,) = struct.unpack_from("<H", mm, off + 48)
+            name = bytes(mm[off + _NAME_OFF : off + _NAME_OFF + n]) if n else None
+            if _SEQ.unpack_from(mm, off)[0] == s1:
+                return name, pid
+        # odd seq left by a writer that died mid-write: take what is there
+        (pid,) = struct.unpack_from("<q", mm, off + 8)
+        (n,) = struct.unpack_from("<H", mm, off + 48)
+        return (bytes(mm[off + _NAME_OFF : off + _NAME_OFF + n]) if n else None), pid
+
+    def _slot_name(self, off: int) -> Optional[bytes]:
+        return self._slot_head(off)[0]
+
+    def _iter_named(self, key: bytes) -> Iterator[int]:
+        # every slot on key's probe chain holding key (chains never shrink)
+        start = zlib.crc32(key) % self.nslots
+        for k in range(self.nslots):
+            off = self._off((start + k) % self.nslots)
+            cur = self._slot_name(off)
+            if cur is None:
+                return
+            if cur == key:
+                yield off
+
+    def _slot_for(self, name: str) -> int:
+        """
+        This process's slot for name: one it already owns, else one whose
+        owner is dead, else the first free slot on the probe chain.
+        """
+        off = self._slots.get(name)
+        if off is not None:
+            return off
+        key = name.encode("utf-8")[:_NAME_MAX]
+        start = zlib.crc32(key) % self.nslots
+        with self._claim_lock, fd_lock(self._fd):
+            reuse: Optional[int] = None
+            for k in range(self.nslots):
+                o = self._off((start + k) % self.nslots)
+                cur, pid = self._slot_head(o)
+                if cur == key:
+                    if pid == self._pid:
+                        break
+                    if reuse is None and _owner_dead(pid):
+                        reuse = o
+                    continue
+                if cur is None:
+                    o = reuse if reuse is not None else o
+                    self._claim(o, key)
+                    break
+            else:
+                if reuse is None:
+                    raise RuntimeError(f"heartbeat registry full ({self.nslots} slots)")
+                o = reuse
+                self._claim(o, key)
+        self._slots[name] = o
+        return o
+
+    def _claim(self, off: int, key: bytes) -> None:
+        # Caller holds the file lock. ts_ms=0 keeps the slot invisible until the first beat.
+        seq = _SEQ.unpack_from(self._mm, off)[0]
+        base = seq + (seq & 1)
+        _SEQ.pack_into(self._mm, off, base + 1)
+        self._mm[off + 8 : off + _SLOT_SIZE] = b"\x00" * (_SLOT_SIZE - 8)
+        self._mm[off + _NAME_OFF : off + _NAME_OFF + len(key)] = key
+        _BODY.pack_into(self._mm, off + 8, self._pid, 0, 0, 0, _now_ms(), len(key))
+        _SEQ.pack_into(self._mm, off, base + 2)
+
+    # ---------- write ----------
+
+    def beat(self, name: str, progress: Optional[int] = None, add_progress: int = 0) -> None:
+        """
+        Record a heartbeat for `name` from this process. `progress` sets the
+        progress counter; `add_progress` increments it.
+        """
+        off = self._slot_for(str(name))
+        mm = self._mm
+        with self._write_lock:
+            seq, _pid, _ts, beats, prog, started, nlen = _SLOT.unpack_from(mm, off)
+            if progress is not None:
+                prog = int(progress)
+            prog += int(add_progress)
+            # An odd seq left behind by a writer that died mid-write is rounded up.
+            base = seq + (seq & 1)
+            _SEQ.pack_into(mm, off, base + 1)
+            _BODY.pack_into(mm, off + 8, self._pid, _now_ms(), beats + 1, prog, started, nlen)
+            _SEQ.pack_into(mm, off, base + 2)
+
+    # ---------- read ----------
+
+    def _read_slot(self, off: int) -> Optional[Dict[str, Any]]:
+        mm = self._mm
+        for _ in range(100):
+            s1 = _SEQ.unpack_from(mm, off)[0]
+            if s1 % 2:
+                continue
+            _seq, pid, ts_ms, beats, prog, started, nlen = _SLOT.unpack_from(mm, off)
+            name = bytes(mm[off + _NAME_OFF : off + _NAME_OFF + nlen]) if nlen else b""
+            if _SEQ.unpack_from(mm, off)[0] == s1:
+                if not name or ts_ms == 0:
+                    return None
+                return {
+                    "name": name.decode("utf-8", "replace"),
+                    "pid": pid,
+                    "ts_ms": ts_ms,
+                    "beats": beats,
+                    "progress": prog,
+                    "started_ms": started,
+                }
+        return None
+
+    @staticmethod
+    def _merge(rows: List[Dict[str, Any]], now: int) -> Dict[str, Any]:
+        # newest writer wins; every writer's pid is listed
+        row = dict(max(rows, key=lambda r: r["ts_ms"]))
+        row.pop("name", None)
+        row["writers"] = sorted(r["pid"] for r in rows)
+        row["age_sec"] = round((now - row["ts_ms"]) / 1000.0, 3)
+        row["pid_alive"] = _pid_alive(row["pid"])
+        return row
+
+    def read_all(self) -> Dict[str, Dict[str, Any]]:
+        now = _now_ms()
+        by_name: Dict[str, List[Dict[str, Any]]] = {}
+        for i in range(self.nslots):
+            row = self._read_slot(self._off(i))
+            if row is not None:
+                by_name.setdefault(row["name"], []).append(row)
+        return {n: self._merge(rows, now) for n, rows in by_name.items()}
+
+    def read_writers(self, name: str) -> List[Dict[str, Any]]:
+        """
+        One row per (name, pid) slot, unmerged.
+        """
+        key = str(name).encode("utf-8")[:_NAME_MAX]
+        rows = [self._read_slot(off) for off in self._iter_named(key)]
+        return [r for r in rows if r is not None]
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        rows = self.read_writers(name)
+        return self._merge(rows, _now_ms()) if rows else None
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+        finally:
+            os.close(self._fd)
+
+
+def _owner_dead(pid: int) -> bool:
+    # only a definite "gone" frees a slot; unknown keeps it
+    if pid <= 0:
+        return True
+    if _owner_alive is not None:
+        try:
+            return not _owner_alive(pid)
+        except Exception:
+            return False
+    return _pid_alive(pid) is False
+
+
+def _pid_alive(pid: int) -> Optional[bool]:
+    if pid <= 0:
+        return None
+    if os.name == "nt":
+        return None  # os.kill(pid, 0) terminates on Windows; don't probe
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except Exception:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Module-level API (one registry per process)
+# ---------------------------------------------------------------------------
+
+_REG: Optional[HeartbeatRegistry] = None
+_REG_LOCK = threading.Lock()
+
+
+def get_registry() -> HeartbeatRegistry:
+    global _REG
+    reg = _REG
+    if reg is None or reg._pid != os.getpid():
+        with _REG_LOCK:
+            if _REG is None or _REG._pid != os.getpid():
+                _REG = HeartbeatRegistry()
+            reg = _REG
+    return reg
+
+
+def beat(name: str, progress: Optional[int] = None, add_progress: int = 0) -> None:
+    get_registry().beat(name, progress=progress, add_progress=add_progress)
+
+
+def read_heartbeats() -> Dict[str, Dict[str, Any]]:
+    return get_registry().read_all()
+
+
+def get_heartbeat(name: str) -> Optional[Dict[str, Any]]:
+    return get_registry().get(name)
+
+
+def stale_workers(max_age_sec: float, names: Optional[List[str]] = None) -> List[str]:
+    """
+    Names whose last beat is older than max_age_sec (or whose pid is gone).
+    If `names` is given, names never seen are reported stale too.
+    """
+    rows = read_heartbeats()
+    out: List[str] = []
+    for n in names if names is not None else list(rows):
+        r = rows.get(n)
+        if r is None or r["age_sec"] > max_age_sec or r["pid_alive"] is False:
+            out.append(n)
+    return out
+
+
+def export_json(path: Path) -> None:
+    """
+    Write the legacy {name: unix_sec} heartbeat file atomically.
+    """
+    data = {n: int(r["ts_ms"] // 1000) for n, r in read_heartbeats().items()}
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(orjson.dumps(data))
+    os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    for n, r in sorted(read_heartbeats().items()):
+        print(f"{n:<40} pid={r['pid']:<7} age={r['age_sec']:>9.1f}s beats={r['beats']:<8} progress={r['progress']} alive={r['pid_alive']}")
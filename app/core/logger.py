@@ -6,18 +6,68 @@ Flashback — Logging Core
 Provides:
     - get_logger(name)  -> configured logger
     - bind_context(logger, **ctx) -> LoggerAdapter that injects context fields
+    - set_sampling(name, rate) -> keep ~rate of a chatty logger's sub-WARNING records
+    - logging_stats() -> queue / drop / sampling counters
 
 All logs go to:
     - stdout
-    - logs/flashback.log (rotated manually by you if needed)
+    - logs/flashback.log   (or logs/flashback.jsonl with LOG_JSON=true)
+
+Pipeline
+--------
+Loggers only see a QueueHandler: the calling thread enqueues the record and
+returns. One QueueListener thread does formatting and all I/O. Messages whose
+args are plain immutables (str/int/float/bool/None/Decimal) are formatted on
+the listener too; anything else is rendered in the caller so later mutation
+can't change what gets logged. The queue is bounded; when full, DEBUG/INFO
+records are dropped and counted rather than blocking a trading loop.
+WARNING+ is never dropped: it waits up to LOG_QUEUE_BLOCK_MS for room and
+is otherwise written by the caller straight to the sinks.
+
+The file sink rotates on size (LOG_FILE_MAX_MB) and at local midnight
+(LOG_ROTATE_DAILY), keeping LOG_FILE_BACKUPS files.
+
+With LOG_JSON=true the file sink writes one compact JSON object per line:
+    {"ts": 1700000000.123, "lvl": "INFO", "logger": "executor_v2",
+     "msg": "...", <bind_context / extra fields>, "exc": "..."}
+
+Env
+---
+LOG_LEVEL            default INFO
+LOG_ASYNC            default true (false = handlers run in the caller, as before)
+LOG_QUEUE_MAX        default 20000
+LOG_QUEUE_BLOCK_MS   default 100 (WARNING+ wait for room in a full queue)
+LOG_FILE_MAX_MB      default 50 (0 = no size rotation)
+LOG_FILE_BACKUPS     default 10
+LOG_ROTATE_DAILY     default true
+LOG_JSON             default false
+LOG_CONSOLE          default true
+LOG_CALLER_INFO      default false (file/line/function lookup per record; the
+                     formats here don't print it, so it's skipped by default).
+                     This is process-wide (logging._srcfile and
+                     logging.logMultiprocessing): %(pathname)s, %(lineno)d,
+                     %(funcName)s and %(processName)s stop being filled for
+                     every logger, third-party handlers included. Set it to
+                     true in a process whose handlers print them.
+LOG_SAMPLE           e.g. "executor_v2=0.1,tp_sl_manager=0.05" (per-logger
+                     keep rate for DEBUG/INFO; WARNING+ is never sampled)
 """
 
 from __future__ import annotations
 
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
+import time
+from decimal import Decimal
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+
+import orjson
 
 # Try to get ROOT from config, otherwise infer from this file
 try:
@@ -41,48 +91,383 @@ def _resolve_root() -> Path:
     return Path(__file__).resolve().parents[2]
 
 
+def _env_bool(name: str, default: bool) -> bool:
+    v = os.getenv(name)
+    if v is None:
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
 ROOT: Path = _resolve_root()
 LOG_DIR: Path = ROOT / "logs"
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 LOG_FILE = LOG_DIR / "flashback.log"
+LOG_JSON_FILE = LOG_DIR / "flashback.jsonl"
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper() or "INFO"
+LOG_ASYNC = _env_bool("LOG_ASYNC", True)
+LOG_QUEUE_MAX = _env_int("LOG_QUEUE_MAX", 20000)
+LOG_QUEUE_BLOCK_MS = _env_int("LOG_QUEUE_BLOCK_MS", 100)
+LOG_FILE_MAX_MB = _env_int("LOG_FILE_MAX_MB", 50)
+LOG_FILE_BACKUPS = _env_int("LOG_FILE_BACKUPS", 10)
+LOG_ROTATE_DAILY = _env_bool("LOG_ROTATE_DAILY", True)
+LOG_JSON = _env_bool("LOG_JSON", False)
+LOG_CONSOLE = _env_bool("LOG_CONSOLE", True)
+LOG_CALLER_INFO = _env_bool("LOG_CALLER_INFO", False)
 
-def _configure_root_logger() -> None:
+_TEXT_FMT = "%(asctime)s [%(levelname)s] [%(name)s] %(message)s"
+
+# LogRecord attributes that are not user/context fields
+_STD_ATTRS = frozenset(
+    logging.LogRecord("x", logging.INFO, "x", 0, "x", None, None).__dict__.keys()
+) | {"message", "asctime", "taskName"}
+
+_IMMUTABLE = (str, int, float, bool, type(None), Decimal, bytes)
+
+_STATS: Dict[str, int] = {"enqueued": 0, "dropped": 0, "sampled_out": 0, "blocked": 0, "inline": 0}
+_LISTENER: Optional[logging.handlers.QueueListener] = None
+_CONF_LOCK = threading.RLock()
+# arguments of the last configure_logging(), re-applied in forked children
+_EFFECTIVE: Dict[str, bool] = {}
+
+
+# ---------- sinks ----------
+
+class _SizeAndDailyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that also rolls over at local midnight.
     """
-    Configure the root logger once.
 
-    We only attach handlers a single time to avoid duplicate log lines
-    whenever modules re-import this file.
+    def __init__(self, filename: Path, max_bytes: int, backups: int, daily: bool) -> None:
+        super().__init__(str(filename), maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        self.daily = daily
+        self._next_roll = self._compute_next_roll()
+
+    @staticmethod
+    def _compute_next_roll() -> float:
+        lt = time.localtime()
+        return time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:  # noqa: N802 (logging API)
+        if self.daily and record.created >= self._next_roll:
+            return 1
+        if self.maxBytes > 0:
+            return super().shouldRollover(record)
+        return 0
+
+    def doRollover(self) -> None:  # noqa: N802 (logging API)
+        if self.backupCount <= 0:
+            # RotatingFileHandler only truncates-by-rename when backups exist;
+            # keep one backup so daily rollover still starts a fresh file.
+            self.backupCount = 1
+        super().doRollover()
+        self._next_roll = self._compute_next_roll()
+
+
+class JsonLinesFormatter(logging.Formatter):
     """
-    root = logging.getLogger()
-    # Use a custom flag to avoid double configuration
-    if getattr(root, "_flashback_configured", False):  # type: ignore[attr-defined]
-        return
+    Compact JSON object per record, including bind_context / extra fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "lvl": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for k, v in record.__dict__.items():
+            if k not in _STD_ATTRS and not k.startswith("_"):
+                out[k] = v
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return orjson.dumps(out, default=str).decode("utf-8")
+
+
+# ---------- queue front ----------
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue without blocking; defer message formatting when that is safe.
+    A full queue drops DEBUG/INFO only: WARNING+ waits briefly for room,
+    then goes straight to the sinks from the calling thread.
+    """
+
+    def __init__(self, q: "queue.Queue[Any]", sinks: Any = ()) -> None:
+        super().__init__(q)
+        self.sinks = list(sinks)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            _STATS["enqueued"] += 1
+            return
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                _STATS["dropped"] += 1
+                return
+        _STATS["blocked"] += 1
+        try:
+            self.queue.put(record, timeout=max(0, LOG_QUEUE_BLOCK_MS) / 1000.0)
+            _STATS["enqueued"] += 1
+            return
+        except queue.Full:
+            pass
+        # listener stuck or far behind: write it here (sink locks serialize with the listener)
+        _STATS["inline"] += 1
+        for h in self.sinks:
+            if record.levelno >= h.level:
+                h.handle(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Tracebacks reference live frames: render them now.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if not isinstance(record.msg, str):
+            record.msg = record.getMessage()
+            record.args = None
+        args = record.args
+        if args:
+            if isinstance(args, tuple):
+                safe = all(isinstance(a, _IMMUTABLE) for a in args)
+            elif isinstance(args, dict):
+                safe = all(isinstance(a, _IMMUTABLE) for a in args.values())
+            else:
+                safe = False
+            if not safe:
+                record.msg = record.getMessage()
+                record.args = None
+        return record
+
+
+class _SamplingFilter(logging.Filter):
+    """
+    Keep 1 of every N sub-WARNING records (deterministic, no RNG).
+    """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.set_rate(rate)
+        self._n = 0
+
+    def set_rate(self, rate: float) -> None:
+        rate = max(0.0, min(1.0, float(rate)))
+        self.rate = rate
+        self.every = 0 if rate <= 0 else max(1, int(round(1.0 / rate)))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.every == 1:
+            return True
+        if self.every == 0:
+            _STATS["sampled_out"] += 1
+            return False
+        self._n += 1
+        if self._n % self.every == 1:
+            return True
+        _STATS["sampled_out"] += 1
+        return False
 
-    root.setLevel(logging.INFO)
 
-    fmt = "%(asctime)s [%(levelname)s] [%(name)s] %(message)s"
-    formatter = logging.Formatter(fmt)
+def set_sampling(name: str, rate: float) -> None:
+    """
+    Keep roughly `rate` (0..1) of DEBUG/INFO records from logger `name`.
+    rate=1 disables sampling; WARNING and above always pass.
+    """
+    lg = logging.getLogger(name)
+    for f in lg.filters:
+        if isinstance(f, _SamplingFilter):
+            if rate >= 1.0:
+                lg.removeFilter(f)
+            else:
+                f.set_rate(rate)
+            return
+    if rate < 1.0:
+        lg.addFilter(_SamplingFilter(rate))
+
+
+def _apply_env_sampling() -> None:
+    spec = os.getenv("LOG_SAMPLE", "").strip()
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        name, _, rate = part.partition("=")
+        try:
+            set_sampling(name.strip(), float(rate))
+        except Exception:
+            pass
+
 
-    # Console handler
-    ch = logging.StreamHandler(sys.stdout)
-    ch.setLevel(logging.INFO)
-    ch.setFormatter(formatter)
-    root.addHandler(ch)
+# ---------- configuration ----------
 
-    # File handler
+def _build_sinks(json_lines: bool, console: bool) -> list:
+    level = getattr(logging, LOG_LEVEL, logging.INFO)
+    text = logging.Formatter(_TEXT_FMT)
+    sinks = []
+    if console:
+        ch = logging.StreamHandler(sys.stdout)
+        ch.setLevel(level)
+        ch.setFormatter(text)
+        sinks.append(ch)
     try:
-        fh = logging.FileHandler(LOG_FILE, encoding="utf-8")
-        fh.setLevel(logging.INFO)
-        fh.setFormatter(formatter)
-        root.addHandler(fh)
+        fh = _SizeAndDailyRotatingFileHandler(
+            LOG_JSON_FILE if json_lines else LOG_FILE,
+            max_bytes=max(0, LOG_FILE_MAX_MB) * 1024 * 1024,
+            backups=max(0, LOG_FILE_BACKUPS),
+            daily=LOG_ROTATE_DAILY,
+        )
+        fh.setLevel(level)
+        fh.setFormatter(JsonLinesFormatter() if json_lines else text)
+        sinks.append(fh)
     except Exception:
         # If file handler explodes, keep console logging only.
         pass
+    return sinks
+
+
+def _stop_listener() -> None:
+    global _LISTENER
+    lst = _LISTENER
+    _LISTENER = None
+    if lst is not None:
+        try:
+            lst.stop()  # drains the queue
+        except Exception:
+            pass
+        for h in lst.handlers:
+            try:
+                h.close()
+            except Exception:
+                pass
+
+
+def configure_logging(
+    *,
+    async_mode: Optional[bool] = None,
+    json_lines: Optional[bool] = None,
+    console: Optional[bool] = None,
+    force: bool = False,
+) -> None:
+    """
+    (Re)build the root handlers. Called implicitly by get_logger(); call it
+    directly only to override env settings (tools, benchmarks).
+    """
+    root = logging.getLogger()
+    with _CONF_LOCK:
+        if getattr(root, "_flashback_configured", False) and not force:  # type: ignore[attr-defined]
+            return
+        if force:
+            _remove_handlers(root)
+
+        _install(
+            root,
+            async_mode=LOG_ASYNC if async_mode is None else async_mode,
+            json_lines=LOG_JSON if json_lines is None else json_lines,
+            console=LOG_CONSOLE if console is None else console,
+        )
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        _apply_env_sampling()
+
+
+def _remove_handlers(root: logging.Logger) -> None:
+    _stop_listener()
+    for h in list(getattr(root, "_flashback_handlers", [])):
+        root.removeHandler(h)
+        try:
+            h.close()
+        except Exception:
+            pass
 
+
+def _install(root: logging.Logger, *, async_mode: bool, json_lines: bool, console: bool) -> None:
+    global _LISTENER
+    if not LOG_CALLER_INFO:
+        # Skips the stack walk in Logger.findCaller and the
+        # multiprocessing lookup in every LogRecord. Process-wide: no
+        # handler in this process gets pathname/lineno/funcName/
+        # processName (see LOG_CALLER_INFO in the module docstring).
+        logging._srcfile = None  # type: ignore[attr-defined]
+        logging.logMultiprocessing = False
+    sinks = _build_sinks(json_lines, console)
+    if async_mode:
+        qh = _DroppingQueueHandler(queue.Queue(maxsize=max(1, LOG_QUEUE_MAX)), sinks)
+        _LISTENER = logging.handlers.QueueListener(qh.queue, *sinks, respect_handler_level=True)
+        _LISTENER.start()
+        front = [qh]
+    else:
+        front = sinks
+    for h in front:
+        root.addHandler(h)
+    setattr(root, "_flashback_handlers", front)  # type: ignore[attr-defined]
     # Mark as configured
     setattr(root, "_flashback_configured", True)  # type: ignore[attr-defined]
+    _EFFECTIVE.clear()
+    _EFFECTIVE.update(async_mode=async_mode, json_lines=json_lines, console=console)
+
+
+def _configure_root_logger() -> None:
+    """
+    Configure the root logger once.
+
+    We only attach handlers a single time to avoid duplicate log lines
+    whenever modules re-import this file.
+    """
+    configure_logging()
+
+
+def flush_logs() -> None:
+    """
+    Drain the queue to the sinks (stops and restarts the listener).
+    """
+    with _CONF_LOCK:
+        lst = _LISTENER
+        if lst is None:
+            return
+        lst.stop()
+        for h in lst.handlers:
+            try:
+                h.flush()
+            except Exception:
+                pass
+        lst.start()
+
+
+def logging_stats() -> Dict[str, Any]:
+    out: Dict[str, Any] = dict(_STATS)
+    lst = _LISTENER
+    out["async"] = lst is not None
+    out["queue_depth"] = lst.queue.qsize() if lst is not None else 0  # type: ignore[union-attr]
+    return out
+
+
+def _after_fork_in_child() -> None:
+    # The listener thread does not survive fork(); rebuild the pipeline with
+    # the parent's settings. Root level and sampling filters live on the
+    # (copied) logger objects, so they carry over as they are.
+    global _CONF_LOCK
+    _CONF_LOCK = threading.RLock()
+    root = logging.getLogger()
+    if getattr(root, "_flashback_configured", False) and _LISTENER is not None:
+        try:
+            _remove_handlers(root)
+            _install(root, **_EFFECTIVE)
+        except Exception:
+            pass
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(_stop_listener)
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -107,11 +492,14 @@ class _ContextAdapter(logging.LoggerAdapter):
         super().__init__(logger, context)
 
     def process(self, msg, kwargs):
-        extra = kwargs.get("extra", {})
-        # Merge base context into any user-provided extra
-        merged = dict(self.extra)
-        merged.update(extra)
-        kwargs["extra"] = merged
+        extra = kwargs.get("extra")
+        if extra:
+            # Merge base context into any user-provided extra
+            merged = dict(self.extra)
+            merged.update(extra)
+            kwargs["extra"] = merged
+        else:
+            kwargs["extra"] = self.extra
         return msg, kwargs
 
 
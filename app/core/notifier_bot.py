@@ -18,18 +18,45 @@ Behavior:
     TG_FLASHBACK01_BOT_TOKEN, TG_FLASHBACK01_CHAT_ID
 - Also supports legacy/common:
     TG_BOT_TOKEN / TG_CHAT_ID
+
+Delivery (TG_ASYNC=true, default):
+- tg_send() only logs and enqueues; it never touches the network. A single
+  daemon sender thread owns all HTTP calls, so a slow Telegram API can't
+  stall the executor / execution_ws loops.
+- Bounded queue (TG_QUEUE_MAX, default 1000). When full the new message is
+  dropped and counted; the caller is never blocked.
+- Repeats (identical text, whitespace aside) are coalesced: while pending
+  they become one line with an "(xN)" suffix; within TG_COALESCE_WINDOW_SEC
+  (default 10) of being sent they are suppressed, and the count is sent as
+  one summary line when the window runs out. Texts that differ in a number
+  (price, qty, label) are never merged.
+- Bursts for the same chat are batched into one message (up to Telegram's
+  4096 chars), collected for TG_BATCH_WINDOW_MS (default 300).
+- Token buckets per chat (TG_CHAT_RATE_PER_SEC=0.33, TG_CHAT_BURST=3, i.e.
+  Telegram's 20 msgs/min group limit) and per process
+  (TG_GLOBAL_RATE_PER_SEC=25); a 429 holds the chat for the returned
+  retry_after.
+- get_dispatcher().metrics(): queue depth, drops, coalesced, batches,
+  429s, errors, enqueue->delivered latency percentiles.
+- TG_API_BASE overrides https://api.telegram.org (local stand-ins).
+- TG_ASYNC=false restores the old synchronous POST in the caller's thread.
 """
 
 from __future__ import annotations
 
+import atexit
 import os
+import queue
+import threading
 import time
 import json
 import logging
+import urllib.error
 import urllib.parse
 import urllib.request
+from collections import OrderedDict, deque
 from dataclasses import dataclass
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 
 
 # -------------------------
@@ -76,6 +103,26 @@ def _env_int(name: str, default: int) -> int:
         return int(default)
 
 
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(_env(name, str(default)))
+    except Exception:
+        return float(default)
+
+
+TG_API_BASE = _env("TG_API_BASE", "https://api.telegram.org").rstrip("/")
+TG_ASYNC = _env("TG_ASYNC", "true").lower() not in ("0", "false", "no", "off")
+TG_QUEUE_MAX = _env_int("TG_QUEUE_MAX", 1000)
+TG_COALESCE_WINDOW_SEC = _env_float("TG_COALESCE_WINDOW_SEC", 10.0)
+TG_BATCH_WINDOW_MS = _env_int("TG_BATCH_WINDOW_MS", 300)
+TG_CHAT_RATE_PER_SEC = _env_float("TG_CHAT_RATE_PER_SEC", 0.33)
+TG_CHAT_BURST = _env_int("TG_CHAT_BURST", 3)
+TG_GLOBAL_RATE_PER_SEC = _env_float("TG_GLOBAL_RATE_PER_SEC", 25.0)
+TG_MAX_RETRIES = _env_int("TG_MAX_RETRIES", 3)
+TG_FLUSH_ON_EXIT_SEC = _env_float("TG_FLUSH_ON_EXIT_SEC", 2.0)
+TG_MAX_TEXT = 4096
+
+
 def _resolve_tg_creds(channel: Optional[str]) -> Tuple[str, str, str]:
     """
     Returns (token, chat_id, source)
@@ -101,16 +148,454 @@ def _resolve_tg_creds(channel: Optional[str]) -> Tuple[str, str, str]:
 # Telegram sender
 # -------------------------
 
-def _http_post(url: str, payload: Dict[str, Any], timeout_sec: int) -> None:
+def _http_post(url: str, payload: Dict[str, Any], timeout_sec: float) -> None:
     data = urllib.parse.urlencode(payload).encode("utf-8")
     req = urllib.request.Request(url, data=data, method="POST")
     with urllib.request.urlopen(req, timeout=timeout_sec) as resp:
         _ = resp.read()
 
 
+class _Bucket:
+    """
+    Token bucket; take() never blocks, it returns how long to wait instead.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "ts")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = max(1e-6, float(rate))
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.ts = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1.0
+
+
+def _coalesce_key(text: str) -> str:
+    # identical text only: masking numbers would merge different prices / labels
+    return " ".join(text.split())
+
+
+class _Msg:
+    # count: logical messages folded in (shown as xN); units: queue entries
+    # still owed a _done() (coalesced copies are settled on arrival)
+    __slots__ = ("text", "count", "units", "enq_ts", "prerendered")
+
+    def __init__(self, text: str, enq_ts: float, prerendered: bool = False) -> None:
+        self.text = text
+        self.count = 1
+        self.units = 1
+        self.enq_ts = enq_ts
+        self.prerendered = prerendered
+
+    def render(self) -> str:
+        if self.count > 1 and not self.prerendered:
+            return f"{self.text} (x{self.count})"
+        return self.text
+
+
+class _Chat:
+    __slots__ = ("token", "chat_id", "pending", "first_ts", "bucket", "hold_until", "recent", "attempts", "next_expire")
+
+    def __init__(self, token: str, chat_id: str) -> None:
+        self.token = token
+        self.chat_id = chat_id
+        # coalesce key -> message, in arrival order
+        self.pending: "OrderedDict[str, _Msg]" = OrderedDict()
+        self.first_ts = 0.0
+        self.bucket = _Bucket(TG_CHAT_RATE_PER_SEC, TG_CHAT_BURST)
+        self.hold_until = 0.0
+        # coalesce key -> [last_sent_ts, suppressed_since, text]
+        self.recent: Dict[str, List[Any]] = {}
+        self.attempts = 0
+        # earliest window end among keys with suppressed repeats
+        self.next_expire = float("inf")
+
+
+class TelegramDispatcher:
+    """
+    Bounded queue + one sender thread. submit() is the only call made from
+    trading threads; everything else runs on the sender.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_base: str = TG_API_BASE,
+        queue_max: int = TG_QUEUE_MAX,
+        coalesce_window_sec: float = TG_COALESCE_WINDOW_SEC,
+        batch_window_ms: int = TG_BATCH_WINDOW_MS,
+        global_rate_per_sec: float = TG_GLOBAL_RATE_PER_SEC,
+        max_retries: int = TG_MAX_RETRIES,
+        timeout_sec: float = 0.0,
+        post: Any = None,
+    ) -> None:
+        self.api_base = api_base.rstrip("/")
+        self.coalesce_window = float(coalesce_window_sec)
+        self.batch_window = max(0, int(batch_window_ms)) / 1000.0
+        self.max_retries = int(max_retries)
+        self.timeout = float(timeout_sec or _env_int("TG_HTTP_TIMEOUT_SEC", 6))
+        self._post = post or self._urllib_post
+        self._q: "queue.Queue[Tuple[str, str, str, float]]" = queue.Queue(maxsize=max(1, int(queue_max)))
+        self._global = _Bucket(global_rate_per_sec, max(1.0, global_rate_per_sec))
+        self._chats: Dict[Tuple[str, str], _Chat] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._busy = 0  # messages accepted but not yet delivered/dropped
+        self._flushing = 0
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._latency_ms: deque = deque(maxlen=4096)
+        self._send_ms: deque = deque(maxlen=1024)
+        self.stats: Dict[str, int] = {
+            "submitted": 0,
+            "enqueued": 0,
+            "dropped_overflow": 0,
+            "coalesced_pending": 0,
+            "suppressed_recent": 0,
+            "batches_sent": 0,
+            "messages_delivered": 0,
+            "rate_limited_429": 0,
+            "send_errors": 0,
+            "dropped_failed": 0,
+            "loop_errors": 0,
+            "max_queue_depth": 0,
+        }
+
+    # ---------- producer side ----------
+
+    def submit(self, token: str, chat_id: str, text: str) -> bool:
+        """
+        Non-blocking. Returns False if the queue was full (message dropped).
+        """
+        self._ensure_thread()
+        with self._lock:
+            self.stats["submitted"] += 1
+            try:
+                self._q.put_nowait((token, chat_id, str(text), time.monotonic()))
+            except queue.Full:
+                self.stats["dropped_overflow"] += 1
+                return False
+            self.stats["enqueued"] += 1
+            self._busy += 1
+            depth = self._q.qsize()
+            if depth > self.stats["max_queue_depth"]:
+                self.stats["max_queue_depth"] = depth
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Send everything pending now (ignoring the batch window) and wait
+        until delivered or dropped. Returns True if idle before timeout.
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._idle:
+            self._flushing += 1
+            try:
+                while self._busy > 0:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        return False
+                    self._idle.wait(min(left, 0.05))
+                return True
+            finally:
+                self._flushing -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            m: Dict[str, Any] = dict(self.stats)
+            lat = sorted(self._latency_ms)
+            snd = sorted(self._send_ms)
+        m["queue_depth"] = self._q.qsize()
+        m["in_flight"] = self._busy
+
+        def _p(xs: List[float], q: float) -> Optional[float]:
+            return round(xs[min(len(xs) - 1, int(len(xs) * q))], 2) if xs else None
+
+        m["latency_ms_p50"] = _p(lat, 0.5)
+        m["latency_ms_p99"] = _p(lat, 0.99)
+        m["latency_ms_max"] = round(lat[-1], 2) if lat else None
+        m["http_ms_p50"] = _p(snd, 0.5)
+        m["http_ms_p99"] = _p(snd, 0.99)
+        return m
+
+    # ---------- sender side ----------
+
+    def _ensure_thread(self) -> None:
+        t = self._thread
+        if t is not None and t.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="tg-dispatcher", daemon=True)
+                self._thread.start()
+
+    def _urllib_post(self, url: str, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        data = urllib.parse.urlencode(payload).encode("utf-8")
+        req = urllib.request.Request(url, data=data, method="POST")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                body = resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+            body = e.read() or b"{}"
+        try:
+            return status, json.loads(body.decode("utf-8") or "{}")
+        except Exception:
+            return status, {}
+
+    def _done(self, n: int) -> None:
+        with self._idle:
+            self._busy -= n
+            if self._busy <= 0:
+                self._busy = 0
+                self._idle.notify_all()
+
+    def _ingest(self, token: str, chat_id: str, text: str, enq_ts: float) -> None:
+        key2 = (token, chat_id)
+        ch = self._chats.get(key2)
+        if ch is None:
+            ch = _Chat(token, chat_id)
+            self._chats[key2] = ch
+        key = _coalesce_key(text)
+        m = ch.pending.get(key)
+        if m is not None:
+            m.count += 1
+            self.stats["coalesced_pending"] += 1
+            self._done(1)
+            return
+        rec = ch.recent.get(key)
+        if rec is not None:
+            if enq_ts - rec[0] < self.coalesce_window:
+                rec[1] += 1
+                ch.next_expire = min(ch.next_expire, rec[0] + self.coalesce_window)
+                self.stats["suppressed_recent"] += 1
+                self._done(1)
+                return
+            if rec[1]:
+                text = f"{text} (+{int(rec[1])} repeats in last {self.coalesce_window:g}s)"
+            del ch.recent[key]
+        if not ch.pending:
+            ch.first_ts = enq_ts
+        ch.pending[key] = _Msg(text, enq_ts)
+
+    def _take_batch(self, ch: _Chat) -> Tuple[str, List[_Msg]]:
+        parts: List[str] = []
+        msgs: List[_Msg] = []
+        size = 0
+        while ch.pending:
+            key, m = next(iter(ch.pending.items()))
+            line = m.render()
+            if len(line) > TG_MAX_TEXT:
+                line = line[: TG_MAX_TEXT - 1] + "…"
+            add = len(line) + (1 if parts else 0)
+            if parts and size + add > TG_MAX_TEXT:
+                break
+            del ch.pending[key]
+            ch.recent[key] = [m.enq_ts, 0, m.text]
+            parts.append(line)
+            msgs.append(m)
+            size += add
+        if ch.pending:
+            ch.first_ts = next(iter(ch.pending.values())).enq_ts
+        return "\n".join(parts), msgs
+
+    def _send(self, ch: _Chat) -> None:
+        text, msgs = self._take_batch(ch)
+        if not msgs:
+            return
+        n_logical = sum(m.count for m in msgs)
+        units = sum(m.units for m in msgs)
+        url = f"{self.api_base}/bot{ch.token}/sendMessage"
+        payload = {"chat_id": ch.chat_id, "text": text, "disable_web_page_preview": True}
+        t0 = time.monotonic()
+        status, body = 0, {}
+        try:
+            status, body = self._post(url, payload)
+        except Exception as e:
+            LOG.warning("tg dispatcher send failed (chat=%s): %s", ch.chat_id, e)
+        t1 = time.monotonic()
+        with self._lock:
+            self._send_ms.append((t1 - t0) * 1000.0)
+
+        if 200 <= status < 300:
+            ch.attempts = 0
+            with self._lock:
+                self.stats["batches_sent"] += 1
+                self.stats["messages_delivered"] += n_logical
+                for m in msgs:
+                    self._latency_ms.append((t1 - m.enq_ts) * 1000.0)
+            self._done(units)
+            return
+
+        # Failed: put the batch back in front as one pre-rendered message.
+        retry_after = 0.0
+        if status == 429:
+            try:
+                retry_after = float((body.get("parameters") or {}).get("retry_after") or 1)
+            except Exception:
+                retry_after = 1.0
+            with self._lock:
+                self.stats["rate_limited_429"] += 1
+        else:
+            ch.attempts += 1
+            with self._lock:
+                self.stats["send_errors"] += 1
+            if ch.attempts > self.max_retries:
+                LOG.warning("tg dispatcher dropping batch after %d attempts (chat=%s, status=%s)",
+                            ch.attempts, ch.chat_id, status)
+                ch.attempts = 0
+                with self._lock:
+                    self.stats["dropped_failed"] += n_logical
+                self._done(units)
+                return
+            retry_after = min(30.0, 0.5 * (2 ** (ch.attempts - 1)))
+        ch.hold_until = t1 + retry_after
+        back = _Msg(text, min(m.enq_ts for m in msgs), prerendered=True)
+        back.count = n_logical
+        back.units = units
+        rest = list(ch.pending.items())
+        ch.pending.clear()
+        ch.pending[f"\x00retry:{id(back)}"] = back
+        for k, v in rest:
+            ch.pending[k] = v
+        ch.first_ts = back.enq_ts
+
+    def _expire_recent(self, ch: _Chat, now: float) -> None:
+        """
+        Queue a summary for keys whose window ran out with suppressed
+        repeats, and forget idle history. Summaries owe no _done(): the
+        repeats were settled when suppressed.
+        """
+        cut = now - self.coalesce_window
+        nxt = float("inf")
+        for k, r in list(ch.recent.items()):
+            if r[0] > cut:
+                if r[1]:
+                    nxt = min(nxt, r[0] + self.coalesce_window)
+                continue
+            del ch.recent[k]
+            if r[1] and k not in ch.pending:
+                if not ch.pending:
+                    ch.first_ts = now
+                m = _Msg(f"{r[2]} (+{int(r[1])} repeats in last {self.coalesce_window:g}s)", now)
+                m.units = 0
+                ch.pending[k] = m
+        ch.next_expire = nxt
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._run_once()
+            except Exception as e:
+                # keep the only sender alive; whatever it was holding is lost
+                LOG.exception("tg dispatcher loop error: %s", e)
+                with self._lock:
+                    self.stats["loop_errors"] += 1
+                self._resync_busy()
+                time.sleep(0.1)
+
+    def _resync_busy(self) -> None:
+        """
+        Recount what is still owed a _done() (queued + pending), so flush()
+        doesn't wait on messages a loop error dropped.
+        """
+        with self._idle:
+            owed = self._q.qsize()
+            for ch in list(self._chats.values()):
+                owed += sum(m.units for m in ch.pending.values())
+            self._busy = owed
+            if owed <= 0:
+                self._idle.notify_all()
+
+    def _run_once(self) -> None:
+        now = time.monotonic()
+        flushing = self._flushing > 0
+        wait = 0.5
+        for ch in self._chats.values():
+            if now >= ch.next_expire or len(ch.recent) > 256:
+                self._expire_recent(ch, now)
+            if ch.next_expire < float("inf"):
+                wait = min(wait, max(0.0, ch.next_expire - now))
+        for ch in list(self._chats.values()):
+            if not ch.pending:
+                continue
+            ready_at = max(ch.hold_until, ch.first_ts + (0.0 if flushing else self.batch_window))
+            if now < ready_at:
+                wait = min(wait, ready_at - now)
+                continue
+            w = max(ch.bucket.wait_time(now), self._global.wait_time(now))
+            if w > 0:
+                wait = min(wait, w)
+                continue
+            ch.bucket.take(now)
+            self._global.take(now)
+            self._send(ch)
+            now = time.monotonic()
+            wait = 0.0
+        try:
+            item = self._q.get(timeout=max(0.001, wait)) if wait > 0 else self._q.get_nowait()
+        except queue.Empty:
+            return
+        self._ingest(*item)
+        while True:
+            try:
+                self._ingest(*self._q.get_nowait())
+            except queue.Empty:
+                break
+
+
+_DISPATCHER: Optional[TelegramDispatcher] = None
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def get_dispatcher() -> TelegramDispatcher:
+    global _DISPATCHER
+    d = _DISPATCHER
+    if d is None:
+        with _DISPATCHER_LOCK:
+            if _DISPATCHER is None:
+                _DISPATCHER = TelegramDispatcher()
+                atexit.register(_flush_at_exit)
+            d = _DISPATCHER
+    return d
+
+
+def _flush_at_exit() -> None:
+    d = _DISPATCHER
+    if d is not None and d._busy > 0:
+        try:
+            d.flush(timeout=TG_FLUSH_ON_EXIT_SEC)
+        except Exception:
+            pass
+
+
+def tg_enqueue(token: str, chat_id: str, text: str) -> bool:
+    """
+    Hand a message to the background dispatcher (never blocks, never raises).
+    """
+    try:
+        return get_dispatcher().submit(token, chat_id, text)
+    except Exception:
+        return False
+
+
 def tg_send(text: str, channel: Optional[str] = None, level: str = "info") -> None:
     """
-    Public API. Safe to call from anywhere.
+    Public API. Safe to call from anywhere; returns without waiting for
+    Telegram unless TG_ASYNC=false.
     """
     token, chat_id, source = _resolve_tg_creds(channel)
 
@@ -123,8 +608,13 @@ def tg_send(text: str, channel: Optional[str] = None, level: str = "info") -> No
         # quiet fallback, avoid spam
         return
 
+    if TG_ASYNC:
+        if not tg_enqueue(token, chat_id, text):
+            LOG.warning("tg_send dropped (%s via %s): queue full", _upper_channel(channel), source)
+        return
+
     timeout = _env_int("TG_HTTP_TIMEOUT_SEC", 6)
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
+    url = f"{TG_API_BASE}/bot{token}/sendMessage"
     payload = {
         "chat_id": chat_id,
         "text": text,
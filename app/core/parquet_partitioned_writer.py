@@ -3,18 +3,25 @@ import polars as pl
 from pathlib import Path
 from datetime import datetime
 
-def write_partitioned_chunk(df: pl.DataFrame, base_dir: str, prefix: str):
-    if 'symbol' not in df.columns or 'received_ms' not in df.columns:
-        raise ValueError('required columns: symbol, received_ms')
+def write_partitioned_chunk(df: pl.DataFrame, base_dir: str, prefix: str, *,
+                            time_col: str = 'received_ms', partition_cols=('symbol', 'day')):
+    # partition_cols: directory order; 'day' is derived from time_col (UTC)
+    required = [c for c in partition_cols if c != 'day'] + [time_col]
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise ValueError(f"required columns: {', '.join(required)}")
 
     df = df.with_columns(
-        pl.from_epoch('received_ms', time_unit='ms').dt.strftime('%Y-%m-%d').alias('day')
+        pl.from_epoch(time_col, time_unit='ms').dt.strftime('%Y-%m-%d').alias('day')
     )
 
     base = Path(base_dir) / '_committed'
+    written = []
 
-    for (symbol, day), part in df.partition_by(['symbol', 'day'], as_dict=True).items():
-        out = base / f'symbol={symbol}' / f'day={day}'
+    for key, part in df.partition_by(list(partition_cols), as_dict=True).items():
+        out = base
+        for col, val in zip(partition_cols, key):
+            out = out / f"{col}={str(val).replace('/', '_').replace(os.sep, '_')}"
         out.mkdir(parents=True, exist_ok=True)
 
         ts = int(time.time() * 1_000_000)
@@ -23,5 +30,6 @@ def write_partitioned_chunk(df: pl.DataFrame, base_dir: str, prefix: str):
 
         part.write_parquet(tmp, compression='zstd', statistics=True)
         os.replace(tmp, final)
+        written.append(final)
 
-    return True
+    return written
@@ -28,22 +28,40 @@ Legacy style (for older callers):
 
 Notes
 -----
-This v1 guard is intentionally simple. It does NOT:
-- Track open positions.
-- Track daily loss.
-- Track symbol concentration.
-
-Those can be layered on later using the event_bus + journal.
+Per-trade caps are checked here. Aggregate caps (total open risk, per-symbol
+notional, long/short imbalance, trades/day, loss streak) come from the
+shared exposure ledger (app.core.exposure_ledger) when the caller passes
+symbol=, side= and notional_usd=. That check is a lock-free pre-filter; live
+entries book their exposure with reserve_trade() right before the order goes
+out (check + book under the ledger lock) and release_trade() it if the order
+is not placed. Daily loss / drawdown is risk_daemon's job.
+
+Shared breaker
+--------------
+The breaker is shared across processes through a small state file
+(state/global_breaker.json, GLOBAL_BREAKER_PATH). set_global_breaker(...,
+persist=True) writes it atomically (the default stays process-local); is_breaker_active() re-reads it only when its mtime
+changes, so a breaker tripped by risk_daemon is seen by every executor on
+its next guard check.
 """
 
 from __future__ import annotations
 
 import os
+import time
 from decimal import Decimal, InvalidOperation
-from typing import Any, Dict, Tuple
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
 
 from app.core.logger import get_logger
 
+try:
+    from app.core import exposure_ledger
+except Exception:  # pragma: no cover
+    exposure_ledger = None  # type: ignore
+
 log = get_logger("portfolio_guard")
 
 
@@ -79,6 +97,13 @@ def _to_decimal(x: Any) -> Decimal:
 _GLOBAL_BREAKER: bool = _env_bool("GLOBAL_BREAKER", False)
 _GLOBAL_BREAKER_REASON: str = "env_default" if _GLOBAL_BREAKER else ""
 
+ROOT = Path(__file__).resolve().parents[2]
+BREAKER_PATH: Path = Path(os.getenv("GLOBAL_BREAKER_PATH", str(ROOT / "state" / "global_breaker.json")))
+
+# Cached view of the shared breaker file, keyed on (mtime_ns, size).
+_BREAKER_FILE_KEY: Optional[Tuple[int, int]] = None
+_BREAKER_FILE_STATE: Dict[str, Any] = {}
+
 # Per-trade risk caps (0 => disabled)
 # Example you *could* set in .env later:
 #   MAX_TRADE_RISK_PCT=0.05        # 5% of equity max per trade
@@ -89,14 +114,65 @@ MAX_TRADE_RISK_USD: Decimal = _env_decimal("MAX_TRADE_RISK_USD", "0")   # USD am
 
 # ---------- BREAKER UTILITIES (new) ----------
 
+def _read_breaker_file() -> Dict[str, Any]:
+    """
+    Shared breaker state ({} if the file is missing). One os.stat() per call;
+    the file is only re-read when it changed.
+    """
+    global _BREAKER_FILE_KEY, _BREAKER_FILE_STATE
+    try:
+        st = os.stat(BREAKER_PATH)
+    except OSError:
+        _BREAKER_FILE_KEY, _BREAKER_FILE_STATE = None, {}
+        return _BREAKER_FILE_STATE
+    key = (st.st_mtime_ns, st.st_size)
+    if key != _BREAKER_FILE_KEY:
+        try:
+            data = orjson.loads(BREAKER_PATH.read_bytes())
+            _BREAKER_FILE_STATE = data if isinstance(data, dict) else {}
+        except Exception:
+            # Mid-replace or corrupt: keep the last good state.
+            return _BREAKER_FILE_STATE
+        _BREAKER_FILE_KEY = key
+    return _BREAKER_FILE_STATE
+
+
+def _write_breaker_file(active: bool, reason: str, source: str) -> None:
+    BREAKER_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = BREAKER_PATH.with_name(f"{BREAKER_PATH.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(
+        orjson.dumps({"on": bool(active), "reason": reason, "source": source, "ts_ms": int(time.time() * 1000)})
+    )
+    os.replace(tmp, BREAKER_PATH)
+
+
 def is_breaker_active() -> bool:
     """
-    Return True if the global breaker is currently active.
+    Return True if the global breaker is currently active (this process's
+    flag, or the shared breaker file).
     """
-    return _GLOBAL_BREAKER
+    if _GLOBAL_BREAKER:
+        return True
+    try:
+        return bool(_read_breaker_file().get("on", False))
+    except Exception:
+        return False
 
 
-def set_global_breaker(active: bool, reason: str = "") -> None:
+def get_breaker_state() -> Dict[str, Any]:
+    """
+    Local flag + shared file state, for status panels.
+    """
+    shared = dict(_read_breaker_file())
+    return {
+        "active": is_breaker_active(),
+        "local": _GLOBAL_BREAKER,
+        "local_reason": _GLOBAL_BREAKER_REASON,
+        "shared": shared,
+    }
+
+
+def set_global_breaker(active: bool, reason: str = "", persist: bool = False, source: str = "") -> None:
     """
     Toggle the global breaker at runtime.
 
@@ -104,11 +180,20 @@ def set_global_breaker(active: bool, reason: str = "") -> None:
     Telegram command, etc.) flip the breaker without restarting
     the process.
 
+    By default only this process's flag changes, as before. persist=True
+    also writes the shared breaker file so every process sees it; only
+    fleet-level controllers (risk_daemon) should pass it, since
+    set_global_breaker(False, persist=True) clears a trip fleet-wide.
     reason is only used for logging/inspection; can be empty.
     """
     global _GLOBAL_BREAKER, _GLOBAL_BREAKER_REASON
     _GLOBAL_BREAKER = bool(active)
     _GLOBAL_BREAKER_REASON = str(reason or "")
+    if persist:
+        try:
+            _write_breaker_file(_GLOBAL_BREAKER, _GLOBAL_BREAKER_REASON, source or f"pid:{os.getpid()}")
+        except Exception as e:
+            log.error("Failed to write shared breaker file %s: %s", BREAKER_PATH, e)
     log.warning("Global breaker set to %s (reason=%s)", _GLOBAL_BREAKER, _GLOBAL_BREAKER_REASON)
 
 
@@ -122,8 +207,8 @@ def get_guard_limits() -> Dict[str, Any]:
       - Bots that want to log config on startup
     """
     return {
-        "global_breaker": _GLOBAL_BREAKER,
-        "global_breaker_reason": _GLOBAL_BREAKER_REASON,
+        "global_breaker": is_breaker_active(),
+        "global_breaker_reason": _GLOBAL_BREAKER_REASON or str(_read_breaker_file().get("reason") or ""),
         "max_trade_risk_usd": str(MAX_TRADE_RISK_USD),
         "max_trade_risk_pct": str(MAX_TRADE_RISK_PCT),
     }
@@ -136,6 +221,9 @@ def _can_open_trade_new(
     strategy_name: str,
     risk_usd: Decimal,
     equity_now_usd: Decimal,
+    symbol: str = "",
+    side: str = "",
+    notional_usd: Decimal = Decimal("0"),
 ) -> Tuple[bool, str]:
     """
     New-style guard.
@@ -149,7 +237,7 @@ def _can_open_trade_new(
             "Guard blocked trade [sub_uid=%s, strat=%s]: GLOBAL_BREAKER active (reason=%s).",
             sub_uid,
             strategy_name,
-            _GLOBAL_BREAKER_REASON,
+            _GLOBAL_BREAKER_REASON or _read_breaker_file().get("reason"),
         )
         return False, "global_breaker_active"
 
@@ -184,7 +272,24 @@ def _can_open_trade_new(
             )
             return False, "risk_pct_above_cap"
 
-    # 5) If we reach here, it's allowed
+    # 5) Aggregate exposure / session caps (shared ledger, lock-free read)
+    if symbol and exposure_ledger is not None:
+        try:
+            ok, reason = exposure_ledger.check_open(symbol, side, float(notional_usd), float(risk_usd))
+        except Exception as e:
+            log.warning("Exposure ledger unavailable (%s); skipping aggregate caps.", e)
+            ok, reason = True, "ok"
+        if not ok:
+            log.info(
+                "Guard blocked trade [sub_uid=%s, strat=%s, symbol=%s]: %s",
+                sub_uid,
+                strategy_name,
+                symbol,
+                reason,
+            )
+            return False, reason
+
+    # 6) If we reach here, it's allowed
     return True, "ok"
 
 
@@ -200,6 +305,9 @@ def can_open_trade(*args, **kwargs) -> Tuple[bool, str]:
             strategy_name="Sub2_BO",
             risk_usd=Decimal("5.0"),
             equity_now_usd=Decimal("100.0"),
+            symbol="BTCUSDT",            # optional: enables aggregate caps
+            side="Buy",
+            notional_usd=Decimal("250"),
         )
 
     Legacy usage:
@@ -221,6 +329,9 @@ def can_open_trade(*args, **kwargs) -> Tuple[bool, str]:
             strategy_name=strategy_name,
             risk_usd=risk_usd,
             equity_now_usd=equity_now_usd,
+            symbol=str(kwargs.get("symbol") or "").upper(),
+            side=str(kwargs.get("side") or ""),
+            notional_usd=_to_decimal(kwargs.get("notional_usd", 0)),
         )
         return allowed, reason
 
@@ -233,7 +344,7 @@ def can_open_trade(*args, **kwargs) -> Tuple[bool, str]:
             log.warning(
                 "Legacy guard blocked trade [symbol=%s]: GLOBAL_BREAKER active (reason=%s).",
                 symbol,
-                _GLOBAL_BREAKER_REASON,
+                _GLOBAL_BREAKER_REASON or _read_breaker_file().get("reason"),
             )
             return False, "global_breaker_active"
 
@@ -256,3 +367,46 @@ def can_open_trade(*args, **kwargs) -> Tuple[bool, str]:
     # --- Completely invalid usage ---
     log.warning("can_open_trade called with invalid arguments: args=%r kwargs=%r", args, kwargs)
     return False, "invalid_arguments"
+
+
+# ---------- EXPOSURE RESERVATION (live entries) ----------
+
+def reserve_trade(
+    trade_id: str,
+    symbol: str,
+    side: str,
+    notional_usd: float,
+    risk_usd: float,
+    account_label: str = "",
+) -> Tuple[bool, str]:
+    """
+    Book a live entry in the shared exposure ledger right before the order
+    is sent. Unlike the lock-free check in can_open_trade, this checks the
+    aggregate caps and books the trade under the ledger lock, so two
+    executors can't both take the last bit of headroom. Pair with
+    release_trade() if the order is not placed. Returns (allowed, reason).
+    """
+    if exposure_ledger is None:
+        return True, "ok"
+    try:
+        ok, reason = exposure_ledger.reserve_open(
+            trade_id, symbol, side, float(notional_usd), float(risk_usd), account_label=account_label
+        )
+    except Exception as e:
+        log.warning("Exposure ledger unavailable (%s); skipping reservation.", e)
+        return True, "ok"
+    if not ok:
+        log.info("Guard blocked trade [symbol=%s, trade_id=%s]: %s", symbol, trade_id, reason)
+    return ok, reason
+
+
+def release_trade(trade_id: str) -> None:
+    """
+    Undo reserve_trade() for an entry that never reached the exchange.
+    """
+    if exposure_ledger is None:
+        return
+    try:
+        exposure_ledger.release(trade_id)
+    except Exception as e:
+        log.warning("Exposure ledger release failed for %s: %s", trade_id, e)
@@ -46,22 +46,41 @@ Design
 Older snapshots with version=1 and raw Bybit rows are still readable; we
 normalize rows when returning them to callers.
 
+Read path (cached)
+------------------
+- The parsed snapshot is cached keyed on the file's (mtime_ns, size), so hot
+  callers (executor guards, tp_sl_manager, corr gate) pay one os.stat() per
+  read instead of a read + parse.
+- Each cached snapshot carries per-label indexed views (normalized rows,
+  by_symbol, by_side) built once per file change.
+- subscribe_positions(cb) registers cb(label, positions) which fires when a
+  label's normalized positions change (detected on read, or by the optional
+  watcher thread started with start_position_watcher()).
+- REST fallback is single-flight per (label, category): concurrent stale
+  readers share one request instead of each issuing their own.
+- get_position_bus_metrics() returns read latency + stale-fallback counters;
+  they are also exported to state/position_bus_metrics.json every
+  POSITION_BUS_METRICS_EXPORT_SEC seconds (0 disables).
+
 Callers typically use:
     from app.core.position_bus import (
         get_positions_for_label,
         get_position_map_for_label,
         get_positions_snapshot,
         get_positions_for_current_label,
+        get_position_index_for_label,
         get_snapshot,
+        subscribe_positions,
     )
 """
 
 from __future__ import annotations
 
 import os
+import threading
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import orjson
 
@@ -97,6 +116,14 @@ EXEC_DRY_RUN: bool = os.getenv("EXEC_DRY_RUN", "false").strip().lower() in ("1",
 
 _CANONICAL_VERSION: int = 2  # normalized schema version
 
+METRICS_PATH: Path = STATE_DIR / "position_bus_metrics.json"
+
+# How often (seconds) metrics are flushed to METRICS_PATH; 0 disables export
+_METRICS_EXPORT_SEC: float = float(os.getenv("POSITION_BUS_METRICS_EXPORT_SEC", "30"))
+
+# Number of recent read latencies kept for percentile reporting
+_LATENCY_WINDOW: int = 512
+
 
 def _now_ms() -> int:
     return int(time.time() * 1000)
@@ -172,19 +199,297 @@ def _normalize_entry(
         return None
 
 
-def _load_snapshot_raw() -> Optional[Dict[str, Any]]:
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+class _BusMetrics:
     """
-    Load the entire snapshot dict from positions_bus.json, or None if missing/invalid.
+    In-process counters for the read path. Cheap enough to update per call.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.cache_hits = 0
+        self.cache_reloads = 0
+        self.stale_fallbacks = 0
+        self.rest_requests = 0
+        self.rest_shared = 0
+        self._latencies_us: List[float] = []
+        self._lat_idx = 0
+        self._last_export = 0.0
+
+    def observe_read(self, started: float, stale_fallback: bool) -> None:
+        lat_us = (time.perf_counter() - started) * 1_000_000.0
+        with self._lock:
+            self.reads += 1
+            if stale_fallback:
+                self.stale_fallbacks += 1
+            if len(self._latencies_us) < _LATENCY_WINDOW:
+                self._latencies_us.append(lat_us)
+            else:
+                self._latencies_us[self._lat_idx] = lat_us
+                self._lat_idx = (self._lat_idx + 1) % _LATENCY_WINDOW
+        self._maybe_export()
+
+    def bump(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lats = sorted(self._latencies_us)
+            reads = self.reads
+            out: Dict[str, Any] = {
+                "reads": reads,
+                "cache_hits": self.cache_hits,
+                "cache_reloads": self.cache_reloads,
+                "stale_fallbacks": self.stale_fallbacks,
+                "stale_fallback_rate": (self.stale_fallbacks / reads) if reads else 0.0,
+                "rest_requests": self.rest_requests,
+                "rest_shared": self.rest_shared,
+            }
+        if lats:
+            out["read_latency_us_p50"] = round(lats[len(lats) // 2], 2)
+            out["read_latency_us_p99"] = round(lats[min(len(lats) - 1, int(len(lats) * 0.99))], 2)
+            out["read_latency_us_max"] = round(lats[-1], 2)
+        out["ts_ms"] = _now_ms()
+        return out
+
+    def _maybe_export(self) -> None:
+        if _METRICS_EXPORT_SEC <= 0:
+            return
+        now = time.time()
+        if now - self._last_export < _METRICS_EXPORT_SEC:
+            return
+        self._last_export = now
+        try:
+            tmp = METRICS_PATH.with_suffix(".json.tmp")
+            tmp.write_bytes(orjson.dumps(self.snapshot()))
+            os.replace(tmp, METRICS_PATH)
+        except Exception:
+            pass
+
+
+_METRICS = _BusMetrics()
+
+
+def get_position_bus_metrics() -> Dict[str, Any]:
+    """
+    Return read-path metrics: reads, cache hits/reloads, stale fallbacks
+    (count + rate), REST requests issued vs shared, and read latency (µs).
     """
+    return _METRICS.snapshot()
+
+
+# ---------------------------------------------------------------------------
+# Snapshot cache (keyed on file mtime/size)
+# ---------------------------------------------------------------------------
+
+class _LabelView:
+    """
+    Immutable-by-convention indexed view of one label's normalized positions.
+    """
+
+    __slots__ = ("positions", "by_symbol", "by_side", "fingerprint")
+
+    def __init__(self, positions: List[Dict[str, Any]]) -> None:
+        self.positions = positions
+        self.by_symbol: Dict[str, Dict[str, Any]] = {}
+        self.by_side: Dict[str, List[Dict[str, Any]]] = {}
+        for row in positions:
+            self.by_symbol[row["symbol"]] = row
+            self.by_side.setdefault(row.get("side") or "", []).append(row)
+        self.fingerprint = tuple(
+            sorted(
+                (r["symbol"], r["side"], r["size"], r["avgPrice"], r["stopLoss"])
+                for r in positions
+            )
+        )
+
+
+class _CachedSnapshot:
+    __slots__ = ("key", "snap", "updated_ms", "views")
+
+    def __init__(self, key: Tuple[int, int], snap: Dict[str, Any]) -> None:
+        self.key = key
+        self.snap = snap
+        try:
+            self.updated_ms = int(snap.get("updated_ms") or 0)
+        except Exception:
+            self.updated_ms = 0
+        # (label, category) -> _LabelView, built lazily
+        self.views: Dict[Tuple[str, str], _LabelView] = {}
+
+    def view(self, label: str, category: str) -> _LabelView:
+        k = (label, category.lower())
+        v = self.views.get(k)
+        if v is None:
+            norm: List[Dict[str, Any]] = []
+            for row in _extract_label_positions_raw(self.snap, label=label, category=category):
+                n = _normalize_entry(row, label=label, category=category)
+                if n:
+                    norm.append(n)
+            v = _LabelView(norm)
+            self.views[k] = v
+        return v
+
+
+_CACHE_LOCK = threading.Lock()
+_CACHE: Optional[_CachedSnapshot] = None
+
+
+def _stat_key() -> Optional[Tuple[int, int]]:
     try:
-        if not POS_SNAPSHOT_PATH.exists():
-            return None
-        data = orjson.loads(POS_SNAPSHOT_PATH.read_bytes())
+        st = os.stat(POS_SNAPSHOT_PATH)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_cached() -> Optional[_CachedSnapshot]:
+    """
+    Return the cached snapshot, reloading only if the file's (mtime, size) moved.
+    """
+    global _CACHE
+    key = _stat_key()
+    if key is None:
+        return None
+    cur = _CACHE
+    if cur is not None and cur.key == key:
+        _METRICS.bump("cache_hits")
+        return cur
+    with _CACHE_LOCK:
+        cur = _CACHE
+        if cur is not None and cur.key == key:
+            _METRICS.bump("cache_hits")
+            return cur
+        try:
+            data = orjson.loads(POS_SNAPSHOT_PATH.read_bytes())
+        except Exception:
+            return cur if cur is not None and cur.key == key else None
         if not isinstance(data, dict):
             return None
-        return data
-    except Exception:
-        return None
+        new = _CachedSnapshot(key, data)
+        prev = _CACHE
+        _CACHE = new
+        _METRICS.bump("cache_reloads")
+    _notify_changes(prev, new)
+    return new
+
+
+def _load_snapshot_raw() -> Optional[Dict[str, Any]]:
+    """
+    Load the entire snapshot dict from positions_bus.json, or None if missing/invalid.
+
+    Served from the mtime/size-keyed cache; callers must treat it as read-only.
+    """
+    cached = _load_cached()
+    return cached.snap if cached is not None else None
+
+
+# ---------------------------------------------------------------------------
+# Subscriptions
+# ---------------------------------------------------------------------------
+
+PositionsCallback = Callable[[str, List[Dict[str, Any]]], None]
+
+class _Subscriber:
+    __slots__ = ("callback", "label", "category", "last")
+
+    def __init__(self, callback: PositionsCallback, label: Optional[str], category: str) -> None:
+        self.callback = callback
+        self.label = label
+        self.category = category
+        # label -> last fingerprint delivered to this subscriber
+        self.last: Dict[str, tuple] = {}
+
+
+_SUBSCRIBERS: List[_Subscriber] = []
+_SUB_LOCK = threading.Lock()
+
+
+def subscribe_positions(
+    callback: PositionsCallback,
+    label: Optional[str] = None,
+    category: str = "linear",
+) -> Callable[[], None]:
+    """
+    Register callback(label, positions) fired when a label's positions change.
+
+    If label is None, the callback fires for every label in the snapshot.
+    Returns an unsubscribe function.
+
+    Changes are detected whenever the snapshot file is reloaded (any read, or
+    the watcher thread from start_position_watcher()).
+    """
+    entry = _Subscriber(callback, label, category.lower())
+    with _SUB_LOCK:
+        _SUBSCRIBERS.append(entry)
+
+    def _unsubscribe() -> None:
+        with _SUB_LOCK:
+            try:
+                _SUBSCRIBERS.remove(entry)
+            except ValueError:
+                pass
+
+    return _unsubscribe
+
+
+def _notify_changes(prev: Optional[_CachedSnapshot], new: _CachedSnapshot) -> None:
+    with _SUB_LOCK:
+        subs = list(_SUBSCRIBERS)
+    if not subs:
+        return
+
+    labels_block = new.snap.get("labels") or {}
+    prev_labels = (prev.snap.get("labels") or {}) if prev is not None else {}
+    all_labels = set(labels_block.keys()) | set(prev_labels.keys()) if isinstance(labels_block, dict) else set()
+
+    for sub in subs:
+        labels = [sub.label] if sub.label else sorted(str(x) for x in all_labels)
+        for lbl in labels:
+            view = new.view(lbl, sub.category)
+            with _SUB_LOCK:
+                if sub.last.get(lbl) == view.fingerprint:
+                    continue
+                sub.last[lbl] = view.fingerprint
+            try:
+                sub.callback(lbl, [dict(r) for r in view.positions])
+            except Exception as e:
+                print(f"[position_bus] subscriber error label={lbl}: {e}")
+
+
+_WATCHER: Optional[threading.Thread] = None
+_WATCHER_STOP = threading.Event()
+
+
+def start_position_watcher(interval_sec: float = 0.25) -> None:
+    """
+    Start a daemon thread that stats the snapshot file every interval_sec and
+    fires subscribers on change, so callbacks don't depend on someone reading.
+    Idempotent.
+    """
+    global _WATCHER
+    if _WATCHER is not None and _WATCHER.is_alive():
+        return
+    _WATCHER_STOP.clear()
+
+    def _loop() -> None:
+        while not _WATCHER_STOP.wait(interval_sec):
+            try:
+                _load_cached()
+            except Exception:
+                pass
+
+    _WATCHER = threading.Thread(target=_loop, name="position_bus_watcher", daemon=True)
+    _WATCHER.start()
+
+
+def stop_position_watcher() -> None:
+    _WATCHER_STOP.set()
 
 
 def _snapshot_age_seconds(snap: Dict[str, Any]) -> Optional[float]:
@@ -213,7 +518,9 @@ def _save_snapshot(
         "labels": labels_positions,
     }
     try:
-        POS_SNAPSHOT_PATH.write_bytes(orjson.dumps(snap))
+        tmp = POS_SNAPSHOT_PATH.with_suffix(".json.tmp")
+        tmp.write_bytes(orjson.dumps(snap))
+        os.replace(tmp, POS_SNAPSHOT_PATH)
     except Exception:
         pass
 
@@ -231,6 +538,13 @@ def get_snapshot() -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
     return snap, age
 
 
+def _cached_age_seconds(cached: _CachedSnapshot) -> Optional[float]:
+    now_ms = _now_ms()
+    if cached.updated_ms <= 0 or now_ms <= cached.updated_ms:
+        return None
+    return (now_ms - cached.updated_ms) / 1000.0
+
+
 def _extract_label_positions_raw(
     snap: Dict[str, Any],
     label: str,
@@ -300,6 +614,76 @@ def _rest_refresh_snapshot_for_label(
     return norm_positions, new_snap
 
 
+class _InFlight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[List[Dict[str, Any]]] = None
+        self.error: Optional[BaseException] = None
+
+
+_INFLIGHT: Dict[Tuple[str, str], _InFlight] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _rest_refresh_single_flight(
+    label: str,
+    category: str,
+    existing_snap: Optional[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    Single-flight wrapper over _rest_refresh_snapshot_for_label: the first
+    stale reader for (label, category) issues the REST request; concurrent
+    readers wait for and share its result.
+
+    A failed refresh is never shared as []: followers re-raise the leader's
+    exception, or TimeoutError if it did not finish in time, so callers can
+    tell "flat" from "unknown".
+    """
+    key = (label, category.lower())
+    with _INFLIGHT_LOCK:
+        flight = _INFLIGHT.get(key)
+        leader = flight is None
+        if leader:
+            flight = _InFlight()
+            _INFLIGHT[key] = flight
+
+    if not leader:
+        _METRICS.bump("rest_shared")
+        if not flight.done.wait(timeout=30.0):
+            raise TimeoutError(f"position_bus REST refresh for {label} still running after 30s")
+        if flight.result is None:
+            raise flight.error or RuntimeError(f"position_bus REST refresh for {label} failed")
+        return [dict(r) for r in flight.result]
+
+    try:
+        _METRICS.bump("rest_requests")
+        norm_positions, new_snap = _rest_refresh_snapshot_for_label(
+            label=label,
+            category=category,
+            existing_snap=existing_snap,
+        )
+        if _POSITION_BUS_ALLOW_REST_WRITE:
+            _save_snapshot(new_snap.get("labels") or {})
+        flight.result = norm_positions
+        return [dict(r) for r in norm_positions]
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+        flight.done.set()
+
+
+def _effective_label(label: Optional[str]) -> str:
+    effective_label = label if isinstance(label, str) else None
+    if not effective_label or not effective_label.strip():
+        effective_label = "main"
+    return effective_label.strip()
+
+
 def get_positions_for_label(
     label: Optional[str] = "main",
     category: str = "linear",
@@ -315,16 +699,36 @@ def get_positions_for_label(
       - If you want the current process label, call get_positions_for_current_label()
         or pass label=ACCOUNT_LABEL explicitly.
     """
-    effective_label = label if isinstance(label, str) else None
-    if not effective_label or not effective_label.strip():
-        effective_label = "main"
-    label = effective_label.strip()
+    started = time.perf_counter()
+    stale_fallback = False
+    try:
+        rows, stale_fallback = _get_positions_for_label(
+            label=_effective_label(label),
+            category=category,
+            max_age_seconds=max_age_seconds,
+            allow_rest_fallback=allow_rest_fallback,
+        )
+        return rows
+    finally:
+        _METRICS.observe_read(started, stale_fallback)
+
 
+def _get_positions_for_label(
+    label: str,
+    category: str,
+    max_age_seconds: Optional[int],
+    allow_rest_fallback: bool,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Returns (rows, used_rest_fallback).
+    """
     if max_age_seconds is None:
         max_age_seconds = _POSITION_BUS_MAX_AGE_SECONDS
 
-    # Snapshot path
-    snap, age = get_snapshot()
+    # Snapshot path (cached on mtime/size)
+    cached = _load_cached()
+    snap = cached.snap if cached is not None else None
+    age = _cached_age_seconds(cached) if cached is not None else None
 
     # DRY_RUN: keep positions bus fresh even when empty (no WS/REST dependency)
     if EXEC_DRY_RUN:
@@ -336,40 +740,26 @@ def get_positions_for_label(
             labels_block[label] = {"category": category, "positions": []}
             _save_snapshot(labels_block)
             # return empty (paper mode should not invent positions)
-            return []
-    if snap is not None and age is not None and age <= max_age_seconds:
-        raw_positions = _extract_label_positions_raw(
-            snap,
-            label=label,
-            category=category,
-        )
-        if raw_positions:
-            norm_positions: List[Dict[str, Any]] = []
-            for row in raw_positions:
-                norm = _normalize_entry(row, label=label, category=category)
-                if norm:
-                    norm_positions.append(norm)
-            if norm_positions:
-                return norm_positions
+            return [], False
+    if cached is not None and age is not None and age <= max_age_seconds:
+        view = cached.view(label, category)
+        if view.positions:
+            # Copies: callers are allowed to mutate the rows they get back.
+            return [dict(r) for r in view.positions], False
 
     # REST fallback
     if not allow_rest_fallback:
-        return []
+        return [], False
 
     # NOTE: REST fallback is only supported for MAIN right now.
     if label.lower() != "main":
-        return []
+        return [], False
 
-    norm_positions, new_snap = _rest_refresh_snapshot_for_label(
+    return _rest_refresh_single_flight(
         label="main",
         category=category,
         existing_snap=snap,
-    )
-
-    if _POSITION_BUS_ALLOW_REST_WRITE:
-        _save_snapshot(new_snap.get("labels") or {})
-
-    return norm_positions
+    ), True
 
 
 def get_position_map_for_label(
@@ -400,6 +790,37 @@ def get_position_map_for_label(
     return out
 
 
+def get_position_index_for_label(
+    label: Optional[str] = "main",
+    category: str = "linear",
+    max_age_seconds: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Indexed, snapshot-only view for a label (no REST fallback):
+
+        {
+          "age_seconds": float | None,
+          "by_symbol": {"BTCUSDT": row, ...},
+          "by_side": {"Buy": [row, ...], "Sell": [row, ...]},
+        }
+
+    Rows are shared with the cache and must be treated as read-only.
+    Returns empty indexes if the snapshot is missing or older than max_age_seconds.
+    """
+    started = time.perf_counter()
+    try:
+        if max_age_seconds is None:
+            max_age_seconds = _POSITION_BUS_MAX_AGE_SECONDS
+        cached = _load_cached()
+        age = _cached_age_seconds(cached) if cached is not None else None
+        if cached is None or age is None or age > max_age_seconds:
+            return {"age_seconds": age, "by_symbol": {}, "by_side": {}}
+        view = cached.view(_effective_label(label), category)
+        return {"age_seconds": age, "by_symbol": view.by_symbol, "by_side": view.by_side}
+    finally:
+        _METRICS.observe_read(started, False)
+
+
 def get_positions_for_current_label(
     category: str = "linear",
     max_age_seconds: Optional[int] = None,
@@ -1,8 +1,16 @@
 import polars as pl
 
-def with_time_window(lf: pl.LazyFrame, start_ms: int | None, end_ms: int | None):
+def with_time_window(lf: pl.LazyFrame, start_ms: int | None, end_ms: int | None, col: str = 'received_ms'):
     if start_ms is not None:
-        lf = lf.filter(pl.col('received_ms') >= start_ms)
+        lf = lf.filter(pl.col(col) >= start_ms)
     if end_ms is not None:
-        lf = lf.filter(pl.col('received_ms') <= end_ms)
+        lf = lf.filter(pl.col(col) <= end_ms)
     return lf
+
+
+def day_bounds(start_ms: int | None, end_ms: int | None):
+    # 'YYYY-MM-DD' (UTC) bounds for pruning day=... partitions
+    from datetime import datetime, timezone
+    fmt = lambda ms: datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc).strftime('%Y-%m-%d')
+    return (fmt(start_ms) if start_ms is not None else None,
+            fmt(end_ms) if end_ms is not None else None)
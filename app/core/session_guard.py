@@ -16,7 +16,11 @@ Journal calls:
 Executor (later) can call:
     session_guard.should_block_trading() -> bool
 
-State is persisted in: state/session_guard.json
+State lives in the shared exposure ledger (app.core.exposure_ledger), so
+every executor process sees the same counters without re-reading or
+rewriting a JSON file per call. state/session_guard.json is still written
+(write-behind, by the ledger) for anything that reads it directly. If the
+ledger can't be opened, the old file-backed path is used.
 
 Env knobs (optional):
     SESSION_MAX_TRADES_PER_DAY   (default 999)
@@ -27,7 +31,7 @@ import os
 import json
 import time
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from datetime import datetime
 
@@ -36,6 +40,11 @@ try:
 except ImportError:
     from core.config import settings  # type: ignore
 
+try:
+    from app.core import exposure_ledger as _ledger
+except Exception:  # pragma: no cover
+    _ledger = None  # type: ignore
+
 ROOT: Path = getattr(settings, "ROOT", Path(__file__).resolve().parents[2])
 STATE_DIR: Path = ROOT / "state"
 STATE_DIR.mkdir(parents=True, exist_ok=True)
@@ -101,10 +110,22 @@ def _save_state(state: Dict[str, Any]) -> None:
 
 # ---------- public API ----------
 
+def _ledger_state() -> Optional[Dict[str, Any]]:
+    if _ledger is None:
+        return None
+    try:
+        return _ledger.session_state()
+    except Exception:
+        return None
+
+
 def get_state() -> Dict[str, Any]:
     """
     Returns current session state (after possible day rollover).
     """
+    state = _ledger_state()
+    if state is not None:
+        return state
     return _load_state()
 
 
@@ -114,6 +135,13 @@ def register_trade_result(result: str) -> None:
 
     result: "WIN" | "LOSS" | "BREAKEVEN" | anything else
     """
+    if _ledger is not None:
+        try:
+            _ledger.register_result(result)
+            return
+        except Exception:
+            pass
+
     state = _load_state()
 
     res = (result or "UNKNOWN").upper()
@@ -142,9 +170,10 @@ def should_block_trading() -> bool:
     Returns True if trading *should* be blocked due to session rules.
 
     Executor can call this before opening a new trade and respect it.
+    Opens booked in the ledger count towards the daily cap as well.
     """
-    state = _load_state()
-    trades_today = int(state.get("trades_today", 0))
+    state = get_state()
+    trades_today = max(int(state.get("trades_today", 0)), int(state.get("opens_today", 0)))
     loss_streak = int(state.get("loss_streak", 0))
 
     if trades_today >= SESSION_MAX_TRADES_PER_DAY:
@@ -160,7 +189,7 @@ def summary_str() -> str:
     """
     Human-readable snapshot, can be used for Telegram / debugging.
     """
-    state = _load_state()
+    state = get_state()
     return (
         f"SessionGuard {state.get('day')} | "
         f"trades={state.get('trades_today', 0)}, "
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — TP ladder diff/sync (batched reduce-only take-profits)
+
+Purpose
+-------
+tp_sl_manager used to re-sync a ladder by amending every live rung every
+cycle and creating / cancelling rungs one /v5/order/* call at a time. This
+module turns a target ladder into a minimal diff against the live
+reduce-only orders and applies it through the v5 batch endpoints.
+
+Diff
+----
+- Rungs are numbered 1..N in ladder order (closest to price first). Our own
+  orders carry idempotent orderLinkIds "<trade_id>:TP<idx>" (or
+  "<trade_id>:TP<idx>v<gen>" once an id has been burned by a fill/cancel),
+  so a live order is matched to its rung by id first.
+- Remaining live orders (manual / foreign / pre-trade_id) are paired with
+  remaining rungs in ladder order, exactly like the old positional amend, so
+  they are adopted instead of cancelled and recreated.
+- Per matched pair: keep if price and remaining qty already match, else one
+  amend carrying only the fields that changed. For partially filled orders
+  the amended qty is cumExecQty + target (Bybit amends the total qty).
+- Unmatched live orders are cancelled; unmatched rungs are created.
+
+Apply
+-----
+cancel -> amend (qty decreases first) -> create, each through
+flashback_common.bybit_batch in BATCH_ORDER_MAX chunks, so reduce-only
+capacity is freed before it is reused. A create rejected because its
+orderLinkId was already used (rung filled earlier) is retried once with the
+next generation id in a follow-up batch. Generations are kept in
+state/tp_ladder_link_gen.json (and raised to any vN seen on live orders),
+so a restarted manager does not walk through burned ids again.
+
+Metrics
+-------
+get_ladder_metrics(): syncs, no-op syncs, HTTP requests per sync and
+time-to-ladder (ms, p50/p99), keep/amend/cancel/create counts and per-item
+errors. Exported to state/tp_ladder_metrics.json every
+TP_LADDER_METRICS_EXPORT_SEC seconds (0 disables).
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+
+from app.core.flashback_common import bybit_batch, reduce_tp_request
+
+try:
+    from app.core.config import settings
+except Exception:
+    settings = None  # type: ignore
+
+ROOT: Path = getattr(settings, "ROOT", None) or Path(__file__).resolve().parents[2]
+STATE_DIR: Path = ROOT / "state"
+METRICS_PATH: Path = STATE_DIR / "tp_ladder_metrics.json"
+LINK_GEN_PATH: Path = STATE_DIR / "tp_ladder_link_gen.json"
+
+_METRICS_EXPORT_SEC: float = float(os.getenv("TP_LADDER_METRICS_EXPORT_SEC", "30"))
+_WINDOW: int = 512
+
+CATEGORY = "linear"
+
+# Bybit: "OrderLinkedID is duplicate"
+_DUPLICATE_LINK_CODES = (110072,)
+
+_LINK_RE = re.compile(r":TP(\d+)(?:v(\d+))?$")
+
+# (trade_id, rung idx) -> orderLinkId generation currently in use (insertion = recency)
+_LINK_GEN: Dict[Tuple[str, int], int] = {}
+_LINK_GEN_MAX = 4096
+_link_gen_loaded = False
+_link_gen_lock = threading.Lock()
+
+
+def tp_link_id(trade_id: str, idx: int, gen: int = 0) -> str:
+    return f"{trade_id}:TP{idx}" + (f"v{gen}" if gen > 0 else "")
+
+
+def _load_link_gen() -> None:
+    global _link_gen_loaded
+    if _link_gen_loaded:
+        return
+    _link_gen_loaded = True
+    try:
+        raw = orjson.loads(LINK_GEN_PATH.read_bytes())
+        for k, v in raw.items():
+            tid, _, idx = str(k).rpartition(":TP")
+            if tid:
+                _LINK_GEN.setdefault((tid, int(idx)), int(v))
+    except Exception:
+        pass
+
+
+def _link_gen(trade_id: str, idx: int) -> int:
+    with _link_gen_lock:
+        _load_link_gen()
+        return _LINK_GEN.get((trade_id, idx), 0)
+
+
+def _set_link_gen(trade_id: str, idx: int, gen: int) -> None:
+    """Raise the generation for a rung (never lowers it) and persist the table."""
+    with _link_gen_lock:
+        _load_link_gen()
+        key = (trade_id, idx)
+        if gen <= _LINK_GEN.get(key, 0):
+            return
+        _LINK_GEN.pop(key, None)
+        _LINK_GEN[key] = gen
+        while len(_LINK_GEN) > _LINK_GEN_MAX:
+            _LINK_GEN.pop(next(iter(_LINK_GEN)))
+        try:
+            STATE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = LINK_GEN_PATH.with_suffix(".json.tmp")
+            tmp.write_bytes(orjson.dumps({f"{t}:TP{i}": g for (t, i), g in _LINK_GEN.items()}))
+            os.replace(tmp, LINK_GEN_PATH)
+        except Exception:
+            pass
+
+
+def _rung_of(order: dict, trade_id: Optional[str]) -> Optional[int]:
+    if not trade_id:
+        return None
+    lid = str(order.get("orderLinkId") or "")
+    if not lid.startswith(f"{trade_id}:TP"):
+        return None
+    m = _LINK_RE.search(lid)
+    return int(m.group(1)) if m else None
+
+
+def _d(x: Any) -> Decimal:
+    try:
+        return Decimal(str(x))
+    except Exception:
+        return Decimal("0")
+
+
+def _order_ref(symbol: str, order: dict) -> Optional[Dict[str, Any]]:
+    if order.get("orderId"):
+        return {"symbol": symbol, "orderId": order["orderId"]}
+    if order.get("orderLinkId"):
+        return {"symbol": symbol, "orderLinkId": order["orderLinkId"]}
+    return None
+
+
+def _remaining(order: dict) -> Tuple[Decimal, Decimal]:
+    """(remaining qty, executed qty) of a live order."""
+    qty = _d(order.get("qty", "0"))
+    cum = _d(order.get("cumExecQty", "0"))
+    leaves = order.get("leavesQty")
+    rem = _d(leaves) if leaves not in (None, "") else qty - cum
+    return rem, cum
+
+
+@dataclass
+class LadderDiff:
+    keep: List[int] = field(default_factory=list)
+    amend: List[Dict[str, Any]] = field(default_factory=list)
+    cancel: List[Dict[str, Any]] = field(default_factory=list)
+    create: List[Dict[str, Any]] = field(default_factory=list)
+    # create item index -> rung idx (for duplicate-id retries)
+    create_rungs: List[int] = field(default_factory=list)
+    # amend item -> qty delta (for ordering decreases first)
+    amend_qty_delta: List[Decimal] = field(default_factory=list)
+
+    @property
+    def n_ops(self) -> int:
+        return len(self.amend) + len(self.cancel) + len(self.create)
+
+
+def plan_ladder_diff(
+    symbol: str,
+    side_now: str,
+    live: Sequence[dict],
+    rungs: Sequence[Tuple[Decimal, Decimal]],
+    trade_id: Optional[str],
+    tick: Decimal,
+) -> LadderDiff:
+    """
+    Minimal diff turning the live TP orders into rungs [(price, qty), ...]
+    (ladder order, rung 1 first).
+    """
+    diff = LadderDiff()
+    n = len(rungs)
+    buy = side_now.lower() == "buy"
+    half_tick = tick / 2 if tick > 0 else Decimal("0")
+
+    matched: Dict[int, dict] = {}
+    pool: List[dict] = []
+    for o in live:
+        idx = _rung_of(o, trade_id)
+        if idx is not None and 1 <= idx <= n and idx not in matched:
+            matched[idx] = o
+            m = _LINK_RE.search(str(o.get("orderLinkId") or ""))
+            if trade_id and m and m.group(2):
+                _set_link_gen(trade_id, idx, int(m.group(2)))
+        else:
+            pool.append(o)
+
+    pool.sort(key=lambda o: _d(o.get("price", "0")), reverse=not buy)
+    free = [i for i in range(1, n + 1) if i not in matched]
+    for i, o in zip(free, pool):
+        matched[i] = o
+    leftovers = pool[len(free):]
+
+    for idx in sorted(matched):
+        o = matched[idx]
+        px, q = rungs[idx - 1]
+        ref = _order_ref(symbol, o)
+        if ref is None:
+            continue
+        rem, cum = _remaining(o)
+        price_ok = abs(_d(o.get("price", "0")) - px) <= half_tick
+        qty_ok = rem == q
+        if price_ok and qty_ok:
+            diff.keep.append(idx)
+            continue
+        item = dict(ref)
+        if not price_ok:
+            item["price"] = str(px)
+        if not qty_ok:
+            item["qty"] = str(cum + q)
+        diff.amend.append(item)
+        diff.amend_qty_delta.append(Decimal("0") if qty_ok else q - rem)
+
+    for o in leftovers:
+        ref = _order_ref(symbol, o)
+        if ref is not None:
+            diff.cancel.append(ref)
+
+    for idx in range(1, n + 1):
+        if idx in matched:
+            continue
+        px, q = rungs[idx - 1]
+        lid = tp_link_id(trade_id, idx, _link_gen(trade_id, idx)) if trade_id else None
+        diff.create.append(reduce_tp_request(symbol, side_now, q, px, link_id=lid))
+        diff.create_rungs.append(idx)
+
+    return diff
+
+
+@dataclass
+class LadderResult:
+    keep: int = 0
+    amended: int = 0
+    cancelled: int = 0
+    created: int = 0
+    requests: int = 0
+    errors: List[str] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+
+def apply_ladder_diff(symbol: str, side_now: str, diff: LadderDiff, trade_id: Optional[str]) -> LadderResult:
+    res = LadderResult(keep=len(diff.keep))
+
+    if diff.cancel:
+        out, calls = bybit_batch("cancel", diff.cancel, CATEGORY)
+        res.requests += calls
+        for item, r in zip(diff.cancel, out):
+            if r["code"] == 0:
+                res.cancelled += 1
+            else:
+                res.errors.append(f"cancel {item.get('orderId') or item.get('orderLinkId')}: {r['code']} {r['msg']}")
+
+    if diff.amend:
+        order = sorted(range(len(diff.amend)), key=lambda i: diff.amend_qty_delta[i])
+        items = [diff.amend[i] for i in order]
+        out, calls = bybit_batch("amend", items, CATEGORY)
+        res.requests += calls
+        for item, r in zip(items, out):
+            if r["code"] == 0:
+                res.amended += 1
+            else:
+                res.errors.append(f"amend {item.get('orderId') or item.get('orderLinkId')}: {r['code']} {r['msg']}")
+
+    creates = list(diff.create)
+    rungs = list(diff.create_rungs)
+    for attempt in range(2):
+        if not creates:
+            break
+        out, calls = bybit_batch("create", creates, CATEGORY)
+        res.requests += calls
+        retry_items: List[Dict[str, Any]] = []
+        retry_rungs: List[int] = []
+        for item, idx, r in zip(creates, rungs, out):
+            if r["code"] == 0:
+                res.created += 1
+                continue
+            if r["code"] in _DUPLICATE_LINK_CODES and trade_id and attempt == 0:
+                gen = _link_gen(trade_id, idx) + 1
+                _set_link_gen(trade_id, idx, gen)
+                retry_items.append(dict(item, orderLinkId=tp_link_id(trade_id, idx, gen)))
+                retry_rungs.append(idx)
+                continue
+            res.errors.append(f"create TP{idx}: {r['code']} {r['msg']}")
+        creates, rungs = retry_items, retry_rungs
+
+    return res
+
+
+def sync_ladder(
+    symbol: str,
+    side_now: str,
+    live: Sequence[dict],
+    rungs: Sequence[Tuple[Decimal, Decimal]],
+    trade_id: Optional[str],
+    tick: Decimal,
+    *,
+    started: Optional[float] = None,
+    fetch_requests: int = 0,
+) -> LadderResult:
+    """
+    Plan + apply in one go and record metrics. `started` (perf_counter) and
+    `fetch_requests` let the caller include its open-orders fetch in
+    time-to-ladder and requests-per-sync.
+    """
+    t0 = started if started is not None else time.perf_counter()
+    diff = plan_ladder_diff(symbol, side_now, live, rungs, trade_id, tick)
+    res = apply_ladder_diff(symbol, side_now, diff, trade_id)
+    res.requests += fetch_requests
+    res.elapsed_ms = (time.perf_counter() - t0) * 1000.0
+    _METRICS.observe(res)
+    return res
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+class _LadderMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.syncs = 0
+        self.noop_syncs = 0
+        self.requests = 0
+        self.kept = 0
+        self.amended = 0
+        self.cancelled = 0
+        self.created = 0
+        self.item_errors = 0
+        self._req: List[int] = []
+        self._ms: List[float] = []
+        self._idx = 0
+        self._last_export = 0.0
+
+    def observe(self, res: LadderResult) -> None:
+        with self._lock:
+            self.syncs += 1
+            if res.amended + res.cancelled + res.created == 0 and not res.errors:
+                self.noop_syncs += 1
+            self.requests += res.requests
+            self.kept += res.keep
+            self.amended += res.amended
+            self.cancelled += res.cancelled
+            self.created += res.created
+            self.item_errors += len(res.errors)
+            if len(self._req) < _WINDOW:
+                self._req.append(res.requests)
+                self._ms.append(res.elapsed_ms)
+            else:
+                self._req[self._idx] = res.requests
+                self._ms[self._idx] = res.elapsed_ms
+                self._idx = (self._idx + 1) % _WINDOW
+        self._maybe_export()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            req = sorted(self._req)
+            ms = sorted(self._ms)
+            out: Dict[str, Any] = {
+                "syncs": self.syncs,
+                "noop_syncs": self.noop_syncs,
+                "requests": self.requests,
+                "requests_per_sync": (self.requests / self.syncs) if self.syncs else 0.0,
+                "kept": self.kept,
+                "amended": self.amended,
+                "cancelled": self.cancelled,
+                "created": self.created,
+                "item_errors": self.item_errors,
+            }
+        if req:
+            out["requests_per_sync_p99"] = req[min(len(req) - 1, int(len(req) * 0.99))]
+            out["time_to_ladder_ms_p50"] = round(ms[len(ms) // 2], 2)
+            out["time_to_ladder_ms_p99"] = round(ms[min(len(ms) - 1, int(len(ms) * 0.99))], 2)
+        out["ts_ms"] = int(time.time() * 1000)
+        return out
+
+    def _maybe_export(self) -> None:
+        if _METRICS_EXPORT_SEC <= 0:
+            return
+        now = time.time()
+        if now - self._last_export < _METRICS_EXPORT_SEC:
+            return
+        self._last_export = now
+        try:
+            STATE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = METRICS_PATH.with_suffix(".json.tmp")
+            tmp.write_bytes(orjson.dumps(self.snapshot()))
+            os.replace(tmp, METRICS_PATH)
+        except Exception:
+            pass
+
+
+_METRICS = _LadderMetrics()
+
+
+def get_ladder_metrics() -> Dict[str, Any]:
+    """Requests per sync, time-to-ladder and diff op counts since start."""
+    return _METRICS.snapshot()
@@ -43,6 +43,8 @@ Other legacy usage (if any) still works:
 from __future__ import annotations
 
 import json
+import os
+import time
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
@@ -368,33 +370,75 @@ _MODEL_LOADED = False
 _GLOBAL_MODEL = None
 _GLOBAL_FEATURES: list[str] = []
 
+# classifier_training rewrites this after publishing; a change means reload
+MODELS_MANIFEST: Path = MODELS_DIR / "setup_classifier_manifest.json"
+RELOAD_CHECK_SEC = float(os.getenv("CLASSIFIER_RELOAD_CHECK_SEC", "30"))
+_MODELS_STAMP: Optional[Tuple[int, int, int]] = None
+_NEXT_RELOAD_CHECK = 0.0
+
+
+def _manifest_stamp() -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(MODELS_MANIFEST)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _load_pickle(path: Path) -> Any:
+    try:
+        import joblib  # type: ignore
+    except ImportError:
+        import pickle
+
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    return joblib.load(path)
+
+
 def _load_models_once() -> None:
     """
     Lazy load all regime expert models found in models/ directory.
     Expected naming:
       - setup_classifier_{regime}.pkl
       - setup_classifier_{regime}_meta.json
+
+    After the first load, the models manifest is stat'ed at most every
+    RELOAD_CHECK_SEC; when the trainer has published since, the whole set is
+    reloaded and swapped in.
     """
     global _REGIME_MODELS, _REGIME_FEATURES, _GLOBAL_MODEL, _GLOBAL_FEATURES, _MODEL_LOADED
+    global _MODELS_STAMP, _NEXT_RELOAD_CHECK
 
     if _MODEL_LOADED:
-        return
+        now = time.monotonic()
+        if now < _NEXT_RELOAD_CHECK:
+            return
+        _NEXT_RELOAD_CHECK = now + RELOAD_CHECK_SEC
+        stamp = _manifest_stamp()
+        if stamp == _MODELS_STAMP:
+            return
+        log.info("Model manifest changed; reloading regime models.")
     _MODEL_LOADED = True
+    _NEXT_RELOAD_CHECK = time.monotonic() + RELOAD_CHECK_SEC
+    _MODELS_STAMP = _manifest_stamp()
 
-    import joblib
-    from pathlib import Path
-
-    models_root = Path(ROOT) / "models"
+    models_root = MODELS_DIR
     if not models_root.exists():
+        _REGIME_MODELS, _REGIME_FEATURES = {}, {}
+        _GLOBAL_MODEL, _GLOBAL_FEATURES = None, []
         log.info("No models directory found; classifier will operate with no models.")
         return
 
+    regime_models: Dict[str, Any] = {}
+    regime_features: Dict[str, list[str]] = {}
+
     # Load all pickles ending with _classifier_*.pkl
     for p in models_root.glob("setup_classifier_*.pkl"):
         try:
             regimen = p.stem.replace("setup_classifier_", "")
-            model_obj = joblib.load(p)
-            _REGIME_MODELS[regimen] = model_obj
+            model_obj = _load_pickle(p)
+            regime_models[regimen] = model_obj
 
             # Try corresponding meta file
             meta_path = models_root / f"{p.stem}_meta.json"
@@ -403,29 +447,35 @@ def _load_models_once() -> None:
                     raw_meta = meta_path.read_text()
                     meta = json.loads(raw_meta)
                     feat_names = meta.get("feature_names") or []
-                    _REGIME_FEATURES[regimen] = list(feat_names)
+                    regime_features[regimen] = list(feat_names)
                 except Exception:
-                    _REGIME_FEATURES[regimen] = []
+                    regime_features[regimen] = []
             else:
-                _REGIME_FEATURES[regimen] = []
+                regime_features[regimen] = []
 
             log.info(f"Loaded regime model '{regimen}'")
         except Exception as e:
             log.warning(f"Failed to load regime model from {p}: {e}")
 
-    # Optionally also load a global fallback model
+    _REGIME_MODELS, _REGIME_FEATURES = regime_models, regime_features
+
+    # Optionally also load a global fallback model (a reload drops one that was unpublished)
     global_path = models_root / "setup_classifier.pkl"
     global_meta = models_root / "setup_classifier_meta.json"
+    global_model: Any = None
+    global_features: list[str] = []
     if global_path.exists():
         try:
-            _GLOBAL_MODEL = joblib.load(global_path)
+            global_model = _load_pickle(global_path)
             log.info("Loaded global fallback classifier")
             if global_meta.exists():
                 raw_meta = global_meta.read_text()
                 gm = json.loads(raw_meta)
-                _GLOBAL_FEATURES = gm.get("feature_names") or []
+                global_features = list(gm.get("feature_names") or [])
         except Exception as e:
+            global_model, global_features = None, []
             log.warning("Failed to load global fallback classifier: %r", e)
+    _GLOBAL_MODEL, _GLOBAL_FEATURES = global_model, global_features
 
 def _pick_model_for_regime(regime: str):
     """
@@ -475,8 +525,9 @@ def _classify_ai(signal: Dict[str, Any], strat_id: str) -> Dict[str, Any]:
 
     # Attempt model inference
     try:
-        # If needed, reorder vec to match regime model features
-        # We assume _extract_live_features makes vec in a default order.
+        # Reorder vec to match the regime model's training features
+        if feature_names:
+            vec = [float(features_dict.get(name) or 0.0) for name in feature_names]
         probs = model_obj.predict_proba([vec])[0]
         score = float(probs[1]) if len(probs) > 1 else float(probs[0])
     except Exception as e:
@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — Wallet Bus (WS-fed equity / margin snapshot per account)
+
+Purpose
+-------
+Executor sizing and the MMR guards used to call /v5/account/wallet-balance
+on every strategy signal (get_equity_usdt) and again for get_mmr_pct. The
+wallet bus keeps one equity/margin snapshot per account label that readers
+can hit in O(1), and only touches REST when the snapshot is too old.
+
+Design
+------
+- Writer: ws_switchboard subscribes to the private "wallet" topic and calls
+  apply_ws_wallet() for every push. Coin rows are merged into the previous
+  snapshot, so partial pushes never drop a coin.
+- While the private WS is connected and the snapshot was taken after the
+  subscription went live, ws_switchboard also calls confirm_ws_fresh():
+  Bybit only pushes wallet changes, so "no push" means "still current".
+- Snapshot files (one per label, mirrors positions_bus naming):
+      main     -> state/wallet_bus.json
+      <label>  -> state/wallet_bus_<label>.json
+  WALLET_BUS_PATH overrides the path for this process' own ACCOUNT_LABEL.
+- Structure:
+    {
+      "version": 1,
+      "updated_ms": 1763752000123,     # last WS push / REST refresh
+      "confirmed_ms": 1763752030000,   # last "WS still connected" stamp
+      "account_label": "main",
+      "source": "ws" | "rest",
+      "account_type": "UNIFIED",
+      "equity_usdt": "1234.56",        # sum of USDT coin equity
+      "total_equity": "1234.56",
+      "total_available_balance": "800.1",
+      "account_im_rate": "0.0123",
+      "account_mm_rate": "0.0045",
+      "mmr_pct": "0.45",
+      "coins": {"USDT": {"equity": "...", "walletBalance": "...", ...}}
+    }
+  Numbers are kept as strings so Decimal callers get exact values back.
+
+Read path
+---------
+- Parsed snapshots are cached per file keyed on (mtime_ns, size); a fresh
+  read costs one os.stat().
+- Age = now - max(updated_ms, confirmed_ms). Above WALLET_BUS_MAX_AGE_SEC
+  the reader does a REST refresh, single-flight per label: concurrent stale
+  readers share one request. The result is cached in-process and (if
+  WALLET_BUS_ALLOW_REST_WRITE) written back to the bus for other processes.
+- If REST fails, a snapshot younger than WALLET_BUS_HARD_MAX_AGE_SEC is still
+  served (counted as stale_served); older than that the reader gets None.
+- get_wallet_bus_metrics() reports cache age, REST fallback rate, shared vs
+  issued REST requests and read latency; exported to
+  state/wallet_bus_metrics.json every WALLET_BUS_METRICS_EXPORT_SEC seconds.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+try:
+    from app.core.config import settings
+except ImportError:  # pragma: no cover
+    from core.config import settings  # type: ignore
+
+
+ROOT: Path = getattr(settings, "ROOT", Path(__file__).resolve().parents[2])
+STATE_DIR: Path = ROOT / "state"
+STATE_DIR.mkdir(parents=True, exist_ok=True)
+
+ACCOUNT_LABEL: str = os.getenv("ACCOUNT_LABEL", "main").strip() or "main"
+
+# Readers treat snapshots older than this as stale and refresh via REST
+WALLET_BUS_MAX_AGE_SEC: float = float(os.getenv("WALLET_BUS_MAX_AGE_SEC", "30"))
+
+# Last-known snapshot is still served (if REST fails) up to this age
+WALLET_BUS_HARD_MAX_AGE_SEC: float = float(os.getenv("WALLET_BUS_HARD_MAX_AGE_SEC", "300"))
+
+# Whether a reader's REST refresh is written back to the bus file
+_WALLET_BUS_ALLOW_REST_WRITE: bool = (
+    os.getenv("WALLET_BUS_ALLOW_REST_WRITE", "true").strip().lower()
+    in ("1", "true", "yes")
+)
+
+_CANONICAL_VERSION: int = 1
+
+METRICS_PATH: Path = STATE_DIR / "wallet_bus_metrics.json"
+
+# How often (seconds) metrics are flushed to METRICS_PATH; 0 disables export
+_METRICS_EXPORT_SEC: float = float(os.getenv("WALLET_BUS_METRICS_EXPORT_SEC", "30"))
+
+# Number of recent read latencies / cache ages kept for percentile reporting
+_LATENCY_WINDOW: int = 512
+
+# Account-level fields copied from a wallet row (WS and REST use the same names)
+_ACCOUNT_FIELDS: Dict[str, str] = {
+    "totalEquity": "total_equity",
+    "totalWalletBalance": "total_wallet_balance",
+    "totalMarginBalance": "total_margin_balance",
+    "totalAvailableBalance": "total_available_balance",
+    "totalPerpUPL": "total_perp_upl",
+    "totalInitialMargin": "total_initial_margin",
+    "totalMaintenanceMargin": "total_maintenance_margin",
+    "accountIMRate": "account_im_rate",
+    "accountMMRate": "account_mm_rate",
+}
+
+_COIN_FIELDS: Tuple[str, ...] = (
+    "equity",
+    "walletBalance",
+    "usdValue",
+    "unrealisedPnl",
+    "cumRealisedPnl",
+    "totalPositionIM",
+    "totalPositionMM",
+    "totalOrderIM",
+    "locked",
+)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _is_main(label: str) -> bool:
+    return (label or "").lower() in ("main", "primary")
+
+
+def bus_path_for_label(label: Optional[str] = None) -> Path:
+    """
+    Snapshot path for a label: wallet_bus.json for main, wallet_bus_<label>.json
+    otherwise. WALLET_BUS_PATH overrides the path for this process' own label.
+    """
+    lab = (label or ACCOUNT_LABEL or "main").strip() or "main"
+    override = os.getenv("WALLET_BUS_PATH", "").strip()
+    if override and lab == ACCOUNT_LABEL:
+        return Path(override)
+    if _is_main(lab):
+        return STATE_DIR / "wallet_bus.json"
+    return STATE_DIR / f"wallet_bus_{lab}.json"
+
+
+def _dec(x: Any) -> Optional[Decimal]:
+    if x is None:
+        return None
+    s = str(x).strip()
+    if not s:
+        return None
+    try:
+        return Decimal(s)
+    except Exception:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Parsing (shared by WS pushes and REST responses)
+# ---------------------------------------------------------------------------
+
+def build_snapshot(
+    rows: Iterable[Dict[str, Any]],
+    label: str,
+    source: str,
+    prev: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Merge wallet rows (WS "wallet" data or REST result.list) into a snapshot.
+
+    Account-level fields are overwritten when present; coin rows are merged
+    by coin name on top of prev["coins"].
+    """
+    snap: Dict[str, Any] = dict(prev) if isinstance(prev, dict) else {}
+    coins: Dict[str, Dict[str, Any]] = {}
+    if isinstance(snap.get("coins"), dict):
+        coins = {k: dict(v) for k, v in snap["coins"].items() if isinstance(v, dict)}
+
+    for acc in rows:
+        if not isinstance(acc, dict):
+            continue
+        acct_type = acc.get("accountType")
+        if acct_type:
+            snap["account_type"] = str(acct_type)
+        for src, dst in _ACCOUNT_FIELDS.items():
+            v = acc.get(src)
+            if v is not None and str(v).strip() != "":
+                snap[dst] = str(v)
+        # v5 uses accountMMRate; older payloads exposed marginRatio
+        if acc.get("marginRatio") not in (None, "") and "account_mm_rate" not in snap:
+            snap["account_mm_rate"] = str(acc.get("marginRatio"))
+        for c in acc.get("coin") or []:
+            if not isinstance(c, dict) or not c.get("coin"):
+                continue
+            name = str(c["coin"]).upper()
+            entry = coins.setdefault(name, {})
+            for f in _COIN_FIELDS:
+                v = c.get(f)
+                if v is not None and str(v).strip() != "":
+                    entry[f] = str(v)
+
+    equity = Decimal("0")
+    usdt = coins.get("USDT") or {}
+    eq = _dec(usdt.get("equity"))
+    if eq is not None and eq > 0:
+        equity = eq
+
+    mmr_pct = Decimal("0")
+    mm_rate = _dec(snap.get("account_mm_rate"))
+    if mm_rate is not None and mm_rate > 0:
+        mmr_pct = mm_rate * Decimal("100")
+
+    snap.update(
+        {
+            "version": _CANONICAL_VERSION,
+            "updated_ms": _now_ms(),
+            "account_label": label,
+            "source": source,
+            "equity_usdt": str(equity),
+            "mmr_pct": str(mmr_pct),
+            "coins": coins,
+        }
+    )
+    return snap
+
+
+def _atomic_write(path: Path, snap: Dict[str, Any]) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(orjson.dumps(snap))
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+
+def _read_file(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        data = orjson.loads(path.read_bytes())
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+# ---------------------------------------------------------------------------
+# Writer side (ws_switchboard)
+# ---------------------------------------------------------------------------
+
+def apply_ws_wallet(
+    rows: Any,
+    label: str,
+    path: Optional[Path] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Merge a private "wallet" push into the label's snapshot and write it.
+    """
+    if isinstance(rows, dict):
+        rows = [rows]
+    if not isinstance(rows, list) or not rows:
+        return None
+    p = path or bus_path_for_label(label)
+    snap = build_snapshot(rows, label=label, source="ws", prev=_read_file(p))
+    snap["confirmed_ms"] = snap["updated_ms"]
+    _atomic_write(p, snap)
+    return snap
+
+
+def confirm_ws_fresh(
+    label: str,
+    since_ms: int,
+    path: Optional[Path] = None,
+) -> bool:
+    """
+    Stamp confirmed_ms while the private WS is connected.
+
+    Only snapshots taken at/after since_ms (when the wallet subscription went
+    live) are confirmed: anything older may predate changes we never saw.
+    """
+    p = path or bus_path_for_label(label)
+    snap = _read_file(p)
+    if snap is None:
+        return False
+    try:
+        updated = int(snap.get("updated_ms") or 0)
+    except Exception:
+        return False
+    if since_ms <= 0 or updated < since_ms:
+        return False
+    snap["confirmed_ms"] = _now_ms()
+    _atomic_write(p, snap)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+class _BusMetrics:
+    """
+    In-process counters for the read path. Cheap enough to update per call.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.cache_hits = 0
+        self.cache_reloads = 0
+        self.rest_fallbacks = 0
+        self.rest_requests = 0
+        self.rest_shared = 0
+        self.rest_errors = 0
+        self.stale_served = 0
+        self.misses = 0
+        self._latencies_us: List[float] = []
+        self._ages_ms: List[float] = []
+        self._idx = 0
+        self._last_age_ms: Optional[float] = None
+        self._last_export = 0.0
+
+    def observe_read(self, started: float, age_ms: Optional[float], rest_fallback: bool) -> None:
+        lat_us = (time.perf_counter() - started) * 1_000_000.0
+        with self._lock:
+            self.reads += 1
+            if rest_fallback:
+                self.rest_fallbacks += 1
+            if age_ms is not None:
+                self._last_age_ms = age_ms
+            if len(self._latencies_us) < _LATENCY_WINDOW:
+                self._latencies_us.append(lat_us)
+                self._ages_ms.append(age_ms if age_ms is not None else -1.0)
+            else:
+                self._latencies_us[self._idx] = lat_us
+                self._ages_ms[self._idx] = age_ms if age_ms is not None else -1.0
+                self._idx = (self._idx + 1) % _LATENCY_WINDOW
+        self._maybe_export()
+
+    def bump(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lats = sorted(self._latencies_us)
+            ages = sorted(a for a in self._ages_ms if a >= 0)
+            reads = self.reads
+            out: Dict[str, Any] = {
+                "reads": reads,
+                "cache_hits": self.cache_hits,
+                "cache_reloads": self.cache_reloads,
+                "rest_fallbacks": self.rest_fallbacks,
+                "rest_fallback_rate": (self.rest_fallbacks / reads) if reads else 0.0,
+                "rest_requests": self.rest_requests,
+                "rest_shared": self.rest_shared,
+                "rest_errors": self.rest_errors,
+                "stale_served": self.stale_served,
+                "misses": self.misses,
+                "cache_age_ms_last": self._last_age_ms,
+            }
+        if lats:
+            out["read_latency_us_p50"] = round(lats[len(lats) // 2], 2)
+            out["read_latency_us_p99"] = round(lats[min(len(lats) - 1, int(len(lats) * 0.99))], 2)
+        if ages:
+            out["cache_age_ms_p50"] = round(ages[len(ages) // 2], 1)
+            out["cache_age_ms_p99"] = round(ages[min(len(ages) - 1, int(len(ages) * 0.99))], 1)
+            out["cache_age_ms_max"] = round(ages[-1], 1)
+        out["ts_ms"] = _now_ms()
+        return out
+
+    def _maybe_export(self) -> None:
+        if _METRICS_EXPORT_SEC <= 0:
+            return
+        now = time.time()
+        if now - self._last_export < _METRICS_EXPORT_SEC:
+            return
+        self._last_export = now
+        export_metrics()
+
+
+_METRICS = _BusMetrics()
+
+
+def get_wallet_bus_metrics() -> Dict[str, Any]:
+    """
+    Return read-path metrics: reads, cache hits/reloads, REST fallbacks
+    (count + rate), REST requests issued vs shared, cache age (ms) and read
+    latency (µs).
+    """
+    return _METRICS.snapshot()
+
+
+def export_metrics() -> None:
+    try:
+        tmp = METRICS_PATH.with_suffix(".json.tmp")
+        tmp.write_bytes(orjson.dumps(_METRICS.snapshot()))
+        os.replace(tmp, METRICS_PATH)
+    except Exception:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Snapshot cache (per file, keyed on mtime/size)
+# ---------------------------------------------------------------------------
+
+class _Cached:
+    __slots__ = ("key", "snap", "fresh_ms")
+
+    def __init__(self, key: Tuple[int, int], snap: Dict[str, Any]) -> None:
+        self.key = key
+        self.snap = snap
+        try:
+            self.fresh_ms = max(int(snap.get("updated_ms") or 0), int(snap.get("confirmed_ms") or 0))
+        except Exception:
+            self.fresh_ms = 0
+
+
+_FILE_CACHE: Dict[Path, _Cached] = {}
+# label -> last REST result (covers REST_WRITE=false and failed writes)
+_REST_CACHE: Dict[str, _Cached] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def _load_cached(path: Path) -> Optional[_Cached]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    cur = _FILE_CACHE.get(path)
+    if cur is not None and cur.key == key:
+        _METRICS.bump("cache_hits")
+        return cur
+    snap = _read_file(path)
+    if snap is None:
+        return cur
+    new = _Cached(key, snap)
+    with _CACHE_LOCK:
+        _FILE_CACHE[path] = new
+    _METRICS.bump("cache_reloads")
+    return new
+
+
+def _freshest(label: str, path: Path) -> Optional[_Cached]:
+    a = _load_cached(path)
+    b = _REST_CACHE.get(label)
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a if a.fresh_ms >= b.fresh_ms else b
+
+
+# ---------------------------------------------------------------------------
+# REST fallback (single-flight per label)
+# ---------------------------------------------------------------------------
+
+def _rest_fetch_wallet(label: str) -> List[Dict[str, Any]]:
+    """
+    One /v5/account/wallet-balance call with the label's read keys; returns
+    result.list. Raises on transport/API errors.
+    """
+    from app.core.flashback_common import bybit_get, get_api_keys
+
+    key, secret = get_api_keys(label, "read")
+    res = bybit_get(
+        "/v5/account/wallet-balance",
+        {"accountType": "UNIFIED"},
+        key=key or None,
+        secret=secret or None,
+    )
+    lst = (res.get("result") or {}).get("list") or []
+    return lst if isinstance(lst, list) else []
+
+
+class _InFlight:
+    __slots__ = ("done", "result")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[_Cached] = None
+
+
+_INFLIGHT: Dict[str, _InFlight] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _rest_refresh_single_flight(label: str, path: Path, prev: Optional[Dict[str, Any]]) -> Optional[_Cached]:
+    """
+    The first stale reader for a label issues the REST request; concurrent
+    readers wait for and share its result.
+    """
+    with _INFLIGHT_LOCK:
+        flight = _INFLIGHT.get(label)
+        leader = flight is None
+        if leader:
+            flight = _InFlight()
+            _INFLIGHT[label] = flight
+
+    if not leader:
+        _METRICS.bump("rest_shared")
+        flight.done.wait(timeout=30.0)
+        return flight.result
+
+    try:
+        _METRICS.bump("rest_requests")
+        try:
+            rows = _rest_fetch_wallet(label)
+        except Exception:
+            _METRICS.bump("rest_errors")
+            return None
+        if not rows:
+            _METRICS.bump("rest_errors")
+            return None
+        snap = build_snapshot(rows, label=label, source="rest", prev=prev)
+        cached = _Cached((0, 0), snap)
+        _REST_CACHE[label] = cached
+        if _WALLET_BUS_ALLOW_REST_WRITE:
+            _atomic_write(path, snap)
+        flight.result = cached
+        return cached
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(label, None)
+        flight.done.set()
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def get_wallet_snapshot(
+    label: Optional[str] = None,
+    max_age_sec: Optional[float] = None,
+    allow_rest_fallback: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """
+    Return the wallet snapshot for label (default: this process' ACCOUNT_LABEL)
+    or None if nothing usable is available. Callers must treat it as read-only.
+    """
+    started = time.perf_counter()
+    lab = (label or ACCOUNT_LABEL or "main").strip() or "main"
+    limit_ms = 1000.0 * (WALLET_BUS_MAX_AGE_SEC if max_age_sec is None else max_age_sec)
+    path = bus_path_for_label(lab)
+    used_rest = False
+    age_ms: Optional[float] = None
+    try:
+        cur = _freshest(lab, path)
+        if cur is not None:
+            age_ms = float(max(0, _now_ms() - cur.fresh_ms))
+            if age_ms <= limit_ms:
+                return cur.snap
+
+        if allow_rest_fallback:
+            used_rest = True
+            fresh = _rest_refresh_single_flight(lab, path, cur.snap if cur is not None else None)
+            if fresh is not None:
+                age_ms = float(max(0, _now_ms() - fresh.fresh_ms))
+                return fresh.snap
+
+        if cur is not None and age_ms is not None and age_ms <= 1000.0 * WALLET_BUS_HARD_MAX_AGE_SEC:
+            _METRICS.bump("stale_served")
+            return cur.snap
+        _METRICS.bump("misses")
+        return None
+    finally:
+        _METRICS.observe_read(started, age_ms, used_rest)
+
+
+def get_equity_usdt(label: Optional[str] = None, **kw: Any) -> Optional[Decimal]:
+    """
+    USDT coin equity from the wallet bus, or None if no usable snapshot.
+    """
+    snap = get_wallet_snapshot(label, **kw)
+    return _dec(snap.get("equity_usdt")) if snap is not None else None
+
+
+def get_mmr_pct(label: Optional[str] = None, **kw: Any) -> Optional[Decimal]:
+    """
+    Account maintenance-margin rate in percent, or None if no usable snapshot.
+    """
+    snap = get_wallet_snapshot(label, **kw)
+    return _dec(snap.get("mmr_pct")) if snap is not None else None
+
+
+def reset_cache() -> None:
+    """Drop in-process caches (tests / benchmarks)."""
+    with _CACHE_LOCK:
+        _FILE_CACHE.clear()
+        _REST_CACHE.clear()
+
+
+__all__: List[str] = [
+    "bus_path_for_label",
+    "build_snapshot",
+    "apply_ws_wallet",
+    "confirm_ws_fresh",
+    "get_wallet_snapshot",
+    "get_equity_usdt",
+    "get_mmr_pct",
+    "get_wallet_bus_metrics",
+    "export_metrics",
+    "reset_cache",
+]
@@ -65,11 +65,16 @@ try:  # pragma: no cover
 except Exception:
     pass
 
+# wallet_bus reads its env at import time, so import it after .env is loaded
+from app.core import wallet_bus  # noqa: E402
+
 LOG = get_logger("ws_switchboard")
 
 # Track whether each WS branch is connected
 _ws_private_ready = False
 _ws_public_ready = False
+# When the private "wallet" subscription was last acked (0 = not live)
+_wallet_ws_since_ms = 0
 _already_notified = False
 
 
@@ -160,7 +165,7 @@ def _maybe_send_online_notification(account_label: str) -> None:
     and optionally also via the global/master bot.
     This only runs once per process start.
     """
-    global _ws_private_ready, _ws_public_ready, _already_notified
+    global _already_notified
 
     # Only send once
     if _already_notified:
@@ -210,13 +215,31 @@ def _env_path(name: str, default: str) -> Path:
 def _is_main(label: str) -> bool:
     return (label or "").lower() in ("main", "primary")
 
-# NOTE: ACCOUNT_LABEL is already loaded below in this module; we reference it after it's set.
-# We set placeholders here; later we re-bind these after ACCOUNT_LABEL is resolved.
-POSITIONS_BUS_PATH: Path = STATE_DIR / "positions_bus.json"
-ORDERBOOK_BUS_PATH: Path = STATE_DIR / "orderbook_bus.json"
-TRADES_BUS_PATH: Path = STATE_DIR / "trades_bus.json"
-PUBLIC_TRADES_PATH: Path = STATE_DIR / "public_trades.jsonl"
-EXECUTIONS_PATH: Path = STATE_DIR / "ws_executions.jsonl"
+ACCOUNT_LABEL: str = os.getenv("ACCOUNT_LABEL", "main").strip() or "main"
+
+# ---------------------------------------------------------------------------
+# Bind per-account bus paths now that ACCOUNT_LABEL is known
+# ---------------------------------------------------------------------------
+if _is_main(ACCOUNT_LABEL):
+    POSITIONS_BUS_PATH = _env_path("POSITIONS_BUS_PATH", "positions_bus.json")
+    ORDERBOOK_BUS_PATH = _env_path("ORDERBOOK_BUS_PATH", "orderbook_bus.json")
+    TRADES_BUS_PATH    = _env_path("TRADES_BUS_PATH",    "trades_bus.json")
+else:
+    POSITIONS_BUS_PATH = _env_path("POSITIONS_BUS_PATH", f"positions_bus_{ACCOUNT_LABEL}.json")
+    ORDERBOOK_BUS_PATH = _env_path("ORDERBOOK_BUS_PATH", f"orderbook_bus_{ACCOUNT_LABEL}.json")
+    TRADES_BUS_PATH    = _env_path("TRADES_BUS_PATH",    f"trades_bus_{ACCOUNT_LABEL}.json")
+
+WALLET_BUS_PATH: Path = wallet_bus.bus_path_for_label(ACCOUNT_LABEL)
+
+PUBLIC_TRADES_PATH = _env_path("PUBLIC_TRADES_PATH", f"public_trades_{ACCOUNT_LABEL}.jsonl")
+# EXECUTIONS path precedence:
+# 1) EXEC_BUS_PATH (systemd / per-instance)
+# 2) EXECUTIONS_BUS_PATH (alias)
+# 3) EXECUTIONS_PATH (legacy override)
+# 4) default per-account name
+_default_exec = _env_path("EXECUTIONS_PATH", f"ws_executions_{ACCOUNT_LABEL}.jsonl")
+EXECUTIONS_PATH = _env_path("EXECUTIONS_BUS_PATH", str(_default_exec))
+EXECUTIONS_PATH = _env_path("EXEC_BUS_PATH", str(EXECUTIONS_PATH))
 
 TRADES_BUS_MAX_PER_SYMBOL: int = int(os.getenv("TRADES_BUS_MAX_PER_SYMBOL", "200"))
 
@@ -388,6 +411,14 @@ def _touch_positions_bus_forever(interval_sec: int, account_label: str, stop_eve
         except Exception as e:
             LOG.error("positions_bus touch error: %s", e)
 
+        # Wallet pushes are change-only: while the subscription is live, a
+        # snapshot taken since it went live is still current.
+        if _wallet_ws_since_ms:
+            try:
+                wallet_bus.confirm_ws_fresh(account_label, _wallet_ws_since_ms, path=WALLET_BUS_PATH)
+            except Exception as e:
+                LOG.error("wallet_bus confirm error: %s", e)
+
         for _ in range(max(1, interval_sec)):
             if stop_event.is_set():
                 break
@@ -656,6 +687,8 @@ def _handle_private_message(msg: Dict[str, Any], account_label: str) -> None:
             LOG.error("[PRIVATE] Subscribe FAILED: %s (raw=%s)", ret_msg, msg)
         else:
             LOG.info("[PRIVATE] Subscribe OK: %s", ret_msg)
+            global _wallet_ws_since_ms
+            _wallet_ws_since_ms = _now_ms()
         return
 
     topic = msg.get("topic")
@@ -726,6 +759,13 @@ def _handle_private_message(msg: Dict[str, Any], account_label: str) -> None:
         _append_jsonl(EXECUTIONS_PATH, line)
         return
 
+    if topic == "wallet":
+        try:
+            wallet_bus.apply_ws_wallet(msg.get("data"), account_label, path=WALLET_BUS_PATH)
+        except Exception as e:
+            LOG.error("[PRIVATE] Error applying wallet update: %s", e)
+        return
+
 
 def _run_private_ws(
     url: str,
@@ -744,7 +784,7 @@ def _run_private_ws(
 
         auth_payload = _build_ws_auth_payload(api_key, api_secret)
         ws.send(json.dumps(auth_payload))
-        ws.send(json.dumps({"op": "subscribe", "args": ["position", "execution"]}))
+        ws.send(json.dumps({"op": "subscribe", "args": ["position", "execution", "wallet"]}))
 
         global _ws_private_ready
         _ws_private_ready = True
@@ -763,6 +803,8 @@ def _run_private_ws(
 
     def on_close(ws: websocket.WebSocketApp, status_code: Any, msg: Any) -> None:  # type: ignore
         LOG.warning("[PRIVATE] WS closed: code=%s msg=%s", status_code, msg)
+        global _wallet_ws_since_ms
+        _wallet_ws_since_ms = 0
 
     while not stop_event.is_set():
         try:
@@ -1007,6 +1049,7 @@ def main() -> None:
     LOG.info("POSITIONS touch sec  : %ss", touch_interval)
     LOG.info("EXEC BUS path        : %s", EXECUTIONS_PATH)
     LOG.info("POSITIONS BUS path   : %s", POSITIONS_BUS_PATH)
+    LOG.info("WALLET BUS path      : %s", WALLET_BUS_PATH)
     LOG.info("ORDERBOOK BUS path   : %s", ORDERBOOK_BUS_PATH)
     LOG.info("TRADES BUS path      : %s", TRADES_BUS_PATH)
 
@@ -1048,27 +1091,6 @@ def main() -> None:
             LOG.error(
                 "Missing Bybit API keys for PRIVATE WS for ACCOUNT_LABEL=%s. "
 
-# ---------------------------------------------------------------------------
-# Bind per-account bus paths now that ACCOUNT_LABEL is known
-# ---------------------------------------------------------------------------
-if _is_main(ACCOUNT_LABEL):
-    POSITIONS_BUS_PATH = _env_path("POSITIONS_BUS_PATH", "positions_bus.json")
-    ORDERBOOK_BUS_PATH = _env_path("ORDERBOOK_BUS_PATH", "orderbook_bus.json")
-    TRADES_BUS_PATH    = _env_path("TRADES_BUS_PATH",    "trades_bus.json")
-else:
-    POSITIONS_BUS_PATH = _env_path("POSITIONS_BUS_PATH", f"positions_bus_{ACCOUNT_LABEL}.json")
-    ORDERBOOK_BUS_PATH = _env_path("ORDERBOOK_BUS_PATH", f"orderbook_bus_{ACCOUNT_LABEL}.json")
-    TRADES_BUS_PATH    = _env_path("TRADES_BUS_PATH",    f"trades_bus_{ACCOUNT_LABEL}.json")
-
-PUBLIC_TRADES_PATH = _env_path("PUBLIC_TRADES_PATH", f"public_trades_{ACCOUNT_LABEL}.jsonl")
-# EXECUTIONS path precedence:
-# 1) EXEC_BUS_PATH (systemd / per-instance)
-# 2) EXECUTIONS_BUS_PATH (alias)
-# 3) EXECUTIONS_PATH (legacy override)
-# 4) default per-account name
-_default_exec = _env_path("EXECUTIONS_PATH", f"ws_executions_{ACCOUNT_LABEL}.jsonl")
-EXECUTIONS_PATH = _env_path("EXECUTIONS_BUS_PATH", str(_default_exec))
-EXECUTIONS_PATH = _env_path("EXEC_BUS_PATH", str(EXECUTIONS_PATH))
                 "Tried BYBIT_MAIN_WEBSOCKET_KEY/SECRET, BYBIT_API_KEY/SECRET, BYBIT_MAIN_API_KEY/SECRET (main) "
                 "or BYBIT_<LABEL>_API_KEY/SECRET (subs).",
                 account_label,
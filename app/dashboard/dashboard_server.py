@@ -1,8 +1,12 @@
 ﻿# app/dashboard/dashboard_server.py
 
-from flask import Flask
-from flask_socketio import SocketIO
+import os
+
+import orjson
+from flask import Flask, request
+from flask_socketio import SocketIO, emit
 from app.dashboard.routes import dashboard_bp
+from app.dashboard.outcomes_aggregator import OutcomesAggregator
 
 print("🔥 Initializing Dashboard Server...")
 
@@ -19,12 +23,107 @@ socketio = SocketIO(
 
 app.register_blueprint(dashboard_bp)
 
+# ---------------------------------------------------------------------------
+# Outcomes push (incremental)
+#
+# Events:
+#   server -> client  "dashboard_delta"     {"from": seq, "to": seq, "d": [delta, ...]}
+#   server -> client  "dashboard_snapshot"  full aggregator snapshot (fresh connect / resync)
+#   client -> server  "dashboard_sync"      {"seq": last_seq_seen}
+#
+# Connect auth: {"seq": last_seq_seen} resumes straight away; {"resume": true}
+# means the client will send dashboard_sync itself; no auth = fresh client,
+# which gets a snapshot.
+# ---------------------------------------------------------------------------
+
+PUSH_INTERVAL_SEC = float(os.getenv("DASH_PUSH_INTERVAL_SEC", "0.5"))
+
+aggregator = OutcomesAggregator()
+_push_started = False
+
+
+def _emit(event, payload, **kwargs):
+    # orjson sizing is cheap next to the emit; keeps bytes-per-update honest.
+    aggregator.record_emit(len(orjson.dumps(payload)))
+    socketio.emit(event, payload, **kwargs)
+
+
+def _push_loop():
+    while True:
+        try:
+            deltas, reset = aggregator.poll()
+            if reset:
+                _emit("dashboard_snapshot", aggregator.snapshot())
+            elif deltas:
+                _emit("dashboard_delta", {"from": deltas[0]["s"] - 1, "to": deltas[-1]["s"], "d": deltas})
+        except Exception as e:
+            print(f"[dashboard_server] push loop error: {e!r}")
+        socketio.sleep(PUSH_INTERVAL_SEC)
+
+
+def start_push_loop():
+    global _push_started
+    if _push_started:
+        return
+    _push_started = True
+    aggregator.poll()  # initial catch-up; no one is connected yet
+    socketio.start_background_task(_push_loop)
+
+
+def _resume(seq, sid):
+    """
+    Send only the deltas after seq, or a full snapshot if those are no longer
+    retained (or seq is unusable).
+    """
+    try:
+        seq = int(seq)
+    except Exception:
+        seq = -1
+    missed = aggregator.deltas_since(seq) if seq >= 0 else None
+    if missed is None:
+        _emit("dashboard_snapshot", aggregator.snapshot(), to=sid)
+    elif missed:
+        _emit("dashboard_delta", {"from": seq, "to": missed[-1]["s"], "d": missed}, to=sid)
+
+
+@socketio.on("connect")
+def _on_connect(auth=None):
+    auth = auth if isinstance(auth, dict) else {}
+    if auth.get("seq") is not None:
+        _resume(auth.get("seq"), request.sid)
+    elif not auth.get("resume"):
+        emit("dashboard_snapshot", aggregator.snapshot())
+
+
+@socketio.on("dashboard_sync")
+def _on_sync(data):
+    """
+    Reconnecting clients send the last seq they applied and receive only the
+    deltas they missed, or a full snapshot if those are no longer retained.
+    """
+    _resume((data or {}).get("seq") if isinstance(data, dict) else None, request.sid)
+
+
+def push_state(rows):
+    """
+    Broadcast hydrated dashboard rows (used by app.dashboard.push).
+    """
+    _emit("dashboard_rows", {"rows": rows})
+
+
 @app.route("/health")
 def health():
     return {"status": "ok"}
 
+
+@app.route("/dashboard/metrics")
+def dashboard_metrics():
+    return aggregator.metrics()
+
+
 if __name__ == "__main__":
     print("🚀 Dashboard running on http://localhost:5000")
+    start_push_loop()
     socketio.run(
         app,
         host="0.0.0.0",
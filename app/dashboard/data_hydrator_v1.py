@@ -3,6 +3,8 @@ import time
 from pathlib import Path
 from typing import Dict, Any, List
 
+from app.dashboard.outcomes_aggregator import OutcomesAggregator
+
 STATE_DIR = Path("state")
 ORCH_STATE = STATE_DIR / "orchestrator_state.json"
 OPS_SNAPSHOT = STATE_DIR / "ops_snapshot.json"
@@ -29,23 +31,10 @@ def _now_ms() -> int:
 
 OUTCOMES_V1 = STATE_DIR / "ai_events" / "outcomes.v1.jsonl"
 
-def _iter_jsonl(path: Path):
-    if not path.exists():
-        return
-    try:
-        with path.open("r", encoding="utf-8", errors="ignore") as f:
-            for line in f:
-                line = (line or "").strip()
-                if not line:
-                    continue
-                try:
-                    obj = json.loads(line)
-                except Exception:
-                    continue
-                if isinstance(obj, dict):
-                    yield obj
-    except Exception:
-        return
+# Tails OUTCOMES_V1 by offset; each hydrate folds only lines appended since the last one.
+# Totals only: no delta history (nothing here serves reconnecting clients).
+_OUTCOMES_AGG = OutcomesAggregator(OUTCOMES_V1, history=0)
+
 
 def _load_outcomes_stats() -> Dict[str, Dict[str, Any]]:
     """
@@ -60,55 +49,22 @@ def _load_outcomes_stats() -> Dict[str, Dict[str, Any]]:
         "last_outcome_ts_ms": int
       }
     """
-    stats: Dict[str, Dict[str, Any]] = {}
+    _OUTCOMES_AGG.poll()
 
-    for row in _iter_jsonl(OUTCOMES_V1):
-        if row.get("schema_version") != "outcome.v1":
-            continue
-
-        acct = row.get("account_label")
-        if not isinstance(acct, str) or not acct.strip():
-            continue
-        acct = acct.strip()
-
-        try:
-            pnl_f = float(row.get("pnl_usd") or 0.0)
-        except Exception:
-            pnl_f = 0.0
-
-        ts = row.get("ts_ms") or row.get("closed_ts_ms") or 0
-        try:
-            ts_i = int(ts)
-        except Exception:
-            ts_i = 0
-
-        s = stats.get(acct)
-        if s is None:
-            s = {
-                "total": 0,
-                "wins": 0,
-                "losses": 0,
-                "pnl_total_usd": 0.0,
-                "last_outcome_ts_ms": 0,
-            }
-            stats[acct] = s
-
-        s["total"] += 1
-        if pnl_f > 0:
-            s["wins"] += 1
-        elif pnl_f < 0:
-            s["losses"] += 1
-
-        s["pnl_total_usd"] += pnl_f
-        if ts_i > int(s.get("last_outcome_ts_ms", 0) or 0):
-            s["last_outcome_ts_ms"] = ts_i
-
-    for acct, s in stats.items():
-        t = int(s.get("total", 0) or 0)
-        w = int(s.get("wins", 0) or 0)
-        pnl_total = float(s.get("pnl_total_usd", 0.0) or 0.0)
-        s["win_rate_pct"] = round((w / t * 100.0), 2) if t > 0 else 0.0
-        s["pnl_avg_usd"] = (pnl_total / t) if t > 0 else 0.0
+    stats: Dict[str, Dict[str, Any]] = {}
+    for acct, s in _OUTCOMES_AGG.account_totals().items():
+        t = int(s["n"])
+        w = int(s["w"])
+        pnl_total = float(s["p"])
+        stats[acct] = {
+            "total": t,
+            "wins": w,
+            "losses": int(s["l"]),
+            "pnl_total_usd": pnl_total,
+            "last_outcome_ts_ms": int(s["t"]),
+            "win_rate_pct": round((w / t * 100.0), 2) if t > 0 else 0.0,
+            "pnl_avg_usd": (pnl_total / t) if t > 0 else 0.0,
+        }
 
     return stats
 
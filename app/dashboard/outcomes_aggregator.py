@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flashback — Incremental outcomes aggregator for the dashboard.
+
+Tails state/ai_events/outcomes.v1.jsonl by byte offset and keeps, per scope:
+
+    account            (account_label)
+    strategy           (account_label, strategy)
+    symbol             (account_label, symbol)
+
+running n / wins / losses / pnl / win rate, an equity curve (bounded) and
+peak-to-trough drawdown. Nothing is ever rescanned: each poll() folds only the
+complete lines appended since the last one.
+
+Every poll that changed something produces compact deltas, one per touched
+key, carrying the key's new summary plus only the equity points added since
+the previous delta (not the whole curve). Deltas get a monotonically
+increasing seq and are kept in a bounded history, so a reconnecting client can
+ask for deltas_since(last_seq) and only falls back to a full snapshot() if it
+has been away longer than the history covers. history=0 turns deltas off for
+readers that only want totals (data_hydrator_v1).
+
+Rows without an account_label are skipped, as the old hydrator scan did.
+
+Delta shape (keys kept short; this goes over the wire on every update):
+    {"s": seq, "k": "a"|"st"|"sy", "id": [account, (strategy|symbol)],
+     "n": int, "w": int, "l": int, "p": pnl, "wr": win_rate, "dd": drawdown,
+     "mdd": max_drawdown, "t": last_ts_ms, "eq": [[ts_ms, equity], ...]}
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import orjson
+
+ROOT = Path(__file__).resolve().parents[2]
+OUTCOMES_V1 = ROOT / "state" / "ai_events" / "outcomes.v1.jsonl"
+
+# Equity points retained per key (older points are dropped, not downsampled).
+EQUITY_POINTS = int(os.getenv("DASH_EQUITY_POINTS", "500"))
+# Deltas retained for reconnect catch-up.
+DELTA_HISTORY = int(os.getenv("DASH_DELTA_HISTORY", "5000"))
+
+_SCOPE_CODES = {"account": "a", "strategy": "st", "symbol": "sy"}
+
+
+def _safe_float(x: Any) -> float:
+    try:
+        return float(x)
+    except Exception:
+        return 0.0
+
+
+def _r(x: float) -> float:
+    return round(x, 6)
+
+
+class _Series:
+    __slots__ = ("n", "wins", "losses", "pnl", "equity", "peak", "max_dd", "last_ts_ms", "curve", "pending")
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.wins = 0
+        self.losses = 0
+        self.pnl = 0.0
+        self.equity = 0.0
+        self.peak = 0.0
+        self.max_dd = 0.0
+        self.last_ts_ms = 0
+        self.curve: Deque[Tuple[int, float]] = deque(maxlen=EQUITY_POINTS)
+        # equity points not yet emitted in a delta
+        self.pending: List[Tuple[int, float]] = []
+
+    def fold(self, pnl: float, ts_ms: int) -> None:
+        self.n += 1
+        if pnl > 0:
+            self.wins += 1
+        elif pnl < 0:
+            self.losses += 1
+        self.pnl += pnl
+        self.equity += pnl
+        if self.equity > self.peak:
+            self.peak = self.equity
+        dd = self.peak - self.equity
+        if dd > self.max_dd:
+            self.max_dd = dd
+        if ts_ms > self.last_ts_ms:
+            self.last_ts_ms = ts_ms
+        pt = (ts_ms, _r(self.equity))
+        self.curve.append(pt)
+        self.pending.append(pt)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "n": self.n,
+            "w": self.wins,
+            "l": self.losses,
+            "p": _r(self.pnl),
+            "wr": _r(self.wins / self.n) if self.n else 0.0,
+            "dd": _r(self.peak - self.equity),
+            "mdd": _r(self.max_dd),
+            "t": self.last_ts_ms,
+        }
+
+
+class OutcomesAggregator:
+    """
+    Thread-safe: poll() is called from one background loop, snapshot() /
+    deltas_since() from request handlers.
+    """
+
+    def __init__(self, path: Path = OUTCOMES_V1, history: int = DELTA_HISTORY) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._seq = 0
+        self._series: Dict[Tuple[str, ...], _Series] = {}
+        self._track_deltas = history > 0
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=max(1, history))
+        # seq of the oldest delta a client can still catch up from
+        self._floor_seq = 0
+        self.stats: Dict[str, Any] = {
+            "polls": 0,
+            "updates": 0,
+            "outcomes": 0,
+            "deltas": 0,
+            "resets": 0,
+            "bytes_emitted": 0,
+            "cpu_ms_total": 0.0,
+        }
+
+    # ---------- ingest ----------
+
+    def _read_new_lines(self) -> Tuple[List[bytes], bool]:
+        """
+        Return (complete new lines, reset_happened).
+        """
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            return [], False
+        reset = False
+        if size < self._offset:
+            # Truncated / rotated: start over.
+            self._offset = 0
+            self._series.clear()
+            self._history.clear()
+            self._floor_seq = self._seq
+            self.stats["resets"] += 1
+            reset = True
+        if size == self._offset:
+            return [], reset
+        with self.path.open("rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            return [], reset
+        self._offset += end + 1
+        return chunk[: end + 1].splitlines(), reset
+
+    def _fold_row(self, row: Dict[str, Any], touched: Dict[Tuple[str, ...], None]) -> bool:
+        if str(row.get("schema_version", "")).strip() != "outcome.v1":
+            return False
+        acct = row.get("account_label")
+        if not isinstance(acct, str) or not acct.strip():
+            return False
+        acct = acct.strip()
+        strat = str(row.get("strategy") or row.get("strategy_name") or "unknown").strip() or "unknown"
+        sym = str(row.get("symbol") or "UNKNOWN").strip().upper() or "UNKNOWN"
+        pnl = _safe_float(row.get("pnl_usd"))
+        try:
+            ts_ms = int(row.get("ts_ms") or row.get("closed_ts_ms") or 0)
+        except Exception:
+            ts_ms = 0
+
+        for key in (("account", acct), ("strategy", acct, strat), ("symbol", acct, sym)):
+            s = self._series.get(key)
+            if s is None:
+                s = _Series()
+                self._series[key] = s
+            s.fold(pnl, ts_ms)
+            touched[key] = None
+        return True
+
+    def poll(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Fold newly appended outcomes. Returns (deltas, reset). When reset is
+        True the file was truncated/rotated and clients need a full snapshot.
+        """
+        cpu0 = time.process_time()
+        with self._lock:
+            self.stats["polls"] += 1
+            lines, reset = self._read_new_lines()
+            touched: Dict[Tuple[str, ...], None] = {}
+            n_out = 0
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    row = orjson.loads(line)
+                except Exception:
+                    continue
+                if isinstance(row, dict) and self._fold_row(row, touched):
+                    n_out += 1
+
+            deltas: List[Dict[str, Any]] = []
+            for key in touched:
+                s = self._series[key]
+                if not self._track_deltas:
+                    s.pending = []
+                    continue
+                self._seq += 1
+                d = {"s": self._seq, "k": _SCOPE_CODES[key[0]], "id": list(key[1:])}
+                d.update(s.summary())
+                d["eq"] = s.pending
+                s.pending = []
+                deltas.append(d)
+                self._history.append(d)
+            if self._history:
+                self._floor_seq = self._history[0]["s"] - 1
+
+            if n_out:
+                self.stats["outcomes"] += n_out
+                self.stats["deltas"] += len(deltas)
+                self.stats["updates"] += 1
+        self.stats["cpu_ms_total"] += (time.process_time() - cpu0) * 1000.0
+        return deltas, reset
+
+    # ---------- read side ----------
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def deltas_since(self, seq: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Deltas with s > seq, or None if seq predates the retained history
+        (caller should send a full snapshot instead).
+        """
+        with self._lock:
+            if seq > self._seq:
+                return None
+            if seq < self._floor_seq:
+                return None
+            return [d for d in self._history if d["s"] > seq]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Full state, including the retained equity curve for every key.
+        """
+        with self._lock:
+            out: Dict[str, Any] = {"seq": self._seq, "account": {}, "strategy": {}, "symbol": {}}
+            for key, s in self._series.items():
+                row = s.summary()
+                row["eq"] = list(s.curve)
+                out[key[0]]["|".join(key[1:])] = row
+            return out
+
+    def account_totals(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-account summary (no curves), for row hydrators.
+        """
+        with self._lock:
+            return {
+                key[1]: s.summary()
+                for key, s in self._series.items()
+                if key[0] == "account"
+            }
+
+    def record_emit(self, nbytes: int) -> None:
+        self.stats["bytes_emitted"] += int(nbytes)
+
+    def metrics(self) -> Dict[str, Any]:
+        m = dict(self.stats)
+        u = m["updates"] or 1
+        m["seq"] = self._seq
+        m["offset"] = self._offset
+        m["keys"] = len(self._series)
+        m["cpu_ms_per_update"] = round(m["cpu_ms_total"] / u, 4)
+        m["bytes_per_update"] = round(m["bytes_emitted"] / u, 1)
+        return m
@@ -1,6 +1,11 @@
 import json
 from pathlib import Path
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 PROGRESS = Path('state/features/progress.json')
 
 def load_progress():
@@ -15,14 +20,21 @@ def save_progress(p):
     PROGRESS.parent.mkdir(parents=True, exist_ok=True)
     json.dump(p, PROGRESS.open('w', encoding='utf-8'), indent=2)
 
+def _line(r):
+    if orjson is not None:
+        try:
+            return orjson.dumps(r) + b'\n'
+        except TypeError:
+            pass
+    return (json.dumps(r, separators=(',', ':'), default=str) + '\n').encode('utf-8')
+
 def append_rows(path, rows, last_ts=None):
     if not rows:
         return
 
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open('a', encoding='utf-8') as f:
-        for r in rows:
-            f.write(json.dumps(r, separators=(',', ':')) + '\n')
+    with path.open('ab') as f:
+        f.write(b''.join(_line(r) for r in rows))
 
     if last_ts is not None:
         prog = load_progress()
@@ -39,37 +39,90 @@ def extract_schema(rows: List[dict]) -> Dict[str, str]:
     return schema
 
 
+def _dtype_name(dtype) -> str:
+    import polars as pl
+
+    if dtype == pl.Null:
+        return 'null'
+    if dtype == pl.Boolean:
+        return 'bool'
+    if dtype.is_integer():
+        return 'int'
+    if dtype.is_float():
+        return 'float'
+    if dtype == pl.String:
+        return 'str'
+    if isinstance(dtype, pl.Struct):
+        return 'dict'
+    if isinstance(dtype, pl.List):
+        return 'list'
+    return str(dtype)
+
+
+def frame_schema(df) -> Dict[str, str]:
+    """
+    Schema of a polars DataFrame in registry type names. Columns are typed
+    once per batch instead of per value; a column's type is that of its
+    non-null values ('null' only when all values are null).
+    """
+    return {name: _dtype_name(dtype) for name, dtype in df.schema.items()}
+
+
+def _compatible(old: str, new: str) -> bool:
+    # null carries no type information; ints widen to float
+    return old == new or 'null' in (old, new) or {old, new} == {'int', 'float'}
+
+
+def _widen(old: str, new: str) -> str:
+    if old == 'null':
+        return new
+    if new == 'float' and old == 'int':
+        return 'float'
+    return old
+
+
 def diff_schema(old: Dict[str, str], new: Dict[str, str]) -> Tuple[List[str], List[str], List[str]]:
     removed = [k for k in old if k not in new]
     added = [k for k in new if k not in old]
-    changed = [k for k in new if k in old and old[k] != new[k]]
+    changed = [k for k in new if k in old and not _compatible(old[k], new[k])]
     return removed, added, changed
 
 
-def enforce_schema(rows: List[dict]):
-    if not rows:
-        return
+def enforce_schema(rows, partial: bool = False) -> Dict[str, str]:
+    """
+    Check rows against the registered schema of the active version and
+    register new columns. `rows` is a list of dicts or a polars DataFrame
+    (validated column-wise). partial=True is for batches of a stream: a
+    column missing from one batch is not a removal.
+    Returns the registered schema.
+    """
+    if rows is None or len(rows) == 0:
+        return {}
 
     version = get_active_version()
     registry = load_registry()
-    new_schema = extract_schema(rows)
+    new_schema = extract_schema(rows) if isinstance(rows, list) else frame_schema(rows)
 
     if version not in registry:
         registry[version] = new_schema
         save_registry(registry)
-        return
+        return new_schema
 
     old_schema = registry[version]
     removed, added, changed = diff_schema(old_schema, new_schema)
 
-    if removed:
+    if removed and not partial:
         raise RuntimeError(f'FEATURE REGISTRY VIOLATION: removed columns {removed}')
 
     if changed:
         raise RuntimeError(f'FEATURE REGISTRY VIOLATION: type changes {changed}')
 
-    if added:
+    widened = [k for k in new_schema if k in old_schema and _widen(old_schema[k], new_schema[k]) != old_schema[k]]
+    if added or widened:
         for k in added:
             old_schema[k] = new_schema[k]
+        for k in widened:
+            old_schema[k] = _widen(old_schema[k], new_schema[k])
         registry[version] = old_schema
         save_registry(registry)
+    return old_schema
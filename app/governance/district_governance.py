@@ -1,10 +1,40 @@
 ﻿
+import atexit
+import json
+import os
+import threading
 import yaml
 import time
 from pathlib import Path
 
+from app.ops.file_lock import path_lock
+
 BASE = Path(__file__).resolve().parents[2]
 GOV_FILE = BASE / 'config' / 'governance.yaml'
+# set_flag ops land here first (any process); folded into governance.yaml by flush().
+# Appends and flushes hold <journal>.lock, so a flush folds exactly the ops it read.
+JOURNAL_FILE = BASE / 'config' / 'governance.journal.jsonl'
+
+WRITE_BEHIND_SEC = float(os.getenv('GOVERNANCE_WRITE_BEHIND_SEC', '0.5'))
+
+_lock = threading.RLock()
+_data = None
+_key = None    # governance.yaml (mtime_ns, size, inode) behind _data
+_jino = None   # journal inode behind _data
+_joff = 0      # journal bytes already applied to _data
+_merged = {}
+_timer = None
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def _journal_lock():
+    return path_lock(JOURNAL_FILE.with_name(JOURNAL_FILE.name + '.lock'))
 
 def _load():
     if not GOV_FILE.exists():
@@ -13,21 +43,125 @@ def _load():
         return yaml.safe_load(f) or {'districts': {}}
 
 def _save(data):
-    with open(GOV_FILE, 'w', encoding='utf-8') as f:
+    tmp = GOV_FILE.with_suffix('.yaml.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
         yaml.safe_dump(data, f)
+    os.replace(tmp, GOV_FILE)
+
+def _apply(data, op):
+    data.setdefault('districts', {})
+    d = data['districts'].setdefault(op['uid'], {})
+    d[op['flag']] = op['value']
+    d['last_command'] = f"{op['source']}:{op['flag']}"
+    d['updated_at'] = op['ts']
+
+def _read_journal(start=0):
+    """(ops, end): ops in complete lines from byte start; end = offset after the last one."""
+    try:
+        with open(JOURNAL_FILE, 'rb') as f:
+            f.seek(start)
+            raw = f.read()
+    except FileNotFoundError:
+        return [], start
+    end = raw.rfind(b'\n') + 1  # a torn last line is left for later
+    ops = []
+    for line in raw[:end].splitlines():
+        try:
+            ops.append(json.loads(line))
+        except ValueError:
+            continue
+    return ops, start + end
+
+def _current():
+    """
+    Parsed governance.yaml + every op in the journal, whichever process wrote
+    it. governance.yaml is re-read when it changes (flush anywhere, external
+    edit) and the journal is then replayed from its start, so the view is
+    always rebuilt from disk and no op is replayed over a newer fold.
+    """
+    global _data, _key, _jino, _joff
+    key = _stat_key(GOV_FILE)
+    jkey = _stat_key(JOURNAL_FILE)
+    jino = jkey[2] if jkey else None
+    if _data is None or key != _key or jino != _jino or (jkey and jkey[1] < _joff):
+        _data, _key, _jino, _joff = _load(), key, jino, 0
+        _merged.clear()
+    if jkey and jkey[1] > _joff:
+        ops, _joff = _read_journal(_joff)
+        for op in ops:
+            _apply(_data, op)
+            if op['uid'] == 'default':
+                _merged.clear()
+            else:
+                _merged.pop(op['uid'], None)
+        if ops:
+            _schedule_flush()
+    return _data
+
+def _schedule_flush():
+    global _timer
+    if _timer is None:
+        _timer = threading.Timer(WRITE_BEHIND_SEC, flush)
+        _timer.daemon = True
+        _timer.start()
+
+def flush():
+    """
+    Fold the journal into governance.yaml and drop the folded ops from it.
+    Under the journal lock: no op can be appended between reading the journal
+    and truncating it. A crash after the YAML write only replays ops that
+    are already in it (idempotent). Safe to call at any time; set_flag
+    schedules it automatically.
+    """
+    global _data, _key, _jino, _joff, _timer
+    with _lock:
+        _timer = None
+        if not JOURNAL_FILE.exists():
+            return  # nothing journaled; a later append schedules its own flush
+        with _journal_lock():
+            ops, end = _read_journal(0)
+            if not ops and end == 0:
+                return
+            data = _load()
+            for op in ops:
+                _apply(data, op)
+            if ops:
+                _save(data)
+            with open(JOURNAL_FILE, 'rb') as f:
+                f.seek(end)
+                tail = f.read()
+            if tail:
+                tmp = JOURNAL_FILE.with_suffix('.jsonl.tmp')
+                tmp.write_bytes(tail)
+                os.replace(tmp, JOURNAL_FILE)
+            else:
+                JOURNAL_FILE.unlink()
+            jkey = _stat_key(JOURNAL_FILE)
+            _data, _key, _jino, _joff = data, _stat_key(GOV_FILE), (jkey[2] if jkey else None), 0
+            _merged.clear()
+
+atexit.register(flush)
 
 def get_governance(uid):
-    data = _load()
-    defaults = data.get('districts', {}).get('default', {})
-    specific = data.get('districts', {}).get(uid, {})
-    return {**defaults, **specific}
+    with _lock:
+        data = _current()
+        merged = _merged.get(uid)
+        if merged is None:
+            defaults = data.get('districts', {}).get('default', {})
+            specific = data.get('districts', {}).get(uid, {})
+            merged = _merged[uid] = {**defaults, **specific}
+        return dict(merged)
 
 def set_flag(uid, flag, value, source='ui'):
-    data = _load()
-    data.setdefault('districts', {})
-    data['districts'].setdefault(uid, {})
-    data['districts'][uid][flag] = value
-    data['districts'][uid]['last_command'] = f'{source}:{flag}'
-    data['districts'][uid]['updated_at'] = int(time.time())
-    _save(data)
-
+    op = {'uid': uid, 'flag': flag, 'value': value, 'source': source, 'ts': int(time.time())}
+    line = (json.dumps(op) + '\n').encode('utf-8')
+    with _lock:
+        with _journal_lock():
+            with open(JOURNAL_FILE, 'a+b') as f:
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        line = b'\n' + line  # never glue onto a torn line
+                f.write(line)
+        _current()  # picks up this op (and any other process's) from the journal
+        _schedule_flush()
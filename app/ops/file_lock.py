@@ -0,0 +1,57 @@
+"""
+file_lock.py
+
+Blocking cross-process exclusive locks (flock on POSIX, msvcrt.locking on
+Windows; a no-op where neither exists). Unlike writer_lock this is not a
+lease: the lock is released when the holder's fd closes, including on crash.
+
+- fd_lock(fd)      lock an fd the caller already keeps open (msvcrt locks
+                   byte 0, so the fd's offset is reset to 0)
+- path_lock(path)  open/create path, hold the lock, close it on exit
+"""
+
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+try:  # POSIX
+    import fcntl as _fcntl  # type: ignore
+except Exception:  # pragma: no cover - Windows
+    _fcntl = None  # type: ignore
+try:  # Windows
+    import msvcrt as _msvcrt  # type: ignore
+except Exception:
+    _msvcrt = None  # type: ignore
+
+
+@contextmanager
+def fd_lock(fd: int) -> Iterator[None]:
+    if _fcntl is not None:
+        _fcntl.flock(fd, _fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            _fcntl.flock(fd, _fcntl.LOCK_UN)
+    elif _msvcrt is not None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        _msvcrt.locking(fd, _msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            os.lseek(fd, 0, os.SEEK_SET)
+            _msvcrt.locking(fd, _msvcrt.LK_UNLCK, 1)
+    else:
+        yield
+
+
+@contextmanager
+def path_lock(path: Union[str, Path]) -> Iterator[None]:
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        with fd_lock(fd):
+            yield
+    finally:
+        os.close(fd)
@@ -26,6 +26,8 @@ except Exception:
     _acquire_lock = None  # type: ignore
     _release_lock = None  # type: ignore
 
+from app.ops.proc_supervisor import proc_start_time, spawn
+
 
 # =========================
 # CANONICAL EXECUTION ENTRYPOINT
@@ -58,16 +60,13 @@ def _fatal(msg: str) -> None:
     raise SystemExit(1)
 
 
-def _pid_alive(pid: int) -> bool:
+def _pid_alive(pid: int, start_time: Optional[int] = None) -> bool:
+    # start_time (recorded at spawn) guards against a reused pid
     if pid <= 0:
         return False
     try:
-        r = subprocess.run(
-            ["tasklist", "/FI", f"PID eq {pid}"],
-            capture_output=True,
-            text=True,
-        )
-        return str(pid) in (r.stdout or "")
+        from app.ops.proc_supervisor import pid_alive
+        return pid_alive(pid, start_time)
     except Exception:
         return False
 
@@ -334,20 +333,16 @@ def main() -> int:
                 fo.write(header.encode("utf-8", errors="ignore"))
                 fe.write(header.encode("utf-8", errors="ignore"))
 
-                p = subprocess.Popen(
-                    cmd,
-                    cwd=str(ROOT),
-                    env=env,
-                    stdout=fo,
-                    stderr=fe,
-                    creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == "nt" else 0,
-                )
+                # own process group / session, so proc_supervisor.terminate() takes the stack down
+                p = spawn(cmd, cwd=str(ROOT), env=env, stdout=fo, stderr=fe)
+            start_time = proc_start_time(int(p.pid))
 
             time.sleep(0.35)
-            alive = _pid_alive(int(p.pid))
+            alive = _pid_alive(int(p.pid), start_time)
 
             procs[label] = {
                 "pid": int(p.pid),
+                "start_time": start_time,
                 "cmd": cmd,
                 "started_ts_ms": ts,
                 "alive": bool(alive),
@@ -356,6 +351,7 @@ def main() -> int:
             }
 
             entry["pid"] = int(p.pid)
+            entry["start_time"] = start_time
             entry["alive"] = bool(alive)
             entry["stdout_log"] = str(out_log)
             entry["stderr_log"] = str(err_log)
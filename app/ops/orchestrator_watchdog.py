@@ -1,12 +1,15 @@
 ﻿from __future__ import annotations
 
+import argparse
 import json
 import os
 import subprocess
 import sys
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.ops.proc_supervisor import ExitWatcher, pid_alive, proc_start_time, spawn, terminate
 
 
 ROOT = Path(__file__).resolve().parents[2]
@@ -23,6 +26,14 @@ WINDOW_SEC = 10 * 60             # rolling window for MAX_RESTARTS
 BACKOFF_MIN = 2.0
 BACKOFF_MAX = 60.0
 
+SUPERVISOR_CMD = [sys.executable, "-m", "app.bots.supervisor_ai_stack"]
+STARTUP_CHECK_SEC = float(os.getenv("ORCH_WATCHDOG_STARTUP_CHECK_SEC", "0.25"))
+LOOP_INTERVAL_SEC = float(os.getenv("ORCH_WATCHDOG_INTERVAL_SEC", "5"))
+LATENCY_KEEP = 20                # restart latencies kept per label
+
+# supervisors spawned by this process (loop mode): label -> Popen, for reaping and exit codes
+_CHILDREN: Dict[str, subprocess.Popen] = {}
+
 
 def _now_ms() -> int:
     return int(time.time() * 1000)
@@ -41,16 +52,26 @@ def _write_json(p: Path, d: dict) -> None:
     p.write_text(json.dumps(d, indent=2, sort_keys=True), encoding="utf-8")
 
 
-def _pid_alive(pid: Optional[int]) -> bool:
-    if not isinstance(pid, int) or pid <= 0:
-        return False
+def _int_or_none(v: Any) -> Optional[int]:
+    try:
+        return int(v) if v is not None else None
+    except Exception:
+        return None
+
+
+def _pid_alive(pid: Optional[int], start_time: Optional[int] = None) -> bool:
+    # start_time (recorded at spawn) guards against a reused pid
     try:
-        r = subprocess.run(["tasklist", "/FI", f"PID eq {pid}"], capture_output=True, text=True)
-        return str(pid) in (r.stdout or "")
+        return pid_alive(pid, start_time)
     except Exception:
         return False
 
 
+def _child(label: str, pid: Optional[int]) -> Optional[subprocess.Popen]:
+    p = _CHILDREN.get(label)
+    return p if p is not None and p.pid == pid else None
+
+
 def _load_manifest_rows() -> list[dict[str, Any]]:
     if not MANIFEST.exists():
         return []
@@ -95,7 +116,7 @@ def _start_supervisor(label: str) -> dict:
     env["PYTHONLEGACYWINDOWSSTDIO"] = "0"
     env["ACCOUNT_LABEL"] = label
 
-    cmd = [sys.executable, "-m", "app.bots.supervisor_ai_stack"]
+    cmd = list(SUPERVISOR_CMD)
 
     ts = _now_ms()
     out_log = LOGDIR / f"{label}.stdout.log"
@@ -105,39 +126,51 @@ def _start_supervisor(label: str) -> dict:
         fo.write(f"\n\n=== WATCHDOG RESTART {label} ts_ms={ts} cmd={cmd} ===\n".encode("utf-8", errors="ignore"))
         fe.write(f"\n\n=== WATCHDOG RESTART {label} ts_ms={ts} cmd={cmd} ===\n".encode("utf-8", errors="ignore"))
 
-        p = subprocess.Popen(
-            cmd,
-            cwd=str(ROOT),
-            env=env,
-            stdout=fo,
-            stderr=fe,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == "nt" else 0,
-        )
+        # own process group, so _kill_pid takes the supervisor's workers down too
+        p = spawn(cmd, cwd=str(ROOT), env=env, stdout=fo, stderr=fe)
 
-    time.sleep(0.25)
+    started = _now_ms()
     pid = int(p.pid)
-    alive = _pid_alive(pid)
+    start_time = proc_start_time(pid)
+    _CHILDREN[label] = p
+    try:
+        p.wait(timeout=STARTUP_CHECK_SEC)
+    except subprocess.TimeoutExpired:
+        pass
+    alive = p.poll() is None
 
     return {
         "pid": pid,
+        "start_time": start_time,
         "alive": bool(alive),
+        "exit_code": p.returncode,
         "cmd": cmd,
-        "started_ts_ms": ts,
+        "started_ts_ms": started,
         "stdout_log": str(out_log),
         "stderr_log": str(err_log),
     }
 
 
-def _kill_pid(pid: Optional[int]) -> None:
+def _kill_pid(pid: Optional[int], start_time: Optional[int] = None, popen: Optional[subprocess.Popen] = None) -> None:
+    # process-group SIGTERM, then SIGKILL after the grace period; a reused pid is left alone
     if not isinstance(pid, int) or pid <= 0:
         return
     try:
-        subprocess.run(["taskkill", "/PID", str(pid), "/F"], capture_output=True, text=True)
+        terminate(pid, start_time, popen=popen)
     except Exception:
         pass
 
 
-def main() -> int:
+def tick(
+    watcher: Optional[ExitWatcher] = None,
+    exits: Optional[Dict[str, Tuple[int, Optional[int]]]] = None,
+) -> Dict[str, Any]:
+    """
+    One supervision pass over the fleet. exits holds exit notifications
+    (label -> (ts_ms, exit_code)) seen since the last pass; with a watcher,
+    live and restarted supervisors are (re)registered for exit wakeups.
+    """
+    exits = exits or {}
     STATE.mkdir(parents=True, exist_ok=True)
     LOGDIR.mkdir(parents=True, exist_ok=True)
 
@@ -160,6 +193,8 @@ def main() -> int:
     blocked: List[str] = []
     alive_labels: List[str] = []
     skipped_backoff: List[str] = []
+    latencies: Dict[str, int] = {}
+    next_due_ms: Optional[int] = None
 
     now = _now_ms()
 
@@ -176,13 +211,12 @@ def main() -> int:
 
         # existing supervisor from orch_state
         pinfo = procs.get(label) if isinstance(procs.get(label), dict) else {}
-        pid_val = pinfo.get("pid")
-        try:
-            pid_int = int(pid_val) if pid_val is not None else None
-        except Exception:
-            pid_int = None
+        pid_int = _int_or_none(pinfo.get("pid"))
+        start_int = _int_or_none(pinfo.get("start_time"))
 
-        is_alive = _pid_alive(pid_int)
+        is_alive = _pid_alive(pid_int, start_int)
+        if watcher is not None and not is_alive:
+            watcher.unwatch(label)
 
         st = labels_state.get(label) if isinstance(labels_state.get(label), dict) else {}
         hist = st.get("restart_history_ms") if isinstance(st.get("restart_history_ms"), list) else []
@@ -194,6 +228,23 @@ def main() -> int:
         blocked_flag = bool(st.get("blocked")) if "blocked" in st else False
         blocked_reason = st.get("blocked_reason")
 
+        # first time we saw it down: the exit notification if we got one, else this pass
+        down_since = _int_or_none(st.get("down_since_ts_ms"))
+        exit_code = st.get("last_exit_code")
+        if label in exits:
+            ex_ts, ex_code = exits[label]
+            down_since = min(down_since or ex_ts, ex_ts)
+            exit_code = ex_code if ex_code is not None else exit_code
+        if is_alive:
+            down_since = None
+        elif down_since is None:
+            down_since = now
+        old = _CHILDREN.get(label)
+        if old is not None and not is_alive:
+            old.poll()  # reap
+            exit_code = old.returncode if old.returncode is not None else exit_code
+            _CHILDREN.pop(label, None)
+
         # too many restarts -> block
         if (len(hist) >= MAX_RESTARTS) or (restart_count >= MAX_RESTARTS):
             blocked_flag = True
@@ -202,7 +253,10 @@ def main() -> int:
         if blocked_flag:
             # If blocked, ensure process is dead
             if is_alive:
-                _kill_pid(pid_int)
+                _kill_pid(pid_int, start_int, _child(label, pid_int))
+                if watcher is not None:
+                    watcher.unwatch(label)
+                _CHILDREN.pop(label, None)
             procs[label] = {
                 **(pinfo if isinstance(pinfo, dict) else {}),
                 "pid": None,
@@ -219,11 +273,15 @@ def main() -> int:
                 "restart_count": restart_count,
                 "last_checked_ts_ms": now,
                 "last_restart_ts_ms": last_restart_ts,
+                "down_since_ts_ms": down_since,
+                "last_exit_code": exit_code,
             }
             blocked.append(label)
             continue
 
         if is_alive:
+            if watcher is not None and pid_int is not None:
+                watcher.watch(label, pid_int, start_int, _child(label, pid_int))
             procs[label] = {
                 **(pinfo if isinstance(pinfo, dict) else {}),
                 "pid": pid_int,
@@ -239,6 +297,7 @@ def main() -> int:
                 "restart_count": restart_count,
                 "last_checked_ts_ms": now,
                 "last_restart_ts_ms": last_restart_ts,
+                "down_since_ts_ms": None,
             }
             alive_labels.append(label)
             continue
@@ -247,6 +306,8 @@ def main() -> int:
         backoff_sec = _backoff_for(restart_count)
         if last_restart_ts and (now - last_restart_ts) < int(backoff_sec * 1000):
             skipped_backoff.append(label)
+            due = last_restart_ts + int(backoff_sec * 1000)
+            next_due_ms = due if next_due_ms is None else min(next_due_ms, due)
             procs[label] = {
                 **(pinfo if isinstance(pinfo, dict) else {}),
                 "pid": None,
@@ -263,12 +324,20 @@ def main() -> int:
                 "restart_count": restart_count,
                 "last_checked_ts_ms": now,
                 "last_restart_ts_ms": last_restart_ts,
+                "down_since_ts_ms": down_since,
+                "last_exit_code": exit_code,
             }
             continue
 
         # restart
         info = _start_supervisor(label)
         restarted.append(label)
+        latency_ms = max(0, int(info["started_ts_ms"]) - int(down_since or now))
+        latencies[label] = latency_ms
+        lat_hist = st.get("restart_latency_ms") if isinstance(st.get("restart_latency_ms"), list) else []
+        lat_hist = (lat_hist + [latency_ms])[-LATENCY_KEEP:]
+        if watcher is not None:
+            watcher.watch(label, info["pid"], info.get("start_time"), _CHILDREN.get(label))
 
         hist = _prune_history_ms(hist + [now], now)
         restart_count = restart_count + 1
@@ -291,6 +360,10 @@ def main() -> int:
             "restart_count": restart_count,
             "last_restart_ts_ms": now,
             "last_checked_ts_ms": now,
+            "down_since_ts_ms": None,
+            "last_exit_code": exit_code,
+            "last_restart_latency_ms": latency_ms,
+            "restart_latency_ms": lat_hist,
         }
 
     orch_out = {"ts_ms": now, "procs": procs}
@@ -304,10 +377,57 @@ def main() -> int:
         f"blocked={len(blocked)} backoff_skips={len(skipped_backoff)}"
     )
     if restarted:
-        print("[watchdog] restarted:", ", ".join(restarted[:50]))
+        print("[watchdog] restarted:", ", ".join(f"{x}({latencies[x]}ms)" for x in restarted[:50]))
     if blocked:
         print("[watchdog] blocked:", ", ".join(blocked[:50]))
 
+    return {
+        "ts_ms": now,
+        "checked": checked,
+        "alive": alive_labels,
+        "restarted": restarted,
+        "blocked": blocked,
+        "backoff": skipped_backoff,
+        "restart_latency_ms": latencies,
+        "next_due_ms": next_due_ms,
+    }
+
+
+def run_loop(interval_sec: float = LOOP_INTERVAL_SEC, max_ticks: Optional[int] = None) -> int:
+    """
+    Long-running watchdog: a pass every interval_sec, or immediately when a
+    watched supervisor exits (or a backoff expires) instead of waiting for
+    the next poll.
+    """
+    watcher = ExitWatcher()
+    exits: Dict[str, Tuple[int, Optional[int]]] = {}
+    ticks = 0
+    try:
+        while max_ticks is None or ticks < max_ticks:
+            summary = tick(watcher, exits)
+            ticks += 1
+            exits = {}
+            timeout = float(interval_sec)
+            due = summary.get("next_due_ms")
+            if due:
+                timeout = min(timeout, max(0.0, (due - _now_ms()) / 1000.0))
+            for label, code in watcher.wait(timeout):
+                exits[label] = (_now_ms(), code)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Restart dead supervisor_ai_stack processes (one pass unless --loop).")
+    ap.add_argument("--loop", action="store_true", help="keep running; wake on supervisor exit")
+    ap.add_argument("--interval", type=float, default=LOOP_INTERVAL_SEC)
+    args = ap.parse_args(argv)
+    if args.loop:
+        return run_loop(args.interval)
+    tick()
     return 0
 
 
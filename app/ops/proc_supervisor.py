@@ -0,0 +1,460 @@
+"""
+proc_supervisor.py
+
+Process supervision primitives without shelling out to tasklist/taskkill/ps:
+
+- identity:   proc_start_time(pid) -> start time from /proc/<pid>/stat
+              (Linux) or GetProcessTimes (Windows); a pid is only "ours"
+              if the start time recorded at spawn still matches, so a
+              reused pid is reported dead instead of being killed
+- liveness:   pid_alive(pid, start_time)  (zombies count as dead)
+- spawn:      spawn(cmd, ...) puts the child in its own process group
+              (start_new_session / CREATE_NEW_PROCESS_GROUP)
+- terminate:  terminate(pid, start_time) SIGTERM to the group, wait
+              KILL_GRACE_SEC, then SIGKILL the group (CTRL_BREAK, then
+              TerminateProcess on Windows; TerminateProcess only kills the
+              leader, so its descendants are killed first via psutil when
+              installed and are otherwise left running)
+- exits:      ExitWatcher.wait(timeout) returns as soon as a watched
+              process exits: pidfds + poll on Linux, one blocking waiter
+              thread per process elsewhere (Popen.wait / process handle)
+- listing:    list_processes(match) from /proc (or psutil if installed)
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+IS_LINUX = sys.platform.startswith("linux")
+IS_WIN = os.name == "nt"
+
+KILL_GRACE_SEC = float(os.getenv("PROC_KILL_GRACE_SEC", "5.0"))
+POLL_SEC = float(os.getenv("PROC_POLL_SEC", "0.25"))  # only when no pidfd/handle wait is available
+
+try:
+    import psutil  # type: ignore
+except Exception:
+    psutil = None  # type: ignore
+
+_k32 = None
+if IS_WIN:
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        _k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        _k32.OpenProcess.restype = wintypes.HANDLE
+        _k32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+        _k32.WaitForSingleObject.restype = wintypes.DWORD
+        _k32.WaitForSingleObject.argtypes = (wintypes.HANDLE, wintypes.DWORD)
+        _k32.GetProcessTimes.argtypes = (wintypes.HANDLE,) + (ctypes.POINTER(wintypes.FILETIME),) * 4
+        _k32.GetExitCodeProcess.argtypes = (wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD))
+        _k32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    except Exception:
+        _k32 = None
+
+_SYNCHRONIZE = 0x00100000
+_QUERY_LIMITED = 0x1000
+_WAIT_TIMEOUT = 0x102
+_INFINITE = 0xFFFFFFFF
+_ERROR_ACCESS_DENIED = 5
+
+
+# =========================
+# IDENTITY / LIVENESS
+# =========================
+
+def _proc_stat(pid: int) -> Optional[Tuple[str, int]]:
+    # (state, starttime ticks) from /proc/<pid>/stat; comm may contain spaces/parens
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            s = f.read()
+        rest = s[s.rindex(b")") + 2:].split()
+        return rest[0].decode(), int(rest[19])
+    except Exception:
+        return None
+
+
+def _win_open(pid: int, access: int) -> Optional[int]:
+    if _k32 is None:
+        return None
+    h = _k32.OpenProcess(access, False, pid)
+    return h or None
+
+
+def _win_start_time(h: int) -> Optional[int]:
+    ft = [wintypes.FILETIME() for _ in range(4)]
+    if not _k32.GetProcessTimes(h, *[ctypes.byref(x) for x in ft]):
+        return None
+    return (ft[0].dwHighDateTime << 32) | ft[0].dwLowDateTime
+
+
+def proc_start_time(pid: Optional[int]) -> Optional[int]:
+    """Start time of pid in platform units (clock ticks / FILETIME), None if unknown or gone."""
+    if not isinstance(pid, int) or pid <= 0:
+        return None
+    if IS_LINUX:
+        st = _proc_stat(pid)
+        return st[1] if st else None
+    if _k32 is not None:
+        h = _win_open(pid, _QUERY_LIMITED)
+        if not h:
+            return None
+        try:
+            return _win_start_time(h)
+        finally:
+            _k32.CloseHandle(h)
+    if psutil is not None:
+        try:
+            return int(psutil.Process(pid).create_time() * 1000)
+        except Exception:
+            return None
+    return None
+
+
+def pid_alive(pid: Optional[int], start_time: Optional[int] = None) -> bool:
+    """True if pid is running (not a zombie) and, when given, still has start_time."""
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    if IS_LINUX:
+        st = _proc_stat(pid)
+        if st is None or st[0] in ("Z", "X", "x"):
+            return False
+        return start_time is None or st[1] == start_time
+    if _k32 is not None:
+        h = _win_open(pid, _SYNCHRONIZE | _QUERY_LIMITED)
+        if not h:
+            # exists but we may not query it; identity can't be verified then
+            return ctypes.get_last_error() == _ERROR_ACCESS_DENIED and start_time is None
+        try:
+            if _k32.WaitForSingleObject(h, 0) != _WAIT_TIMEOUT:
+                return False
+            return start_time is None or _win_start_time(h) == start_time
+        finally:
+            _k32.CloseHandle(h)
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        pass
+    except Exception:
+        return False
+    return start_time is None or proc_start_time(pid) in (None, start_time)
+
+
+def list_processes(match: str = "") -> Optional[List[Dict[str, Any]]]:
+    """[{pid, name, cmdline}] whose process name contains match (case-insensitive); None if unsupported."""
+    m = match.lower()
+    out: List[Dict[str, Any]] = []
+    if IS_LINUX:
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f"/proc/{pid}/cmdline", "rb") as f:
+                    argv = f.read().split(b"\0")
+            except Exception:
+                continue
+            name = os.path.basename(argv[0].decode("utf-8", errors="replace")) if argv and argv[0] else ""
+            if name and m in name.lower():
+                cmd = b" ".join(a for a in argv if a).decode("utf-8", errors="replace")
+                out.append({"pid": int(pid), "name": name, "cmdline": cmd})
+        return out
+    if psutil is not None:
+        for p in psutil.process_iter(["pid", "name", "cmdline"]):
+            try:
+                name = p.info["name"] or ""
+                cmd = " ".join(p.info["cmdline"] or [])
+            except Exception:
+                continue
+            if name and m in name.lower():
+                out.append({"pid": int(p.info["pid"]), "name": name, "cmdline": cmd})
+        return out
+    return None
+
+
+# =========================
+# SPAWN / TERMINATE
+# =========================
+
+def spawn(cmd: List[str], **kw: Any) -> subprocess.Popen:
+    """Popen in a new process group so terminate() can take the whole tree down."""
+    if IS_WIN:
+        kw["creationflags"] = kw.get("creationflags", 0) | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kw.setdefault("start_new_session", True)
+    return subprocess.Popen(cmd, **kw)
+
+
+def _wait_gone(pid: int, start_time: Optional[int], timeout: float, popen: Optional[subprocess.Popen]) -> bool:
+    if popen is not None:
+        try:
+            popen.wait(timeout=timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+    if IS_LINUX and hasattr(os, "pidfd_open"):
+        try:
+            fd = os.pidfd_open(pid)
+        except Exception:
+            return not pid_alive(pid, start_time)
+        try:
+            # a pidfd opened after a pid reuse would watch the wrong process
+            if not pid_alive(pid, start_time):
+                return True
+            select.select([fd], [], [], timeout)
+        finally:
+            os.close(fd)
+        return not pid_alive(pid, start_time)
+    deadline = time.monotonic() + timeout
+    while pid_alive(pid, start_time):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(min(0.05, POLL_SEC))
+    return True
+
+
+def _win_descendants(pid: int) -> List[Any]:
+    # without psutil there is no walk of the tree; only the leader gets killed
+    if psutil is None:
+        return []
+    try:
+        return list(psutil.Process(pid).children(recursive=True))
+    except Exception:
+        return []
+
+
+def terminate(
+    pid: Optional[int],
+    start_time: Optional[int] = None,
+    grace_sec: Optional[float] = None,
+    popen: Optional[subprocess.Popen] = None,
+) -> str:
+    """
+    Stop pid and its process group. Returns "gone" (nothing to do, including
+    a pid that now belongs to someone else), "term" or "kill".
+
+    On Windows the hard kill is TerminateProcess, which only stops the
+    leader; its descendants are killed too when psutil is installed.
+    """
+    if not pid_alive(pid, start_time):
+        if popen is not None:
+            popen.poll()
+        return "gone"
+    grace = KILL_GRACE_SEC if grace_sec is None else float(grace_sec)
+
+    if IS_WIN:
+        try:
+            os.kill(pid, signal.CTRL_BREAK_EVENT)  # type: ignore[attr-defined]
+        except Exception:
+            pass
+        if _wait_gone(pid, start_time, grace, popen):
+            return "term"
+        if pid_alive(pid, start_time):
+            # TerminateProcess has no group form: kill the descendants ourselves
+            for child in _win_descendants(pid):
+                try:
+                    child.kill()
+                except Exception:
+                    pass
+            try:
+                os.kill(pid, signal.SIGTERM)  # TerminateProcess
+            except Exception:
+                pass
+        if popen is not None:
+            popen.poll()
+        return "kill"
+
+    try:
+        pgid = os.getpgid(pid)
+    except Exception:
+        pgid = None
+    group = pgid == pid  # only signal groups we lead; never our own group
+
+    def _send(sig: int) -> None:
+        try:
+            if group:
+                os.killpg(pgid, sig)
+            else:
+                os.kill(pid, sig)
+        except Exception:
+            pass
+
+    _send(signal.SIGTERM)
+    if _wait_gone(pid, start_time, grace, popen):
+        if group:
+            try:
+                os.killpg(pgid, 0)  # leader gone, stragglers left in its group?
+            except Exception:
+                return "term"
+            _send(signal.SIGKILL)
+        return "term"
+    _send(signal.SIGKILL)
+    _wait_gone(pid, start_time, 1.0, popen)
+    return "kill"
+
+
+# =========================
+# EXIT NOTIFICATION
+# =========================
+
+class ExitWatcher:
+    """
+    Blocks until one of the watched processes exits.
+
+    watch(key, pid, start_time, popen) registers a process (re-registering
+    a key replaces it); wait(timeout) returns [(key, exit_code or None)]
+    for processes that exited, or [] on timeout / wake(). Children we
+    spawned (popen given) are reaped and report their exit code.
+    """
+
+    def __init__(self) -> None:
+        self._pidfd = IS_LINUX and hasattr(os, "pidfd_open")
+        self._lock = threading.Lock()
+        self._procs: Dict[str, Tuple[int, Optional[int], Optional[subprocess.Popen], int]] = {}
+        self._ready: List[Tuple[str, Optional[int]]] = []
+        self._gen = 0
+        if self._pidfd:
+            self._fds: Dict[int, str] = {}
+            self._poll = select.poll()
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+            self._poll.register(self._wake_r, select.POLLIN)
+        else:
+            self._q: "queue.Queue[Tuple[str, int, Optional[int]]]" = queue.Queue()
+
+    def watching(self, key: str) -> Optional[Tuple[int, Optional[int]]]:
+        p = self._procs.get(key)
+        return (p[0], p[1]) if p else None
+
+    def watch(self, key: str, pid: int, start_time: Optional[int] = None, popen: Optional[subprocess.Popen] = None) -> None:
+        cur = self._procs.get(key)
+        if cur and cur[0] == pid and cur[1] == start_time:
+            if popen is not None and cur[2] is None:
+                self._procs[key] = (pid, start_time, popen, cur[3])
+            return
+        self.unwatch(key)
+        with self._lock:
+            self._gen += 1
+            gen = self._gen
+            self._procs[key] = (pid, start_time, popen, gen)
+        if self._pidfd:
+            try:
+                fd = os.pidfd_open(pid)
+            except Exception:
+                self._finish(key)
+                return
+            if not pid_alive(pid, start_time) and (popen is None or popen.poll() is not None):
+                os.close(fd)
+                self._finish(key)
+                return
+            self._fds[fd] = key
+            self._poll.register(fd, select.POLLIN)
+            return
+        threading.Thread(target=self._waiter, args=(key, pid, start_time, popen, gen), daemon=True,
+                         name=f"exitwatch-{key}").start()
+
+    def unwatch(self, key: str) -> None:
+        with self._lock:
+            self._procs.pop(key, None)
+        if self._pidfd:
+            for fd, k in list(self._fds.items()):
+                if k == key:
+                    self._poll.unregister(fd)
+                    os.close(fd)
+                    del self._fds[fd]
+        self._ready = [r for r in self._ready if r[0] != key]
+
+    def wake(self) -> None:
+        if self._pidfd:
+            try:
+                os.write(self._wake_w, b"\0")
+            except Exception:
+                pass
+        else:
+            self._q.put(("", -1, None))
+
+    def wait(self, timeout: Optional[float]) -> List[Tuple[str, Optional[int]]]:
+        if not self._ready:
+            if self._pidfd:
+                ms = None if timeout is None else max(0, int(timeout * 1000))
+                for fd, _ev in self._poll.poll(ms):
+                    if fd == self._wake_r:
+                        try:
+                            while os.read(self._wake_r, 64):
+                                pass
+                        except Exception:
+                            pass
+                        continue
+                    key = self._fds.pop(fd, None)
+                    self._poll.unregister(fd)
+                    os.close(fd)
+                    if key is not None:
+                        self._finish(key)
+            else:
+                try:
+                    item = self._q.get(timeout=timeout)
+                    while True:
+                        self._take(*item)
+                        item = self._q.get_nowait()
+                except queue.Empty:
+                    pass
+        out, self._ready = self._ready, []
+        return out
+
+    def close(self) -> None:
+        for key in list(self._procs):
+            self.unwatch(key)
+        if self._pidfd:
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+
+    def _finish(self, key: str) -> None:
+        with self._lock:
+            p = self._procs.pop(key, None)
+        if p is None:
+            return
+        code = None
+        if p[2] is not None:
+            try:
+                code = p[2].wait(timeout=1.0)  # reap; the pidfd fires once it is a zombie
+            except Exception:
+                code = p[2].poll()
+        self._ready.append((key, code))
+
+    def _take(self, key: str, gen: int, code: Optional[int]) -> None:
+        with self._lock:
+            p = self._procs.get(key)
+            if p is None or p[3] != gen:
+                return  # stale: unwatched or replaced meanwhile
+            del self._procs[key]
+        self._ready.append((key, code))
+
+    def _waiter(self, key: str, pid: int, start_time: Optional[int], popen: Optional[subprocess.Popen], gen: int) -> None:
+        code: Optional[int] = None
+        try:
+            if popen is not None:
+                code = popen.wait()
+            elif _k32 is not None:
+                h = _win_open(pid, _SYNCHRONIZE | _QUERY_LIMITED)
+                if h:
+                    try:
+                        if start_time is None or _win_start_time(h) == start_time:
+                            _k32.WaitForSingleObject(h, _INFINITE)
+                    finally:
+                        _k32.CloseHandle(h)
+            else:
+                while pid_alive(pid, start_time):
+                    time.sleep(POLL_SEC)
+                    if self._procs.get(key, (0, 0, 0, -1))[3] != gen:
+                        return
+        except Exception:
+            pass
+        self._q.put((key, gen, code))
@@ -1,21 +1,22 @@
 from pathlib import Path
-import json, statistics, sys
+import json, os, statistics, sys
 
-ROOT = Path(r"C:\flashback")
+ROOT = Path(__file__).resolve().parents[2]
 STATE = ROOT / "state"
 SB_DIR = STATE / "scoreboard"
 
-INP = SB_DIR / "scoreboard.v1.json"
+# same location (and override) as app/ai/scoreboard_builder_v1.py writes to
+INP = Path(os.getenv("SCOREBOARD_PATH", str(STATE / "ai_memory" / "scoreboard.v1.json")))
 OUT = SB_DIR / "scoreboard.v1.confidence.json"
 
 SHRINK_K = 50  # strength of prior
 
 if not INP.exists():
-    sys.exit("❌ Missing scoreboard.v1.json")
+    sys.exit(f"❌ Missing {INP}")
 
 data = json.loads(INP.read_text(encoding="utf-8"))
 
-rows = data.get("rows") or data.get("scoreboard") or []
+rows = data.get("rows") or data.get("scoreboard") or data.get("buckets") or []
 if not rows:
     sys.exit("❌ No rows found in scoreboard")
 
@@ -36,6 +37,7 @@ for r in rows:
     r["prior_expectancy"] = round(prior, 6)
 
 # --- Write output ---
+OUT.parent.mkdir(parents=True, exist_ok=True)
 OUT.write_text(json.dumps({
     "schema": "scoreboard.v1.confidence",
     "generated_from": "scoreboard.v1",
@@ -11,8 +11,5 @@ if ($OnlyLabels -ne "") {
   Remove-Item Env:ORCH_ONLY_LABELS -ErrorAction SilentlyContinue | Out-Null
 }
 
-Write-Host "watchdog_loop running every $IntervalSec sec. Ctrl+C to stop."
-while ($true) {
-  python -m app.ops.orchestrator_watchdog | Out-Host
-  Start-Sleep -Seconds $IntervalSec
-}
+Write-Host "watchdog_loop running every $IntervalSec sec (and on supervisor exit). Ctrl+C to stop."
+python -m app.ops.orchestrator_watchdog --loop --interval $IntervalSec | Out-Host
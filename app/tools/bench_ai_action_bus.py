@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ai_action_bus since-ts queries on a large synthetic bus.
+
+Writes --n envelope rows (--labels accounts, 1 ms apart) to a temp bus, then:
+
+  legacy:    full scan from byte 0 (old read_actions), since-ts near the end
+  build:     one-off sidecar index build
+  indexed:   read_actions via the sparse index (recent / middle / label)
+  cursor:    named cursor resume after "restart" (new object, same name)
+  rotation:  seal into segments while appending; query + cursor across them
+
+Usage:
+    python -m app.tools.bench_ai_action_bus [--n 1000000] [--labels 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import orjson
+
+from app.core import ai_action_bus, ai_action_index
+
+
+def _write_bus(path: Path, n: int, labels: int, t0: int) -> None:
+    with path.open("wb") as f:
+        buf = []
+        for i in range(n):
+            label = f"flashback{i % labels:02d}" if i % 5 else "main"
+            buf.append(orjson.dumps({
+                "ts_ms": t0 + i,
+                "source": "ai_pilot",
+                "label": label,
+                "dry_run": True,
+                "action": {"type": "advice_only", "symbol": "BTCUSDT", "side": "Buy", "qty": 1, "confidence": 0.7, "i": i},
+            }) + b"\n")
+            if len(buf) >= 10000:
+                f.write(b"".join(buf))
+                buf.clear()
+        f.write(b"".join(buf))
+
+
+def _ms(fn, reps: int = 1):
+    t = time.perf_counter()
+    for _ in range(reps):
+        out = fn()
+    return (time.perf_counter() - t) * 1000.0 / reps, out
+
+
+def _point_bus(path: Path) -> None:
+    ai_action_bus.ACTION_LOG_PATH = path
+    ai_action_index._INDEXES.clear()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--labels", type=int, default=8)
+    ap.add_argument("--reps", type=int, default=50)
+    args = ap.parse_args()
+
+    t0 = 1_760_000_000_000
+    with tempfile.TemporaryDirectory() as td:
+        bus = Path(td) / "ai_actions.jsonl"
+        t = time.perf_counter()
+        _write_bus(bus, args.n, args.labels, t0)
+        print(f"=== ai_action_bus benchmark n={args.n} size={bus.stat().st_size / 1e6:.0f}MB "
+              f"(written in {time.perf_counter() - t:.1f}s) every={ai_action_index.INDEX_EVERY} ===")
+        _point_bus(bus)
+
+        recent = t0 + args.n - 200
+        middle = t0 + args.n // 2
+        legacy_ms, legacy_rows = _ms(lambda: ai_action_bus._scan_actions(recent, 500))
+        build_ms, _ = _ms(lambda: ai_action_index.get_segment_index(bus).catch_up())
+        idx = ai_action_index.get_segment_index(bus)
+        print(f"legacy scan (since=recent)     {legacy_ms:10.1f}ms rows={len(legacy_rows)}")
+        print(f"index build (one-off)          {build_ms:10.1f}ms marks={len(idx.g_off)} "
+              f"label_marks={sum(len(v) for v in idx.labels.values())} idx={idx.idx_path.stat().st_size / 1e3:.0f}KB")
+
+        for name, since, label in (
+            ("recent", recent, None),
+            ("middle", middle, None),
+            ("recent+label", recent, "flashback03"),
+            ("middle+label", middle, "main"),
+        ):
+            ms, rows = _ms(lambda: ai_action_bus.read_actions(since, 500, label=label), args.reps)
+            expect = ai_action_bus._scan_actions(since, 500, label)
+            ok = [r["action"]["i"] for r in rows] == [r["action"]["i"] for r in expect]
+            print(f"indexed {name:<22} {ms:10.3f}ms rows={len(rows)} matches_scan={ok}")
+
+        # append + incremental catch-up
+        ai_action_bus.append_actions([{"type": "advice_only", "symbol": "ETHUSDT"}] * 100, label="main")
+        ms, rows = _ms(lambda: ai_action_bus.read_actions(int(time.time() * 1000) - 60_000, 500))
+        print(f"append 100 + query (catch-up)  {ms:10.3f}ms rows={len(rows)}")
+
+        # cursors: resume after restart is a seek, not a rescan
+        cdir = Path(td) / "cursors"
+        c = ai_action_index.ActionCursor("router", bus, start="begin", cursor_dir=cdir)
+        c.poll(limit=args.n // 2)
+        c.commit()
+        ms, c2 = _ms(lambda: ai_action_index.ActionCursor("router", bus, cursor_dir=cdir))
+        pms, rows = _ms(lambda: c2.poll(limit=10))
+        print(f"cursor reopen {ms:8.3f}ms first poll {pms:8.3f}ms resumed_at_i={rows[0]['action']['i']} "
+              f"(expected {args.n // 2})")
+
+        # rotation across segments
+        rbus = Path(td) / "rot" / "ai_actions.jsonl"
+        rbus.parent.mkdir()
+        _point_bus(rbus)
+        rc = ai_action_index.ActionCursor("rot", rbus, start="begin", cursor_dir=cdir)
+        seen = 0
+        for k in range(200):
+            ai_action_bus.append_actions([{"type": "advice_only", "k": k, "j": j} for j in range(100)], label="main")
+            with ai_action_index.writer_lock(rbus):
+                ai_action_index.rotate_if_needed(rbus, max_bytes=400_000)
+            if k % 7 == 0:
+                seen += len(rc.poll(limit=100_000))
+                rc.commit()
+        seen += len(rc.poll(limit=100_000))
+        segs = ai_action_index.load_segments(rbus)
+        total = len(ai_action_bus.read_actions(0, 10**9))
+        print(f"rotation segments={len(segs)} query_total={total} cursor_seen={seen} "
+              f"consistent={total == seen == 200 * 100}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: AI state snapshot, full rebuild per poll vs versioned service.
+
+Drives the real bus readers against temp bus files:
+
+  positions_bus.json  rewritten every poll (touch loop, same rows), rows
+                      change every --pos-every polls
+  orderbook_bus.json  --symbols books x 50 levels, rewritten every
+                      --ob-every polls
+  orders_bus.json     rewritten every --orders-every polls
+  wallet bus          fed once via apply_ws_wallet
+
+legacy = a fresh AiStateService per poll (every section rebuilt, policies
+evaluated every poll). service = one shared AiStateService, policies only
+when the version moves (ai_pilot AI_PILOT_SKIP_UNCHANGED).
+
+Usage:
+    python -m app.tools.bench_ai_state [--polls 300] [--symbols 8] [--ob-every 10]
+"""
+
+from __future__ import annotations
+
+import os
+
+os.environ.setdefault("EXEC_DRY_RUN", "true")
+# bus metrics go nowhere; bus files are redirected to a temp dir in main()
+os.environ["POSITION_BUS_METRICS_EXPORT_SEC"] = "0"
+os.environ["WALLET_BUS_METRICS_EXPORT_SEC"] = "0"
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import orjson
+
+from app.core import ai_state_bus as asb
+from app.core import market_bus as mb
+from app.core import orders_bus as ob
+from app.core import position_bus as pb
+from app.core import wallet_bus as wb
+
+
+def _write(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(orjson.dumps(data))
+    os.replace(tmp, path)
+
+
+def _positions(syms: List[str], gen: int) -> Dict[str, Any]:
+    rows = [{"symbol": s, "side": "Buy", "size": str(1 + gen % 3), "avgPrice": str(100 + i)}
+            for i, s in enumerate(syms)]
+    # a few ms old: position_bus treats a same-millisecond updated_ms as "no age"
+    return {"version": 1, "updated_ms": asb._now_ms() - 5, "labels": {"main": {"category": "linear", "positions": rows}}}
+
+
+def _books(syms: List[str], gen: int) -> Dict[str, Any]:
+    out = {}
+    for i, s in enumerate(syms):
+        mid = 100 + i + gen * 0.1
+        out[s] = {
+            "bids": [[f"{mid - 0.1 * (k + 1):.2f}", "1.5"] for k in range(50)],
+            "asks": [[f"{mid + 0.1 * (k + 1):.2f}", "1.5"] for k in range(50)],
+            "ts_ms": asb._now_ms(),
+        }
+    return {"updated_ms": asb._now_ms(), "symbols": out}
+
+
+def _orders(gen: int) -> Dict[str, Any]:
+    return {"version": 1, "updated_ms": asb._now_ms(),
+            "events": [{"orderId": f"o{k}", "orderStatus": "New"} for k in range(gen % 60)]}
+
+
+def run(mode: str, args, td: Path) -> Dict[str, Any]:
+    syms = [f"SYM{i}USDT" for i in range(args.symbols)]
+    asb._SERVICES.clear()
+    pos_gen = ob_gen = ord_gen = 0
+    _write(pb.POS_SNAPSHOT_PATH, _positions(syms, pos_gen))
+    _write(mb.ORDERBOOK_PATH_LABELED, _books(syms, ob_gen))
+    _write(ob.ORDERS_BUS_PATH, _orders(ord_gen))
+
+    def make() -> asb.AiStateService:
+        return asb.AiStateService("main", include_orderbook=True, include_trades=False, trades_limit=0)
+
+    svc = make()
+    evals = 0
+    last_version = None
+    wall = cpu = 0.0
+    builds: List[float] = []
+    for i in range(1, args.polls + 1):
+        # bus writers between polls
+        if i % args.pos_every == 0:
+            pos_gen += 1
+        _write(pb.POS_SNAPSHOT_PATH, _positions(syms, pos_gen))
+        if i % args.ob_every == 0:
+            ob_gen += 1
+            _write(mb.ORDERBOOK_PATH_LABELED, _books(syms, ob_gen))
+        if i % args.orders_every == 0:
+            ord_gen += 1
+            _write(ob.ORDERS_BUS_PATH, _orders(ord_gen))
+
+        c0, t0 = time.process_time(), time.perf_counter()
+        if mode == "legacy":
+            snap = make().current()
+            evals += 1
+        else:
+            snap = svc.current()
+            if snap.version != last_version:
+                last_version = snap.version
+                evals += 1
+        ok, errs = asb.validate_snapshot_v2(snap)
+        assert ok, errs
+        wall += time.perf_counter() - t0
+        cpu += time.process_time() - c0
+        builds.append(snap.build_ms)
+
+    builds.sort()
+    return {
+        "ms_per_poll": wall * 1000.0 / args.polls,
+        "cpu_ms_per_poll": cpu * 1000.0 / args.polls,
+        "build_ms_p50": builds[len(builds) // 2],
+        "build_ms_p99": builds[min(len(builds) - 1, int(len(builds) * 0.99))],
+        "policy_evals": evals,
+        "section_builds": svc.section_builds if mode == "service" else None,
+        "symbols_in_snapshot": len(snap.get("symbols") or {}),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--polls", type=int, default=300)
+    ap.add_argument("--symbols", type=int, default=8)
+    ap.add_argument("--pos-every", type=int, default=50)
+    ap.add_argument("--ob-every", type=int, default=10)
+    ap.add_argument("--orders-every", type=int, default=25)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td_s:
+        td = Path(td_s)
+        pb.STATE_DIR = td
+        pb.POS_SNAPSHOT_PATH = td / "positions_bus.json"
+        pb.METRICS_PATH = td / "position_bus_metrics.json"
+        mb.ORDERBOOK_PATH_LABELED = td / "orderbook_bus_main.json"
+        mb.ORDERBOOK_PATH_LEGACY = td / "orderbook_bus.json"
+        mb.TRADES_PATH_LABELED = td / "trades_bus_main.json"
+        mb.TRADES_PATH_LEGACY = td / "trades_bus.json"
+        ob.ORDERS_BUS_PATH = td / "orders_bus.json"
+        wb.STATE_DIR = td
+        wb.METRICS_PATH = td / "wallet_bus_metrics.json"
+        wb.apply_ws_wallet([{"accountMMRate": "0.004", "coin": [{"coin": "USDT", "equity": "10000"}]}], "main")
+
+        print(f"=== ai_state benchmark polls={args.polls} symbols={args.symbols} pos_every={args.pos_every} "
+              f"ob_every={args.ob_every} orders_every={args.orders_every} ===")
+        res = {m: run(m, args, td) for m in ("legacy", "service")}
+        print(f"{'mode':8s} {'ms/poll':>9s} {'cpu ms/poll':>12s} {'build p50':>10s} {'build p99':>10s} "
+              f"{'policy evals':>13s}")
+        for m, r in res.items():
+            print(f"{m:8s} {r['ms_per_poll']:9.3f} {r['cpu_ms_per_poll']:12.3f} {r['build_ms_p50']:10.3f} "
+                  f"{r['build_ms_p99']:10.3f} {r['policy_evals']:13d}")
+        print(f"service section_builds={res['service']['section_builds']} "
+              f"symbols={res['service']['symbols_in_snapshot']}")
+
+
+if __name__ == "__main__":
+    main()
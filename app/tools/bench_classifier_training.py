@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: regime classifier training, full rebuild vs incremental retrain.
+
+Writes a synthetic state/feature_store.jsonl (feature_builder format:
+feature rows, with the matching outcome rows arriving later and joined on
+trade_id) into a temp dir, then runs app.ai.classifier_training:
+
+  cold        empty cache: parse everything, fit every fold + final model
+  no-op       nothing appended: manifest stat only
+  +N weeks    --append-weeks of new setups/outcomes appended; only the new
+              folds and the final models are refit
+  full        full=True on the grown data (what every retrain used to be)
+
+Then checks that a running trade_classifier picks up the republished
+models from the manifest without a restart.
+
+Usage:
+    python -m app.tools.bench_classifier_training [--weeks 20] [--per-week 100] [--append-weeks 1] [--workers 0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import math
+import os
+import random
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+import orjson
+
+from app.ai import classifier_training as ct
+
+REGIMES = ("trend", "range", "high_vol")
+WEEK_MS = 7 * 86_400_000
+T0_MS = 1_735_689_600_000  # 2025-01-01
+
+
+def _weights(regime: str) -> List[float]:
+    rng = random.Random(sum(map(ord, regime)))
+    return [rng.uniform(-1.2, 1.2) for _ in range(8)]
+
+
+def gen_week(rng: random.Random, week: int, per_week: int, start_id: int) -> List[Dict]:
+    rows: List[Dict] = []
+    outcomes: Dict[str, Dict] = {}
+    tid = start_id
+    for regime in REGIMES:
+        w = _weights(regime)
+        for _ in range(per_week):
+            tid += 1
+            ts = T0_MS + week * WEEK_MS + rng.randrange(WEEK_MS)
+            x = [rng.gauss(0, 1) for _ in range(8)]
+            side = rng.choice((1, -1))
+            z = sum(a * b for a, b in zip(w, x)) * 0.8 + 0.2 * side
+            win = rng.random() < 1.0 / (1.0 + math.exp(-z))
+            rows.append({
+                "trade_id": f"t{tid}",
+                "symbol": "BTCUSDT",
+                "ts_open_ms": ts,
+                "hour_utc": (ts // 3_600_000) % 24,
+                "dow": ((ts // 86_400_000) + 3) % 7,
+                "regime": regime,
+                "atr_pct": abs(x[0]),
+                "vol_zscore": x[1],
+                "adx": 25.0 if regime == "trend" else 12.0,
+                "f.side_sign": side,
+                "f.atr_like": abs(x[2]),
+                "f.range_mean": x[3],
+                "f.range_std": abs(x[4]),
+                "f.trend_dir": x[5],
+                "f.trend_strength": x[6],
+            })
+            outcomes[f"t{tid}"] = {
+                "trade_id": f"t{tid}",
+                "ts_open_ms": ts,
+                "regime": "range",
+                "r_multiple": (1.0 if win else -1.0) * (0.5 + abs(x[7])),
+                "win": win,
+            }
+    rows.sort(key=lambda r: r["ts_open_ms"])
+    # outcomes land after their features, interleaved with later setups
+    out: List[Dict] = []
+    lag = max(1, len(rows) // 10)
+    for i, r in enumerate(rows):
+        out.append(r)
+        if i >= lag:
+            out.append(outcomes[rows[i - lag]["trade_id"]])
+    for r in rows[-lag:]:
+        out.append(outcomes[r["trade_id"]])
+    return out
+
+
+def append(path: Path, rows: List[Dict]) -> None:
+    with open(path, "ab") as f:
+        for r in rows:
+            f.write(orjson.dumps(r) + b"\n")
+
+
+def line(name: str, s: Dict) -> None:
+    c = s["cache"]
+    print(f"{name:10s} {s['elapsed_s']:7.2f}s  sync={s['sync_s']:.3f}s bytes={c['bytes_read']:>9} "
+          f"samples+={c['samples_added']:>5} buckets_written={c['buckets_written']:>3}  "
+          f"folds fit/cached={s['folds_fit']}/{s['folds_cached']} finals={s['finals_fit']}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--weeks", type=int, default=20)
+    ap.add_argument("--per-week", type=int, default=100, help="setups per week per regime")
+    ap.add_argument("--append-weeks", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=0)
+    args = ap.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    rng = random.Random(7)
+    if importlib.util.find_spec("sklearn") is not None:
+        base = "sklearn LogisticRegression"
+    else:
+        base = "pure-Python LogitModel (no sklearn)"
+    print(f"=== classifier training benchmark weeks={args.weeks} per_week={args.per_week} regimes={len(REGIMES)} "
+          f"cores={os.cpu_count()} workers={workers} base={base} ===")
+
+    with tempfile.TemporaryDirectory() as td_s:
+        td = Path(td_s)
+        src, cache_dir, models_dir = td / "feature_store.jsonl", td / "training_cache", td / "models"
+        kw = dict(source=src, cache_dir=cache_dir, models_dir=models_dir, params=ct.TrainParams(),
+                  workers=workers)
+
+        tid = 0
+        for wk in range(args.weeks):
+            append(src, gen_week(rng, wk, args.per_week, tid))
+            tid += args.per_week * len(REGIMES)
+        print(f"source     {src.stat().st_size / 1e6:.1f} MB")
+
+        cold = ct.run(full=True, **kw)
+        line("cold", cold)
+        noop = ct.run(**kw)
+        line("no-op", noop)
+
+        # a running classifier serving the published models
+        from app.core import trade_classifier as tc
+
+        tc.MODELS_DIR = models_dir
+        tc.MODELS_MANIFEST = models_dir / ct.MANIFEST_NAME
+        tc._MODEL_LOADED = False
+        sig = {"side": "buy", "atr_pct": 0.8, "range_mean": 0.5, "trend_dir": 1.0, "ts": T0_MS, "regime": "trend"}
+        r1 = tc.classify(sig, "bench")
+        v1 = orjson.loads((models_dir / "setup_classifier_trend_meta.json").read_bytes())["model_version"]
+
+        for wk in range(args.weeks, args.weeks + args.append_weeks):
+            append(src, gen_week(rng, wk, args.per_week, tid))
+            tid += args.per_week * len(REGIMES)
+        inc = ct.run(**kw)
+        line(f"+{args.append_weeks}w", inc)
+
+        tc._NEXT_RELOAD_CHECK = 0.0  # skip the CLASSIFIER_RELOAD_CHECK_SEC wait
+        r2 = tc.classify(sig, "bench")
+        v2 = orjson.loads((models_dir / "setup_classifier_trend_meta.json").read_bytes())["model_version"]
+
+        full = ct.run(full=True, **kw)
+        line("full", full)
+        print(f"retrain    incremental/full = {inc['elapsed_s'] / full['elapsed_s']:.0%}  "
+              f"speedup {full['elapsed_s'] / inc['elapsed_s']:.1f}x")
+
+        for regime, status in full["regimes"].items():
+            print(f"regime     {regime:9s} {status}")
+        rep = orjson.loads((models_dir / "reports" / "setup_classifier_trend_report.json").read_bytes())
+        oos = rep["oos"]
+        print(f"report     trend oos n={oos['n']} auc={oos['auc']} logloss={oos['logloss']} brier={oos['brier']} "
+              f"ece={oos['ece']} folds={len(rep['folds'])}")
+        print(f"pickup     score {r1['score']:.4f} -> {r2['score']:.4f}  version {v1[:8]} -> {v2[:8]}  "
+              f"reloaded={v1 != v2 and r1['score'] != r2['score']}")
+        same_pred = inc["regimes"] == full["regimes"]
+        print(f"consistent incremental == full rebuild statuses: {same_pred}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: cockpit API read path and governance flags, before/after the
+read model.
+
+HTTP (local load generator, keep-alive connections, --threads x --seconds):
+  legacy        GET /legacy/subaccounts   open + json.load both state files
+  cached        GET /cached/subaccounts   read_model view, 200 + body
+  cached+etag   GET /cached/subaccounts   client sends If-None-Match -> 304
+
+The server is a stdlib ThreadingHTTPServer wrapping the same handler logic
+the FastAPI routes use, so the numbers don't depend on fastapi/uvicorn
+being installed. Pass --url to point the load generator at a running
+cockpit (uvicorn app.api.cockpit_api:app) instead.
+
+Governance (in-process):
+  get_governance  yaml.safe_load per call vs cached merged view
+  set_flag        load + dump yaml per call vs journal append (write-behind)
+
+Usage:
+    python -m app.tools.bench_cockpit_api [--subaccounts 60] [--threads 8] [--seconds 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import yaml
+
+from app.api import read_model as rm
+from app.governance import district_governance as dg
+
+try:
+    from app.api.subaccounts_api import _build_subaccounts
+except ImportError:  # fastapi missing: same merge as the route
+    def _build_subaccounts(state, gov_state):
+        if not isinstance(state, dict):
+            return []
+        governance = (gov_state or {}).get('districts', {}) if isinstance(gov_state, dict) else {}
+        return [dict(sa, **governance.get(sa.get('subaccount_uid'), {})) for sa in state.get('subaccounts', [])]
+
+
+def legacy_subaccounts(state_file: str, gov_file: str):
+    # app/api/subaccounts_api.get_subaccounts before the read model
+    if not os.path.exists(state_file):
+        return []
+    with open(state_file, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    subaccounts = state.get('subaccounts', [])
+    governance = {}
+    if os.path.exists(gov_file):
+        with open(gov_file, 'r', encoding='utf-8') as f:
+            governance = json.load(f).get('districts', {})
+    for sa in subaccounts:
+        gid = sa['subaccount_uid']
+        if gid in governance:
+            sa.update(governance[gid])
+    return subaccounts
+
+
+def make_server(state_file: str, gov_file: str) -> Tuple[ThreadingHTTPServer, rm.JsonView]:
+    view = rm.JsonView([rm.CachedJsonFile(state_file), rm.CachedJsonFile(gov_file)], _build_subaccounts)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, *a):  # quiet
+            pass
+
+        def do_GET(self):
+            headers: Dict[str, str] = {}
+            if self.path.startswith('/legacy/'):
+                status = 200
+                # FastAPI's default JSONResponse encoding
+                body = json.dumps(legacy_subaccounts(state_file, gov_file), separators=(',', ':')).encode()
+            else:
+                status, body, headers = rm.conditional_response(view, self.headers.get('If-None-Match'))
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, view
+
+
+def load(host: str, port: int, path: str, threads: int, seconds: float, etag: bool) -> Tuple[float, Dict[int, int], int]:
+    counts: List[Dict[int, int]] = [dict() for _ in range(threads)]
+    nbytes = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def worker(i: int) -> None:
+        conn = http.client.HTTPConnection(host, port, timeout=10)
+        tag: Optional[str] = None
+        while time.perf_counter() < stop:
+            hdrs = {'If-None-Match': tag} if (etag and tag) else {}
+            conn.request('GET', path, headers=hdrs)
+            r = conn.getresponse()
+            body = r.read()
+            nbytes[i] += len(body)
+            counts[i][r.status] = counts[i].get(r.status, 0) + 1
+            tag = r.getheader('ETag') or tag
+        conn.close()
+
+    ths = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    t = time.perf_counter()
+    for th in ths:
+        th.start()
+    for th in ths:
+        th.join()
+    el = time.perf_counter() - t
+    total: Dict[int, int] = {}
+    for c in counts:
+        for k, v in c.items():
+            total[k] = total.get(k, 0) + v
+    return sum(total.values()) / el, total, sum(nbytes)
+
+
+def bench_governance(td: Path, n: int) -> None:
+    gov = td / 'governance.yaml'
+    districts = {'default': {'autonomy_enabled': False, 'telegram_enabled': False, 'trading_enabled': False,
+                             'strategy_locked': False, 'last_command': 'system_init', 'updated_at': None}}
+    for i in range(40):
+        districts[f'sub{i}'] = {'trading_enabled': bool(i % 2), 'last_command': 'ui:init', 'updated_at': 0}
+    gov.write_text(yaml.safe_dump({'districts': districts}), encoding='utf-8')
+
+    def legacy_get(uid):
+        with open(gov, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {'districts': {}}
+        return {**data['districts'].get('default', {}), **data['districts'].get(uid, {})}
+
+    def legacy_set(uid, flag, value):
+        with open(gov, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {'districts': {}}
+        data['districts'].setdefault(uid, {})[flag] = value
+        with open(gov, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(data, f)
+
+    m = max(1, n // 10)
+    t = time.perf_counter()
+    for i in range(m):
+        legacy_get(f'sub{i % 40}')
+    lg = (time.perf_counter() - t) * 1e6 / m
+    t = time.perf_counter()
+    for i in range(m):
+        legacy_set(f'sub{i % 40}', 'trading_enabled', bool(i % 2))
+    ls = (time.perf_counter() - t) * 1e6 / m
+
+    dg.GOV_FILE = gov
+    dg.JOURNAL_FILE = td / 'governance.journal.jsonl'
+    dg._data = None
+    t = time.perf_counter()
+    for i in range(n):
+        dg.get_governance(f'sub{i % 40}')
+    cg = (time.perf_counter() - t) * 1e6 / n
+    t = time.perf_counter()
+    for i in range(n):
+        dg.set_flag(f'sub{i % 40}', 'trading_enabled', bool(i % 2))
+    cs = (time.perf_counter() - t) * 1e6 / n
+    seen = dg.get_governance('sub3')['trading_enabled']
+    last_sub3 = max(i for i in range(n) if i % 40 == 3)
+    dg.flush()
+    on_disk = yaml.safe_load(gov.read_text(encoding='utf-8'))['districts']['sub3']['trading_enabled']
+    print(f"get_governance  legacy {lg:9.1f}us  cached {cg:7.2f}us  speedup {lg / cg:.0f}x")
+    print(f"set_flag        legacy {ls:9.1f}us  journal {cs:6.2f}us  speedup {ls / cs:.0f}x  "
+          f"read_your_write={seen == bool(last_sub3 % 2)} flushed={on_disk == seen} "
+          f"journal_left={dg.JOURNAL_FILE.exists()}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--subaccounts', type=int, default=60)
+    ap.add_argument('--threads', type=int, default=8)
+    ap.add_argument('--seconds', type=float, default=3.0)
+    ap.add_argument('--gov-ops', type=int, default=20000)
+    ap.add_argument('--url', default=None, help='e.g. http://127.0.0.1:8000/api/subaccounts')
+    args = ap.parse_args()
+
+    if args.url:
+        u = urlparse(args.url)
+        for name, etag in (('plain', False), ('etag', True)):
+            rps, st, nb = load(u.hostname, u.port or 80, u.path, args.threads, args.seconds, etag)
+            print(f"{name:12s} {rps:9.0f} req/s  status={st}  bytes={nb}")
+        return
+
+    with tempfile.TemporaryDirectory() as td_s:
+        td = Path(td_s)
+        state_file, gov_file = str(td / 'subaccounts_state.json'), str(td / 'governance_state.json')
+        subs = [{'subaccount_uid': f'sub{i}', 'label': f'flashback{i:02d}', 'equity': 1000 + i,
+                 'strategy': 'trend', 'trades': [{'pnl': (-1) ** k * 0.5, 'ts': 1700000000 + k} for k in range(20)]}
+                for i in range(args.subaccounts)]
+        Path(state_file).write_text(json.dumps({'subaccounts': subs}), encoding='utf-8')
+        Path(gov_file).write_text(json.dumps({'districts': {f'sub{i}': {'trading_enabled': True, 'autonomy_enabled': False}
+                                                            for i in range(args.subaccounts)}}), encoding='utf-8')
+
+        srv, view = make_server(state_file, gov_file)
+        host, port = srv.server_address[:2]
+        print(f"=== cockpit api benchmark subaccounts={args.subaccounts} threads={args.threads} "
+              f"seconds={args.seconds} ===")
+        res = {}
+        for name, path, etag in (('legacy', '/legacy/subaccounts', False),
+                                 ('cached', '/cached/subaccounts', False),
+                                 ('cached+etag', '/cached/subaccounts', True)):
+            rps, st, nb = load(host, port, path, args.threads, args.seconds, etag)
+            res[name] = rps
+            print(f"{name:12s} {rps:9.0f} req/s  status={st}  MB_sent={nb / 1e6:.1f}")
+        print(f"speedup cached {res['cached'] / res['legacy']:.1f}x  cached+etag {res['cached+etag'] / res['legacy']:.1f}x  "
+              f"view_builds={view.builds}")
+
+        # a write is visible on the next request (new ETag)
+        _, etag0 = view.get()
+        Path(gov_file).write_text(json.dumps({'districts': {'sub0': {'trading_enabled': False}}}), encoding='utf-8')
+        body, etag1 = view.get()
+        print(f"invalidate  etag_changed={etag0 != etag1} sub0.trading_enabled={json.loads(body)[0]['trading_enabled']}")
+        srv.shutdown()
+
+        bench_governance(td, args.gov_ops)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: dashboard push cost under a synthetic outcome stream.
+
+A writer thread appends outcome.v1 rows at --rate per second to a temp
+outcomes file. Every --interval seconds we measure, for one dashboard update:
+
+  incremental: OutcomesAggregator.poll() + serialize the delta event
+  snapshot:    serialize OutcomesAggregator.snapshot() (same content pushed
+               whole, i.e. what a full-snapshot push of this state costs)
+  rescan:      build_dashboard_snapshot_from_outcomes.build_snapshot(), the
+               old full rescan (per-account totals only, no curves)
+
+and report CPU ms and emitted bytes per update for each.
+
+Usage:
+    python -m app.tools.bench_dashboard_deltas [--rate 100] [--seconds 20] [--interval 0.5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import orjson
+
+from app.dashboard.outcomes_aggregator import OutcomesAggregator
+from app.tools import build_dashboard_snapshot_from_outcomes as full_builder
+
+ACCOUNTS = ["main"] + [f"flashback{str(i).zfill(2)}" for i in range(1, 11)]
+STRATEGIES = ["breakout", "mean_revert", "trend", "scalp"]
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "DOGEUSDT", "BNBUSDT"]
+
+
+def _outcome(rnd: random.Random, i: int) -> bytes:
+    return orjson.dumps({
+        "schema_version": "outcome.v1",
+        "event_type": "trade_outcome",
+        "trade_id": f"BENCH_{i}",
+        "account_label": rnd.choice(ACCOUNTS),
+        "strategy": rnd.choice(STRATEGIES),
+        "symbol": rnd.choice(SYMBOLS),
+        "setup_type": "bench",
+        "timeframe": "5",
+        "mode": "PAPER",
+        "pnl_usd": round(rnd.uniform(-10, 10), 4),
+        "fees_usd": 0.01,
+        "ts_ms": int(time.time() * 1000),
+    }) + b"\n"
+
+
+def _writer(path: Path, rate: float, stop: threading.Event, seed_rows: int) -> None:
+    rnd = random.Random(3)
+    i = 0
+    with path.open("ab") as f:
+        for _ in range(seed_rows):
+            f.write(_outcome(rnd, i))
+            i += 1
+        f.flush()
+        period = 1.0 / rate
+        nxt = time.perf_counter()
+        while not stop.is_set():
+            f.write(_outcome(rnd, i))
+            f.flush()
+            i += 1
+            nxt += period
+            time.sleep(max(0.0, nxt - time.perf_counter()))
+
+
+def _fmt(name: str, cpu: List[float], nbytes: List[int]) -> str:
+    if not cpu:
+        return f"{name:<12} no updates"
+    return (
+        f"{name:<12} updates={len(cpu)} cpu_ms/update mean={statistics.fmean(cpu):8.3f} "
+        f"max={max(cpu):8.3f}  bytes/update mean={statistics.fmean(nbytes):10.0f}"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rate", type=float, default=100.0, help="outcomes per second")
+    ap.add_argument("--seconds", type=float, default=20.0)
+    ap.add_argument("--interval", type=float, default=0.5, help="dashboard update interval")
+    ap.add_argument("--seed-rows", type=int, default=50_000, help="history present before the run")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "outcomes.v1.jsonl"
+        path.touch()
+        full_builder.OUTCOMES = path
+
+        stop = threading.Event()
+        wt = threading.Thread(target=_writer, args=(path, args.rate, stop, args.seed_rows), daemon=True)
+        wt.start()
+        time.sleep(0.5)
+
+        agg = OutcomesAggregator(path)
+        agg.poll()  # catch up on seeded history (not counted)
+
+        inc_cpu: List[float] = []
+        inc_bytes: List[int] = []
+        snap_cpu: List[float] = []
+        snap_bytes: List[int] = []
+        full_cpu: List[float] = []
+        full_bytes: List[int] = []
+
+        t_end = time.perf_counter() + args.seconds
+        while time.perf_counter() < t_end:
+            time.sleep(args.interval)
+
+            c0 = time.process_time()
+            deltas, _reset = agg.poll()
+            if deltas:
+                body = orjson.dumps({"from": deltas[0]["s"] - 1, "to": deltas[-1]["s"], "d": deltas})
+                inc_cpu.append((time.process_time() - c0) * 1000.0)
+                inc_bytes.append(len(body))
+                agg.record_emit(len(body))
+
+            c0 = time.process_time()
+            body = orjson.dumps(agg.snapshot())
+            snap_cpu.append((time.process_time() - c0) * 1000.0)
+            snap_bytes.append(len(body))
+
+            c0 = time.process_time()
+            snap = full_builder.build_snapshot()
+            body = orjson.dumps(snap)
+            full_cpu.append((time.process_time() - c0) * 1000.0)
+            full_bytes.append(len(body))
+
+        stop.set()
+        wt.join(timeout=2)
+
+    print(f"=== dashboard push benchmark rate={args.rate}/s interval={args.interval}s seed_rows={args.seed_rows} ===")
+    print(_fmt("incremental", inc_cpu, inc_bytes))
+    print(_fmt("snapshot", snap_cpu, snap_bytes))
+    print(_fmt("rescan", full_cpu, full_bytes))
+    print(f"aggregator metrics: {agg.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
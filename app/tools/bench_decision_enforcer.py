@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ai_decision_enforcer throughput, tail scan vs trade_id index.
+
+Synthetic ai_decisions.jsonl: per trade one pilot input decision plus
+--audit executor post-enforce rows appended later (interleaved with other
+trades), a few manual overrides and conflicting duplicates.
+
+  scan(tail):   enforce_decision with the legacy 2MB tail re-parse (recent trades)
+  scan(full):   same, tail large enough to see the whole log (correctness baseline)
+  build:        one-off index build
+  indexed:      enforce_decision via the index (random trades over the whole log)
+  readonly:     another process mmap-opens the index read-only and looks up
+  rotation:     log -> log.1 + fresh log; old trades still resolve
+
+Usage:
+    python -m app.tools.bench_decision_enforcer [--trades 100000] [--audit 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import orjson
+
+from app.ai import ai_decision_enforcer as enf
+from app.ai.ai_decision_index import DecisionIndex
+
+ACCOUNTS = ["main", "flashback01", "flashback02"]
+
+
+def _write_log(path: Path, trades: int, audit: int, seed: int = 5) -> None:
+    rnd = random.Random(seed)
+    t0 = 1_760_000_000_000
+    pending: List[Tuple[int, bytes]] = []
+    with path.open("wb") as f:
+        for i in range(trades):
+            acct = ACCOUNTS[i % len(ACCOUNTS)]
+            ts = t0 + i * 50
+            allow = rnd.random() < 0.7
+            row = {
+                "schema_version": 1,
+                "event_type": "pilot_decision",
+                "ts_ms": ts,
+                "trade_id": f"T{i}",
+                "client_trade_id": f"{acct}:T{i}",
+                "account_label": acct,
+                "symbol": "BTCUSDT",
+                "decision": "ALLOW_TRADE" if allow else "BLOCK_TRADE",
+                "allow": allow,
+                "size_multiplier": 1.0 if allow else 0.0,
+                "gates": {"reason": "passed" if allow else "low_expectancy"},
+            }
+            f.write(orjson.dumps(row) + b"\n")
+            if i % 97 == 0:  # conflicting duplicate input
+                row2 = dict(row, ts_ms=ts + 1, size_multiplier=0.5)
+                f.write(orjson.dumps(row2) + b"\n")
+            if i % 211 == 0:  # manual override
+                f.write(orjson.dumps({
+                    "ts_ms": ts + 2, "trade_id": f"T{i}", "account_label": acct, "allow": False,
+                    "extra": {"stage": "manual_block"}, "reason": "manual",
+                }) + b"\n")
+            for k in range(audit):
+                pending.append((i + rnd.randrange(1, 40), orjson.dumps({
+                    "schema_version": 1, "event_type": "ai_decision", "ts_ms": ts + 1000 + k,
+                    "trade_id": f"T{i}", "client_trade_id": f"{acct}:T{i}", "account_label": acct,
+                    "decision": "ALLOW_TRADE", "meta": {"source": "executor_post_enforce", "enforced_code": "OK"},
+                    "extra": {"stage": "decision_enforced"},
+                }) + b"\n"))
+            keep = []
+            for due, b in pending:
+                if due <= i:
+                    f.write(b)
+                else:
+                    keep.append((due, b))
+            pending = keep
+        for _, b in pending:
+            f.write(b)
+
+
+def _rate(fn, ids: List[Tuple[str, str]]) -> Tuple[float, list]:
+    t = time.perf_counter()
+    out = [fn(tid, acct) for tid, acct in ids]
+    el = time.perf_counter() - t
+    return len(ids) / el if el > 0 else 0.0, out
+
+
+def _enforce(tid: str, acct: str):
+    return enf.enforce_decision(tid, account_label=acct)
+
+
+def _readonly_worker(args: Tuple[str, List[str]]) -> Tuple[int, float]:
+    path, ids = args
+    idx = DecisionIndex(Path(path), readonly=True)
+    t = time.perf_counter()
+    hits = sum(1 for tid in ids if idx.lookup(tid))
+    return hits, len(ids) / (time.perf_counter() - t)
+
+
+def _strip(v: dict) -> tuple:
+    return (v["allow"], v["size_multiplier"], v["decision_code"], v["reason"].split(" | ")[0])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trades", type=int, default=100_000)
+    ap.add_argument("--audit", type=int, default=2)
+    ap.add_argument("--n", type=int, default=5000, help="enforcements per indexed measurement")
+    ap.add_argument("--scan-n", type=int, default=200)
+    ap.add_argument("--full-n", type=int, default=20)
+    args = ap.parse_args()
+
+    rnd = random.Random(9)
+    with tempfile.TemporaryDirectory() as td:
+        log = Path(td) / "ai_decisions.jsonl"
+        _write_log(log, args.trades, args.audit)
+        size = log.stat().st_size
+        print(f"=== ai_decision_enforcer benchmark trades={args.trades} rows/trade~{1 + args.audit} "
+              f"log={size / 1e6:.0f}MB ===")
+        enf.DECISIONS_PATH = log
+
+        def ids(n: int, lo: int = 0) -> List[Tuple[str, str]]:
+            out = []
+            for _ in range(n):
+                i = rnd.randrange(lo, args.trades)
+                acct = ACCOUNTS[i % len(ACCOUNTS)]
+                out.append((f"{acct}:T{i}" if rnd.random() < 0.5 else f"T{i}", acct))
+            return out
+
+        # ---------- legacy scans ----------
+        enf.AI_DECISION_INDEX_ENABLED = False
+        recent = ids(args.scan_n, lo=max(0, args.trades - 2000))
+        r_tail, _ = _rate(_enforce, recent)
+        enf.AI_DECISION_ENFORCER_TAIL_BYTES = size + 1
+        sample = ids(args.full_n)
+        r_full, full_out = _rate(_enforce, sample)
+        found_full = sum(1 for v in full_out if v["decision_code"] != "NO_DECISION")
+        enf.AI_DECISION_ENFORCER_TAIL_BYTES = 2 * 1024 * 1024
+        _, tail_out = _rate(_enforce, sample)
+        found_tail = sum(1 for v in tail_out if v["decision_code"] != "NO_DECISION")
+        print(f"scan(tail 2MB)   {r_tail:10.1f} trades/s  (recent trades only; random trades found {found_tail}/{len(sample)})")
+        print(f"scan(full log)   {r_full:10.2f} trades/s  (random trades found {found_full}/{len(sample)})")
+
+        # ---------- index ----------
+        enf.AI_DECISION_INDEX_ENABLED = True
+        enf._DECISION_INDEX = None
+        t = time.perf_counter()
+        idx = enf.get_decision_index()
+        idx.catch_up()
+        build = time.perf_counter() - t
+        st = idx.stats()
+        print(f"index build      {build * 1000:10.1f}ms keys={st['keys']} postings={st['postings']} "
+              f"tidx={st['tidx_bytes'] / 1e6:.1f}MB tpost={st['tpost_bytes'] / 1e6:.1f}MB")
+
+        _, idx_sample = _rate(_enforce, sample)
+        same = sum(1 for a, b in zip(idx_sample, full_out) if _strip(a) == _strip(b))
+        r_idx, _ = _rate(_enforce, ids(args.n))
+        r_idx_recent, _ = _rate(_enforce, recent)
+        print(f"indexed          {r_idx:10.1f} trades/s  (random over whole log; matches full scan {same}/{len(sample)})")
+        print(f"indexed(recent)  {r_idx_recent:10.1f} trades/s  speedup vs scan(tail) {r_idx_recent / r_tail:.0f}x")
+
+        # ---------- incremental catch-up ----------
+        with log.open("ab") as f:
+            for j in range(1000):
+                f.write(orjson.dumps({"schema_version": 1, "ts_ms": 1, "trade_id": f"N{j}", "account_label": "main",
+                                      "decision": "ALLOW_TRADE", "allow": True}) + b"\n")
+        t = time.perf_counter()
+        v = enf.enforce_decision("N999", account_label="main")
+        print(f"append 1000 + enforce {1000 * (time.perf_counter() - t):8.2f}ms code={v['decision_code']}")
+
+        # ---------- read-only consumers ----------
+        lookups = [tid for tid, _ in ids(20000)]
+        with mp.Pool(4) as pool:
+            res = pool.map(_readonly_worker, [(str(log), lookups)] * 4)
+        print(f"readonly mmap    {sum(r for _, r in res):10.0f} lookups/s over 4 procs hits={res[0][0]}/{len(lookups)}")
+
+        # ---------- rotation ----------
+        os.replace(log, log.with_name(log.name + ".1"))
+        with log.open("wb") as f:
+            f.write(orjson.dumps({"schema_version": 1, "ts_ms": 2, "trade_id": "R1", "account_label": "main",
+                                  "decision": "ALLOW_TRADE", "allow": True}) + b"\n")
+        old = enf.enforce_decision("main:T0", account_label="main")
+        new = enf.enforce_decision("R1", account_label="main")
+        print(f"rotation         old={old['decision_code']} new={new['decision_code']} "
+              f"segments={idx.stats()['segments']} rebuilds={idx.rebuilds}")
+        idx.close()
+
+
+if __name__ == "__main__":
+    main()
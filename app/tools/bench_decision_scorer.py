@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ai_decision_scorer indexed aggregates vs the legacy full rescan.
+
+For each memory size the temp memory dir holds --files single-record files
+(the legacy layout) plus one memory_entries.jsonl with the rest.
+
+  legacy:   listdir + open/parse every file per score (old score_decision)
+  indexed:  score_decision after warm-up (hash lookup + throttled stat scan)
+  refresh:  cost of ingesting --append new jsonl records incrementally
+
+Usage:
+    python -m app.tools.bench_decision_scorer [--sizes 1000,10000,100000] [--files 500]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from statistics import mean
+
+from app.ai import ai_decision_scorer as scorer
+
+STRATS = ["breakout", "trend_pullback", "mean_revert", "scalp"]
+SYMBOLS = [f"SYM{i}USDT" for i in range(30)]
+ACCOUNTS = ["main", "flashback01", "flashback02", "flashback03"]
+SETUPS = ["breakout_high", "pullback_ma", "range_fade", "squeeze"]
+
+
+def _row(rnd: random.Random) -> dict:
+    r = rnd.gauss(0.1, 1.2)
+    return {
+        "event_type": "memory_entry",
+        "strategy": rnd.choice(STRATS),
+        "symbol": rnd.choice(SYMBOLS),
+        "account_label": rnd.choice(ACCOUNTS),
+        "setup_type": rnd.choice(SETUPS),
+        "outcome": {"win": r > 0, "r_multiple": round(r, 4), "pnl_usd": round(r * 10, 2)},
+    }
+
+
+def _legacy_score() -> float | None:
+    memory = scorer._load_memory()
+    wins = [1.0 if row.get("outcome", {})["win"] else 0.0 for row in memory if "win" in row.get("outcome", {})]
+    return round(mean(wins), 4) if wins else None
+
+
+def _per_call_us(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--files", type=int, default=500, help="single-record files (legacy layout)")
+    ap.add_argument("--n", type=int, default=20000, help="indexed scores per measurement")
+    ap.add_argument("--append", type=int, default=1000)
+    args = ap.parse_args()
+
+    rnd = random.Random(3)
+    q = dict(features={"setup_type": "pullback_ma"}, symbol="SYM4USDT", strategy="trend_pullback",
+             account_label="flashback02", mode="PAPER")
+    print("=== ai_decision_scorer benchmark ===")
+    print(f"{'records':>8} {'legacy_us':>10} {'build_ms':>9} {'indexed_us':>11} {'refresh_ms':>11} {'speedup':>8}  level(n)")
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        with tempfile.TemporaryDirectory() as td:
+            td = Path(td)
+            singles = min(args.files, size)
+            for i in range(singles):
+                (td / f"mem_{i:06d}.json").write_text(json.dumps(_row(rnd)) + "\n", encoding="utf-8")
+            jl = td / "memory_entries.jsonl"
+            with jl.open("w", encoding="utf-8") as f:
+                for _ in range(size - singles):
+                    f.write(json.dumps(_row(rnd)) + "\n")
+
+            scorer.MEMORY_DIR = str(td)
+            scorer._INDEX = None
+            legacy_us = _per_call_us(_legacy_score, max(3, min(50, 20000 // max(1, singles))))
+
+            t0 = time.perf_counter()
+            scorer.get_index().refresh(force=True)
+            build_ms = (time.perf_counter() - t0) * 1000.0
+            idx_us = _per_call_us(lambda: scorer.score_decision(**q), args.n)
+
+            with jl.open("a", encoding="utf-8") as f:
+                for _ in range(args.append):
+                    f.write(json.dumps(_row(rnd)) + "\n")
+            before = scorer.index_stats()["records"]
+            t0 = time.perf_counter()
+            scorer.get_index().refresh(force=True)
+            refresh_ms = (time.perf_counter() - t0) * 1000.0
+            added = scorer.index_stats()["records"] - before
+            info = scorer.explain_decision(**q)
+            ok = added == args.append and scorer.index_stats()["records"] == size + args.append
+            print(f"{size:>8} {legacy_us:>10.1f} {build_ms:>9.1f} {idx_us:>11.2f} {refresh_ms:>11.2f} "
+                  f"{legacy_us / idx_us:>7.0f}x  {info['level']}({info['n']}) avg_r={info['avg_r']} consistent={ok}")
+    scorer._INDEX = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: windowed queries over JSONL event logs vs Parquet archive + live tail.
+
+Synthetic public_trades.jsonl (--n rows over --days days, --symbols symbols)
+and ws_executions.jsonl (batched exec rows, several accounts), then:
+
+  legacy:    json.loads every line, filter window/symbol in Python
+  compact:   one-off archive of a rotated segment + the sealed live prefix
+  unified:   read_stream (partition pruning + ts pushdown + JSONL tail)
+  crash:     interrupted batch is discarded and redone, row counts unchanged
+
+Usage:
+    python -m app.tools.bench_event_archive [--n 1000000] [--days 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import orjson
+
+from app.core import event_archive as ea
+
+ACCOUNTS = ["main", "flashback01", "flashback02"]
+DAY_MS = 86_400_000
+
+
+def _write_trades(path: Path, n: int, symbols: list, t0: int, span_ms: int, seed: int = 3) -> None:
+    rnd = random.Random(seed)
+    step = span_ms / n
+    with path.open("wb") as f:
+        buf = []
+        for i in range(n):
+            ts = t0 + int(i * step)
+            sym = symbols[i % len(symbols)]
+            buf.append(orjson.dumps({
+                "version": 1, "received_ms": ts + 3, "symbol": sym,
+                "trade": {"T": ts, "s": sym, "S": "Buy" if rnd.random() < 0.5 else "Sell",
+                          "v": f"{rnd.random():.4f}", "p": f"{60000 + rnd.random() * 100:.2f}", "i": f"t{i}"},
+            }) + b"\n")
+            if len(buf) >= 20000:
+                f.write(b"".join(buf))
+                buf.clear()
+        f.write(b"".join(buf))
+
+
+def _write_execs(path: Path, n: int, symbols: list, t0: int, span_ms: int) -> None:
+    step = span_ms / n
+    with path.open("wb") as f:
+        for i in range(0, n, 4):
+            ts = t0 + int(i * step)
+            acct = ACCOUNTS[i % len(ACCOUNTS)]
+            data = [{"symbol": symbols[(i + k) % len(symbols)], "side": "Buy", "execId": f"e{i + k}",
+                     "orderId": f"o{i}", "orderLinkId": "", "execType": "Trade", "execPrice": "60000.5",
+                     "execQty": "0.01", "execFee": "0.01", "closedSize": "0", "isMaker": k % 2 == 0,
+                     "execTime": str(ts + k)} for k in range(4)]
+            f.write(orjson.dumps({"version": 1, "topic": "execution", "ts_ms": ts + 5,
+                                  "account_label": acct, "data": data}) + b"\n")
+
+
+def _legacy_trades(paths, start_ms, end_ms, symbol):
+    out = []
+    for p in paths:
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                t = row.get("trade") or {}
+                ts = int(t.get("T") or row.get("received_ms") or 0)
+                if start_ms <= ts <= end_ms and (symbol is None or row.get("symbol") == symbol):
+                    out.append(row)
+    return out
+
+
+def _ms(fn, reps: int = 1):
+    t = time.perf_counter()
+    for _ in range(reps):
+        out = fn()
+    return (time.perf_counter() - t) * 1000.0 / reps, out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--days", type=int, default=10)
+    ap.add_argument("--symbols", type=int, default=8)
+    ap.add_argument("--reps", type=int, default=5)
+    args = ap.parse_args()
+
+    symbols = [f"SYM{i}USDT" for i in range(args.symbols)]
+    t0 = 1_760_000_000_000 - 1_760_000_000_000 % DAY_MS
+    span = args.days * DAY_MS
+
+    with tempfile.TemporaryDirectory() as td:
+        td = Path(td)
+        trades = td / "public_trades.jsonl"
+        execs = td / "ws_executions.jsonl"
+        adir = td / "archive"
+
+        # 70% in a rotated segment, 30% in the live file
+        _write_trades(trades, args.n, symbols, t0, span)
+        data = trades.read_bytes()
+        cut = data.index(b"\n", int(len(data) * 0.7)) + 1
+        trades.with_name(trades.name + ".1").write_bytes(data[:cut])
+        trades.write_bytes(data[cut:])
+        del data
+        _write_execs(execs, args.n // 4, symbols, t0, span)
+
+        ea.STREAMS["public_trades"] = ea.Stream("public_trades", (trades,), ea._rows_public_trades,
+                                                ea.STREAMS["public_trades"].schema)
+        ea.STREAMS["ws_executions"] = ea.Stream("ws_executions", (execs,), ea._rows_ws_executions,
+                                                ea.STREAMS["ws_executions"].schema)
+        paths = [trades.with_name(trades.name + ".1"), trades]
+        size = sum(p.stat().st_size for p in paths)
+        print(f"=== event_archive benchmark rows={args.n} days={args.days} symbols={args.symbols} "
+              f"jsonl={size / 1e6:.0f}MB ===")
+
+        win_lo = t0 + (args.days - 2) * DAY_MS + DAY_MS // 2  # spans the rotated/live boundary region
+        win_hi = win_lo + DAY_MS
+        sym = symbols[1]
+
+        legacy_ms, legacy = _ms(lambda: _legacy_trades(paths, win_lo, win_hi, sym))
+        print(f"legacy json scan (1 day, 1 symbol)  {legacy_ms:10.1f}ms rows={len(legacy)}")
+
+        # compact everything sealed; leave the last ~MB of the live file as tail
+        with trades.open("ab") as f:
+            f.write(b'{"version":1,"received_ms":')  # partial line mid-write
+        ms, st = _ms(lambda: ea.compact_stream("public_trades", archive_dir=adir, min_bytes=0))
+        pq = sum(p.stat().st_size for p in (adir / "public_trades").rglob("*.parquet"))
+        print(f"compact public_trades (one-off)     {ms:10.1f}ms rows={st['rows']} files={st['parquet_files']} "
+              f"parquet={pq / 1e6:.1f}MB")
+        with trades.open("ab") as f:
+            f.write(orjson.dumps(t0 + span - 10) + b',"symbol":"' + sym.encode() + b'","trade":{"T":'
+                    + orjson.dumps(t0 + span - 10) + b',"s":"' + sym.encode() + b'","S":"Buy","v":"1","p":"1","i":"tail"}}\n')
+            for k in range(5000):
+                ts = t0 + span - 5000 + k
+                f.write(orjson.dumps({"version": 1, "received_ms": ts, "symbol": sym,
+                                      "trade": {"T": ts, "s": sym, "S": "Sell", "v": "1", "p": "1", "i": f"x{k}"}}) + b"\n")
+
+        def unified(lo, hi, symbol=None):
+            return ea.read_stream("public_trades", start_ms=lo, end_ms=hi, archive_dir=adir,
+                                  symbols=[symbol] if symbol else None, columns=["ts_ms", "symbol", "price", "size"])
+
+        ms, df = _ms(lambda: unified(win_lo, win_hi, sym), args.reps)
+        print(f"unified (1 day, 1 symbol)           {ms:10.1f}ms rows={df.height} matches_legacy={df.height == len(legacy)} "
+              f"speedup {legacy_ms / ms:.0f}x")
+        ms, df = _ms(lambda: unified(t0 + span - 6000, t0 + span), args.reps)
+        print(f"unified (live tail window)          {ms:10.1f}ms rows={df.height} (expect >= 5001)")
+        ms, df = _ms(lambda: unified(None, None))
+        print(f"unified (full history)              {ms:10.1f}ms rows={df.height} (expect {args.n + 5001})")
+
+        # ws_executions: exploded exec rows, account pruning
+        ms, st = _ms(lambda: ea.compact_stream("ws_executions", archive_dir=adir, min_bytes=0))
+        print(f"compact ws_executions               {ms:10.1f}ms rows={st['rows']} files={st['parquet_files']}")
+        ms, df = _ms(lambda: ea.read_stream("ws_executions", archive_dir=adir, accounts=["flashback01"],
+                                            start_ms=win_lo, end_ms=win_hi), args.reps)
+        print(f"unified ws_executions (acct, 1 day) {ms:10.1f}ms rows={df.height}")
+
+        # crash mid-batch: pending marker + half-written file -> ignored by readers, then discarded
+        sdir = adir / "public_trades"
+        man = ea._load_manifest(sdir)
+        key = next(k for k, v in man["files"].items() if v["live"])
+        upto = man["files"][key]["archived_upto"]
+        prefix = ea._batch_prefix(ea.get_stream("public_trades"), key, upto)
+        victim = next(sdir.rglob("*.parquet"))
+        half = victim.with_name(f"{prefix}_{int(time.time() * 1e6)}.parquet")
+        half.write_bytes(victim.read_bytes())
+        man["pending"] = {"prefix": prefix, "file": key, "start": upto, "end": upto + 1}
+        ea._save_manifest(sdir, man)
+        during = unified(None, None).height
+        ea.compact_stream("public_trades", archive_dir=adir, min_bytes=0)
+        after = unified(None, None).height
+        print(f"crash recovery rows during={during} after={after} leftover_removed={not half.exists()} "
+              f"consistent={during == after == args.n + 5001}")
+
+        # live -> .1 rotation keeps inode; nothing re-archived
+        os.replace(paths[0], trades.with_name(trades.name + ".2"))
+        os.replace(trades, paths[0])
+        trades.write_bytes(b"")
+        st = ea.compact_stream("public_trades", archive_dir=adir, min_bytes=0)
+        print(f"rotation re-archived rows={st['rows']} total={unified(None, None).height} merged={st['merged']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: exposure ledger guard latency + multi-process consistency.
+
+Latency (single process, ledger pre-loaded with --open trades):
+  legacy_session:  session_guard file path (read + parse state JSON per check)
+  ledger_check:    exposure_ledger.check_open (lock-free seqlock read)
+  guard_full:      portfolio_guard.can_open_trade(..., symbol=, side=, notional_usd=)
+  open+close:      record_open + record_close (locked write + journal append)
+
+Consistency (--procs processes x --cycles each, one shared ledger file):
+  churn:  reserve_open / record_close cycles; afterwards open risk must be 0
+          and opens_today must equal procs x cycles
+  caps:   every process races reserve_open against EXPOSURE_MAX_TOTAL_RISK_USD;
+          booked risk must never exceed the cap
+
+Usage:
+    python -m app.tools.bench_exposure_ledger [--n 200000] [--procs 8] [--cycles 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import random
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Tuple
+
+from app.core import exposure_ledger, portfolio_guard, session_guard
+
+SYMBOLS = [f"SYM{i}USDT" for i in range(40)]
+
+
+def _per_call_ns(fn, n: int) -> float:
+    t0 = time.perf_counter_ns()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter_ns() - t0) / n
+
+
+def _set_caps(total_risk: float, symbol_notional: float, imbalance: float) -> None:
+    exposure_ledger.MAX_TOTAL_RISK_USD = total_risk
+    exposure_ledger.MAX_SYMBOL_NOTIONAL_USD = symbol_notional
+    exposure_ledger.MAX_IMBALANCE_USD = imbalance
+    exposure_ledger.MAX_TRADES_PER_DAY = 0
+    exposure_ledger.MAX_LOSS_STREAK = 0
+
+
+def _churn_worker(args: Tuple[str, str, int, int]) -> int:
+    shm, journal, idx, cycles = args
+    _set_caps(0, 0, 0)
+    led = exposure_ledger.ExposureLedger(Path(shm), Path(journal), session_json_path=None)
+    rnd = random.Random(idx)
+    for k in range(cycles):
+        tid = f"p{idx}-{k}"
+        led.reserve_open(tid, rnd.choice(SYMBOLS), rnd.choice(["Buy", "Sell"]), 100.0, 1.0, f"acct{idx}")
+        if k % 3 == 0:
+            led.update_open(tid, notional_usd=150.0, risk_usd=1.5)
+        led.record_close(tid, pnl_usd=rnd.uniform(-1, 1))
+    led.close()
+    return cycles
+
+
+def _caps_worker(args: Tuple[str, str, int, float]) -> int:
+    shm, journal, idx, cap = args
+    _set_caps(cap, 0, 0)
+    led = exposure_ledger.ExposureLedger(Path(shm), Path(journal), session_json_path=None)
+    booked = 0
+    for k in range(1000):
+        ok, _ = led.reserve_open(f"c{idx}-{k}", "BTCUSDT", "Buy", 10.0, 1.0, f"acct{idx}")
+        booked += int(ok)
+    led.close()
+    return booked
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000, help="checks per latency measurement")
+    ap.add_argument("--open", type=int, default=500, help="open trades preloaded for the latency run")
+    ap.add_argument("--procs", type=int, default=8)
+    ap.add_argument("--cycles", type=int, default=2000)
+    ap.add_argument("--cap", type=float, default=750.0, help="total-risk cap for the race test")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        td = Path(td)
+
+        # ---------- latency ----------
+        _set_caps(1e12, 1e12, 1e12)
+        led = exposure_ledger.ExposureLedger(td / "lat.shm", td / "lat.jsonl", session_json_path=td / "sg.json")
+        exposure_ledger._LEDGER = led
+        rnd = random.Random(1)
+        for i in range(args.open):
+            led.record_open(f"seed{i}", rnd.choice(SYMBOLS), rnd.choice(["Buy", "Sell"]), 100.0, 1.0, "main")
+
+        session_guard.STATE_PATH = td / "session_guard_legacy.json"
+        session_guard._save_state(session_guard._default_state())
+        legacy_max = session_guard.SESSION_MAX_TRADES_PER_DAY
+
+        def _legacy() -> bool:
+            st = session_guard._load_state()
+            return int(st.get("trades_today", 0)) >= legacy_max or int(st.get("loss_streak", 0)) >= 5
+
+        n = args.n
+        legacy_ns = _per_call_ns(_legacy, max(1, n // 20))
+        check_ns = _per_call_ns(lambda: led.check_open("SYM7USDT", "Buy", 100.0, 1.0), n)
+        mod_ns = _per_call_ns(lambda: exposure_ledger.check_open("SYM7USDT", "Buy", 100.0, 1.0), n)
+        block_ns = _per_call_ns(session_guard.should_block_trading, n // 4)
+        risk, eq, notional = Decimal("1"), Decimal("1000"), Decimal("100")
+        guard_ns = _per_call_ns(
+            lambda: portfolio_guard.can_open_trade(
+                sub_uid="1", strategy_name="bench", risk_usd=risk, equity_now_usd=eq,
+                symbol="SYM7USDT", side="Buy", notional_usd=notional,
+            ),
+            n // 4,
+        )
+        guard_plain_ns = _per_call_ns(
+            lambda: portfolio_guard.can_open_trade(sub_uid="1", strategy_name="bench", risk_usd=risk, equity_now_usd=eq),
+            n // 4,
+        )
+        k = [0]
+
+        def _open_close() -> None:
+            k[0] += 1
+            led.record_open(f"b{k[0]}", "SYM3USDT", "Sell", 100.0, 1.0, "main")
+            led.record_close(f"b{k[0]}")
+
+        oc_ns = _per_call_ns(_open_close, max(1, n // 20))
+        led.flush()
+        led.close()
+        exposure_ledger._LEDGER = None
+
+        print(f"=== exposure ledger benchmark open_trades={args.open} ===")
+        print(f"legacy session_guard check     {legacy_ns / 1000.0:9.2f}us")
+        print(f"session_guard.should_block     {block_ns / 1000.0:9.2f}us")
+        print(f"ledger.check_open              {check_ns / 1000.0:9.2f}us")
+        print(f"exposure_ledger.check_open     {mod_ns / 1000.0:9.2f}us")
+        print(f"can_open_trade (no symbol)     {guard_plain_ns / 1000.0:9.2f}us")
+        print(f"can_open_trade (+aggregate)    {guard_ns / 1000.0:9.2f}us")
+        print(f"record_open + record_close     {oc_ns / 1000.0:9.2f}us")
+
+        # ---------- multi-process churn ----------
+        shm, journal = td / "mp.shm", td / "mp.jsonl"
+        exposure_ledger.ExposureLedger(shm, journal, session_json_path=None).close()
+        t0 = time.perf_counter()
+        with mp.Pool(args.procs) as pool:
+            done = sum(pool.map(_churn_worker, [(str(shm), str(journal), i, args.cycles) for i in range(args.procs)]))
+        el = time.perf_counter() - t0
+        led = exposure_ledger.ExposureLedger(shm, journal, session_json_path=None)
+        s = led.snapshot()
+        led.close()
+        ok = s["open_count"] == 0 and abs(s["total_risk"]) < 1e-6 and s["opens_today"] == done and s["trades_today"] == done
+        print(f"churn   procs={args.procs} cycles={done} {done / el:9.0f} cycles/s open={s['open_count']} "
+              f"risk={s['total_risk']:.6f} opens_today={s['opens_today']} closes={s['trades_today']} consistent={ok}")
+
+        # replay from journal
+        shm.unlink()
+        led = exposure_ledger.ExposureLedger(shm, journal, session_json_path=None)
+        r = led.snapshot()
+        led.close()
+        print(f"replay  records={led.replayed} open={r['open_count']} opens_today={r['opens_today']} "
+              f"closes={r['trades_today']} matches={r['opens_today'] == s['opens_today'] and r['open_count'] == 0}")
+
+        # ---------- cap race ----------
+        shm2, journal2 = td / "cap.shm", td / "cap.jsonl"
+        exposure_ledger.ExposureLedger(shm2, journal2, session_json_path=None).close()
+        with mp.Pool(args.procs) as pool:
+            booked: List[int] = pool.map(_caps_worker, [(str(shm2), str(journal2), i, args.cap) for i in range(args.procs)])
+        led = exposure_ledger.ExposureLedger(shm2, journal2, session_json_path=None)
+        c = led.snapshot()
+        led.close()
+        print(f"caps    cap={args.cap} booked_risk={c['total_risk']:.1f} trades={sum(booked)} "
+              f"within_cap={c['total_risk'] <= args.cap}")
+
+
+if __name__ == "__main__":
+    main()
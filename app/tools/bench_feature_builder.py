@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: feature_builder, load-everything vs streaming/checkpointed.
+
+Writes synthetic state/features_trades.jsonl + enriched outcomes (--rows
+lines in total, half each; outcomes trail their setups) into a temp dir and
+runs each mode in a child process (cwd = temp dir, since the registry and
+progress files are cwd-relative) so peak RSS is per mode:
+
+  legacy      the previous main(): load_jsonl both files into lists,
+              normalize, one enforce_schema over everything, append_rows.
+              Run on --legacy-rows only; its memory grows with input size.
+  stream      build(): bounded batches, joined rows, JSONL + typed Parquet
+  +1%         build() again after appending 1% more input: only the tail
+  recovery    output past the checkpoint (torn JSONL + a stray Parquet
+              chunk) is dropped on the next run; totals still match
+
+Usage:
+    python -m app.tools.bench_feature_builder [--rows 10000000] [--legacy-rows 1000000] [--batch 50000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import orjson
+
+T0_MS = 1_735_689_600_000  # 2025-01-01
+SYMBOLS = ("BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT")
+REPO = Path(__file__).resolve().parents[2]
+
+
+def write_inputs(state: Path, n_trades: int, start: int = 0, seed: int = 11) -> None:
+    """n_trades feature rows + n_trades outcomes, 5s apart; outcomes lag 200 trades."""
+    rng = random.Random(seed + start)
+    (state / "ai_events").mkdir(parents=True, exist_ok=True)
+    lag = 200
+    with open(state / "features_trades.jsonl", "ab") as ff, \
+            open(state / "ai_events" / "outcomes.enriched.backfill.jsonl", "ab") as fo:
+        fbuf: List[bytes] = []
+        obuf: List[bytes] = []
+        for i in range(start, start + n_trades):
+            ts = T0_MS + i * 5_000
+            fbuf.append(orjson.dumps({
+                "trade_id": f"T{i}",
+                "symbol": SYMBOLS[i % 4],
+                "strategy_name": "trend_v2",
+                "account_label": "flashback01",
+                "mode": "PAPER",
+                "ts_open_ms": ts,
+                "features": {
+                    "atr_pct": rng.random() * 2,
+                    "volume_zscore": rng.gauss(0, 1),
+                    "adx": rng.random() * 40,
+                    "side_sign": 1 if i % 2 else -1,
+                    "range_mean": rng.random(),
+                    "trend_strength": rng.random(),
+                },
+            }))
+            j = i - lag
+            if j >= start:
+                obuf.append(_outcome(rng, j))
+            if len(fbuf) >= 50_000:
+                ff.write(b"\n".join(fbuf) + b"\n")
+                fo.write(b"\n".join(obuf) + b"\n" if obuf else b"")
+                fbuf, obuf = [], []
+        for j in range(max(start, start + n_trades - lag), start + n_trades):
+            obuf.append(_outcome(rng, j))
+        if fbuf:
+            ff.write(b"\n".join(fbuf) + b"\n")
+        if obuf:
+            fo.write(b"\n".join(obuf) + b"\n")
+
+
+def _outcome(rng: random.Random, j: int) -> bytes:
+    pnl = rng.gauss(0.1, 1.0)
+    return orjson.dumps({
+        "event_type": "outcome_enriched",
+        "trade_id": f"T{j}",
+        "symbol": SYMBOLS[j % 4],
+        "strategy": "trend_v2",
+        "account_label": "flashback01",
+        "outcome": {"payload": {
+            "pnl_usd": pnl * 10,
+            "r_multiple": pnl,
+            "win": pnl > 0,
+            "extra": {"opened_ms": T0_MS + j * 5_000, "mode": "PAPER", "entry_price": 100.0, "exit_price": 100.0 + pnl},
+        }},
+    })
+
+
+def legacy_main(state: Path) -> Dict[str, Any]:
+    # the pre-streaming feature_builder.main()
+    from app.ai import feature_builder as fb
+    from app.data.append_store import append_rows
+    from app.data.feature_registry import enforce_schema
+
+    def load_jsonl(path: Path):
+        if not path.exists():
+            return []
+        out = []
+        with path.open("rb") as f:
+            for line in f:
+                try:
+                    obj = fb.loads(line)
+                    if isinstance(obj, dict):
+                        out.append(obj)
+                except Exception:
+                    continue
+        return out
+
+    rows = []
+    max_ts = 0
+    lines = 0
+    for r in load_jsonl(state / "features_trades.jsonl"):
+        lines += 1
+        o = fb.normalize_feature_trade(r)
+        if o:
+            rows.append(o)
+            max_ts = max(max_ts, o.get("ts_open_ms") or 0)
+    for e in load_jsonl(state / "ai_events" / "outcomes.enriched.backfill.jsonl"):
+        lines += 1
+        o = fb.normalize_outcome(e)
+        if o:
+            rows.append(o)
+            max_ts = max(max_ts, o.get("ts_open_ms") or 0)
+    enforce_schema(rows)
+    append_rows(state / "feature_store.jsonl", rows, max_ts)
+    return {"lines": lines, "rows_out": len(rows)}
+
+
+def child(mode: str, root: Path, batch: int) -> None:
+    os.chdir(root)
+    state = root / "state"
+    t = time.perf_counter()
+    if mode == "legacy":
+        st = legacy_main(state)
+    else:
+        from app.ai import feature_builder as fb
+
+        st = fb.build(
+            out=state / "feature_store.jsonl",
+            parquet_dir=state / "feature_store",
+            checkpoint=state / "features" / "builder_checkpoint.json",
+            features_path=state / "features_trades.jsonl",
+            outcomes_path=state / "ai_events" / "outcomes.enriched.backfill.jsonl",
+            batch_rows=batch,
+        )
+    st["elapsed_s"] = time.perf_counter() - t
+    from app.ai.feature_builder import peak_rss_mb
+
+    st["peak_rss_mb"] = peak_rss_mb()
+    print(orjson.dumps(st).decode())
+
+
+def run_child(mode: str, root: Path, batch: int) -> Dict[str, Any]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in (str(REPO), os.environ.get("PYTHONPATH", "")) if p))
+    out = subprocess.run(
+        [sys.executable, "-m", "app.tools.bench_feature_builder", "--child", mode, "--dir", str(root), "--batch", str(batch)],
+        env=env, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        raise SystemExit(f"{mode} failed:\n{out.stderr[-3000:]}")
+    return orjson.loads(out.stdout.strip().splitlines()[-1])
+
+
+def count_lines(path: Path) -> int:
+    n = 0
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(8 << 20)
+            if not b:
+                return n
+            n += b.count(b"\n")
+
+
+def parquet_rows(d: Path) -> int:
+    import polars as pl
+
+    files = list((d / "_committed").rglob("*.parquet"))
+    return int(pl.scan_parquet(files).select(pl.len()).collect().item()) if files else 0
+
+
+def line(name: str, lines: int, st: Dict[str, Any]) -> None:
+    rss = st.get("peak_rss_mb")
+    rss_s = f"{rss:7.0f} MB" if rss is not None else "    n/a   "
+    print(f"{name:9s} lines={lines:>10,}  {st['elapsed_s']:8.1f}s  {lines / st['elapsed_s']:>9,.0f} lines/s  "
+          f"peak_rss={rss_s}  rows_out={st['rows_out']:,}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10_000_000, help="input lines (features + outcomes)")
+    ap.add_argument("--legacy-rows", type=int, default=1_000_000)
+    ap.add_argument("--batch", type=int, default=50_000)
+    ap.add_argument("--child", default=None)
+    ap.add_argument("--dir", default=None)
+    args = ap.parse_args()
+
+    if args.child:
+        child(args.child, Path(args.dir), args.batch)
+        return
+
+    print(f"=== feature_builder benchmark rows={args.rows:,} legacy_rows={args.legacy_rows:,} batch={args.batch} "
+          f"cores={os.cpu_count()} ===")
+    with tempfile.TemporaryDirectory() as td_s:
+        td = Path(td_s)
+
+        if args.legacy_rows:
+            lroot = td / "legacy"
+            write_inputs(lroot / "state", args.legacy_rows // 2)
+            line("legacy", args.legacy_rows, run_child("legacy", lroot, args.batch))
+            sroot = td / "legacy_stream"
+            write_inputs(sroot / "state", args.legacy_rows // 2)
+            line("stream", args.legacy_rows, run_child("stream", sroot, args.batch))
+
+        root = td / "big"
+        t = time.perf_counter()
+        write_inputs(root / "state", args.rows // 2)
+        size = sum(p.stat().st_size for p in (root / "state").rglob("*.jsonl"))
+        print(f"input     {args.rows:,} lines {size / 1e9:.2f} GB generated in {time.perf_counter() - t:.0f}s")
+        st = run_child("stream", root, args.batch)
+        line("stream", args.rows, st)
+        print(f"          joined={st['joined']:,} evicted={st['evicted']} pending={st['pending']} "
+              f"batches={st['batches']} parquet_files={st['parquet_files']}")
+
+        extra = max(2, args.rows // 100)
+        write_inputs(root / "state", extra // 2, start=args.rows // 2)
+        st2 = run_child("stream", root, args.batch)
+        line("+1%", st2["lines"], st2)
+
+        out = root / "state" / "feature_store.jsonl"
+        n_jsonl = count_lines(out)
+        n_pq = parquet_rows(root / "state" / "feature_store")
+        expected = (args.rows + extra) // 2
+        print(f"check     jsonl_rows={n_jsonl:,} parquet_rows={n_pq:,} expected_joined={expected:,} "
+              f"ok={n_jsonl == n_pq == expected}")
+
+        # recovery: output past the checkpoint is discarded on the next run
+        rroot = td / "recovery"
+        write_inputs(rroot / "state", 5_000)
+        run_child("stream", rroot, args.batch)
+        rout = rroot / "state" / "feature_store.jsonl"
+        with open(rout, "ab") as f:
+            f.write(b'{"trade_id":"T0","torn":')
+        stray = rroot / "state" / "feature_store" / "_committed" / "day=2025-01-01" / "features-99999999_1.parquet"
+        stray.write_bytes(b"PAR1")
+        write_inputs(rroot / "state", 1_000, start=5_000)
+        st3 = run_child("stream", rroot, args.batch)
+        n_r, n_rpq = count_lines(rout), parquet_rows(rroot / "state" / "feature_store")
+        print(f"recovery  dropped jsonl_bytes={st3['recovered'][0]} parquet_files={st3['recovered'][1]} jsonl_rows={n_r:,} parquet_rows={n_rpq:,} "
+              f"ok={n_r == n_rpq == 6_000 and not stray.exists()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: emergency flatten against a local mock exchange.
+
+MockExchange simulates N accounts x M open symbols with a fixed per-call
+latency and per-account, per-endpoint request limits over a sliding 1s
+window (calls over the limit fail like a Bybit 10006 "too many visits").
+Fills are immediate: a reduce-only close for the full size removes the
+position.
+
+Compares:
+  legacy: per account, list symbols, then per symbol list positions again +
+          reduce-only + cancel_all, all serial (the old flatten_all_ws_first)
+  fleet:  execution_ws.flatten_fleet(exchange=mock)
+
+and reports total time-to-flat, per-symbol time-to-flat percentiles, REST
+calls and rate-limit rejections. Also checks the final state is flat.
+
+Usage:
+    python -m app.tools.bench_fleet_flatten [--accounts 11] [--symbols 8] [--latency-ms 60]
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Any, Deque, Dict, List, Tuple
+
+from app.core import execution_ws
+
+
+class MockExchange:
+    """
+    Same surface as execution_ws.BybitFleetExchange.
+    """
+
+    def __init__(self, accounts: List[str], symbols: int, latency_ms: float, limit_per_sec: int) -> None:
+        self.latency = latency_ms / 1000.0
+        self.limits = {"read": limit_per_sec * 5, "order": limit_per_sec, "cancel": limit_per_sec}
+        self._lock = threading.Lock()
+        self.positions: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.open_orders: Dict[str, Dict[str, int]] = {}
+        self._calls: Dict[Tuple[str, str], Deque[float]] = {(a, k): deque() for a in accounts for k in self.limits}
+        self.calls = 0
+        self.rejected = 0
+        for a in accounts:
+            self.positions[a] = {}
+            self.open_orders[a] = {}
+            for i in range(symbols):
+                sym = f"SYM{i}USDT"
+                self.positions[a][sym] = {"symbol": sym, "side": "Buy" if i % 2 else "Sell", "size": str(1 + i)}
+                self.open_orders[a][sym] = 3
+
+    def _hit(self, label: str, kind: str) -> None:
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            q = self._calls[(label, kind)]
+            while q and now - q[0] > 1.0:
+                q.popleft()
+            if len(q) >= self.limits[kind]:
+                self.rejected += 1
+                raise RuntimeError("Bybit retCode 10006: Too many visits")
+            q.append(now)
+        time.sleep(self.latency)
+
+    def list_positions(self, label: str) -> List[Dict[str, Any]]:
+        self._hit(label, "read")
+        with self._lock:
+            return [dict(p) for p in self.positions[label].values()]
+
+    def reduce_only(self, label: str, symbol: str, side: str, qty: Decimal) -> Dict[str, Any]:
+        self._hit(label, "order")
+        with self._lock:
+            p = self.positions[label].get(symbol)
+            if p is None:
+                raise RuntimeError("Bybit retCode 110017: reduce-only order has same side with current position")
+            left = Decimal(p["size"]) - Decimal(str(qty))
+            if left <= 0:
+                del self.positions[label][symbol]
+            else:
+                p["size"] = str(left)
+        return {"retCode": 0}
+
+    def cancel_all(self, label: str, symbol: str) -> None:
+        self._hit(label, "cancel")
+        with self._lock:
+            self.open_orders[label].pop(symbol, None)
+
+    def is_flat(self) -> bool:
+        return not any(self.positions.values())
+
+
+def _legacy_flatten(ex: MockExchange, accounts: List[str]) -> List[float]:
+    t0 = time.perf_counter()
+    ttf: List[float] = []
+    for lab in accounts:
+        syms = sorted({p["symbol"] for p in ex.list_positions(lab)})
+        for sym in syms:
+            for p in ex.list_positions(lab):
+                if p["symbol"] == sym:
+                    ex.reduce_only(lab, sym, p["side"], Decimal(p["size"]))
+            ex.cancel_all(lab, sym)
+            ttf.append((time.perf_counter() - t0) * 1000.0)
+    return ttf
+
+
+def _pct(xs: List[float], q: float) -> float:
+    if not xs:
+        return 0.0
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(len(s) * q))]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--accounts", type=int, default=11)
+    ap.add_argument("--symbols", type=int, default=8, help="open symbols per account")
+    ap.add_argument("--latency-ms", type=float, default=60.0)
+    ap.add_argument("--limit", type=int, default=10, help="mock per-account order requests/sec limit (reads get 5x)")
+    ap.add_argument("--concurrency", type=int, default=execution_ws.FLATTEN_MAX_CONCURRENCY)
+    ap.add_argument("--rate", type=float, default=execution_ws.FLATTEN_RATE_PER_SEC)
+    ap.add_argument("--skip-legacy", action="store_true")
+    args = ap.parse_args()
+
+    accounts = ["main"] + [f"flashback{str(i).zfill(2)}" for i in range(1, args.accounts)]
+    n = len(accounts) * args.symbols
+    print(f"=== fleet flatten benchmark accounts={len(accounts)} symbols/account={args.symbols} "
+          f"latency={args.latency_ms}ms limit={args.limit}/s ===")
+
+    if not args.skip_legacy:
+        ex = MockExchange(accounts, args.symbols, args.latency_ms, args.limit)
+        t0 = time.perf_counter()
+        try:
+            ttf = _legacy_flatten(ex, accounts)
+            err = ""
+        except Exception as e:
+            ttf, err = [], f" error={e}"
+        total = (time.perf_counter() - t0) * 1000.0
+        print(f"legacy  total={total:9.1f}ms ttf_p50={_pct(ttf, 0.5):9.1f}ms ttf_max={_pct(ttf, 1.0):9.1f}ms "
+              f"calls={ex.calls} rejected={ex.rejected} flat={ex.is_flat()}{err}")
+
+    ex = MockExchange(accounts, args.symbols, args.latency_ms, args.limit)
+    res = execution_ws.flatten_fleet(
+        accounts, exchange=ex, notify=False, max_concurrency=args.concurrency, rate_per_sec=args.rate
+    )
+    acks = [r["ack_ms"] for syms in res["results"].values() for r in syms.values() if r["ack_ms"] is not None]
+    flats = [r["flat_ms"] for syms in res["results"].values() for r in syms.values() if r["flat_ms"] is not None]
+    print(f"fleet   total={res['elapsed_ms']:9.1f}ms ack_p50={_pct(acks, 0.5):9.1f}ms ack_max={_pct(acks, 1.0):9.1f}ms "
+          f"flat_max={_pct(flats, 1.0):9.1f}ms calls={ex.calls} rejected={ex.rejected} "
+          f"flat={ex.is_flat()} ok={res['ok']} symbols={len(acks)}/{n} remaining={res['remaining']}")
+
+
+if __name__ == "__main__":
+    main()
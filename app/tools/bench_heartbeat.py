@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: heartbeat cost, legacy JSON file vs shared-memory registry.
+
+  legacy:   read + parse + rewrite the whole heartbeats JSON per beat
+            (the pre-registry record_heartbeat), with --names entries present
+  registry: app.core.heartbeat_registry.HeartbeatRegistry.beat()
+
+Also runs --procs processes beating distinct names concurrently against
+each backend and counts names missing at the end (lost updates).
+
+Usage:
+    python -m app.tools.bench_heartbeat [--beats 20000] [--names 40] [--procs 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import orjson
+
+from app.core.heartbeat_registry import HeartbeatRegistry
+
+_LOCK = threading.Lock()
+
+
+def _legacy_beat(path: Path, name: str) -> None:
+    with _LOCK:
+        if path.exists():
+            try:
+                raw = path.read_bytes()
+                data = orjson.loads(raw) if raw else {}
+                if not isinstance(data, dict):
+                    data = {}
+            except Exception:
+                data = {}
+        else:
+            data = {}
+        data[name] = int(time.time())
+        path.write_bytes(orjson.dumps(data))
+
+
+def _time(fn, n: int) -> List[float]:
+    out: List[float] = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        fn(i)
+        out.append((time.perf_counter() - t0) * 1_000_000.0)
+    return out
+
+
+def _summary(name: str, lat: List[float]) -> str:
+    s = sorted(lat)
+    return (
+        f"{name:<9} beats={len(s)} mean={statistics.fmean(s):8.2f}us "
+        f"p50={s[len(s) // 2]:8.2f}us p99={s[int(len(s) * 0.99)]:8.2f}us"
+    )
+
+
+def _proc_legacy(path: str, proc: int, beats: int) -> None:
+    for i in range(beats):
+        _legacy_beat(Path(path), f"p{proc}_w{i % 10}")
+
+
+def _proc_registry(path: str, proc: int, beats: int) -> None:
+    reg = HeartbeatRegistry(Path(path))
+    for i in range(beats):
+        reg.beat(f"p{proc}_w{i % 10}")
+
+
+def _lost(target, path: Path, procs: int, beats: int) -> float:
+    ctx = mp.get_context("spawn")
+    ps = [ctx.Process(target=target, args=(str(path), p, beats)) for p in range(procs)]
+    t0 = time.perf_counter()
+    for p in ps:
+        p.start()
+    for p in ps:
+        p.join()
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--beats", type=int, default=20_000)
+    ap.add_argument("--names", type=int, default=40, help="workers already present in the table")
+    ap.add_argument("--procs", type=int, default=4)
+    ap.add_argument("--proc-beats", type=int, default=2_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        td_p = Path(td)
+        legacy_path = td_p / "heartbeats.json"
+        reg = HeartbeatRegistry(td_p / "heartbeats.shm")
+        for i in range(args.names):
+            _legacy_beat(legacy_path, f"worker_{i}")
+            reg.beat(f"worker_{i}")
+
+        legacy = _time(lambda i: _legacy_beat(legacy_path, f"worker_{i % args.names}"), args.beats)
+        registry = _time(lambda i: reg.beat(f"worker_{i % args.names}"), args.beats)
+        read_lat = _time(lambda i: reg.read_all(), 200)
+
+        print(f"=== heartbeat benchmark beats={args.beats} names={args.names} ===")
+        print(_summary("legacy", legacy))
+        print(_summary("registry", registry))
+        print(_summary("read_all", read_lat))
+
+        expected = {f"p{p}_w{i}" for p in range(args.procs) for i in range(10)}
+
+        mp_legacy = td_p / "mp.json"
+        t_leg = _lost(_proc_legacy, mp_legacy, args.procs, args.proc_beats)
+        try:
+            seen = set(orjson.loads(mp_legacy.read_bytes()))
+        except Exception:
+            seen = set()
+        print(f"multi-proc legacy:   {t_leg:6.2f}s missing_names={len(expected - seen)}/{len(expected)}")
+
+        mp_reg = td_p / "mp.shm"
+        t_reg = _lost(_proc_registry, mp_reg, args.procs, args.proc_beats)
+        rows = HeartbeatRegistry(mp_reg).read_all()
+        missing = len(expected - set(rows))
+        beats_total = sum(r["beats"] for r in rows.values())
+        print(
+            f"multi-proc registry: {t_reg:6.2f}s missing_names={missing}/{len(expected)} "
+            f"beats={beats_total}/{args.procs * args.proc_beats}"
+        )
+
+
+if __name__ == "__main__":
+    main()
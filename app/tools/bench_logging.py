@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: per-call logging cost on the executor path.
+
+Replays the executor_v2 hot-path pattern (bind_context adapter, %-style
+message with 8 args, a couple of calls per strategy decision) with
+stdout and the log file redirected into a temp dir, under:
+
+  sync:        handlers in the caller, caller info on (the old setup)
+  async:       QueueHandler -> QueueListener (text file sink)
+  async_json:  same, JSON-lines file sink (context fields included)
+  async_samp:  async + set_sampling("executor_v2", 0.1)
+
+Reports caller-side cost per call (mean / p50 / p99), time for the listener
+to drain, and that every non-sampled record reached the file.
+
+Usage:
+    python -m app.tools.bench_logging [--n 50000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# captured before app.core.logger configures anything
+_LEGACY_SRCFILE = logging._srcfile  # type: ignore[attr-defined]
+
+from app.core import logger as fl  # noqa: E402
+
+
+def _pct(xs: List[float], q: float) -> float:
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(len(s) * q))]
+
+
+def _run(mode: str, td: Path, n: int) -> Dict[str, float]:
+    out_dir = td / mode
+    out_dir.mkdir()
+    fl.LOG_FILE = out_dir / "flashback.log"
+    fl.LOG_JSON_FILE = out_dir / "flashback.jsonl"
+    console = (out_dir / "console.out").open("w", encoding="utf-8")
+    real_stdout = sys.stdout
+    sys.stdout = console
+    try:
+        fl.configure_logging(async_mode=(mode != "sync"), json_lines=(mode == "async_json"), console=True, force=True)
+        fl.set_sampling("executor_v2", 0.1 if mode == "async_samp" else 1.0)
+        if mode == "sync":
+            # the old pipeline also paid for caller lookup on every record
+            logging._srcfile = _LEGACY_SRCFILE  # type: ignore[attr-defined]
+            logging.logMultiprocessing = True
+        for k in fl._STATS:
+            fl._STATS[k] = 0
+        bound = fl.bind_context(fl.get_logger("executor_v2"), bot="executor_v2", account_label="flashback01",
+                                strat="Sub1_BO", sub_uid="524633243")
+        costs: List[float] = []
+        t_all = time.perf_counter()
+        for i in range(n):
+            t0 = time.perf_counter_ns()
+            bound.info(
+                "label_norm symbol=%s tf_raw=%r tf=%s(tf_reason=%s) setup_type_raw=%r setup_type=%s(st_reason=%s) mode=%s",
+                "BTCUSDT", "5", "5m", "ok", "breakout", "breakout", "ok", "LIVE_CANARY",
+            )
+            costs.append((time.perf_counter_ns() - t0) / 1000.0)
+        caller_s = time.perf_counter() - t_all
+        t_drain = time.perf_counter()
+        fl.flush_logs()
+        drain_s = time.perf_counter() - t_drain
+        stats = fl.logging_stats()
+        fl.configure_logging(async_mode=False, console=False, force=True)
+    finally:
+        sys.stdout = real_stdout
+        console.close()
+    f = fl.LOG_JSON_FILE if mode == "async_json" else fl.LOG_FILE
+    lines = sum(1 for _ in f.open("rb"))
+    expected = n - stats["sampled_out"] - stats["dropped"]
+    return {
+        "mean": sum(costs) / n,
+        "p50": _pct(costs, 0.5),
+        "p99": _pct(costs, 0.99),
+        "caller_s": caller_s,
+        "drain_s": drain_s,
+        "lines": lines,
+        "expected": expected,
+        "dropped": stats["dropped"],
+        "sampled_out": stats["sampled_out"],
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50_000)
+    args = ap.parse_args()
+
+    fl.LOG_QUEUE_MAX = max(fl.LOG_QUEUE_MAX, args.n + 1)
+    rows = {}
+    with tempfile.TemporaryDirectory() as td:
+        for mode in ("sync", "async", "async_json", "async_samp"):
+            rows[mode] = _run(mode, Path(td), args.n)
+
+    print(f"=== logging benchmark n={args.n} (executor_v2 label_norm line, stdout + file) ===")
+    for mode, r in rows.items():
+        print(f"{mode:<11} per-call mean={r['mean']:7.2f}us p50={r['p50']:7.2f}us p99={r['p99']:7.2f}us "
+              f"caller={r['caller_s']:.2f}s drain={r['drain_s']:.2f}s lines={r['lines']}/{r['expected']} "
+              f"sampled_out={r['sampled_out']} dropped={r['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ai_memory_store tiered lookups, legacy per-query SQLite vs resident store.
+
+  legacy:    v2.3 read path — new sqlite connection per query, LIKE prefix
+             filters, over --rollups synthetic rows
+  load:      resident store restart from its SQLite backing (--rollups rows)
+  query:     query_memories_tiered p50/p99 (full fingerprints, Tier A hits,
+             Tier B fallbacks, prefix fingerprints), idle and while a writer
+             appends setups/outcomes that the background thread ingests
+  ingest:    setups + outcomes.v1 (out-of-order, re-delivered lines) vs a
+             naive recompute; restart + append keeps the same aggregates
+
+Usage:
+    python -m app.tools.bench_memory_store [--rollups 1000000] [--budget-ms 1.0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import orjson
+
+from app.ai import ai_memory_store as ms
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "DOGEUSDT", "BNBUSDT", "ADAUSDT", "LINKUSDT"]
+SETUP_TYPES = ["breakout", "pullback"]
+POLICIES = ["a1" * 16, "b2" * 16]
+TF = "5m"
+
+
+def _fp(i: int) -> str:
+    return hashlib.sha256(f"fp{i}".encode()).hexdigest()
+
+
+def _seed_backing(db: Path, rollups: int, now_ms: int) -> List[str]:
+    """rollups/4 fingerprints x (setup_type, policy)."""
+    rnd = random.Random(1)
+    conn = ms._connect(db)
+    conn.execute("BEGIN;")
+    fps = []
+    rows = []
+    for i in range(rollups // 4):
+        fp = _fp(i)
+        fps.append(fp)
+        sym = SYMBOLS[i % len(SYMBOLS)]
+        for st in SETUP_TYPES:
+            for ph in POLICIES:
+                n = rnd.randint(1, 40)
+                wins = rnd.randint(0, n)
+                rows.append((fp, sym, TF, st, ph, None, n, wins, n - wins, n, rnd.uniform(-1, 1) * n,
+                             n, rnd.uniform(-50, 50) * n, 0, 0.0, 0, 0.0, now_ms - rnd.randint(0, 90) * 86_400_000))
+        if len(rows) >= 50_000:
+            conn.executemany(f"INSERT INTO rollups ({ms._ROLLUP_COLS}) VALUES ({','.join('?' * 18)});", rows)
+            rows.clear()
+    conn.executemany(f"INSERT INTO rollups ({ms._ROLLUP_COLS}) VALUES ({','.join('?' * 18)});", rows)
+    conn.execute("COMMIT;")
+    conn.close()
+    return fps
+
+
+def _seed_legacy(db: Path, backing: Path) -> None:
+    conn = sqlite3.connect(str(db))
+    conn.execute(f"ATTACH DATABASE '{backing}' AS b;")
+    conn.execute(
+        """
+        CREATE TABLE memory_rollups AS SELECT
+            memory_fingerprint, memory_id, symbol, timeframe, setup_type, policy_hash,
+            n, wins, losses, (wins * 1.0 / n) AS win_rate, (r_sum / r_n) AS avg_r_multiple,
+            (pnl_sum / pnl_n) AS avg_pnl_usd, NULL AS allow_rate, 1.0 AS avg_size_multiplier,
+            last_ts_ms, last_ts_ms AS built_ts_ms
+        FROM b.rollups;
+        """
+    )
+    conn.execute("CREATE INDEX idx_roll_mfp ON memory_rollups(memory_fingerprint);")
+    conn.execute("CREATE INDEX idx_roll_sym_tf ON memory_rollups(symbol, timeframe);")
+    conn.execute("CREATE INDEX idx_roll_policy ON memory_rollups(policy_hash);")
+    conn.commit()
+    conn.close()
+
+
+def _legacy_query(db: Path, fp: str, symbol: str, ph: str) -> list:
+    # v2.3 read path: connect per query, LIKE on fingerprint / policy prefix
+    conn = sqlite3.connect(str(db))
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(
+        """
+        SELECT * FROM memory_rollups
+        WHERE memory_fingerprint LIKE ? AND n >= ? AND last_ts_ms >= ? AND symbol = ? AND timeframe = ?
+          AND setup_type = ? AND policy_hash LIKE ?
+        ORDER BY avg_r_multiple DESC, win_rate DESC, n DESC, last_ts_ms DESC LIMIT 5;
+        """,
+        (fp, 2, 0, symbol, TF, "breakout", ph[:8] + "%"),
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def _event(fp: str, sym: str, st: str, ph: str) -> Dict[str, Any]:
+    return {"symbol": sym, "timeframe": TF, "setup_type": st, "policy": {"policy_hash": ph},
+            "payload": {"features": {"memory_fingerprint": fp}}}
+
+
+def _pct(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p * len(xs)))]
+
+
+def _lat(fn, n: int) -> Tuple[float, float, float]:
+    out = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t) * 1000.0)
+    return _pct(out, 0.5), _pct(out, 0.99), max(out)
+
+
+def _setup_line(tid: str, fp: str, sym: str, st: str, ph: str, ts: int) -> bytes:
+    return orjson.dumps({"event_type": "setup_context", "trade_id": tid, "ts_ms": ts, "symbol": sym,
+                         "timeframe": TF, "setup_type": st, "policy": {"policy_hash": ph},
+                         "payload": {"features": {"memory_fingerprint": fp}}}) + b"\n"
+
+
+def _outcome_line(tid: str, sym: str, ts: int, pnl: float, r: float) -> bytes:
+    return orjson.dumps({"schema_version": "outcome.v1", "event_type": "trade_outcome", "trade_id": tid,
+                         "symbol": sym, "opened_ts_ms": ts - 60_000, "closed_ts_ms": ts, "pnl_usd": pnl,
+                         "r_multiple": r}) + b"\n"
+
+
+def _correctness(td: Path, now_ms: int) -> None:
+    rnd = random.Random(7)
+    setups, outcomes = td / "c_setups.jsonl", td / "c_outcomes.jsonl"
+    db = td / "c.sqlite"
+    expect: Dict[tuple, list] = {}
+    trades = []
+    for i in range(20_000):
+        fp = _fp(10_000_000 + i % 3000)
+        sym, st, ph = SYMBOLS[i % 8], SETUP_TYPES[i % 2], POLICIES[(i // 2) % 2]
+        trades.append((f"T{i}", (fp, sym, TF, st, ph), now_ms - rnd.randint(0, 10) * 86_400_000))
+    s_lines, o_lines = [], []
+    for tid, key, ts in trades:
+        s_lines.append((ts, _setup_line(tid, key[0], key[1], key[3], key[4], ts)))
+        pnl, r = rnd.uniform(-20, 20), rnd.uniform(-2, 2)
+        # ~10% of outcomes land before their setup is written
+        o_lines.append((ts - (5 if rnd.random() < 0.1 else -5), _outcome_line(tid, key[1], ts, pnl, r)))
+        if rnd.random() < 0.05:
+            o_lines.append((ts + 10, _outcome_line(tid, key[1], ts, pnl, r)))  # re-delivered
+        e = expect.setdefault(key, [0, 0, 0.0])
+        e[0] += 1
+        e[1] += pnl > 0
+        e[2] += r
+    s_lines.sort()
+    o_lines.sort()
+    half_s, half_o = len(s_lines) // 2, len(o_lines) // 2
+    setups.write_bytes(b"".join(b for _, b in s_lines[:half_s]))
+    outcomes.write_bytes(b"".join(b for _, b in o_lines[:half_o]))
+
+    st1 = ms.MemoryRollupStore(db, setups, outcomes)
+    st1.refresh(force=True)
+    st1.persist()
+    with setups.open("ab") as f:
+        f.write(b"".join(b for _, b in s_lines[half_s:]))
+    with outcomes.open("ab") as f:
+        f.write(b"".join(b for _, b in o_lines[half_o:]))
+    t = time.perf_counter()
+    st2 = ms.MemoryRollupStore(db, setups, outcomes)  # restart, then tail the second half
+    st2.refresh(force=True)
+    ms_catch = (time.perf_counter() - t) * 1000
+    ok = len(st2.rollups) == len(expect) and all(
+        (ru.n, ru.wins) == (e[0], e[1]) and abs(ru.r_sum - e[2]) < 1e-6
+        for key, e in expect.items()
+        for ru in (st2.rollups.get(key),)
+        if ru is not None
+    )
+    print(f"ingest correctness: rollups={len(st2.rollups)} expected={len(expect)} aggregates_match={ok} "
+          f"pending_left={st2.stats()['pending_outcomes']} restart+catch-up {ms_catch:.0f}ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rollups", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=20_000)
+    ap.add_argument("--legacy-queries", type=int, default=500)
+    ap.add_argument("--budget-ms", type=float, default=1.0, help="p99 budget for query_memories_tiered")
+    args = ap.parse_args()
+
+    now_ms = int(time.time() * 1000)
+    rnd = random.Random(3)
+    with tempfile.TemporaryDirectory() as td:
+        td = Path(td)
+        db = td / "memory_rollups.v3.sqlite"
+        setups, outcomes = td / "setups.jsonl", td / "outcomes.v1.jsonl"
+        setups.touch()
+        outcomes.touch()
+
+        t = time.perf_counter()
+        fps = _seed_backing(db, args.rollups, now_ms)
+        print(f"=== ai_memory_store benchmark rollups={args.rollups} fingerprints={len(fps)} "
+              f"(seeded in {time.perf_counter() - t:.1f}s) budget p99<={args.budget_ms}ms ===")
+
+        legacy_db = td / "legacy_rollups.sqlite"
+        _seed_legacy(legacy_db, db)
+
+        def pick() -> Tuple[str, str]:
+            i = rnd.randrange(len(fps))
+            return fps[i], SYMBOLS[i % len(SYMBOLS)]
+
+        p50, p99, mx = _lat(lambda: _legacy_query(legacy_db, *pick(), POLICIES[0]), args.legacy_queries)
+        print(f"legacy sqlite per query    p50={p50:8.3f}ms p99={p99:8.3f}ms max={mx:8.2f}ms")
+
+        t = time.perf_counter()
+        store = ms.MemoryRollupStore(db, setups, outcomes)
+        load_s = time.perf_counter() - t
+        print(f"resident load (restart)    {load_s:8.2f}s rollups={len(store.rollups)}")
+        ms._STORE = store
+        store.start()
+
+        opts = ms.QueryOptions(k=5, min_n=3, min_n_any=3, min_n_symbol=2)
+
+        def q_full():
+            fp, sym = pick()
+            return ms.query_memories_tiered(_event(fp, sym, "breakout", POLICIES[0]), opts)
+
+        def q_fallback():  # symbol mismatch -> Tier A empty -> Tier B
+            fp, _ = pick()
+            return ms.query_memories_tiered(_event(fp, "NOPEUSDT", "pullback", POLICIES[1][:10]), opts)
+
+        def q_prefix():
+            fp, sym = pick()
+            return ms.query_memories_tiered(_event(fp[:12], sym, "breakout", POLICIES[0][:8]), opts)
+
+        tiers = {}
+        for _ in range(2000):
+            tier = q_full()["tier_used"]
+            tiers[tier] = tiers.get(tier, 0) + 1
+        results = {}
+        for name, fn in (("tier A (full fp)", q_full), ("tier B fallback", q_fallback), ("prefix fp+policy", q_prefix)):
+            results[name] = _lat(fn, args.queries)
+            p50, p99, mx = results[name]
+            print(f"resident {name:<18} p50={p50:8.4f}ms p99={p99:8.4f}ms max={mx:8.2f}ms")
+        print(f"tier mix (full fp sample): {tiers}")
+
+        # concurrent ingest: writer appends setups/outcomes, daemon thread tails + persists
+        stop = threading.Event()
+        written = [0]
+
+        def writer():
+            i = 0
+            while not stop.is_set():
+                buf_s, buf_o = [], []
+                for _ in range(200):
+                    fp, sym = fps[i % len(fps)], SYMBOLS[(i % len(fps)) % len(SYMBOLS)]
+                    tid = f"L{i}"
+                    buf_s.append(_setup_line(tid, fp, sym, "breakout", POLICIES[0], now_ms))
+                    buf_o.append(_outcome_line(tid, sym, now_ms + i, 5.0, 0.5))
+                    i += 1
+                with setups.open("ab") as f:
+                    f.write(b"".join(buf_s))
+                with outcomes.open("ab") as f:
+                    f.write(b"".join(buf_o))
+                written[0] = i
+                time.sleep(0.01)
+
+        th = threading.Thread(target=writer, daemon=True)
+        th.start()
+        p50, p99, mx = _lat(q_full, args.queries)
+        stop.set()
+        th.join()
+        time.sleep(ms.REFRESH_SEC * 2 + 0.5)
+        print(f"resident under ingest      p50={p50:8.4f}ms p99={p99:8.4f}ms max={mx:8.2f}ms "
+              f"(appended {written[0]} trades, ingested offsets={store.offsets})")
+        store.persist()
+
+        worst = max([r[1] for r in results.values()] + [p99])
+        verdict = "PASS" if worst <= args.budget_ms else "FAIL"
+        print(f"p99 budget {args.budget_ms}ms: worst p99={worst:.4f}ms -> {verdict}")
+
+        _correctness(td, now_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: orchestrator_watchdog supervision, subprocess polling vs
+in-process liveness + exit notification (app.ops.proc_supervisor).
+
+  check      liveness cost per pid: one `ps -p` subprocess per check (the
+             Linux stand-in for the old `tasklist /FI "PID eq ..."`) vs
+             pid_alive() reading /proc
+  latency    --labels fake supervisors (sleepers) under the watchdog in a
+             temp root; one is SIGKILLed --kills times and kill -> respawn
+             is timed from the orchestrator state:
+               poll   tick() every --interval s (what watchdog_loop.ps1 did)
+               event  run_loop(): wakes on the child's exit
+  reuse      a recorded pid with a different start time is reported dead
+             and terminate() leaves the live process alone
+  group      terminate() takes down a grandchild via the process group,
+             and escalates to SIGKILL when SIGTERM is ignored
+
+Usage:
+    python -m app.tools.bench_orchestrator_watchdog [--checks 200] [--labels 4] [--kills 10] [--interval 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import orjson
+
+from app.ops import orchestrator_watchdog as wd
+from app.ops.proc_supervisor import pid_alive, proc_start_time, spawn, terminate
+
+SLEEPER = [sys.executable, "-c", "import time; time.sleep(3600)"]
+
+
+def _ps_alive(pid: int) -> bool:
+    r = subprocess.run(["ps", "-p", str(pid)], capture_output=True, text=True)
+    return str(pid) in (r.stdout or "")
+
+
+def bench_check(n: int) -> None:
+    p = spawn(SLEEPER)
+    try:
+        for name, fn in (("subprocess", _ps_alive), ("pid_alive", pid_alive)):
+            t = time.perf_counter()
+            ok = all(fn(p.pid) for _ in range(n))
+            el = time.perf_counter() - t
+            print(f"check      {name:10s} {el / n * 1e6:10.1f} us/check  alive={ok}")
+    finally:
+        terminate(p.pid, popen=p)
+
+
+def _setup(root: Path, labels: int) -> List[str]:
+    names = [f"bench{i:02d}" for i in range(labels)]
+    (root / "config").mkdir(parents=True, exist_ok=True)
+    rows = "".join(f"- account_label: {n}\n  enabled: true\n  enable_ai_stack: true\n  automation_mode: LEARN_DRY\n"
+                   for n in names)
+    (root / "config" / "fleet_manifest.yaml").write_text("fleet:\n" + rows, encoding="utf-8")
+    wd.ROOT = root
+    wd.STATE = root / "state"
+    wd.LOGDIR = wd.STATE / "orchestrator_logs"
+    wd.MANIFEST = root / "config" / "fleet_manifest.yaml"
+    wd.ORCH_STATE = wd.STATE / "orchestrator_state.json"
+    wd.WATCHDOG_STATE = wd.STATE / "orchestrator_watchdog.json"
+    wd.SUPERVISOR_CMD = SLEEPER
+    wd.MAX_RESTARTS = 10_000
+    wd.BACKOFF_MIN = 0.0  # measure detection + respawn, not the restart backoff
+    wd.BACKOFF_MAX = 0.0
+    return names
+
+
+def _proc(label: str) -> dict:
+    try:
+        return orjson.loads(wd.ORCH_STATE.read_bytes())["procs"][label]
+    except Exception:
+        return {}
+
+
+def _wait_pid(label: str, not_pid: object, timeout: float = 60.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        p = _proc(label)
+        if p.get("pid") and p.get("pid") != not_pid and p.get("alive"):
+            return p
+        time.sleep(0.005)
+    raise SystemExit(f"{label}: no respawn within {timeout}s")
+
+
+def bench_latency(mode: str, labels: int, kills: int, interval: float) -> List[float]:
+    root = Path(tempfile.mkdtemp(prefix=f"wd_{mode}_"))
+    names = _setup(root, labels)
+    stop = threading.Event()
+
+    def poll_loop() -> None:
+        while not stop.is_set():
+            wd.tick()
+            stop.wait(interval)
+
+    target: Callable[[], object] = poll_loop if mode == "poll" else (lambda: wd.run_loop(interval))
+    rng = random.Random(5)
+    out: List[float] = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        th = threading.Thread(target=target, daemon=True)
+        th.start()
+        victim = names[0]
+        cur = _wait_pid(victim, None)
+        for _ in range(kills):
+            time.sleep(rng.uniform(0.2, interval))  # kill at an arbitrary point of the poll cycle
+            t_kill = time.time() * 1000
+            os.kill(cur["pid"], signal.SIGKILL)
+            cur = _wait_pid(victim, cur["pid"])
+            out.append(cur["started_ts_ms"] - t_kill)
+        # empty fleet: the (event) loop keeps running as a daemon but restarts nothing
+        wd.MANIFEST.write_text("fleet: []\n", encoding="utf-8")
+        stop.set()
+        if mode == "poll":
+            th.join(timeout=interval + 10)
+        procs = orjson.loads(wd.ORCH_STATE.read_bytes())["procs"]
+        for n in names:
+            p = procs.get(n) or {}
+            terminate(p.get("pid"), p.get("start_time"), grace_sec=1.0, popen=wd._CHILDREN.get(n))
+        time.sleep(0.2)
+    return out
+
+
+def bench_reuse() -> None:
+    p = spawn(SLEEPER)
+    st = proc_start_time(p.pid)
+    stale = (st or 0) + 1  # what a recorded identity looks like after the pid was reused
+    dead = not pid_alive(p.pid, stale)
+    res = terminate(p.pid, stale, grace_sec=0.5)
+    survived = p.poll() is None
+    print(f"reuse      start_time={st} alive(right)={pid_alive(p.pid, st)} alive(stale)={not dead} "
+          f"terminate(stale)={res} survived={survived} ok={dead and res == 'gone' and survived}")
+    terminate(p.pid, st, popen=p)
+
+
+def bench_group() -> None:
+    for ignore in (False, True):
+        code = ("import signal, subprocess, sys, time\n"
+                + ("signal.signal(signal.SIGTERM, signal.SIG_IGN)\n" if ignore else "")
+                + "c = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(3600)'])\n"
+                  "print(c.pid, flush=True)\ntime.sleep(3600)\n")
+        p = spawn([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True)
+        gpid = int(p.stdout.readline())
+        gst = proc_start_time(gpid)
+        t = time.perf_counter()
+        res = terminate(p.pid, proc_start_time(p.pid), grace_sec=0.5, popen=p)
+        el = time.perf_counter() - t
+        time.sleep(0.1)
+        gone = not pid_alive(gpid, gst)
+        print(f"group      sigterm_ignored={ignore!s:5s} result={res} in {el * 1000:.0f} ms  "
+              f"grandchild_gone={gone} ok={gone and res == ('kill' if ignore else 'term')}")
+        p.stdout.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--checks", type=int, default=200)
+    ap.add_argument("--labels", type=int, default=4)
+    ap.add_argument("--kills", type=int, default=10)
+    ap.add_argument("--interval", type=float, default=5.0)
+    args = ap.parse_args()
+
+    print(f"=== orchestrator watchdog benchmark labels={args.labels} kills={args.kills} interval={args.interval}s "
+          f"platform={sys.platform} ===")
+    bench_check(args.checks)
+    for mode in ("poll", "event"):
+        lat = bench_latency(mode, args.labels, args.kills, args.interval)
+        print(f"latency    {mode:5s} kill->respawn mean={statistics.mean(lat):8.0f} ms  "
+              f"p50={statistics.median(lat):8.0f} ms  max={max(lat):8.0f} ms")
+    bench_reuse()
+    bench_group()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ai_executor_gate per-decision cost and ai_policiy_stats cost.
+
+  legacy:    resolve (dict merge) + parse thresholds per decision, every
+             decision appended to ai_policy_log.jsonl (mkdir + open per
+             line, as before); stats = reload the whole log
+  compiled:  get_compiled_policy().for_strategy() + in-memory counters,
+             blocks + AI_POLICY_LOG_SAMPLE_RATE of allows logged;
+             stats = read the counters file
+
+Runs in a temp state dir with a --strategies policy file. Both paths must
+agree on every allow/block and on the aggregate counts.
+
+Usage:
+    python -m app.tools.bench_policy_gate [--decisions 50000] [--strategies 40]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import orjson
+
+from app.ai import ai_executor_gate as gate
+from app.ai import ai_policiy_stats as stats_tool
+
+MODES = ["PAPER", "LIVE_CANARY", "LIVE_FULL"]
+
+
+def legacy_decide(policy: Dict[str, Any], strat: str, mode: str, score, log_path: Path) -> Dict[str, Any]:
+    cfg = gate._resolve_policy_for_strategy(policy, strat)
+    min_score, min_live, min_canary = gate._extract_min_scores(cfg)
+    enabled = [str(m).upper() for m in (cfg.get("enabled_modes") or MODES)]
+    missing_ok = [str(m).upper() for m in cfg.get("missing_score_allow_modes", ["PAPER"])]
+    allow, reason = True, "ok"
+    if mode not in enabled:
+        allow, reason = False, "mode_not_enabled"
+    if allow and score is None and mode not in missing_ok:
+        allow, reason = False, "missing_score_blocked"
+    if allow and score is not None:
+        eff = min_score
+        if mode == "LIVE_FULL" and min_live is not None:
+            eff = min_live
+        elif mode == "LIVE_CANARY" and min_canary is not None:
+            eff = min_canary
+        if eff is not None and score < eff:
+            allow, reason = False, "score_below_min"
+    d = {"allow": allow, "reason": reason, "strategy_name": strat, "symbol": "BTCUSDT",
+         "account_label": "main", "mode": mode, "trade_id": None, "score": score,
+         "min_score": min_score, "min_score_live": min_live, "min_score_canary": min_canary,
+         "policy_flags": {"enabled_modes": enabled, "missing_score_allow_modes": missing_ok},
+         "ts_ms": int(time.time() * 1000), "features": {"f1": 0.1, "f2": 0.2}}
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with log_path.open("ab") as f:
+        f.write(orjson.dumps(d) + b"\n")
+    return d
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--decisions", type=int, default=50000)
+    ap.add_argument("--strategies", type=int, default=40)
+    ap.add_argument("--sample-rate", type=float, default=0.05)
+    args = ap.parse_args()
+
+    rng = random.Random(7)
+    strats = [f"Strat{i}" for i in range(args.strategies)]
+    workload = [(rng.choice(strats), rng.choice(MODES), None if rng.random() < 0.05 else rng.random())
+                for _ in range(args.decisions)]
+
+    with tempfile.TemporaryDirectory() as td_s:
+        td = Path(td_s)
+        gate.POLICY_PATH = td / "setup_policy.json"
+        gate.POLICY_LOG_PATH = td / "ai_policy_log.jsonl"
+        gate.COUNTERS_PATH = td / "ai_policy_counters_main.json"
+        gate.AI_POLICY_LOG_SAMPLE_RATE = args.sample_rate
+        gate.AI_POLICY_COUNTERS_FLUSH_SEC = 30.0
+        policy = {"__default__": {"min_score": 0.3, "min_score_live": 0.6, "min_score_canary": 0.5,
+                                  "enabled_modes": MODES, "missing_score_allow_modes": ["PAPER"]}}
+        for i, s in enumerate(strats):
+            policy[s] = {"min_score": round(0.2 + (i % 5) * 0.1, 2)}
+        gate.POLICY_PATH.write_bytes(orjson.dumps(policy))
+        legacy_log = td / "legacy_policy_log.jsonl"
+
+        print(f"=== policy gate benchmark decisions={args.decisions} strategies={args.strategies} "
+              f"allow_sample={args.sample_rate} ===")
+
+        loaded = gate.load_setup_policy()
+        t = time.perf_counter()
+        legacy = [legacy_decide(loaded, s, m, sc, legacy_log) for s, m, sc in workload]
+        legacy_us = (time.perf_counter() - t) * 1e6 / args.decisions
+
+        t = time.perf_counter()
+        new: List[Dict[str, Any]] = []
+        for s, m, sc in workload:
+            th = gate.get_compiled_policy().for_strategy(s)
+            new.append(gate.ai_gate_decide(strategy_name=s, symbol="BTCUSDT", account_label="main", mode=m,
+                                           features={"f1": 0.1, "f2": 0.2}, raw_score=sc, thresholds=th))
+        new_us = (time.perf_counter() - t) * 1e6 / args.decisions
+        gate.flush_decision_counters(force=True)
+
+        agree = all(a["allow"] == b["allow"] and a["reason"] == b["reason"] for a, b in zip(legacy, new))
+        print(f"decide  legacy {legacy_us:8.2f}us  compiled {new_us:8.2f}us  speedup {legacy_us / new_us:.1f}x  "
+              f"same_decisions={agree}")
+
+        legacy_size = legacy_log.stat().st_size
+        new_size = gate.POLICY_LOG_PATH.stat().st_size if gate.POLICY_LOG_PATH.exists() else 0
+        blocks = sum(1 for d in new if not d["allow"])
+        print(f"log     legacy {legacy_size / 1e6:8.2f}MB  sampled {new_size / 1e6:8.2f}MB  "
+              f"(blocks={blocks} all kept)  counters file {gate.COUNTERS_PATH.stat().st_size / 1e3:.1f}KB")
+
+        t = time.perf_counter()
+        s_old = stats_tool.build_stats(stats_tool._load_jsonl(legacy_log))
+        old_ms = (time.perf_counter() - t) * 1000.0
+        t = time.perf_counter()
+        s_new = stats_tool.build_stats_from_counters(stats_tool.load_counters(td))
+        new_ms = (time.perf_counter() - t) * 1000.0
+        same = (s_old["total_decisions"], s_old["allow_count"], s_old["by_reason"], s_old["score_histogram"]) == \
+               (s_new["total_decisions"], s_new["allow_count"], s_new["by_reason"], s_new["score_histogram"])
+        print(f"stats   legacy {old_ms:8.1f}ms  counters {new_ms:8.2f}ms  same_aggregates={same}")
+
+        # policy edit is picked up on the next decision
+        before = gate.get_compiled_policy()
+        gate.AI_POLICY_RECHECK_SEC = 0.0
+        policy["Strat0"] = {"min_score": 0.99}
+        time.sleep(0.01)
+        gate.POLICY_PATH.write_bytes(orjson.dumps(policy))
+        after = gate.get_compiled_policy()
+        print(f"reload  recompiled={before is not after} Strat0.min={after.for_strategy('Strat0').min_score}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: risk_daemon breaker latency on a replayed execution stream.
+
+Each trial writes a background execution stream (--rate lines/s across
+--accounts accounts) into a temp ws_executions_<label>.jsonl, then appends
+one losing close that breaches RISK_ACCOUNT_MAX_DAILY_LOSS_USD. We measure:
+
+  detect:      breaching line written -> RiskEngine trip
+  end_to_end:  breaching line written -> portfolio_guard.is_breaker_active()
+               true in an observer thread (shared breaker file)
+
+Also reports the engine's per-update cost on an offline replay.
+
+Usage:
+    python -m app.tools.bench_risk_breaker [--trials 20] [--rate 500] [--poll-ms 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import orjson
+
+from app.bots import risk_daemon
+from app.core import portfolio_guard
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "DOGEUSDT", "BNBUSDT"]
+
+
+def _line(label: str, sym: str, side: str, qty: float, px: float) -> Dict[str, Any]:
+    return {
+        "version": 1,
+        "topic": "execution",
+        "ts_ms": int(time.time() * 1000),
+        "bench_t": time.time(),
+        "account_label": label,
+        "data": [{
+            "symbol": sym, "side": side, "execQty": str(qty), "execPrice": str(px),
+            "execFee": "0.01", "execType": "Trade", "markPrice": str(px),
+        }],
+    }
+
+
+def _noise_writer(state_dir: Path, accounts: List[str], rate: float, stop: threading.Event) -> None:
+    rnd = random.Random(5)
+    files = {a: (state_dir / f"ws_executions_{a}.jsonl").open("ab") for a in accounts}
+    period = 1.0 / rate
+    nxt = time.perf_counter()
+    flip: Dict[str, int] = {}
+    while not stop.is_set():
+        a = rnd.choice(accounts)
+        sym = rnd.choice(SYMBOLS[1:])
+        k = flip.get(a + sym, 0)
+        flip[a + sym] = k + 1
+        side = "Buy" if k % 2 == 0 else "Sell"
+        f = files[a]
+        f.write(orjson.dumps(_line(a, sym, side, 0.1, 100.0 + rnd.uniform(-0.05, 0.05))) + b"\n")
+        f.flush()
+        nxt += period
+        time.sleep(max(0.0, nxt - time.perf_counter()))
+    for f in files.values():
+        f.close()
+
+
+def _trial(td: Path, args: argparse.Namespace, accounts: List[str]) -> Dict[str, float]:
+    state_dir = td / "state"
+    state_dir.mkdir(parents=True, exist_ok=True)
+    for a in accounts:
+        (state_dir / f"ws_executions_{a}.jsonl").touch()
+    portfolio_guard.BREAKER_PATH = td / "global_breaker.json"
+    portfolio_guard._GLOBAL_BREAKER = False
+
+    engine = risk_daemon.RiskEngine(
+        max_daily_loss_usd=0,
+        max_drawdown_usd=0,
+        account_max_daily_loss_usd=args.loss_limit,
+        account_max_drawdown_usd=0,
+        trip_breaker=lambda reason: portfolio_guard._write_breaker_file(True, reason, "bench"),
+        events_path=None,
+    )
+    stop = threading.Event()
+    loop = threading.Thread(
+        target=risk_daemon.run_loop,
+        args=(engine,),
+        kwargs={"state_dir": state_dir, "stop": stop, "from_start": True, "use_position_bus": False, "export_state": False},
+        daemon=True,
+    )
+    loop.start()
+    noise = threading.Thread(target=_noise_writer, args=(state_dir, accounts, args.rate, stop), daemon=True)
+    noise.start()
+
+    seen: Dict[str, float] = {}
+
+    def _observe() -> None:
+        while not stop.is_set():
+            if portfolio_guard.is_breaker_active():
+                seen["t"] = time.time()
+                return
+            time.sleep(0.0005)
+
+    obs = threading.Thread(target=_observe, daemon=True)
+    obs.start()
+
+    time.sleep(args.warmup)
+    victim = accounts[0]
+    with (state_dir / f"ws_executions_{victim}.jsonl").open("ab") as f:
+        f.write(orjson.dumps(_line(victim, SYMBOLS[0], "Buy", 1.0, 50_000.0)) + b"\n")
+        f.flush()
+        time.sleep(random.uniform(0.0, args.poll_ms / 1000.0))
+        bad = _line(victim, SYMBOLS[0], "Sell", 1.0, 50_000.0 - args.loss_limit * 1.5)
+        f.write(orjson.dumps(bad) + b"\n")
+        f.flush()
+    t_write = bad["bench_t"]
+
+    obs.join(timeout=5)
+    stop.set()
+    loop.join(timeout=2)
+    noise.join(timeout=2)
+
+    trip = engine.tripped or {}
+    return {
+        "detect_ms": (trip.get("ts_ms", 0) / 1000.0 - t_write) * 1000.0 if trip else float("nan"),
+        "end_to_end_ms": (seen.get("t", float("nan")) - t_write) * 1000.0,
+        "kind": trip.get("kind"),
+    }
+
+
+def _offline_cost(n: int, accounts: List[str]) -> float:
+    rnd = random.Random(1)
+    engine = risk_daemon.RiskEngine(
+        max_daily_loss_usd=0, max_drawdown_usd=0, account_max_daily_loss_usd=0, account_max_drawdown_usd=0,
+        trip_breaker=lambda r: None, events_path=None,
+    )
+    lines = [_line(rnd.choice(accounts), rnd.choice(SYMBOLS), rnd.choice(["Buy", "Sell"]), 0.1, 100 + rnd.random())
+             for _ in range(n)]
+    t0 = time.perf_counter()
+    for ln in lines:
+        engine.on_execution_line(ln)
+    return (time.perf_counter() - t0) / n * 1_000_000.0
+
+
+def _pct(xs: List[float], q: float) -> float:
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(len(s) * q))]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trials", type=int, default=20)
+    ap.add_argument("--rate", type=float, default=500.0, help="background execution lines per second")
+    ap.add_argument("--accounts", type=int, default=11)
+    ap.add_argument("--poll-ms", type=float, default=risk_daemon.POLL_SEC * 1000.0)
+    ap.add_argument("--warmup", type=float, default=0.5)
+    ap.add_argument("--loss-limit", type=float, default=500.0)
+    args = ap.parse_args()
+
+    risk_daemon.POLL_SEC = args.poll_ms / 1000.0
+    accounts = ["main"] + [f"flashback{str(i).zfill(2)}" for i in range(1, args.accounts)]
+
+    detect: List[float] = []
+    e2e: List[float] = []
+    for _ in range(args.trials):
+        with tempfile.TemporaryDirectory() as td:
+            r = _trial(Path(td), args, accounts)
+        if r["kind"] is None:
+            print("trial did not trip!")
+            continue
+        detect.append(r["detect_ms"])
+        e2e.append(r["end_to_end_ms"])
+
+    print(f"=== risk breaker benchmark trials={args.trials} rate={args.rate}/s accounts={len(accounts)} poll={args.poll_ms}ms ===")
+    if detect:
+        print(f"detect      p50={_pct(detect, 0.5):7.2f}ms p99={_pct(detect, 0.99):7.2f}ms max={max(detect):7.2f}ms")
+        print(f"end_to_end  p50={_pct(e2e, 0.5):7.2f}ms p99={_pct(e2e, 0.99):7.2f}ms max={max(e2e):7.2f}ms "
+              f"mean={statistics.fmean(e2e):7.2f}ms")
+    print(f"engine cost per execution line: {_offline_cost(100_000, accounts):.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: scoreboard_gate_decide latency, linear scan vs compiled index.
+
+Builds a synthetic scoreboard.v1 with N buckets (default 10k) in a temp dir,
+then times:
+  - legacy: load JSON + linear bucket scan per call (the pre-compiled path)
+  - compiled: ai_scoreboard_gatekeeper_v1.scoreboard_gate_decide
+
+Also checks both paths return the same decision for every probed key.
+
+Usage:
+    python -m app.tools.bench_scoreboard_gate [--buckets 10000] [--calls 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.ai import ai_scoreboard_gatekeeper_v1 as gk
+
+
+def _synthetic_scoreboard(n_buckets: int, seed: int = 7) -> Dict[str, Any]:
+    rnd = random.Random(seed)
+    setups = [f"setup_{i}" for i in range(20)]
+    tfs = ["1", "5", "15", "60", "240"]
+    n_syms = max(1, n_buckets // (len(setups) * len(tfs)) + 1)
+    syms = [f"SYM{i}USDT" for i in range(n_syms)]
+
+    buckets: List[Dict[str, Any]] = []
+    for st in setups:
+        for tf in tfs:
+            for sym in syms:
+                if len(buckets) >= n_buckets:
+                    break
+                buckets.append({
+                    "bucket_key": {"setup_type": st, "timeframe": tf, "symbol": sym},
+                    "n": rnd.randint(0, 200),
+                    "confidence": round(rnd.random(), 4),
+                    "expectancy": round(rnd.uniform(-0.3, 0.3), 4),
+                })
+    return {"schema_version": "scoreboard.v1", "min_n": 10, "buckets": buckets}
+
+
+def _legacy_decide(path: str, setup_type: str, timeframe: str, symbol: str) -> Optional[Dict[str, Any]]:
+    """
+    The pre-compiled decision path: parse the file, scan buckets, evaluate.
+    """
+    sb = gk._load_scoreboard(path)
+    if not sb or sb.get("schema_version") != "scoreboard.v1":
+        return None
+    key = gk._bucket_key(setup_type, timeframe, symbol)
+    match = None
+    for b in sb.get("buckets") or []:
+        bk = b.get("bucket_key") or {}
+        if gk._bucket_key(bk.get("setup_type"), bk.get("timeframe"), bk.get("symbol")) == key:
+            match = b
+            break
+    if not match:
+        return None
+    return gk._precompute_decision(match, gk._Thresholds(sb.get("min_n")), path)
+
+
+def _time_calls(fn, keys: List[Tuple[str, str, str]]) -> List[float]:
+    out: List[float] = []
+    for k in keys:
+        t0 = time.perf_counter()
+        fn(*k)
+        out.append((time.perf_counter() - t0) * 1_000_000.0)
+    return out
+
+
+def _summary(name: str, lat_us: List[float]) -> str:
+    lat = sorted(lat_us)
+    p50 = lat[len(lat) // 2]
+    p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+    return f"{name:<9} calls={len(lat)} mean={statistics.fmean(lat):10.2f}us p50={p50:10.2f}us p99={p99:10.2f}us"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--buckets", type=int, default=10_000)
+    ap.add_argument("--calls", type=int, default=2_000)
+    ap.add_argument("--legacy-calls", type=int, default=200, help="legacy path is slow; sample fewer calls")
+    args = ap.parse_args()
+
+    sb = _synthetic_scoreboard(args.buckets)
+    rnd = random.Random(11)
+    keys: List[Tuple[str, str, str]] = []
+    for _ in range(args.calls):
+        bk = rnd.choice(sb["buckets"])["bucket_key"]
+        keys.append((bk["setup_type"], bk["timeframe"], bk["symbol"]))
+
+    with tempfile.TemporaryDirectory() as td:
+        path = str(Path(td) / "scoreboard.v1.json")
+        Path(path).write_text(json.dumps(sb), encoding="utf-8")
+        os.environ["SCOREBOARD_PATH"] = path
+
+        # Correctness: same decision on every probed key.
+        mismatches = 0
+        for k in keys[: args.legacy_calls]:
+            a = _legacy_decide(path, *k)
+            b = gk.scoreboard_gate_decide(*k)
+            if b is not None:
+                b = {kk: vv for kk, vv in b.items() if kk != "bucket_match"}
+            if a != b:
+                mismatches += 1
+
+        legacy = _time_calls(lambda st, tf, sym: _legacy_decide(path, st, tf, sym), keys[: args.legacy_calls])
+
+        t0 = time.perf_counter()
+        gk.get_compiled_scoreboard(path, force=True)
+        compile_ms = (time.perf_counter() - t0) * 1000.0
+        compiled = _time_calls(gk.scoreboard_gate_decide, keys)
+
+    print(f"=== scoreboard_gate_decide benchmark (buckets={args.buckets}) ===")
+    print(_summary("legacy", legacy))
+    print(_summary("compiled", compiled))
+    print(f"compile_once={compile_ms:.2f}ms speedup_p50={sorted(legacy)[len(legacy)//2] / max(1e-9, sorted(compiled)[len(compiled)//2]):.0f}x")
+    print(f"decision_mismatches={mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark / demo: notifier_bot background dispatcher vs the old inline POST,
+against a local Telegram stand-in (no network).
+
+The stand-in (ThreadingHTTPServer on 127.0.0.1) answers
+POST /bot<token>/sendMessage after --latency-ms and enforces Telegram-like
+per-chat limits (1 msg/s, 20 msgs/min): over the limit it returns 429 with
+parameters.retry_after, like the real API.
+
+Scenarios:
+  legacy:     inline _http_post per message (what tg_send did), caller time
+  dispatcher: TelegramDispatcher.submit from a simulated trading loop:
+              bursts of order/latency notifications across --chats chats,
+              many exact repeats (coalescable); texts differing in
+              numbers are delivered separately
+  overflow:   stand-in stalled, tiny queue: submit must still not block and
+              overflow must be counted
+
+Usage:
+    python -m app.tools.bench_tg_notifier [--events 600] [--latency-ms 400]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Tuple
+from urllib.parse import parse_qs
+
+from app.core import notifier_bot
+
+
+class _StandIn:
+    def __init__(self, latency_ms: float) -> None:
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.sent: Dict[str, Deque[float]] = defaultdict(deque)
+        self.requests = 0
+        self.accepted = 0
+        self.rejected_429 = 0
+        self.lines = 0
+        self.stalled = threading.Event()
+        stand = self
+
+        class H(BaseHTTPRequestHandler):
+            def log_message(self, *a: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                n = int(self.headers.get("Content-Length") or 0)
+                form = parse_qs(self.rfile.read(n).decode("utf-8"))
+                chat = (form.get("chat_id") or [""])[0]
+                text = (form.get("text") or [""])[0]
+                while stand.stalled.is_set():
+                    time.sleep(0.01)
+                time.sleep(stand.latency)
+                code, body = stand.admit(chat, text)
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), H)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def admit(self, chat: str, text: str) -> Tuple[int, Dict[str, Any]]:
+        now = time.monotonic()
+        with self.lock:
+            self.requests += 1
+            q = self.sent[chat]
+            while q and now - q[0] > 60.0:
+                q.popleft()
+            if (q and now - q[-1] < 1.0) or len(q) >= 20:
+                self.rejected_429 += 1
+                wait = 1 if len(q) < 20 else int(60 - (now - q[0])) + 1
+                return 429, {"ok": False, "error_code": 429, "parameters": {"retry_after": wait}}
+            q.append(now)
+            self.accepted += 1
+            self.lines += text.count("\n") + 1
+        return 200, {"ok": True, "result": {}}
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+
+def _events(n: int, chats: int, seed: int = 7) -> List[Tuple[str, str]]:
+    rnd = random.Random(seed)
+    out: List[Tuple[str, str]] = []
+    syms = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
+    while len(out) < n:
+        chat = f"-100{rnd.randrange(chats)}"
+        sym = rnd.choice(syms)
+        kind = rnd.random()
+        if kind < 0.5:
+            # repeated alerts: identical text, coalescable
+            text = f"⚠️ WS reconnecting [LIVE/Sub{rnd.randrange(3)}] {sym} private stream stale (threshold=800 ms)"
+        elif kind < 0.8:
+            text = f"🚀 Entry placed [LIVE/Sub1] {sym} Buy qty={rnd.uniform(0.1, 5):.3f} client_trade_id=t{rnd.randrange(10**6)}"
+        else:
+            text = f"⛔ Scoreboard gate blocked: trade_id=t{rnd.randrange(10**6)} symbol={sym} reason=low_expectancy_{rnd.choice('abcdefgh')}"
+        out.append((chat, text))
+    return out
+
+
+def _pct(xs: List[float], q: float) -> float:
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(len(s) * q))] if s else 0.0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=600)
+    ap.add_argument("--chats", type=int, default=3)
+    ap.add_argument("--latency-ms", type=float, default=400.0)
+    ap.add_argument("--burst", type=int, default=20, help="events per trading-loop tick")
+    ap.add_argument("--tick-ms", type=float, default=50.0)
+    ap.add_argument("--legacy-n", type=int, default=15)
+    ap.add_argument("--flush-timeout", type=float, default=180.0)
+    args = ap.parse_args()
+
+    stand = _StandIn(args.latency_ms)
+    events = _events(args.events, args.chats)
+    print(f"=== tg notifier benchmark events={len(events)} chats={args.chats} "
+          f"stand-in latency={args.latency_ms}ms limits=1/s,20/min per chat ===")
+
+    # ---------- legacy inline POST ----------
+    block: List[float] = []
+    errs = 0
+    for chat, text in events[: args.legacy_n]:
+        t0 = time.perf_counter()
+        try:
+            notifier_bot._http_post(f"{stand.url}/botTEST/sendMessage",
+                                    {"chat_id": chat, "text": text}, timeout_sec=6)
+        except Exception:
+            errs += 1
+        block.append((time.perf_counter() - t0) * 1000.0)
+    print(f"legacy      caller block p50={_pct(block, 0.5):8.2f}ms max={max(block):8.2f}ms "
+          f"(n={len(block)}, http errors incl. 429={errs})")
+
+    time.sleep(2.0)
+    stand.sent.clear()
+    r0, a0, x0, l0 = stand.requests, stand.accepted, stand.rejected_429, stand.lines
+
+    # ---------- dispatcher ----------
+    d = notifier_bot.TelegramDispatcher(api_base=stand.url)
+    submit_us: List[float] = []
+    t_start = time.perf_counter()
+    for i in range(0, len(events), args.burst):
+        for chat, text in events[i : i + args.burst]:
+            t0 = time.perf_counter()
+            d.submit("TEST", chat, text)
+            submit_us.append((time.perf_counter() - t0) * 1_000_000.0)
+        time.sleep(args.tick_ms / 1000.0)
+    loop_s = time.perf_counter() - t_start
+    idle = d.flush(timeout=args.flush_timeout)
+    m = d.metrics()
+    accounted = m["messages_delivered"] + m["suppressed_recent"] + m["dropped_overflow"] + m["dropped_failed"]
+    print(f"dispatcher  caller submit p50={_pct(submit_us, 0.5):6.1f}us p99={_pct(submit_us, 0.99):6.1f}us "
+          f"max={max(submit_us):7.1f}us  trading loop {loop_s:.2f}s")
+    print(f"            http requests={stand.requests - r0} accepted={stand.accepted - a0} "
+          f"429s={stand.rejected_429 - x0} lines={stand.lines - l0} drained={idle}")
+    print(f"            submitted={m['submitted']} delivered={m['messages_delivered']} "
+          f"coalesced={m['coalesced_pending']} suppressed={m['suppressed_recent']} "
+          f"batches={m['batches_sent']} overflow={m['dropped_overflow']} failed={m['dropped_failed']} "
+          f"accounted={accounted == m['submitted']}")
+    print(f"            enqueue->delivered p50={m['latency_ms_p50']}ms p99={m['latency_ms_p99']}ms "
+          f"http p50={m['http_ms_p50']}ms max_depth={m['max_queue_depth']}")
+
+    # ---------- overflow ----------
+    stand.stalled.set()
+    d2 = notifier_bot.TelegramDispatcher(api_base=stand.url, queue_max=50, batch_window_ms=0)
+    over_us: List[float] = []
+    for i in range(2000):
+        t0 = time.perf_counter()
+        d2.submit("TEST", "-100999", f"overflow event unique-{chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}{i // 676}x")
+        over_us.append((time.perf_counter() - t0) * 1_000_000.0)
+    m2 = d2.metrics()
+    print(f"overflow    submitted={m2['submitted']} dropped_overflow={m2['dropped_overflow']} "
+          f"submit p50={_pct(over_us, 0.5):.1f}us p99={_pct(over_us, 0.99):.1f}us (stand-in stalled)")
+    stand.stalled.clear()
+    stand.close()
+
+
+if __name__ == "__main__":
+    main()
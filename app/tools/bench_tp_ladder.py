@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: TP ladder sync, per-rung calls vs diff + batch endpoints.
+
+Runs both sync paths against an in-process exchange stand-in (order book of
+reduce-only limits, orderLinkId uniqueness incl. filled/cancelled ids,
+per-item batch results, fixed --rtt-ms per HTTP call), over --positions
+positions with --rungs rungs each:
+
+  initial:   no TPs yet -> full ladder
+  steady:    nothing changed (the common case every poll)
+  tp1 fill:  rung 1 filled, remaining size re-split over the same rungs
+  dca move:  entry moved -> every rung re-priced, rung 2 partially filled
+
+legacy = the old _sync_tp_ladder flow (place_reduce_tp / amend / cancel one
+call each, every matched rung amended each cycle).
+
+Usage:
+    python -m app.tools.bench_tp_ladder [--positions 8] [--rungs 5] [--rtt-ms 30]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# never write the live state/ metrics file from a benchmark
+os.environ["TP_LADDER_METRICS_EXPORT_SEC"] = "0"
+
+from app.core import flashback_common as fc  # noqa: E402
+from app.core import tp_ladder  # noqa: E402
+
+TICK = Decimal("0.1")
+STEP = Decimal("0.001")
+
+
+class StandInExchange:
+    """Just enough of Bybit v5 /order/* for reduce-only TP ladders."""
+
+    def __init__(self, rtt_ms: float) -> None:
+        self.rtt = rtt_ms / 1000.0
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.used_links: set = set()
+        self.calls = 0
+        self._seq = 0
+
+    # ---- transport ----
+    def get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls += 1
+        time.sleep(self.rtt)
+        assert path == "/v5/order/realtime"
+        rows = [dict(o) for o in self.orders.values()
+                if o["symbol"] == params.get("symbol") and o["orderStatus"] in ("New", "PartiallyFilled")]
+        return {"retCode": 0, "result": {"list": rows}}
+
+    def post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls += 1
+        time.sleep(self.rtt)
+        action = path.rsplit("/", 1)[-1]
+        if action.endswith("-batch"):
+            rows, infos = [], []
+            for req in body["request"]:
+                code, msg, row = getattr(self, "_" + action[:-6])(req)
+                rows.append(row)
+                infos.append({"code": code, "msg": msg})
+            return {"retCode": 0, "result": {"list": rows}, "retExtInfo": {"list": infos}}
+        code, msg, row = getattr(self, "_" + action)(body)
+        if code != 0:
+            raise RuntimeError(f"Bybit retCode {code}: {msg}")
+        return {"retCode": 0, "result": row}
+
+    # ---- order ops ----
+    def _find(self, req: Dict[str, Any]):
+        if req.get("orderId"):
+            return self.orders.get(req["orderId"])
+        for o in self.orders.values():
+            if o["orderLinkId"] and o["orderLinkId"] == req.get("orderLinkId"):
+                return o
+        return None
+
+    def _create(self, req: Dict[str, Any]):
+        lid = req.get("orderLinkId") or ""
+        if lid and lid in self.used_links:
+            return 110072, "OrderLinkedID is duplicate", {}
+        self._seq += 1
+        oid = f"o{self._seq}"
+        if lid:
+            self.used_links.add(lid)
+        self.orders[oid] = {
+            "orderId": oid, "orderLinkId": lid, "symbol": req["symbol"], "side": req["side"],
+            "orderType": "Limit", "price": req["price"], "qty": req["qty"], "cumExecQty": "0",
+            "leavesQty": req["qty"], "reduceOnly": True, "orderStatus": "New",
+        }
+        return 0, "OK", {"orderId": oid, "orderLinkId": lid}
+
+    def _amend(self, req: Dict[str, Any]):
+        o = self._find(req)
+        if o is None or o["orderStatus"] not in ("New", "PartiallyFilled"):
+            return 110001, "order not exists or too late to amend", {}
+        if "price" in req:
+            o["price"] = req["price"]
+        if "qty" in req:
+            q = Decimal(req["qty"])
+            cum = Decimal(o["cumExecQty"])
+            if q <= cum:
+                return 110003, "qty below executed", {}
+            o["qty"] = str(q)
+            o["leavesQty"] = str(q - cum)
+        return 0, "OK", {"orderId": o["orderId"], "orderLinkId": o["orderLinkId"]}
+
+    def _cancel(self, req: Dict[str, Any]):
+        o = self._find(req)
+        if o is None or o["orderStatus"] not in ("New", "PartiallyFilled"):
+            return 110001, "order not exists", {}
+        o["orderStatus"] = "Cancelled"
+        return 0, "OK", {"orderId": o["orderId"], "orderLinkId": o["orderLinkId"]}
+
+    # ---- market events ----
+    def fill(self, order: Dict[str, Any], qty: Decimal) -> None:
+        o = self.orders[order["orderId"]]
+        cum = Decimal(o["cumExecQty"]) + qty
+        o["cumExecQty"] = str(cum)
+        o["leavesQty"] = str(Decimal(o["qty"]) - cum)
+        o["orderStatus"] = "Filled" if Decimal(o["leavesQty"]) <= 0 else "PartiallyFilled"
+
+    def live(self, symbol: str) -> List[Dict[str, Any]]:
+        rows = [o for o in self.orders.values()
+                if o["symbol"] == symbol and o["orderStatus"] in ("New", "PartiallyFilled")]
+        return sorted(rows, key=lambda o: Decimal(o["price"]))
+
+
+def _ladder(entry: Decimal, size: Decimal, rungs: int) -> List[Tuple[Decimal, Decimal]]:
+    each = (size / rungs).quantize(STEP)
+    qtys = [each] * (rungs - 1) + [size - each * (rungs - 1)]
+    return [((entry * (1 + Decimal(i) / 200)).quantize(TICK), q) for i, q in zip(range(1, rungs + 1), qtys)]
+
+
+def _tp_live(ex: StandInExchange, symbol: str) -> List[Dict[str, Any]]:
+    return fc.bybit_get("/v5/order/realtime", {"category": "linear", "symbol": symbol})["result"]["list"]
+
+
+def legacy_sync(ex: StandInExchange, symbol: str, trade_id: str, ladder) -> None:
+    tpo = sorted(_tp_live(ex, symbol), key=lambda o: Decimal(o["price"]))
+    if not tpo:
+        for idx, (px, q) in enumerate(ladder, start=1):
+            try:
+                fc.place_reduce_tp(symbol, "Buy", q, px, link_id=f"{trade_id}:TP{idx}")
+            except Exception:
+                pass
+        return
+    n_common = min(len(tpo), len(ladder))
+    for i in range(n_common):
+        try:
+            fc.bybit_post("/v5/order/amend", {"category": "linear", "symbol": symbol, "orderId": tpo[i]["orderId"],
+                                              "price": str(ladder[i][0]), "qty": str(ladder[i][1])})
+        except Exception:
+            pass
+    for o in tpo[len(ladder):]:
+        try:
+            fc.bybit_post("/v5/order/cancel", {"category": "linear", "symbol": symbol, "orderId": o["orderId"]})
+        except Exception:
+            pass
+    for idx in range(len(tpo) + 1, len(ladder) + 1):
+        px, q = ladder[idx - 1]
+        try:
+            fc.place_reduce_tp(symbol, "Buy", q, px, link_id=f"{trade_id}:TP{idx}")
+        except Exception:
+            pass
+
+
+def diff_sync(ex: StandInExchange, symbol: str, trade_id: str, ladder) -> tp_ladder.LadderResult:
+    started = time.perf_counter()
+    live = _tp_live(ex, symbol)
+    return tp_ladder.sync_ladder(symbol, "Buy", live, ladder, trade_id, TICK, started=started, fetch_requests=1)
+
+
+def _matches(ex: StandInExchange, symbol: str, ladder) -> bool:
+    got = [(Decimal(o["price"]), Decimal(o["leavesQty"])) for o in ex.live(symbol)]
+    return got == sorted(ladder)
+
+
+def run(mode: str, args) -> Dict[str, Any]:
+    ex = StandInExchange(args.rtt_ms)
+    fc.bybit_get = lambda path, params=None, **kw: ex.get(path, params or {})
+    fc.bybit_post = lambda path, body=None, **kw: ex.post(path, body or {})
+    tp_ladder._LINK_GEN.clear()
+    sync = legacy_sync if mode == "legacy" else diff_sync
+    syms = [f"SYM{i}USDT" for i in range(args.positions)]
+    entry = {s: Decimal(100 + 10 * i) for i, s in enumerate(syms)}
+    size = {s: Decimal("1.000") for s in syms}
+    out: Dict[str, Any] = {}
+
+    def phase(name: str, cycles: int = 1) -> None:
+        ex.calls = 0
+        t = time.perf_counter()
+        for _ in range(cycles):
+            for s in syms:
+                sync(ex, s, f"T{s}", _ladder(entry[s], size[s], args.rungs))
+        el = (time.perf_counter() - t) * 1000.0
+        ok = all(_matches(ex, s, _ladder(entry[s], size[s], args.rungs)) for s in syms)
+        out[name] = (ex.calls / (cycles * len(syms)), el / cycles, ok)
+
+    phase("initial")
+    phase("steady", cycles=args.steady)
+
+    for s in syms:
+        ex.fill(ex.live(s)[0], Decimal(ex.live(s)[0]["leavesQty"]))
+        size[s] = Decimal("0.800")
+    phase("tp1 fill")
+
+    for s in syms:
+        ex.fill(ex.live(s)[1], Decimal("0.050"))
+        size[s] -= Decimal("0.050")
+        entry[s] += Decimal("0.7")
+    phase("dca move")
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--positions", type=int, default=8)
+    ap.add_argument("--rungs", type=int, default=5)
+    ap.add_argument("--rtt-ms", type=float, default=30.0)
+    ap.add_argument("--steady", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"=== tp_ladder benchmark positions={args.positions} rungs={args.rungs} rtt={args.rtt_ms}ms "
+          f"batch_max={fc.BATCH_ORDER_MAX} ===")
+    with tempfile.TemporaryDirectory() as td:
+        tp_ladder.METRICS_PATH = Path(td) / "tp_ladder_metrics.json"
+        tp_ladder.LINK_GEN_PATH = Path(td) / "tp_ladder_link_gen.json"
+        tp_ladder._METRICS_EXPORT_SEC = 0.0
+        res = {m: run(m, args) for m in ("legacy", "diff")}
+    print(f"{'phase':10s} {'legacy req/sync':>16s} {'diff req/sync':>14s} {'legacy ms/cycle':>16s} "
+          f"{'diff ms/cycle':>14s}  correct(legacy/diff)")
+    for ph in res["legacy"]:
+        lr, lm, lok = res["legacy"][ph]
+        dr, dm, dok = res["diff"][ph]
+        print(f"{ph:10s} {lr:16.1f} {dr:14.1f} {lm:16.1f} {dm:14.1f}  {lok}/{dok}")
+    m = tp_ladder.get_ladder_metrics()
+    print("diff metrics " + " ".join(f"{k}={m.get(k)}" for k in (
+        "syncs", "noop_syncs", "requests_per_sync", "time_to_ladder_ms_p50", "time_to_ladder_ms_p99",
+        "kept", "amended", "cancelled", "created", "item_errors")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: per-signal wallet-balance REST vs WS-fed wallet bus.
+
+REST is simulated with a fixed round-trip (--rtt-ms) so the numbers are
+reproducible offline.
+
+  legacy:        one wallet-balance call per get_equity + one per get_mmr
+  bus(fresh):    snapshot written by the WS writer, readers stat() + cache
+  bus(stale):    snapshot past max age, N threads read at once -> 1 REST call
+  ws push:       apply_ws_wallet latency (switchboard side)
+
+Usage:
+    python -m app.tools.bench_wallet_bus [--signals 20000] [--rtt-ms 40]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from app.core import wallet_bus as wb
+
+_ROW = {
+    "accountType": "UNIFIED",
+    "accountIMRate": "0.0210",
+    "accountMMRate": "0.0045",
+    "totalEquity": "10234.55",
+    "totalAvailableBalance": "8000.10",
+    "coin": [
+        {"coin": "USDT", "equity": "10200.12", "walletBalance": "10150.00", "unrealisedPnl": "50.12"},
+        {"coin": "BTC", "equity": "0.0005", "walletBalance": "0.0005"},
+    ],
+}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--signals", type=int, default=20000)
+    ap.add_argument("--rtt-ms", type=float, default=40.0)
+    ap.add_argument("--legacy-n", type=int, default=50)
+    ap.add_argument("--threads", type=int, default=32)
+    args = ap.parse_args()
+
+    rest_calls = [0]
+
+    def fake_rest(label: str):
+        rest_calls[0] += 1
+        time.sleep(args.rtt_ms / 1000.0)
+        return [dict(_ROW)]
+
+    with tempfile.TemporaryDirectory() as td:
+        wb.STATE_DIR = Path(td)
+        wb.METRICS_PATH = Path(td) / "wallet_bus_metrics.json"
+        wb._rest_fetch_wallet = fake_rest
+        label = "main"
+        print(f"=== wallet_bus benchmark signals={args.signals} rest_rtt={args.rtt_ms}ms ===")
+
+        # legacy: every signal pays equity + mmr round trips
+        t = time.perf_counter()
+        for _ in range(args.legacy_n):
+            fake_rest(label)
+            fake_rest(label)
+        legacy_ms = (time.perf_counter() - t) * 1000.0 / args.legacy_n
+        print(f"legacy  per signal        {legacy_ms:10.3f}ms  (2 REST calls)")
+
+        # ws push -> bus
+        n_push = 2000
+        wb.apply_ws_wallet([_ROW], label)
+        t = time.perf_counter()
+        for i in range(n_push):
+            row = dict(_ROW, coin=[{"coin": "USDT", "equity": f"{10200 + i * 0.01:.2f}"}])
+            wb.apply_ws_wallet([row], label)
+        push_us = (time.perf_counter() - t) * 1e6 / n_push
+        snap = wb.get_wallet_snapshot(label)
+        print(f"ws push apply             {push_us:10.1f}us  merged_coins={sorted(snap['coins'])} "
+              f"equity={snap['equity_usdt']} mmr_pct={snap['mmr_pct']}")
+
+        # fresh reads (equity + mmr per signal)
+        rest_calls[0] = 0
+        t = time.perf_counter()
+        for _ in range(args.signals):
+            wb.get_equity_usdt(label)
+            wb.get_mmr_pct(label)
+        bus_ms = (time.perf_counter() - t) * 1000.0 / args.signals
+        print(f"bus(fresh) per signal     {bus_ms:10.4f}ms  rest_calls={rest_calls[0]} "
+              f"speedup {legacy_ms / bus_ms:.0f}x")
+
+        # stale: age the snapshot past the bound, thundering herd of readers
+        path = wb.bus_path_for_label(label)
+        raw = wb._read_file(path)
+        raw["updated_ms"] = raw["confirmed_ms"] = wb._now_ms() - 120_000
+        wb._atomic_write(path, raw)
+        wb.reset_cache()
+        rest_calls[0] = 0
+        barrier = threading.Barrier(args.threads)
+        out = []
+
+        def reader() -> None:
+            barrier.wait()
+            out.append(wb.get_equity_usdt(label))
+
+        ths = [threading.Thread(target=reader) for _ in range(args.threads)]
+        t = time.perf_counter()
+        for th in ths:
+            th.start()
+        for th in ths:
+            th.join()
+        herd_ms = (time.perf_counter() - t) * 1000.0
+        print(f"bus(stale) {args.threads} readers    {herd_ms:10.1f}ms  rest_calls={rest_calls[0]} "
+              f"all_equal={len(set(out)) == 1}")
+
+        # confirm_ws_fresh keeps a change-free snapshot alive; old ones are not confirmed
+        ok_old = wb.confirm_ws_fresh(label, since_ms=wb._now_ms() + 1)
+        wb.apply_ws_wallet([_ROW], label)
+        ok_new = wb.confirm_ws_fresh(label, since_ms=wb._now_ms() - 1000)
+        print(f"confirm   predates_ws={ok_old} (expect False)  after_ws={ok_new} (expect True)")
+
+        # REST failure: last-known served within hard bound, then None
+        def broken(label: str):
+            raise RuntimeError("down")
+
+        wb._rest_fetch_wallet = broken
+        raw = wb._read_file(path)
+        raw["updated_ms"] = raw["confirmed_ms"] = wb._now_ms() - 60_000
+        wb._atomic_write(path, raw)
+        wb.reset_cache()
+        soft = wb.get_equity_usdt(label)
+        hard = wb.get_equity_usdt(label, max_age_sec=1) if wb.WALLET_BUS_HARD_MAX_AGE_SEC > 60 else None
+        wb.WALLET_BUS_HARD_MAX_AGE_SEC = 10
+        gone = wb.get_equity_usdt(label)
+        print(f"rest down  stale_served={soft is not None and hard is not None} past_hard_bound={gone}")
+
+        wb.export_metrics()
+        m = wb.get_wallet_bus_metrics()
+        print("metrics   " + " ".join(f"{k}={m[k]}" for k in (
+            "reads", "rest_fallback_rate", "rest_requests", "rest_shared", "stale_served",
+            "cache_age_ms_p50", "read_latency_us_p50", "read_latency_us_p99")))
+        print(f"exported  {os.path.exists(wb.METRICS_PATH)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,11 @@ import subprocess
 from pathlib import Path
 from typing import Dict, Any, Tuple
 
+try:
+    from app.ops.proc_supervisor import list_processes
+except Exception:
+    list_processes = None  # type: ignore
+
 
 def _now_ms() -> float:
     return time.time() * 1000.0
@@ -32,8 +37,16 @@ def _now_ms() -> float:
 def _proc_dump() -> str:
     """
     Best-effort python process listing with command lines.
-    Uses PowerShell CIM query. If it fails, returns the exception text.
+    Reads /proc (or psutil) in-process; falls back to a PowerShell CIM query
+    where neither is available. If it fails, returns the exception text.
     """
+    try:
+        procs = list_processes("python") if list_processes is not None else None
+        if procs is not None:
+            lines = [f"ProcessId   : {p['pid']}\nCommandLine : {p['cmdline']}" for p in procs if p["pid"] != os.getpid()]
+            return "\n\n".join(lines) if lines else "<no python processes found>"
+    except Exception:
+        pass
     try:
         cmd = [
             "powershell",
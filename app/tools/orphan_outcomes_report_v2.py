@@ -4,7 +4,22 @@ import json
 import os
 from typing import Any, Dict, List
 
+try:
+    from app.core.event_archive import read_records, stream_for_path
+except Exception:  # polars not installed: plain JSONL only
+    read_records = stream_for_path = None  # type: ignore
+
 def _iter_jsonl(path: Path):
+    # archived logs: Parquet archive + live tail, rotated segments included
+    name = stream_for_path(path) if stream_for_path else None
+    if name:
+        try:
+            rows = read_records(name)
+        except Exception:
+            rows = None
+        if rows is not None:
+            yield from (o for o in rows if isinstance(o, dict))
+            return
     if not path.exists():
         return
     with path.open("r", encoding="utf-8", errors="ignore") as f:
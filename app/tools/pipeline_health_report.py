@@ -2,10 +2,22 @@
 from pathlib import Path
 from collections import defaultdict
 
+try:
+    from app.core.event_archive import read_records, stream_for_path
+except Exception:  # polars not installed: plain JSONL only
+    read_records = stream_for_path = None
+
 SETUPS = Path("state/ai_events/setups.jsonl")
 OUTS   = Path("state/ai_events/outcomes.v1.jsonl")
 
 def read_jsonl(p: Path):
+    # archived logs: Parquet archive + live tail, rotated segments included
+    name = stream_for_path(p) if stream_for_path else None
+    if name:
+        try:
+            return [o for o in read_records(name) if isinstance(o, dict)]
+        except Exception:
+            pass
     if not p.exists():
         return []
     out=[]
@@ -7,6 +7,11 @@ from collections import Counter
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+try:
+    from app.core.event_archive import read_records, stream_for_path
+except Exception:  # polars not installed: plain JSONL only
+    read_records = stream_for_path = None  # type: ignore
+
 ROOT = Path(__file__).resolve().parents[2]
 
 OUTCOMES = ROOT / "state" / "ai_events" / "outcomes.v1.jsonl"
@@ -22,6 +27,16 @@ BAD_TRADE_PREFIXES = ("PIPE_", "TEST_", "THIS_IS_NOT_REAL")
 
 
 def _load_jsonl(path: Path):
+    # archived logs: Parquet archive + live tail, rotated segments included
+    name = stream_for_path(path) if stream_for_path else None
+    if name:
+        try:
+            rows = read_records(name)
+        except Exception:
+            rows = None
+        if rows is not None:
+            yield from (o for o in rows if isinstance(o, dict))
+            return
     if not path.exists():
         return
     for line in path.read_text(encoding="utf-8", errors="ignore").splitlines():
@@ -1,6 +1,8 @@
 ﻿from time import time
 from app.state.store import upsert_subaccount, get_subaccount
 
+TRADE_WINDOW = 50
+
 def record_trade(label, pnl, confidence, intent):
     sa = get_subaccount(label)
 
@@ -11,15 +13,26 @@ def record_trade(label, pnl, confidence, intent):
         "confidence": confidence
     }
 
-    trades = sa.get("trades", [])[-49:]
-    trades.append(trade)
+    trades = sa.get("trades", [])[-TRADE_WINDOW:]
+    wins = sa.get("win_count")
+    if wins is None:
+        # records written before win_count existed: count once
+        wins = sum(1 for t in trades if t["pnl"] > 0)
 
-    wins = [t for t in trades if t["pnl"] > 0]
+    # rolling window: adjust the win count by what leaves and what enters
+    if len(trades) == TRADE_WINDOW:
+        if trades[0]["pnl"] > 0:
+            wins -= 1
+        trades = trades[1:]
+    trades.append(trade)
+    if pnl > 0:
+        wins += 1
 
     upsert_subaccount(label, {
         "trades": trades,
         "trade_count": len(trades),
-        "win_rate": round(len(wins)/len(trades),2) if trades else 0.0,
+        "win_count": wins,
+        "win_rate": round(wins/len(trades),2) if trades else 0.0,
         "confidence": confidence,
         "ai_intent": intent,
         "last_trade_ts": trade["ts"],
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import orjson
+
+from app.core import ai_action_index as aix
+
+
+def _append(bus, start: int, n: int) -> None:
+    with bus.open("ab") as f:
+        for i in range(start, start + n):
+            f.write(orjson.dumps({"ts_ms": 1_760_000_000_000 + i, "label": "main", "action": {"i": i}}) + b"\n")
+
+
+def _seal(bus) -> None:
+    with aix.writer_lock(bus):
+        assert aix.rotate_if_needed(bus, max_bytes=1) is not None
+
+
+def _ids(rows) -> list:
+    return [r["action"]["i"] for r in rows]
+
+
+def test_cursor_does_not_replay_sealed_segments(tmp_path):
+    aix._INDEXES.clear()
+    bus = tmp_path / "ai_actions.jsonl"
+    cdir = tmp_path / "cursors"
+    _append(bus, 0, 10)
+    cur = aix.ActionCursor("router", bus, start="begin", cursor_dir=cdir)
+    assert _ids(cur.poll()) == list(range(10))
+    cur.commit()
+
+    _append(bus, 10, 5)
+    _seal(bus)
+    assert not bus.exists()
+    assert _ids(cur.poll()) == list(range(10, 15))
+    cur.commit()
+
+    # restart while the active file still does not exist
+    cur = aix.ActionCursor("router", bus, cursor_dir=cdir)
+    assert cur.poll() == []
+    cur.commit()
+    cur = aix.ActionCursor("router", bus, cursor_dir=cdir)
+    assert cur.poll() == []
+
+    _append(bus, 15, 3)
+    assert _ids(cur.poll()) == [15, 16, 17]
+
+    # a new cursor created between a seal and the next append starts at the end
+    _seal(bus)
+    fresh = aix.ActionCursor("late", bus, cursor_dir=cdir)
+    assert fresh.poll() == []
+    _append(bus, 18, 2)
+    assert _ids(fresh.poll()) == [18, 19]
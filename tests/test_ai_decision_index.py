@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import os
+
+import orjson
+
+from app.ai.ai_decision_index import DecisionIndex
+
+
+def _classify(row):
+    return 0, int(row.get("ts_ms") or 0)
+
+
+def _write(path, tids, mode: str = "ab") -> None:
+    with path.open(mode) as f:
+        for i, tid in enumerate(tids):
+            f.write(orjson.dumps({"trade_id": tid, "ts_ms": 1_760_000_000_000 + i}) + b"\n")
+
+
+def _rows(idx: DecisionIndex, tid: str) -> list:
+    return [r for r in (idx.read_row(p) for p in idx.lookup(tid)) if r is not None]
+
+
+def test_reused_inode_is_indexed_as_a_new_segment(tmp_path):
+    log = tmp_path / "ai_decisions.jsonl"
+    rot = tmp_path / "ai_decisions.jsonl.1"
+    _write(log, ["old-1", "old-2"])
+    idx = DecisionIndex(log, classify=_classify)
+    assert idx.catch_up()
+    inode_a = log.stat().st_ino
+
+    os.replace(log, rot)
+    _write(log, ["mid-1"])
+    assert idx.catch_up()
+
+    # keep=1 rotation where the filesystem hands the unlinked log.1 inode to the
+    # new log: same inode as a known segment, different content
+    spare = tmp_path / "spare"
+    os.replace(rot, spare)
+    os.replace(log, rot)
+    _write(spare, ["new-1", "new-2"], mode="r+b")
+    os.replace(spare, log)
+    assert log.stat().st_ino == inode_a
+
+    assert idx.catch_up()
+    assert [r["trade_id"] for r in _rows(idx, "new-2")] == ["new-2"]
+    assert [r["trade_id"] for r in _rows(idx, "mid-1")] == ["mid-1"]
+    # the rotated-out rows are gone, never served from the file that took their inode
+    assert _rows(idx, "old-2") == []
+
+    _write(log, ["new-3"])
+    assert idx.catch_up()
+    assert [r["trade_id"] for r in _rows(idx, "new-3")] == ["new-3"]
+    idx.close()
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import json
+import os
+
+from app.ai import ai_decision_scorer as scorer
+
+
+def _row(win: bool, r: float, strategy: str = "breakout") -> dict:
+    return {"strategy": strategy, "symbol": "BTCUSDT", "account_label": "main",
+            "setup_type": "squeeze", "outcome": {"win": win, "r_multiple": r}}
+
+
+def _fresh(memdir) -> "scorer._MemoryIndex":
+    idx = scorer._MemoryIndex(str(memdir), scorer.LEVELS)
+    idx.refresh(force=True)
+    return idx
+
+
+def _same(a: dict, b: dict) -> bool:
+    return a.keys() == b.keys() and all(
+        all(abs(x - y) < 1e-9 for x, y in zip(a[k], b[k])) for k in a
+    )
+
+
+def test_refresh_tracks_removed_truncated_and_rewritten_files(tmp_path):
+    (tmp_path / "a.json").write_text(json.dumps(_row(True, 1.5)) + "\n")
+    (tmp_path / "b.json").write_text(json.dumps(_row(False, -1.0, "scalp")) + "\n")
+    log = tmp_path / "entries.jsonl"
+    log.write_text("".join(json.dumps(_row(i % 2 == 0, 0.5 * i)) + "\n" for i in range(6)))
+
+    idx = _fresh(tmp_path)
+    assert idx.records == 8
+
+    os.remove(tmp_path / "b.json")
+    log.write_text(json.dumps(_row(False, -2.0)) + "\n")  # truncated + rewritten
+    (tmp_path / "a.json").write_text(json.dumps(_row(False, -0.5)) + "\n")  # rewritten in place
+    with open(log, "a") as f:
+        f.write(json.dumps(_row(True, 3.0)) + "\n")
+
+    idx.refresh(force=True)
+    assert set(idx.files) == {"a.json", "entries.jsonl"}
+    assert idx.records == 3
+    want = _fresh(tmp_path)
+    assert _same(idx.buckets, want.buckets)
+    assert not any(k[1] == ("scalp",) for k in idx.buckets)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import orjson
+import pytest
+
+from app.ai import ai_executor_gate as gate
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(gate, "COUNTERS_PATH", tmp_path / "ai_policy_counters_test.json")
+    monkeypatch.setattr(gate, "POLICY_LOG_PATH", tmp_path / "ai_policy_log.jsonl")
+    monkeypatch.setattr(gate, "ACCOUNT_LABEL", "test")
+    monkeypatch.setattr(gate, "AI_POLICY_LOG_DISABLE", False)
+    monkeypatch.setattr(gate, "_COUNTERS", None)
+    monkeypatch.setattr(gate, "_COUNTERS_LAST_FLUSH", 0.0)
+    return tmp_path
+
+
+def _decision(allow: bool, score=None, reason: str = "ok", strat: str = "StratA", ts_ms: int = 1000) -> dict:
+    return {"allow": allow, "reason": reason, "strategy_name": strat, "mode": "paper",
+            "account_label": "main", "score": score, "ts_ms": ts_ms}
+
+
+def _log_rows(paths) -> list:
+    p = paths / "ai_policy_log.jsonl"
+    return [orjson.loads(ln) for ln in p.read_bytes().splitlines()] if p.exists() else []
+
+
+def test_counters_aggregate_and_merge():
+    c = gate.DecisionCounters()
+    c.observe(_decision(True, 0.7, ts_ms=2000))
+    c.observe(_decision(False, 0.1, reason="score_below_min", ts_ms=1000))
+    c.observe(_decision(False, None, reason="missing_score_blocked", strat="StratB", ts_ms=3000))
+    d = c.to_dict()
+
+    assert (d["total"], d["allowed"], d["blocked"]) == (3, 1, 2)
+    assert d["by_reason"] == {"ok": 1, "score_below_min": 1, "missing_score_blocked": 1}
+    assert d["by_mode"]["PAPER"] == {"decisions": 3, "allowed": 1, "blocked": 2}
+    assert d["score_histogram"]["0.6-0.8"] == 1 and d["score_histogram"]["None"] == 1
+    sa = d["by_strategy"]["StratA"]
+    assert (sa["decisions"], sa["score_cnt"]) == (2, 2) and sa["score_sum"] == pytest.approx(0.8)
+    assert "score_sum" not in d["by_strategy"]["StratB"]
+    assert (d["since_ms"], d["updated_ms"]) == (2000, 3000)
+
+    # seeding from a previous file adds onto it rather than replacing it
+    again = gate.DecisionCounters(d)
+    again.observe(_decision(True, 0.9, ts_ms=4000))
+    d2 = again.to_dict()
+    assert (d2["total"], d2["allowed"]) == (4, 2)
+    assert d2["by_strategy"]["StratA"]["decisions"] == 3
+    assert (d2["since_ms"], d2["updated_ms"]) == (2000, 4000)
+
+    merged = gate.merge_counters(gate.DecisionCounters.empty(), d)
+    gate.merge_counters(merged, {"total": 2, "by_reason": {"ok": 2}, "by_mode": "junk"})
+    assert merged["total"] == 5 and merged["by_reason"]["ok"] == 3
+
+
+def test_flush_writes_only_when_dirty_and_survives_restart(paths, monkeypatch):
+    monkeypatch.setattr(gate, "AI_POLICY_COUNTERS_FLUSH_SEC", 3600.0)
+    assert gate.flush_decision_counters() is False  # nothing observed yet
+
+    gate._record_decision(_decision(True, 0.5))  # first decision flushes (last flush at 0)
+    gate._record_decision(_decision(False, 0.1, reason="score_below_min"))  # inside the interval
+    on_disk = orjson.loads(gate.COUNTERS_PATH.read_bytes())
+    assert on_disk["total"] == 1 and on_disk["account_label"] == "test"
+
+    assert gate.flush_decision_counters() is True
+    assert gate.flush_decision_counters() is False
+    assert orjson.loads(gate.COUNTERS_PATH.read_bytes())["total"] == 2
+    assert not gate.COUNTERS_PATH.with_suffix(".json.tmp").exists()
+
+    # a new process seeds from the file
+    monkeypatch.setattr(gate, "_COUNTERS", None)
+    gate._record_decision(_decision(True, 0.9))
+    assert gate.flush_decision_counters(force=True) is True
+    assert orjson.loads(gate.COUNTERS_PATH.read_bytes())["total"] == 3
+
+
+def test_policy_log_samples_allows_but_keeps_every_block(paths, monkeypatch):
+    monkeypatch.setattr(gate, "AI_POLICY_LOG_SAMPLE_RATE", 0.25)
+    draws = iter([0.1, 0.9])
+    monkeypatch.setattr(gate.random, "random", lambda: next(draws))
+
+    gate._append_policy_log(_decision(True, 0.7))   # 0.1 < 0.25: kept
+    gate._append_policy_log(_decision(True, 0.7))   # 0.9: dropped
+    gate._append_policy_log(_decision(False, 0.1, reason="score_below_min"))  # no draw
+
+    rows = _log_rows(paths)
+    assert [r["allow"] for r in rows] == [True, False]
+    assert rows[0]["log_sample_rate"] == 0.25
+    assert "log_sample_rate" not in rows[1]
+
+
+def test_full_sample_rate_logs_every_allow_unmarked(paths, monkeypatch):
+    monkeypatch.setattr(gate, "AI_POLICY_LOG_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(gate.random, "random", lambda: pytest.fail("no draw at rate 1.0"))
+    for _ in range(3):
+        gate._append_policy_log(_decision(True, 0.7))
+    rows = _log_rows(paths)
+    assert len(rows) == 3 and all("log_sample_rate" not in r for r in rows)
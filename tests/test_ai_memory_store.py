@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import time
+
+import orjson
+import pytest
+
+from app.ai import ai_memory_store
+from app.ai.ai_memory_store import MemoryRollupStore, QueryOptions, query_memories_tiered
+
+FP = "f" * 64
+PH = "p" * 40
+
+
+def _setup(tid: str, sym: str, allow: bool = True, size_mult: float = 0.5) -> dict:
+    return {"event_type": "setup_context", "trade_id": tid, "symbol": sym, "timeframe": "5",
+            "setup_type": "breakout", "policy": {"policy_hash": PH}, "ts_ms": int(time.time() * 1000),
+            "payload": {"features": {"memory_fingerprint": FP}}, "allow": allow, "size_multiplier": size_mult}
+
+
+def _outcome(tid: str, pnl: float, r=None) -> dict:
+    ev = {"event_type": "trade_outcome", "trade_id": tid, "pnl_usd": pnl, "ts_ms": int(time.time() * 1000)}
+    if r is not None:
+        ev["r_multiple"] = r
+    return ev
+
+
+def _append(path, events) -> None:
+    with path.open("ab") as f:
+        for ev in events:
+            f.write(orjson.dumps(ev) + b"\n")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    st = MemoryRollupStore(tmp_path / "rollups.sqlite", tmp_path / "setups.jsonl", tmp_path / "outcomes.jsonl")
+    monkeypatch.setattr(ai_memory_store, "_STORE", st)
+    return st
+
+
+def test_rollup_stats_use_only_rows_with_r(store):
+    _append(store.paths["setups"], [_setup(f"t{i}", "BTCUSDT", size_mult=0.4 + 0.2 * (i % 2)) for i in range(4)])
+    # outcome before its setup is parked and applied once the setup shows up
+    _append(store.paths["outcomes"], [_outcome("t0", 10.0, 2.0), _outcome("t1", -5.0, -0.5),
+                                      _outcome("t2", 3.0), _outcome("late", -1.0, -1.0)])
+    store.refresh(force=True)
+    _append(store.paths["setups"], [_setup("late", "BTCUSDT", allow=False)])
+    store.refresh(force=True)
+
+    [mem] = store.query(memory_fingerprint=FP, symbol="BTCUSDT", timeframe="5m", setup_type="breakout",
+                        policy_hash=PH, min_n=1, max_age_days=30, k=5)
+    s = mem["stats"]
+    assert (s["n"], s["wins"], s["losses"]) == (4, 2, 2)
+    # 2 - 0.5 - 1 over the 3 rows that carry R (t2 has none)
+    assert s["r_sum"] == pytest.approx(0.5) and s["r_mean"] == pytest.approx(0.5 / 3)
+    assert s["avg_pnl_usd"] == pytest.approx(7.0 / 4)
+    assert s["allow_rate"] == pytest.approx(0.75)
+    assert mem["size_multiplier"] == pytest.approx((0.4 + 0.6 + 0.4 + 0.5) / 4)
+
+    _append(store.paths["outcomes"], [_outcome("t3", 4.0, 3.0)])
+    store.refresh(force=True)
+    [mem] = store.query(memory_fingerprint=FP, symbol="BTCUSDT", timeframe="5m", setup_type="breakout",
+                        policy_hash=PH, min_n=1, max_age_days=30, k=5)
+    assert mem["stats"]["r_sum"] == pytest.approx(3.5) and mem["stats"]["r_mean"] == pytest.approx(3.5 / 4)
+
+
+def test_tier_a_then_any_fallback(store):
+    _append(store.paths["setups"], [_setup("b1", "BTCUSDT")] + [_setup(f"e{i}", "ETHUSDT") for i in range(3)])
+    _append(store.paths["outcomes"], [_outcome("b1", 1.0, 1.0)] + [_outcome(f"e{i}", 2.0, 2.0) for i in range(3)])
+    store.refresh(force=True)
+
+    res = query_memories_tiered(_setup("q1", "BTCUSDT"), QueryOptions(min_n=3))
+    assert res["tier_used"] == "A"
+    assert [m["symbol"] for m in res["matched"]] == ["BTCUSDT"]
+
+    # no SOLUSDT rollup: falls back to ANY, where only ETHUSDT has min_n
+    res = query_memories_tiered(_setup("q2", "SOLUSDT"), QueryOptions(min_n=3))
+    assert res["tier_used"] == "B"
+    assert [m["symbol"] for m in res["matched"]] == ["ETHUSDT"]
+
+    # a fingerprint prefix matches too; a different policy doesn't
+    q = _setup("q3", "SOLUSDT")
+    q["payload"]["features"]["memory_fingerprint"] = FP[:12]
+    assert query_memories_tiered(q, QueryOptions(min_n=1))["tier_used"] == "B"
+    q["policy"]["policy_hash"] = "x" * 40
+    assert query_memories_tiered(q, QueryOptions(min_n=1))["tier_used"] == "NONE"
+
+
+def test_restart_resumes_from_sqlite(store):
+    _append(store.paths["setups"], [_setup("t1", "BTCUSDT")])
+    _append(store.paths["outcomes"], [_outcome("t1", 5.0, 1.5)])
+    store.refresh(force=True)
+    store.persist()  # may already be done by refresh(); a no-op then
+
+    again = MemoryRollupStore(store.db_path, store.paths["setups"], store.paths["outcomes"])
+    assert again.refresh(force=True) == 0
+    [mem] = again.query(memory_fingerprint=FP, symbol=None, timeframe=None, setup_type=None,
+                        policy_hash=None, min_n=1, max_age_days=30, k=5)
+    assert mem["stats"]["n"] == 1 and mem["stats"]["r_sum"] == 1.5
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import types
+from decimal import Decimal
+
+import pytest
+
+from app.core import ai_state_bus as asb
+
+
+def _service(monkeypatch, rows: list) -> asb.AiStateService:
+    svc = asb.AiStateService("main", include_orderbook=False)
+    for name in ("account", "symbols", "orders"):
+        monkeypatch.setattr(svc._sections[name], "build_fn", lambda: {})
+    monkeypatch.setattr(svc._sections["positions"], "build_fn",
+                        lambda: {"raw": rows, "by_symbol": {r["symbol"]: r for r in rows}})
+    return svc
+
+
+def test_snapshot_sections_are_deep_frozen(monkeypatch):
+    svc = _service(monkeypatch, [{"symbol": "BTCUSDT", "size": "1"}])
+    snap = svc.current()
+    pos = snap.get("positions")
+    with pytest.raises(TypeError):
+        pos["by_symbol"]["BTCUSDT"]["size"] = "2"
+    with pytest.raises((TypeError, AttributeError)):
+        pos["raw"].append({})
+
+    # legacy callers get a plain copy they may mutate without touching the shared sections
+    d = snap.as_dict()
+    d["positions"]["by_symbol"]["BTCUSDT"]["size"] = "2"
+    d["positions"]["raw"].append({})
+    again = svc.current()
+    assert again.version == snap.version
+    assert again.get("positions")["by_symbol"]["BTCUSDT"]["size"] == "1"
+    assert len(again.get("positions")["raw"]) == 1
+
+
+def test_account_section_reads_the_requested_label(monkeypatch):
+    seen: list = []
+    fake_wb = types.SimpleNamespace(
+        get_equity_usdt=lambda label: seen.append(label) or Decimal("1234"),
+        get_mmr_pct=lambda label: Decimal("0.5"),
+    )
+    fake_fc = types.SimpleNamespace(
+        ACCOUNT_LABEL="main",
+        get_equity_usdt=lambda: Decimal("1"),
+        get_mmr_pct=lambda: Decimal("0"),
+        tier_from_equity=lambda eq: None,
+    )
+    monkeypatch.setitem(asb._IMPORTS, "app.core.flashback_common", fake_fc)
+    monkeypatch.setitem(asb._IMPORTS, "app.core.wallet_bus", fake_wb)
+    assert asb._build_account("flashback07")["equity_usdt"] == "1234"
+    assert seen == ["flashback07"]
+    assert asb._build_account("main")["equity_usdt"] == "1"
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import orjson
+import pytest
+
+from app.ai import classifier_training as ct
+from app.core import trade_classifier as tc
+
+T0_MS = 1_735_689_600_000
+
+
+def _append(path, start: int, n: int) -> None:
+    with path.open("ab") as f:
+        for i in range(start, start + n):
+            ts = T0_MS + i * 3_600_000
+            feat = {"trade_id": f"t{i}", "symbol": "BTCUSDT", "ts_open_ms": ts, "regime": "trend",
+                    "atr_pct": 1.0, "vol_zscore": 0.1 * i, "adx": 25.0, "f.side_sign": 1}
+            out = {"trade_id": f"t{i}", "ts_open_ms": ts, "r_multiple": 1.0 if i % 2 else -1.0, "win": bool(i % 2)}
+            f.write(orjson.dumps(feat) + b"\n" + orjson.dumps(out) + b"\n")
+
+
+def _rows(cache: ct.FeatureCache) -> int:
+    return sum(b["rows"] for per in cache.buckets().values() for b in per)
+
+
+def test_crash_before_manifest_save_does_not_duplicate_rows(tmp_path, monkeypatch):
+    src = tmp_path / "feature_store.jsonl"
+    cdir = tmp_path / "cache"
+    _append(src, 0, 10)
+    assert _rows(_synced(src, cdir)) == 10
+
+    _append(src, 10, 5)
+    crashing = ct.FeatureCache(src, cdir)
+
+    def boom() -> None:
+        raise OSError("killed")
+
+    monkeypatch.setattr(crashing, "_save_manifest", boom)
+    with pytest.raises(OSError):
+        crashing.sync()  # bucket files written, manifest not
+
+    cache = _synced(src, cdir)
+    assert _rows(cache) == 15
+    paths = [b["path"] for per in cache.buckets().values() for b in per]
+    ts = list(ct.load_matrix(paths)[1])
+    assert len(ts) == 15
+    assert sorted(p.name for p in (cdir / "features").rglob("*.fcol*")) == sorted(
+        p.rsplit("/", 1)[-1] for p in paths)
+
+
+def _synced(src, cdir) -> ct.FeatureCache:
+    cache = ct.FeatureCache(src, cdir)
+    cache.sync()
+    return cache
+
+
+def test_reload_drops_unpublished_global_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(tc, "MODELS_DIR", tmp_path)
+    monkeypatch.setattr(tc, "MODELS_MANIFEST", tmp_path / "setup_classifier_manifest.json")
+    for name, val in (("_MODEL_LOADED", False), ("_MODELS_STAMP", None), ("_REGIME_MODELS", {}),
+                      ("_REGIME_FEATURES", {}), ("_GLOBAL_MODEL", None), ("_GLOBAL_FEATURES", [])):
+        monkeypatch.setattr(tc, name, val)
+    monkeypatch.setattr(tc, "_load_pickle", lambda p: {"model": p.name})
+    (tmp_path / "setup_classifier.pkl").write_bytes(b"x")
+    (tmp_path / "setup_classifier_meta.json").write_text('{"feature_names": ["a"]}')
+    tc._load_models_once()
+    assert tc._GLOBAL_MODEL == {"model": "setup_classifier.pkl"} and tc._GLOBAL_FEATURES == ["a"]
+
+    (tmp_path / "setup_classifier.pkl").unlink()
+    (tmp_path / "setup_classifier_manifest.json").write_text("{}")
+    monkeypatch.setattr(tc, "_NEXT_RELOAD_CHECK", 0.0)
+    tc._load_models_once()
+    assert tc._GLOBAL_MODEL is None and tc._GLOBAL_FEATURES == []
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import os
+
+import orjson
+
+from app.core import event_archive as ea
+
+DAY_MS = 1_760_000_000_000
+
+
+def _write(path, start: int, n: int) -> None:
+    with path.open("ab") as f:
+        for i in range(start, start + n):
+            row = {"symbol": "BTCUSDT", "received_ms": DAY_MS + i, "trade": {"T": DAY_MS + i, "p": "1", "v": "1", "i": str(i)}}
+            f.write(orjson.dumps(row) + b"\n")
+
+
+def _setup(tmp_path, monkeypatch):
+    log = tmp_path / "public_trades.jsonl"
+    stream = ea.Stream("public_trades", (log,), ea._rows_public_trades, ea.STREAMS["public_trades"].schema)
+    monkeypatch.setitem(ea.STREAMS, "public_trades", stream)
+    return log, tmp_path / "archive"
+
+
+def _ids(adir) -> list:
+    return ea.read_stream("public_trades", archive_dir=adir).get_column("trade_id").to_list()
+
+
+def test_merge_crash_before_unlink_does_not_duplicate(tmp_path, monkeypatch):
+    log, adir = _setup(tmp_path, monkeypatch)
+    for i in range(4):
+        _write(log, i * 10, 10)
+        ea.compact_stream("public_trades", archive_dir=adir, min_bytes=0)
+    monkeypatch.setattr(ea, "MERGE_FILES", 2)
+
+    # crash right after the merge committed, before its inputs were unlinked
+    monkeypatch.setattr(ea, "_finish_merges", lambda *a: None)
+    assert ea.merge_small_files("public_trades", archive_dir=adir) == 1
+    names = [p.name for p in ea._committed_files(adir / "public_trades")]
+    assert len(names) == 5 and sum("-merged_" in n for n in names) == 1
+    assert _ids(adir) == [str(i) for i in range(40)]
+
+    monkeypatch.undo()
+    log, adir = _setup(tmp_path, monkeypatch)
+    ea.merge_small_files("public_trades", archive_dir=adir, max_files=2)
+    assert len(list(ea._committed_files(adir / "public_trades"))) == 1
+    assert _ids(adir) == [str(i) for i in range(40)]
+
+
+def test_uncommitted_merge_and_batch_are_ignored(tmp_path, monkeypatch):
+    log, adir = _setup(tmp_path, monkeypatch)
+    _write(log, 0, 10)
+    ea.compact_stream("public_trades", archive_dir=adir, min_bytes=0)
+    sdir = adir / "public_trades"
+    part = next(ea._committed_files(sdir)).parent
+
+    # a merged file that never made it into the manifest
+    stray = part / "public_trades-merged_1.parquet"
+    ea.read_parquet(next(part.glob("*.parquet"))).write_parquet(stray)
+    # a batch written under a seq the manifest never committed
+    man = ea._load_manifest(sdir)
+    key = next(iter(man["files"]))
+    df = ea.read_parquet(next(part.glob("public_trades-*-0_*.parquet"))).with_columns(
+        ea.pl.lit(man["seq"] + 1, dtype=ea.pl.Int64).alias("_seq"))
+    df.write_parquet(part / f"public_trades-{key}-0_{os.getpid()}.parquet")
+
+    assert _ids(adir) == [str(i) for i in range(10)]
+    ea.merge_small_files("public_trades", archive_dir=adir, max_files=100)
+    assert not stray.exists()
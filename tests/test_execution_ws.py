@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import pytest
+
+from app.core import execution_ws
+
+
+class MockExchange:
+    """Fills reduce-only closes immediately; labels in `broken` fail every read."""
+
+    def __init__(self, book: Dict[str, List[Dict[str, Any]]], broken=()) -> None:
+        self._lock = threading.Lock()
+        self.positions = {lab: {(p["symbol"], p["side"]): dict(p) for p in rows} for lab, rows in book.items()}
+        self.broken = set(broken)
+        self.closes: List[tuple] = []
+        self.cancels: List[tuple] = []
+
+    def list_positions(self, label: str) -> List[Dict[str, Any]]:
+        if label in self.broken:
+            raise RuntimeError("retCode 10003: invalid api key")
+        with self._lock:
+            return [dict(p) for p in self.positions.get(label, {}).values()]
+
+    def reduce_only(self, label: str, symbol: str, side: str, qty: Decimal) -> Dict[str, Any]:
+        with self._lock:
+            self.closes.append((label, symbol, side, qty))
+            p = self.positions[label][(symbol, side)]
+            left = Decimal(p["size"]) - qty
+            if left <= 0:
+                del self.positions[label][(symbol, side)]
+            else:
+                p["size"] = str(left)
+        return {"retCode": 0}
+
+    def cancel_all(self, label: str, symbol: str) -> None:
+        with self._lock:
+            self.cancels.append((label, symbol))
+
+
+@pytest.fixture(autouse=True)
+def _quiet(monkeypatch):
+    monkeypatch.setattr(execution_ws, "record_heartbeat", lambda *a, **k: None)
+    monkeypatch.setattr(execution_ws, "alert_bot_error", lambda *a, **k: None)
+    monkeypatch.setattr(execution_ws, "FLATTEN_RECONCILE_DELAY_SEC", 0.0)
+
+
+def _pos(sym: str, side: str, size: str) -> Dict[str, Any]:
+    return {"symbol": sym, "side": side, "size": size}
+
+
+def test_flatten_fleet_closes_every_leg():
+    ex = MockExchange({
+        "main": [_pos("BTCUSDT", "Buy", "0.5"), _pos("ETHUSDT", "Sell", "2")],
+        "sub1": [_pos("BTCUSDT", "Buy", "1"), _pos("BTCUSDT", "Sell", "1")],
+        "sub2": [],
+    })
+    res = execution_ws.flatten_fleet(["main", "sub1", "sub2"], exchange=ex, notify=False)
+    assert res["ok"] and res["remaining"] == {} and res["snapshot_errors"] == {}
+    assert not any(ex.positions.values())
+    assert res["results"]["sub1"]["BTCUSDT"]["qty"] == "2"
+    assert all(r["flat_ms"] is not None for syms in res["results"].values() for r in syms.values())
+    assert sorted(ex.cancels) == [("main", "BTCUSDT"), ("main", "ETHUSDT"), ("sub1", "BTCUSDT")]
+
+
+def test_unreadable_account_is_not_reported_flat():
+    ex = MockExchange({"main": [_pos("BTCUSDT", "Buy", "1")], "sub1": [_pos("ETHUSDT", "Buy", "1")]},
+                      broken={"sub1"})
+    res = execution_ws.flatten_fleet(["main", "sub1"], exchange=ex, notify=False, reconcile_rounds=1)
+    assert not res["ok"]
+    assert "sub1" in res["snapshot_errors"]
+    assert ex.positions["main"] == {} and ex.positions["sub1"]
+    assert all(c[0] == "main" for c in ex.closes)
+
+
+def test_subaccount_never_uses_main_keys(monkeypatch):
+    for k in ("BYBIT_SUB1_READ_KEY", "BYBIT_SUB1_READ_SECRET"):
+        monkeypatch.delenv(k, raising=False)
+    monkeypatch.setenv("BYBIT_MAIN_READ_KEY", "main-key")
+    monkeypatch.setenv("BYBIT_MAIN_READ_SECRET", "main-secret")
+    calls: list = []
+    monkeypatch.setattr(execution_ws, "bybit_get", lambda *a, **k: calls.append(k) or {"result": {"list": []}})
+
+    assert execution_ws._fleet_keys("main", "read") == ("main-key", "main-secret")
+    res = execution_ws.flatten_fleet(["sub1"], exchange=execution_ws.BybitFleetExchange(), notify=False,
+                                     reconcile_rounds=0)
+    assert not res["ok"]
+    assert "BYBIT_SUB1_READ_KEY" in res["snapshot_errors"]["sub1"]
+    assert calls == []
+
+    monkeypatch.setenv("BYBIT_SUB1_READ_KEY", "sub-key")
+    monkeypatch.setenv("BYBIT_SUB1_READ_SECRET", "sub-secret")
+    res = execution_ws.flatten_fleet(["sub1"], exchange=execution_ws.BybitFleetExchange(), notify=False)
+    assert res["ok"] and calls[0]["key"] == "sub-key"
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import zlib
+
+import orjson
+
+from app.core import exposure_ledger
+from app.core.exposure_ledger import ExposureLedger
+
+NTRADES = 16
+
+
+def _ledger(tmp_path, name: str = "led") -> ExposureLedger:
+    return ExposureLedger(tmp_path / f"{name}.shm", tmp_path / f"{name}.jsonl", nsymbols=8, ntrades=NTRADES,
+                          session_json_path=None)
+
+
+def _colliding_ids(n: int, home: int) -> list:
+    out, i = [], 0
+    while len(out) < n:
+        tid = f"t{i}"
+        if zlib.crc32(tid.encode()) % NTRADES == home:
+            out.append(tid)
+        i += 1
+    return out
+
+
+def test_close_symbol_releases_colliding_trades(tmp_path):
+    led = _ledger(tmp_path)
+    # same home slot, wrapping past the end of the table
+    tids = _colliding_ids(4, NTRADES - 2)
+    for tid in tids:
+        assert led.record_open(tid, "BTCUSDT", "Buy", 100.0, 1.0, account_label="acc1")
+    led.record_open("other", "ETHUSDT", "Buy", 50.0, 2.0, account_label="acc1")
+
+    assert led.close_symbol("acc1", "BTCUSDT", -5.0) == 4
+    s = led.snapshot(include_trades=True)
+    assert [t["trade_id"] for t in s["trades"]] == ["other"]
+    assert s["open_count"] == 1 and s["total_risk"] == 2.0
+    assert s["symbols"].get("BTCUSDT", {}).get("open_count", 0) == 0
+    led.close()
+
+
+def test_journal_is_written_in_order_and_replays(tmp_path):
+    led = _ledger(tmp_path)
+    led.record_open("a", "BTCUSDT", "Buy", 100.0, 1.0)
+    led.record_close("a", pnl_usd=-3.0)
+    assert led.reserve_open("b", "BTCUSDT", "Sell", 80.0, 2.0)[0]
+    assert led.release("b")
+    # no flush needed: every mutation is in the journal when it returns
+    ops = [orjson.loads(x)["op"] for x in (tmp_path / "led.jsonl").read_bytes().splitlines()]
+    assert ops == ["open", "close", "open", "release"]
+    before = led.session_state()
+    led.close()
+
+    (tmp_path / "led.shm").unlink()
+    led = _ledger(tmp_path)
+    s = led.snapshot()
+    assert s["open_count"] == 0 and s["opens_today"] == 1 and before["losses_today"] == s["losses"] == 1
+    led.close()
+
+
+def test_journal_compaction_keeps_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(exposure_ledger, "JOURNAL_COMPACT_BYTES", 2000)
+    led = _ledger(tmp_path)
+    for i in range(40):
+        led.record_open(f"x{i}", "BTCUSDT", "Buy", 10.0, 1.0)
+        led.record_close(f"x{i}", pnl_usd=1.0 if i % 2 else -1.0)
+    led.record_open("live", "ETHUSDT", "Sell", 30.0, 3.0)
+    want = led.snapshot()
+    led.close()
+    journal = tmp_path / "led.jsonl"
+    assert journal.stat().st_size <= 2000 + 512
+
+    (tmp_path / "led.shm").unlink()
+    led = _ledger(tmp_path)
+    got = led.snapshot(include_trades=True)
+    for k in ("open_count", "total_risk", "short_notional", "trades_today", "opens_today", "wins", "losses",
+              "loss_streak", "win_streak", "realized_today"):
+        assert got[k] == want[k], k
+    assert [t["trade_id"] for t in got["trades"]] == ["live"]
+    led.close()
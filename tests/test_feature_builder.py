@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import orjson
+import pytest
+
+from app.ai import feature_builder as fb
+
+T0_MS = 1_735_689_600_000  # 2025-01-01
+
+
+def _feat(i: int) -> dict:
+    return {"trade_id": f"T{i}", "symbol": "BTCUSDT", "strategy_name": "trend_v2", "account_label": "main",
+            "mode": "PAPER", "ts_open_ms": T0_MS + i * 5_000, "features": {"atr_pct": 0.5, "adx": 25, "k": i}}
+
+
+def _outcome(i: int) -> dict:
+    return {"event_type": "outcome_enriched", "trade_id": f"T{i}", "symbol": "BTCUSDT", "strategy": "trend_v2",
+            "account_label": "main", "outcome": {"payload": {
+                "pnl_usd": 1.0, "r_multiple": 0.5, "win": True,
+                "extra": {"opened_ms": T0_MS + i * 5_000, "mode": "PAPER", "entry_price": 100.0, "exit_price": 101.0}}}}
+
+
+def _append(path: Path, objs) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("ab") as f:
+        for o in objs:
+            f.write(orjson.dumps(o) + b"\n")
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    # the registry and legacy progress files are cwd-relative
+    monkeypatch.chdir(tmp_path)
+    state = tmp_path / "state"
+    paths = {
+        "out": state / "feature_store.jsonl",
+        "parquet_dir": state / "feature_store",
+        "checkpoint": state / "features" / "builder_checkpoint.json",
+        "features_path": state / "features_trades.jsonl",
+        "outcomes_path": state / "ai_events" / "outcomes.enriched.backfill.jsonl",
+    }
+
+    def build(**kw):
+        return fb.build(**paths, batch_rows=kw.pop("batch_rows", 8), parquet=kw.pop("parquet", False), **kw)
+
+    return paths, build
+
+
+def _out_rows(paths) -> list:
+    return [orjson.loads(ln) for ln in paths["out"].read_bytes().splitlines()]
+
+
+def test_joiner_matches_either_order_and_evicts_oldest(monkeypatch):
+    monkeypatch.setattr(fb, "PENDING_MAX", 2)
+    monkeypatch.setattr(fb, "PENDING_MAX_AGE_MS", 60_000)
+    j = fb.Joiner()
+    f1 = fb.normalize_feature_trade(_feat(1))
+    o1 = fb.normalize_outcome(_outcome(1))
+    assert j.add(f1, True) is None
+    row = j.add(o1, False)
+    assert row["trade_id"] == "T1" and row["r_multiple"] == 0.5 and row["adx"] == 25.0
+    assert (j.joined, j.features, j.outcomes) == (1, {}, {})
+
+    # outcome first works the same way
+    assert j.add(fb.normalize_outcome(_outcome(2)), False) is None
+    assert j.add(fb.normalize_feature_trade(_feat(2)), True)["pnl_usd"] == 1.0
+    # rows without a trade_id can never join: passed straight through
+    assert j.add({"symbol": "X"}, True) == {"symbol": "X"}
+
+    for i in range(10, 14):
+        j.add(fb.normalize_feature_trade(_feat(i)), True)
+    out = j.evict(T0_MS + 13 * 5_000)
+    assert [r["trade_id"] for r in out] == ["T10", "T11"]  # over PENDING_MAX, oldest first
+    out = j.evict(T0_MS + 12 * 5_000 + 60_000 + 1)
+    assert [r["trade_id"] for r in out] == ["T12"]  # older than the age cap
+    assert list(j.features) == ["T13"] and j.evicted == 3
+
+    # the pending set round-trips through the checkpoint
+    again = fb.Joiner(orjson.loads(orjson.dumps(j.state())))
+    assert again.add(fb.normalize_outcome(_outcome(13)), False)["trade_id"] == "T13"
+
+
+def test_incremental_runs_only_read_the_tail(env):
+    paths, build = env
+    _append(paths["features_path"], [_feat(i) for i in range(20)])
+    _append(paths["outcomes_path"], [_outcome(i) for i in range(15)])
+
+    st = build()
+    assert st["lines"] == 35 and st["rows_out"] == 15 and st["pending"] == 5
+    assert fb.load_checkpoint(paths["checkpoint"])["pending"]["features"].keys() == {f"T{i}" for i in range(15, 20)}
+
+    # outcomes for the pending features arrive later and join against the checkpointed pending set
+    _append(paths["outcomes_path"], [_outcome(i) for i in range(15, 20)])
+    st = build()
+    assert st["lines"] == 5 and st["rows_out"] == 5 and st["joined"] == 5 and st["pending"] == 0
+
+    rows = _out_rows(paths)
+    assert sorted(r["trade_id"] for r in rows) == sorted(f"T{i}" for i in range(20))
+    assert all(r["r_multiple"] == 0.5 for r in rows)
+    assert build()["lines"] == 0
+
+
+def test_crash_after_checkpoint_drops_unsaved_output(env):
+    paths, build = env
+    _append(paths["features_path"], [_feat(i) for i in range(10)])
+    _append(paths["outcomes_path"], [_outcome(i) for i in range(10)])
+    st = build(parquet=True)
+    assert st["rows_out"] == 10 and st["parquet_files"] >= 1
+    size = paths["out"].stat().st_size
+    seq = fb.load_checkpoint(paths["checkpoint"])["seq"]
+    chunks = sorted(p.name for p in (paths["parquet_dir"] / "_committed").rglob("*.parquet"))
+
+    # a run that died after writing but before its checkpoint: torn JSONL tail + an extra chunk
+    with paths["out"].open("ab") as f:
+        f.write(b'{"trade_id":"T0","partial":')
+    stray = paths["parquet_dir"] / "_committed" / "day=2025-01-01" / f"features-{seq + 1:08d}_1.parquet"
+    stray.parent.mkdir(parents=True, exist_ok=True)
+    stray.write_bytes(b"junk")
+
+    st = build(parquet=True)
+    assert st["recovered"] == (27, 1) and st["lines"] == 0
+    assert paths["out"].stat().st_size == size
+    assert sorted(p.name for p in (paths["parquet_dir"] / "_committed").rglob("*.parquet")) == chunks
+
+
+def test_rewritten_source_is_read_from_the_start(env):
+    paths, build = env
+    _append(paths["features_path"], [_feat(i) for i in range(4)])
+    build()
+    # a rotated/replaced file no longer matches the checkpointed head fingerprint
+    paths["features_path"].write_bytes(b"")
+    _append(paths["features_path"], [_feat(i) for i in range(100, 103)])
+    assert build()["lines"] == 3
+
+
+def test_peak_rss_is_optional(monkeypatch):
+    # Windows has no resource module; without psutil the stat is just unknown
+    monkeypatch.setattr(fb, "resource", None)
+    monkeypatch.setattr(fb, "psutil", None)
+    assert fb.peak_rss_mb() is None
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+from pathlib import Path
+
+from app.core.heartbeat_registry import HeartbeatRegistry
+
+BEATS = 2000
+
+
+def _writer(path: str, name: str, n: int, q, barrier) -> None:
+    reg = HeartbeatRegistry(Path(path), nslots=32)
+    for i in range(n):
+        reg.beat(name, add_progress=1)
+    q.put(reg._pid)
+    # stay alive until every writer has claimed its slot (a dead owner's slot is reusable)
+    barrier.wait(timeout=60)
+    reg.close()
+
+
+def _run_writers(path: Path, name: str, procs: int, n: int) -> list:
+    ctx = mp.get_context("fork")
+    q = ctx.Queue()
+    barrier = ctx.Barrier(procs)
+    ps = [ctx.Process(target=_writer, args=(str(path), name, n, q, barrier)) for _ in range(procs)]
+    for p in ps:
+        p.start()
+    pids = [q.get(timeout=60) for _ in ps]
+    for p in ps:
+        p.join(timeout=60)
+        assert p.exitcode == 0
+    return pids
+
+
+def test_concurrent_writers_same_name_keep_separate_slots(tmp_path):
+    path = tmp_path / "hb.shm"
+    pids = _run_writers(path, "execution_ws", 4, BEATS)
+
+    reg = HeartbeatRegistry(path, nslots=32)
+    rows = reg.read_writers("execution_ws")
+    assert sorted(r["pid"] for r in rows) == sorted(pids)
+    # one writer per slot: no lost or torn updates
+    assert all(r["beats"] == BEATS and r["progress"] == BEATS for r in rows)
+
+    merged = reg.get("execution_ws")
+    assert merged is not None and merged["writers"] == sorted(pids)
+    assert reg.read_all()["execution_ws"]["writers"] == sorted(pids)
+
+
+def test_dead_owner_slot_is_reused(tmp_path):
+    path = tmp_path / "hb.shm"
+    for _ in range(3):
+        _run_writers(path, "risk_daemon", 1, 10)
+    reg = HeartbeatRegistry(path, nslots=32)
+    # each run's writer exited before the next claimed: the slot is recycled
+    assert len(reg.read_writers("risk_daemon")) == 1
+    reg.beat("risk_daemon")
+    rows = reg.read_writers("risk_daemon")
+    assert [r["pid"] for r in rows] == [reg._pid]
+    assert rows[0]["beats"] == 1
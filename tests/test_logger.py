@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import sys
+
+import orjson
+import pytest
+
+from app.core import logger as flog
+
+
+class _Capture(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def _record(level: int, msg: str) -> logging.LogRecord:
+    return logging.LogRecord("t", level, __file__, 1, msg, None, None)
+
+
+def test_full_queue_drops_info_but_never_warning(monkeypatch):
+    monkeypatch.setattr(flog, "LOG_QUEUE_BLOCK_MS", 10)
+    sink = _Capture()
+    qh = flog._DroppingQueueHandler(queue.Queue(maxsize=1), [sink])
+    qh.handle(_record(logging.INFO, "fills the queue"))
+    dropped = flog._STATS["dropped"]
+
+    qh.handle(_record(logging.INFO, "dropped"))
+    qh.handle(_record(logging.ERROR, "kept"))
+
+    assert flog._STATS["dropped"] == dropped + 1
+    assert [r.getMessage() for r in sink.records] == ["kept"]
+    assert qh.queue.get_nowait().getMessage() == "fills the queue"
+
+
+def test_size_rotation_keeps_backups(tmp_path):
+    fh = flog._SizeAndDailyRotatingFileHandler(tmp_path / "x.log", max_bytes=200, backups=2, daily=False)
+    fh.setFormatter(logging.Formatter("%(message)s"))
+    for i in range(40):
+        fh.handle(_record(logging.INFO, f"line {i:03d} " + "x" * 20))
+    fh.close()
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names == ["x.log", "x.log.1", "x.log.2"]
+    assert all(p.stat().st_size <= 200 for p in tmp_path.iterdir())
+    assert "line 039" in (tmp_path / "x.log").read_text(encoding="utf-8")
+
+
+def test_daily_rollover_without_backups_starts_a_fresh_file(tmp_path):
+    fh = flog._SizeAndDailyRotatingFileHandler(tmp_path / "d.log", max_bytes=0, backups=0, daily=True)
+    fh.setFormatter(logging.Formatter("%(message)s"))
+    fh.handle(_record(logging.INFO, "yesterday"))
+    fh._next_roll = 0.0
+    fh.handle(_record(logging.INFO, "today"))
+    fh.close()
+    assert (tmp_path / "d.log").read_text(encoding="utf-8") == "today\n"
+    assert (tmp_path / "d.log.1").read_text(encoding="utf-8") == "yesterday\n"
+    assert fh._next_roll > 0.0
+
+
+def test_json_lines_carry_context_and_exception():
+    lg = logging.getLogger("test_json_lines")
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        rec = lg.makeRecord("test_json_lines", logging.ERROR, __file__, 1, "fill %s @ %s", ("BTCUSDT", 1.5),
+                            sys.exc_info(), extra={"account_label": "acc1", "_private": 1})
+    out = orjson.loads(flog.JsonLinesFormatter().format(rec))
+    assert out["lvl"] == "ERROR" and out["logger"] == "test_json_lines"
+    assert out["msg"] == "fill BTCUSDT @ 1.5"
+    assert out["account_label"] == "acc1" and "_private" not in out
+    assert "ValueError: bad" in out["exc"]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_forked_child_keeps_explicit_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(flog, "LOG_JSON_FILE", tmp_path / "flashback.jsonl")
+    monkeypatch.setattr(flog, "LOG_FILE", tmp_path / "flashback.log")
+    root = logging.getLogger()
+    level = root.level
+    try:
+        flog.configure_logging(async_mode=True, json_lines=True, console=False, force=True)
+        root.setLevel(logging.WARNING)
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                logging.getLogger("child").info("below the parent's level")
+                logging.getLogger("child").warning("from child")
+                flog.flush_logs()
+                code = 0
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        lines = [orjson.loads(x) for x in (tmp_path / "flashback.jsonl").read_bytes().splitlines()]
+        assert [(x["logger"], x["lvl"], x["msg"]) for x in lines] == [("child", "WARNING", "from child")]
+        assert not (tmp_path / "flashback.log").exists()
+    finally:
+        flog.configure_logging(force=True)
+        root.setLevel(level)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.core.notifier_bot import TelegramDispatcher
+
+
+def _dispatcher(sent: list, window: float) -> TelegramDispatcher:
+    def post(url, payload):
+        sent.append(payload["text"])
+        return 200, {"ok": True}
+
+    return TelegramDispatcher(coalesce_window_sec=window, batch_window_ms=0, global_rate_per_sec=1000, post=post)
+
+
+def test_texts_differing_in_numbers_are_not_merged():
+    sent: list = []
+    d = _dispatcher(sent, 5.0)
+    d.submit("T", "1", "Entry placed [Sub1] BTCUSDT Buy @ 65000")
+    d.submit("T", "1", "Entry placed [Sub2] BTCUSDT Buy @ 64000")
+    d.submit("T", "1", "Entry placed [Sub2] BTCUSDT Buy @ 64000")
+    assert d.flush(5.0)
+    lines = "\n".join(sent).splitlines()
+    assert "Entry placed [Sub1] BTCUSDT Buy @ 65000" in lines
+    assert any(ln.startswith("Entry placed [Sub2] BTCUSDT Buy @ 64000") for ln in lines)
+    assert d.metrics()["coalesced_pending"] + d.metrics()["suppressed_recent"] == 1
+
+
+def test_suppressed_repeats_are_summarized_when_window_expires():
+    sent: list = []
+    d = _dispatcher(sent, 0.3)
+    d.submit("T", "1", "WS stale")
+    assert d.flush(5.0)
+    for _ in range(3):
+        d.submit("T", "1", "WS stale")
+    assert d.flush(5.0)
+    assert d.metrics()["suppressed_recent"] == 3
+    deadline = time.monotonic() + 5.0
+    while len(sent) < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert sent == ["WS stale", "WS stale (+3 repeats in last 0.3s)"]
+
+
+class _FakeTelegram(BaseHTTPRequestHandler):
+    """sendMessage stand-in: the first call gets a 429 with retry_after=1."""
+
+    calls: list = []
+
+    def do_POST(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        form = urllib.parse.parse_qs(self.rfile.read(n).decode("utf-8"))
+        self.calls.append((time.monotonic(), self.path, form["text"][0]))
+        if len(self.calls) == 1:
+            status, body = 429, {"ok": False, "error_code": 429, "parameters": {"retry_after": 1}}
+        else:
+            status, body = 200, {"ok": True}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_http_429_holds_chat_and_identical_texts_coalesce():
+    _FakeTelegram.calls = []
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _FakeTelegram)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        d = TelegramDispatcher(api_base=f"http://127.0.0.1:{srv.server_port}", coalesce_window_sec=5.0,
+                               batch_window_ms=200, global_rate_per_sec=1000, timeout_sec=5)
+        for _ in range(3):
+            d.submit("TOKEN", "42", "WS stale")
+        d.submit("TOKEN", "42", "WS stale 2")
+        assert d.flush(10.0)
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    calls = _FakeTelegram.calls
+    assert len(calls) == 2
+    assert calls[0][1] == "/botTOKEN/sendMessage"
+    assert calls[0][2] == calls[1][2] == "WS stale (x3)\nWS stale 2"
+    assert calls[1][0] - calls[0][0] >= 0.9
+    m = d.metrics()
+    assert m["rate_limited_429"] == 1 and m["batches_sent"] == 1
+    assert m["messages_delivered"] == 4 and m["coalesced_pending"] == 2
+
+
+def test_sender_survives_a_loop_error(monkeypatch):
+    sent: list = []
+    d = _dispatcher(sent, 0.0)
+    real_ingest = d._ingest
+    boom = [True]
+
+    def ingest(*item):
+        if boom:
+            boom.clear()
+            raise RuntimeError("boom")
+        real_ingest(*item)
+
+    monkeypatch.setattr(d, "_ingest", ingest)
+    d.submit("T", "1", "lost")
+    assert d.flush(5.0)
+    d.submit("T", "1", "delivered")
+    assert d.flush(5.0)
+    assert sent == ["delivered"] and d.metrics()["loop_errors"] == 1
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import orjson
+import pytest
+
+from app.core import position_bus
+
+
+@pytest.fixture
+def bus(tmp_path, monkeypatch):
+    monkeypatch.setattr(position_bus, "POS_SNAPSHOT_PATH", tmp_path / "positions_bus.json")
+    monkeypatch.setattr(position_bus, "METRICS_PATH", tmp_path / "position_bus_metrics.json")
+    monkeypatch.setattr(position_bus, "_CACHE", None)
+    return position_bus
+
+
+def _write(bus, labels: dict) -> None:
+    bus.POS_SNAPSHOT_PATH.write_bytes(orjson.dumps({"version": 2, "updated_ms": int(time.time() * 1000),
+                                                    "labels": labels}))
+
+
+def _row(sym: str, size: str) -> dict:
+    return {"symbol": sym, "side": "Buy", "size": size, "avgPrice": "100", "stopLoss": "0"}
+
+
+def test_every_subscriber_on_a_label_is_notified(bus):
+    first: list = []
+    second: list = []
+    unsub1 = bus.subscribe_positions(lambda lbl, rows: first.append(len(rows)), label="acc1")
+    unsub2 = bus.subscribe_positions(lambda lbl, rows: second.append(len(rows)), label="acc1")
+    try:
+        _write(bus, {"acc1": {"category": "linear", "positions": [_row("BTCUSDT", "1")]}})
+        bus.get_snapshot()
+        assert first == [1] and second == [1]
+
+        late: list = []
+        unsub3 = bus.subscribe_positions(lambda lbl, rows: late.append(len(rows)), label="acc1")
+        time.sleep(0.01)
+        _write(bus, {"acc1": {"category": "linear", "positions": [_row("BTCUSDT", "1"), _row("ETHUSDT", "2")]}})
+        bus.get_snapshot()
+        unsub3()
+        assert first == [1, 2] and second == [1, 2] and late == [2]
+    finally:
+        unsub1()
+        unsub2()
+
+
+def test_failed_refresh_is_not_shared_as_flat(bus, monkeypatch):
+    entered = threading.Event()
+    release = threading.Event()
+
+    def failing_refresh(label, category, existing_snap):
+        entered.set()
+        release.wait(5)
+        raise RuntimeError("bybit down")
+
+    monkeypatch.setattr(bus, "_rest_refresh_snapshot_for_label", failing_refresh)
+    results: dict = {}
+
+    def call(name: str) -> None:
+        try:
+            results[name] = bus._rest_refresh_single_flight("main", "linear", None)
+        except Exception as e:
+            results[name] = e
+
+    leader = threading.Thread(target=call, args=("leader",))
+    leader.start()
+    assert entered.wait(5)
+    follower = threading.Thread(target=call, args=("follower",))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert isinstance(results["leader"], RuntimeError)
+    assert isinstance(results["follower"], RuntimeError)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.ops import proc_supervisor as ps
+
+pytestmark = pytest.mark.skipif(not ps.IS_LINUX, reason="exercises the /proc + process-group paths")
+
+# a python that ignores SIGTERM, optionally starting a grandchild that ignores it too
+_STUBBORN = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(60)"
+
+
+def _leader(ignore_term: bool) -> str:
+    return (
+        "import signal, subprocess, sys, time\n"
+        + ("signal.signal(signal.SIGTERM, signal.SIG_IGN)\n" if ignore_term else "")
+        + f"c = subprocess.Popen([sys.executable, '-c', {_STUBBORN!r}])\n"
+        "print(c.pid, flush=True)\n"
+        "time.sleep(60)\n"
+    )
+
+
+def _spawn_tree(ignore_term: bool):
+    p = ps.spawn([sys.executable, "-c", _leader(ignore_term)], stdout=subprocess.PIPE, text=True)
+    child = int(p.stdout.readline())
+    return p, child
+
+
+def _gone(pid: int, timeout: float = 5.0) -> bool:
+    end = time.monotonic() + timeout
+    while ps.pid_alive(pid):
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_start_time_identifies_the_process():
+    me = os.getpid()
+    st = ps.proc_start_time(me)
+    assert isinstance(st, int)
+    assert ps.pid_alive(me) and ps.pid_alive(me, st)
+    assert not ps.pid_alive(me, st + 1)  # same pid, different process: a reused pid
+    assert ps.proc_start_time(-1) is None and not ps.pid_alive(None)
+
+
+def test_reused_pid_is_never_signalled():
+    p = ps.spawn([sys.executable, "-c", "import time; time.sleep(60)"])
+    try:
+        st = ps.proc_start_time(p.pid)
+        assert ps.terminate(p.pid, st + 1, grace_sec=0.2) == "gone"
+        time.sleep(0.1)
+        assert p.poll() is None and ps.pid_alive(p.pid, st)
+        assert ps.terminate(p.pid, st, grace_sec=5, popen=p) == "term"
+        assert p.returncode == -15
+    finally:
+        if p.poll() is None:
+            p.kill()
+            p.wait()
+
+
+def test_stubborn_group_is_killed_whole():
+    p, child = _spawn_tree(ignore_term=True)
+    try:
+        assert ps.terminate(p.pid, ps.proc_start_time(p.pid), grace_sec=0.3, popen=p) == "kill"
+        assert p.returncode == -9
+        assert _gone(child)
+    finally:
+        if p.poll() is None:
+            p.kill()
+            p.wait()
+
+
+def test_group_stragglers_are_killed_after_the_leader_exits():
+    p, child = _spawn_tree(ignore_term=False)
+    try:
+        assert ps.terminate(p.pid, ps.proc_start_time(p.pid), grace_sec=5, popen=p) == "term"
+        assert _gone(child)
+    finally:
+        if p.poll() is None:
+            p.kill()
+            p.wait()
+
+
+def test_exit_watcher_reports_exit_and_stale_identity():
+    w = ps.ExitWatcher()
+    p = ps.spawn([sys.executable, "-c", "import time; time.sleep(0.2)"])
+    try:
+        st = ps.proc_start_time(p.pid)
+        # recorded start time doesn't match: the process we knew is already gone
+        w.watch("stale", p.pid, st + 1)
+        assert w.wait(0) == [("stale", None)]
+
+        w.watch("job", p.pid, st, popen=p)
+        assert w.wait(0) == []
+        assert w.wait(10) == [("job", 0)]
+    finally:
+        w.close()
+        if p.poll() is None:
+            p.kill()
+            p.wait()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+import orjson
+import pytest
+
+from app.bots import risk_daemon
+
+
+@pytest.fixture(autouse=True)
+def _no_heartbeat(monkeypatch):
+    # run_loop would otherwise beat into the repo's state/heartbeats.shm
+    monkeypatch.setattr(risk_daemon, "record_heartbeat", lambda name: None)
+
+
+def _engine(trips: list, breaker_active=None, trip=None) -> risk_daemon.RiskEngine:
+    return risk_daemon.RiskEngine(
+        max_daily_loss_usd=0,
+        max_drawdown_usd=0,
+        account_max_daily_loss_usd=100.0,
+        account_max_drawdown_usd=0,
+        trip_breaker=trip or trips.append,
+        breaker_active=breaker_active,
+        events_path=None,
+    )
+
+
+def _line(side: str, qty: float, px: float, ts_ms: int, sym: str = "BTCUSDT") -> dict:
+    row = {"symbol": sym, "side": side, "execQty": str(qty), "execPrice": str(px),
+           "execType": "Trade", "execFee": "0", "execTime": str(ts_ms)}
+    return {"account_label": "acc1", "ts_ms": ts_ms, "data": [row]}
+
+
+def _write(path: Path, lines: list) -> None:
+    with path.open("ab") as f:
+        for ln in lines:
+            f.write(orjson.dumps(ln) + b"\n")
+
+
+def _run(engine: risk_daemon.RiskEngine, state_dir: Path, until) -> None:
+    stop = threading.Event()
+    th = threading.Thread(
+        target=risk_daemon.run_loop,
+        args=(engine,),
+        kwargs={"state_dir": state_dir, "stop": stop, "use_position_bus": False},
+        daemon=True,
+    )
+    th.start()
+    deadline = time.monotonic() + 10
+    while not until() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stop.set()
+    th.join(timeout=10)
+
+
+def test_restart_keeps_daily_loss(tmp_path, monkeypatch):
+    monkeypatch.setattr(risk_daemon, "STATE_PATH", tmp_path / "risk_state.json")
+    monkeypatch.setattr(risk_daemon, "POLL_SEC", 0.01)
+    feed = tmp_path / "ws_executions.jsonl"
+    now = int(time.time() * 1000)
+    # 60 USD lost today, below the 100 USD account limit
+    _write(feed, [_line("Buy", 1, 1000, now), _line("Sell", 1, 940, now)])
+
+    trips: list = []
+    first = _engine(trips)
+    _run(first, tmp_path, lambda: first.stats["fills"] == 2)
+    assert round(first.books["acc1"].realized, 6) == -60.0
+    assert not trips
+
+    # restart: the books come back and the tail resumes after the saved lines
+    second = _engine(trips)
+    _write(feed, [_line("Buy", 1, 1000, now), _line("Sell", 1, 950, now)])
+    _run(second, tmp_path, lambda: second.tripped is not None)
+    assert second.stats["fills"] == 2
+    assert round(second.books["acc1"].realized, 6) == -110.0
+    assert trips and "account_daily_loss" in trips[0]
+
+
+def test_restart_without_state_replays_today(tmp_path, monkeypatch):
+    monkeypatch.setattr(risk_daemon, "STATE_PATH", tmp_path / "risk_state.json")
+    monkeypatch.setattr(risk_daemon, "POLL_SEC", 0.01)
+    feed = tmp_path / "ws_executions.jsonl"
+    now = int(time.time() * 1000)
+    yesterday = now - 86_400_000
+    _write(feed, [_line("Buy", 1, 1000, yesterday), _line("Sell", 1, 500, yesterday),
+                  _line("Buy", 1, 1000, now), _line("Sell", 1, 880, now)])
+
+    trips: list = []
+    engine = _engine(trips)
+    _run(engine, tmp_path, lambda: engine.tripped is not None)
+    assert engine.stats["fills"] == 2
+    assert round(engine.books["acc1"].realized, 6) == -120.0
+    assert trips
+
+
+def test_late_fill_after_flat_resync_opens_no_position():
+    engine = _engine([])
+    t0 = int(time.time() * 1000) - 1000
+    engine.on_execution_line(_line("Buy", 2, 100, t0))
+    # the resync already reflects the closing fill; its execution line arrives after it
+    engine.on_positions("acc1", [])
+    engine.on_execution_line(_line("Sell", 2, 110, t0 + 10))
+    b = engine.books["acc1"]
+    assert b.pos == {}
+    assert round(b.realized, 6) == 20.0
+    assert b.ghost == {}
+
+    # a fill executed after the resync is a new position
+    engine.on_execution_line(_line("Sell", 1, 110, int(time.time() * 1000) + 1000))
+    assert b.pos["BTCUSDT"][0] == -1.0
+
+
+def test_trips_again_after_day_roll(monkeypatch):
+    clock = [1_700_000_000_000]
+    monkeypatch.setattr(risk_daemon, "_now_ms", lambda: clock[0])
+    trips: list = []
+    engine = _engine(trips)
+    engine.on_execution_line(_line("Buy", 1, 1000, clock[0]))
+    assert engine.on_execution_line(_line("Sell", 1, 850, clock[0])) is not None
+    # still breached, breaker latched: no second trip the same day
+    engine.on_execution_line(_line("Buy", 1, 1000, clock[0]))
+    assert engine.on_execution_line(_line("Sell", 1, 900, clock[0])) is None
+    assert len(trips) == 1
+
+    clock[0] += 86_400_000
+    engine.on_marks({"BTCUSDT": 1000.0})
+    assert engine.tripped is None
+    engine.on_execution_line(_line("Buy", 1, 1000, clock[0]))
+    assert engine.on_execution_line(_line("Sell", 1, 880, clock[0])) is not None
+    assert len(trips) == 2 and engine.tripped["value"] == -120.0
+
+
+def test_trips_again_after_operator_reset():
+    breaker = {"on": False}
+    trips: list = []
+
+    def trip(reason: str) -> None:
+        trips.append(reason)
+        breaker["on"] = True
+
+    engine = _engine(trips, breaker_active=lambda: breaker["on"], trip=trip)
+    now = int(time.time() * 1000)
+    engine.on_execution_line(_line("Buy", 1, 1000, now))
+    assert engine.on_execution_line(_line("Sell", 1, 850, now)) is not None
+    engine.on_marks({"BTCUSDT": 990.0})
+    assert len(trips) == 1
+
+    breaker["on"] = False  # operator reset while still over the limit
+    assert engine.on_marks({"BTCUSDT": 980.0}) is not None
+    assert len(trips) == 2 and breaker["on"]
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from app.core import tp_ladder
+
+
+def _fresh(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(tp_ladder, "LINK_GEN_PATH", tmp_path / "tp_ladder_link_gen.json")
+    monkeypatch.setattr(tp_ladder, "STATE_DIR", tmp_path)
+    monkeypatch.setattr(tp_ladder, "_LINK_GEN", {})
+    monkeypatch.setattr(tp_ladder, "_link_gen_loaded", False)
+
+
+def _create_link(trade_id: str) -> str:
+    diff = tp_ladder.plan_ladder_diff("BTCUSDT", "Buy", [], [(Decimal("101"), Decimal("1"))], trade_id, Decimal("0.1"))
+    return diff.create[0]["orderLinkId"]
+
+
+def test_burned_link_generation_survives_restart(tmp_path, monkeypatch):
+    _fresh(tmp_path, monkeypatch)
+    assert _create_link("T1") == "T1:TP1"
+    tp_ladder._set_link_gen("T1", 1, 2)
+
+    # restart: the table comes back from state
+    monkeypatch.setattr(tp_ladder, "_LINK_GEN", {})
+    monkeypatch.setattr(tp_ladder, "_link_gen_loaded", False)
+    assert _create_link("T1") == "T1:TP1v2"
+
+
+def test_live_order_generation_is_adopted(tmp_path, monkeypatch):
+    _fresh(tmp_path, monkeypatch)
+    live = [{"orderId": "o1", "orderLinkId": "T2:TP1v3", "price": "101", "qty": "1", "leavesQty": "1"}]
+    tp_ladder.plan_ladder_diff("BTCUSDT", "Buy", live, [(Decimal("101"), Decimal("1"))], "T2", Decimal("0.1"))
+    assert tp_ladder._link_gen("T2", 1) == 3
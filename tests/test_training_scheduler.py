@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from app.ai.training_scheduler import TrainingScheduler
+
+# Jobs are stdlib callables so the spawned workers never need to import this module.
+
+
+@pytest.fixture
+def sched():
+    s = TrainingScheduler(max_workers=1, use_gpu=False)
+    try:
+        yield s
+    finally:
+        s.shutdown(wait=False, cancel_pending=True)
+
+
+def _wait_running(fut, timeout: float = 30.0) -> None:
+    end = time.monotonic() + timeout
+    while not fut.running():
+        assert time.monotonic() < end, "job never started"
+        time.sleep(0.01)
+
+
+def test_higher_priority_runs_first_fifo_within_priority(sched):
+    blocker = sched.submit(time.sleep, 0.3, kind="sleep")
+    _wait_running(blocker)  # the single worker is busy, so everything below queues
+
+    done: list = []  # callbacks fire on the collector thread in completion order
+    futs = []
+    for name, prio in (("low", -1), ("high_a", 5), ("mid", 0), ("high_b", 5)):
+        f = sched.submit(time.sleep, 0, kind="sleep", priority=prio)
+        f.add_done_callback(lambda _f, n=name: done.append(n))
+        futs.append(f)
+    for f in futs:
+        f.result(timeout=30)
+    assert done == ["high_a", "high_b", "mid", "low"]
+    assert sched.snapshot()["completed"] == 5
+
+
+def test_cancel_queued_and_running_jobs(sched):
+    running = sched.submit(time.sleep, 30, kind="sleep")
+    queued = sched.submit(time.sleep, 0, kind="sleep")
+    _wait_running(running)
+
+    assert sched.cancel(queued) is True and queued.cancelled()
+    assert sched.cancel(running) is True
+    with pytest.raises(CancelledError):
+        running.result(timeout=5)
+
+    # the killed worker is replaced and keeps serving
+    assert sched.submit(len, "abc").result(timeout=30) == 3
+    snap = sched.snapshot()
+    assert snap["cancelled"] == 2 and snap["respawns"] == 1 and snap["workers"] == 1
+    assert sched.cancel(running) is False
+
+
+def test_timeout_kills_the_job_not_the_pool(sched):
+    slow = sched.submit(time.sleep, 30, kind="sleep", timeout=0.3)
+    with pytest.raises(TimeoutError):
+        slow.result(timeout=30)
+    assert sched.submit(len, "ab", timeout=30).result(timeout=30) == 2
+    snap = sched.snapshot()
+    assert snap["timeouts"] == 1 and snap["respawns"] == 1 and snap["running"] == 0
+
+
+def test_job_errors_reach_the_future(sched):
+    with pytest.raises(TypeError):
+        sched.submit(len, 5).result(timeout=30)
+    assert sched.snapshot()["failed"] == 1